@@ -0,0 +1,21 @@
+"""Регистрация кнопок админ-панели 'adm:*' в роутере button_callback.
+
+app.admin.router импортирует bot_kie, поэтому обработчик подгружается при первом нажатии.
+"""
+from __future__ import annotations
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+
+async def admin_panel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    from app.admin.router import admin_callback
+
+    return await admin_callback(update, context)
+
+
+def register_callback_routes() -> None:
+    from app.buttons.dispatcher import register_callback_handler
+    from app.buttons.registry import CallbackType
+
+    register_callback_handler("adm:", admin_panel_callback, CallbackType.PREFIX, description="Админ-панель")
@@ -16,6 +16,7 @@ from app.config import Settings, get_settings
 from app.storage import get_storage
 from app.telegram_error_handler import ensure_error_handler_registered
 from app.observability.safe_handler import install_safe_handler_wrapper
+from app.session_store import get_session_write_back, install_session_write_back
 from app.utils.logging_config import get_logger
 from app.session_store import get_session_store
 
@@ -188,6 +189,20 @@ async def create_application(settings: Optional[Settings] = None, *, bot_overrid
     
     # Создаем Application с post_init
     async def post_shutdown(app: Application) -> None:
+        write_back = get_session_write_back()
+        if write_back is not None:
+            try:
+                flushed = await write_back.flush_all()
+                await write_back.backend.close()
+                logger.info("[OK] Sessions flushed to %s backend: %s", write_back.backend.name, flushed)
+            except Exception as exc:
+                logger.warning("[SHUTDOWN] Session flush failed: %s", exc)
+        try:
+            from app.generations.telegram_file_cache import flush_file_cache
+
+            await flush_file_cache()
+        except Exception as exc:
+            logger.warning("[SHUTDOWN] Telegram file_id cache flush failed: %s", exc)
         deps = get_deps(app)
         kie_client = deps.get_kie_client()
         close_fn = getattr(kie_client, "close", None)
@@ -201,6 +216,9 @@ async def create_application(settings: Optional[Settings] = None, *, bot_overrid
             if asyncio.iscoroutine(result):
                 await result
             logger.info("[OK] Storage closed")
+        from app.integrations.http_clients import close_http_clients
+
+        await close_http_clients()
 
     request = HTTPXRequest(
         connect_timeout=settings.telegram_http_connect_timeout_seconds,
@@ -231,6 +249,7 @@ async def create_application(settings: Optional[Settings] = None, *, bot_overrid
         setattr(application, "_initialized", True)
     ensure_error_handler_registered(application)
     install_safe_handler_wrapper(application)
+    install_session_write_back(application)
     
     # Инициализируем dependency container
     deps = DependencyContainer()
@@ -8,7 +8,7 @@ from typing import Callable, Dict, Optional
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from app.buttons.registry import ButtonRegistry, CallbackRouter, CallbackType
+from app.buttons.registry import ButtonHandler, ButtonRegistry, CallbackRouter, CallbackType
 from app.buttons.router_config import CALLBACK_ROUTES
 from app.buttons.fallback import fallback_callback_handler
 from app.observability.exception_boundary import handle_update_exception
@@ -18,6 +18,68 @@ logger = logging.getLogger(__name__)
 # Глобальный экземпляр роутера
 _global_router: Optional[CallbackRouter] = None
 _handlers_map: Dict[str, Callable] = {}
+_route_registry: Optional[ButtonRegistry] = None
+
+
+async def legacy_callback_chain(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Маркер: маршрут пока обслуживается цепочкой в bot_kie._button_callback_impl."""
+    raise RuntimeError("legacy_callback_chain is a routing marker and is not called directly")
+
+
+def get_route_registry() -> ButtonRegistry:
+    """
+    Реестр маршрутов для button_callback.
+
+    Все маршруты из CALLBACK_ROUTES изначально указывают на legacy_callback_chain;
+    модули подменяют их своими обработчиками через register_callback_handler().
+    """
+    global _route_registry
+    if _route_registry is None:
+        registry = ButtonRegistry()
+        for callback_data, callback_type, description, handler_name in CALLBACK_ROUTES:
+            registry.register(
+                callback_data=callback_data,
+                handler=legacy_callback_chain,
+                handler_name=handler_name,
+                callback_type=callback_type,
+                description=description,
+            )
+        _route_registry = registry
+    return _route_registry
+
+
+def register_callback_handler(
+    callback_data: str,
+    handler: Callable,
+    callback_type: CallbackType = CallbackType.EXACT,
+    *,
+    handler_name: Optional[str] = None,
+    description: str = "",
+) -> None:
+    """Регистрирует обработчик модуля для маршрута (handler(update, context) -> state)."""
+    registry = get_route_registry()
+    existing = registry.get_handler(callback_data)
+    if existing is not None and existing.callback_data == callback_data:
+        description = description or existing.description
+        registry.unregister(callback_data)
+    registry.register(
+        callback_data=callback_data,
+        handler=handler,
+        handler_name=handler_name,
+        callback_type=callback_type,
+        description=description,
+    )
+
+
+def resolve_callback_route(callback_data: Optional[str]) -> Optional[ButtonHandler]:
+    """O(1) поиск маршрута для callback_data (None для неизвестных)."""
+    if not callback_data:
+        return None
+    return get_route_registry().get_handler(callback_data)
+
+
+def is_legacy_route(route: Optional[ButtonHandler]) -> bool:
+    return route is None or route.handler is legacy_callback_chain
 
 
 def initialize_router(handlers: Dict[str, Callable]) -> CallbackRouter:
@@ -4,11 +4,13 @@ Button Registry and Callback Router
 """
 
 import re
+import time
 import logging
-from typing import Dict, Callable, Optional, List, Set
+from typing import Any, Dict, Callable, Optional, List, Set
 from dataclasses import dataclass
 from enum import Enum
 
+from app.observability.callback_route_metrics import record_route_latency
 from app.observability.exception_boundary import handle_update_exception
 
 logger = logging.getLogger(__name__)
@@ -46,12 +48,28 @@ class ButtonHandler:
     line: int = 0
 
 
+def _segment_key(callback_data: str) -> Optional[str]:
+    """Return "head:" for callback_data with a ':' separator, else None."""
+    head, sep, _ = callback_data.partition(":")
+    return head + sep if sep else None
+
+
 class ButtonRegistry:
-    """Реестр всех кнопок бота"""
-    
+    """Реестр всех кнопок бота.
+
+    Lookup order: exact dict, then the prefix registered for the segment
+    before the first ':' (``gen_type:`` for ``gen_type:text-to-image``), then
+    the longest other prefix via a character trie, then regex patterns.
+    Exact and segment lookups are single dict hits regardless of route count.
+    """
+
+    _TRIE_END = ""
+
     def __init__(self):
         self._handlers: Dict[str, ButtonHandler] = {}
         self._prefix_handlers: List[ButtonHandler] = []
+        self._segment_handlers: Dict[str, ButtonHandler] = {}
+        self._prefix_trie: Dict[str, Any] = {}
         self._pattern_handlers: List[ButtonHandler] = []
         self._all_callbacks: Set[str] = set()
     
@@ -65,7 +83,7 @@ class ButtonRegistry:
         file: str = "",
         line: int = 0
     ):
-        """Регистрирует обработчик кнопки"""
+        """Регистрирует обработчик кнопки (повторная регистрация заменяет прежний)"""
         handler_name = handler_name or handler.__name__
         
         button_handler = ButtonHandler(
@@ -84,19 +102,60 @@ class ButtonRegistry:
             self._handlers[callback_data] = button_handler
             self._all_callbacks.add(callback_data)
         elif callback_type == CallbackType.PREFIX:
+            self._prefix_handlers = [
+                existing for existing in self._prefix_handlers if existing.callback_data != callback_data
+            ]
             self._prefix_handlers.append(button_handler)
+            if _segment_key(callback_data) == callback_data:
+                self._segment_handlers[callback_data] = button_handler
+            else:
+                node = self._prefix_trie
+                for char in callback_data:
+                    node = node.setdefault(char, {})
+                node[self._TRIE_END] = button_handler
         elif callback_type == CallbackType.PATTERN:
             self._pattern_handlers.append(button_handler)
+
+    def unregister(self, callback_data: str) -> None:
+        """Удаляет маршрут (exact, prefix или pattern) с данным callback_data."""
+        if self._handlers.pop(callback_data, None) is not None:
+            self._all_callbacks.discard(callback_data)
+        self._prefix_handlers = [h for h in self._prefix_handlers if h.callback_data != callback_data]
+        self._segment_handlers.pop(callback_data, None)
+        self._pattern_handlers = [h for h in self._pattern_handlers if h.callback_data != callback_data]
+        node = self._prefix_trie
+        for char in callback_data:
+            node = node.get(char)
+            if node is None:
+                return
+        node.pop(self._TRIE_END, None)
+
+    def _longest_trie_prefix(self, callback_data: str) -> Optional[ButtonHandler]:
+        node = self._prefix_trie
+        found = node.get(self._TRIE_END)
+        for char in callback_data:
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(self._TRIE_END, found)
+        return found
     
     def get_handler(self, callback_data: str) -> Optional[ButtonHandler]:
         """Получает обработчик для callback_data"""
         # Точное совпадение
-        if callback_data in self._handlers:
-            return self._handlers[callback_data]
+        handler = self._handlers.get(callback_data)
+        if handler is not None:
+            return handler
         
-        # Префикс
-        for handler in self._prefix_handlers:
-            if callback_data.startswith(handler.callback_data):
+        # Префикс: сегмент до первого ':'
+        segment = _segment_key(callback_data)
+        if segment is not None:
+            handler = self._segment_handlers.get(segment)
+            if handler is not None:
+                return handler
+        if self._prefix_trie:
+            handler = self._longest_trie_prefix(callback_data)
+            if handler is not None:
                 return handler
         
         # Паттерн
@@ -108,6 +167,26 @@ class ButtonRegistry:
                 logger.warning(f"⚠️ Неверный regex паттерн: {handler.callback_data}")
         
         return None
+
+    def match_all(self, callback_data: str) -> List[ButtonHandler]:
+        """Все маршруты, которые подходят под callback_data (для проверки однозначности)."""
+        matches: List[ButtonHandler] = []
+        if callback_data in self._handlers:
+            matches.append(self._handlers[callback_data])
+        matches.extend(
+            handler for handler in self._prefix_handlers if callback_data.startswith(handler.callback_data)
+        )
+        for handler in self._pattern_handlers:
+            try:
+                if re.match(handler.callback_data, callback_data):
+                    matches.append(handler)
+            except re.error:
+                continue
+        return matches
+
+    def iter_routes(self) -> List[ButtonHandler]:
+        """Все зарегистрированные маршруты (exact, prefix, pattern)."""
+        return [*self._handlers.values(), *self._prefix_handlers, *self._pattern_handlers]
     
     def get_all_callbacks(self) -> Set[str]:
         """Возвращает все зарегистрированные callback_data"""
@@ -122,7 +201,15 @@ class ButtonRegistry:
         }
         
         # Проверка дубликатов уже делается при регистрации
-        # Здесь можно добавить дополнительные проверки
+        # Маршруты, перекрывающие друг друга, делают выбор обработчика неочевидным
+        for route in self.iter_routes():
+            overlapping = [
+                other.callback_data
+                for other in self.match_all(route.callback_data)
+                if other is not route and other.callback_type != CallbackType.PATTERN
+            ]
+            if overlapping:
+                issues["warnings"].append(f"{route.callback_data} overlaps {sorted(overlapping)}")
         
         return issues
 
@@ -164,6 +251,7 @@ class CallbackRouter:
             handler_info = self.registry.get_handler(callback_data)
             
             if handler_info:
+                started = time.monotonic()
                 try:
                     await handler_info.handler(update, context)
                     self._stats["handled"] += 1
@@ -179,6 +267,8 @@ class CallbackRouter:
                     self._stats["errors"] += 1
                     await _safe_router_failure(update, context, e, handler_info.handler_name)
                     return False
+                finally:
+                    record_route_latency(handler_info.callback_data, (time.monotonic() - started) * 1000)
             else:
                 # Неизвестный callback - используем fallback
                 if self._fallback_handler:
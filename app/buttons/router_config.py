@@ -18,6 +18,8 @@ CALLBACK_ROUTES: List[Tuple[str, CallbackType, str, str]] = [
     
     # ==================== НАВИГАЦИЯ ====================
     ("cancel", CallbackType.EXACT, "Отмена", "handle_cancel"),
+    ("cancel_command", CallbackType.EXACT, "Отмена текущей задачи", "handle_cancel_command"),
+    ("cancel:", CallbackType.PREFIX, "Отмена задачи по id", "handle_cancel_job"),
     ("reset_step", CallbackType.EXACT, "Сбросить шаг", "handle_reset_step"),
     ("reset_wizard", CallbackType.EXACT, "Сбросить визард", "handle_reset_wizard"),
     ("back_to_confirmation", CallbackType.EXACT, "Назад к подтверждению", "handle_back_to_confirmation"),
@@ -33,6 +35,8 @@ CALLBACK_ROUTES: List[Tuple[str, CallbackType, str, str]] = [
     ("category:", CallbackType.PREFIX, "Выбор категории", "handle_category"),
     ("free_tools", CallbackType.EXACT, "Бесплатные инструменты", "handle_free_tools"),
     ("other_models", CallbackType.EXACT, "Другие модели", "handle_other_models"),
+    ("fast_tools", CallbackType.EXACT, "Быстрые инструменты", "handle_fast_tools"),
+    ("special_tools", CallbackType.EXACT, "Специальные инструменты", "handle_special_tools"),
     
     # ==================== ВЫБОР МОДЕЛИ ====================
     ("m:", CallbackType.PREFIX, "Выбор модели (короткий формат)", "handle_model_select"),
@@ -94,6 +98,7 @@ CALLBACK_ROUTES: List[Tuple[str, CallbackType, str, str]] = [
     ("set_language:", CallbackType.PREFIX, "Изменить язык", "handle_set_language"),
     ("retry_generate:", CallbackType.PREFIX, "Повторить генерацию", "handle_retry_generate"),
     ("retry_delivery:", CallbackType.PREFIX, "Повторить доставку", "handle_retry_delivery"),
+    ("open_result:", CallbackType.PREFIX, "Открыть результат", "handle_open_result"),
     
     # ==================== АДМИНКА ====================
     ("admin_user_mode", CallbackType.EXACT, "Режим пользователя (админ)", "handle_admin_user_mode"),
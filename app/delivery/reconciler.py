@@ -5,8 +5,10 @@ import asyncio
 import inspect
 import logging
 import os
+import random
 import time
 from datetime import datetime
+from itertools import zip_longest
 from typing import Any, Callable, Dict, Iterable, Optional
 
 from app.config import get_settings
@@ -16,8 +18,13 @@ from app.generations.universal_engine import (
     _validate_result_urls,
     parse_record_info,
 )
+from app.kie.callbacks import KIE_CALLBACK_SAFETY_POLL_SECONDS, callbacks_enabled
 from app.kie_catalog import get_model
-from app.observability.delivery_metrics import metrics_snapshot as delivery_metrics_snapshot, record_pending_age
+from app.observability.delivery_metrics import (
+    metrics_snapshot as delivery_metrics_snapshot,
+    record_pending_age,
+    record_reconcile_sweep,
+)
 from app.observability.structured_logs import log_structured_event
 from app.observability.task_lifecycle import log_task_lifecycle
 from app.observability.correlation_store import register_correlation_ids
@@ -44,6 +51,14 @@ FAILED_STATES = {"failed", "canceled"}
 DELIVERED_STATES = {"delivered"}
 DELIVERY_POLL_TIMEOUT_SECONDS = int(os.getenv("DELIVERY_POLL_TIMEOUT_SECONDS", "300"))
 DELIVERY_RECONCILER_MAX_BACKOFF_SECONDS = int(os.getenv("DELIVERY_RECONCILER_MAX_BACKOFF_SECONDS", "60"))
+DELIVERY_POLL_CONCURRENCY = int(os.getenv("DELIVERY_POLL_CONCURRENCY", "8"))
+DELIVERY_DELIVER_CONCURRENCY = int(os.getenv("DELIVERY_DELIVER_CONCURRENCY", "4"))
+DELIVERY_POLL_BASE_SECONDS_IMAGE = float(os.getenv("DELIVERY_POLL_BASE_SECONDS_IMAGE", "5"))
+DELIVERY_POLL_BASE_SECONDS_VIDEO = float(os.getenv("DELIVERY_POLL_BASE_SECONDS_VIDEO", "15"))
+DELIVERY_POLL_MAX_SECONDS = float(os.getenv("DELIVERY_POLL_MAX_SECONDS", "120"))
+DELIVERY_POLL_JITTER_RATIO = float(os.getenv("DELIVERY_POLL_JITTER_RATIO", "0.2"))
+# Provider has not started the task yet: no point checking as often as a running one.
+_NOT_STARTED_STATES = {"queued", "waiting", "queuing", "pending"}
 
 
 def _delivery_key(user_id: int, task_id: str) -> str:
@@ -930,6 +945,219 @@ async def deliver_job_result(
     return delivered
 
 
+async def apply_task_status(
+    bot,
+    storage,
+    *,
+    job: Dict[str, Any],
+    status: Dict[str, Any],
+    source: str,
+    age_s: Optional[float] = None,
+    get_user_language: Optional[Callable[[int], str]] = None,
+) -> str:
+    """Apply a provider status record (poll or callback) to a pending job.
+
+    Returns the canonical state that was applied.
+    """
+    task_id = job.get("task_id") or job.get("external_task_id") or status.get("taskId")
+    correlation_id = job.get("correlation_id") or job.get("request_id")
+    request_id = job.get("request_id") or correlation_id
+    job_id_value = job.get("job_id") or task_id
+    resolution = normalize_provider_state(status.get("state"))
+    status_state = resolution.canonical_state
+    raw_state = resolution.raw_state or str(status.get("state") or "")
+    status["_raw_state"] = raw_state
+    status["state"] = status_state
+    status["taskId"] = task_id
+    if status_state in SUCCESS_STATES:
+        if age_s is not None:
+            record_wait_latency(int(age_s * 1000))
+        try:
+            await storage.update_job_status(job_id_value, "success")
+        except Exception as storage_exc:
+            logger.warning("Failed to update job success status: %s", storage_exc)
+        # Whether the result actually reached the user; read by the reconciler's sweep metrics.
+        status["_delivered"] = await deliver_job_result(
+            bot,
+            storage,
+            job=job,
+            status_record=status,
+            notify_user=True,
+            source=source,
+            get_user_language=get_user_language,
+        )
+    elif status_state in {"queued", "waiting"}:
+        try:
+            await storage.update_job_status(job_id_value, status_state)
+        except Exception as storage_exc:
+            logger.warning("Failed to update job state=%s: %s", status_state, storage_exc)
+        log_structured_event(
+            correlation_id=correlation_id,
+            request_id=request_id,
+            user_id=job.get("user_id"),
+            chat_id=job.get("chat_id") or job.get("user_id"),
+            action="KIE_POLL",
+            action_path=source,
+            model_id=job.get("model_id"),
+            task_id=task_id,
+            job_id=job_id_value,
+            stage="KIE_POLL",
+            outcome=status_state,
+            param={"raw_state": raw_state},
+        )
+        if status_state == "waiting":
+            await _maybe_notify_waiting(
+                bot,
+                storage,
+                job,
+                raw_state=raw_state,
+                get_user_language=get_user_language,
+            )
+    elif status_state in FAILED_STATES:
+        try:
+            await storage.update_job_status(
+                job_id_value,
+                "failed",
+                error_message=status.get("failMsg"),
+                error_code=status.get("failCode") or "KIE_FAIL_STATE",
+            )
+        except Exception as storage_exc:
+            logger.warning("Failed to update job failure: %s", storage_exc)
+        prompt_hash = job.get("prompt_hash")
+        model_id = job.get("model_id")
+        user_id = job.get("user_id")
+        if prompt_hash and model_id and user_id is not None:
+            try:
+                from app.generations.request_dedupe_store import update_dedupe_entry
+
+                await update_dedupe_entry(
+                    int(user_id),
+                    str(model_id),
+                    str(prompt_hash),
+                    job_id=job.get("job_id"),
+                    task_id=task_id,
+                    status="failed",
+                    request_id=request_id,
+                    result_text=status.get("failMsg"),
+                )
+            except Exception as dedupe_exc:
+                logger.warning("delivery_dedupe_fail_update_failed task_id=%s error=%s", task_id, dedupe_exc)
+        if user_id is not None:
+            lang = get_user_language(user_id) if get_user_language else "ru"
+            fail_hint = (status.get("failMsg") or "").strip()
+            if len(fail_hint) > 140:
+                fail_hint = f"{fail_hint[:137]}…"
+            error_text = build_error_message(correlation_id, lang=lang, hint=fail_hint or None)
+            try:
+                await bot.send_message(chat_id=job.get("chat_id") or user_id, text=error_text, parse_mode="HTML")
+            except Exception as exc:
+                logger.warning("delivery_error_notify_failed task_id=%s error=%s", task_id, exc)
+        log_structured_event(
+            correlation_id=correlation_id,
+            request_id=request_id,
+            user_id=user_id,
+            chat_id=job.get("chat_id") or user_id,
+            action="KIE_POLL",
+            action_path=source,
+            model_id=model_id,
+            task_id=task_id,
+            job_id=job_id_value,
+            stage="KIE_POLL",
+            outcome="failed",
+            error_code=status.get("failCode") or "KIE_FAIL_STATE",
+            fix_hint=status.get("failMsg"),
+            param={"raw_state": raw_state},
+        )
+        log_task_lifecycle(
+            state="failed",
+            user_id=user_id,
+            task_id=task_id,
+            job_id=job.get("job_id"),
+            model_id=model_id,
+            correlation_id=correlation_id,
+            source=source,
+            detail={"reason": "provider_failed"},
+        )
+    return status_state
+
+
+def _job_media_kind(job: Dict[str, Any]) -> str:
+    model_id = str(job.get("model_id") or "")
+    spec = get_model(model_id) if model_id else None
+    media_type = getattr(spec, "output_media_type", None) if spec else None
+    if media_type:
+        return str(media_type)
+    return "video" if "video" in model_id.lower() else "image"
+
+
+def next_poll_delay(
+    media_kind: str,
+    state: Optional[str],
+    *,
+    streak: int,
+    rng: Callable[[], float] = random.random,
+) -> float:
+    """Jittered delay before the next status poll of a pending task."""
+    base = DELIVERY_POLL_BASE_SECONDS_VIDEO if media_kind == "video" else DELIVERY_POLL_BASE_SECONDS_IMAGE
+    state_l = str(state or "").lower()
+    if not state_l:
+        factor = 1.5
+    elif state_l in _NOT_STARTED_STATES:
+        factor = 2.0
+    else:
+        factor = 1.0
+    delay = min(DELIVERY_POLL_MAX_SECONDS, base * factor * (2 ** min(max(streak, 0), 4)))
+    jitter = 1.0 + DELIVERY_POLL_JITTER_RATIO * (2.0 * rng() - 1.0)
+    return max(0.0, delay * jitter)
+
+
+class PollSchedule:
+    """Per-task next-poll deadlines kept across reconciler sweeps."""
+
+    def __init__(
+        self,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self._clock = clock
+        self._rng = rng
+        self._entries: Dict[str, tuple[float, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_due(self, task_id: str) -> bool:
+        entry = self._entries.get(task_id)
+        return entry is None or self._clock() >= entry[0]
+
+    def record(self, task_id: str, *, media_kind: str, state: Optional[str]) -> float:
+        _, streak = self._entries.get(task_id, (0.0, 0))
+        delay = next_poll_delay(media_kind, state, streak=streak, rng=self._rng)
+        self._entries[task_id] = (self._clock() + delay, streak + 1)
+        return delay
+
+    def forget(self, task_id: str) -> None:
+        self._entries.pop(task_id, None)
+
+    def prune(self, active_task_ids: Iterable[str]) -> None:
+        active = set(active_task_ids)
+        for task_id in list(self._entries):
+            if task_id not in active:
+                self._entries.pop(task_id, None)
+
+
+def interleave_jobs_by_user(jobs: Iterable[Dict[str, Any]]) -> list[Dict[str, Any]]:
+    """Round-robin jobs across users, keeping each user's own order."""
+    per_user: Dict[Any, list[Dict[str, Any]]] = {}
+    for job in jobs:
+        per_user.setdefault(job.get("user_id"), []).append(job)
+    ordered: list[Dict[str, Any]] = []
+    for round_jobs in zip_longest(*per_user.values()):
+        ordered.extend(job for job in round_jobs if job is not None)
+    return ordered
+
+
 async def reconcile_pending_results(
     bot,
     storage,
@@ -939,9 +1167,20 @@ async def reconcile_pending_results(
     pending_age_alert_seconds: int,
     queue_tail_alert_threshold: int,
     get_user_language: Optional[Callable[[int], str]] = None,
+    schedule: Optional[PollSchedule] = None,
+    poll_concurrency: Optional[int] = None,
+    deliver_concurrency: Optional[int] = None,
 ) -> None:
+    sweep_started = time.monotonic()
     jobs = await storage.list_jobs_by_status(list(PENDING_STATES), limit=batch_limit)
     if not jobs:
+        record_reconcile_sweep(
+            duration_seconds=time.monotonic() - sweep_started,
+            queue_depth=0,
+            due=0,
+            delivered=0,
+            deferred=0,
+        )
         return
 
     now_ts = time.time()
@@ -983,143 +1222,122 @@ async def reconcile_pending_results(
             param={"pending_count": len(jobs), "threshold": queue_tail_alert_threshold},
         )
 
-    for job in jobs:
+    callback_mode = callbacks_enabled()
+    poll_semaphore = asyncio.Semaphore(max(1, poll_concurrency or DELIVERY_POLL_CONCURRENCY))
+    deliver_semaphore = asyncio.Semaphore(max(1, deliver_concurrency or DELIVERY_DELIVER_CONCURRENCY))
+    user_locks: Dict[Any, asyncio.Lock] = {}
+    due_jobs = []
+    for job in interleave_jobs_by_user(jobs):
         task_id = job.get("task_id") or job.get("external_task_id")
         if not task_id:
             continue
         age_s = _job_age_seconds(job, now_ts=now_ts)
-        await _maybe_notify_timeout(
-            bot,
-            storage,
-            job,
-            age_s=age_s,
-            timeout_seconds=DELIVERY_POLL_TIMEOUT_SECONDS,
-            get_user_language=get_user_language,
-        )
-        correlation_id = job.get("correlation_id") or job.get("request_id")
-        request_id = job.get("request_id") or correlation_id
-        job_id_value = job.get("job_id") or task_id
-        try:
-            status = await kie_client.get_task_status(task_id, correlation_id=correlation_id)
-        except Exception as exc:
-            logger.warning("delivery_status_poll_failed task_id=%s error=%s", task_id, exc)
+        if callback_mode and age_s is not None and age_s < KIE_CALLBACK_SAFETY_POLL_SECONDS:
+            # Fresh tasks complete via KIE callbacks; only stragglers are polled.
             continue
-        if not status.get("ok"):
+        if schedule is not None and not schedule.is_due(str(task_id)):
             continue
-        resolution = normalize_provider_state(status.get("state"))
-        status_state = resolution.canonical_state
-        raw_state = resolution.raw_state or str(status.get("state") or "")
-        status["_raw_state"] = raw_state
-        status["state"] = status_state
-        status["taskId"] = task_id
-        if status_state in SUCCESS_STATES:
-            if age_s is not None:
-                record_wait_latency(int(age_s * 1000))
+        due_jobs.append((job, str(task_id), age_s))
+
+    async def _poll(job: Dict[str, Any], task_id: str, age_s: Optional[float]):
+        async with poll_semaphore:
+            await _maybe_notify_timeout(
+                bot,
+                storage,
+                job,
+                age_s=age_s,
+                timeout_seconds=DELIVERY_POLL_TIMEOUT_SECONDS,
+                get_user_language=get_user_language,
+            )
+            correlation_id = job.get("correlation_id") or job.get("request_id")
             try:
-                await storage.update_job_status(job_id_value, "success")
-            except Exception as storage_exc:
-                logger.warning("Failed to update job success status: %s", storage_exc)
-            await deliver_job_result(
+                status = await kie_client.get_task_status(task_id, correlation_id=correlation_id)
+            except Exception as exc:
+                logger.warning("delivery_status_poll_failed task_id=%s error=%s", task_id, exc)
+                if schedule is not None:
+                    schedule.record(task_id, media_kind=_job_media_kind(job), state=None)
+                return None
+            if not status.get("ok"):
+                if schedule is not None:
+                    schedule.record(task_id, media_kind=_job_media_kind(job), state=None)
+                return None
+            resolution = normalize_provider_state(status.get("state"))
+            if resolution.canonical_state in SUCCESS_STATES:
+                return job, status, age_s
+            await apply_task_status(
                 bot,
                 storage,
                 job=job,
-                status_record=status,
-                notify_user=True,
+                status=status,
                 source="delivery_reconciler",
+                age_s=age_s,
                 get_user_language=get_user_language,
             )
-        elif status_state in {"queued", "waiting"}:
-            try:
-                await storage.update_job_status(job_id_value, status_state)
-            except Exception as storage_exc:
-                logger.warning("Failed to update job state=%s: %s", status_state, storage_exc)
-            log_structured_event(
-                correlation_id=correlation_id,
-                request_id=request_id,
-                user_id=job.get("user_id"),
-                chat_id=job.get("chat_id") or job.get("user_id"),
-                action="KIE_POLL",
-                action_path="delivery_reconciler",
-                model_id=job.get("model_id"),
-                task_id=task_id,
-                job_id=job_id_value,
-                stage="KIE_POLL",
-                outcome=status_state,
-                param={"raw_state": raw_state},
-            )
-            if status_state == "waiting":
-                await _maybe_notify_waiting(
+            if schedule is not None:
+                if resolution.canonical_state in FAILED_STATES:
+                    schedule.forget(task_id)
+                else:
+                    schedule.record(
+                        task_id,
+                        media_kind=_job_media_kind(job),
+                        state=resolution.raw_state or resolution.canonical_state,
+                    )
+            return None
+
+    async def _deliver(job: Dict[str, Any], status: Dict[str, Any], age_s: Optional[float]) -> bool:
+        # One delivery per user at a time, so a single heavy user cannot hold every slot.
+        user_lock = user_locks.setdefault(job.get("user_id"), asyncio.Lock())
+        async with user_lock:
+            async with deliver_semaphore:
+                await apply_task_status(
                     bot,
                     storage,
-                    job,
-                    raw_state=raw_state,
+                    job=job,
+                    status=status,
+                    source="delivery_reconciler",
+                    age_s=age_s,
                     get_user_language=get_user_language,
                 )
-        elif status_state in FAILED_STATES:
-            try:
-                await storage.update_job_status(
-                    job_id_value,
-                    "failed",
-                    error_message=status.get("failMsg"),
-                    error_code=status.get("failCode") or "KIE_FAIL_STATE",
-                )
-            except Exception as storage_exc:
-                logger.warning("Failed to update job failure: %s", storage_exc)
-            prompt_hash = job.get("prompt_hash")
-            model_id = job.get("model_id")
-            user_id = job.get("user_id")
-            if prompt_hash and model_id and user_id is not None:
-                try:
-                    from app.generations.request_dedupe_store import update_dedupe_entry
-
-                    await update_dedupe_entry(
-                        int(user_id),
-                        str(model_id),
-                        str(prompt_hash),
-                        job_id=job.get("job_id"),
-                        task_id=task_id,
-                        status="failed",
-                        request_id=request_id,
-                        result_text=status.get("failMsg"),
-                    )
-                except Exception as dedupe_exc:
-                    logger.warning("delivery_dedupe_fail_update_failed task_id=%s error=%s", task_id, dedupe_exc)
-            if user_id is not None:
-                lang = get_user_language(user_id) if get_user_language else "ru"
-                fail_hint = (status.get("failMsg") or "").strip()
-                if len(fail_hint) > 140:
-                    fail_hint = f"{fail_hint[:137]}…"
-                error_text = build_error_message(correlation_id, lang=lang, hint=fail_hint or None)
-                try:
-                    await bot.send_message(chat_id=job.get("chat_id") or user_id, text=error_text, parse_mode="HTML")
-                except Exception as exc:
-                    logger.warning("delivery_error_notify_failed task_id=%s error=%s", task_id, exc)
-            log_structured_event(
-                correlation_id=correlation_id,
-                request_id=request_id,
-                user_id=user_id,
-                chat_id=job.get("chat_id") or user_id,
-                action="KIE_POLL",
-                action_path="delivery_reconciler",
-                model_id=model_id,
-                task_id=task_id,
-                job_id=job_id_value,
-                stage="KIE_POLL",
-                outcome="failed",
-                error_code=status.get("failCode") or "KIE_FAIL_STATE",
-                fix_hint=status.get("failMsg"),
-                param={"raw_state": raw_state},
-            )
-            log_task_lifecycle(
-                state="failed",
-                user_id=user_id,
-                task_id=task_id,
-                job_id=job.get("job_id"),
-                model_id=model_id,
-                correlation_id=correlation_id,
-                source="delivery_reconciler",
-                detail={"reason": "provider_failed"},
-            )
+        return status.get("_delivered") is True
+
+    async def _poll_then_deliver(job: Dict[str, Any], task_id: str, age_s: Optional[float]) -> bool:
+        # Each ready job goes straight to delivery; a slow poll elsewhere does not hold it back.
+        try:
+            ready = await _poll(job, task_id, age_s)
+        except Exception as exc:
+            logger.warning("delivery_poll_stage_failed task_id=%s error=%s", task_id, exc)
+            return False
+        if ready is None:
+            return False
+        try:
+            delivered = await _deliver(*ready)
+        except Exception as exc:
+            logger.warning("delivery_deliver_stage_failed task_id=%s error=%s", task_id, exc)
+            if schedule is not None:
+                schedule.record(task_id, media_kind=_job_media_kind(job), state=None)
+            return False
+        if schedule is not None:
+            schedule.forget(task_id)
+        return delivered
+
+    outcomes = await asyncio.gather(
+        *(_poll_then_deliver(job, task_id, age_s) for job, task_id, age_s in due_jobs),
+        return_exceptions=True,
+    )
+    delivered = sum(1 for outcome in outcomes if outcome is True)
+    if schedule is not None:
+        schedule.prune(
+            str(job.get("task_id") or job.get("external_task_id"))
+            for job in jobs
+            if job.get("task_id") or job.get("external_task_id")
+        )
+    record_reconcile_sweep(
+        duration_seconds=time.monotonic() - sweep_started,
+        queue_depth=len(jobs),
+        due=len(due_jobs),
+        delivered=delivered,
+        deferred=len(jobs) - len(due_jobs),
+    )
 
     snapshot = {
         "delivery": delivery_metrics_snapshot(),
@@ -1148,6 +1366,7 @@ async def run_reconciler_loop(
     backoff_seconds = interval_seconds
     db_backoff_seconds = 0
     max_backoff = max(interval_seconds, DELIVERY_RECONCILER_MAX_BACKOFF_SECONDS)
+    schedule = PollSchedule()
     while True:
         try:
             await reconcile_pending_results(
@@ -1158,6 +1377,7 @@ async def run_reconciler_loop(
                 pending_age_alert_seconds=pending_age_alert_seconds,
                 queue_tail_alert_threshold=queue_tail_alert_threshold,
                 get_user_language=get_user_language,
+                schedule=schedule,
             )
             backoff_seconds = interval_seconds
             db_backoff_seconds = 0
@@ -15,6 +15,7 @@ from urllib.parse import urlparse
 import aiohttp
 from telegram import InputFile
 
+from app.integrations.http_clients import get_session
 from app.observability.structured_logs import log_structured_event
 from app.observability.trace import trace_event, url_summary
 from app.utils.url_normalizer import is_valid_result_url
@@ -170,7 +171,7 @@ async def _download_with_retries(
     last_error: Optional[Exception] = None
     for attempt in range(attempts):
         try:
-            async with session.get(url, allow_redirects=True) as response:
+            async with session.get(url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT) as response:
                 if response.status >= 400:
                     raise RuntimeError(f"HTTP {response.status}")
                 data = await response.read()
@@ -232,116 +233,116 @@ async def deliver_generation_result(
             await context.bot.send_message(chat_id=chat_id, text=caption_text, parse_mode="HTML")
         return
 
-    async with aiohttp.ClientSession(timeout=DOWNLOAD_TIMEOUT) as session:
-        for index, url in enumerate(urls, start=1):
-            if not is_valid_result_url(url):
-                log_structured_event(
-                    correlation_id=correlation_id,
-                    user_id=chat_id,
-                    chat_id=chat_id,
-                    model_id=model_id,
-                    gen_type=gen_type,
-                    action="DELIVERY_VALIDATE",
-                    action_path="result_delivery.deliver_generation_result",
-                    stage="DELIVERY",
-                    waiting_for="URL_VALIDATE",
-                    outcome="failed",
-                    error_code="INVALID_RESULT_URL",
-                    fix_hint="check_kie_response_url_fields",
-                    param={"url": url_summary(url)},
+    session = await get_session("cdn")
+    for index, url in enumerate(urls, start=1):
+        if not is_valid_result_url(url):
+            log_structured_event(
+                correlation_id=correlation_id,
+                user_id=chat_id,
+                chat_id=chat_id,
+                model_id=model_id,
+                gen_type=gen_type,
+                action="DELIVERY_VALIDATE",
+                action_path="result_delivery.deliver_generation_result",
+                stage="DELIVERY",
+                waiting_for="URL_VALIDATE",
+                outcome="failed",
+                error_code="INVALID_RESULT_URL",
+                fix_hint="check_kie_response_url_fields",
+                param={"url": url_summary(url)},
+            )
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text=(
+                    "⚠️ Результат получен, но ссылка битая. Попробуйте ещё раз или выберите другую модель.\n"
+                    f"ID: {correlation_id or 'corr-na-na'}"
+                ),
+            )
+            continue
+        try:
+            target = await _download_with_retries(session, url)
+            real_type = _resolve_real_mime(target.content_type, target.data, target.url)
+            if _looks_like_html(target.data, real_type):
+                message = (
+                    "⚠️ KIE вернул html/preview, нужен другой url.\n"
+                    f"{target.url}"
                 )
                 await context.bot.send_message(
                     chat_id=chat_id,
-                    text=(
-                        "⚠️ Результат получен, но ссылка битая. Попробуйте ещё раз или выберите другую модель.\n"
-                        f"ID: {correlation_id or 'corr-na-na'}"
-                    ),
+                    text=message,
+                    disable_web_page_preview=True,
                 )
                 continue
-            try:
-                target = await _download_with_retries(session, url)
-                real_type = _resolve_real_mime(target.content_type, target.data, target.url)
-                if _looks_like_html(target.data, real_type):
-                    message = (
-                        "⚠️ KIE вернул html/preview, нужен другой url.\n"
-                        f"{target.url}"
-                    )
-                    await context.bot.send_message(
-                        chat_id=chat_id,
-                        text=message,
-                        disable_web_page_preview=True,
-                    )
-                    continue
-
-                if _is_textual_type(real_type):
-                    filename = _derive_filename(target.url, real_type, index, filename_prefix)
-                    payload = InputFile(io.BytesIO(target.data), filename=filename)
-                    await context.bot.send_document(chat_id=chat_id, document=payload)
-                    continue
-
-                if target.size_bytes > SAFE_UPLOAD_BYTES or not prefer_upload:
-                    message = (
-                        "⚠️ Файл слишком большой для Telegram.\n"
-                        f"{target.url}"
-                    )
-                    await context.bot.send_message(
-                        chat_id=chat_id,
-                        text=message,
-                        disable_web_page_preview=True,
-                    )
-                    continue
 
+            if _is_textual_type(real_type):
                 filename = _derive_filename(target.url, real_type, index, filename_prefix)
                 payload = InputFile(io.BytesIO(target.data), filename=filename)
-                method = _method_for_type(real_type)
-                payload_key = {
-                    "send_photo": "photo",
-                    "send_video": "video",
-                    "send_audio": "audio",
-                }.get(method, "document")
-                kwargs = {payload_key: payload}
-                if caption_text and index == 1:
-                    kwargs["caption"] = caption_text
-                    kwargs["parse_mode"] = "HTML"
-                await getattr(context.bot, method)(chat_id=chat_id, **kwargs)
-                log_structured_event(
-                    correlation_id=correlation_id,
-                    user_id=chat_id,
-                    chat_id=chat_id,
-                    model_id=model_id,
-                    gen_type=gen_type,
-                    action="DELIVERY_ITEM",
-                    action_path="result_delivery.deliver_generation_result",
-                    stage="DELIVERY",
-                    outcome="sent",
-                    duration_ms=int((time.monotonic() - start_ts) * 1000),
-                    param={"url": url_summary(target.url), "method": method},
-                )
-            except Exception as exc:
-                error_id = _short_error_id()
-                logger.error("Delivery failure for %s: %s", url, exc, exc_info=True)
-                log_structured_event(
-                    correlation_id=correlation_id,
-                    user_id=chat_id,
-                    chat_id=chat_id,
-                    model_id=model_id,
-                    gen_type=gen_type,
-                    action="DELIVERY_FAIL",
-                    action_path="result_delivery.deliver_generation_result",
-                    stage="DELIVERY",
-                    outcome="failed",
-                    duration_ms=int((time.monotonic() - start_ts) * 1000),
-                    error_id=error_id,
-                    error_code="TG_DELIVERY_FAILED",
-                    fix_hint="send_url_fallback",
-                    param={"url": url_summary(url), "error": str(exc)},
+                await context.bot.send_document(chat_id=chat_id, document=payload)
+                continue
+
+            if target.size_bytes > SAFE_UPLOAD_BYTES or not prefer_upload:
+                message = (
+                    "⚠️ Файл слишком большой для Telegram.\n"
+                    f"{target.url}"
                 )
                 await context.bot.send_message(
                     chat_id=chat_id,
-                    text=(
-                        "⚠️ Не удалось отправить файл через Telegram.\n"
-                        f"Ссылка: {url}\n"
-                        f"ID: {error_id}"
-                    ),
+                    text=message,
                     disable_web_page_preview=True,
                 )
+                continue
+
+            filename = _derive_filename(target.url, real_type, index, filename_prefix)
+            payload = InputFile(io.BytesIO(target.data), filename=filename)
+            method = _method_for_type(real_type)
+            payload_key = {
+                "send_photo": "photo",
+                "send_video": "video",
+                "send_audio": "audio",
+            }.get(method, "document")
+            kwargs = {payload_key: payload}
+            if caption_text and index == 1:
+                kwargs["caption"] = caption_text
+                kwargs["parse_mode"] = "HTML"
+            await getattr(context.bot, method)(chat_id=chat_id, **kwargs)
+            log_structured_event(
+                correlation_id=correlation_id,
+                user_id=chat_id,
+                chat_id=chat_id,
+                model_id=model_id,
+                gen_type=gen_type,
+                action="DELIVERY_ITEM",
+                action_path="result_delivery.deliver_generation_result",
+                stage="DELIVERY",
+                outcome="sent",
+                duration_ms=int((time.monotonic() - start_ts) * 1000),
+                param={"url": url_summary(target.url), "method": method},
+            )
+        except Exception as exc:
+            error_id = _short_error_id()
+            logger.error("Delivery failure for %s: %s", url, exc, exc_info=True)
+            log_structured_event(
+                correlation_id=correlation_id,
+                user_id=chat_id,
+                chat_id=chat_id,
+                model_id=model_id,
+                gen_type=gen_type,
+                action="DELIVERY_FAIL",
+                action_path="result_delivery.deliver_generation_result",
+                stage="DELIVERY",
+                outcome="failed",
+                duration_ms=int((time.monotonic() - start_ts) * 1000),
+                error_id=error_id,
+                error_code="TG_DELIVERY_FAILED",
+                fix_hint="send_url_fallback",
+                param={"url": url_summary(url), "error": str(exc)},
+            )
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text=(
+                    "⚠️ Не удалось отправить файл через Telegram.\n"
+                    f"Ссылка: {url}\n"
+                    f"ID: {error_id}"
+                ),
+                disable_web_page_preview=True,
+            )
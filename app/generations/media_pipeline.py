@@ -1,23 +1,37 @@
 """Universal media pipeline for Telegram delivery."""
 from __future__ import annotations
 
-import io
+import asyncio
 import logging
 import mimetypes
 import os
-from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+import tempfile
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urlparse, urlunparse
 
 import aiohttp
-from telegram import InputFile, InputMediaPhoto, InputMediaVideo
+from telegram import Bot, InputFile, InputMediaPhoto, InputMediaVideo, Message
+from telegram.error import RetryAfter, TelegramError
 
+from app.integrations.http_clients import get_session
 from app.observability.structured_logs import log_structured_event
 
 logger = logging.getLogger(__name__)
 
 TELEGRAM_MAX_BYTES = int(os.getenv("TELEGRAM_MAX_FILE_BYTES", str(50 * 1024 * 1024)))
 TELEGRAM_URL_DIRECT = os.getenv("TELEGRAM_URL_DIRECT", "0") == "1"
+MEDIA_HEAD_PRECHECK = os.getenv("MEDIA_HEAD_PRECHECK", "1") != "0"
+MEDIA_STREAM_CHUNK_BYTES = int(os.getenv("MEDIA_STREAM_CHUNK_BYTES", str(256 * 1024)))
+MEDIA_SPOOL_MAX_MEMORY_BYTES = int(os.getenv("MEDIA_SPOOL_MAX_MEMORY_BYTES", str(2 * 1024 * 1024)))
+MEDIA_INFLIGHT_BUDGET_BYTES = int(os.getenv("MEDIA_INFLIGHT_BUDGET_BYTES", str(200 * 1024 * 1024)))
+# How long a download waits for budget before the item is sent by URL instead.
+MEDIA_BUDGET_WAIT_SECONDS = float(os.getenv("MEDIA_BUDGET_WAIT_SECONDS", "30"))
+MEDIA_STREAM_UPLOAD = os.getenv("MEDIA_STREAM_UPLOAD", "1") != "0"
+MEDIA_UPLOAD_TIMEOUT_SECONDS = float(os.getenv("MEDIA_UPLOAD_TIMEOUT_SECONDS", "300"))
+MEDIA_RESOLVE_CONCURRENCY = int(os.getenv("MEDIA_RESOLVE_CONCURRENCY", "4"))
 
 
 def _skip_media_download() -> bool:
@@ -42,6 +56,143 @@ class ResolvedMedia:
     error_code: Optional[str]
 
 
+class MediaBudgetExhausted(RuntimeError):
+    """No budget became free within MEDIA_BUDGET_WAIT_SECONDS."""
+
+
+class MediaByteBudget:
+    """Global cap on in-memory media bytes: downloads in progress plus memory-backed spools.
+
+    A finished download that rolled over to disk releases its reservation,
+    so items waiting for upload (e.g. the rest of a media group) cannot starve
+    the downloads they are waiting for.
+    """
+
+    def __init__(self, capacity_bytes: int) -> None:
+        self.capacity_bytes = max(1, int(capacity_bytes))
+        self._in_use = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    async def acquire(self, nbytes: int, *, timeout: Optional[float] = None) -> int:
+        amount = min(max(1, int(nbytes)), self.capacity_bytes)
+        if not self._waiters and self._in_use + amount <= self.capacity_bytes:
+            self._in_use += amount
+            return amount
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        entry = (amount, future)
+        self._waiters.append(entry)
+        try:
+            if timeout is None:
+                await future
+            else:
+                try:
+                    await asyncio.wait_for(future, timeout=timeout)
+                except asyncio.TimeoutError:
+                    raise MediaBudgetExhausted(
+                        f"media budget busy: need={amount} in_use={self._in_use} capacity={self.capacity_bytes}"
+                    ) from None
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                # Smaller requests queued behind this one may fit now.
+                self._wake_waiters()
+            elif future.done() and not future.cancelled():
+                self.release(amount)
+            raise
+        return amount
+
+    def release(self, nbytes: int) -> None:
+        self._in_use = max(0, self._in_use - int(nbytes))
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters:
+            amount, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if self._in_use + amount > self.capacity_bytes:
+                break
+            self._waiters.popleft()
+            self._in_use += amount
+            future.set_result(None)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "capacity_bytes": self.capacity_bytes,
+            "in_use_bytes": self._in_use,
+            "waiters": len(self._waiters),
+        }
+
+
+_media_budget = MediaByteBudget(MEDIA_INFLIGHT_BUDGET_BYTES)
+
+
+def get_media_budget() -> MediaByteBudget:
+    return _media_budget
+
+
+@dataclass
+class SpooledMedia:
+    """Downloaded body: small files stay in memory, large ones roll over to disk."""
+
+    head: bytes
+    size: int
+    file: Optional[Any] = None
+    reserved_bytes: int = 0
+    _finalizer: Optional[Any] = field(default=None, repr=False)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SpooledMedia":
+        spool_file = tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_MAX_MEMORY_BYTES)
+        spool_file.write(data)
+        spool_file.seek(0)
+        return cls(head=data[:HTML_SNIPPET_LIMIT], size=len(data), file=spool_file)
+
+    def attach_budget(self, budget: MediaByteBudget, reserved_bytes: int) -> None:
+        self.reserved_bytes = reserved_bytes
+        # Safety net: the reservation is returned even if a caller forgets close().
+        self._finalizer = weakref.finalize(self, _release_spool, self.file, budget, reserved_bytes)
+
+    @property
+    def rolled_to_disk(self) -> bool:
+        return self.size > MEDIA_SPOOL_MAX_MEMORY_BYTES
+
+    def close(self) -> None:
+        if self._finalizer is not None:
+            self._finalizer()
+        elif self.file is not None:
+            self.file.close()
+
+
+def _release_spool(file: Optional[Any], budget: MediaByteBudget, reserved_bytes: int) -> None:
+    if file is not None:
+        try:
+            file.close()
+        except Exception:
+            pass
+    budget.release(reserved_bytes)
+
+
+class SpooledInputFile(InputFile):
+    """InputFile over a spooled download; bytes are read only when PTB serializes the upload."""
+
+    def __init__(self, spool: SpooledMedia, filename: str) -> None:
+        self.spool = spool
+        self.attach_name = None
+        self.filename = filename
+        self.mimetype = mimetypes.guess_type(filename, strict=False)[0] or "application/octet-stream"
+
+    @property
+    def input_file_content(self) -> bytes:  # type: ignore[override]
+        self.spool.file.seek(0)
+        return self.spool.file.read()
+
+
 class MediaNotMediaError(RuntimeError):
     def __init__(self, url: str, content_type: str, reason: str) -> None:
         super().__init__(reason)
@@ -179,17 +330,66 @@ def _is_probably_html(data: bytes, content_type: str) -> bool:
         return True
     return False
 
-async def _download_with_retries(session: aiohttp.ClientSession, url: str, retries: int = 2) -> Tuple[bytes, str, Optional[int]]:
+async def _head_content_length(session: aiohttp.ClientSession, url: str) -> Optional[int]:
+    """Best-effort HEAD probe; None when the size is unknown."""
+    try:
+        async with session.head(url, allow_redirects=True) as response:
+            if response.status >= 400:
+                return None
+            return response.content_length
+    except Exception:
+        return None
+
+
+async def _download_with_retries(
+    session: aiohttp.ClientSession,
+    url: str,
+    retries: int = 2,
+    *,
+    max_bytes: int = TELEGRAM_MAX_BYTES,
+    expected_length: Optional[int] = None,
+) -> Tuple[SpooledMedia, str, Optional[int]]:
+    """Stream the body into a spooled temp file, stopping once ``max_bytes`` is exceeded."""
+    budget = get_media_budget()
     last_error: Optional[Exception] = None
     for _ in range(retries + 1):
+        reserved = await budget.acquire(
+            min(expected_length or max_bytes, max_bytes),
+            timeout=MEDIA_BUDGET_WAIT_SECONDS if MEDIA_BUDGET_WAIT_SECONDS > 0 else None,
+        )
+        spool_file = tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_MAX_MEMORY_BYTES)
         try:
             async with session.get(url, allow_redirects=True) as response:
-                data = await response.read()
                 content_type = response.headers.get("Content-Type", "").split(";")[0].lower()
-                content_length = response.content_length or len(data)
-                return data, content_type, content_length
+                declared_length = response.content_length
+                if declared_length and declared_length > max_bytes:
+                    _release_spool(spool_file, budget, reserved)
+                    return SpooledMedia(head=b"", size=0), content_type, declared_length
+                head = b""
+                size = 0
+                async for chunk in response.content.iter_chunked(MEDIA_STREAM_CHUNK_BYTES):
+                    if len(head) < HTML_SNIPPET_LIMIT:
+                        head += chunk[: HTML_SNIPPET_LIMIT - len(head)]
+                    size += len(chunk)
+                    if size > max_bytes:
+                        _release_spool(spool_file, budget, reserved)
+                        return SpooledMedia(head=head, size=size), content_type, max(size, declared_length or 0)
+                    spool_file.write(chunk)
         except Exception as exc:
+            _release_spool(spool_file, budget, reserved)
             last_error = exc
+            continue
+        spool_file.seek(0)
+        # Unknown-size downloads reserve the Telegram limit; hand back what was not used.
+        # A spool that rolled over to disk holds no body in memory, so it keeps no
+        # reservation; otherwise parked group items could starve their own siblings.
+        held = max(1, size) if size <= MEDIA_SPOOL_MAX_MEMORY_BYTES else 0
+        if held < reserved:
+            budget.release(reserved - held)
+            reserved = held
+        spool = SpooledMedia(head=head, size=size, file=spool_file)
+        spool.attach_budget(budget, reserved)
+        return spool, content_type, declared_length or size
     raise RuntimeError(f"Download failed: {last_error}")
 
 
@@ -236,6 +436,55 @@ def _build_caption(correlation_id: Optional[str], media_kind: str) -> str:
     return f"{emoji} {text}"
 
 
+def _too_large_media(
+    resolved_url: str,
+    content_type: str,
+    content_length: Optional[int],
+    method: str,
+    *,
+    used_download: bool,
+    correlation_id: Optional[str],
+) -> ResolvedMedia:
+    log_structured_event(
+        correlation_id=correlation_id,
+        action="MEDIA_PIPELINE",
+        action_path="media_pipeline._resolve_single_media",
+        stage="MEDIA_VALIDATE",
+        waiting_for="SIZE_CHECK",
+        outcome="failed",
+        error_code="TG_MEDIA_TOO_LARGE",
+        fix_hint="Telegram size limit exceeded; falling back to URL delivery.",
+        param={
+            "content_length": content_length,
+            "telegram_limit": TELEGRAM_MAX_BYTES,
+            "downloaded": used_download,
+        },
+    )
+    if TELEGRAM_URL_DIRECT:
+        return ResolvedMedia(
+            url=resolved_url,
+            payload=resolved_url,
+            content_type=content_type,
+            content_length=content_length,
+            method=method,
+            used_download=used_download,
+            too_large=True,
+            is_media=True,
+            error_code=None,
+        )
+    return ResolvedMedia(
+        url=resolved_url,
+        payload=resolved_url,
+        content_type=content_type,
+        content_length=content_length,
+        method="send_message",
+        used_download=used_download,
+        too_large=True,
+        is_media=False,
+        error_code="TG_MEDIA_TOO_LARGE",
+    )
+
+
 async def _resolve_single_media(
     url: str,
     media_kind: str,
@@ -280,6 +529,18 @@ async def _resolve_single_media(
             error_code=None,
         )
 
+    head_length = await _head_content_length(http_client, resolved_url) if MEDIA_HEAD_PRECHECK else None
+    if head_length and head_length > TELEGRAM_MAX_BYTES:
+        guessed_type = (mimetypes.guess_type(resolved_url)[0] or "").lower()
+        return _too_large_media(
+            resolved_url,
+            guessed_type,
+            head_length,
+            _media_method_from_type(media_kind, guessed_type, resolved_url),
+            used_download=False,
+            correlation_id=correlation_id,
+        )
+
     log_structured_event(
         correlation_id=correlation_id,
         action="MEDIA_PIPELINE",
@@ -287,9 +548,40 @@ async def _resolve_single_media(
         stage="MEDIA_RESOLVE",
         waiting_for="DOWNLOAD",
         outcome="start",
-        param={"resolved_domain": _safe_domain(resolved_url)},
+        param={"resolved_domain": _safe_domain(resolved_url), "content_length": head_length},
     )
-    data, dl_type, dl_length = await _download_with_retries(http_client, resolved_url)
+    try:
+        body, dl_type, dl_length = await _download_with_retries(
+            http_client,
+            resolved_url,
+            expected_length=head_length,
+        )
+    except MediaBudgetExhausted as exc:
+        # Let Telegram fetch the URL itself rather than block delivery on the budget.
+        guessed_type = (mimetypes.guess_type(resolved_url)[0] or "").lower()
+        method = _media_method_from_type(media_kind, guessed_type, resolved_url)
+        log_structured_event(
+            correlation_id=correlation_id,
+            action="MEDIA_PIPELINE",
+            action_path="media_pipeline._resolve_single_media",
+            stage="MEDIA_RESOLVE",
+            waiting_for="DOWNLOAD",
+            outcome="fallback_url",
+            error_code="MEDIA_BUDGET_EXHAUSTED",
+            fix_hint=str(exc),
+            param={"resolved_domain": _safe_domain(resolved_url), "tg_method": method},
+        )
+        return ResolvedMedia(
+            url=resolved_url,
+            payload=resolved_url,
+            content_type=guessed_type,
+            content_length=head_length,
+            method=method,
+            used_download=False,
+            too_large=False,
+            is_media=True,
+            error_code="MEDIA_BUDGET_EXHAUSTED",
+        )
     log_structured_event(
         correlation_id=correlation_id,
         action="MEDIA_PIPELINE",
@@ -303,8 +595,9 @@ async def _resolve_single_media(
             "content_length": dl_length,
         },
     )
-    sniffed_type = _sniff_content_type(data, dl_type, resolved_url)
-    if _is_probably_html(data, sniffed_type):
+    sniffed_type = _sniff_content_type(body.head, dl_type, resolved_url)
+    if _is_probably_html(body.head, sniffed_type):
+        body.close()
         log_structured_event(
             correlation_id=correlation_id,
             action="MEDIA_PIPELINE",
@@ -320,43 +613,18 @@ async def _resolve_single_media(
     too_large = bool(dl_length and dl_length > TELEGRAM_MAX_BYTES)
     method = _media_method_from_type(media_kind, sniffed_type, resolved_url)
     if too_large:
-        log_structured_event(
-            correlation_id=correlation_id,
-            action="MEDIA_PIPELINE",
-            action_path="media_pipeline._resolve_single_media",
-            stage="MEDIA_VALIDATE",
-            waiting_for="SIZE_CHECK",
-            outcome="failed",
-            error_code="TG_MEDIA_TOO_LARGE",
-            fix_hint="Telegram size limit exceeded; falling back to URL delivery.",
-            param={"content_length": dl_length, "telegram_limit": TELEGRAM_MAX_BYTES},
-        )
-        if TELEGRAM_URL_DIRECT:
-            return ResolvedMedia(
-                url=resolved_url,
-                payload=resolved_url,
-                content_type=sniffed_type,
-                content_length=dl_length,
-                method=method,
-                used_download=True,
-                too_large=True,
-                is_media=True,
-                error_code=None,
-            )
-        return ResolvedMedia(
-            url=resolved_url,
-            payload=resolved_url,
-            content_type=sniffed_type,
-            content_length=dl_length,
-            method="send_message",
+        body.close()
+        return _too_large_media(
+            resolved_url,
+            sniffed_type,
+            dl_length,
+            method,
             used_download=True,
-            too_large=True,
-            is_media=False,
-            error_code="TG_MEDIA_TOO_LARGE",
+            correlation_id=correlation_id,
         )
 
     filename = _infer_filename(resolved_url, sniffed_type, media_kind, filename_prefix)
-    payload = InputFile(io.BytesIO(data), filename=filename)
+    payload = SpooledInputFile(body, filename=filename)
     log_structured_event(
         correlation_id=correlation_id,
         action="MEDIA_PIPELINE",
@@ -423,39 +691,57 @@ async def resolve_and_prepare_telegram_payload(
             "text": f"⚠️ Нет результата для отправки. ID: {correlation_id or 'corr-na-na'}",
         }
 
+    resolve_limit = asyncio.Semaphore(max(1, MEDIA_RESOLVE_CONCURRENCY))
+
+    async def _resolve_bounded(url: str) -> ResolvedMedia:
+        async with resolve_limit:
+            return await _resolve_single_media(
+                url,
+                media_kind,
+                correlation_id,
+                kie_client,
+                http_client,
+                filename_prefix=filename_prefix,
+            )
+
+    # Resolve concurrently, then walk outcomes in the original URL order.
+    outcomes = await asyncio.gather(*(_resolve_bounded(url) for url in urls), return_exceptions=True)
+    fatal_error = next(
+        (
+            outcome
+            for outcome in outcomes
+            if isinstance(outcome, BaseException) and not isinstance(outcome, MediaNotMediaError)
+        ),
+        None,
+    )
+    if fatal_error is not None:
+        _close_resolved(outcome for outcome in outcomes if isinstance(outcome, ResolvedMedia))
+        raise fatal_error
+
     resolved_items: List[ResolvedMedia] = []
     invalid_urls: List[str] = []
-    for url in urls:
-        try:
-            resolved_items.append(
-                await _resolve_single_media(
-                    url,
-                    media_kind,
-                    correlation_id,
-                    kie_client,
-                    http_client,
-                    filename_prefix=filename_prefix,
-                )
-            )
-        except MediaNotMediaError as exc:
-            invalid_urls.append(exc.url)
-            log_structured_event(
-                correlation_id=correlation_id,
-                action="MEDIA_RESOLVE",
-                action_path="media_pipeline.resolve_and_prepare_telegram_payload",
-                stage="MEDIA_RESOLVE",
-                outcome="failed",
-                error_code="KIE_MEDIA_URL_NOT_MEDIA",
-                fix_hint="Проверьте URL результата: ожидался медиа-файл.",
-                param={
-                    "media_kind": media_kind,
-                    "resolved_domain": _safe_domain(exc.url),
-                    "content_type": exc.content_type,
-                    "resolved_url": _strip_url_query(exc.url),
-                    "reason": exc.reason,
-                },
-            )
+    for outcome in outcomes:
+        if isinstance(outcome, ResolvedMedia):
+            resolved_items.append(outcome)
             continue
+        exc = outcome
+        invalid_urls.append(exc.url)
+        log_structured_event(
+            correlation_id=correlation_id,
+            action="MEDIA_RESOLVE",
+            action_path="media_pipeline.resolve_and_prepare_telegram_payload",
+            stage="MEDIA_RESOLVE",
+            outcome="failed",
+            error_code="KIE_MEDIA_URL_NOT_MEDIA",
+            fix_hint="Проверьте URL результата: ожидался медиа-файл.",
+            param={
+                "media_kind": media_kind,
+                "resolved_domain": _safe_domain(exc.url),
+                "content_type": exc.content_type,
+                "resolved_url": _strip_url_query(exc.url),
+                "reason": exc.reason,
+            },
+        )
     for item in resolved_items:
         fallback_reason = None
         if item.used_download:
@@ -483,6 +769,7 @@ async def resolve_and_prepare_telegram_payload(
         }
     oversized_items = [item for item in resolved_items if item.too_large]
     if oversized_items and not TELEGRAM_URL_DIRECT:
+        _close_resolved(resolved_items)
         links_text = "\n".join(f"• {item.url}" for item in oversized_items)
         return "send_message", {
             "text": (
@@ -532,6 +819,113 @@ async def resolve_and_prepare_telegram_payload(
     return first_item.method, {payload_key: first_item.payload, "caption": caption}
 
 
+def prepare_cached_telegram_payload(
+    cached_items: List[Tuple[str, str]],
+    correlation_id: Optional[str],
+    media_kind: str,
+) -> Tuple[str, Dict[str, Any]]:
+    """Build a payload from previously uploaded ``(tg_method, file_id)`` pairs.
+
+    Mirrors the method selection of ``resolve_and_prepare_telegram_payload``.
+    """
+    caption = _build_caption(correlation_id, (media_kind or "").lower())
+    if len(cached_items) > 1 and all(method in {"send_photo", "send_video"} for method, _ in cached_items):
+        media_group = []
+        for idx, (method, file_id) in enumerate(cached_items):
+            media_cls = InputMediaPhoto if method == "send_photo" else InputMediaVideo
+            media_group.append(media_cls(media=file_id, caption=caption if idx == 0 else None))
+        return "send_media_group", {"media": media_group}
+    method, file_id = cached_items[0]
+    payload_key = _STREAM_UPLOAD_ENDPOINTS.get(method, ("sendDocument", "document"))[1]
+    return method, {payload_key: file_id, "caption": caption}
+
+
+def _close_resolved(items: Iterable[ResolvedMedia]) -> None:
+    for item in items:
+        if isinstance(item.payload, SpooledInputFile):
+            item.payload.spool.close()
+
+
+def _iter_spooled_files(payload: Dict[str, Any]) -> Iterable[SpooledInputFile]:
+    for value in payload.values():
+        if isinstance(value, SpooledInputFile):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                media = getattr(item, "media", None)
+                if isinstance(media, SpooledInputFile):
+                    yield media
+
+
+def release_media_payload(payload: Dict[str, Any]) -> None:
+    """Close spooled downloads referenced by a prepared payload and free their budget."""
+    for input_file in _iter_spooled_files(payload):
+        input_file.spool.close()
+
+
+_STREAM_UPLOAD_ENDPOINTS = {
+    "send_photo": ("sendPhoto", "photo"),
+    "send_video": ("sendVideo", "video"),
+    "send_audio": ("sendAudio", "audio"),
+    "send_voice": ("sendVoice", "voice"),
+    "send_animation": ("sendAnimation", "animation"),
+    "send_document": ("sendDocument", "document"),
+}
+
+
+def _can_stream_upload(bot: Any, tg_method: str, payload: Dict[str, Any]) -> bool:
+    if not MEDIA_STREAM_UPLOAD or _skip_media_download():
+        return False
+    if tg_method not in _STREAM_UPLOAD_ENDPOINTS or not isinstance(bot, Bot):
+        return False
+    payload_key = _STREAM_UPLOAD_ENDPOINTS[tg_method][1]
+    input_file = payload.get(payload_key)
+    # Small files stay in memory anyway; only disk-backed spools are worth streaming.
+    return isinstance(input_file, SpooledInputFile) and input_file.spool.rolled_to_disk
+
+
+async def _stream_upload(bot: Bot, tg_method: str, chat_id: int, payload: Dict[str, Any]) -> Message:
+    api_method, payload_key = _STREAM_UPLOAD_ENDPOINTS[tg_method]
+    input_file: SpooledInputFile = payload[payload_key]
+    form = aiohttp.FormData()
+    form.add_field("chat_id", str(chat_id))
+    for key, value in payload.items():
+        if key == payload_key or value is None:
+            continue
+        form.add_field(key, str(value))
+    input_file.spool.file.seek(0)
+    form.add_field(
+        payload_key,
+        input_file.spool.file,
+        filename=input_file.filename,
+        content_type=input_file.mimetype,
+    )
+    timeout = aiohttp.ClientTimeout(total=MEDIA_UPLOAD_TIMEOUT_SECONDS)
+    session = await get_session("telegram")
+    async with session.post(f"{bot.base_url}/{api_method}", data=form, timeout=timeout) as response:
+        body = await response.json(content_type=None)
+    if not body.get("ok"):
+        retry_after = (body.get("parameters") or {}).get("retry_after")
+        if retry_after:
+            raise RetryAfter(int(retry_after))
+        raise TelegramError(body.get("description") or f"Telegram upload failed: HTTP {response.status}")
+    return Message.de_json(body["result"], bot)
+
+
+async def send_prepared_media(bot: Any, tg_method: str, *, chat_id: int, payload: Dict[str, Any]) -> Any:
+    """Send a payload from ``resolve_and_prepare_telegram_payload`` and release its spools.
+
+    Disk-backed downloads are streamed to the Bot API as multipart instead of
+    being read into memory by ``InputFile``.
+    """
+    try:
+        if _can_stream_upload(bot, tg_method, payload):
+            return await _stream_upload(bot, tg_method, chat_id, payload)
+        return await getattr(bot, tg_method)(chat_id=chat_id, **payload)
+    finally:
+        release_media_payload(payload)
+
+
 def log_media_resolution(
     *,
     correlation_id: Optional[str],
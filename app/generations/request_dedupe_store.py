@@ -5,12 +5,14 @@ import json
 import os
 import time
 from dataclasses import dataclass, asdict
-from typing import Any, Dict, Optional
+from typing import Any, Optional
 
 from app.utils.distributed_lock import build_tenant_lock_key, get_redis_client
+from app.utils.expiring_map import ExpiringMap
 
 
 _DEFAULT_TTL_SECONDS = int(os.getenv("GEN_DEDUPE_TTL_SECONDS", "3600"))
+_MEMORY_MAX_ENTRIES = int(os.getenv("GEN_DEDUPE_MEMORY_MAX_ENTRIES", "50000"))
 
 
 @dataclass
@@ -31,9 +33,10 @@ class DedupeEntry:
     orphan_notified_ts: float = 0.0
 
 
-_memory_entries: Dict[str, tuple[DedupeEntry, float]] = {}
-_memory_job_tasks: Dict[str, tuple[dict[str, Any], float]] = {}
-_memory_request_map: Dict[str, tuple[dict[str, Any], float]] = {}
+_memory_entries: ExpiringMap[DedupeEntry] = ExpiringMap(_DEFAULT_TTL_SECONDS, max_size=_MEMORY_MAX_ENTRIES)
+_memory_job_tasks: ExpiringMap[dict[str, Any]] = ExpiringMap(_DEFAULT_TTL_SECONDS, max_size=_MEMORY_MAX_ENTRIES)
+_memory_task_jobs: ExpiringMap[dict[str, Any]] = ExpiringMap(_DEFAULT_TTL_SECONDS, max_size=_MEMORY_MAX_ENTRIES)
+_memory_request_map: ExpiringMap[dict[str, Any]] = ExpiringMap(_DEFAULT_TTL_SECONDS, max_size=_MEMORY_MAX_ENTRIES)
 
 
 def _build_key(user_id: int, model_id: str, prompt_hash: str) -> str:
@@ -46,6 +49,11 @@ def _build_job_task_key(job_id: str) -> str:
     return build_tenant_lock_key(raw_key)
 
 
+def _build_task_job_key(task_id: str) -> str:
+    raw_key = f"gen_task_job:{task_id}"
+    return build_tenant_lock_key(raw_key)
+
+
 def _build_request_key(request_id: str) -> str:
     raw_key = f"gen_request:{request_id}"
     return build_tenant_lock_key(raw_key)
@@ -113,14 +121,7 @@ async def get_dedupe_entry(
     if redis_client:
         raw = await redis_client.get(key)
         return _deserialize(raw) if raw else None
-    entry = _memory_entries.get(key)
-    if not entry:
-        return None
-    stored_entry, expires_at = entry
-    if time.monotonic() > expires_at:
-        _memory_entries.pop(key, None)
-        return None
-    return stored_entry
+    return _memory_entries.get(key)
 
 
 async def get_request_mapping(request_id: Optional[str]) -> Optional[dict[str, Any]]:
@@ -131,14 +132,8 @@ async def get_request_mapping(request_id: Optional[str]) -> Optional[dict[str, A
     if redis_client:
         raw = await redis_client.get(key)
         return _deserialize_request_mapping(raw) if raw else None
-    entry = _memory_request_map.get(key)
-    if not entry:
-        return None
-    payload, expires_at = entry
-    if time.monotonic() > expires_at:
-        _memory_request_map.pop(key, None)
-        return None
-    return dict(payload)
+    payload = _memory_request_map.get(key)
+    return dict(payload) if payload else None
 
 
 async def get_dedupe_entry_by_request_id(
@@ -178,7 +173,7 @@ async def set_request_mapping(
     if redis_client:
         await redis_client.set(key, json.dumps(payload, ensure_ascii=False), ex=ttl_seconds)
         return
-    _memory_request_map[key] = (payload, time.monotonic() + ttl_seconds)
+    _memory_request_map.set(key, payload, ttl_seconds=ttl_seconds)
 
 
 async def set_dedupe_entry(
@@ -192,7 +187,7 @@ async def set_dedupe_entry(
     if redis_client:
         await redis_client.set(key, _serialize(entry), ex=ttl_seconds)
     else:
-        _memory_entries[key] = (entry, time.monotonic() + ttl_seconds)
+        _memory_entries.set(key, entry, ttl_seconds=ttl_seconds)
     if entry.request_id:
         await set_request_mapping(entry.request_id, entry.user_id, entry.model_id, entry.prompt_hash, ttl_seconds=ttl_seconds)
     return entry
@@ -250,11 +245,8 @@ async def list_dedupe_entries(*, limit: int = 500) -> list[DedupeEntry]:
             if cursor == 0:
                 break
         return entries
-    now = time.monotonic()
-    for key, (entry, expires_at) in list(_memory_entries.items()):
-        if now > expires_at:
-            _memory_entries.pop(key, None)
-            continue
+    _memory_entries.purge()
+    for entry in _memory_entries.values():
         entries.append(entry)
         if len(entries) >= limit:
             break
@@ -269,11 +261,17 @@ async def set_job_task_mapping(
 ) -> None:
     payload = {"job_id": job_id, "task_id": task_id, "updated_ts": time.time()}
     key = _build_job_task_key(job_id)
+    reverse_key = _build_task_job_key(task_id) if task_id else None
     redis_client = await get_redis_client()
     if redis_client:
-        await redis_client.set(key, json.dumps(payload, ensure_ascii=False), ex=ttl_seconds)
+        raw = json.dumps(payload, ensure_ascii=False)
+        await redis_client.set(key, raw, ex=ttl_seconds)
+        if reverse_key:
+            await redis_client.set(reverse_key, raw, ex=ttl_seconds)
         return
-    _memory_job_tasks[key] = (payload, time.monotonic() + ttl_seconds)
+    _memory_job_tasks.set(key, payload, ttl_seconds=ttl_seconds)
+    if reverse_key:
+        _memory_task_jobs.set(reverse_key, payload, ttl_seconds=ttl_seconds)
 
 
 async def get_task_id_for_job(job_id: Optional[str]) -> Optional[str]:
@@ -290,14 +288,26 @@ async def get_task_id_for_job(job_id: Optional[str]) -> Optional[str]:
         except Exception:
             return None
         return data.get("task_id")
-    entry = _memory_job_tasks.get(key)
-    if not entry:
-        return None
-    payload, expires_at = entry
-    if time.monotonic() > expires_at:
-        _memory_job_tasks.pop(key, None)
+    payload = _memory_job_tasks.get(key)
+    return payload.get("task_id") if payload else None
+
+
+async def get_job_id_for_task(task_id: Optional[str]) -> Optional[str]:
+    if not task_id:
         return None
-    return payload.get("task_id")
+    key = _build_task_job_key(task_id)
+    redis_client = await get_redis_client()
+    if redis_client:
+        raw = await redis_client.get(key)
+        if not raw:
+            return None
+        try:
+            data = json.loads(raw)
+        except Exception:
+            return None
+        return data.get("job_id")
+    payload = _memory_task_jobs.get(key)
+    return payload.get("job_id") if payload else None
 
 
 async def delete_job_task_mapping(job_id: Optional[str]) -> None:
@@ -314,4 +324,5 @@ async def delete_job_task_mapping(job_id: Optional[str]) -> None:
 def reset_memory_entries() -> None:
     _memory_entries.clear()
     _memory_job_tasks.clear()
+    _memory_task_jobs.clear()
     _memory_request_map.clear()
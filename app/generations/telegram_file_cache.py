@@ -0,0 +1,363 @@
+"""Persistent result URL -> Telegram file_id cache for repeat deliveries.
+
+New and invalidated entries are written to storage in batches, at most once
+per ``TG_FILE_ID_CACHE_FLUSH_SECONDS``, so a delivery never waits for a
+full-document update of ``telegram_file_ids.json``.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_FILE_CACHE_FILE = "telegram_file_ids.json"
+TG_FILE_CACHE_ENABLED = os.getenv("TG_FILE_ID_CACHE_ENABLED", "1") != "0"
+TG_FILE_CACHE_TTL_SECONDS = float(os.getenv("TG_FILE_ID_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+TG_FILE_CACHE_MAX_ENTRIES = int(os.getenv("TG_FILE_ID_CACHE_MAX_ENTRIES", "5000"))
+# 0 = persist synchronously on every change.
+TG_FILE_CACHE_FLUSH_SECONDS = float(os.getenv("TG_FILE_ID_CACHE_FLUSH_SECONDS", "30"))
+
+# tg_method -> Message attribute holding the uploaded file.
+_MESSAGE_ATTACHMENT_KEYS = {
+    "send_photo": "photo",
+    "send_video": "video",
+    "send_audio": "audio",
+    "send_voice": "voice",
+    "send_animation": "animation",
+    "send_document": "document",
+}
+
+
+@dataclass(frozen=True)
+class CachedTelegramFile:
+    file_id: str
+    method: str
+    created_at: float
+    last_used_at: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "file_id": self.file_id,
+            "method": self.method,
+            "created_at": self.created_at,
+            "last_used_at": self.last_used_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Optional["CachedTelegramFile"]:
+        file_id = data.get("file_id")
+        method = data.get("method")
+        if not isinstance(file_id, str) or method not in _MESSAGE_ATTACHMENT_KEYS:
+            return None
+        created_at = float(data.get("created_at") or 0.0)
+        return cls(
+            file_id=file_id,
+            method=method,
+            created_at=created_at,
+            last_used_at=float(data.get("last_used_at") or created_at),
+        )
+
+
+_entries: "OrderedDict[str, CachedTelegramFile]" = OrderedDict()
+_loaded = False
+_pending: Dict[str, Optional[CachedTelegramFile]] = {}
+_pending_storage: Optional[Any] = None
+_flush_task: Optional["asyncio.Task[None]"] = None
+_METRICS: Dict[str, int] = {
+    "hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions": 0,
+    "invalidations": 0,
+    "flushes": 0,
+}
+
+
+def cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _is_expired(entry: CachedTelegramFile, now: float) -> bool:
+    return TG_FILE_CACHE_TTL_SECONDS > 0 and now - entry.created_at > TG_FILE_CACHE_TTL_SECONDS
+
+
+def _resolve_storage(storage: Optional[Any]) -> Optional[Any]:
+    if storage is not None:
+        return storage
+    from app.storage import get_storage
+
+    try:
+        return get_storage()
+    except Exception:
+        return None
+
+
+def _trim(entries: "OrderedDict[str, CachedTelegramFile]") -> int:
+    evicted = 0
+    while len(entries) > max(1, TG_FILE_CACHE_MAX_ENTRIES):
+        entries.popitem(last=False)
+        evicted += 1
+    return evicted
+
+
+async def _ensure_loaded(storage: Optional[Any]) -> None:
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    storage_instance = _resolve_storage(storage)
+    if not storage_instance or not hasattr(storage_instance, "read_json_file"):
+        return
+    try:
+        data = await storage_instance.read_json_file(TELEGRAM_FILE_CACHE_FILE, default={})
+    except Exception as exc:
+        logger.debug("tg_file_cache_load_failed error=%s", exc)
+        return
+    now = time.time()
+    loaded = []
+    for key, raw in (data or {}).items():
+        entry = CachedTelegramFile.from_dict(raw) if isinstance(raw, dict) else None
+        if entry and not _is_expired(entry, now):
+            loaded.append((key, entry))
+    loaded.sort(key=lambda item: item[1].last_used_at)
+    # Entries cached by this process while the load was in flight are newer.
+    recent = list(_entries.items())
+    _entries.clear()
+    for key, entry in loaded + recent:
+        _entries.pop(key, None)
+        _entries[key] = entry
+    _METRICS["evictions"] += _trim(_entries)
+
+
+async def _persist(
+    updates: Dict[str, Optional[CachedTelegramFile]],
+    *,
+    storage: Optional[Any],
+) -> bool:
+    storage_instance = _resolve_storage(storage)
+    if not storage_instance or not hasattr(storage_instance, "update_json_file"):
+        return True
+
+    def updater(data: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        merged: "OrderedDict[str, CachedTelegramFile]" = OrderedDict()
+        existing = []
+        for key, raw in (data or {}).items():
+            entry = CachedTelegramFile.from_dict(raw) if isinstance(raw, dict) else None
+            if entry and not _is_expired(entry, now):
+                existing.append((key, entry))
+        existing.sort(key=lambda item: item[1].last_used_at)
+        for key, entry in existing:
+            merged[key] = entry
+        for key, entry in updates.items():
+            merged.pop(key, None)
+            if entry is not None:
+                merged[key] = entry
+        _trim(merged)
+        return {key: entry.to_dict() for key, entry in merged.items()}
+
+    try:
+        await storage_instance.update_json_file(TELEGRAM_FILE_CACHE_FILE, updater)
+    except Exception as exc:
+        logger.debug("tg_file_cache_persist_failed count=%s error=%s", len(updates), exc)
+        return False
+    return True
+
+
+async def _queue_persist(
+    updates: Dict[str, Optional[CachedTelegramFile]],
+    *,
+    storage: Optional[Any],
+) -> None:
+    global _flush_task, _pending_storage
+    _pending.update(updates)
+    if storage is not None:
+        _pending_storage = storage
+    if TG_FILE_CACHE_FLUSH_SECONDS <= 0:
+        await flush_file_cache()
+        return
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.get_running_loop().create_task(_flush_later())
+
+
+async def _flush_later() -> None:
+    try:
+        await asyncio.sleep(TG_FILE_CACHE_FLUSH_SECONDS)
+    except asyncio.CancelledError:
+        return
+    await flush_file_cache()
+
+
+async def flush_file_cache() -> int:
+    """Write pending cache changes in one update; called by the timer and on shutdown."""
+    global _flush_task
+    task, _flush_task = _flush_task, None
+    if task is not None and task is not asyncio.current_task() and not task.done():
+        task.cancel()
+    if not _pending:
+        return 0
+    updates = dict(_pending)
+    _pending.clear()
+    if not await _persist(updates, storage=_pending_storage):
+        # Newer changes queued meanwhile win over the failed batch.
+        for key, entry in updates.items():
+            _pending.setdefault(key, entry)
+        return 0
+    _METRICS["flushes"] += 1
+    return len(updates)
+
+
+def _log_hit_rate() -> None:
+    lookups = _METRICS["hits"] + _METRICS["misses"]
+    hit_rate = round(_METRICS["hits"] / lookups, 4) if lookups else 0.0
+    logger.info(
+        "METRIC_GAUGE name=tg_file_id_cache_hit_rate value=%s hits=%s misses=%s entries=%s",
+        hit_rate,
+        _METRICS["hits"],
+        _METRICS["misses"],
+        len(_entries),
+    )
+
+
+async def get_cached_files(
+    urls: Sequence[str],
+    *,
+    storage: Optional[Any] = None,
+) -> Optional[List[CachedTelegramFile]]:
+    """Return cached uploads for every URL, or None if any URL is not cached."""
+    if not TG_FILE_CACHE_ENABLED or not urls:
+        return None
+    await _ensure_loaded(storage)
+    now = time.time()
+    found: List[CachedTelegramFile] = []
+    for url in urls:
+        key = cache_key(url)
+        entry = _entries.get(key)
+        if entry is not None and _is_expired(entry, now):
+            _entries.pop(key, None)
+            _METRICS["evictions"] += 1
+            entry = None
+        if entry is None:
+            _METRICS["misses"] += 1
+            _log_hit_rate()
+            return None
+        found.append(entry)
+    for url, entry in zip(urls, found):
+        key = cache_key(url)
+        _entries[key] = CachedTelegramFile(entry.file_id, entry.method, entry.created_at, now)
+        _entries.move_to_end(key)
+    _METRICS["hits"] += 1
+    _log_hit_rate()
+    return found
+
+
+def _extract_file_id(message: Any, tg_method: str) -> Optional[str]:
+    attachment = getattr(message, _MESSAGE_ATTACHMENT_KEYS[tg_method], None)
+    if tg_method == "send_photo" and isinstance(attachment, (list, tuple)):
+        attachment = attachment[-1] if attachment else None
+    if attachment is None and tg_method in {"send_animation", "send_document"}:
+        # Telegram may store GIF/MP4 animations as documents and vice versa.
+        attachment = getattr(message, "document", None) or getattr(message, "animation", None)
+    file_id = getattr(attachment, "file_id", None)
+    return file_id if isinstance(file_id, str) and file_id else None
+
+
+def _media_group_method(message: Any) -> Optional[str]:
+    if isinstance(getattr(message, "photo", None), (list, tuple)) and message.photo:
+        return "send_photo"
+    if getattr(message, "video", None) is not None:
+        return "send_video"
+    return None
+
+
+async def remember_sent_media(
+    urls: Sequence[str],
+    tg_method: str,
+    sent: Any,
+    *,
+    storage: Optional[Any] = None,
+) -> int:
+    """Cache file_ids from the Message(s) Telegram returned for a fresh upload.
+
+    Only unambiguous sends are cached: one URL for a single-file method, or a
+    media group with exactly one message per URL.
+    """
+    if not TG_FILE_CACHE_ENABLED or not urls:
+        return 0
+    pairs: List[tuple[str, str, str]] = []
+    if tg_method == "send_media_group":
+        messages = list(sent or []) if isinstance(sent, (list, tuple)) else []
+        if len(messages) != len(urls):
+            return 0
+        for url, message in zip(urls, messages):
+            method = _media_group_method(message)
+            file_id = _extract_file_id(message, method) if method else None
+            if not file_id:
+                return 0
+            pairs.append((url, method, file_id))
+    elif tg_method in _MESSAGE_ATTACHMENT_KEYS and len(urls) == 1:
+        file_id = _extract_file_id(sent, tg_method)
+        if not file_id:
+            return 0
+        pairs.append((urls[0], tg_method, file_id))
+    else:
+        return 0
+
+    await _ensure_loaded(storage)
+    now = time.time()
+    updates: Dict[str, Optional[CachedTelegramFile]] = {}
+    for url, method, file_id in pairs:
+        key = cache_key(url)
+        entry = CachedTelegramFile(file_id=file_id, method=method, created_at=now, last_used_at=now)
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        updates[key] = entry
+    _METRICS["stores"] += len(updates)
+    _METRICS["evictions"] += _trim(_entries)
+    await _queue_persist(updates, storage=storage)
+    return len(updates)
+
+
+async def invalidate_cached_files(urls: Iterable[str], *, storage: Optional[Any] = None) -> None:
+    """Drop entries whose file_id Telegram rejected."""
+    updates: Dict[str, Optional[CachedTelegramFile]] = {}
+    for url in urls:
+        key = cache_key(url)
+        if _entries.pop(key, None) is not None:
+            updates[key] = None
+    if not updates:
+        return
+    _METRICS["invalidations"] += len(updates)
+    await _queue_persist(updates, storage=storage)
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    snapshot: Dict[str, Any] = dict(_METRICS)
+    lookups = snapshot["hits"] + snapshot["misses"]
+    snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+    snapshot["entries"] = len(_entries)
+    snapshot["pending"] = len(_pending)
+    return snapshot
+
+
+def reset_file_cache() -> None:
+    global _loaded, _flush_task, _pending_storage
+    task, _flush_task = _flush_task, None
+    if task is not None and not task.done():
+        try:
+            task.cancel()
+        except RuntimeError:
+            pass
+    _entries.clear()
+    _pending.clear()
+    _pending_storage = None
+    _loaded = False
+    for key in _METRICS:
+        _METRICS[key] = 0
@@ -8,16 +8,26 @@ from datetime import datetime
 from typing import List, Optional, Dict, Any
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 
 from app.kie_catalog import ModelSpec
 from app.generations.universal_engine import JobResult
-from app.generations.media_pipeline import resolve_and_prepare_telegram_payload
+from app.generations.media_pipeline import (
+    prepare_cached_telegram_payload,
+    resolve_and_prepare_telegram_payload,
+    send_prepared_media,
+)
+from app.generations.telegram_file_cache import (
+    get_cached_files,
+    invalidate_cached_files,
+    remember_sent_media,
+)
+from app.integrations.http_clients import get_session
 from app.utils.url_normalizer import (
     is_valid_result_url,
     normalize_result_urls,
     ResultUrlNormalizationError,
 )
-import aiohttp
 from app.services.free_tools_service import format_free_counter_block, get_free_counter_snapshot
 from app.pricing.price_resolver import format_price_rub
 from app.observability.trace import trace_event, url_summary
@@ -100,6 +110,52 @@ def build_result_filename_prefix(
     return _sanitize_filename_component(base)
 
 
+_INVALID_FILE_ID_MARKERS = (
+    "wrong file identifier",
+    "wrong remote file identifier",
+    "file reference expired",
+    "file_reference_expired",
+    "invalid file_id",
+    "file_id_invalid",
+    "wrong type of the web page content",
+    "failed to get http url content",
+)
+
+
+async def _send_cached_result(
+    bot,
+    chat_id: int,
+    urls: List[str],
+    media_type: str,
+    correlation_id: Optional[str],
+) -> Optional[str]:
+    """Re-send previously uploaded results by file_id; returns tg_method on success."""
+    cached = await get_cached_files(urls)
+    if not cached:
+        return None
+    tg_method, payload = prepare_cached_telegram_payload(
+        [(entry.method, entry.file_id) for entry in cached],
+        correlation_id,
+        media_type or "document",
+    )
+    try:
+        await getattr(bot, tg_method)(chat_id=chat_id, **payload)
+    except BadRequest as exc:
+        # Только битый/протухший file_id лечится повторной загрузкой; прочие ошибки
+        # (таймаут — сообщение могло уйти, Forbidden, RetryAfter) повторять нельзя.
+        if not _is_invalid_file_id_error(exc):
+            raise
+        logger.warning("tg_file_cache_send_failed correlation_id=%s error=%s", correlation_id, exc)
+        await invalidate_cached_files(urls)
+        return None
+    return tg_method
+
+
+def _is_invalid_file_id_error(exc: BadRequest) -> bool:
+    message = str(getattr(exc, "message", "") or exc).lower()
+    return any(marker in message for marker in _INVALID_FILE_ID_MARKERS)
+
+
 async def deliver_result(
     bot,
     chat_id: int,
@@ -273,93 +329,135 @@ async def deliver_result(
             raise
         return True
 
-    async with aiohttp.ClientSession() as session:
-        tg_method, payload = await resolve_and_prepare_telegram_payload(
-            {"urls": normalized_urls, "text": text},
-            correlation_id,
-            media_type or "document",
-            kie_client,
-            session,
-            filename_prefix=filename_prefix,
+    try:
+        cached_method = await _send_cached_result(bot, chat_id, normalized_urls, media_type, correlation_id)
+    except Exception as exc:
+        log_structured_event(
+            correlation_id=correlation_id,
+            request_id=request_id,
+            user_id=chat_id,
+            chat_id=chat_id,
+            model_id=model_id,
+            gen_type=gen_type or media_type,
+            action="TG_DELIVER",
+            action_path="telegram_sender.deliver_result",
+            task_id=task_id,
+            job_id=job_id,
+            stage="TG_DELIVER",
+            outcome="failed",
+            duration_ms=int((time.monotonic() - start_ts) * 1000),
+            error_code="TG_DELIVER_FAILED",
+            fix_hint=str(exc),
+            param={"media_type": media_type, "file_id_cache": "hit"},
         )
-        try:
-            await getattr(bot, tg_method)(chat_id=chat_id, **payload)
-            log_structured_event(
-                correlation_id=correlation_id,
-                request_id=request_id,
-                user_id=chat_id,
-                chat_id=chat_id,
-                model_id=model_id,
-                gen_type=gen_type or media_type,
-                action="TG_DELIVER",
-                action_path="telegram_sender.deliver_result",
-                task_id=task_id,
-                job_id=job_id,
-                stage="TG_DELIVER",
-                outcome="success",
-                duration_ms=int((time.monotonic() - start_ts) * 1000),
-                param={"tg_method": tg_method, "media_type": media_type},
-            )
-            log_structured_event(
-                correlation_id=correlation_id,
-                request_id=request_id,
-                user_id=chat_id,
-                chat_id=chat_id,
-                model_id=model_id,
-                gen_type=gen_type or media_type,
-                action="RESULT_DELIVERED",
-                action_path="telegram_sender.deliver_result",
-                task_id=task_id,
-                job_id=job_id,
-                stage="TG_DELIVER",
-                outcome="success",
-                param={"media_type": media_type, "tg_method": tg_method},
-            )
-        except Exception as exc:
-            fallback_urls = ", ".join(normalized_urls[:3]) if normalized_urls else "URL missing"
-            log_structured_event(
-                correlation_id=correlation_id,
-                request_id=request_id,
-                user_id=chat_id,
-                chat_id=chat_id,
-                model_id=model_id,
-                gen_type=gen_type or media_type,
-                action="TG_DELIVER",
-                action_path="telegram_sender.deliver_result",
-                task_id=task_id,
-                job_id=job_id,
-                stage="TG_DELIVER",
-                outcome="failed",
-                duration_ms=int((time.monotonic() - start_ts) * 1000),
-                error_code="TG_DELIVER_FAILED",
-                fix_hint="send_url_fallback",
-                param={"error": str(exc), "urls": [url_summary(url) for url in normalized_urls[:3]]},
-            )
-            await bot.send_message(
-                chat_id=chat_id,
-                text=(
-                    "⚠️ Не удалось отправить файл через Telegram. Вот ссылка:\n"
-                    f"{fallback_urls}"
-                ),
-                disable_web_page_preview=True,
-            )
-            log_structured_event(
-                correlation_id=correlation_id,
-                request_id=request_id,
-                user_id=chat_id,
-                chat_id=chat_id,
-                model_id=model_id,
-                gen_type=gen_type or media_type,
-                action="TG_DELIVER_FALLBACK",
-                action_path="telegram_sender.deliver_result",
-                task_id=task_id,
-                job_id=job_id,
-                stage="TG_DELIVER",
-                outcome="sent",
-                error_code="TG_DELIVER_FALLBACK_URL",
-                fix_hint="Sent URL fallback after upload failure.",
-            )
-            return True
+        raise
+    if cached_method:
+        log_structured_event(
+            correlation_id=correlation_id,
+            request_id=request_id,
+            user_id=chat_id,
+            chat_id=chat_id,
+            model_id=model_id,
+            gen_type=gen_type or media_type,
+            action="RESULT_DELIVERED",
+            action_path="telegram_sender.deliver_result",
+            task_id=task_id,
+            job_id=job_id,
+            stage="TG_DELIVER",
+            outcome="success",
+            duration_ms=int((time.monotonic() - start_ts) * 1000),
+            param={"media_type": media_type, "tg_method": cached_method, "file_id_cache": "hit"},
+        )
+        return True
+
+    session = await get_session("cdn")
+    tg_method, payload = await resolve_and_prepare_telegram_payload(
+        {"urls": normalized_urls, "text": text},
+        correlation_id,
+        media_type or "document",
+        kie_client,
+        session,
+        filename_prefix=filename_prefix,
+    )
+    try:
+        sent = await send_prepared_media(bot, tg_method, chat_id=chat_id, payload=payload)
+        await remember_sent_media(normalized_urls, tg_method, sent)
+        log_structured_event(
+            correlation_id=correlation_id,
+            request_id=request_id,
+            user_id=chat_id,
+            chat_id=chat_id,
+            model_id=model_id,
+            gen_type=gen_type or media_type,
+            action="TG_DELIVER",
+            action_path="telegram_sender.deliver_result",
+            task_id=task_id,
+            job_id=job_id,
+            stage="TG_DELIVER",
+            outcome="success",
+            duration_ms=int((time.monotonic() - start_ts) * 1000),
+            param={"tg_method": tg_method, "media_type": media_type},
+        )
+        log_structured_event(
+            correlation_id=correlation_id,
+            request_id=request_id,
+            user_id=chat_id,
+            chat_id=chat_id,
+            model_id=model_id,
+            gen_type=gen_type or media_type,
+            action="RESULT_DELIVERED",
+            action_path="telegram_sender.deliver_result",
+            task_id=task_id,
+            job_id=job_id,
+            stage="TG_DELIVER",
+            outcome="success",
+            param={"media_type": media_type, "tg_method": tg_method},
+        )
+    except Exception as exc:
+        fallback_urls = ", ".join(normalized_urls[:3]) if normalized_urls else "URL missing"
+        log_structured_event(
+            correlation_id=correlation_id,
+            request_id=request_id,
+            user_id=chat_id,
+            chat_id=chat_id,
+            model_id=model_id,
+            gen_type=gen_type or media_type,
+            action="TG_DELIVER",
+            action_path="telegram_sender.deliver_result",
+            task_id=task_id,
+            job_id=job_id,
+            stage="TG_DELIVER",
+            outcome="failed",
+            duration_ms=int((time.monotonic() - start_ts) * 1000),
+            error_code="TG_DELIVER_FAILED",
+            fix_hint="send_url_fallback",
+            param={"error": str(exc), "urls": [url_summary(url) for url in normalized_urls[:3]]},
+        )
+        await bot.send_message(
+            chat_id=chat_id,
+            text=(
+                "⚠️ Не удалось отправить файл через Telegram. Вот ссылка:\n"
+                f"{fallback_urls}"
+            ),
+            disable_web_page_preview=True,
+        )
+        log_structured_event(
+            correlation_id=correlation_id,
+            request_id=request_id,
+            user_id=chat_id,
+            chat_id=chat_id,
+            model_id=model_id,
+            gen_type=gen_type or media_type,
+            action="TG_DELIVER_FALLBACK",
+            action_path="telegram_sender.deliver_result",
+            task_id=task_id,
+            job_id=job_id,
+            stage="TG_DELIVER",
+            outcome="sent",
+            error_code="TG_DELIVER_FALLBACK_URL",
+            fix_hint="Sent URL fallback after upload failure.",
+        )
+        return True
     return True
 
 
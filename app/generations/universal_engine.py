@@ -13,6 +13,8 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, Awaitable, Callable, Dict, List, Optional
 
+from app.integrations.http_clients import get_session
+from app.kie import callbacks as kie_callbacks
 from app.kie.kie_client import KIEClient
 from app.observability.trace import trace_event, url_summary, prompt_summary
 from app.observability.structured_logs import log_structured_event
@@ -538,45 +540,81 @@ async def _validate_result_urls(
         )
         return
     timeout = aiohttp.ClientTimeout(total=timeout_s)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        last_error: Optional[str] = None
-        for url in urls:
-            try:
-                async with session.get(url, allow_redirects=True) as response:
-                    content_type = (response.headers.get("Content-Type") or "").split(";")[0].strip().lower()
-                    content_length = response.content_length
-                    sample = await response.content.read(1024)
-                    size_ok = (content_length or len(sample)) > 0
-                    if not size_ok:
-                        last_error = "empty_payload"
-                        continue
-                    inferred_media = _guess_media_type_from_url(url)
-                    if not _content_type_matches(media_type or inferred_media, content_type):
-                        last_error = f"unexpected_content_type:{content_type}"
-                        continue
-                    log_request_event(
-                        request_id=request_id,
-                        user_id=user_id,
-                        model=model_id,
-                        prompt_hash=prompt_hash,
-                        task_id=task_id,
-                        job_id=job_id,
-                        status="result_validated",
-                        latency_ms=None,
-                        attempt=None,
-                        error_code=None,
-                        error_msg=None,
-                        correlation_id=correlation_id,
-                    )
-                    return
-            except Exception as exc:
-                last_error = str(exc)
-                continue
-        raise KIEResultError(
-            "KIE_RESULT_INVALID_CONTENT",
-            error_code="KIE_RESULT_INVALID_CONTENT",
-            fix_hint=last_error or "Result URL validation failed.",
-        )
+    session = await get_session("cdn")
+    last_error: Optional[str] = None
+    for url in urls:
+        try:
+            async with session.get(url, allow_redirects=True, timeout=timeout) as response:
+                content_type = (response.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+                content_length = response.content_length
+                sample = await response.content.read(1024)
+                size_ok = (content_length or len(sample)) > 0
+                if not size_ok:
+                    last_error = "empty_payload"
+                    continue
+                inferred_media = _guess_media_type_from_url(url)
+                if not _content_type_matches(media_type or inferred_media, content_type):
+                    last_error = f"unexpected_content_type:{content_type}"
+                    continue
+                log_request_event(
+                    request_id=request_id,
+                    user_id=user_id,
+                    model=model_id,
+                    prompt_hash=prompt_hash,
+                    task_id=task_id,
+                    job_id=job_id,
+                    status="result_validated",
+                    latency_ms=None,
+                    attempt=None,
+                    error_code=None,
+                    error_msg=None,
+                    correlation_id=correlation_id,
+                )
+                return
+        except Exception as exc:
+            last_error = str(exc)
+            continue
+    raise KIEResultError(
+        "KIE_RESULT_INVALID_CONTENT",
+        error_code="KIE_RESULT_INVALID_CONTENT",
+        fix_hint=last_error or "Result URL validation failed.",
+    )
+
+
+def _create_task_kwargs(client: Any, correlation_id: Optional[str]) -> Dict[str, Any]:
+    create_fn = getattr(client, "create_task", None)
+    params = inspect.signature(create_fn).parameters if create_fn else {}
+    kwargs: Dict[str, Any] = {}
+    if "correlation_id" in params:
+        kwargs["correlation_id"] = correlation_id
+    callback_url = kie_callbacks.resolve_callback_url()
+    if callback_url and "callback_url" in params:
+        kwargs["callback_url"] = callback_url
+    return kwargs
+
+
+def _take_trusted_callback(task_id: str) -> Optional[Dict[str, Any]]:
+    pushed = kie_callbacks.take_task_callback(task_id)
+    if pushed is None:
+        return None
+    record, trusted = pushed
+    # Unverified callbacks only shorten the wait; the next poll confirms the state.
+    return record if trusted else None
+
+
+async def _pause_before_poll(
+    task_id: str,
+    delay: float,
+    *,
+    callback_mode: bool,
+    remaining_s: float,
+) -> None:
+    pause_s = delay + random.uniform(0, delay * 0.2)
+    if not callback_mode:
+        await asyncio.sleep(pause_s)
+        return
+    pause_s = max(pause_s, kie_callbacks.KIE_CALLBACK_SAFETY_POLL_SECONDS)
+    await kie_callbacks.wait_task_callback(task_id, min(pause_s, max(0.0, remaining_s)))
 
 
 async def wait_job_result(
@@ -621,9 +659,97 @@ async def wait_job_result(
         storage=storage,
         source="wait_job_result.start",
     )
-    while True:
-        elapsed = time.monotonic() - start
-        if elapsed >= timeout or attempt >= max_attempts:
+    callback_mode = kie_callbacks.callbacks_enabled()
+    watched_task_ids: List[str] = []
+    if callback_mode:
+        # Completion is pushed to KIE_CALLBACK_PATH; polling only runs as a slow safety net.
+        kie_callbacks.watch_task(task_id)
+        watched_task_ids.append(task_id)
+    try:
+        while True:
+            elapsed = time.monotonic() - start
+            if elapsed >= timeout or attempt >= max_attempts:
+                log_request_event(
+                    request_id=request_id,
+                    user_id=user_id,
+                    model=model_id,
+                    prompt_hash=prompt_hash,
+                    task_id=task_id,
+                    job_id=job_id,
+                    status="timeout",
+                    latency_ms=int(elapsed * 1000),
+                    attempt=attempt,
+                    error_code="ERR_KIE_TIMEOUT",
+                    error_msg="timeout",
+                    correlation_id=correlation_id,
+                )
+                if storage and job_id:
+                    await storage.update_job_status(
+                        job_id,
+                        "timeout",
+                        error_message="timeout",
+                        error_code="ERR_KIE_TIMEOUT",
+                    )
+                if on_timeout:
+                    await on_timeout()
+                raise TimeoutError("ERR_KIE_TIMEOUT")
+
+            if callback_mode and kie_callbacks.task_handed_off(task_id):
+                # The callback handoff is already delivering this task through the reconciler.
+                return {"taskId": task_id, "state": "queued", "delivery_pending": True}
+            attempt += 1
+            poll_call_start = time.monotonic()
+            pushed_record = _take_trusted_callback(task_id) if callback_mode else None
+            try:
+                status_params = inspect.signature(client.get_task_status).parameters
+                status_kwargs: Dict[str, Any] = {}
+                if "correlation_id" in status_params:
+                    status_kwargs["correlation_id"] = correlation_id
+                if "poll_attempt" in status_params:
+                    status_kwargs["poll_attempt"] = attempt
+                if "total_wait_ms" in status_params:
+                    status_kwargs["total_wait_ms"] = int(elapsed * 1000)
+                if "retry_count" in status_params:
+                    status_kwargs["retry_count"] = retry_count
+                if pushed_record is not None:
+                    record = pushed_record
+                elif status_kwargs:
+                    record = await client.get_task_status(task_id, **status_kwargs)
+                else:
+                    record = await client.get_task_status(task_id)
+            except Exception as exc:
+                log_request_event(
+                    request_id=request_id,
+                    user_id=user_id,
+                    model=model_id,
+                    prompt_hash=prompt_hash,
+                    task_id=task_id,
+                    job_id=job_id,
+                    status="retry",
+                    latency_ms=int(elapsed * 1000),
+                    attempt=attempt,
+                    error_code="KIE_POLL_EXCEPTION",
+                    error_msg=str(exc),
+                    correlation_id=correlation_id,
+                )
+                await _pause_before_poll(
+                    task_id,
+                    delay,
+                    callback_mode=callback_mode,
+                    remaining_s=timeout - (time.monotonic() - start),
+                )
+                delay = min(max_delay, delay * 2)
+                continue
+            poll_latency_ms = int((time.monotonic() - poll_call_start) * 1000)
+
+            record["taskId"] = task_id
+            record["elapsed"] = elapsed
+            raw_state = record.get("state")
+            resolution = normalize_provider_state(raw_state)
+            state = resolution.canonical_state
+            raw_state_norm = resolution.raw_state or (raw_state or "")
+            record["_raw_state"] = raw_state_norm
+            record["state"] = state
             log_request_event(
                 request_id=request_id,
                 user_id=user_id,
@@ -631,279 +757,230 @@ async def wait_job_result(
                 prompt_hash=prompt_hash,
                 task_id=task_id,
                 job_id=job_id,
-                status="timeout",
+                status=state,
                 latency_ms=int(elapsed * 1000),
                 attempt=attempt,
-                error_code="ERR_KIE_TIMEOUT",
-                error_msg="timeout",
+                error_code=None,
+                error_msg=None,
                 correlation_id=correlation_id,
             )
-            if storage and job_id:
-                await storage.update_job_status(
-                    job_id,
-                    "timeout",
-                    error_message="timeout",
-                    error_code="ERR_KIE_TIMEOUT",
-                )
-            if on_timeout:
-                await on_timeout()
-            raise TimeoutError("ERR_KIE_TIMEOUT")
+            await _watchdog_store(
+                storage,
+                prompt_hash,
+                {
+                    "task_id": task_id,
+                    "job_id": job_id,
+                    "status": state,
+                },
+            )
 
-        attempt += 1
-        poll_call_start = time.monotonic()
-        try:
-            status_params = inspect.signature(client.get_task_status).parameters
-            status_kwargs: Dict[str, Any] = {}
-            if "correlation_id" in status_params:
-                status_kwargs["correlation_id"] = correlation_id
-            if "poll_attempt" in status_params:
-                status_kwargs["poll_attempt"] = attempt
-            if "total_wait_ms" in status_params:
-                status_kwargs["total_wait_ms"] = int(elapsed * 1000)
-            if "retry_count" in status_params:
-                status_kwargs["retry_count"] = retry_count
-            if status_kwargs:
-                record = await client.get_task_status(task_id, **status_kwargs)
-            else:
-                record = await client.get_task_status(task_id)
-        except Exception as exc:
-            log_request_event(
+            log_structured_event(
+                correlation_id=correlation_id,
                 request_id=request_id,
                 user_id=user_id,
-                model=model_id,
-                prompt_hash=prompt_hash,
+                action="KIE_POLL",
+                action_path="universal_engine.wait_job_result",
+                model_id=model_id,
                 task_id=task_id,
                 job_id=job_id,
-                status="retry",
-                latency_ms=int(elapsed * 1000),
-                attempt=attempt,
-                error_code="KIE_POLL_EXCEPTION",
-                error_msg=str(exc),
-                correlation_id=correlation_id,
+                stage="KIE_POLL",
+                outcome=state,
+                poll_attempt=attempt,
+                poll_latency_ms=poll_latency_ms,
+                total_wait_ms=int(elapsed * 1000),
+                task_state=raw_state_norm,
+                retry_count=retry_count,
             )
-            await asyncio.sleep(delay + random.uniform(0, delay * 0.2))
-            delay = min(max_delay, delay * 2)
-            continue
-        poll_latency_ms = int((time.monotonic() - poll_call_start) * 1000)
-
-        record["taskId"] = task_id
-        record["elapsed"] = elapsed
-        raw_state = record.get("state")
-        resolution = normalize_provider_state(raw_state)
-        state = resolution.canonical_state
-        raw_state_norm = resolution.raw_state or (raw_state or "")
-        record["_raw_state"] = raw_state_norm
-        record["state"] = state
-        log_request_event(
-            request_id=request_id,
-            user_id=user_id,
-            model=model_id,
-            prompt_hash=prompt_hash,
-            task_id=task_id,
-            job_id=job_id,
-            status=state,
-            latency_ms=int(elapsed * 1000),
-            attempt=attempt,
-            error_code=None,
-            error_msg=None,
-            correlation_id=correlation_id,
-        )
-        await _watchdog_store(
-            storage,
-            prompt_hash,
-            {
-                "task_id": task_id,
-                "job_id": job_id,
-                "status": state,
-            },
-        )
-
-        log_structured_event(
-            correlation_id=correlation_id,
-            request_id=request_id,
-            user_id=user_id,
-            action="KIE_POLL",
-            action_path="universal_engine.wait_job_result",
-            model_id=model_id,
-            task_id=task_id,
-            job_id=job_id,
-            stage="KIE_POLL",
-            outcome=state,
-            poll_attempt=attempt,
-            poll_latency_ms=poll_latency_ms,
-            total_wait_ms=int(elapsed * 1000),
-            task_state=raw_state_norm,
-            retry_count=retry_count,
-        )
 
-        if progress_callback:
-            now = time.monotonic()
-            if attempt == 1 or now - last_progress_ts >= progress_interval_s:
-                await progress_callback(
-                    {
-                        "stage": "KIE_POLL",
-                        "task_id": task_id,
-                        "state": raw_state_norm,
-                        "elapsed": elapsed,
-                        "poll_attempt": attempt,
-                        "retry_count": retry_count,
-                        "total_wait_ms": int(elapsed * 1000),
-                        "force": True,
-                        "min_interval": progress_interval_s,
-                    }
+            if progress_callback:
+                now = time.monotonic()
+                if attempt == 1 or now - last_progress_ts >= progress_interval_s:
+                    await progress_callback(
+                        {
+                            "stage": "KIE_POLL",
+                            "task_id": task_id,
+                            "state": raw_state_norm,
+                            "elapsed": elapsed,
+                            "poll_attempt": attempt,
+                            "retry_count": retry_count,
+                            "total_wait_ms": int(elapsed * 1000),
+                            "force": True,
+                            "min_interval": progress_interval_s,
+                        }
+                    )
+                    last_progress_ts = now
+
+            if record.get("ok") is False:
+                status = record.get("status")
+                if status and status >= 500 or status in {408, 429}:
+                    await _pause_before_poll(
+                        task_id,
+                        delay,
+                        callback_mode=callback_mode,
+                        remaining_s=timeout - (time.monotonic() - start),
+                    )
+                    delay = min(max_delay, delay * 2)
+                    continue
+                raise KIERequestFailed(
+                    record.get("error", "KIE request failed"),
+                    status=status,
+                    user_message=record.get("user_message"),
+                    error_code=record.get("error_code"),
+                    correlation_id=record.get("correlation_id") or correlation_id,
                 )
-                last_progress_ts = now
 
-        if record.get("ok") is False:
-            status = record.get("status")
-            if status and status >= 500 or status in {408, 429}:
-                await asyncio.sleep(delay + random.uniform(0, delay * 0.2))
+            if raw_state_norm == "waiting":
+                if waiting_since is None:
+                    waiting_since = time.monotonic()
+                waiting_elapsed = time.monotonic() - waiting_since
+                if waiting_elapsed >= waiting_timeout_s and retry_count < WAITING_MAX_RETRIES and on_waiting_timeout:
+                    retry_count += 1
+                    retry_task_id = await on_waiting_timeout(retry_count)
+                    log_structured_event(
+                        correlation_id=correlation_id,
+                        request_id=request_id,
+                        user_id=user_id,
+                        action="KIE_WAITING_TIMEOUT",
+                        action_path="universal_engine.wait_job_result",
+                        model_id=model_id,
+                        task_id=task_id,
+                        job_id=job_id,
+                        stage="KIE_POLL",
+                        outcome="waiting_timeout",
+                        poll_attempt=attempt,
+                        poll_latency_ms=poll_latency_ms,
+                        total_wait_ms=int(elapsed * 1000),
+                        task_state=raw_state_norm,
+                        retry_count=retry_count,
+                    )
+                    task_id = retry_task_id
+                    record["taskId"] = task_id
+                    if callback_mode:
+                        kie_callbacks.watch_task(task_id)
+                        watched_task_ids.append(task_id)
+                    if task_ref is not None:
+                        task_ref["task_id"] = task_id
+                    await register_correlation_ids(
+                        correlation_id=correlation_id,
+                        request_id=request_id,
+                        task_id=task_id,
+                        job_id=job_id,
+                        user_id=user_id,
+                        model_id=model_id,
+                        storage=storage,
+                        source="wait_job_result.retry_task",
+                    )
+                    waiting_since = None
+                    delay = base_delay
+                    continue
+            else:
+                waiting_since = None
+
+            if state in {"queued", "waiting"}:
+                if storage and job_id:
+                    await storage.update_job_status(job_id, state)
+                await _pause_before_poll(
+                    task_id,
+                    delay,
+                    callback_mode=callback_mode,
+                    remaining_s=timeout - (time.monotonic() - start),
+                )
                 delay = min(max_delay, delay * 2)
                 continue
-            raise KIERequestFailed(
-                record.get("error", "KIE request failed"),
-                status=status,
-                user_message=record.get("user_message"),
-                error_code=record.get("error_code"),
-                correlation_id=record.get("correlation_id") or correlation_id,
-            )
 
-        if raw_state_norm == "waiting":
-            if waiting_since is None:
-                waiting_since = time.monotonic()
-            waiting_elapsed = time.monotonic() - waiting_since
-            if waiting_elapsed >= waiting_timeout_s and retry_count < WAITING_MAX_RETRIES and on_waiting_timeout:
-                retry_count += 1
-                retry_task_id = await on_waiting_timeout(retry_count)
-                log_structured_event(
-                    correlation_id=correlation_id,
-                    request_id=request_id,
+            if state == "success":
+                urls = _extract_urls(record, _parse_result_json(record.get("resultJson")))
+                record_wait_latency(int(elapsed * 1000))
+                if storage and job_id:
+                    await storage.update_job_status(job_id, "success", result_urls=urls)
+                validate_params = inspect.signature(validate_result_fn).parameters
+                validate_kwargs: Dict[str, Any] = {
+                    "media_type": None,
+                    "request_id": request_id,
+                    "user_id": user_id,
+                    "model_id": model_id,
+                    "prompt_hash": prompt_hash,
+                    "task_id": task_id,
+                    "job_id": job_id,
+                }
+                if "correlation_id" in validate_params:
+                    validate_kwargs["correlation_id"] = correlation_id
+                await validate_result_fn(
+                    urls,
+                    **validate_kwargs,
+                )
+                if storage and job_id:
+                    await storage.update_job_status(job_id, "result_validated", result_urls=urls)
+                log_task_lifecycle(
+                    state="success",
                     user_id=user_id,
-                    action="KIE_WAITING_TIMEOUT",
-                    action_path="universal_engine.wait_job_result",
-                    model_id=model_id,
                     task_id=task_id,
                     job_id=job_id,
-                    stage="KIE_POLL",
-                    outcome="waiting_timeout",
-                    poll_attempt=attempt,
-                    poll_latency_ms=poll_latency_ms,
-                    total_wait_ms=int(elapsed * 1000),
-                    task_state=raw_state_norm,
-                    retry_count=retry_count,
-                )
-                task_id = retry_task_id
-                record["taskId"] = task_id
-                if task_ref is not None:
-                    task_ref["task_id"] = task_id
-                await register_correlation_ids(
+                    model_id=model_id,
                     correlation_id=correlation_id,
-                    request_id=request_id,
+                    source="universal_engine.wait_job_result",
+                )
+                log_task_lifecycle(
+                    state="done",
+                    user_id=user_id,
                     task_id=task_id,
                     job_id=job_id,
-                    user_id=user_id,
                     model_id=model_id,
-                    storage=storage,
-                    source="wait_job_result.retry_task",
+                    correlation_id=correlation_id,
+                    source="universal_engine.wait_job_result",
                 )
-                waiting_since = None
-                delay = base_delay
-                continue
-        else:
-            waiting_since = None
-
-        if state in {"queued", "waiting"}:
-            if storage and job_id:
-                await storage.update_job_status(job_id, state)
-            await asyncio.sleep(delay + random.uniform(0, delay * 0.2))
-            delay = min(max_delay, delay * 2)
-            continue
+                record["result_validated"] = True
+                return record
 
-        if state == "success":
-            urls = _extract_urls(record, _parse_result_json(record.get("resultJson")))
-            record_wait_latency(int(elapsed * 1000))
-            if storage and job_id:
-                await storage.update_job_status(job_id, "success", result_urls=urls)
-            validate_params = inspect.signature(validate_result_fn).parameters
-            validate_kwargs: Dict[str, Any] = {
-                "media_type": None,
-                "request_id": request_id,
-                "user_id": user_id,
-                "model_id": model_id,
-                "prompt_hash": prompt_hash,
-                "task_id": task_id,
-                "job_id": job_id,
-            }
-            if "correlation_id" in validate_params:
-                validate_kwargs["correlation_id"] = correlation_id
-            await validate_result_fn(
-                urls,
-                **validate_kwargs,
-            )
-            if storage and job_id:
-                await storage.update_job_status(job_id, "result_validated", result_urls=urls)
-            log_task_lifecycle(
-                state="success",
-                user_id=user_id,
-                task_id=task_id,
-                job_id=job_id,
-                model_id=model_id,
-                correlation_id=correlation_id,
-                source="universal_engine.wait_job_result",
-            )
-            log_task_lifecycle(
-                state="done",
-                user_id=user_id,
-                task_id=task_id,
-                job_id=job_id,
-                model_id=model_id,
-                correlation_id=correlation_id,
-                source="universal_engine.wait_job_result",
-            )
-            record["result_validated"] = True
-            return record
+            if state == "failed":
+                fail_code = record.get("failCode")
+                fail_msg = record.get("failMsg") or record.get("errorMessage")
+                if storage and job_id:
+                    await storage.update_job_status(
+                        job_id,
+                        "failed",
+                        error_message=fail_msg,
+                        error_code=fail_code or "KIE_FAIL_STATE",
+                    )
+                log_task_lifecycle(
+                    state="failed",
+                    user_id=user_id,
+                    task_id=task_id,
+                    job_id=job_id,
+                    model_id=model_id,
+                    correlation_id=correlation_id,
+                    source="universal_engine.wait_job_result",
+                )
+                raise KIEJobFailed(
+                    fail_msg or "Task failed",
+                    fail_code=fail_code,
+                    fail_msg=fail_msg,
+                    correlation_id=correlation_id,
+                    record_info=record,
+                )
 
-        if state == "failed":
-            fail_code = record.get("failCode")
-            fail_msg = record.get("failMsg") or record.get("errorMessage")
-            if storage and job_id:
-                await storage.update_job_status(
-                    job_id,
-                    "failed",
-                    error_message=fail_msg,
-                    error_code=fail_code or "KIE_FAIL_STATE",
+            if state == "canceled":
+                if storage and job_id:
+                    await storage.update_job_status(job_id, "canceled", error_message="canceled", error_code="KIE_CANCELED")
+                raise KIEJobFailed(
+                    "Task canceled",
+                    fail_code="KIE_CANCELED",
+                    fail_msg="Task canceled",
+                    correlation_id=correlation_id,
+                    record_info=record,
                 )
-            log_task_lifecycle(
-                state="failed",
-                user_id=user_id,
-                task_id=task_id,
-                job_id=job_id,
-                model_id=model_id,
-                correlation_id=correlation_id,
-                source="universal_engine.wait_job_result",
-            )
-            raise KIEJobFailed(
-                fail_msg or "Task failed",
-                fail_code=fail_code,
-                fail_msg=fail_msg,
-                correlation_id=correlation_id,
-                record_info=record,
-            )
 
-        if state == "canceled":
-            if storage and job_id:
-                await storage.update_job_status(job_id, "canceled", error_message="canceled", error_code="KIE_CANCELED")
-            raise KIEJobFailed(
-                "Task canceled",
-                fail_code="KIE_CANCELED",
-                fail_msg="Task canceled",
-                correlation_id=correlation_id,
-                record_info=record,
+            await _pause_before_poll(
+                task_id,
+                delay,
+                callback_mode=callback_mode,
+                remaining_s=timeout - (time.monotonic() - start),
             )
+            delay = min(max_delay, delay * 2)
 
-        await asyncio.sleep(delay + random.uniform(0, delay * 0.2))
-        delay = min(max_delay, delay * 2)
-
+    finally:
+        for watched_task_id in watched_task_ids:
+            kie_callbacks.unwatch_task(watched_task_id)
 
 async def run_generation(
     user_id: int,
@@ -1019,11 +1096,11 @@ async def run_generation(
             stage="KIE_CREATE",
             outcome="start",
         )
-        create_fn = getattr(client, "create_task", None)
-        if create_fn and "correlation_id" in inspect.signature(create_fn).parameters:
-            created = await client.create_task(spec.kie_model, payload["input"], correlation_id=correlation_id)
-        else:
-            created = await client.create_task(spec.kie_model, payload["input"])
+        created = await client.create_task(
+            spec.kie_model,
+            payload["input"],
+            **_create_task_kwargs(client, correlation_id),
+        )
         create_duration_ms = int((time.monotonic() - create_start) * 1000)
         if not created.get("ok"):
             log_request_event(
@@ -1303,10 +1380,11 @@ async def run_generation(
                 outcome="waiting_timeout",
                 retry_count=retry_count,
             )
-            if "correlation_id" in inspect.signature(client.create_task).parameters:
-                created_retry = await client.create_task(spec.kie_model, retry_payload["input"], correlation_id=correlation_id)
-            else:
-                created_retry = await client.create_task(spec.kie_model, retry_payload["input"])
+            created_retry = await client.create_task(
+                spec.kie_model,
+                retry_payload["input"],
+                **_create_task_kwargs(client, correlation_id),
+            )
             if not created_retry.get("ok"):
                 raise KIERequestFailed(
                     created_retry.get("error", "create_task_failed"),
@@ -1378,6 +1456,20 @@ async def run_generation(
             progress_interval_s=POLL_PROGRESS_INTERVAL_SECONDS,
         )
         task_id = task_ref.get("task_id", task_id)
+        if record.get("delivery_pending"):
+            return JobResult(
+                task_id=task_id or "",
+                state="queued",
+                media_type="pending",
+                urls=[],
+                text=None,
+                raw={
+                    "taskId": task_id,
+                    "state": "queued",
+                    "jobId": job_id,
+                    "delivery_pending": True,
+                },
+            )
         poll_duration_ms = int((time.monotonic() - poll_start) * 1000)
         state = record.get("state")
         if correlation_id:
@@ -4,7 +4,8 @@
 """
 
 import logging
-from typing import Optional
+from functools import partial
+from typing import Callable, Optional
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 
@@ -222,3 +223,72 @@ async def handle_model_callback(
         else:
             await query.answer("❌ Error loading model card", show_alert=True)
         return False
+
+
+async def handle_type_header_callback(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    *,
+    get_user_language: Callable[[int], str],
+    next_state: int,
+) -> int:
+    """
+    Обработчик для callback 'type_header:<type>'.
+    Показывает модели выбранного раздела.
+    """
+    from app.helpers.models_menu import build_models_menu_for_type, get_type_label
+
+    query = update.callback_query
+    user_id = update.effective_user.id if update.effective_user else None
+    data = query.data or ""
+    model_type = data.split(":", 1)[1] if ":" in data else ""
+    user_lang = get_user_language(user_id) if user_id else "ru"
+
+    keyboard_markup, models_count = build_models_menu_for_type(user_lang, model_type)
+    type_label = get_type_label(model_type, user_lang)
+    if user_lang == "ru":
+        header_text = (
+            f"📂 <b>Раздел:</b> {type_label}\n\n"
+            f"Доступно моделей: <b>{models_count}</b>\n\n"
+            "Выберите модель ниже."
+        )
+    else:
+        header_text = (
+            f"📂 <b>Section:</b> {type_label}\n\n"
+            f"Available models: <b>{models_count}</b>\n\n"
+            "Select a model below."
+        )
+    try:
+        await query.edit_message_text(
+            header_text,
+            reply_markup=keyboard_markup,
+            parse_mode="HTML",
+        )
+    except Exception as exc:
+        logger.warning("Failed to render type filter menu: %s", exc)
+        try:
+            await query.message.reply_text(
+                header_text,
+                reply_markup=keyboard_markup,
+                parse_mode="HTML",
+            )
+        except Exception:
+            await query.answer("⚠️ Не удалось открыть раздел", show_alert=True)
+    return next_state
+
+
+def register_callback_routes(*, get_user_language: Callable[[int], str], selecting_model_state: int) -> None:
+    """Регистрирует обработчики меню моделей в роутере button_callback."""
+    from app.buttons.dispatcher import register_callback_handler
+    from app.buttons.registry import CallbackType
+
+    register_callback_handler(
+        "type_header:",
+        partial(
+            handle_type_header_callback,
+            get_user_language=get_user_language,
+            next_state=selecting_model_state,
+        ),
+        CallbackType.PREFIX,
+        handler_name="handle_type_header_callback",
+    )
@@ -2,6 +2,6 @@
 Integrations module - внешние API клиенты
 """
 
-__all__ = ['kie_client', 'kie_stub']
+__all__ = ['http_clients', 'kie_client', 'kie_stub', 'payment_ocr']
 
 
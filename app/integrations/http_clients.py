@@ -0,0 +1,448 @@
+"""
+Общий реестр HTTP-клиентов для всех внешних вызовов.
+
+Раньше каждый вызывающий код создавал свою ``aiohttp.ClientSession`` с
+настройками по умолчанию (без keep-alive тюнинга и DNS-кэша), а часть —
+новую сессию на каждую доставку. Теперь у каждого апстрима свой пул:
+
+* ``kie_api`` — JSON API KIE (createTask / recordInfo / download-url);
+* ``kie_upload`` — загрузка файлов в KIE File API;
+* ``cdn`` — скачивание результатов с CDN (опционально HTTP/2 через httpx,
+  ``HTTP_CDN_HTTP2=1`` и установленный ``h2``);
+* ``github`` — GitHub Contents API (сессию держит GitHubStorage,
+  см. ``create_session``);
+* ``telegram`` — потоковая загрузка медиа в Bot API;
+* ``default`` — всё остальное (health-пробы).
+
+Лимиты задаются через ``HTTP_POOL_<UPSTREAM>_LIMIT`` / ``_PER_HOST`` /
+``_KEEPALIVE_SECONDS`` и общий ``HTTP_DNS_TTL_SECONDS``.
+Сессии привязаны к event loop, поэтому реестр хранит их по (апстрим, loop).
+``close_http_clients()`` вызывается при остановке приложения.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Mapping, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+HTTP_DNS_TTL_SECONDS = int(os.getenv("HTTP_DNS_TTL_SECONDS", "300"))
+HTTP_CDN_HTTP2 = os.getenv("HTTP_CDN_HTTP2", "0").strip().lower() in {"1", "true", "yes"}
+
+_WINDOW = 1000
+
+
+def _env_number(upstream: str, suffix: str, default: float) -> float:
+    raw = os.getenv(f"HTTP_POOL_{upstream.upper()}_{suffix}")
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        logger.warning("HTTP_POOL invalid %s_%s=%r, using %s", upstream.upper(), suffix, raw, default)
+        return default
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    name: str
+    limit: int
+    limit_per_host: int
+    keepalive_seconds: float
+    connect_timeout: float = 10.0
+    total_timeout: Optional[float] = None
+    headers: Mapping[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls, name: str, *, limit: int, limit_per_host: int, keepalive_seconds: float, **kwargs: Any) -> "UpstreamConfig":
+        return cls(
+            name=name,
+            limit=int(_env_number(name, "LIMIT", limit)),
+            limit_per_host=int(_env_number(name, "PER_HOST", limit_per_host)),
+            keepalive_seconds=_env_number(name, "KEEPALIVE_SECONDS", keepalive_seconds),
+            **kwargs,
+        )
+
+
+UPSTREAMS: Dict[str, UpstreamConfig] = {
+    config.name: config
+    for config in (
+        UpstreamConfig.from_env("kie_api", limit=100, limit_per_host=100, keepalive_seconds=30),
+        UpstreamConfig.from_env(
+            "kie_upload",
+            limit=100,
+            limit_per_host=30,
+            keepalive_seconds=30,
+            total_timeout=60,
+            headers={"User-Agent": "TelegramBot/1.0"},
+        ),
+        # total=300 — как у aiohttp по умолчанию; загрузчики передают свой timeout на запрос.
+        UpstreamConfig.from_env("cdn", limit=64, limit_per_host=16, keepalive_seconds=15, total_timeout=300),
+        UpstreamConfig.from_env("github", limit=16, limit_per_host=16, keepalive_seconds=60),
+        UpstreamConfig.from_env("telegram", limit=16, limit_per_host=16, keepalive_seconds=30),
+        UpstreamConfig.from_env("default", limit=32, limit_per_host=8, keepalive_seconds=15),
+    )
+}
+
+
+class _UpstreamStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.queued = 0
+        self.queue_wait_ms: Deque[float] = deque(maxlen=_WINDOW)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.requests += 1
+
+        async def on_queued_start(session, ctx, params):
+            ctx.queued_at = time.monotonic()
+
+        async def on_queued_end(session, ctx, params):
+            self.queued += 1
+            started = getattr(ctx, "queued_at", None)
+            if started is not None:
+                self.queue_wait_ms.append((time.monotonic() - started) * 1000)
+
+        async def on_create_end(session, ctx, params):
+            self.connections_created += 1
+
+        async def on_reuse(session, ctx, params):
+            self.connections_reused += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_queued_start.append(on_queued_start)
+        trace.on_connection_queued_end.append(on_queued_end)
+        trace.on_connection_create_end.append(on_create_end)
+        trace.on_connection_reuseconn.append(on_reuse)
+        return trace
+
+
+class _Http2Response:
+    """Минимальный aiohttp-совместимый ответ поверх httpx (status/headers/read/content)."""
+
+    def __init__(self, response: Any) -> None:
+        self._response = response
+        self.status = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.history = list(response.history)
+        length = response.headers.get("content-length")
+        self.content_length = int(length) if length and length.isdigit() else None
+        self.content = self
+
+    async def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            return await self._response.aread()
+        data = b""
+        async for chunk in self._response.aiter_bytes(n):
+            data += chunk
+            if len(data) >= n:
+                break
+        return data[:n]
+
+    async def text(self) -> str:
+        await self._response.aread()
+        return self._response.text
+
+    async def iter_chunked(self, size: int):
+        async for chunk in self._response.aiter_bytes(size):
+            yield chunk
+
+
+class _Http2RequestContext:
+    def __init__(self, client: Any, method: str, url: str, kwargs: Dict[str, Any]) -> None:
+        self._client = client
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._response: Any = None
+
+    async def __aenter__(self) -> _Http2Response:
+        kwargs = dict(self._kwargs)
+        allow_redirects = kwargs.pop("allow_redirects", True)
+        timeout = kwargs.pop("timeout", None)
+        if isinstance(timeout, aiohttp.ClientTimeout):
+            timeout = timeout.total
+        request_kwargs = {key: kwargs[key] for key in ("headers", "params") if key in kwargs}
+        if timeout is not None:
+            request_kwargs["timeout"] = timeout
+        request = self._client.build_request(self._method, self._url, **request_kwargs)
+        self._response = await self._client.send(request, stream=True, follow_redirects=allow_redirects)
+        return _Http2Response(self._response)
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        if self._response is not None:
+            await self._response.aclose()
+        return False
+
+
+class Http2Session:
+    """httpx-клиент с HTTP/2 под интерфейсом ``session.get/head`` из aiohttp.
+
+    Покрывает только то, чем пользуются загрузчики результатов: GET/HEAD,
+    status, headers, content_length, read() и content.iter_chunked().
+    """
+
+    def __init__(self, config: UpstreamConfig, *, http2: bool = True, transport: Any = None) -> None:
+        import httpx
+
+        self.config = config
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=config.limit,
+                max_keepalive_connections=config.limit_per_host,
+                keepalive_expiry=config.keepalive_seconds,
+            ),
+            timeout=httpx.Timeout(config.total_timeout, connect=config.connect_timeout),
+            headers=dict(config.headers),
+        )
+
+    @property
+    def closed(self) -> bool:
+        return self._client.is_closed
+
+    def get(self, url: str, **kwargs: Any) -> _Http2RequestContext:
+        return _Http2RequestContext(self._client, "GET", url, kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> _Http2RequestContext:
+        return _Http2RequestContext(self._client, "HEAD", url, kwargs)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        import httpx  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _connector_usage(connector: Any) -> Tuple[int, int]:
+    """(in_use, idle) по внутренностям TCPConnector; (0, 0) если их нет."""
+    acquired = getattr(connector, "_acquired", None)
+    idle_map = getattr(connector, "_conns", None)
+    in_use = len(acquired) if acquired is not None else 0
+    idle = sum(len(items) for items in idle_map.values()) if isinstance(idle_map, dict) else 0
+    return in_use, idle
+
+
+def _percentile(values: Deque[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percentile * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class HttpClientRegistry:
+    def __init__(self, upstreams: Optional[Mapping[str, UpstreamConfig]] = None, *, cdn_http2: bool = HTTP_CDN_HTTP2) -> None:
+        self.upstreams: Dict[str, UpstreamConfig] = dict(upstreams or UPSTREAMS)
+        self.cdn_http2 = cdn_http2
+        self._sessions: Dict[Tuple[str, int], Tuple["weakref.ref[asyncio.AbstractEventLoop]", Any]] = {}
+        self._owned_elsewhere: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._stats: Dict[str, _UpstreamStats] = {name: _UpstreamStats() for name in self.upstreams}
+        self._http2_warned = False
+
+    def config(self, upstream: str) -> UpstreamConfig:
+        return self.upstreams.get(upstream) or self.upstreams["default"]
+
+    def _new_aiohttp_session(
+        self,
+        config: UpstreamConfig,
+        *,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=config.limit,
+            limit_per_host=config.limit_per_host,
+            keepalive_timeout=config.keepalive_seconds,
+            ttl_dns_cache=HTTP_DNS_TTL_SECONDS,
+            use_dns_cache=True,
+        )
+        merged_headers = dict(config.headers)
+        merged_headers.update(headers or {})
+        stats = self._stats.setdefault(config.name, _UpstreamStats())
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout or aiohttp.ClientTimeout(total=config.total_timeout, connect=config.connect_timeout),
+            headers=merged_headers,
+            trace_configs=[stats.trace_config()],
+        )
+
+    def _new_session(self, config: UpstreamConfig) -> Any:
+        if config.name == "cdn" and self.cdn_http2:
+            if _http2_available():
+                logger.info("HTTP_POOL upstream=cdn transport=httpx_http2")
+                return Http2Session(config)
+            if not self._http2_warned:
+                self._http2_warned = True
+                logger.warning("HTTP_POOL upstream=cdn http2_unavailable=true reason=h2_not_installed fallback=aiohttp")
+        return self._new_aiohttp_session(config)
+
+    async def get_session(self, upstream: str) -> Any:
+        """Общая сессия апстрима для текущего loop; закрывать её вызывающему коду нельзя."""
+        loop = asyncio.get_running_loop()
+        config = self.config(upstream)
+        key = (config.name, id(loop))
+        entry = self._sessions.get(key)
+        if entry is not None:
+            loop_ref, session = entry
+            if loop_ref() is loop and not getattr(session, "closed", False):
+                return session
+        self._drop_dead_loops()
+        session = self._new_session(config)
+        self._sessions[key] = (weakref.ref(loop), session)
+        logger.info(
+            "HTTP_POOL session_created upstream=%s limit=%s per_host=%s keepalive_s=%s",
+            config.name,
+            config.limit,
+            config.limit_per_host,
+            config.keepalive_seconds,
+        )
+        return session
+
+    def create_session(
+        self,
+        upstream: str,
+        *,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> aiohttp.ClientSession:
+        """Сессия с настройками апстрима, которой владеет вызывающий (он же её закрывает)."""
+        session = self._new_aiohttp_session(self.config(upstream), timeout=timeout, headers=headers)
+        try:
+            session._http_pool_upstream = self.config(upstream).name  # type: ignore[attr-defined]
+            self._owned_elsewhere.add(session)
+        except (AttributeError, TypeError):
+            pass
+        return session
+
+    def _drop_dead_loops(self) -> None:
+        for key, (loop_ref, _session) in list(self._sessions.items()):
+            loop = loop_ref()
+            if loop is None or loop.is_closed():
+                self._sessions.pop(key, None)
+
+    async def close(self) -> None:
+        """Закрыть сессии текущего loop, для других живых loop — запланировать закрытие."""
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        entries = list(self._sessions.items())
+        self._sessions.clear()
+        for (name, _loop_id), (loop_ref, session) in entries:
+            loop = loop_ref()
+            if getattr(session, "closed", False) or loop is None or loop.is_closed():
+                continue
+            try:
+                if loop is current:
+                    await session.close()
+                else:
+                    asyncio.run_coroutine_threadsafe(session.close(), loop)
+            except Exception as exc:
+                logger.warning("HTTP_POOL close_failed upstream=%s error=%s", name, exc)
+        if entries:
+            logger.info("HTTP_POOL closed sessions=%s", len(entries))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        usage: Dict[str, List[int]] = {}
+        sessions = [(name, session) for (name, _), (_, session) in self._sessions.items()]
+        sessions.extend((getattr(session, "_http_pool_upstream", "default"), session) for session in list(self._owned_elsewhere))
+        for name, session in sessions:
+            if getattr(session, "closed", False):
+                continue
+            in_use, idle = _connector_usage(getattr(session, "connector", None))
+            bucket = usage.setdefault(name, [0, 0, 0])
+            bucket[0] += 1
+            bucket[1] += in_use
+            bucket[2] += idle
+        result: Dict[str, Dict[str, Any]] = {}
+        for name, config in self.upstreams.items():
+            stats = self._stats.get(name) or _UpstreamStats()
+            session_count, in_use, idle = usage.get(name, [0, 0, 0])
+            limit = config.limit * max(1, session_count)
+            result[name] = {
+                "sessions": session_count,
+                "limit": config.limit,
+                "in_use": in_use,
+                "idle": idle,
+                "utilization": round(in_use / limit, 3) if limit else None,
+                "requests": stats.requests,
+                "connections_created": stats.connections_created,
+                "connections_reused": stats.connections_reused,
+                "queued": stats.queued,
+                "queue_wait_ms_p95": _percentile(stats.queue_wait_ms, 0.95),
+            }
+        return result
+
+
+_registry: Optional[HttpClientRegistry] = None
+
+
+def get_http_registry() -> HttpClientRegistry:
+    global _registry
+    if _registry is None:
+        _registry = HttpClientRegistry()
+    return _registry
+
+
+async def get_session(upstream: str) -> Any:
+    return await get_http_registry().get_session(upstream)
+
+
+def create_session(
+    upstream: str,
+    *,
+    timeout: Optional[aiohttp.ClientTimeout] = None,
+    headers: Optional[Mapping[str, str]] = None,
+) -> aiohttp.ClientSession:
+    return get_http_registry().create_session(upstream, timeout=timeout, headers=headers)
+
+
+async def close_http_clients() -> None:
+    if _registry is not None:
+        await _registry.close()
+
+
+def log_pool_gauges() -> Dict[str, Dict[str, Any]]:
+    """Снимок пулов + METRIC_GAUGE по апстримам, у которых есть сессии."""
+    snapshot = get_http_registry().snapshot() if _registry is not None else {}
+    for name, item in snapshot.items():
+        if not item["sessions"]:
+            continue
+        logger.info(
+            "METRIC_GAUGE name=http_pool_in_use value=%s upstream=%s idle=%s limit=%s queued=%s queue_wait_ms_p95=%s",
+            item["in_use"],
+            name,
+            item["idle"],
+            item["limit"],
+            item["queued"],
+            item["queue_wait_ms_p95"],
+        )
+    return snapshot
+
+
+def reset_http_clients() -> None:
+    """Забыть сессии без закрытия (для тестов)."""
+    global _registry
+    _registry = None
@@ -0,0 +1,382 @@
+"""
+OCR скриншотов оплаты в отдельном пуле процессов.
+
+Tesseract работает секундами и держит GIL, поэтому вызывать его в event loop
+нельзя: один скриншот останавливает обработку всех webhook-апдейтов.
+Здесь вся тяжёлая работа (декодирование, уменьшение, оттенки серого,
+порог, несколько проходов OCR) выполняется в дочернем процессе:
+
+* не больше ``PAYMENT_OCR_WORKERS`` задач одновременно, остальные ждут в
+  очереди длиной до ``PAYMENT_OCR_QUEUE_MAX``; сверх этого ``OcrQueueFull``;
+* ``on_queued(position)`` вызывается, если задаче пришлось ждать, чтобы
+  показать пользователю «проверяем…»;
+* на задачу даётся ``PAYMENT_OCR_TIMEOUT_SECONDS``; после таймаута новые задачи
+  идут в новый пул, а старый добивается, когда на нём закончатся чужие задачи;
+  воркер также перезапускается каждые
+  ``PAYMENT_OCR_MAX_TASKS_PER_CHILD`` задач;
+* воркеры создаёт forkserver (``start_ocr_forkserver`` при старте), в который
+  заранее загружены только PIL и pytesseract;
+* время ожидания в очереди и время OCR пишутся в METRIC_GAUGE.
+
+Воркер выполняет только ``run_ocr`` и ничего не логирует.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_OCR_WORKERS = int(os.getenv("PAYMENT_OCR_WORKERS", "1"))
+PAYMENT_OCR_QUEUE_MAX = int(os.getenv("PAYMENT_OCR_QUEUE_MAX", "8"))
+PAYMENT_OCR_TIMEOUT_SECONDS = float(os.getenv("PAYMENT_OCR_TIMEOUT_SECONDS", "30"))
+PAYMENT_OCR_MAX_TASKS_PER_CHILD = int(os.getenv("PAYMENT_OCR_MAX_TASKS_PER_CHILD", "50"))
+PAYMENT_OCR_MAX_SIDE = int(os.getenv("PAYMENT_OCR_MAX_SIDE", "1600"))
+# 0 = без бинаризации: у банковских приложений часто тёмная тема.
+PAYMENT_OCR_THRESHOLD = int(os.getenv("PAYMENT_OCR_THRESHOLD", "0"))
+
+_OCR_LANGS = ("rus+eng", "eng", None)
+_FORKSERVER_PRELOAD = "app.integrations.payment_ocr_preload"
+_WINDOW = 500
+
+
+class OcrError(RuntimeError):
+    """OCR не выполнен (Tesseract недоступен, битое изображение, упал воркер)."""
+
+
+class OcrQueueFull(OcrError):
+    """Очередь OCR переполнена, скриншот не принят."""
+
+
+class OcrTimeout(OcrError):
+    """OCR не уложился в PAYMENT_OCR_TIMEOUT_SECONDS."""
+
+
+@dataclass
+class OcrResult:
+    text: str
+    lang: Optional[str]
+    width: int
+    height: int
+    ocr_ms: float
+    queue_wait_ms: float = 0.0
+
+
+def preprocess_image(image: Any, *, max_side: int = PAYMENT_OCR_MAX_SIDE, threshold: int = PAYMENT_OCR_THRESHOLD) -> Any:
+    """Оттенки серого + автоконтраст, уменьшение до max_side, опционально порог."""
+    from PIL import ImageOps
+
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    image = ImageOps.autocontrast(image.convert("L"))
+    longest = max(image.size)
+    if max_side > 0 and longest > max_side:
+        scale = max_side / float(longest)
+        image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))))
+    if threshold > 0:
+        image = image.point(lambda value: 255 if value > threshold else 0)
+    return image
+
+
+def run_ocr(image_data: bytes, tesseract_cmd: Optional[str] = None) -> Dict[str, Any]:
+    """Выполняется в воркере: декодирование, предобработка и OCR с фолбэком языков."""
+    from io import BytesIO
+
+    from PIL import Image
+    import pytesseract
+
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    started = time.perf_counter()
+    with Image.open(BytesIO(image_data)) as source:
+        width, height = source.size
+        image = preprocess_image(source)
+    last_error: Optional[BaseException] = None
+    for lang in _OCR_LANGS:
+        try:
+            text = pytesseract.image_to_string(image, lang=lang) if lang else pytesseract.image_to_string(image)
+        except Exception as exc:
+            last_error = exc
+            continue
+        return {
+            "text": text,
+            "lang": lang,
+            "width": width,
+            "height": height,
+            "ocr_ms": (time.perf_counter() - started) * 1000,
+        }
+    raise OcrError(f"OCR failed: {last_error}")
+
+
+def _ocr_mp_context() -> multiprocessing.context.BaseContext:
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([_FORKSERVER_PRELOAD])
+    return context
+
+
+def _default_executor_factory(workers: int) -> Executor:
+    # forkserver, а не fork: пул создаётся лениво и пересоздаётся после таймаутов,
+    # когда в процессе бота уже работают потоки, и fork мог бы унести в воркер
+    # захваченную блокировку. Воркеры форкаются из однопоточного сервера.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=_ocr_mp_context())
+
+
+def start_ocr_forkserver() -> None:
+    """Запустить forkserver при старте процесса, до первого скриншота."""
+    from multiprocessing import forkserver
+
+    _ocr_mp_context()
+    forkserver.ensure_running()
+
+
+class OcrPool:
+    """Пул OCR-воркеров с ограниченной очередью и таймаутом на задачу."""
+
+    def __init__(
+        self,
+        *,
+        workers: int = PAYMENT_OCR_WORKERS,
+        queue_max: int = PAYMENT_OCR_QUEUE_MAX,
+        timeout_seconds: float = PAYMENT_OCR_TIMEOUT_SECONDS,
+        executor_factory: Callable[[int], Executor] = _default_executor_factory,
+        worker_fn: Callable[..., Dict[str, Any]] = run_ocr,
+        max_tasks_per_child: int = PAYMENT_OCR_MAX_TASKS_PER_CHILD,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.queue_max = max(0, queue_max)
+        self.timeout_seconds = timeout_seconds
+        self._executor_factory = executor_factory
+        self._worker_fn = worker_fn
+        self._executor: Optional[Executor] = None
+        self._executor_tasks = 0
+        # id(executor) -> задачи, ещё выполняющиеся на нём; отставленные пулы ждут их завершения.
+        self._executor_jobs: Dict[int, int] = {}
+        self._draining: Dict[int, Executor] = {}
+        self.max_tasks_per_child = max_tasks_per_child
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.queue_wait_ms: Deque[float] = deque(maxlen=_WINDOW)
+        self.ocr_ms: Deque[float] = deque(maxlen=_WINDOW)
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.workers)
+            self._slots_loop = loop
+        return self._slots
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._executor_factory(self.workers)
+            self._executor_tasks = 0
+        self._executor_tasks += 1
+        return self._executor
+
+    def recycle(self, reason: str, *, executor: Optional[Executor] = None, kill: bool = True) -> None:
+        """Retire ``executor`` (default: the current one); the next task starts a fresh pool.
+
+        Acts only if ``executor`` is still the current pool, so a late failure from an
+        already retired pool cannot take down its replacement. With ``kill`` the workers
+        are killed only once no other task is running on that pool.
+        """
+        if executor is None:
+            executor = self._executor
+        if executor is None or executor is not self._executor:
+            return
+        self._executor = None
+        self.recycled += 1
+        others = self._executor_jobs.get(id(executor), 0)
+        if kill and others:
+            # На пуле ещё идут задачи других пользователей: добьём его после них.
+            self._draining[id(executor)] = executor
+            logger.warning("PAYMENT_OCR pool_recycled reason=%s killed=0 draining=%s", reason, others)
+            return
+        self._shutdown_executor(executor, kill=kill)
+        logger.log(logging.WARNING if kill else logging.INFO, "PAYMENT_OCR pool_recycled reason=%s", reason)
+
+    @staticmethod
+    def _shutdown_executor(executor: Executor, *, kill: bool) -> None:
+        processes = list((getattr(executor, "_processes", None) or {}).values()) if kill else []
+        executor.shutdown(wait=False, cancel_futures=kill)
+        for process in processes:
+            try:
+                process.kill()
+            except Exception:
+                pass
+
+    def _job_finished(self, executor: Executor) -> None:
+        key = id(executor)
+        remaining = self._executor_jobs.get(key, 0) - 1
+        if remaining > 0:
+            self._executor_jobs[key] = remaining
+            return
+        self._executor_jobs.pop(key, None)
+        draining = self._draining.pop(key, None)
+        if draining is not None:
+            self._shutdown_executor(draining, kill=True)
+            logger.info("PAYMENT_OCR drained_pool_stopped")
+
+    async def run(
+        self,
+        image_data: bytes,
+        *,
+        tesseract_cmd: Optional[str] = None,
+        on_queued: Optional[Callable[[int], Any]] = None,
+    ) -> OcrResult:
+        slots = self._get_slots()
+        if slots.locked():
+            if self.waiting >= self.queue_max:
+                self.rejected += 1
+                logger.warning("PAYMENT_OCR queue_full waiting=%s queue_max=%s", self.waiting, self.queue_max)
+                raise OcrQueueFull("payment OCR queue is full")
+            if on_queued is not None:
+                try:
+                    notified = on_queued(self.waiting + 1)
+                    if asyncio.iscoroutine(notified):
+                        await notified
+                except Exception as exc:
+                    logger.debug("PAYMENT_OCR on_queued_failed error=%s", exc)
+
+        queued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+        wait_ms = (time.monotonic() - queued_at) * 1000
+        self.in_flight += 1
+        executor = self._get_executor()
+        self._executor_jobs[id(executor)] = self._executor_jobs.get(id(executor), 0) + 1
+        recycle_reason: Optional[str] = None
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(executor, self._worker_fn, bytes(image_data), tesseract_cmd)
+            try:
+                payload = await asyncio.wait_for(future, timeout=self.timeout_seconds)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.failed += 1
+                recycle_reason = "timeout"
+                raise OcrTimeout(f"payment OCR timed out after {self.timeout_seconds:.0f}s") from None
+            except BrokenProcessPool as exc:
+                self.failed += 1
+                recycle_reason = "broken_pool"
+                raise OcrError(f"OCR worker crashed: {exc}") from exc
+            except OcrError:
+                self.failed += 1
+                raise
+            except Exception as exc:
+                self.failed += 1
+                raise OcrError(str(exc)) from exc
+        finally:
+            self.in_flight -= 1
+            slots.release()
+            self._job_finished(executor)
+            if recycle_reason:
+                # Только пул этой задачи и только если его ещё не заменили.
+                self.recycle(recycle_reason, executor=executor)
+            elif (
+                self.max_tasks_per_child > 0
+                and self.in_flight == 0
+                and self._executor_tasks >= self.max_tasks_per_child * self.workers
+            ):
+                # Tesseract/PIL в долгоживущем воркере копят память — перезапускаем.
+                self.recycle("max_tasks", kill=False)
+
+        self.completed += 1
+        result = OcrResult(
+            text=payload.get("text") or "",
+            lang=payload.get("lang"),
+            width=int(payload.get("width") or 0),
+            height=int(payload.get("height") or 0),
+            ocr_ms=float(payload.get("ocr_ms") or 0.0),
+            queue_wait_ms=wait_ms,
+        )
+        self.queue_wait_ms.append(wait_ms)
+        self.ocr_ms.append(result.ocr_ms)
+        logger.info(
+            "METRIC_GAUGE name=payment_ocr_ms value=%s queue_wait_ms=%s queue_depth=%s lang=%s",
+            int(result.ocr_ms),
+            int(wait_ms),
+            self.waiting,
+            result.lang,
+        )
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_max": self.queue_max,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "recycled": self.recycled,
+            "queue_wait_ms_p95": _percentile(self.queue_wait_ms, 0.95),
+            "ocr_ms_p50": _percentile(self.ocr_ms, 0.50),
+            "ocr_ms_p95": _percentile(self.ocr_ms, 0.95),
+        }
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        draining, self._draining = list(self._draining.values()), {}
+        for retired in draining:
+            self._shutdown_executor(retired, kill=True)
+
+
+def _percentile(values: Deque[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percentile * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+_pool: Optional[OcrPool] = None
+
+
+def get_ocr_pool() -> OcrPool:
+    global _pool
+    if _pool is None:
+        _pool = OcrPool()
+    return _pool
+
+
+async def recognize_payment_screenshot(
+    image_data: bytes,
+    *,
+    tesseract_cmd: Optional[str] = None,
+    on_queued: Optional[Callable[[int], Any]] = None,
+) -> OcrResult:
+    return await get_ocr_pool().run(image_data, tesseract_cmd=tesseract_cmd, on_queued=on_queued)
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    return get_ocr_pool().snapshot() if _pool is not None else {}
+
+
+def reset_ocr_pool() -> None:
+    """Сбросить пул (для тестов)."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
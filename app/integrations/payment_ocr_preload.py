@@ -0,0 +1,13 @@
+"""
+Предзагрузка forkserver-а пула OCR.
+
+Forkserver импортирует этот модуль один раз, воркеры форкаются из него уже с
+PIL и pytesseract. Ничего из приложения здесь не импортируется.
+"""
+
+from PIL import Image, ImageOps  # noqa: F401
+
+try:
+    import pytesseract  # noqa: F401
+except ImportError:  # pragma: no cover - OCR недоступен, воркеры не запускаются
+    pytesseract = None
@@ -0,0 +1,414 @@
+"""Push-based KIE task completion.
+
+KIE posts the final task record to ``callBackUrl`` when a task finishes. The
+route registered on the webhook server verifies the callback, wakes the
+coroutine waiting in ``wait_job_result`` for that task, or — when no waiter is
+alive in this process (restart, other instance) — resolves the job and hands
+it to the delivery reconciler directly. Once a handoff has claimed a task, a
+waiter that registers later stands down instead of delivering it a second
+time. Polling remains as a slow safety net.
+"""
+from __future__ import annotations
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from aiohttp import web
+
+from app.observability.structured_logs import log_structured_event
+
+logger = logging.getLogger(__name__)
+
+KIE_CALLBACK_PATH = os.getenv("KIE_CALLBACK_PATH", "/kie/callback").strip() or "/kie/callback"
+KIE_CALLBACK_TOKEN_HEADER = "X-KIE-Callback-Token"
+KIE_CALLBACK_SAFETY_POLL_SECONDS = float(os.getenv("KIE_CALLBACK_SAFETY_POLL_SECONDS", "30"))
+KIE_CALLBACK_EARLY_MAX = int(os.getenv("KIE_CALLBACK_EARLY_MAX", "1000"))
+KIE_CALLBACK_EARLY_TTL_SECONDS = float(os.getenv("KIE_CALLBACK_EARLY_TTL_SECONDS", "300"))
+
+
+@dataclass
+class _TaskWaiter:
+    loop: asyncio.AbstractEventLoop
+    event: asyncio.Event
+    record: Optional[Dict[str, Any]] = None
+    trusted: bool = False
+    refs: int = 1
+    handed_off: bool = False
+
+
+@dataclass
+class CallbackStats:
+    received: int = 0
+    rejected: int = 0
+    woke_waiter: int = 0
+    handed_off: int = 0
+    orphaned: int = 0
+    early: int = 0
+    last_received_ts: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "woke_waiter": self.woke_waiter,
+            "handed_off": self.handed_off,
+            "orphaned": self.orphaned,
+            "early": self.early,
+            "last_received_ts": self.last_received_ts,
+        }
+
+
+_waiters: Dict[str, _TaskWaiter] = {}
+# Callbacks that arrive between create_task and the first wait are parked here.
+_early_records: "OrderedDict[str, tuple[Dict[str, Any], bool, float]]" = OrderedDict()
+_handoff_tasks: Set[asyncio.Task[Any]] = set()
+# Tasks whose delivery was claimed by a callback handoff; a later waiter must not deliver them again.
+_handoff_claims: "OrderedDict[str, float]" = OrderedDict()
+_stats = CallbackStats()
+
+
+def get_callback_token() -> str:
+    return os.getenv("KIE_CALLBACK_TOKEN", "").strip()
+
+
+def resolve_callback_url() -> Optional[str]:
+    """Callback URL passed to createTask, with the verification token attached."""
+    from app.services.kie_input_builder import get_callback_url
+
+    base_url = (get_callback_url() or "").strip()
+    if not base_url:
+        return None
+    token = get_callback_token()
+    if not token:
+        return base_url
+    parts = urlsplit(base_url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "token"]
+    query.append(("token", token))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+def callbacks_enabled() -> bool:
+    return bool(resolve_callback_url())
+
+
+def verify_callback_token(provided: Optional[str]) -> bool:
+    expected = get_callback_token()
+    if not expected:
+        return True
+    if not provided:
+        return False
+    return hmac.compare_digest(provided.encode("utf-8"), expected.encode("utf-8"))
+
+
+def normalize_callback_record(payload: Any) -> Optional[Dict[str, Any]]:
+    """Map a callback body onto the ``KIEClient.get_task_status`` record shape."""
+    if not isinstance(payload, dict):
+        return None
+    task_data = payload.get("data") if isinstance(payload.get("data"), dict) else payload
+    task_id = task_data.get("taskId") or task_data.get("task_id") or payload.get("taskId")
+    if not task_id:
+        return None
+    result_json = task_data.get("resultJson")
+    if isinstance(result_json, (dict, list)):
+        result_json = json.dumps(result_json, ensure_ascii=False)
+    code = payload.get("code")
+    return {
+        "ok": code in (None, 200),
+        "taskId": str(task_id),
+        "state": task_data.get("state"),
+        "resultJson": result_json,
+        "resultUrls": task_data.get("resultUrls", []),
+        "failCode": task_data.get("failCode"),
+        "failMsg": task_data.get("failMsg") or (payload.get("msg") if code not in (None, 200) else None),
+        "errorMessage": task_data.get("errorMessage"),
+        "completeTime": task_data.get("completeTime"),
+        "createTime": task_data.get("createTime"),
+        "source": "kie_callback",
+    }
+
+
+def watch_task(task_id: str) -> None:
+    """Register interest in callbacks for ``task_id`` (reference counted)."""
+    waiter = _waiters.get(task_id)
+    if waiter is not None:
+        waiter.refs += 1
+        return
+    waiter = _TaskWaiter(loop=asyncio.get_running_loop(), event=asyncio.Event())
+    if task_id in _handoff_claims:
+        waiter.handed_off = True
+        waiter.event.set()
+        _waiters[task_id] = waiter
+        return
+    early = _early_records.pop(task_id, None)
+    if early is not None:
+        record, trusted, received_ts = early
+        if time.monotonic() - received_ts <= KIE_CALLBACK_EARLY_TTL_SECONDS:
+            waiter.record = record
+            waiter.trusted = trusted
+            waiter.event.set()
+    _waiters[task_id] = waiter
+
+
+def unwatch_task(task_id: str) -> None:
+    waiter = _waiters.get(task_id)
+    if waiter is None:
+        return
+    waiter.refs -= 1
+    if waiter.refs <= 0:
+        _waiters.pop(task_id, None)
+
+
+def task_handed_off(task_id: str) -> bool:
+    """True when a callback handoff already owns delivery of ``task_id``."""
+    waiter = _waiters.get(task_id)
+    return bool(waiter and waiter.handed_off) or task_id in _handoff_claims
+
+
+def _claim_for_handoff(task_id: str) -> bool:
+    # No awaits here: the check against waiters and the claim happen in one loop step.
+    if task_id in _waiters or _early_records.pop(task_id, None) is None:
+        return False
+    _handoff_claims[task_id] = time.monotonic()
+    _handoff_claims.move_to_end(task_id)
+    while len(_handoff_claims) > KIE_CALLBACK_EARLY_MAX:
+        _handoff_claims.popitem(last=False)
+    return True
+
+
+def take_task_callback(task_id: str) -> Optional[tuple[Dict[str, Any], bool]]:
+    """Pop the latest callback record for a watched task, if one arrived."""
+    waiter = _waiters.get(task_id)
+    if waiter is None or waiter.record is None:
+        return None
+    record, trusted = waiter.record, waiter.trusted
+    waiter.record = None
+    waiter.trusted = False
+    waiter.event.clear()
+    return dict(record), trusted
+
+
+async def wait_task_callback(task_id: str, timeout: float) -> bool:
+    """Sleep up to ``timeout`` seconds, returning early when a callback arrives."""
+    waiter = _waiters.get(task_id)
+    if waiter is None:
+        await asyncio.sleep(max(0.0, timeout))
+        return False
+    try:
+        await asyncio.wait_for(waiter.event.wait(), timeout=max(0.0, timeout))
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+def publish_task_callback(task_id: str, record: Dict[str, Any], *, trusted: bool) -> bool:
+    """Deliver a callback record to an in-process waiter; False when nobody waits."""
+    waiter = _waiters.get(task_id)
+    if waiter is None:
+        return False
+    waiter.record = record
+    waiter.trusted = trusted
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is waiter.loop:
+        waiter.event.set()
+    else:
+        waiter.loop.call_soon_threadsafe(waiter.event.set)
+    return True
+
+
+def _park_early_record(task_id: str, record: Dict[str, Any], *, trusted: bool) -> None:
+    _early_records[task_id] = (record, trusted, time.monotonic())
+    _early_records.move_to_end(task_id)
+    while len(_early_records) > KIE_CALLBACK_EARLY_MAX:
+        _early_records.popitem(last=False)
+
+
+def callback_stats_snapshot() -> Dict[str, Any]:
+    snapshot = _stats.to_dict()
+    snapshot["waiters"] = len(_waiters)
+    snapshot["early_parked"] = len(_early_records)
+    snapshot["handoff_claims"] = len(_handoff_claims)
+    return snapshot
+
+
+def reset_callback_state() -> None:
+    global _stats
+    _waiters.clear()
+    _early_records.clear()
+    _handoff_claims.clear()
+    _stats = CallbackStats()
+
+
+async def resolve_job_for_task(storage: Any, task_id: str) -> Optional[Dict[str, Any]]:
+    """Find the stored job for a provider task id via the correlation/dedupe registries."""
+    from app.generations.request_dedupe_store import get_job_id_for_task
+    from app.observability.correlation_store import lookup_correlations, resolve_by_task_id
+
+    candidates = []
+    correlation = resolve_by_task_id(task_id)
+    if correlation is None:
+        persisted = await lookup_correlations(task_id=task_id, limit=1, storage=storage)
+        correlation = persisted[0] if persisted else None
+    if correlation and correlation.get("job_id"):
+        candidates.append(str(correlation["job_id"]))
+    try:
+        mapped_job_id = await get_job_id_for_task(task_id)
+    except Exception as exc:
+        logger.warning("kie_callback_job_mapping_failed task_id=%s error=%s", task_id, exc)
+        mapped_job_id = None
+    if mapped_job_id and str(mapped_job_id) not in candidates:
+        candidates.append(str(mapped_job_id))
+    candidates.append(task_id)
+    for job_id in candidates:
+        try:
+            job = await storage.get_job(job_id)
+        except Exception as exc:
+            logger.warning("kie_callback_get_job_failed job_id=%s error=%s", job_id, exc)
+            continue
+        if not job:
+            continue
+        job = dict(job)
+        job.setdefault("job_id", job_id)
+        if not (job.get("task_id") or job.get("external_task_id")):
+            job["task_id"] = task_id
+        if correlation:
+            job.setdefault("correlation_id", correlation.get("correlation_id"))
+            job.setdefault("request_id", correlation.get("request_id"))
+        return job
+    return None
+
+
+def _register_handoff_task(task: asyncio.Task[Any]) -> None:
+    _handoff_tasks.add(task)
+    task.add_done_callback(_handoff_tasks.discard)
+
+
+async def _handoff_to_delivery(
+    task_id: str,
+    record: Dict[str, Any],
+    *,
+    trusted: bool,
+    get_bot: Callable[[], Any],
+    get_storage: Callable[[], Any],
+    get_kie_client: Callable[[], Any],
+    get_user_language: Optional[Callable[[int], str]],
+) -> None:
+    from app.delivery.reconciler import DELIVERED_STATES, apply_task_status
+
+    storage = get_storage()
+    job = await resolve_job_for_task(storage, task_id)
+    if job is None:
+        _stats.orphaned += 1
+        log_structured_event(
+            action="KIE_CALLBACK",
+            action_path="kie_callbacks.handoff",
+            task_id=task_id,
+            stage="KIE_CALLBACK",
+            outcome="orphan",
+            param={"state": record.get("state")},
+        )
+        return
+    if str(job.get("status") or "").lower() in DELIVERED_STATES:
+        _early_records.pop(task_id, None)
+        return
+    status = record
+    if not trusted:
+        # Unsigned callbacks are only a wake-up hint: confirm with one poll.
+        status = await get_kie_client().get_task_status(
+            task_id,
+            correlation_id=job.get("correlation_id") or job.get("request_id"),
+        )
+        if not status.get("ok"):
+            return
+    if not _claim_for_handoff(task_id):
+        # A waiter in this process picked the record up in the meantime.
+        return
+    _stats.handed_off += 1
+    await apply_task_status(
+        get_bot(),
+        storage,
+        job=job,
+        status=dict(status),
+        source="kie_callback",
+        get_user_language=get_user_language,
+    )
+
+
+def build_kie_callback_handler(
+    *,
+    get_bot: Callable[[], Any],
+    get_storage: Callable[[], Any],
+    get_kie_client: Callable[[], Any],
+    get_user_language: Optional[Callable[[int], str]] = None,
+) -> Callable[[web.Request], Awaitable[web.StreamResponse]]:
+    """Build the aiohttp handler for ``KIE_CALLBACK_PATH``."""
+
+    async def kie_callback_handler(request: web.Request) -> web.StreamResponse:
+        token = request.query.get("token") or request.headers.get(KIE_CALLBACK_TOKEN_HEADER)
+        if not verify_callback_token(token):
+            _stats.rejected += 1
+            logger.warning("KIE_CALLBACK rejected reason=invalid_token remote=%s", request.remote)
+            return web.json_response({"ok": False, "error": "invalid_token"}, status=403)
+        try:
+            payload = await request.json()
+        except Exception:
+            _stats.rejected += 1
+            return web.json_response({"ok": False, "error": "invalid_json"}, status=400)
+        record = normalize_callback_record(payload)
+        if record is None:
+            _stats.rejected += 1
+            return web.json_response({"ok": False, "error": "missing_task_id"}, status=400)
+
+        task_id = record["taskId"]
+        trusted = bool(get_callback_token())
+        _stats.received += 1
+        _stats.last_received_ts = time.time()
+        if publish_task_callback(task_id, record, trusted=trusted):
+            _stats.woke_waiter += 1
+            outcome = "waiter"
+        else:
+            _park_early_record(task_id, record, trusted=trusted)
+            _stats.early += 1
+            task = asyncio.create_task(
+                _handoff_to_delivery(
+                    task_id,
+                    record,
+                    trusted=trusted,
+                    get_bot=get_bot,
+                    get_storage=get_storage,
+                    get_kie_client=get_kie_client,
+                    get_user_language=get_user_language,
+                )
+            )
+            _register_handoff_task(task)
+            task.add_done_callback(_log_handoff_failure)
+            outcome = "handoff"
+        log_structured_event(
+            action="KIE_CALLBACK",
+            action_path="kie_callbacks.handler",
+            task_id=task_id,
+            stage="KIE_CALLBACK",
+            outcome=outcome,
+            param={"state": record.get("state"), "trusted": trusted},
+        )
+        return web.json_response({"ok": True, "dispatch": outcome})
+
+    return kie_callback_handler
+
+
+def _log_handoff_failure(task: asyncio.Task[Any]) -> None:
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logger.warning("kie_callback_handoff_failed error=%s", exc, exc_info=exc)
@@ -74,12 +74,13 @@ class KIEClient:
             logger.info("[CIRCUIT_BREAKER] enabled=false")
 
     async def close(self) -> None:
-        if self._session and not self._session.closed:
-            await self._session.close()
+        # Сессия общая (пул kie_api), её закрывает close_http_clients() при остановке.
+        self._session = None
 
     async def _get_session(self) -> aiohttp.ClientSession:
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        from app.integrations.http_clients import get_session
+
+        self._session = await get_session("kie_api")
         return self._session
 
     def _headers(self, correlation_id: str) -> Dict[str, str]:
@@ -238,6 +239,7 @@ class KIEClient:
                     headers=self._headers(correlation_id),
                     json=payload,
                     params=params,
+                    timeout=self.timeout,
                 ) as response:
                     text = await response.text()
                     latency_ms = int((time.monotonic() - start_ts) * 1000)
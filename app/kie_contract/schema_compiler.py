@@ -0,0 +1,263 @@
+"""Compiled, cached view of the KIE model input schemas.
+
+Each model's ``input`` block from models/kie_models.yaml is turned once into a
+``CompiledSchema`` holding field specs, enum sets, per-field coercers,
+defaults and the required list. The normalizer, the contract validator and the
+UX form engine all read from it, so a request no longer walks the YAML dicts.
+The cache follows the registry: when schema_loader re-reads the YAML file,
+every compiled schema is dropped and rebuilt on next use.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from app.kie_contract.schema_loader import _load_registry
+
+
+def _coerce_number(value: Any, field_type: str) -> Any:
+    if isinstance(value, str) and value.strip():
+        try:
+            numeric_value = float(value) if field_type == "number" else int(value)
+        except ValueError:
+            try:
+                numeric_value = float(value)
+            except ValueError:
+                return value
+        if field_type == "integer":
+            if isinstance(numeric_value, float) and numeric_value.is_integer():
+                return int(numeric_value)
+            return numeric_value if isinstance(numeric_value, int) else value
+        if isinstance(numeric_value, float) and numeric_value.is_integer():
+            return int(numeric_value)
+        return numeric_value
+    if field_type == "integer" and isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _coerce_number_value(value: Any) -> Any:
+    return _coerce_number(value, "number")
+
+
+def _coerce_integer_value(value: Any) -> Any:
+    return _coerce_number(value, "integer")
+
+
+def _coerce_boolean_value(value: Any) -> Any:
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in {"true", "1", "yes"}:
+            return True
+        if lowered in {"false", "0", "no"}:
+            return False
+    return value
+
+
+def _coerce_array_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return [value]
+    return value
+
+
+def _keep_value(value: Any) -> Any:
+    return value
+
+
+_COERCERS: Dict[str, Callable[[Any], Any]] = {
+    "number": _coerce_number_value,
+    "integer": _coerce_integer_value,
+    "boolean": _coerce_boolean_value,
+    "array": _coerce_array_value,
+}
+
+
+def coercer_for(field_type: str) -> Callable[[Any], Any]:
+    """Coercion function for a schema field type (identity for unknown types)."""
+    return _COERCERS.get(field_type, _keep_value)
+
+
+def coerce_value(field_type: str, value: Any) -> Any:
+    if value is None:
+        return value
+    return coercer_for(field_type)(value)
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    name: str
+    field_type: str
+    required: bool
+    enum: Optional[List[Any]] = None
+    item_type: Optional[str] = None
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    min_items: Optional[int] = None
+    max_items: Optional[int] = None
+    default: Any = None
+    enum_strings: Optional[FrozenSet[str]] = field(default=None, compare=False, repr=False)
+
+    def coerce(self, value: Any) -> Any:
+        return coerce_value(self.field_type, value)
+
+    def check(self, value: Any) -> Optional[str]:
+        """Return an error message when ``value`` does not fit the field, else None."""
+        if value is None:
+            return None
+        field_type = self.field_type
+        if field_type == "string":
+            if not isinstance(value, str):
+                return f"{self.name} must be a string"
+            if self.min_value is not None and len(value) < int(self.min_value):
+                return f"{self.name} must be at least {self.min_value} characters"
+            if self.max_value is not None and len(value) > int(self.max_value):
+                return f"{self.name} exceeds max length {self.max_value}"
+        elif field_type == "integer":
+            if isinstance(value, bool) or not isinstance(value, int):
+                return f"{self.name} must be an integer"
+            if self.min_value is not None and value < self.min_value:
+                return f"{self.name} must be >= {self.min_value}"
+            if self.max_value is not None and value > self.max_value:
+                return f"{self.name} must be <= {self.max_value}"
+        elif field_type == "number":
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return f"{self.name} must be a number"
+            if self.min_value is not None and value < self.min_value:
+                return f"{self.name} must be >= {self.min_value}"
+            if self.max_value is not None and value > self.max_value:
+                return f"{self.name} must be <= {self.max_value}"
+        elif field_type == "boolean":
+            if not isinstance(value, bool):
+                return f"{self.name} must be a boolean"
+        elif field_type == "enum":
+            if self.enum:
+                allowed = self.enum_strings
+                if allowed is None:
+                    allowed = frozenset(str(option) for option in self.enum)
+                if str(value) not in allowed:
+                    return f"{self.name} must be one of {self.enum}"
+        elif field_type == "array":
+            if not isinstance(value, list):
+                return f"{self.name} must be an array"
+            if self.min_items is not None and len(value) < self.min_items:
+                return f"{self.name} must contain at least {self.min_items} items"
+            if self.max_items is not None and len(value) > self.max_items:
+                return f"{self.name} must contain at most {self.max_items} items"
+            if self.item_type:
+                for idx, item in enumerate(value):
+                    if self.item_type == "string" and not isinstance(item, str):
+                        return f"{self.name}[{idx}] must be a string"
+                    if self.item_type == "number" and (isinstance(item, bool) or not isinstance(item, (int, float))):
+                        return f"{self.name}[{idx}] must be a number"
+                    if self.item_type == "integer" and (isinstance(item, bool) or not isinstance(item, int)):
+                        return f"{self.name}[{idx}] must be an integer"
+                    if self.item_type == "boolean" and not isinstance(item, bool):
+                        return f"{self.name}[{idx}] must be a boolean"
+        return None
+
+
+def _is_empty_required(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, list):
+        return len(value) == 0
+    return False
+
+
+class CompiledSchema:
+    """Precomputed field specs and lookups for one model's input schema."""
+
+    __slots__ = ("model_id", "fields", "field_map", "field_names", "required", "defaults")
+
+    def __init__(self, model_id: str, fields: Tuple[FieldSpec, ...]) -> None:
+        self.model_id = model_id
+        self.fields = fields
+        self.field_map: Dict[str, FieldSpec] = {spec.name: spec for spec in fields}
+        self.field_names: FrozenSet[str] = frozenset(self.field_map)
+        self.required: Tuple[str, ...] = tuple(spec.name for spec in fields if spec.required)
+        self.defaults: Dict[str, Any] = {spec.name: spec.default for spec in fields if spec.default is not None}
+
+    def normalize(self, payload: Mapping[str, Any]) -> Dict[str, Any]:
+        normalized: Dict[str, Any] = dict(payload)
+        field_map = self.field_map
+        for key, value in payload.items():
+            spec = field_map.get(key)
+            if spec is not None:
+                normalized[key] = spec.coerce(value)
+        return normalized
+
+    def validate(self, payload: Mapping[str, Any], *, ignore_unknown: bool = False) -> List[str]:
+        errors: List[str] = []
+        for name in self.required:
+            if name not in payload or _is_empty_required(payload.get(name)):
+                errors.append(f"{name} is required")
+        field_map = self.field_map
+        for key, value in payload.items():
+            spec = field_map.get(key)
+            if spec is None:
+                if not ignore_unknown:
+                    errors.append(f"{key} is not allowed for this model")
+                continue
+            error = spec.check(value)
+            if error:
+                errors.append(error)
+        return errors
+
+
+def compile_field(field_name: str, field_data: Mapping[str, Any]) -> FieldSpec:
+    enum_values = field_data.get("enum")
+    if enum_values is None:
+        enum_values = field_data.get("values")
+    if isinstance(enum_values, str):
+        enum_values = [enum_values]
+    return FieldSpec(
+        name=field_name,
+        field_type=field_data.get("type", "string"),
+        required=bool(field_data.get("required", False)),
+        enum=enum_values,
+        item_type=field_data.get("item_type"),
+        min_value=field_data.get("min"),
+        max_value=field_data.get("max"),
+        min_items=field_data.get("min_items"),
+        max_items=field_data.get("max_items"),
+        default=field_data.get("default"),
+        enum_strings=frozenset(str(option) for option in enum_values) if enum_values else None,
+    )
+
+
+def compile_input_schema(model_id: str, schema: Mapping[str, Any]) -> CompiledSchema:
+    return CompiledSchema(
+        model_id,
+        tuple(compile_field(name, data) for name, data in schema.items() if isinstance(data, Mapping)),
+    )
+
+
+_compiled_for: Optional[Dict[str, Any]] = None
+_compiled: Dict[str, Optional[CompiledSchema]] = {}
+
+
+def get_compiled_schema(model_id: str) -> Optional[CompiledSchema]:
+    """Compiled schema for ``model_id`` or None when the registry has no input schema."""
+    global _compiled_for
+    registry = _load_registry()
+    if registry is not _compiled_for:
+        _compiled.clear()
+        _compiled_for = registry
+    try:
+        return _compiled[model_id]
+    except KeyError:
+        pass
+    models = registry.get("models", {})
+    model_data = models.get(model_id) if isinstance(models, dict) else None
+    schema = model_data.get("input") if isinstance(model_data, dict) else None
+    compiled = compile_input_schema(model_id, schema) if isinstance(schema, dict) and schema else None
+    _compiled[model_id] = compiled
+    return compiled
+
+
+def reset_compiled_schemas() -> None:
+    global _compiled_for
+    _compiled.clear()
+    _compiled_for = None
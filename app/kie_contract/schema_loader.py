@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import yaml
 
@@ -10,12 +10,37 @@ ROOT = Path(__file__).resolve().parents[2]
 REGISTRY_PATH = ROOT / "models" / "kie_models.yaml"
 
 
+_registry_cache: Optional[Tuple[Tuple[str, int, int], Dict[str, Any]]] = None
+
+
+def _registry_version() -> Tuple[str, int, int]:
+    try:
+        stat = REGISTRY_PATH.stat()
+    except OSError:
+        return (str(REGISTRY_PATH), -1, -1)
+    return (str(REGISTRY_PATH), stat.st_mtime_ns, stat.st_size)
+
+
 def _load_registry() -> Dict[str, Any]:
-    if not REGISTRY_PATH.exists():
-        return {}
-    with REGISTRY_PATH.open("r", encoding="utf-8") as handle:
-        data = yaml.safe_load(handle) or {}
-    return data if isinstance(data, dict) else {}
+    """Parsed registry, re-read only when the YAML file changes (mtime/size)."""
+    global _registry_cache
+    version = _registry_version()
+    cached = _registry_cache
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    if version[1] < 0:
+        data: Dict[str, Any] = {}
+    else:
+        with REGISTRY_PATH.open("r", encoding="utf-8") as handle:
+            loaded = yaml.safe_load(handle) or {}
+        data = loaded if isinstance(loaded, dict) else {}
+    _registry_cache = (version, data)
+    return data
+
+
+def reset_registry_cache() -> None:
+    global _registry_cache
+    _registry_cache = None
 
 
 def list_model_ids() -> List[str]:
@@ -1,29 +1,40 @@
 """Rate limiting and deduplication helpers."""
 from __future__ import annotations
 
+import os
 import time
 from dataclasses import dataclass
-from typing import Callable, Dict, Hashable, Tuple
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from app.utils.expiring_map import ExpiringMap
+
+TTL_CACHE_MAX_KEYS = int(os.getenv("TTL_CACHE_MAX_KEYS", "100000"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
 
 
 class TTLCache:
-    def __init__(self, ttl_seconds: float, time_fn: Callable[[], float] | None = None) -> None:
+    def __init__(
+        self,
+        ttl_seconds: float,
+        time_fn: Callable[[], float] | None = None,
+        *,
+        max_size: Optional[int] = TTL_CACHE_MAX_KEYS,
+    ) -> None:
         self.ttl_seconds = ttl_seconds
         self._time_fn = time_fn or time.monotonic
-        self._entries: Dict[Hashable, float] = {}
+        self._entries: ExpiringMap[bool] = ExpiringMap(ttl_seconds, max_size=max_size, time_fn=self._time_fn)
 
-    def _cleanup(self, now: float) -> None:
-        expired = [key for key, ts in self._entries.items() if now - ts > self.ttl_seconds]
-        for key in expired:
-            self._entries.pop(key, None)
+    def __len__(self) -> int:
+        return len(self._entries)
 
     def seen(self, key: Hashable) -> bool:
-        now = self._time_fn()
-        self._cleanup(now)
-        if key in self._entries:
-            return True
-        self._entries[key] = now
-        return False
+        return self._entries.add(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self._entries.stats()
 
 
 @dataclass
@@ -53,31 +64,42 @@ class TokenBucket:
         return False, needed / self.rate
 
 
-class PerUserRateLimiter:
-    def __init__(self, rate: float, capacity: float, time_fn: Callable[[], float] | None = None) -> None:
-        self.rate = rate
-        self.capacity = capacity
-        self._time_fn = time_fn or time.monotonic
-        self._buckets: Dict[int, TokenBucket] = {}
-
-    def check(self, user_id: int, amount: float = 1.0) -> Tuple[bool, float]:
-        bucket = self._buckets.get(user_id)
-        if bucket is None:
-            bucket = TokenBucket.create(self.rate, self.capacity, self._time_fn)
-            self._buckets[user_id] = bucket
-        return bucket.consume(amount)
+class PerKeyRateLimiter:
+    """Token bucket per key; idle buckets expire and the key count is bounded.
 
+    A bucket left alone for capacity / rate seconds has refilled completely,
+    so dropping it and creating a fresh one later gives the same answer.
+    """
 
-class PerKeyRateLimiter:
-    def __init__(self, rate: float, capacity: float, time_fn: Callable[[], float] | None = None) -> None:
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        time_fn: Callable[[], float] | None = None,
+        *,
+        max_keys: Optional[int] = RATE_LIMIT_MAX_KEYS,
+    ) -> None:
         self.rate = rate
         self.capacity = capacity
         self._time_fn = time_fn or time.monotonic
-        self._buckets: Dict[Hashable, TokenBucket] = {}
+        idle_ttl = max(capacity / rate, 1.0) if rate > 0 else None
+        self._buckets: ExpiringMap[TokenBucket] = ExpiringMap(idle_ttl, max_size=max_keys, time_fn=self._time_fn)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
 
     def check(self, key: Hashable, amount: float = 1.0) -> Tuple[bool, float]:
-        bucket = self._buckets.get(key)
+        now = self._time_fn()
+        bucket = self._buckets.get(key, now=now)
         if bucket is None:
             bucket = TokenBucket.create(self.rate, self.capacity, self._time_fn)
-            self._buckets[key] = bucket
+        self._buckets.set(key, bucket, now=now)
         return bucket.consume(amount)
+
+    def stats(self) -> Dict[str, int]:
+        return self._buckets.stats()
+
+
+class PerUserRateLimiter(PerKeyRateLimiter):
+    def check(self, user_id: int, amount: float = 1.0) -> Tuple[bool, float]:
+        return super().check(user_id, amount)
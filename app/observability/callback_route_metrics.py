@@ -0,0 +1,88 @@
+"""Per-route latency histograms for callback_data routing."""
+from __future__ import annotations
+
+import bisect
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended.
+BUCKET_BOUNDS_MS: Tuple[float, ...] = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+CALLBACK_ROUTE_SLOW_MS = float(os.getenv("CALLBACK_ROUTE_SLOW_MS", "2000"))
+UNKNOWN_ROUTE = "unknown"
+
+_lock = threading.Lock()
+
+
+class _RouteHistogram:
+    __slots__ = ("counts", "total", "sum_ms", "max_ms")
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, latency_ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, latency_ms)] += 1
+        self.total += 1
+        self.sum_ms += latency_ms
+        if latency_ms > self.max_ms:
+            self.max_ms = latency_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (max for the open bucket)."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return float(BUCKET_BOUNDS_MS[index]) if index < len(BUCKET_BOUNDS_MS) else round(self.max_ms, 1)
+        return round(self.max_ms, 1)
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "count": self.total,
+            "avg_ms": round(self.sum_ms / self.total, 2) if self.total else None,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 1),
+            "buckets": dict(zip([str(bound) for bound in BUCKET_BOUNDS_MS] + ["inf"], self.counts)),
+        }
+
+
+_HISTOGRAMS: Dict[str, _RouteHistogram] = {}
+
+
+def record_route_latency(route: Optional[str], latency_ms: float) -> None:
+    """Record one callback handled under ``route`` (the registered callback_data key)."""
+    if latency_ms is None or latency_ms < 0:
+        return
+    key = route or UNKNOWN_ROUTE
+    with _lock:
+        histogram = _HISTOGRAMS.get(key)
+        if histogram is None:
+            histogram = _HISTOGRAMS[key] = _RouteHistogram()
+        histogram.observe(float(latency_ms))
+    if latency_ms >= CALLBACK_ROUTE_SLOW_MS:
+        logger.warning(
+            "METRIC_GAUGE name=callback_route_slow_ms value=%s route=%s",
+            int(latency_ms),
+            key,
+        )
+
+
+def metrics_snapshot() -> Dict[str, Dict[str, object]]:
+    with _lock:
+        return {route: histogram.summary() for route, histogram in sorted(_HISTOGRAMS.items())}
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _HISTOGRAMS.clear()
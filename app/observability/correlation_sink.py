@@ -0,0 +1,329 @@
+"""Append-only persistence for correlation records.
+
+Each flushed batch is appended as rows instead of being merged into the single
+observability_correlations.json document:
+
+* Postgres storage: table ``observability_correlation_events`` with indexes on
+  request_id / task_id / job_id / correlation_id, filled with one batched
+  INSERT per flush and pruned by ``created_at``.
+* JSON / GitHub storage: rotating JSONL segments under
+  ``<data_dir>/correlations/``; a segment is closed once it reaches
+  CORRELATION_SINK_SEGMENT_BYTES and whole segments are deleted after the
+  retention window.
+
+``lookup`` answers diagnostics queries by id without loading the whole history.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+CORRELATION_SINK_RETENTION_SECONDS = float(os.getenv("CORRELATION_SINK_RETENTION_HOURS", "72")) * 3600
+CORRELATION_SINK_SEGMENT_BYTES = int(os.getenv("CORRELATION_SINK_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+CORRELATION_SINK_PRUNE_INTERVAL_SECONDS = float(os.getenv("CORRELATION_SINK_PRUNE_INTERVAL_SECONDS", "600"))
+CORRELATION_SINK_DIR = os.getenv("CORRELATION_SINK_DIR", "").strip()
+
+LOOKUP_FIELDS = ("correlation_id", "request_id", "task_id", "job_id")
+_ROW_FIELDS = (
+    "correlation_id",
+    "request_id",
+    "task_id",
+    "job_id",
+    "user_id",
+    "model_id",
+    "updated_at_ms",
+    "missing_actions",
+    "source",
+)
+
+
+def _lookup_criteria(**ids: Optional[str]) -> Dict[str, str]:
+    return {name: str(value) for name, value in ids.items() if name in LOOKUP_FIELDS and value}
+
+
+def _latest_per_correlation(rows: Iterable[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Rows come newest first; keep the newest snapshot of each correlation."""
+    seen: set[str] = set()
+    result: List[Dict[str, Any]] = []
+    for row in rows:
+        correlation_id = row.get("correlation_id")
+        if correlation_id in seen:
+            continue
+        seen.add(correlation_id)
+        result.append(row)
+        if len(result) >= limit:
+            break
+    return result
+
+
+class PostgresCorrelationSink:
+    name = "postgres"
+
+    def __init__(self, storage: Any) -> None:
+        self._storage = storage
+        self._schema_ready_pools: set[int] = set()
+
+    @property
+    def partner_id(self) -> str:
+        return str(getattr(self._storage, "partner_id", "") or "default")
+
+    async def _get_pool(self) -> Any:
+        pool = await self._storage._get_pool()
+        if id(pool) not in self._schema_ready_pools:
+            async with pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS observability_correlation_events (
+                        id             BIGSERIAL PRIMARY KEY,
+                        partner_id     TEXT NOT NULL,
+                        correlation_id TEXT NOT NULL,
+                        request_id     TEXT,
+                        task_id        TEXT,
+                        job_id         TEXT,
+                        user_id        BIGINT,
+                        model_id       TEXT,
+                        source         TEXT,
+                        payload        JSONB NOT NULL,
+                        created_at     TIMESTAMPTZ NOT NULL DEFAULT now()
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_corr_events_correlation
+                        ON observability_correlation_events(partner_id, correlation_id);
+                    CREATE INDEX IF NOT EXISTS idx_corr_events_request
+                        ON observability_correlation_events(partner_id, request_id) WHERE request_id IS NOT NULL;
+                    CREATE INDEX IF NOT EXISTS idx_corr_events_task
+                        ON observability_correlation_events(partner_id, task_id) WHERE task_id IS NOT NULL;
+                    CREATE INDEX IF NOT EXISTS idx_corr_events_job
+                        ON observability_correlation_events(partner_id, job_id) WHERE job_id IS NOT NULL;
+                    CREATE INDEX IF NOT EXISTS idx_corr_events_created_at
+                        ON observability_correlation_events(created_at);
+                    """
+                )
+            self._schema_ready_pools.add(id(pool))
+        return pool
+
+    async def append(self, rows: Sequence[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        pool = await self._get_pool()
+        partner_id = self.partner_id
+        values = [
+            (
+                partner_id,
+                str(row["correlation_id"]),
+                row.get("request_id"),
+                row.get("task_id"),
+                row.get("job_id"),
+                int(row["user_id"]) if row.get("user_id") is not None else None,
+                row.get("model_id"),
+                row.get("source"),
+                json.dumps(row, ensure_ascii=False, default=str),
+            )
+            for row in rows
+        ]
+        async with pool.acquire() as conn:
+            await conn.executemany(
+                """
+                INSERT INTO observability_correlation_events
+                    (partner_id, correlation_id, request_id, task_id, job_id, user_id, model_id, source, payload)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9::jsonb)
+                """,
+                values,
+            )
+        return len(values)
+
+    async def lookup(self, *, limit: int = 20, **ids: Optional[str]) -> List[Dict[str, Any]]:
+        criteria = _lookup_criteria(**ids)
+        if not criteria:
+            return []
+        pool = await self._get_pool()
+        clauses = ["partner_id = $1"]
+        args: List[Any] = [self.partner_id]
+        for column, value in criteria.items():
+            args.append(value)
+            clauses.append(f"{column} = ${len(args)}")
+        args.append(int(limit) * 4)
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"""
+                SELECT payload FROM observability_correlation_events
+                WHERE {' AND '.join(clauses)}
+                ORDER BY id DESC
+                LIMIT ${len(args)}
+                """,
+                *args,
+            )
+        decoded = (json.loads(row["payload"]) if isinstance(row["payload"], str) else dict(row["payload"]) for row in rows)
+        return _latest_per_correlation(decoded, limit)
+
+    async def prune(self, retention_seconds: float = CORRELATION_SINK_RETENTION_SECONDS) -> int:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            result = await conn.execute(
+                """
+                DELETE FROM observability_correlation_events
+                WHERE created_at < now() - make_interval(secs => $1)
+                """,
+                float(retention_seconds),
+            )
+        try:
+            return int(str(result).split()[-1])
+        except (ValueError, IndexError):
+            return 0
+
+
+class JsonlCorrelationSink:
+    name = "jsonl"
+
+    def __init__(self, directory: Path, *, segment_bytes: int = CORRELATION_SINK_SEGMENT_BYTES) -> None:
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._active: Optional[Path] = None
+
+    def _segments(self) -> List[Path]:
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("correlations-*.jsonl"))
+
+    def _active_segment(self) -> Path:
+        active = self._active
+        if active is not None and active.exists() and active.stat().st_size < self.segment_bytes:
+            return active
+        segments = self._segments()
+        if active is None and segments and segments[-1].stat().st_size < self.segment_bytes:
+            self._active = segments[-1]
+            return self._active
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"correlations-{time.time_ns():020d}.jsonl"
+        self._active = self.directory / name
+        return self._active
+
+    def _append_sync(self, rows: Sequence[Dict[str, Any]]) -> int:
+        payload = "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+        with self._lock:
+            with self._active_segment().open("a", encoding="utf-8") as handle:
+                handle.write(payload)
+        return len(rows)
+
+    async def append(self, rows: Sequence[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        return await asyncio.to_thread(self._append_sync, rows)
+
+    def _lookup_sync(self, criteria: Dict[str, str], limit: int) -> List[Dict[str, Any]]:
+        needles = [json.dumps(value, ensure_ascii=False) for value in criteria.values()]
+
+        def newest_first() -> Iterable[Dict[str, Any]]:
+            for segment in reversed(self._segments()):
+                matches: List[Dict[str, Any]] = []
+                try:
+                    with segment.open("r", encoding="utf-8") as handle:
+                        for line in handle:
+                            if not all(needle in line for needle in needles):
+                                continue
+                            try:
+                                row = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue
+                            if all(str(row.get(key)) == value for key, value in criteria.items()):
+                                matches.append(row)
+                except FileNotFoundError:
+                    continue
+                yield from reversed(matches)
+
+        return _latest_per_correlation(newest_first(), limit)
+
+    async def lookup(self, *, limit: int = 20, **ids: Optional[str]) -> List[Dict[str, Any]]:
+        criteria = _lookup_criteria(**ids)
+        if not criteria:
+            return []
+        return await asyncio.to_thread(self._lookup_sync, criteria, int(limit))
+
+    def _prune_sync(self, retention_seconds: float) -> int:
+        cutoff = time.time() - retention_seconds
+        removed = 0
+        with self._lock:
+            for segment in self._segments():
+                if segment == self._active:
+                    continue
+                try:
+                    if segment.stat().st_mtime < cutoff:
+                        segment.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+    async def prune(self, retention_seconds: float = CORRELATION_SINK_RETENTION_SECONDS) -> int:
+        return await asyncio.to_thread(self._prune_sync, retention_seconds)
+
+
+_sinks: Dict[int, tuple[Any, Any]] = {}
+_last_prune_ts: Dict[int, float] = {}
+
+
+def _postgres_backend(storage: Any) -> Optional[Any]:
+    for candidate in (storage, getattr(storage, "_primary", None)):
+        if candidate is not None and callable(getattr(candidate, "_get_pool", None)) and hasattr(candidate, "partner_id"):
+            return candidate
+    return None
+
+
+def _jsonl_directory(storage: Any) -> Path:
+    if CORRELATION_SINK_DIR:
+        return Path(CORRELATION_SINK_DIR)
+    for candidate in (storage, getattr(storage, "_runtime", None), getattr(storage, "_primary", None)):
+        data_dir = getattr(candidate, "data_dir", None)
+        if data_dir:
+            return Path(data_dir) / "correlations"
+    tenant = os.getenv("BOT_INSTANCE_ID", "").strip() or os.getenv("PARTNER_ID", "").strip() or "default"
+    return Path("data") / tenant / "correlations"
+
+
+def get_correlation_sink(storage: Any) -> Any:
+    """Sink for ``storage``: Postgres table when it is (or wraps) Postgres storage, JSONL otherwise."""
+    cached = _sinks.get(id(storage))
+    if cached is not None and cached[0] is storage:
+        return cached[1]
+    pg_storage = _postgres_backend(storage)
+    sink = PostgresCorrelationSink(pg_storage) if pg_storage is not None else JsonlCorrelationSink(_jsonl_directory(storage))
+    _sinks[id(storage)] = (storage, sink)
+    return sink
+
+
+async def maybe_prune(sink: Any, *, now: Optional[float] = None) -> int:
+    """Prune at most once per CORRELATION_SINK_PRUNE_INTERVAL_SECONDS per sink."""
+    now = time.monotonic() if now is None else now
+    key = id(sink)
+    last = _last_prune_ts.get(key)
+    if last is not None and now - last < CORRELATION_SINK_PRUNE_INTERVAL_SECONDS:
+        return 0
+    _last_prune_ts[key] = now
+    try:
+        removed = await sink.prune(CORRELATION_SINK_RETENTION_SECONDS)
+    except Exception as exc:
+        logger.debug("correlation_sink_prune_failed sink=%s error=%s", sink.name, exc)
+        return 0
+    if removed:
+        logger.info("METRIC_GAUGE name=correlation_sink_pruned value=%s sink=%s", removed, sink.name)
+    return removed
+
+
+def build_row(record_dict: Dict[str, Any], source: Optional[str]) -> Dict[str, Any]:
+    row = {name: record_dict.get(name) for name in _ROW_FIELDS}
+    row["source"] = source
+    row["ts_ms"] = int(time.time() * 1000)
+    return row
+
+
+def reset_correlation_sinks() -> None:
+    _sinks.clear()
+    _last_prune_ts.clear()
@@ -4,16 +4,18 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+import sys
 import time
+from collections import OrderedDict
 from contextlib import suppress
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional, Set
+from typing import Any, Dict, List, Optional, Set
 
+from app.observability.correlation_sink import build_row, get_correlation_sink, maybe_prune, reset_correlation_sinks
 from app.observability.trace import get_correlation_id as get_trace_correlation_id
 
 logger = logging.getLogger(__name__)
 
-CORRELATIONS_FILE = "observability_correlations.json"
 _DELIVERY_COMPLETE_STATES = {"delivered", "success", "succeeded", "completed"}
 
 
@@ -21,7 +23,7 @@ def _now_ms() -> int:
     return int(time.time() * 1000)
 
 
-@dataclass
+@dataclass(slots=True)
 class CorrelationRecord:
     correlation_id: str
     request_id: Optional[str] = None
@@ -31,6 +33,8 @@ class CorrelationRecord:
     model_id: Optional[str] = None
     updated_at_ms: int = field(default_factory=_now_ms)
     missing_actions: Set[str] = field(default_factory=set)
+    delivery_complete: bool = False
+    touched_at: float = field(default_factory=time.monotonic, compare=False, repr=False)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -45,8 +49,15 @@ class CorrelationRecord:
         }
 
 
-_records_by_correlation: Dict[str, CorrelationRecord] = {}
+# LRU order: least recently touched first. Completed deliveries are evicted before live ones.
+_records_by_correlation: "OrderedDict[str, CorrelationRecord]" = OrderedDict()
 _records_by_request: Dict[str, CorrelationRecord] = {}
+_records_by_task: Dict[str, CorrelationRecord] = {}
+_completed_correlations: "OrderedDict[str, None]" = OrderedDict()
+_registry_max_records = int(os.getenv("CORRELATION_REGISTRY_MAX_RECORDS", "50000"))
+_registry_max_age_seconds = float(os.getenv("CORRELATION_REGISTRY_MAX_AGE_SECONDS", "21600"))
+_registry_evicted_total = 0
+_registry_expired_total = 0
 _persist_tasks: Set[asyncio.Task[Any]] = set()
 _persist_debounce_tasks: Dict[str, asyncio.Task[Any]] = {}
 _persist_debounce_seconds = float(os.getenv("CORRELATION_STORE_DEBOUNCE_SECONDS", "0.5"))
@@ -272,15 +283,117 @@ def _normalize_correlation_id(correlation_id: Optional[str], request_id: Optiona
     return str(resolved)
 
 
+def _unindex(index: Dict[str, CorrelationRecord], key: Optional[str], record: CorrelationRecord) -> None:
+    if key and index.get(key) is record:
+        del index[key]
+
+
+def _drop_record(correlation_id: str) -> Optional[CorrelationRecord]:
+    record = _records_by_correlation.pop(correlation_id, None)
+    _completed_correlations.pop(correlation_id, None)
+    if record is None:
+        return None
+    _unindex(_records_by_request, record.request_id, record)
+    _unindex(_records_by_task, record.task_id, record)
+    return record
+
+
+def _enforce_registry_bounds(now: float) -> None:
+    global _registry_evicted_total, _registry_expired_total
+    if _registry_max_age_seconds > 0:
+        deadline = now - _registry_max_age_seconds
+        while _records_by_correlation:
+            oldest_id, oldest = next(iter(_records_by_correlation.items()))
+            if oldest.touched_at >= deadline:
+                break
+            _drop_record(oldest_id)
+            _registry_expired_total += 1
+    if _registry_max_records <= 0:
+        return
+    while len(_records_by_correlation) > _registry_max_records:
+        if _completed_correlations:
+            victim = next(iter(_completed_correlations))
+        else:
+            victim = next(iter(_records_by_correlation))
+        _drop_record(victim)
+        _registry_evicted_total += 1
+
+
+def _touch(record: CorrelationRecord, now: Optional[float] = None) -> None:
+    record.touched_at = time.monotonic() if now is None else now
+    if _records_by_correlation.get(record.correlation_id) is record:
+        _records_by_correlation.move_to_end(record.correlation_id)
+
+
 def _get_record(correlation_id: str) -> CorrelationRecord:
+    now = time.monotonic()
     record = _records_by_correlation.get(correlation_id)
     if record:
+        _touch(record, now)
         return record
-    record = CorrelationRecord(correlation_id=correlation_id)
+    record = CorrelationRecord(correlation_id=correlation_id, touched_at=now)
     _records_by_correlation[correlation_id] = record
+    _enforce_registry_bounds(now)
     return record
 
 
+def _index_record(record: CorrelationRecord) -> None:
+    if record.request_id:
+        _records_by_request[record.request_id] = record
+    if record.task_id:
+        _records_by_task[record.task_id] = record
+
+
+def mark_delivery_status(correlation_id: Optional[str], status: Optional[str]) -> None:
+    """Flag a correlation as delivered so it is evicted ahead of in-flight ones."""
+    if not correlation_id or not is_delivery_complete(status):
+        return
+    record = _records_by_correlation.get(str(correlation_id))
+    if record is None or record.delivery_complete:
+        return
+    record.delivery_complete = True
+    _completed_correlations[record.correlation_id] = None
+
+
+def registry_snapshot(*, sample_size: int = 256) -> Dict[str, Any]:
+    """Entry counts and an approximate memory footprint of the in-memory registry."""
+    records = len(_records_by_correlation)
+    sampled = 0
+    sampled_bytes = 0
+    for record in reversed(_records_by_correlation.values()):
+        if sampled >= sample_size:
+            break
+        sampled_bytes += sys.getsizeof(record) + sys.getsizeof(record.missing_actions)
+        for value in (record.correlation_id, record.request_id, record.task_id, record.job_id, record.model_id):
+            if value is not None:
+                sampled_bytes += sys.getsizeof(value)
+        sampled += 1
+    approx_bytes = int(sampled_bytes / sampled * records) if sampled else 0
+    return {
+        "records": records,
+        "by_request": len(_records_by_request),
+        "by_task": len(_records_by_task),
+        "completed": len(_completed_correlations),
+        "max_records": _registry_max_records,
+        "max_age_seconds": _registry_max_age_seconds,
+        "evicted_total": _registry_evicted_total,
+        "expired_total": _registry_expired_total,
+        "approx_bytes": approx_bytes,
+    }
+
+
+def log_registry_gauges() -> Dict[str, Any]:
+    snapshot = registry_snapshot()
+    logger.info(
+        "METRIC_GAUGE name=correlation_registry_records value=%s completed=%s evicted_total=%s approx_bytes=%s",
+        snapshot["records"],
+        snapshot["completed"],
+        snapshot["evicted_total"],
+        snapshot["approx_bytes"],
+    )
+    return snapshot
+
+
 def resolve_correlation_ids(
     *,
     correlation_id: Optional[str],
@@ -297,6 +410,8 @@ def resolve_correlation_ids(
         record = _records_by_request.get(str(request_id))
         if record:
             resolved_corr = record.correlation_id
+    if record:
+        _touch(record)
     resolved_request_id = str(request_id) if request_id else (record.request_id if record else None)
     resolved_task_id = str(task_id) if task_id else (record.task_id if record else None)
     resolved_job_id = str(job_id) if job_id else (record.job_id if record else None)
@@ -308,6 +423,16 @@ def resolve_correlation_ids(
     }
 
 
+def resolve_by_task_id(task_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Return the in-memory record for a provider task id, if known."""
+    if not task_id:
+        return None
+    record = _records_by_task.get(str(task_id))
+    if record is None or record.task_id != str(task_id):
+        return None
+    return record.to_dict()
+
+
 def _merge_record(
     record: CorrelationRecord,
     *,
@@ -319,10 +444,13 @@ def _merge_record(
     missing_actions: Optional[Set[str]] = None,
 ) -> tuple[CorrelationRecord, bool]:
     changed = False
+    # Drop the superseded key, otherwise the index keeps entries that eviction never reaches.
     if request_id and record.request_id != request_id:
+        _unindex(_records_by_request, record.request_id, record)
         record.request_id = request_id
         changed = True
     if task_id and record.task_id != task_id:
+        _unindex(_records_by_task, record.task_id, record)
         record.task_id = task_id
         changed = True
     if job_id and record.job_id != job_id:
@@ -347,46 +475,6 @@ def _merge_record(
     return record, changed
 
 
-async def _persist_record(record: CorrelationRecord, *, storage: Optional[Any], source: Optional[str]) -> None:
-    storage_instance = _resolve_storage(storage)
-    if not storage_instance or not hasattr(storage_instance, "update_json_file"):
-        return
-
-    async def _update_file() -> None:
-        def updater(data: Dict[str, Any]) -> Dict[str, Any]:
-            next_data = dict(data or {})
-            payload = dict(next_data.get(record.correlation_id) or {})
-            payload.update(record.to_dict())
-            if source:
-                payload["source"] = source
-            next_data[record.correlation_id] = payload
-            if record.request_id:
-                index_key = f"request:{record.request_id}"
-                request_payload = dict(next_data.get(index_key) or {})
-                request_payload.update(
-                    {
-                        "correlation_id": record.correlation_id,
-                        "request_id": record.request_id,
-                        "task_id": record.task_id,
-                        "job_id": record.job_id,
-                        "updated_at_ms": record.updated_at_ms,
-                    }
-                )
-                next_data[index_key] = request_payload
-            return next_data
-
-        await storage_instance.update_json_file(
-            CORRELATIONS_FILE,
-            updater,
-            lock_mode="pg_try_advisory_xact_lock",
-        )
-
-    try:
-        await _update_file()
-    except Exception as exc:
-        logger.debug("correlation_store_persist_failed correlation_id=%s error=%s", record.correlation_id, exc)
-
-
 async def _persist_records_batch(
     records: Dict[str, CorrelationRecord],
     *,
@@ -399,56 +487,72 @@ async def _persist_records_batch(
 
     await maybe_inject_sleep("TRT_FAULT_INJECT_CORR_FLUSH_SLEEP_MS", label="correlation_store.flush")
     storage_instance = _resolve_storage(storage)
-    if not storage_instance or not hasattr(storage_instance, "update_json_file"):
+    if storage_instance is None:
         return
-
-    async def _update_file() -> None:
-        def updater(data: Dict[str, Any]) -> Dict[str, Any]:
-            next_data = dict(data or {})
-            for record in records.values():
-                payload = dict(next_data.get(record.correlation_id) or {})
-                payload.update(record.to_dict())
-                source = sources.get(record.correlation_id)
-                if source:
-                    payload["source"] = source
-                next_data[record.correlation_id] = payload
-                if record.request_id:
-                    index_key = f"request:{record.request_id}"
-                    request_payload = dict(next_data.get(index_key) or {})
-                    request_payload.update(
-                        {
-                            "correlation_id": record.correlation_id,
-                            "request_id": record.request_id,
-                            "task_id": record.task_id,
-                            "job_id": record.job_id,
-                            "updated_at_ms": record.updated_at_ms,
-                        }
-                    )
-                    next_data[index_key] = request_payload
-            return next_data
-
-        await storage_instance.update_json_file(
-            CORRELATIONS_FILE,
-            updater,
-            lock_mode="pg_try_advisory_xact_lock",
-        )
+    sink = get_correlation_sink(storage_instance)
+    rows = [build_row(record.to_dict(), sources.get(record.correlation_id)) for record in records.values()]
 
     start_ts = time.monotonic()
     try:
-        await _update_file()
+        await sink.append(rows)
     except Exception as exc:
         logger.debug(
-            "correlation_store_persist_failed batch_size=%s error=%s",
+            "correlation_store_persist_failed batch_size=%s sink=%s error=%s",
             len(records),
+            sink.name,
             exc,
         )
         return
     duration_ms = int((time.monotonic() - start_ts) * 1000)
     logger.info(
-        "METRIC_GAUGE name=correlation_store_flush_duration_ms value=%s count=%s",
+        "METRIC_GAUGE name=correlation_store_flush_duration_ms value=%s count=%s sink=%s",
         duration_ms,
         len(records),
+        sink.name,
     )
+    await maybe_prune(sink)
+
+
+async def lookup_correlations(
+    *,
+    correlation_id: Optional[str] = None,
+    request_id: Optional[str] = None,
+    task_id: Optional[str] = None,
+    job_id: Optional[str] = None,
+    limit: int = 20,
+    storage: Optional[Any] = None,
+) -> List[Dict[str, Any]]:
+    """Find correlation records by id for diagnostics.
+
+    The in-memory registry answers first (first id that hits); otherwise the
+    persisted sink is queried for rows matching all given ids.
+    """
+    for index, key in (
+        (_records_by_correlation, correlation_id),
+        (_records_by_request, request_id),
+        (_records_by_task, task_id),
+    ):
+        record = index.get(str(key)) if key else None
+        if record is not None:
+            return [record.to_dict()]
+    if job_id:
+        for record in reversed(_records_by_correlation.values()):
+            if record.job_id == str(job_id):
+                return [record.to_dict()]
+    storage_instance = _resolve_storage(storage)
+    if storage_instance is None:
+        return []
+    try:
+        return await get_correlation_sink(storage_instance).lookup(
+            correlation_id=correlation_id,
+            request_id=request_id,
+            task_id=task_id,
+            job_id=job_id,
+            limit=limit,
+        )
+    except Exception as exc:
+        logger.debug("correlation_store_lookup_failed error=%s", exc)
+        return []
 
 
 async def register_correlation_ids(
@@ -475,8 +579,7 @@ async def register_correlation_ids(
         user_id=user_id,
         model_id=model_id,
     )
-    if record.request_id:
-        _records_by_request[record.request_id] = record
+    _index_record(record)
     if changed:
         _schedule_debounced_persist(
             correlation_id=record.correlation_id,
@@ -515,8 +618,7 @@ def register_ids(
         user_id=user_id,
         model_id=model_id,
     )
-    if record.request_id:
-        _records_by_request[record.request_id] = record
+    _index_record(record)
     if changed:
         loop = _get_running_loop()
         if loop and loop.is_running():
@@ -559,8 +661,7 @@ def note_missing_ids(
         model_id=record.model_id,
         missing_actions={action_tag},
     )
-    if record.request_id:
-        _records_by_request[record.request_id] = record
+    _index_record(record)
     if changed:
         loop = _get_running_loop()
         if loop and loop.is_running():
@@ -590,6 +691,12 @@ def reset_correlation_store() -> None:
 
     _records_by_correlation.clear()
     _records_by_request.clear()
+    _records_by_task.clear()
+    _completed_correlations.clear()
+    reset_correlation_sinks()
+    global _registry_evicted_total, _registry_expired_total
+    _registry_evicted_total = 0
+    _registry_expired_total = 0
     for task in list(_persist_tasks):
         _cancel_task_safe(task)
     _persist_tasks.clear()
@@ -1,11 +1,16 @@
 """In-memory delivery metrics tracking."""
 from __future__ import annotations
 
+import logging
 from collections import deque
-from typing import Deque, Optional
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
 
 _PENDING_AGES: Deque[float] = deque(maxlen=2000)
 _DELIVERY_RESULTS: Deque[bool] = deque(maxlen=2000)
+_SWEEP_DURATIONS: Deque[float] = deque(maxlen=500)
+_last_sweep: Dict[str, Any] = {}
 
 
 def record_pending_age(age_seconds: float) -> None:
@@ -18,6 +23,35 @@ def record_delivery_attempt(success: bool) -> None:
     _DELIVERY_RESULTS.append(bool(success))
 
 
+def record_reconcile_sweep(
+    *,
+    duration_seconds: float,
+    queue_depth: int,
+    due: int,
+    delivered: int,
+    deferred: int,
+) -> None:
+    """Record one reconciler sweep (poll + deliver stages)."""
+    _SWEEP_DURATIONS.append(max(0.0, float(duration_seconds)))
+    _last_sweep.clear()
+    _last_sweep.update(
+        {
+            "duration_s": round(float(duration_seconds), 3),
+            "queue_depth": int(queue_depth),
+            "due": int(due),
+            "delivered": int(delivered),
+            "deferred": int(deferred),
+        }
+    )
+    logger.info(
+        "METRIC_GAUGE name=delivery_reconcile_sweep_ms value=%s queue_depth=%s due=%s delivered=%s",
+        int(duration_seconds * 1000),
+        queue_depth,
+        due,
+        delivered,
+    )
+
+
 def _percentile(values: Deque[float], percentile: float) -> Optional[float]:
     if not values:
         return None
@@ -38,10 +72,18 @@ def deliver_success_rate() -> Optional[float]:
     return success / total if total else None
 
 
+def sweep_duration_p95() -> Optional[float]:
+    return _percentile(_SWEEP_DURATIONS, 0.95)
+
+
 def metrics_snapshot() -> dict:
     return {
         "pending_age_p95": pending_age_p95(),
         "pending_samples": len(_PENDING_AGES),
         "deliver_success_rate": deliver_success_rate(),
         "delivery_samples": len(_DELIVERY_RESULTS),
+        "sweep_duration_p95": sweep_duration_p95(),
+        "sweep_samples": len(_SWEEP_DURATIONS),
+        "queue_depth": _last_sweep.get("queue_depth"),
+        "last_sweep": dict(_last_sweep),
     }
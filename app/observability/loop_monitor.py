@@ -0,0 +1,318 @@
+"""Runtime event-loop lag sampler and slow-callback detector.
+
+* Sampler: a task sleeps for ``EVENT_LOOP_SAMPLE_INTERVAL_MS`` and records how
+  late it woke up. That drift is the scheduling delay every other coroutine
+  sees; it goes into a fixed-bucket histogram plus a window for percentiles.
+* Watchdog: a daemon thread checks the sampler's wake-up deadline. When the
+  loop is overdue by more than ``EVENT_LOOP_SLOW_CALLBACK_MS`` it captures the
+  stack of the loop thread and the task running on it, i.e. the code that
+  holds the loop. The stall is logged once when detected and again, as a
+  structured ``EVENT_LOOP_STALL`` event with its total duration, when the loop
+  comes back.
+
+Exposed through ``/health`` (``event_loop``), ``/diag/loop`` and
+``event_loop_lag_ms`` in ``WEBHOOK_TIMING_PROFILE`` structured logs.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOOP_MONITOR_ENABLED = os.getenv("EVENT_LOOP_MONITOR_ENABLED", "1").strip().lower() not in {"0", "false", "no"}
+EVENT_LOOP_SAMPLE_INTERVAL_MS = float(os.getenv("EVENT_LOOP_SAMPLE_INTERVAL_MS", "100"))
+EVENT_LOOP_SLOW_CALLBACK_MS = float(os.getenv("EVENT_LOOP_SLOW_CALLBACK_MS", "250"))
+EVENT_LOOP_GAUGE_INTERVAL_SECONDS = float(os.getenv("EVENT_LOOP_GAUGE_INTERVAL_SECONDS", "60"))
+EVENT_LOOP_STACK_DEPTH = int(os.getenv("EVENT_LOOP_STACK_DEPTH", "30"))
+
+_HISTOGRAM_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_WINDOW = 3000
+_RECENT_STALLS = 20
+
+
+def _percentile(values: Deque[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percentile * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _describe_task(task: Optional[asyncio.Task]) -> Optional[str]:
+    if task is None:
+        return None
+    coro = task.get_coro()
+    name = getattr(coro, "__qualname__", None) or type(coro).__name__
+    return f"{task.get_name()}:{name}"
+
+
+class LoopMonitor:
+    """Sampler task + watchdog thread bound to one running loop."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        *,
+        interval_ms: float = EVENT_LOOP_SAMPLE_INTERVAL_MS,
+        threshold_ms: float = EVENT_LOOP_SLOW_CALLBACK_MS,
+        gauge_interval_seconds: float = EVENT_LOOP_GAUGE_INTERVAL_SECONDS,
+        stack_depth: int = EVENT_LOOP_STACK_DEPTH,
+    ) -> None:
+        self.loop = loop
+        self.interval = max(0.001, interval_ms / 1000)
+        self.threshold = max(0.001, threshold_ms / 1000)
+        self.gauge_interval = gauge_interval_seconds
+        self.stack_depth = stack_depth
+        self.histogram: List[int] = [0] * (len(_HISTOGRAM_BUCKETS_MS) + 1)
+        self.lags: Deque[float] = deque(maxlen=_WINDOW)
+        self.samples = 0
+        self.max_lag_ms = 0.0
+        self.last_lag_ms: Optional[float] = None
+        self.stalls_total = 0
+        self.recent_stalls: Deque[Dict[str, Any]] = deque(maxlen=_RECENT_STALLS)
+        self._lock = threading.Lock()
+        self._deadline: Optional[float] = None
+        self._pending_stall: Optional[Dict[str, Any]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._last_gauge = time.monotonic()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._task = self.loop.create_task(self._sample_loop(), name="event_loop_lag_sampler")
+        self._thread = threading.Thread(target=self._watchdog, name="event-loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(
+            "EVENT_LOOP_MONITOR started interval_ms=%s slow_callback_ms=%s",
+            int(self.interval * 1000),
+            int(self.threshold * 1000),
+        )
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    # --- loop side -----------------------------------------------------
+
+    async def _sample_loop(self) -> None:
+        try:
+            while not self._stop.is_set():
+                expected = time.monotonic() + self.interval
+                with self._lock:
+                    self._deadline = expected
+                await asyncio.sleep(self.interval)
+                self._record(max(0.0, time.monotonic() - expected) * 1000)
+        finally:
+            with self._lock:
+                self._deadline = None
+
+    def _record(self, lag_ms: float) -> None:
+        self.samples += 1
+        self.last_lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self.lags.append(lag_ms)
+        index = len(_HISTOGRAM_BUCKETS_MS)
+        for position, bound in enumerate(_HISTOGRAM_BUCKETS_MS):
+            if lag_ms <= bound:
+                index = position
+                break
+        self.histogram[index] += 1
+
+        with self._lock:
+            stall, self._pending_stall = self._pending_stall, None
+        if stall is not None:
+            self._finish_stall(stall, lag_ms)
+
+        now = time.monotonic()
+        if self.gauge_interval > 0 and now - self._last_gauge >= self.gauge_interval:
+            self._last_gauge = now
+            logger.info(
+                "METRIC_GAUGE name=event_loop_lag_p95_ms value=%s p99_ms=%s max_ms=%s samples=%s stalls_total=%s",
+                round(_percentile(self.lags, 0.95) or 0.0, 1),
+                round(_percentile(self.lags, 0.99) or 0.0, 1),
+                round(self.max_lag_ms, 1),
+                self.samples,
+                self.stalls_total,
+            )
+
+    def _finish_stall(self, stall: Dict[str, Any], lag_ms: float) -> None:
+        stall["blocked_ms"] = round(max(lag_ms, stall["detected_after_ms"]), 1)
+        from app.observability.structured_logs import log_structured_event
+
+        log_structured_event(
+            action="EVENT_LOOP_STALL",
+            action_path="runtime:event_loop",
+            stage="EVENT_LOOP",
+            outcome="slow",
+            duration_ms=stall["blocked_ms"],
+            event_loop_lag_ms=stall["blocked_ms"],
+            skip_correlation_store=True,
+            param={"task": stall.get("task"), "where": stall.get("where"), "stack": stall.get("stack")},
+        )
+
+    # --- watchdog thread ----------------------------------------------
+
+    def _watchdog(self) -> None:
+        reported_deadline: Optional[float] = None
+        poll = min(self.threshold / 4, 0.05)
+        while not self._stop.wait(poll):
+            if self.loop.is_closed():
+                return
+            if not self.loop.is_running():
+                continue
+            with self._lock:
+                deadline = self._deadline
+            if deadline is None or deadline == reported_deadline:
+                continue
+            overdue = time.monotonic() - deadline
+            if overdue < self.threshold:
+                continue
+            reported_deadline = deadline
+            self._capture_stall(overdue)
+
+    def _capture_stall(self, overdue: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id) if self._loop_thread_id else None
+        stack = traceback.format_stack(frame, limit=None) if frame is not None else []
+        stack = [line.rstrip() for line in stack[-self.stack_depth:]]
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        stall = {
+            "detected_at": time.time(),
+            "detected_after_ms": round(overdue * 1000, 1),
+            "task": _describe_task(task),
+            "where": stack[-1].splitlines()[0].strip() if stack else None,
+            "stack": stack,
+        }
+        with self._lock:
+            self.stalls_total += 1
+            self.recent_stalls.append(stall)
+            self._pending_stall = stall
+        logger.warning(
+            "EVENT_LOOP_BLOCKED blocked_ms>=%s task=%s where=%s\n%s",
+            stall["detected_after_ms"],
+            stall["task"],
+            stall["where"],
+            "\n".join(stack),
+        )
+
+    # --- read side ------------------------------------------------------
+
+    def current_lag_ms(self) -> Optional[float]:
+        """Last sampled lag, or how overdue the sampler is if the loop is stuck right now."""
+        with self._lock:
+            deadline = self._deadline
+        overdue = (time.monotonic() - deadline) * 1000 if deadline is not None else 0.0
+        if self.last_lag_ms is None and overdue <= 0:
+            return None
+        return round(max(self.last_lag_ms or 0.0, overdue), 1)
+
+    def snapshot(self, *, include_stacks: bool = False) -> Dict[str, Any]:
+        histogram = {f"le_{bound}": self.histogram[i] for i, bound in enumerate(_HISTOGRAM_BUCKETS_MS)}
+        histogram["le_inf"] = self.histogram[-1]
+        with self._lock:
+            stalls = [dict(stall) for stall in self.recent_stalls]
+        if not include_stacks:
+            for stall in stalls:
+                stall.pop("stack", None)
+        return {
+            "running": self.running,
+            "interval_ms": int(self.interval * 1000),
+            "slow_callback_ms": int(self.threshold * 1000),
+            "samples": self.samples,
+            "last_lag_ms": self.last_lag_ms,
+            "p50_ms": _percentile(self.lags, 0.50),
+            "p95_ms": _percentile(self.lags, 0.95),
+            "p99_ms": _percentile(self.lags, 0.99),
+            "max_ms": round(self.max_lag_ms, 1),
+            "histogram_ms": histogram,
+            "stalls_total": self.stalls_total,
+            "recent_stalls": stalls,
+        }
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def start_loop_monitor(**kwargs: Any) -> Optional[LoopMonitor]:
+    """Start the monitor on the running loop (idempotent per loop)."""
+    global _monitor
+    if not EVENT_LOOP_MONITOR_ENABLED:
+        return None
+    loop = asyncio.get_running_loop()
+    if _monitor is not None and _monitor.loop is loop and _monitor.running:
+        return _monitor
+    _monitor = LoopMonitor(loop, **kwargs)
+    _monitor.start()
+    return _monitor
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor
+    monitor, _monitor = _monitor, None
+    if monitor is None:
+        return
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if monitor.loop is running_loop:
+        await monitor.stop()
+    else:
+        monitor._stop.set()
+
+
+def get_loop_monitor() -> Optional[LoopMonitor]:
+    return _monitor
+
+
+def current_lag_ms() -> Optional[float]:
+    """Scheduling delay of the running loop in ms, None when the monitor is off."""
+    monitor = _monitor
+    if monitor is None or not monitor.running:
+        return None
+    try:
+        if asyncio.get_running_loop() is not monitor.loop:
+            return None
+    except RuntimeError:
+        return None
+    return monitor.current_lag_ms()
+
+
+def loop_monitor_snapshot(*, include_stacks: bool = False) -> Dict[str, Any]:
+    monitor = _monitor
+    if monitor is None:
+        return {"running": False, "enabled": EVENT_LOOP_MONITOR_ENABLED}
+    return monitor.snapshot(include_stacks=include_stacks)
+
+
+def reset_loop_monitor() -> None:
+    """Drop the monitor without awaiting it (intended for tests)."""
+    global _monitor
+    monitor, _monitor = _monitor, None
+    if monitor is not None:
+        monitor._stop.set()
+        if monitor._task is not None and not monitor._task.done() and not monitor.loop.is_closed():
+            monitor._task.cancel()
@@ -14,7 +14,12 @@ from typing import Any, Optional
 
 from app.observability.trace import get_correlation_id as get_trace_correlation_id
 from app.observability.context import get_context_fields
-from app.observability.correlation_store import note_missing_ids, register_ids, resolve_correlation_ids
+from app.observability.correlation_store import (
+    mark_delivery_status,
+    note_missing_ids,
+    register_ids,
+    resolve_correlation_ids,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -118,6 +123,8 @@ def log_structured_event(**fields: Any) -> None:
             model_id=fields.get("model_id"),
             source="structured_logs",
         )
+        if stage == "TG_DELIVER":
+            mark_delivery_status(correlation_id, outcome)
 
     if not skip_correlation_store and _requires_ids(stage, action, outcome):
         missing_ids = {name for name, value in {"task_id": task_id, "job_id": job_id}.items() if not value}
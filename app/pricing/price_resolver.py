@@ -14,7 +14,7 @@ from typing import Any, Dict, Optional
 from app.config import Settings, get_settings
 from app.kie_catalog import get_model
 from app.models.canonical import canonicalize_model_id
-from app.pricing.price_ssot import list_model_skus, resolve_sku_for_params
+from app.pricing.price_ssot import CompiledModelPricing, get_compiled_model, resolve_sku_for_params
 
 logger = logging.getLogger(__name__)
 _pricing_ok_logged: set[str] = set()
@@ -111,39 +111,26 @@ def _apply_mode_defaults(model_id: str, mode_index: Optional[int], normalized: D
             normalized["duration"] = duration
 
 
-def _backfill_from_cheapest_sku(model_id: str, normalized: Dict[str, Any]) -> None:
-    skus = list_model_skus(model_id)
-    if not skus:
+def _backfill_from_cheapest_sku(compiled: Optional[CompiledModelPricing], normalized: Dict[str, Any]) -> None:
+    if compiled is None or not compiled.skus:
         return
-    sku_param_keys: set[str] = set()
-    for sku in skus:
-        sku_param_keys.update((sku.params or {}).keys())
     missing_keys = [
         key
-        for key in sku_param_keys
+        for key in compiled.param_keys
         if key not in normalized or normalized.get(key) in (None, "")
     ]
     if not missing_keys:
         return
 
-    consistent_skus = []
-    for sku in skus:
-        sku_params = sku.params or {}
-        if any(
-            _normalize_param_value(normalized.get(key)) != _normalize_param_value(value)
-            for key, value in sku_params.items()
-            if key in normalized
-        ):
+    selected = {key: _normalize_param_value(value) for key, value in normalized.items()}
+    for sku, sku_params in compiled.skus_by_price:
+        if any(selected[key] != value for key, value in sku_params.items() if key in selected):
             continue
-        consistent_skus.append(sku)
-    if not consistent_skus:
+        for key, value in (sku.params or {}).items():
+            if key not in normalized or normalized.get(key) in (None, ""):
+                normalized[key] = value
         return
 
-    default_sku = min(consistent_skus, key=lambda sku: sku.price_rub)
-    for key, value in (default_sku.params or {}).items():
-        if key not in normalized or normalized.get(key) in (None, ""):
-            normalized[key] = value
-
 
 def _apply_pricing_defaults(model_id: str, selected_params: Dict[str, Any], mode_index: Optional[int]) -> Dict[str, Any]:
     normalized = dict(selected_params or {})
@@ -153,14 +140,9 @@ def _apply_pricing_defaults(model_id: str, selected_params: Dict[str, Any], mode
         if key not in normalized or normalized.get(key) in (None, ""):
             normalized[key] = value
 
-    skus = list_model_skus(model_id)
-    if skus:
-        param_values: Dict[str, Dict[str, Any]] = {}
-        for sku in skus:
-            for param_key, param_value in (sku.params or {}).items():
-                norm_value = _normalize_param_value(param_value)
-                param_values.setdefault(param_key, {})[norm_value] = param_value
-        for param_key, values_map in param_values.items():
+    compiled = get_compiled_model(model_id)
+    if compiled is not None and compiled.skus:
+        for param_key, values_map in compiled.param_values.items():
             if param_key in normalized:
                 current_norm = _normalize_param_value(normalized.get(param_key))
                 if current_norm in values_map:
@@ -174,7 +156,7 @@ def _apply_pricing_defaults(model_id: str, selected_params: Dict[str, Any], mode
                 continue
             if len(values_map) == 1:
                 normalized[param_key] = next(iter(values_map.values()))
-    _backfill_from_cheapest_sku(model_id, normalized)
+    _backfill_from_cheapest_sku(compiled, normalized)
     return normalized
 
 
@@ -199,8 +181,8 @@ def resolve_price_quote(
     fallback_used = False
     if not sku:
         audit_mode = os.getenv("PRICING_AUDIT_MODE", "0").strip().lower() in {"1", "true", "yes"}
-        available_skus = list_model_skus(canonical_model_id)
-        if not available_skus:
+        compiled = get_compiled_model(canonical_model_id)
+        if compiled is None or not compiled.skus:
             logger.warning(
                 "PRICING_SKU_MISSING model_id=%s params=%s",
                 canonical_model_id,
@@ -211,7 +193,7 @@ def resolve_price_quote(
             raise RuntimeError(
                 f"PRICING_AUDIT_MODE: SKU mismatch for {canonical_model_id} params={effective_params}"
             )
-        sku = min(available_skus, key=lambda candidate: candidate.price_rub)
+        sku = compiled.skus_by_price[0][0]
         fallback_used = True
         logger.warning(
             "PRICING_SKU_FALLBACK model_id=%s sku_id=%s params=%s reason=sku_not_resolved",
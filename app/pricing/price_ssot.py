@@ -1,16 +1,19 @@
 """Price SSOT loader and helpers for KIE pricing in RUB."""
 from __future__ import annotations
 
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from decimal import Decimal
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
 
 import yaml
 
-import logging
-
 
 ROOT = Path(__file__).resolve().parents[2]
 PRICING_SSOT_PATH = ROOT / "data" / "kie_pricing_rub.yaml"
@@ -59,7 +62,11 @@ def load_price_ssot() -> Dict[str, Any]:
 
 
 def reset_price_ssot_cache() -> None:
+    global _pricing_index, _pricing_index_checked_at
     load_price_ssot.cache_clear()
+    with _pricing_index_lock:
+        _pricing_index = None
+        _pricing_index_checked_at = 0.0
 
 
 def _sku_is_free(sku_data: Dict[str, Any]) -> bool:
@@ -91,42 +98,214 @@ def _iter_skus(model_data: Dict[str, Any], model_id: str) -> Iterable[PriceSku]:
         )
 
 
+# ==================== COMPILED INDEX ====================
+
+ParamTuple = Tuple[Tuple[str, str], ...]
+
+PRICING_INDEX_STAT_INTERVAL_SECONDS = float(os.getenv("PRICING_INDEX_STAT_INTERVAL_SECONDS", "1.0"))
+PRICING_VARIANT_CACHE_SIZE = int(os.getenv("PRICING_VARIANT_CACHE_SIZE", "256"))
+
+
+class CompiledModelPricing:
+    """Per-model lookup tables built once per SSOT file version."""
+
+    __slots__ = (
+        "model_id",
+        "skus",
+        "normalized_params",
+        "by_params",
+        "key_sets",
+        "param_keys",
+        "param_values",
+        "variant_min_prices",
+        "skus_by_price",
+        "min_price",
+        "has_free_sku",
+        "_variant_cache",
+    )
+
+    def __init__(self, model_id: str, skus: Sequence[PriceSku]) -> None:
+        self.model_id = model_id
+        self.skus: Tuple[PriceSku, ...] = tuple(skus)
+        self.normalized_params: Tuple[Dict[str, str], ...] = tuple(
+            {key: _normalize_param_value(value) for key, value in sku.params.items()} for sku in self.skus
+        )
+        self.by_params: Dict[ParamTuple, List[PriceSku]] = {}
+        key_sets: Dict[Tuple[str, ...], None] = {}
+        self.param_values: Dict[str, Dict[str, Any]] = {}
+        self.variant_min_prices: Dict[str, Dict[str, Decimal]] = {}
+        for sku, normalized in zip(self.skus, self.normalized_params):
+            keys = tuple(sorted(normalized))
+            key_sets.setdefault(keys, None)
+            self.by_params.setdefault(tuple((key, normalized[key]) for key in keys), []).append(sku)
+            for key, raw_value in sku.params.items():
+                self.param_values.setdefault(key, {})[normalized[key]] = raw_value
+                prices = self.variant_min_prices.setdefault(key, {})
+                current = prices.get(normalized[key])
+                if current is None or sku.price_rub < current:
+                    prices[normalized[key]] = sku.price_rub
+        self.key_sets: Tuple[Tuple[str, ...], ...] = tuple(key_sets)
+        self.param_keys: FrozenSet[str] = frozenset(self.param_values)
+        # Stable sort keeps YAML order among equal prices, matching min() semantics.
+        self.skus_by_price: Tuple[Tuple[PriceSku, Dict[str, str]], ...] = tuple(
+            sorted(zip(self.skus, self.normalized_params), key=lambda item: item[0].price_rub)
+        )
+        self.min_price: Optional[Decimal] = self.skus_by_price[0][0].price_rub if self.skus else None
+        self.has_free_sku = any(sku.is_free_sku for sku in self.skus)
+        self._variant_cache: "OrderedDict[Tuple[str, ParamTuple], List[Tuple[str, Decimal]]]" = OrderedDict()
+
+    def resolve(self, params: Dict[str, Any]) -> Optional[PriceSku]:
+        """Unique SKU whose params are all matched by ``params``; None when ambiguous/missing."""
+        normalized = {key: _normalize_param_value(value) for key, value in (params or {}).items()}
+        match: Optional[PriceSku] = None
+        for keys in self.key_sets:
+            if any(key not in normalized for key in keys):
+                continue
+            candidates = self.by_params.get(tuple((key, normalized[key]) for key in keys))
+            if not candidates:
+                continue
+            if match is not None or len(candidates) > 1:
+                return None
+            match = candidates[0]
+        return match
+
+    def variants(self, param_name: str, partial_params: Dict[str, Any]) -> List[Tuple[str, Decimal]]:
+        normalized_partial = {
+            key: _normalize_param_value(value) for key, value in (partial_params or {}).items() if key != param_name
+        }
+        if not normalized_partial:
+            return sorted(self.variant_min_prices.get(param_name, {}).items(), key=lambda item: item[0])
+        cache_key = (param_name, tuple(sorted(normalized_partial.items())))
+        cached = self._variant_cache.get(cache_key)
+        if cached is not None:
+            self._variant_cache.move_to_end(cache_key)
+            return list(cached)
+        values: Dict[str, Decimal] = {}
+        for sku, sku_params in zip(self.skus, self.normalized_params):
+            value = sku_params.get(param_name)
+            if value is None:
+                continue
+            if any(sku_params.get(key) != expected for key, expected in normalized_partial.items()):
+                continue
+            current_price = values.get(value)
+            if current_price is None or sku.price_rub < current_price:
+                values[value] = sku.price_rub
+        result = sorted(values.items(), key=lambda item: item[0])
+        self._variant_cache[cache_key] = result
+        while len(self._variant_cache) > PRICING_VARIANT_CACHE_SIZE:
+            self._variant_cache.popitem(last=False)
+        return list(result)
+
+
+class PricingIndex:
+    """Compiled SSOT: model_id -> CompiledModelPricing plus sku_key lookup."""
+
+    def __init__(self, models: Dict[str, Sequence[PriceSku]], version: Tuple[Any, ...] = ()) -> None:
+        self.version = version
+        self.models: Dict[str, CompiledModelPricing] = {
+            model_id: CompiledModelPricing(model_id, skus) for model_id, skus in models.items()
+        }
+        self.model_ids: Tuple[str, ...] = tuple(models)
+        self.by_sku_key: Dict[str, PriceSku] = {}
+        for compiled in self.models.values():
+            for sku in compiled.skus:
+                self.by_sku_key.setdefault(sku.sku_key, sku)
+        self.free_sku_keys: Tuple[str, ...] = tuple(
+            sku.sku_key for compiled in self.models.values() for sku in compiled.skus if sku.is_free_sku
+        )
+
+    @classmethod
+    def from_ssot(cls, ssot: Dict[str, Any], version: Tuple[Any, ...] = ()) -> "PricingIndex":
+        models: Dict[str, List[PriceSku]] = {}
+        raw_models = ssot.get("models", [])
+        if isinstance(raw_models, list):
+            for model in raw_models:
+                if not isinstance(model, dict) or not model.get("id"):
+                    continue
+                model_id = model["id"]
+                # First entry wins, like the former linear scan.
+                if model_id not in models:
+                    models[model_id] = list(_iter_skus(model, model_id))
+        return cls(models, version)
+
+    def model(self, model_id: str) -> Optional[CompiledModelPricing]:
+        return self.models.get(model_id)
+
+
+_pricing_index: Optional[PricingIndex] = None
+_pricing_index_checked_at = 0.0
+_pricing_index_lock = threading.Lock()
+
+
+def _ssot_version(path: Path) -> Tuple[str, int, int]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return (str(path), -1, -1)
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def get_pricing_index() -> PricingIndex:
+    """Compiled pricing index; rebuilt when the SSOT file path or mtime changes."""
+    global _pricing_index, _pricing_index_checked_at
+    index = _pricing_index
+    now = time.monotonic()
+    if (
+        index is not None
+        and index.version[:1] == (str(PRICING_SSOT_PATH),)
+        and now - _pricing_index_checked_at < PRICING_INDEX_STAT_INTERVAL_SECONDS
+    ):
+        return index
+    version = _ssot_version(PRICING_SSOT_PATH)
+    if index is not None and index.version == version:
+        _pricing_index_checked_at = now
+        return index
+    with _pricing_index_lock:
+        index = _pricing_index
+        if index is None or index.version != version:
+            started = time.perf_counter()
+            if index is not None:
+                load_price_ssot.cache_clear()
+            index = PricingIndex.from_ssot(load_price_ssot(), version)
+            _pricing_index = index
+            logger.info(
+                "PRICING_INDEX_BUILT models=%s skus=%s build_ms=%.1f",
+                len(index.model_ids),
+                len(index.by_sku_key),
+                (time.perf_counter() - started) * 1000,
+            )
+        _pricing_index_checked_at = now
+        return index
+
+
+def get_compiled_model(model_id: str) -> Optional[CompiledModelPricing]:
+    return get_pricing_index().model(model_id)
+
+
 def list_model_skus(model_id: str) -> List[PriceSku]:
-    ssot = load_price_ssot()
-    models = ssot.get("models", [])
-    if not isinstance(models, list):
-        return []
-    for model in models:
-        if not isinstance(model, dict):
-            continue
-        if model.get("id") != model_id:
-            continue
-        return list(_iter_skus(model, model_id))
-    return []
+    compiled = get_compiled_model(model_id)
+    return list(compiled.skus) if compiled else []
 
 
 def list_all_models() -> List[str]:
-    ssot = load_price_ssot()
-    models = ssot.get("models", [])
-    if not isinstance(models, list):
-        return []
-    return [model.get("id") for model in models if isinstance(model, dict) and model.get("id")]
+    return list(get_pricing_index().model_ids)
+
+
+def get_sku_by_key(sku_key: str) -> Optional[PriceSku]:
+    return get_pricing_index().by_sku_key.get(sku_key)
+
+
+def model_price_params(model_id: str) -> FrozenSet[str]:
+    """Parameter names that select between SKUs of ``model_id``."""
+    compiled = get_compiled_model(model_id)
+    return compiled.param_keys if compiled else frozenset()
 
 
 def resolve_sku_for_params(model_id: str, params: Dict[str, Any]) -> Optional[PriceSku]:
-    skus = list_model_skus(model_id)
-    if not skus:
+    compiled = get_compiled_model(model_id)
+    if compiled is None or not compiled.skus:
         return None
-    normalized = {k: _normalize_param_value(v) for k, v in (params or {}).items()}
-    matches: List[PriceSku] = []
-    for sku in skus:
-        sku_params = {k: _normalize_param_value(v) for k, v in sku.params.items()}
-        if any(normalized.get(k) != v for k, v in sku_params.items()):
-            continue
-        matches.append(sku)
-    if len(matches) == 1:
-        return matches[0]
-    return None
+    return compiled.resolve(params)
 
 
 def get_price_for_params(model_id: str, selected_params: Dict[str, Any]) -> Optional[Decimal]:
@@ -135,10 +314,8 @@ def get_price_for_params(model_id: str, selected_params: Dict[str, Any]) -> Opti
 
 
 def get_min_price(model_id: str) -> Optional[Decimal]:
-    skus = list_model_skus(model_id)
-    if not skus:
-        return None
-    return min((sku.price_rub for sku in skus), default=None)
+    compiled = get_compiled_model(model_id)
+    return compiled.min_price if compiled else None
 
 
 def list_variants_with_prices(
@@ -146,33 +323,16 @@ def list_variants_with_prices(
     param_name: str,
     current_partial_params: Dict[str, Any],
 ) -> List[Tuple[str, Decimal]]:
-    skus = list_model_skus(model_id)
-    if not skus:
+    compiled = get_compiled_model(model_id)
+    if compiled is None:
         return []
-    normalized_partial = {k: _normalize_param_value(v) for k, v in (current_partial_params or {}).items()}
-    normalized_partial.pop(param_name, None)
-    values: Dict[str, Decimal] = {}
-    for sku in skus:
-        if param_name not in sku.params:
-            continue
-        sku_params = {k: _normalize_param_value(v) for k, v in sku.params.items()}
-        if any(sku_params.get(k) != v for k, v in normalized_partial.items()):
-            continue
-        value = _normalize_param_value(sku.params.get(param_name))
-        current_price = values.get(value)
-        if current_price is None or sku.price_rub < current_price:
-            values[value] = sku.price_rub
-    return sorted(values.items(), key=lambda item: item[0])
+    return compiled.variants(param_name, current_partial_params)
 
 
 def model_has_free_sku(model_id: str) -> bool:
-    return any(sku.is_free_sku for sku in list_model_skus(model_id))
+    compiled = get_compiled_model(model_id)
+    return bool(compiled and compiled.has_free_sku)
 
 
 def list_free_sku_keys() -> List[str]:
-    free_skus: List[str] = []
-    for model_id in list_all_models():
-        for sku in list_model_skus(model_id):
-            if sku.is_free_sku:
-                free_skus.append(sku.sku_key)
-    return free_skus
+    return list(get_pricing_index().free_sku_keys)
@@ -11,6 +11,7 @@ from app.kie_contract.schema_loader import get_model_schema, get_model_meta
 from app.pricing.price_ssot import (
     PriceSku,
     get_min_price,
+    get_sku_by_key,
     list_all_models,
     list_free_sku_keys,
     list_model_skus as list_price_model_skus,
@@ -177,13 +178,20 @@ def get_free_sku_ids() -> List[str]:
     return list_free_sku_keys()
 
 
-@lru_cache(maxsize=512)
 def get_sku_by_id(sku_id: str) -> Optional[PricingSku]:
-    for model_id in list_all_models():
-        for sku in list_model_skus(model_id):
-            if sku.sku_id == sku_id:
-                return sku
-    return None
+    sku = get_sku_by_key(sku_id)
+    if not sku:
+        return None
+    return PricingSku(
+        sku_id=sku.sku_key,
+        model_id=sku.model_id,
+        price_rub=sku.price_rub,
+        unit=sku.unit,
+        params=sku.params,
+        notes=sku.notes,
+        status="READY",
+        is_free_sku=sku.is_free_sku,
+    )
 
 
 def encode_sku_callback(sku_id: str) -> str:
@@ -0,0 +1,430 @@
+"""Concurrent, rate-aware broadcast jobs for admin mass messaging.
+
+A broadcast is a persisted job:
+
+* ``broadcast_jobs/broadcast-<id>-recipients.json`` — recipient ids, written once;
+* ``broadcast_jobs/broadcast-<id>.json`` — message, counters and ``cursor``,
+  the index below which every recipient has been handled; checkpointed every
+  BROADCAST_CHECKPOINT_EVERY recipients;
+* ``broadcast_jobs/index.json`` — status of every job, so unfinished jobs can
+  be resumed from their cursor after a restart.
+
+Sending runs BROADCAST_CONCURRENCY workers behind one global token bucket
+(Telegram allows ~30 messages/s per bot) and a per-chat bucket (1 message/s
+per chat). ``RetryAfter`` pauses the global bucket for the requested time and
+the message is retried. Blocked users are resolved once per job from a set.
+
+Delivery is at least once: after a crash, recipients between the persisted
+cursor and the in-flight window (at most BROADCAST_CONCURRENCY plus one
+checkpoint) may receive the message again.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field, fields
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from telegram.error import Forbidden, NetworkError, RetryAfter, TimedOut
+
+from app.middleware.rate_limit import PerKeyRateLimiter, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_GLOBAL_RATE = float(os.getenv("BROADCAST_GLOBAL_RATE", "28"))
+BROADCAST_GLOBAL_BURST = float(os.getenv("BROADCAST_GLOBAL_BURST", "28"))
+BROADCAST_PER_CHAT_RATE = float(os.getenv("BROADCAST_PER_CHAT_RATE", "1"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "16"))
+BROADCAST_CHECKPOINT_EVERY = int(os.getenv("BROADCAST_CHECKPOINT_EVERY", "200"))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv("BROADCAST_MAX_ATTEMPTS", "3"))
+BROADCAST_MAX_RETRY_AFTER_SECONDS = float(os.getenv("BROADCAST_MAX_RETRY_AFTER_SECONDS", "120"))
+
+_MIN_WAIT_SECONDS = 0.001
+
+BROADCAST_JOBS_DIR = "broadcast_jobs"
+BROADCAST_INDEX_FILE = f"{BROADCAST_JOBS_DIR}/index.json"
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_CANCELLED = "cancelled"
+
+SendFn = Callable[[int, "BroadcastJob"], Awaitable[Any]]
+
+
+def job_filename(broadcast_id: Any) -> str:
+    return f"{BROADCAST_JOBS_DIR}/broadcast-{broadcast_id}.json"
+
+
+def recipients_filename(broadcast_id: Any) -> str:
+    return f"{BROADCAST_JOBS_DIR}/broadcast-{broadcast_id}-recipients.json"
+
+
+@dataclass
+class BroadcastJob:
+    broadcast_id: str
+    total: int
+    message_text: Optional[str] = None
+    photo_file_id: Optional[str] = None
+    parse_mode: Optional[str] = "HTML"
+    status: str = STATUS_RUNNING
+    cursor: int = 0
+    sent: int = 0
+    delivered: int = 0
+    failed: int = 0
+    unreachable: int = 0
+    skipped_blocked: int = 0
+    retry_after_hits: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    resumed: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BroadcastJob":
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.skipped_blocked
+
+    def progress(self, *, now: Optional[float] = None) -> Dict[str, Any]:
+        """Snapshot for the admin panel."""
+        now = time.time() if now is None else now
+        elapsed = max(0.0, (self.finished_at or now) - (self.started_at or now))
+        rate = self.sent / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total - self.processed)
+        return {
+            "broadcast_id": self.broadcast_id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "sent": self.sent,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "unreachable": self.unreachable,
+            "skipped_blocked": self.skipped_blocked,
+            "retry_after_hits": self.retry_after_hits,
+            "rate_per_sec": round(rate, 2),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 and self.status == STATUS_RUNNING else None,
+        }
+
+
+class GlobalPacer:
+    """Token bucket shared by all workers; ``pause`` empties it for RetryAfter."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        *,
+        time_fn: Callable[[], float] | None = None,
+        sleep_fn: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ) -> None:
+        self._time_fn = time_fn or time.monotonic
+        self._sleep = sleep_fn
+        self._bucket = TokenBucket.create(rate, max(1.0, burst), self._time_fn)
+        self._paused_until = 0.0
+
+    async def acquire(self) -> None:
+        while True:
+            now = self._time_fn()
+            if now < self._paused_until:
+                wait = self._paused_until - now
+            else:
+                allowed, wait = self._bucket.consume()
+                if allowed:
+                    return
+            # Refill arithmetic can leave a deficit of ~1e-16 tokens; never spin on it.
+            await self._sleep(max(wait, _MIN_WAIT_SECONDS))
+
+    def pause(self, seconds: float) -> None:
+        now = self._time_fn()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._bucket.tokens = 0.0
+        self._bucket.updated_at = self._paused_until
+
+
+_global_pacer: Optional[GlobalPacer] = None
+
+
+def get_global_pacer() -> GlobalPacer:
+    """One pacer per process: concurrent broadcasts share the bot's global limit."""
+    global _global_pacer
+    if _global_pacer is None:
+        _global_pacer = GlobalPacer(BROADCAST_GLOBAL_RATE, BROADCAST_GLOBAL_BURST)
+    return _global_pacer
+
+
+def _retry_after_seconds(exc: RetryAfter) -> float:
+    value = exc.retry_after
+    if isinstance(value, timedelta):
+        value = value.total_seconds()
+    return min(float(value), BROADCAST_MAX_RETRY_AFTER_SECONDS)
+
+
+class BroadcastRunner:
+    """Sends one job's remaining recipients and checkpoints its cursor."""
+
+    def __init__(
+        self,
+        job: BroadcastJob,
+        recipients: List[int],
+        send_fn: SendFn,
+        *,
+        storage: Any,
+        blocked_ids: Optional[Iterable[int]] = None,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        pacer: Optional[GlobalPacer] = None,
+        per_chat_rate: float = BROADCAST_PER_CHAT_RATE,
+        checkpoint_every: int = BROADCAST_CHECKPOINT_EVERY,
+        max_attempts: int = BROADCAST_MAX_ATTEMPTS,
+        time_fn: Callable[[], float] | None = None,
+        sleep_fn: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ) -> None:
+        self.job = job
+        self._recipients = recipients
+        self._send_fn = send_fn
+        self._storage = storage
+        self._blocked: Set[int] = {int(uid) for uid in blocked_ids or ()}
+        self._concurrency = max(1, concurrency)
+        self._time_fn = time_fn or time.monotonic
+        self._sleep = sleep_fn
+        self._pacer = pacer or get_global_pacer()
+        self._per_chat = PerKeyRateLimiter(per_chat_rate, 1.0, time_fn=self._time_fn)
+        self._checkpoint_every = max(1, checkpoint_every)
+        self._max_attempts = max(1, max_attempts)
+        self._completed: Set[int] = set()
+        self._next_index = job.cursor
+        self._since_checkpoint = 0
+        self._checkpoint_lock = asyncio.Lock()
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    async def _send_with_retries(self, user_id: int) -> None:
+        job = self.job
+        for attempt in range(1, self._max_attempts + 1):
+            allowed, wait = self._per_chat.check(user_id)
+            if not allowed:
+                await self._sleep(max(wait, _MIN_WAIT_SECONDS))
+            await self._pacer.acquire()
+            try:
+                await self._send_fn(user_id, job)
+                job.delivered += 1
+                return
+            except RetryAfter as exc:
+                job.retry_after_hits += 1
+                self._pacer.pause(_retry_after_seconds(exc))
+            except Forbidden:
+                job.unreachable += 1
+                return
+            except (TimedOut, NetworkError) as exc:
+                if attempt >= self._max_attempts:
+                    logger.warning("broadcast_send_failed broadcast_id=%s user_id=%s error=%s", job.broadcast_id, user_id, exc)
+                    break
+                await self._sleep(min(2.0 ** attempt, 10.0))
+            except Exception as exc:
+                logger.warning("broadcast_send_failed broadcast_id=%s user_id=%s error=%s", job.broadcast_id, user_id, exc)
+                break
+        job.failed += 1
+
+    def _advance_cursor(self) -> None:
+        cursor = self.job.cursor
+        completed = self._completed
+        while cursor in completed:
+            completed.discard(cursor)
+            cursor += 1
+        self.job.cursor = cursor
+
+    async def _mark_done(self, index: int) -> None:
+        self._completed.add(index)
+        self._advance_cursor()
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self._checkpoint_every:
+            self._since_checkpoint = 0
+            await self.checkpoint()
+
+    async def checkpoint(self) -> None:
+        async with self._checkpoint_lock:
+            try:
+                await save_job(self._storage, self.job)
+            except Exception as exc:
+                logger.warning("broadcast_checkpoint_failed broadcast_id=%s error=%s", self.job.broadcast_id, exc)
+
+    async def _worker(self) -> None:
+        recipients = self._recipients
+        while not self._cancelled:
+            index = self._next_index
+            if index >= len(recipients):
+                return
+            self._next_index = index + 1
+            user_id = int(recipients[index])
+            if user_id in self._blocked:
+                self.job.skipped_blocked += 1
+            else:
+                await self._send_with_retries(user_id)
+                self.job.sent += 1
+            await self._mark_done(index)
+
+    async def run(self) -> BroadcastJob:
+        job = self.job
+        if job.started_at is None:
+            job.started_at = time.time()
+        started = time.monotonic()
+        start_cursor = job.cursor
+        await asyncio.gather(*(self._worker() for _ in range(self._concurrency)))
+        job.status = STATUS_CANCELLED if self._cancelled else STATUS_DONE
+        job.finished_at = time.time()
+        await self.checkpoint()
+        await _set_index_status(self._storage, job.broadcast_id, job.status)
+        elapsed = max(time.monotonic() - started, 1e-9)
+        logger.info(
+            "METRIC_GAUGE name=broadcast_throughput_per_sec value=%.2f broadcast_id=%s processed=%s",
+            (job.cursor - start_cursor) / elapsed,
+            job.broadcast_id,
+            job.cursor - start_cursor,
+        )
+        logger.info(
+            "broadcast_finished broadcast_id=%s status=%s delivered=%s failed=%s unreachable=%s "
+            "skipped_blocked=%s retry_after_hits=%s",
+            job.broadcast_id,
+            job.status,
+            job.delivered,
+            job.failed,
+            job.unreachable,
+            job.skipped_blocked,
+            job.retry_after_hits,
+        )
+        return job
+
+
+_active_runners: Dict[str, BroadcastRunner] = {}
+
+
+async def save_job(storage: Any, job: BroadcastJob) -> None:
+    await storage.write_json_file(job_filename(job.broadcast_id), job.to_dict())
+
+
+async def load_job(storage: Any, broadcast_id: Any) -> Optional[BroadcastJob]:
+    data = await storage.read_json_file(job_filename(broadcast_id), default={})
+    if not isinstance(data, dict) or not data.get("broadcast_id"):
+        return None
+    return BroadcastJob.from_dict(data)
+
+
+async def _set_index_status(storage: Any, broadcast_id: str, status: str) -> None:
+    def updater(data: Dict[str, Any]) -> Dict[str, Any]:
+        data = dict(data or {})
+        data[str(broadcast_id)] = status
+        return data
+
+    await storage.update_json_file(BROADCAST_INDEX_FILE, updater)
+
+
+async def create_job(
+    storage: Any,
+    broadcast_id: Any,
+    recipients: Iterable[int],
+    *,
+    message_text: Optional[str] = None,
+    photo_file_id: Optional[str] = None,
+    parse_mode: Optional[str] = "HTML",
+) -> BroadcastJob:
+    unique: List[int] = list(dict.fromkeys(int(uid) for uid in recipients))
+    job = BroadcastJob(
+        broadcast_id=str(broadcast_id),
+        total=len(unique),
+        message_text=message_text,
+        photo_file_id=photo_file_id,
+        parse_mode=parse_mode,
+    )
+    await storage.write_json_file(recipients_filename(job.broadcast_id), {"user_ids": unique})
+    await save_job(storage, job)
+    await _set_index_status(storage, job.broadcast_id, STATUS_RUNNING)
+    return job
+
+
+async def run_job(
+    storage: Any,
+    job: BroadcastJob,
+    send_fn: SendFn,
+    *,
+    blocked_ids: Optional[Iterable[int]] = None,
+    on_complete: Optional[Callable[[BroadcastJob], Awaitable[Any]]] = None,
+    **runner_kwargs: Any,
+) -> BroadcastJob:
+    data = await storage.read_json_file(recipients_filename(job.broadcast_id), default={})
+    recipients = list(data.get("user_ids") or []) if isinstance(data, dict) else []
+    runner = BroadcastRunner(job, recipients, send_fn, storage=storage, blocked_ids=blocked_ids, **runner_kwargs)
+    _active_runners[job.broadcast_id] = runner
+    try:
+        await runner.run()
+    finally:
+        _active_runners.pop(job.broadcast_id, None)
+    if on_complete is not None:
+        await on_complete(job)
+    return job
+
+
+async def pending_job_ids(storage: Any) -> List[str]:
+    index = await storage.read_json_file(BROADCAST_INDEX_FILE, default={})
+    if not isinstance(index, dict):
+        return []
+    return [broadcast_id for broadcast_id, status in index.items() if status == STATUS_RUNNING]
+
+
+async def resume_pending_jobs(
+    storage: Any,
+    send_fn: SendFn,
+    *,
+    blocked_ids: Optional[Iterable[int]] = None,
+    on_complete: Optional[Callable[[BroadcastJob], Awaitable[Any]]] = None,
+    **runner_kwargs: Any,
+) -> List[BroadcastJob]:
+    """Continue every job left running by a previous process, from its cursor."""
+    resumed: List[BroadcastJob] = []
+    blocked = set(blocked_ids or ())
+    for broadcast_id in await pending_job_ids(storage):
+        if broadcast_id in _active_runners:
+            continue
+        job = await load_job(storage, broadcast_id)
+        if job is None:
+            await _set_index_status(storage, broadcast_id, STATUS_CANCELLED)
+            continue
+        job.resumed += 1
+        logger.info("broadcast_resumed broadcast_id=%s cursor=%s total=%s", job.broadcast_id, job.cursor, job.total)
+        resumed.append(
+            await run_job(storage, job, send_fn, blocked_ids=blocked, on_complete=on_complete, **runner_kwargs)
+        )
+    return resumed
+
+
+def cancel_job(broadcast_id: Any) -> bool:
+    runner = _active_runners.get(str(broadcast_id))
+    if runner is None:
+        return False
+    runner.cancel()
+    return True
+
+
+def get_progress(broadcast_id: Any) -> Optional[Dict[str, Any]]:
+    runner = _active_runners.get(str(broadcast_id))
+    return runner.job.progress() if runner is not None else None
+
+
+def active_progress() -> List[Dict[str, Any]]:
+    return [runner.job.progress() for runner in list(_active_runners.values())]
+
+
+def reset_broadcast_runners() -> None:
+    global _global_pacer
+    _active_runners.clear()
+    _global_pacer = None
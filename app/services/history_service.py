@@ -1,6 +1,23 @@
-"""History events service with idempotent append and aggregates."""
+"""History events service with idempotent append and aggregates.
+
+Events are stored per user so a read costs O(limit) instead of loading every
+user's history:
+
+* Postgres storages (``supports_history_event_rows``): rows in
+  ``history_events`` keyed by (partner_id, event_id) with a per-user index,
+  plus ``history_event_counters`` updated in the same transaction.
+* File storages (JSON / GitHub / storage_json): one document per user,
+  ``history_events/user-<id>.json``, holding the newest
+  HISTORY_EVENTS_MAX_PER_USER events, an event_id index and running counters.
+
+Each event gets a per-user ``seq``; ``get_page`` pages newest first with
+``seq`` as the cursor. The former single ``history_events.json`` document is
+read only to seed a user's new storage on first use.
+"""
 from __future__ import annotations
 
+import bisect
+import os
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
@@ -9,6 +26,8 @@ from app.storage.base import BaseStorage
 
 HISTORY_EVENTS_FILE = "history_events.json"
 LEGACY_HISTORY_FILE = "generations_history.json"
+HISTORY_EVENTS_DIR = "history_events"
+HISTORY_EVENTS_MAX_PER_USER = int(os.getenv("HISTORY_EVENTS_MAX_PER_USER", "500"))
 
 
 @dataclass(frozen=True)
@@ -20,6 +39,89 @@ class HistoryEvent:
     created_at: str
 
 
+@dataclass(frozen=True)
+class HistoryPage:
+    events: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+
+
+_seeded_users: set[tuple[int, int]] = set()
+
+
+def user_events_filename(user_id: int) -> str:
+    return f"{HISTORY_EVENTS_DIR}/user-{int(user_id)}.json"
+
+
+def _uses_rows(storage: Any) -> bool:
+    return getattr(storage, "supports_history_event_rows", False) is True
+
+
+def _empty_doc() -> Dict[str, Any]:
+    return {"seq": 0, "total": 0, "counts": {}, "latest": None, "ids": {}, "events": [], "seeded": False}
+
+
+def _coerce_doc(raw: Any) -> Dict[str, Any]:
+    if not isinstance(raw, dict) or not isinstance(raw.get("events"), list):
+        return _empty_doc()
+    doc = _empty_doc()
+    doc.update(raw)
+    return doc
+
+
+def _add_to_doc(doc: Dict[str, Any], event: Dict[str, Any]) -> bool:
+    """Append ``event`` unless its event_id is known; keeps counters and the size bound."""
+    ids: Dict[str, int] = doc["ids"]
+    if event["event_id"] in ids:
+        return False
+    doc["seq"] = int(doc["seq"]) + 1
+    stored = dict(event, seq=doc["seq"])
+    doc["events"].append(stored)
+    ids[event["event_id"]] = doc["seq"]
+    kind = stored.get("kind") or "legacy"
+    doc["counts"][kind] = int(doc["counts"].get(kind, 0)) + 1
+    doc["total"] = int(doc["total"]) + 1
+    doc["latest"] = stored
+    overflow = len(doc["events"]) - HISTORY_EVENTS_MAX_PER_USER
+    if overflow > 0:
+        for dropped in doc["events"][:overflow]:
+            ids.pop(dropped.get("event_id"), None)
+        del doc["events"][:overflow]
+    return True
+
+
+async def _legacy_user_events(storage: BaseStorage, user_id: int) -> List[Dict[str, Any]]:
+    legacy = await storage.read_json_file(HISTORY_EVENTS_FILE, default={})
+    events = legacy.get(str(user_id), []) if isinstance(legacy, dict) else []
+    return [event for event in events if isinstance(event, dict) and event.get("event_id")]
+
+
+def _seed_doc(doc: Dict[str, Any], legacy_events: List[Dict[str, Any]]) -> None:
+    """Fold the user's legacy events in ahead of anything already stored."""
+    newer = doc["events"]
+    doc.update(_empty_doc())
+    for event in legacy_events + newer:
+        _add_to_doc(doc, {k: v for k, v in event.items() if k != "seq"})
+    doc["seeded"] = True
+
+
+async def _pending_legacy_events(storage: BaseStorage, user_id: int) -> Optional[List[Dict[str, Any]]]:
+    """Legacy events still to be copied for ``user_id``, or None once seeding is done."""
+    key = (id(storage), int(user_id))
+    if key in _seeded_users:
+        return None
+    if _uses_rows(storage):
+        if not await storage.get_history_event_counters(user_id):
+            for event in await _legacy_user_events(storage, user_id):
+                await storage.append_history_event(user_id, event)
+        _seeded_users.add(key)
+        return None
+    doc = _coerce_doc(await storage.read_json_file(user_events_filename(user_id), default={}))
+    if doc.get("seeded"):
+        _seeded_users.add(key)
+        return None
+    return await _legacy_user_events(storage, user_id)
+
+
 async def append_event(
     storage: BaseStorage,
     user_id: int,
@@ -29,42 +131,81 @@ async def append_event(
 ) -> bool:
     if not event_id:
         raise ValueError("event_id is required")
+    event = {
+        "event_id": event_id,
+        "user_id": user_id,
+        "kind": kind,
+        "payload": payload,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    legacy_events = await _pending_legacy_events(storage, user_id)
+    if _uses_rows(storage):
+        return bool(await storage.append_history_event(user_id, event))
+
+    inserted = False
 
     def updater(data: Dict[str, Any]) -> Dict[str, Any]:
-        updated = dict(data)
-        user_key = str(user_id)
-        events = list(updated.get(user_key, []))
-        if any(event.get("event_id") == event_id for event in events):
-            return updated
-        events.append(
-            {
-                "event_id": event_id,
-                "user_id": user_id,
-                "kind": kind,
-                "payload": payload,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-            }
-        )
-        updated[user_key] = events
-        return updated
-
-    before = await storage.read_json_file(HISTORY_EVENTS_FILE, default={})
-    updated = await storage.update_json_file(HISTORY_EVENTS_FILE, updater)
-    user_key = str(user_id)
-    return len(updated.get(user_key, [])) > len(before.get(user_key, []))
+        nonlocal inserted
+        doc = _coerce_doc(data)
+        if legacy_events is not None and not doc.get("seeded"):
+            _seed_doc(doc, legacy_events)
+        inserted = _add_to_doc(doc, event)
+        return doc
+
+    await storage.update_json_file(user_events_filename(user_id), updater)
+    _seeded_users.add((id(storage), int(user_id)))
+    return inserted
+
+
+async def get_page(
+    storage: BaseStorage,
+    user_id: int,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+) -> HistoryPage:
+    """Newest-first page of events; pass ``next_cursor`` back to get the following page."""
+    limit = max(1, int(limit))
+    try:
+        before_seq = int(cursor) if cursor else None
+    except (TypeError, ValueError):
+        before_seq = None
+    if _uses_rows(storage):
+        events = await storage.list_history_events(user_id, limit=limit + 1, before_seq=before_seq)
+    else:
+        doc = _coerce_doc(await storage.read_json_file(user_events_filename(user_id), default={}))
+        stored = doc["events"]
+        if not stored and not doc.get("seeded") and before_seq is None:
+            legacy = [dict(event, seq=index + 1) for index, event in enumerate(await _legacy_user_events(storage, user_id))]
+            stored = legacy
+        end = len(stored)
+        if before_seq is not None:
+            end = bisect.bisect_left([event.get("seq", 0) for event in stored], before_seq)
+        events = stored[max(0, end - limit - 1):end][::-1]
+    has_more = len(events) > limit
+    events = events[:limit]
+    next_cursor = str(events[-1]["seq"]) if has_more and events and events[-1].get("seq") else None
+    return HistoryPage(events=events, next_cursor=next_cursor)
 
 
 async def get_recent(storage: BaseStorage, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
-    events = await storage.read_json_file(HISTORY_EVENTS_FILE, default={})
-    user_events = list(events.get(str(user_id), []))
-    if user_events:
-        return user_events[-limit:]
+    page = await get_page(storage, user_id, limit=limit)
+    if page.events:
+        return page.events[::-1]
     legacy = await storage.read_json_file(LEGACY_HISTORY_FILE, default={})
     legacy_events = list(legacy.get(str(user_id), []))
     return legacy_events[-limit:]
 
 
 async def get_aggregates(storage: BaseStorage, user_id: int) -> Dict[str, Any]:
+    if _uses_rows(storage):
+        counters = await storage.get_history_event_counters(user_id)
+        if counters:
+            latest = await storage.list_history_events(user_id, limit=1, before_seq=None)
+            return {"counts": counters, "latest": latest[0] if latest else None}
+    else:
+        doc = _coerce_doc(await storage.read_json_file(user_events_filename(user_id), default={}))
+        if doc["total"]:
+            return {"counts": dict(doc["counts"]), "latest": doc["latest"]}
     events = await get_recent(storage, user_id, limit=1000)
     counts: Dict[str, int] = {}
     latest: Optional[Dict[str, Any]] = None
@@ -73,3 +214,7 @@ async def get_aggregates(storage: BaseStorage, user_id: int) -> Dict[str, Any]:
         counts[kind] = counts.get(kind, 0) + 1
         latest = event
     return {"counts": counts, "latest": latest}
+
+
+def reset_seeded_users() -> None:
+    _seeded_users.clear()
@@ -3,9 +3,12 @@ Builder для входных параметров KIE AI API.
 Собирает input строго по типу модели, валидирует и нормализует.
 """
 
+import copy
 import re
 import logging
-from typing import Dict, Any, Optional, Tuple, List, Set
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Any, Optional, Tuple, List, Set
 from app.kie_catalog.catalog import ModelSpec, ModelMode
 from app.models.canonical import canonicalize_model_id
 from app.kie_catalog.input_schemas import (
@@ -8306,6 +8309,856 @@ def _validate_sora_watermark_remover(
     return True, None
 
 
+# ==================== MODEL RULE TABLES ====================
+# Each per-model rule is declared once; build_input resolves the rules for a
+# model_id once (lru_cache) instead of calling every validator in sequence.
+# canonical=True rules match on canonicalize_model_id(model_id).
+
+
+@dataclass(frozen=True)
+class _ValidatorRule:
+    model_ids: Tuple[str, ...]
+    validator: Callable[[str, Dict[str, Any]], Tuple[bool, Optional[str]]]
+    canonical: bool = False
+
+
+@dataclass(frozen=True)
+class _DefaultsRule:
+    model_ids: Tuple[str, ...]
+    defaults: Dict[str, Any]
+    canonical: bool = False
+
+
+_VALIDATOR_RULES: Tuple[_ValidatorRule, ...] = (
+    _ValidatorRule(("wan/2-6-text-to-video",), _validate_wan_2_6_text_to_video),
+    _ValidatorRule(("wan/2-5-text-to-video", "wan/2.5-text-to-video"), _validate_wan_2_5_text_to_video),
+    _ValidatorRule(("wan/2-5-image-to-video", "wan/2.5-image-to-video"), _validate_wan_2_5_image_to_video),
+    _ValidatorRule(("wan/2-6-image-to-video",), _validate_wan_2_6_image_to_video),
+    _ValidatorRule(("wan/2-2-animate-replace", "wan/2.2-animate-replace"), _validate_wan_2_2_animate_replace),
+    _ValidatorRule(("wan/2-2-animate-move", "wan/2.2-animate-move"), _validate_wan_2_2_animate_move),
+    _ValidatorRule(("wan/2-6-video-to-video",), _validate_wan_2_6_video_to_video),
+    _ValidatorRule(
+        ("wan/2-2-a14b-text-to-video-turbo", "wan-2-2-a14b-text-to-video-turbo", "wan/2-2-a14b-t2v-turbo", "2-2-a14b-text-to-video-turbo"),
+        _validate_wan_2_2_a14b_text_to_video_turbo,
+    ),
+    _ValidatorRule(
+        ("wan/2-2-a14b-image-to-video-turbo", "wan-2-2-a14b-image-to-video-turbo", "wan/2-2-a14b-i2v-turbo", "2-2-a14b-image-to-video-turbo"),
+        _validate_wan_2_2_a14b_image_to_video_turbo,
+    ),
+    _ValidatorRule(
+        ("google/imagen4-fast", "google-imagen4-fast", "imagen4-fast", "imagen4/fast"),
+        _validate_google_imagen4_fast,
+    ),
+    _ValidatorRule(
+        ("google/imagen4-ultra", "google-imagen4-ultra", "imagen4-ultra", "imagen4/ultra"),
+        _validate_google_imagen4_ultra,
+    ),
+    _ValidatorRule(("google/imagen4", "google-imagen4", "imagen4"), _validate_google_imagen4),
+    _ValidatorRule(("seedream/4.5-text-to-image",), _validate_seedream_4_5_text_to_image),
+    _ValidatorRule(
+        ("bytedance/seedream-v4-text-to-image", "seedream-v4-text-to-image", "seedream-v4-t2i"),
+        _validate_bytedance_seedream_v4_text_to_image,
+    ),
+    _ValidatorRule(
+        ("bytedance/seedream-v4-edit", "seedream-v4-edit", "seedream-v4-i2i"),
+        _validate_bytedance_seedream_v4_edit,
+    ),
+    _ValidatorRule(("bytedance/seedream", "bytedance-seedream", "seedream"), _validate_bytedance_seedream),
+    _ValidatorRule(("qwen/image-to-image", "qwen-image-to-image", "qwen/i2i"), _validate_qwen_image_to_image),
+    _ValidatorRule(("qwen/text-to-image", "qwen-text-to-image", "qwen/t2i"), _validate_qwen_text_to_image),
+    _ValidatorRule(("google/nano-banana", "google-nano-banana", "nano-banana"), _validate_google_nano_banana),
+    _ValidatorRule(
+        ("google/nano-banana-edit", "google-nano-banana-edit", "nano-banana-edit"),
+        _validate_google_nano_banana_edit,
+    ),
+    _ValidatorRule(("qwen/image-edit", "qwen-image-edit", "qwen/edit"), _validate_qwen_image_edit),
+    _ValidatorRule(
+        ("ideogram/character-edit", "ideogram-character-edit", "character-edit"),
+        _validate_ideogram_character_edit,
+    ),
+    _ValidatorRule(
+        ("ideogram/character-remix", "ideogram-character-remix", "character-remix"),
+        _validate_ideogram_character_remix,
+    ),
+    _ValidatorRule(("ideogram/character", "ideogram-character", "character"), _validate_ideogram_character),
+    _ValidatorRule(
+        ("bytedance/v1-pro-text-to-video", "bytedance-v1-pro-text-to-video", "v1-pro-text-to-video"),
+        _validate_bytedance_v1_pro_text_to_video,
+    ),
+    _ValidatorRule(
+        ("bytedance/v1-lite-image-to-video", "bytedance-v1-lite-image-to-video", "v1-lite-image-to-video"),
+        _validate_bytedance_v1_lite_image_to_video,
+    ),
+    _ValidatorRule(
+        ("bytedance/v1-pro-image-to-video", "bytedance-v1-pro-image-to-video", "v1-pro-image-to-video"),
+        _validate_bytedance_v1_pro_image_to_video,
+    ),
+    _ValidatorRule(
+        ("kling/v2-1-master-image-to-video", "kling-v2-1-master-image-to-video", "v2-1-master-image-to-video"),
+        _validate_kling_v2_1_master_image_to_video,
+    ),
+    _ValidatorRule(
+        ("kling/v2-1-standard", "kling-v2-1-standard", "v2-1-standard"),
+        _validate_kling_v2_1_standard,
+    ),
+    _ValidatorRule(("kling/v2-1-pro", "kling-v2-1-pro", "v2-1-pro"), _validate_kling_v2_1_pro),
+    _ValidatorRule(
+        ("kling/v2-1-master-text-to-video", "kling-v2-1-master-text-to-video", "v2-1-master-text-to-video"),
+        _validate_kling_v2_1_master_text_to_video,
+    ),
+    _ValidatorRule(("seedream/4.5-edit",), _validate_seedream_4_5_edit),
+    _ValidatorRule(("kling-2.6/image-to-video",), _validate_kling_2_6_image_to_video),
+    _ValidatorRule(("kling-2.6/text-to-video",), _validate_kling_2_6_text_to_video),
+    _ValidatorRule(("z-image",), _validate_z_image),
+    _ValidatorRule(("flux-2/pro-image-to-image",), _validate_flux_2_pro_image_to_image),
+    _ValidatorRule(("flux-2/pro-text-to-image",), _validate_flux_2_pro_text_to_image),
+    _ValidatorRule(("flux-2/flex-image-to-image",), _validate_flux_2_flex_image_to_image),
+    _ValidatorRule(("flux-2/flex-text-to-image",), _validate_flux_2_flex_text_to_image),
+    _ValidatorRule(("nano-banana-pro", "google/nano-banana-pro"), _validate_nano_banana_pro),
+    _ValidatorRule(
+        ("bytedance/v1-pro-fast-image-to-video", "bytedance-v1-pro-fast-image-to-video", "v1-pro-fast-image-to-video"),
+        _validate_bytedance_v1_pro_fast_image_to_video,
+    ),
+    _ValidatorRule(("grok-imagine/image-to-video", "grok/imagine"), _validate_grok_imagine_image_to_video),
+    _ValidatorRule(
+        ("grok-imagine/text-to-video", "grok/imagine-text-to-video"),
+        _validate_grok_imagine_text_to_video,
+    ),
+    _ValidatorRule(
+        ("grok-imagine/text-to-image", "grok/imagine-text-to-image"),
+        _validate_grok_imagine_text_to_image,
+    ),
+    _ValidatorRule(
+        ("recraft/remove-background", "recraft-remove-background"),
+        _validate_recraft_remove_background,
+    ),
+    _ValidatorRule(
+        ("recraft/crisp-upscale", "recraft-crisp-upscale", "recraft/crisp-upscaler"),
+        _validate_recraft_crisp_upscale,
+    ),
+    _ValidatorRule(("ideogram/v3-reframe", "ideogram-v3-reframe"), _validate_ideogram_v3_reframe),
+    _ValidatorRule(
+        ("ideogram/v3-text-to-image", "ideogram-v3-text-to-image", "ideogram/v3-t2i", "v3-text-to-image"),
+        _validate_ideogram_v3_text_to_image,
+    ),
+    _ValidatorRule(("ideogram/v3-edit", "ideogram-v3-edit", "v3-edit"), _validate_ideogram_v3_edit),
+    _ValidatorRule(("ideogram/v3-remix", "ideogram-v3-remix", "v3-remix"), _validate_ideogram_v3_remix),
+    _ValidatorRule(
+        ("elevenlabs/audio-isolation", "elevenlabs-audio-isolation"),
+        _validate_elevenlabs_audio_isolation,
+    ),
+    _ValidatorRule(
+        ("elevenlabs/sound-effect-v2", "elevenlabs-sound-effect-v2"),
+        _validate_elevenlabs_sound_effect_v2,
+    ),
+    _ValidatorRule(
+        ("elevenlabs/speech-to-text", "elevenlabs-speech-to-text"),
+        _validate_elevenlabs_speech_to_text,
+    ),
+    _ValidatorRule(
+        ("elevenlabs/text-to-speech-multilingual-v2", "elevenlabs-text-to-speech-multilingual-v2"),
+        _validate_elevenlabs_text_to_speech_multilingual_v2,
+    ),
+    _ValidatorRule(("grok-imagine/upscale", "grok/imagine-upscale"), _validate_grok_imagine_upscale),
+    _ValidatorRule(
+        ("hailuo/02-image-to-video-pro", "hailuo/02-i2v-pro", "hailuo/0.2-image-to-video-pro"),
+        _validate_hailuo_02_image_to_video_pro,
+    ),
+    _ValidatorRule(
+        ("hailuo/02-image-to-video-standard", "hailuo/02-i2v-standard", "hailuo/0.2-image-to-video-standard"),
+        _validate_hailuo_02_image_to_video_standard,
+    ),
+    _ValidatorRule(
+        ("kling/v1-avatar-standard", "kling/v1-avatar", "kling/avatar-standard"),
+        _validate_kling_v1_avatar_standard,
+    ),
+    _ValidatorRule(
+        ("kling/ai-avatar-v1-pro", "kling/avatar-v1-pro", "kling/ai-avatar-pro"),
+        _validate_kling_ai_avatar_v1_pro,
+    ),
+    _ValidatorRule(("infinitalk/from-audio", "infinitalk-from-audio"), _validate_infinitalk_from_audio),
+    _ValidatorRule(
+        ("hailuo/2-3-image-to-video-pro", "hailuo/2-3-i2v-pro"),
+        _validate_hailuo_2_3_image_to_video_pro,
+    ),
+    _ValidatorRule(
+        ("hailuo/2-3-image-to-video-standard", "hailuo/2-3-i2v-standard"),
+        _validate_hailuo_2_3_image_to_video_standard,
+    ),
+    _ValidatorRule(("sora-2-pro-storyboard",), _validate_sora_2_pro_storyboard, canonical=True),
+    _ValidatorRule(("sora-2-text-to-video",), _validate_sora_2_text_to_video, canonical=True),
+    _ValidatorRule(("sora-2-image-to-video",), _validate_sora_2_image_to_video, canonical=True),
+    _ValidatorRule(("sora-2-pro-text-to-video",), _validate_sora_2_pro_text_to_video, canonical=True),
+    _ValidatorRule(("sora-2-pro-image-to-video",), _validate_sora_2_pro_image_to_video, canonical=True),
+    _ValidatorRule(("sora-watermark-remover",), _validate_sora_watermark_remover, canonical=True),
+    _ValidatorRule(
+        ("topaz/image-upscale", "topaz/image-upscaler", "topaz/upscale"),
+        _validate_topaz_image_upscale,
+    ),
+    _ValidatorRule(
+        ("kling/v2-5-turbo-image-to-video-pro", "kling/v2-5-turbo-i2v-pro", "kling/v2.5-turbo-image-to-video-pro"),
+        _validate_kling_v2_5_turbo_image_to_video_pro,
+    ),
+)
+
+# Defaults from the KIE docs, applied after validation to fields that are still missing.
+_DEFAULTS_RULES: Tuple[_DefaultsRule, ...] = (
+    _DefaultsRule(
+        ("z-image",),
+        {
+            "aspect_ratio": "1:1",
+        },
+    ),
+    _DefaultsRule(
+        ("flux-2/pro-image-to-image",),
+        {
+            "aspect_ratio": "1:1",
+            "resolution": "1K",
+        },
+    ),
+    _DefaultsRule(
+        ("flux-2/pro-text-to-image",),
+        {
+            "aspect_ratio": "1:1",
+            "resolution": "1K",
+        },
+    ),
+    _DefaultsRule(
+        ("flux-2/flex-image-to-image",),
+        {
+            "aspect_ratio": "1:1",
+            "resolution": "1K",
+        },
+    ),
+    _DefaultsRule(
+        ("flux-2/flex-text-to-image",),
+        {
+            "aspect_ratio": "1:1",
+            "resolution": "1K",
+        },
+    ),
+    _DefaultsRule(
+        ("nano-banana-pro", "google/nano-banana-pro"),
+        {
+            "image_input": [],
+            "aspect_ratio": "1:1",
+            "resolution": "1K",
+            "output_format": "png",
+        },
+    ),
+    _DefaultsRule(
+        ("bytedance/v1-pro-fast-image-to-video", "bytedance-v1-pro-fast-image-to-video", "v1-pro-fast-image-to-video"),
+        {
+            "resolution": "720p",
+            "duration": "5",
+        },
+    ),
+    _DefaultsRule(
+        ("grok-imagine/image-to-video", "grok/imagine"),
+        {
+            "index": 0,
+            "mode": "normal",
+        },
+    ),
+    _DefaultsRule(
+        ("grok-imagine/text-to-video", "grok/imagine-text-to-video"),
+        {
+            "aspect_ratio": "2:3",
+            "mode": "normal",
+        },
+    ),
+    _DefaultsRule(
+        ("grok-imagine/text-to-image", "grok/imagine-text-to-image"),
+        {
+            "aspect_ratio": "3:2",  # отличается от text-to-video!
+            # ВАЖНО: Нет параметра mode для text-to-image (в отличие от text-to-video и image-to-video)
+        },
+    ),
+    _DefaultsRule(
+        ("hailuo/02-text-to-video-pro", "hailuo/02-t2v-pro", "hailuo/0.2-text-to-video-pro"),
+        {
+            "prompt_optimizer": True,
+        },
+    ),
+    _DefaultsRule(
+        ("hailuo/02-text-to-video-standard", "hailuo/02-t2v-standard", "hailuo/0.2-text-to-video-standard"),
+        {
+            "duration": "6",
+            "prompt_optimizer": True,
+        },
+    ),
+    _DefaultsRule(
+        ("hailuo/02-image-to-video-pro", "hailuo/02-i2v-pro", "hailuo/0.2-image-to-video-pro"),
+        {
+            "image_url": "https://file.aiquickdraw.com/custom-page/akr/section-images/17585210783150ispzfo7.png",
+            "prompt_optimizer": True,
+            # end_image_url опциональный, default "" (пустая строка) - не добавляем если не указан
+        },
+    ),
+    _DefaultsRule(
+        ("hailuo/02-image-to-video-standard", "hailuo/02-i2v-standard", "hailuo/0.2-image-to-video-standard"),
+        {
+            "image_url": "https://file.aiquickdraw.com/custom-page/akr/section-images/17585207681646umf3lz8.png",
+            "end_image_url": "https://file.aiquickdraw.com/custom-page/akr/section-images/1758521423357w8586uq8.png",
+            "duration": "10",
+            "resolution": "768P",
+            "prompt_optimizer": True,
+        },
+    ),
+    _DefaultsRule(
+        ("hailuo/2-3-image-to-video-pro", "hailuo/2-3-i2v-pro"),
+        {
+            "duration": "6",
+            "resolution": "768P",
+        },
+    ),
+    _DefaultsRule(
+        ("kling/v2-1-master-text-to-video", "kling-v2-1-master-text-to-video", "v2-1-master-text-to-video"),
+        {
+            "duration": "5",
+            "aspect_ratio": "16:9",
+            "negative_prompt": "blur, distort, and low quality",
+            "cfg_scale": 0.5,
+        },
+    ),
+    _DefaultsRule(
+        ("hailuo/2-3-image-to-video-standard", "hailuo/2-3-i2v-standard"),
+        {
+            "duration": "6",
+            "resolution": "768P",
+        },
+    ),
+    _DefaultsRule(
+        ("sora-2-pro-storyboard",),
+        {
+            "n_frames": "15",
+            "aspect_ratio": "landscape",
+        },
+        canonical=True,
+    ),
+    _DefaultsRule(
+        ("sora-2-text-to-video",),
+        {
+            "aspect_ratio": "landscape",
+            "n_frames": "10",
+            "remove_watermark": True,
+            # ВАЖНО: НЕТ параметра size в sora-2-text-to-video (только в pro версии!)
+        },
+        canonical=True,
+    ),
+    _DefaultsRule(
+        ("sora-2-image-to-video",),
+        {
+            "aspect_ratio": "landscape",
+            "n_frames": "10",
+            "remove_watermark": True,
+            # ВАЖНО: НЕТ параметра size в sora-2-image-to-video (только в pro версии!)
+        },
+        canonical=True,
+    ),
+    _DefaultsRule(
+        ("sora-2-pro-text-to-video",),
+        {
+            "aspect_ratio": "landscape",
+            "n_frames": "10",
+            "size": "standard",
+            "remove_watermark": True,
+        },
+        canonical=True,
+    ),
+    _DefaultsRule(
+        ("sora-2-pro-image-to-video",),
+        {
+            "aspect_ratio": "landscape",
+            "n_frames": "10",
+            "size": "standard",  # отличается от text-to-video, где "high"!
+            "remove_watermark": True,
+        },
+        canonical=True,
+    ),
+    _DefaultsRule(
+        ("sora-watermark-remover",),
+        {
+            "video_url": "https://sora.chatgpt.com/p/s_68e83bd7eee88191be79d2ba7158516f",
+        },
+        canonical=True,
+    ),
+    _DefaultsRule(
+        ("infinitalk/from-audio", "infinitalk-from-audio"),
+        {
+            "resolution": "480p",
+        },
+    ),
+    _DefaultsRule(
+        ("elevenlabs/sound-effect-v2", "elevenlabs-sound-effect-v2"),
+        {
+            "loop": False,
+            "prompt_influence": 0.3,
+            "output_format": "mp3_44100_128",
+        },
+    ),
+    _DefaultsRule(
+        ("kling/v2-1-standard", "kling-v2-1-standard", "v2-1-standard"),
+        {
+            "duration": "5",
+            "negative_prompt": "blur, distort, and low quality",
+            "cfg_scale": 0.5,
+        },
+    ),
+    _DefaultsRule(
+        ("kling/v2-1-pro", "kling-v2-1-pro", "v2-1-pro"),
+        {
+            "duration": "5",
+            "negative_prompt": "blur, distort, and low quality",
+            "cfg_scale": 0.5,
+            "tail_image_url": "",  # пустая строка!
+        },
+    ),
+    _DefaultsRule(
+        ("elevenlabs/speech-to-text", "elevenlabs-speech-to-text"),
+        {
+            "language_code": "",
+            "tag_audio_events": True,
+            "diarize": True,
+        },
+    ),
+    _DefaultsRule(
+        ("elevenlabs/text-to-speech-multilingual-v2", "elevenlabs-text-to-speech-multilingual-v2"),
+        {
+            "voice": "Rachel",
+            "stability": 0.5,
+            "similarity_boost": 0.75,
+            "style": 0,
+            "speed": 1,
+            "timestamps": False,
+            "previous_text": "",
+            "next_text": "",
+            "language_code": "",
+        },
+    ),
+    _DefaultsRule(
+        ("wan/2-2-a14b-text-to-video-turbo", "wan-2-2-a14b-text-to-video-turbo", "wan/2-2-a14b-t2v-turbo", "2-2-a14b-text-to-video-turbo"),
+        {
+            "resolution": "720p",
+            "aspect_ratio": "16:9",
+            "enable_prompt_expansion": False,
+            "seed": 0,
+            "acceleration": "none",
+        },
+    ),
+    _DefaultsRule(
+        ("wan/2-2-a14b-image-to-video-turbo", "wan-2-2-a14b-image-to-video-turbo", "wan/2-2-a14b-i2v-turbo", "2-2-a14b-image-to-video-turbo"),
+        {
+            "resolution": "720p",
+            "aspect_ratio": "auto",  # ВАЖНО: "auto", а не "16:9"!
+            "enable_prompt_expansion": False,
+            "seed": 0,
+            "acceleration": "none",
+        },
+    ),
+    _DefaultsRule(
+        ("wan/2-2-a14b-speech-to-video-turbo", "wan-2-2-a14b-speech-to-video-turbo"),
+        {
+            "num_frames": 80,
+            "frames_per_second": 16,
+            "resolution": "480p",
+            "negative_prompt": "",
+            "num_inference_steps": 27,
+            "guidance_scale": 3.5,
+            "shift": 5,
+            "enable_safety_checker": True,
+        },
+    ),
+    _DefaultsRule(
+        ("bytedance/seedream", "bytedance-seedream", "seedream"),
+        {
+            "image_size": "square_hd",
+            "guidance_scale": 2.5,
+            "enable_safety_checker": True,
+        },
+    ),
+    _DefaultsRule(
+        ("qwen/image-to-image", "qwen-image-to-image", "qwen/i2i"),
+        {
+            "strength": 0.8,
+            "output_format": "png",
+            "acceleration": "none",
+            "negative_prompt": "blurry, ugly",
+            "num_inference_steps": 30,
+            "guidance_scale": 2.5,
+            "enable_safety_checker": True,
+        },
+    ),
+    _DefaultsRule(
+        ("qwen/text-to-image", "qwen-text-to-image", "qwen/t2i"),
+        {
+            "image_size": "square_hd",
+            "num_inference_steps": 30,
+            "guidance_scale": 2.5,
+            "enable_safety_checker": True,
+            "output_format": "png",
+            "negative_prompt": " ",  # пробел!
+            "acceleration": "none",
+        },
+    ),
+    _DefaultsRule(
+        ("kling/v2-1-master-image-to-video", "kling-v2-1-master-image-to-video", "v2-1-master-image-to-video"),
+        {
+            "duration": "5",
+            "negative_prompt": "blur, distort, and low quality",
+            "cfg_scale": 0.5,
+        },
+    ),
+    _DefaultsRule(
+        ("google/imagen4-fast", "google-imagen4-fast", "imagen4-fast", "imagen4/fast"),
+        {
+            "negative_prompt": "",  # пустая строка!
+            "aspect_ratio": "16:9",
+            "num_images": "1",
+        },
+    ),
+    _DefaultsRule(
+        ("google/imagen4-ultra", "google-imagen4-ultra", "imagen4-ultra", "imagen4/ultra"),
+        {
+            "negative_prompt": "",  # пустая строка!
+            "aspect_ratio": "1:1",  # ВАЖНО: "1:1", а не "16:9"!
+            "seed": "",  # пустая строка! ВАЖНО: string, а не number!
+        },
+    ),
+    _DefaultsRule(
+        ("google/imagen4", "google-imagen4", "imagen4"),
+        {
+            "negative_prompt": "",  # пустая строка!
+            "aspect_ratio": "1:1",  # ВАЖНО: "1:1", а не "16:9"!
+            "num_images": "1",
+            "seed": "",  # пустая строка! ВАЖНО: string, а не number!
+        },
+    ),
+    _DefaultsRule(
+        ("google/nano-banana", "google-nano-banana", "nano-banana"),
+        {
+            "output_format": "png",
+            "image_size": "1:1",
+        },
+    ),
+    _DefaultsRule(
+        ("google/nano-banana-edit", "google-nano-banana-edit", "nano-banana-edit"),
+        {
+            "output_format": "png",
+            "image_size": "1:1",
+        },
+    ),
+    _DefaultsRule(
+        ("qwen/image-edit", "qwen-image-edit", "qwen/edit"),
+        {
+            "acceleration": "none",
+            "image_size": "landscape_4_3",
+            "num_inference_steps": 25,
+            "guidance_scale": 4,
+            "sync_mode": False,
+            "enable_safety_checker": True,
+            "output_format": "png",
+            "negative_prompt": "blurry, ugly",
+        },
+    ),
+    _DefaultsRule(
+        ("ideogram/character-edit", "ideogram-character-edit", "character-edit"),
+        {
+            "rendering_speed": "BALANCED",
+            "style": "AUTO",
+            "expand_prompt": True,
+            "num_images": "1",
+        },
+    ),
+    _DefaultsRule(
+        ("ideogram/character-remix", "ideogram-character-remix", "character-remix"),
+        {
+            "rendering_speed": "BALANCED",
+            "style": "AUTO",
+            "expand_prompt": True,
+            "image_size": "square_hd",
+            "num_images": "1",
+            "strength": 0.8,
+            "negative_prompt": "",  # пустая строка!
+            "image_urls": [],
+            "reference_mask_urls": "",  # пустая строка!
+        },
+    ),
+    _DefaultsRule(
+        ("ideogram/v3-edit", "ideogram-v3-edit", "v3-edit"),
+        {
+            "rendering_speed": "BALANCED",
+            "expand_prompt": True,
+        },
+    ),
+    _DefaultsRule(
+        ("ideogram/v3-remix", "ideogram-v3-remix", "v3-remix"),
+        {
+            "rendering_speed": "BALANCED",
+            "style": "AUTO",
+            "expand_prompt": True,
+            "image_size": "square_hd",
+            "num_images": "1",
+            "strength": 0.8,
+            "negative_prompt": "",  # пустая строка!
+        },
+    ),
+    _DefaultsRule(
+        ("ideogram/character", "ideogram-character", "character"),
+        {
+            "rendering_speed": "BALANCED",
+            "style": "AUTO",
+            "expand_prompt": True,
+            "num_images": "1",
+            "image_size": "square_hd",
+            "negative_prompt": "",  # пустая строка!
+        },
+    ),
+    _DefaultsRule(
+        ("bytedance/v1-pro-fast-image-to-video", "bytedance-v1-pro-fast-image-to-video", "v1-pro-fast-image-to-video"),
+        {
+            "resolution": "720p",
+            "duration": "5",
+        },
+    ),
+    _DefaultsRule(
+        ("bytedance/v1-lite-text-to-video", "bytedance-v1-lite-text-to-video", "v1-lite-text-to-video"),
+        {
+            "aspect_ratio": "16:9",
+            "resolution": "720p",
+            "duration": "5",
+            "camera_fixed": False,
+            "enable_safety_checker": True,
+        },
+    ),
+    _DefaultsRule(
+        ("bytedance/v1-pro-text-to-video", "bytedance-v1-pro-text-to-video", "v1-pro-text-to-video"),
+        {
+            "aspect_ratio": "16:9",
+            "resolution": "720p",
+            "duration": "5",
+            "camera_fixed": False,
+            "seed": -1,  # случайный seed
+            "enable_safety_checker": True,
+        },
+    ),
+    _DefaultsRule(
+        ("bytedance/v1-lite-image-to-video", "bytedance-v1-lite-image-to-video", "v1-lite-image-to-video"),
+        {
+            "resolution": "720p",
+            "duration": "5",
+            "camera_fixed": False,
+            "seed": -1,  # случайный seed
+            "enable_safety_checker": True,
+            "end_image_url": "",  # пустая строка!
+        },
+    ),
+    _DefaultsRule(
+        ("bytedance/v1-pro-image-to-video", "bytedance-v1-pro-image-to-video", "v1-pro-image-to-video"),
+        {
+            "resolution": "720p",
+            "duration": "5",
+            "camera_fixed": False,
+            "seed": -1,  # случайный seed
+            "enable_safety_checker": True,
+        },
+    ),
+    _DefaultsRule(
+        ("ideogram/v3-text-to-image", "ideogram-v3-text-to-image", "ideogram/v3-t2i", "v3-text-to-image"),
+        {
+            "rendering_speed": "BALANCED",
+            "style": "AUTO",
+            "expand_prompt": True,
+            "image_size": "square_hd",
+            "negative_prompt": "",  # пустая строка!
+        },
+    ),
+    _DefaultsRule(
+        ("ideogram/v3-reframe", "ideogram-v3-reframe"),
+        {
+            "image_size": "square_hd",
+            "rendering_speed": "BALANCED",
+            "style": "AUTO",
+            "num_images": "1",
+            "seed": 0,
+        },
+    ),
+    _DefaultsRule(
+        ("topaz/image-upscale", "topaz/image-upscaler", "topaz/upscale"),
+        {
+            "image_url": "https://static.aiquickdraw.com/tools/example/1762752805607_mErUj1KR.png",
+            "upscale_factor": "2",
+        },
+    ),
+    _DefaultsRule(
+        ("kling/v2-5-turbo-text-to-video-pro", "kling/v2-5-turbo-t2v-pro", "kling/v2.5-turbo-text-to-video-pro"),
+        {
+            "duration": "5",
+            "aspect_ratio": "16:9",
+            "negative_prompt": "blur, distort, and low quality",
+            "cfg_scale": 0.5,
+        },
+    ),
+    _DefaultsRule(
+        ("kling-2.6/image-to-video",),
+        {
+            "sound": False,
+            "duration": "5",
+        },
+    ),
+    _DefaultsRule(
+        ("kling-2.6/text-to-video",),
+        {
+            "sound": False,
+            "aspect_ratio": "1:1",
+            "duration": "5",
+        },
+    ),
+    _DefaultsRule(
+        ("kling/v2-5-turbo-text-to-video-pro", "kling/v2-5-turbo-t2v-pro", "kling/v2.5-turbo-text-to-video-pro"),
+        {
+            "duration": "5",
+            "aspect_ratio": "16:9",
+            "negative_prompt": "blur, distort, and low quality",
+            "cfg_scale": 0.5,
+        },
+    ),
+    _DefaultsRule(
+        ("kling/v2-5-turbo-image-to-video-pro", "kling/v2-5-turbo-i2v-pro", "kling/v2.5-turbo-image-to-video-pro"),
+        {
+            "image_url": "https://file.aiquickdraw.com/custom-page/akr/section-images/1759211376283gfcw5zcy.png",
+            "duration": "5",
+            "negative_prompt": "blur, distort, and low quality",
+            "cfg_scale": 0.5,
+            # tail_image_url опциональный, default "" (пустая строка) - не добавляем если не указан
+        },
+    ),
+    _DefaultsRule(
+        ("seedream/4.5-text-to-image",),
+        {
+            "aspect_ratio": "1:1",
+            "quality": "basic",
+        },
+    ),
+    _DefaultsRule(
+        ("seedream/4.5-edit",),
+        {
+            "aspect_ratio": "1:1",
+            "quality": "basic",
+        },
+    ),
+    _DefaultsRule(
+        ("bytedance/seedream-v4-text-to-image", "seedream-v4-text-to-image", "seedream-v4-t2i"),
+        {
+            "image_size": "square_hd",
+            "image_resolution": "1K",
+            "max_images": 1,
+        },
+    ),
+    _DefaultsRule(
+        ("bytedance/seedream-v4-edit", "seedream-v4-edit", "seedream-v4-i2i"),
+        {
+            "image_size": "square_hd",
+            "image_resolution": "1K",
+            "max_images": 1,
+        },
+    ),
+    _DefaultsRule(
+        ("wan/2-6-text-to-video",),
+        {
+            "duration": "5",
+            "resolution": "1080p",
+        },
+    ),
+    _DefaultsRule(
+        ("wan/2-5-text-to-video", "wan/2.5-text-to-video"),
+        {
+            "duration": "5",
+            "aspect_ratio": "16:9",
+            "resolution": "1080p",
+            "negative_prompt": "",  # пустая строка
+            "enable_prompt_expansion": True,
+        },
+    ),
+    _DefaultsRule(
+        ("wan/2-5-image-to-video", "wan/2.5-image-to-video"),
+        {
+            "image_url": "https://file.aiquickdraw.com/custom-page/akr/section-images/1758796480945qb63zxq8.webp",
+            "duration": "5",
+            "resolution": "1080p",
+            "negative_prompt": "",  # пустая строка
+            "enable_prompt_expansion": True,
+        },
+    ),
+    _DefaultsRule(
+        ("wan/2-6-image-to-video",),
+        {
+            "duration": "5",
+            "resolution": "1080p",
+        },
+    ),
+    _DefaultsRule(
+        ("wan/2-2-animate-replace", "wan/2.2-animate-replace"),
+        {
+            "video_url": "https://file.aiquickdraw.com/custom-page/akr/section-images/17586199429271xscyd5d.mp4",
+            "image_url": "https://file.aiquickdraw.com/custom-page/akr/section-images/17586199255323tks43kq.png",
+            "resolution": "480p",
+        },
+    ),
+    _DefaultsRule(
+        ("wan/2-2-animate-move", "wan/2.2-animate-move"),
+        {
+            "video_url": "https://file.aiquickdraw.com/custom-page/akr/section-images/17586254974931y2hottk.mp4",
+            "image_url": "https://file.aiquickdraw.com/custom-page/akr/section-images/1758625466310wpehpbnf.png",
+            "resolution": "480p",
+        },
+    ),
+    _DefaultsRule(
+        ("wan/2-6-video-to-video",),
+        {
+            "duration": "5",
+            "resolution": "1080p",
+        },
+    ),
+)
+
+
+def _rule_matches(model_ids: Tuple[str, ...], canonical: bool, model_id: str) -> bool:
+    if canonical:
+        return canonicalize_model_id(model_id) in model_ids
+    return model_id in model_ids
+
+
+@lru_cache(maxsize=512)
+def _validators_for(model_id: str) -> Tuple[Callable[[str, Dict[str, Any]], Tuple[bool, Optional[str]]], ...]:
+    """Validators for ``model_id`` in declaration order."""
+    return tuple(
+        rule.validator for rule in _VALIDATOR_RULES if _rule_matches(rule.model_ids, rule.canonical, model_id)
+    )
+
+
+@lru_cache(maxsize=512)
+def _model_defaults_for(model_id: str) -> Dict[str, Any]:
+    """Merged doc defaults for ``model_id``; earlier rules win like the former if-chain."""
+    merged: Dict[str, Any] = {}
+    for rule in _DEFAULTS_RULES:
+        if _rule_matches(rule.model_ids, rule.canonical, model_id):
+            for field_name, value in rule.defaults.items():
+                merged.setdefault(field_name, value)
+    return merged
+
+
+@lru_cache(maxsize=128)
+def _type_defaults(model_type: str) -> Dict[str, Any]:
+    """Schema defaults for every whitelisted field of ``model_type``."""
+    defaults: Dict[str, Any] = {}
+    for field_name in get_schema_for_type(model_type):
+        default_value = get_default_value(model_type, field_name)
+        if default_value is not None:
+            defaults[field_name] = default_value
+    return defaults
+
+
 def build_input(
     model_spec: ModelSpec,
     user_payload: Dict[str, Any],
@@ -8329,6 +9182,7 @@ def build_input(
     allowed_fields = get_schema_for_type(model_type)
     required_fields = get_required_fields_for_type(model_type)
     
+    schema_found = bool(allowed_fields)
     if not allowed_fields:
         logger.warning(f"No schema for model type: {model_type}, model_id: {model_id}")
         # Fallback: разрешаем все поля если схема не найдена
@@ -8396,11 +9250,16 @@ def build_input(
         normalized_input[normalized_key] = value
     
     # Применяем дефолты из схемы
-    for field_name in allowed_fields:
-        if field_name not in normalized_input:
-            default_value = get_default_value(model_type, field_name)
-            if default_value is not None:
+    if schema_found:
+        for field_name, default_value in _type_defaults(model_type).items():
+            if field_name not in normalized_input:
                 normalized_input[field_name] = default_value
+    else:
+        for field_name in allowed_fields:
+            if field_name not in normalized_input:
+                default_value = get_default_value(model_type, field_name)
+                if default_value is not None:
+                    normalized_input[field_name] = default_value
     
     # Извлекаем дефолты из notes режима
     if mode_index < len(model_spec.modes):
@@ -8422,1096 +9281,17 @@ def build_input(
                 if resolution is not None:
                     normalized_input['resolution'] = resolution
     
-    # Специфичная валидация для wan/2-6-text-to-video
-    is_valid, error_msg = _validate_wan_2_6_text_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для wan/2-5-text-to-video
-    is_valid, error_msg = _validate_wan_2_5_text_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для wan/2-5-image-to-video
-    is_valid, error_msg = _validate_wan_2_5_image_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для wan/2-6-image-to-video
-    is_valid, error_msg = _validate_wan_2_6_image_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для wan/2-2-animate-replace
-    is_valid, error_msg = _validate_wan_2_2_animate_replace(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для wan/2-2-animate-move
-    is_valid, error_msg = _validate_wan_2_2_animate_move(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для wan/2-6-video-to-video
-    is_valid, error_msg = _validate_wan_2_6_video_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для wan/2-2-a14b-text-to-video-turbo
-    is_valid, error_msg = _validate_wan_2_2_a14b_text_to_video_turbo(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для wan/2-2-a14b-image-to-video-turbo
-    is_valid, error_msg = _validate_wan_2_2_a14b_image_to_video_turbo(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для google/imagen4-fast
-    is_valid, error_msg = _validate_google_imagen4_fast(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для google/imagen4-ultra
-    is_valid, error_msg = _validate_google_imagen4_ultra(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для google/imagen4
-    is_valid, error_msg = _validate_google_imagen4(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для seedream/4.5-text-to-image
-    is_valid, error_msg = _validate_seedream_4_5_text_to_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для bytedance/seedream-v4-text-to-image
-    is_valid, error_msg = _validate_bytedance_seedream_v4_text_to_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для bytedance/seedream-v4-edit
-    is_valid, error_msg = _validate_bytedance_seedream_v4_edit(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для bytedance/seedream
-    is_valid, error_msg = _validate_bytedance_seedream(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для qwen/image-to-image
-    is_valid, error_msg = _validate_qwen_image_to_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для qwen/text-to-image
-    is_valid, error_msg = _validate_qwen_text_to_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для google/nano-banana
-    is_valid, error_msg = _validate_google_nano_banana(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для google/nano-banana-edit
-    is_valid, error_msg = _validate_google_nano_banana_edit(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для qwen/image-edit
-    is_valid, error_msg = _validate_qwen_image_edit(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для ideogram/character-edit
-    is_valid, error_msg = _validate_ideogram_character_edit(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для ideogram/character-remix
-    is_valid, error_msg = _validate_ideogram_character_remix(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для ideogram/character
-    is_valid, error_msg = _validate_ideogram_character(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для bytedance/v1-lite-text-to-video
-    is_valid, error_msg = _validate_bytedance_v1_lite_text_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для bytedance/v1-pro-text-to-video
-    is_valid, error_msg = _validate_bytedance_v1_pro_text_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для bytedance/v1-lite-image-to-video
-    is_valid, error_msg = _validate_bytedance_v1_lite_image_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для bytedance/v1-pro-image-to-video
-    is_valid, error_msg = _validate_bytedance_v1_pro_image_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для kling/v2-1-master-image-to-video
-    is_valid, error_msg = _validate_kling_v2_1_master_image_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для kling/v2-1-standard
-    is_valid, error_msg = _validate_kling_v2_1_standard(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для kling/v2-1-pro
-    is_valid, error_msg = _validate_kling_v2_1_pro(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для kling/v2-1-master-text-to-video
-    is_valid, error_msg = _validate_kling_v2_1_master_text_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для seedream/4.5-edit
-    is_valid, error_msg = _validate_seedream_4_5_edit(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для kling-2.6/image-to-video
-    is_valid, error_msg = _validate_kling_2_6_image_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для kling-2.6/text-to-video
-    is_valid, error_msg = _validate_kling_2_6_text_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для z-image
-    is_valid, error_msg = _validate_z_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для flux-2/pro-image-to-image
-    is_valid, error_msg = _validate_flux_2_pro_image_to_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для flux-2/pro-text-to-image
-    is_valid, error_msg = _validate_flux_2_pro_text_to_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для flux-2/flex-image-to-image
-    is_valid, error_msg = _validate_flux_2_flex_image_to_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для flux-2/flex-text-to-image
-    is_valid, error_msg = _validate_flux_2_flex_text_to_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для nano-banana-pro
-    is_valid, error_msg = _validate_nano_banana_pro(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для bytedance/v1-pro-fast-image-to-video
-    is_valid, error_msg = _validate_bytedance_v1_pro_fast_image_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для grok-imagine/image-to-video
-    is_valid, error_msg = _validate_grok_imagine_image_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для grok-imagine/text-to-video
-    is_valid, error_msg = _validate_grok_imagine_text_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для grok-imagine/text-to-image
-    is_valid, error_msg = _validate_grok_imagine_text_to_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для recraft/remove-background
-    is_valid, error_msg = _validate_recraft_remove_background(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для recraft/crisp-upscale
-    is_valid, error_msg = _validate_recraft_crisp_upscale(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для ideogram/v3-reframe
-    is_valid, error_msg = _validate_ideogram_v3_reframe(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для ideogram/v3-text-to-image
-    is_valid, error_msg = _validate_ideogram_v3_text_to_image(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для ideogram/v3-edit
-    is_valid, error_msg = _validate_ideogram_v3_edit(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для ideogram/v3-remix
-    is_valid, error_msg = _validate_ideogram_v3_remix(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для elevenlabs/audio-isolation
-    is_valid, error_msg = _validate_elevenlabs_audio_isolation(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для elevenlabs/sound-effect-v2
-    is_valid, error_msg = _validate_elevenlabs_sound_effect_v2(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для elevenlabs/speech-to-text
-    is_valid, error_msg = _validate_elevenlabs_speech_to_text(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для elevenlabs/text-to-speech-multilingual-v2
-    is_valid, error_msg = _validate_elevenlabs_text_to_speech_multilingual_v2(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для grok-imagine/upscale
-    is_valid, error_msg = _validate_grok_imagine_upscale(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для hailuo/02-text-to-video-pro
-    is_valid, error_msg = _validate_hailuo_02_text_to_video_pro(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для hailuo/02-text-to-video-standard
-    is_valid, error_msg = _validate_hailuo_02_text_to_video_standard(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для hailuo/02-image-to-video-pro
-    is_valid, error_msg = _validate_hailuo_02_image_to_video_pro(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для hailuo/02-image-to-video-standard
-    is_valid, error_msg = _validate_hailuo_02_image_to_video_standard(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для kling/v1-avatar-standard
-    is_valid, error_msg = _validate_kling_v1_avatar_standard(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для kling/ai-avatar-v1-pro
-    is_valid, error_msg = _validate_kling_ai_avatar_v1_pro(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для infinitalk/from-audio
-    is_valid, error_msg = _validate_infinitalk_from_audio(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для hailuo/2-3-image-to-video-pro
-    is_valid, error_msg = _validate_hailuo_2_3_image_to_video_pro(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для hailuo/2-3-image-to-video-standard
-    is_valid, error_msg = _validate_hailuo_2_3_image_to_video_standard(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для sora-2-pro-storyboard
-    is_valid, error_msg = _validate_sora_2_pro_storyboard(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для sora-2-text-to-video (не pro версия!)
-    is_valid, error_msg = _validate_sora_2_text_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для sora-2-image-to-video (не pro версия!)
-    is_valid, error_msg = _validate_sora_2_image_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для sora-2-pro-text-to-video
-    is_valid, error_msg = _validate_sora_2_pro_text_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для sora-2-pro-image-to-video
-    is_valid, error_msg = _validate_sora_2_pro_image_to_video(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для sora-watermark-remover
-    is_valid, error_msg = _validate_sora_watermark_remover(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для topaz/image-upscale
-    is_valid, error_msg = _validate_topaz_image_upscale(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для kling/v2-5-turbo-text-to-video-pro
-    is_valid, error_msg = _validate_kling_v2_5_turbo_text_to_video_pro(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Специфичная валидация для kling/v2-5-turbo-image-to-video-pro
-    is_valid, error_msg = _validate_kling_v2_5_turbo_image_to_video_pro(model_id, normalized_input)
-    if not is_valid:
-        return {}, error_msg
-    
-    # Применяем дефолты для z-image
-    if model_id == "z-image":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации
-    
-    # Применяем дефолты для flux-2/pro-image-to-image
-    if model_id == "flux-2/pro-image-to-image":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "1K"  # Default согласно документации
-    
-    # Применяем дефолты для flux-2/pro-text-to-image
-    if model_id == "flux-2/pro-text-to-image":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "1K"  # Default согласно документации
-    
-    # Применяем дефолты для flux-2/flex-image-to-image
-    if model_id == "flux-2/flex-image-to-image":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "1K"  # Default согласно документации
-    
-    # Применяем дефолты для flux-2/flex-text-to-image
-    if model_id == "flux-2/flex-text-to-image":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "1K"  # Default согласно документации
-    
-    # Применяем дефолты для nano-banana-pro
-    if model_id in ["nano-banana-pro", "google/nano-banana-pro"]:
-        if 'image_input' not in normalized_input:
-            normalized_input['image_input'] = []  # Default согласно документации
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "1K"  # Default согласно документации
-        if 'output_format' not in normalized_input:
-            normalized_input['output_format'] = "png"  # Default согласно документации
-    
-    # Применяем дефолты для bytedance/v1-pro-fast-image-to-video
-    if model_id in ["bytedance/v1-pro-fast-image-to-video", "bytedance-v1-pro-fast-image-to-video", "v1-pro-fast-image-to-video"]:
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "720p"  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-    
-    # Применяем дефолты для grok-imagine/image-to-video
-    if model_id in ["grok-imagine/image-to-video", "grok/imagine"]:
-        if 'index' not in normalized_input:
-            normalized_input['index'] = 0  # Default согласно документации
-        if 'mode' not in normalized_input:
-            normalized_input['mode'] = "normal"  # Default согласно документации
-    
-    # Применяем дефолты для grok-imagine/text-to-video
-    if model_id in ["grok-imagine/text-to-video", "grok/imagine-text-to-video"]:
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "2:3"  # Default согласно документации
-        if 'mode' not in normalized_input:
-            normalized_input['mode'] = "normal"  # Default согласно документации
-    
-    # Применяем дефолты для grok-imagine/text-to-image
-    if model_id in ["grok-imagine/text-to-image", "grok/imagine-text-to-image"]:
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "3:2"  # Default согласно документации (отличается от text-to-video!)
-        # ВАЖНО: Нет параметра mode для text-to-image (в отличие от text-to-video и image-to-video)
-    
-    # Применяем дефолты для hailuo/02-text-to-video-pro
-    if model_id in ["hailuo/02-text-to-video-pro", "hailuo/02-t2v-pro", "hailuo/0.2-text-to-video-pro"]:
-        if 'prompt_optimizer' not in normalized_input:
-            normalized_input['prompt_optimizer'] = True  # Default согласно документации
-    
-    # Применяем дефолты для hailuo/02-text-to-video-standard
-    if model_id in ["hailuo/02-text-to-video-standard", "hailuo/02-t2v-standard", "hailuo/0.2-text-to-video-standard"]:
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "6"  # Default согласно документации
-        if 'prompt_optimizer' not in normalized_input:
-            normalized_input['prompt_optimizer'] = True  # Default согласно документации
-    
-    # Применяем дефолты для hailuo/02-image-to-video-pro
-    if model_id in ["hailuo/02-image-to-video-pro", "hailuo/02-i2v-pro", "hailuo/0.2-image-to-video-pro"]:
-        if 'image_url' not in normalized_input:
-            normalized_input['image_url'] = "https://file.aiquickdraw.com/custom-page/akr/section-images/17585210783150ispzfo7.png"  # Default согласно документации
-        if 'prompt_optimizer' not in normalized_input:
-            normalized_input['prompt_optimizer'] = True  # Default согласно документации
-        # end_image_url опциональный, default "" (пустая строка) - не добавляем если не указан
-    
-    # Применяем дефолты для hailuo/02-image-to-video-standard
-    if model_id in ["hailuo/02-image-to-video-standard", "hailuo/02-i2v-standard", "hailuo/0.2-image-to-video-standard"]:
-        if 'image_url' not in normalized_input:
-            normalized_input['image_url'] = "https://file.aiquickdraw.com/custom-page/akr/section-images/17585207681646umf3lz8.png"  # Default согласно документации
-        if 'end_image_url' not in normalized_input:
-            normalized_input['end_image_url'] = "https://file.aiquickdraw.com/custom-page/akr/section-images/1758521423357w8586uq8.png"  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "10"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "768P"  # Default согласно документации
-        if 'prompt_optimizer' not in normalized_input:
-            normalized_input['prompt_optimizer'] = True  # Default согласно документации
-    
-    # Применяем дефолты для hailuo/2-3-image-to-video-pro
-    if model_id in ["hailuo/2-3-image-to-video-pro", "hailuo/2-3-i2v-pro"]:
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "6"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "768P"  # Default согласно документации
-    
-    # Применяем дефолты для kling/v2-1-master-text-to-video
-    if model_id in ["kling/v2-1-master-text-to-video", "kling-v2-1-master-text-to-video", "v2-1-master-text-to-video"]:
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "16:9"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = "blur, distort, and low quality"  # Default согласно документации
-        if 'cfg_scale' not in normalized_input:
-            normalized_input['cfg_scale'] = 0.5  # Default согласно документации
-    
-    # Применяем дефолты для hailuo/2-3-image-to-video-standard
-    if model_id in ["hailuo/2-3-image-to-video-standard", "hailuo/2-3-i2v-standard"]:
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "6"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "768P"  # Default согласно документации
-    
-    # Применяем дефолты для sora-2-pro-storyboard
-    if canonicalize_model_id(model_id) == "sora-2-pro-storyboard":
-        if 'n_frames' not in normalized_input:
-            normalized_input['n_frames'] = "15"  # Default согласно документации
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "landscape"  # Default согласно документации
-    
-    # Применяем дефолты для sora-2-text-to-video (не pro версия!)
-    if canonicalize_model_id(model_id) == "sora-2-text-to-video":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "landscape"  # Default согласно документации
-        if 'n_frames' not in normalized_input:
-            normalized_input['n_frames'] = "10"  # Default согласно документации
-        if 'remove_watermark' not in normalized_input:
-            normalized_input['remove_watermark'] = True  # Default согласно документации
-        # ВАЖНО: НЕТ параметра size в sora-2-text-to-video (только в pro версии!)
-    
-    # Применяем дефолты для sora-2-image-to-video (не pro версия!)
-    if canonicalize_model_id(model_id) == "sora-2-image-to-video":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "landscape"  # Default согласно документации
-        if 'n_frames' not in normalized_input:
-            normalized_input['n_frames'] = "10"  # Default согласно документации
-        if 'remove_watermark' not in normalized_input:
-            normalized_input['remove_watermark'] = True  # Default согласно документации
-        # ВАЖНО: НЕТ параметра size в sora-2-image-to-video (только в pro версии!)
-    
-    # Применяем дефолты для sora-2-pro-text-to-video
-    if canonicalize_model_id(model_id) == "sora-2-pro-text-to-video":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "landscape"  # Default согласно документации
-        if 'n_frames' not in normalized_input:
-            normalized_input['n_frames'] = "10"  # Default согласно документации
-        if 'size' not in normalized_input:
-            normalized_input['size'] = "standard"  # Default согласно документации
-        if 'remove_watermark' not in normalized_input:
-            normalized_input['remove_watermark'] = True  # Default согласно документации
-    
-    # Применяем дефолты для sora-2-pro-image-to-video
-    if canonicalize_model_id(model_id) == "sora-2-pro-image-to-video":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "landscape"  # Default согласно документации
-        if 'n_frames' not in normalized_input:
-            normalized_input['n_frames'] = "10"  # Default согласно документации
-        if 'size' not in normalized_input:
-            normalized_input['size'] = "standard"  # Default согласно документации (отличается от text-to-video, где "high"!)
-        if 'remove_watermark' not in normalized_input:
-            normalized_input['remove_watermark'] = True  # Default согласно документации
-    
-    # Применяем дефолты для sora-watermark-remover
-    if canonicalize_model_id(model_id) == "sora-watermark-remover":
-        if 'video_url' not in normalized_input:
-            normalized_input['video_url'] = "https://sora.chatgpt.com/p/s_68e83bd7eee88191be79d2ba7158516f"  # Default согласно документации
-    
-    # Применяем дефолты для infinitalk/from-audio
-    if model_id in ["infinitalk/from-audio", "infinitalk-from-audio"]:
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "480p"  # Default согласно документации
-    
-    # Применяем дефолты для elevenlabs/sound-effect-v2
-    if model_id in ["elevenlabs/sound-effect-v2", "elevenlabs-sound-effect-v2"]:
-        if 'loop' not in normalized_input:
-            normalized_input['loop'] = False  # Default согласно документации
-        if 'prompt_influence' not in normalized_input:
-            normalized_input['prompt_influence'] = 0.3  # Default согласно документации
-        if 'output_format' not in normalized_input:
-            normalized_input['output_format'] = "mp3_44100_128"  # Default согласно документации
-    
-    # Применяем дефолты для kling/v2-1-standard
-    if model_id in ["kling/v2-1-standard", "kling-v2-1-standard", "v2-1-standard"]:
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = "blur, distort, and low quality"  # Default согласно документации
-        if 'cfg_scale' not in normalized_input:
-            normalized_input['cfg_scale'] = 0.5  # Default согласно документации
-    
-    # Применяем дефолты для kling/v2-1-pro
-    if model_id in ["kling/v2-1-pro", "kling-v2-1-pro", "v2-1-pro"]:
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = "blur, distort, and low quality"  # Default согласно документации
-        if 'cfg_scale' not in normalized_input:
-            normalized_input['cfg_scale'] = 0.5  # Default согласно документации
-        if 'tail_image_url' not in normalized_input:
-            normalized_input['tail_image_url'] = ""  # Default согласно документации (пустая строка!)
-    
-    # Применяем дефолты для elevenlabs/speech-to-text
-    if model_id in ["elevenlabs/speech-to-text", "elevenlabs-speech-to-text"]:
-        if 'language_code' not in normalized_input:
-            normalized_input['language_code'] = ""  # Default согласно документации
-        if 'tag_audio_events' not in normalized_input:
-            normalized_input['tag_audio_events'] = True  # Default согласно документации
-        if 'diarize' not in normalized_input:
-            normalized_input['diarize'] = True  # Default согласно документации
-    
-    # Применяем дефолты для elevenlabs/text-to-speech-multilingual-v2
-    if model_id in ["elevenlabs/text-to-speech-multilingual-v2", "elevenlabs-text-to-speech-multilingual-v2"]:
-        if 'voice' not in normalized_input:
-            normalized_input['voice'] = "Rachel"  # Default согласно документации
-        if 'stability' not in normalized_input:
-            normalized_input['stability'] = 0.5  # Default согласно документации
-        if 'similarity_boost' not in normalized_input:
-            normalized_input['similarity_boost'] = 0.75  # Default согласно документации
-        if 'style' not in normalized_input:
-            normalized_input['style'] = 0  # Default согласно документации
-        if 'speed' not in normalized_input:
-            normalized_input['speed'] = 1  # Default согласно документации
-        if 'timestamps' not in normalized_input:
-            normalized_input['timestamps'] = False  # Default согласно документации
-        if 'previous_text' not in normalized_input:
-            normalized_input['previous_text'] = ""  # Default согласно документации
-        if 'next_text' not in normalized_input:
-            normalized_input['next_text'] = ""  # Default согласно документации
-        if 'language_code' not in normalized_input:
-            normalized_input['language_code'] = ""  # Default согласно документации
-    
-    # Применяем дефолты для wan/2-2-a14b-text-to-video-turbo
-    if model_id in ["wan/2-2-a14b-text-to-video-turbo", "wan-2-2-a14b-text-to-video-turbo", "wan/2-2-a14b-t2v-turbo", "2-2-a14b-text-to-video-turbo"]:
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "720p"  # Default согласно документации
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "16:9"  # Default согласно документации
-        if 'enable_prompt_expansion' not in normalized_input:
-            normalized_input['enable_prompt_expansion'] = False  # Default согласно документации
-        if 'seed' not in normalized_input:
-            normalized_input['seed'] = 0  # Default согласно документации
-        if 'acceleration' not in normalized_input:
-            normalized_input['acceleration'] = "none"  # Default согласно документации
-    
-    # Применяем дефолты для wan/2-2-a14b-image-to-video-turbo
-    if model_id in ["wan/2-2-a14b-image-to-video-turbo", "wan-2-2-a14b-image-to-video-turbo", "wan/2-2-a14b-i2v-turbo", "2-2-a14b-image-to-video-turbo"]:
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "720p"  # Default согласно документации
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "auto"  # Default согласно документации (ВАЖНО: "auto", а не "16:9"!)
-        if 'enable_prompt_expansion' not in normalized_input:
-            normalized_input['enable_prompt_expansion'] = False  # Default согласно документации
-        if 'seed' not in normalized_input:
-            normalized_input['seed'] = 0  # Default согласно документации
-        if 'acceleration' not in normalized_input:
-            normalized_input['acceleration'] = "none"  # Default согласно документации
-    
-    # Применяем дефолты для wan/2-2-a14b-speech-to-video-turbo
-    if model_id in ["wan/2-2-a14b-speech-to-video-turbo", "wan-2-2-a14b-speech-to-video-turbo"]:
-        if 'num_frames' not in normalized_input:
-            normalized_input['num_frames'] = 80  # Default согласно документации
-        if 'frames_per_second' not in normalized_input:
-            normalized_input['frames_per_second'] = 16  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "480p"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = ""  # Default согласно документации
-        if 'num_inference_steps' not in normalized_input:
-            normalized_input['num_inference_steps'] = 27  # Default согласно документации
-        if 'guidance_scale' not in normalized_input:
-            normalized_input['guidance_scale'] = 3.5  # Default согласно документации
-        if 'shift' not in normalized_input:
-            normalized_input['shift'] = 5  # Default согласно документации
-        if 'enable_safety_checker' not in normalized_input:
-            normalized_input['enable_safety_checker'] = True  # Default согласно документации
-    
-    # Применяем дефолты для bytedance/seedream
-    if model_id in ["bytedance/seedream", "bytedance-seedream", "seedream"]:
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "square_hd"  # Default согласно документации
-        if 'guidance_scale' not in normalized_input:
-            normalized_input['guidance_scale'] = 2.5  # Default согласно документации
-        if 'enable_safety_checker' not in normalized_input:
-            normalized_input['enable_safety_checker'] = True  # Default согласно документации
-    
-    # Применяем дефолты для qwen/image-to-image
-    if model_id in ["qwen/image-to-image", "qwen-image-to-image", "qwen/i2i"]:
-        if 'strength' not in normalized_input:
-            normalized_input['strength'] = 0.8  # Default согласно документации
-        if 'output_format' not in normalized_input:
-            normalized_input['output_format'] = "png"  # Default согласно документации
-        if 'acceleration' not in normalized_input:
-            normalized_input['acceleration'] = "none"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = "blurry, ugly"  # Default согласно документации
-        if 'num_inference_steps' not in normalized_input:
-            normalized_input['num_inference_steps'] = 30  # Default согласно документации
-        if 'guidance_scale' not in normalized_input:
-            normalized_input['guidance_scale'] = 2.5  # Default согласно документации
-        if 'enable_safety_checker' not in normalized_input:
-            normalized_input['enable_safety_checker'] = True  # Default согласно документации
-    
-    # Применяем дефолты для qwen/text-to-image
-    if model_id in ["qwen/text-to-image", "qwen-text-to-image", "qwen/t2i"]:
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "square_hd"  # Default согласно документации
-        if 'num_inference_steps' not in normalized_input:
-            normalized_input['num_inference_steps'] = 30  # Default согласно документации
-        if 'guidance_scale' not in normalized_input:
-            normalized_input['guidance_scale'] = 2.5  # Default согласно документации
-        if 'enable_safety_checker' not in normalized_input:
-            normalized_input['enable_safety_checker'] = True  # Default согласно документации
-        if 'output_format' not in normalized_input:
-            normalized_input['output_format'] = "png"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = " "  # Default согласно документации (пробел!)
-        if 'acceleration' not in normalized_input:
-            normalized_input['acceleration'] = "none"  # Default согласно документации
-    
-    # Применяем дефолты для kling/v2-1-master-image-to-video
-    if model_id in ["kling/v2-1-master-image-to-video", "kling-v2-1-master-image-to-video", "v2-1-master-image-to-video"]:
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = "blur, distort, and low quality"  # Default согласно документации
-        if 'cfg_scale' not in normalized_input:
-            normalized_input['cfg_scale'] = 0.5  # Default согласно документации
-    
-    # Применяем дефолты для google/imagen4-fast
-    if model_id in ["google/imagen4-fast", "google-imagen4-fast", "imagen4-fast", "imagen4/fast"]:
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = ""  # Default согласно документации (пустая строка!)
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "16:9"  # Default согласно документации
-        if 'num_images' not in normalized_input:
-            normalized_input['num_images'] = "1"  # Default согласно документации
-    
-    # Применяем дефолты для google/imagen4-ultra
-    if model_id in ["google/imagen4-ultra", "google-imagen4-ultra", "imagen4-ultra", "imagen4/ultra"]:
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = ""  # Default согласно документации (пустая строка!)
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации (ВАЖНО: "1:1", а не "16:9"!)
-        if 'seed' not in normalized_input:
-            normalized_input['seed'] = ""  # Default согласно документации (пустая строка! ВАЖНО: string, а не number!)
-    
-    # Применяем дефолты для google/imagen4
-    if model_id in ["google/imagen4", "google-imagen4", "imagen4"]:
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = ""  # Default согласно документации (пустая строка!)
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации (ВАЖНО: "1:1", а не "16:9"!)
-        if 'num_images' not in normalized_input:
-            normalized_input['num_images'] = "1"  # Default согласно документации
-        if 'seed' not in normalized_input:
-            normalized_input['seed'] = ""  # Default согласно документации (пустая строка! ВАЖНО: string, а не number!)
-    
-    # Применяем дефолты для google/nano-banana
-    if model_id in ["google/nano-banana", "google-nano-banana", "nano-banana"]:
-        if 'output_format' not in normalized_input:
-            normalized_input['output_format'] = "png"  # Default согласно документации
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "1:1"  # Default согласно документации
-    
-    # Применяем дефолты для google/nano-banana-edit
-    if model_id in ["google/nano-banana-edit", "google-nano-banana-edit", "nano-banana-edit"]:
-        if 'output_format' not in normalized_input:
-            normalized_input['output_format'] = "png"  # Default согласно документации
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "1:1"  # Default согласно документации
-    
-    # Применяем дефолты для qwen/image-edit
-    if model_id in ["qwen/image-edit", "qwen-image-edit", "qwen/edit"]:
-        if 'acceleration' not in normalized_input:
-            normalized_input['acceleration'] = "none"  # Default согласно документации
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "landscape_4_3"  # Default согласно документации
-        if 'num_inference_steps' not in normalized_input:
-            normalized_input['num_inference_steps'] = 25  # Default согласно документации
-        if 'guidance_scale' not in normalized_input:
-            normalized_input['guidance_scale'] = 4  # Default согласно документации
-        if 'sync_mode' not in normalized_input:
-            normalized_input['sync_mode'] = False  # Default согласно документации
-        if 'enable_safety_checker' not in normalized_input:
-            normalized_input['enable_safety_checker'] = True  # Default согласно документации
-        if 'output_format' not in normalized_input:
-            normalized_input['output_format'] = "png"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = "blurry, ugly"  # Default согласно документации
-    
-    # Применяем дефолты для ideogram/character-edit
-    if model_id in ["ideogram/character-edit", "ideogram-character-edit", "character-edit"]:
-        if 'rendering_speed' not in normalized_input:
-            normalized_input['rendering_speed'] = "BALANCED"  # Default согласно документации
-        if 'style' not in normalized_input:
-            normalized_input['style'] = "AUTO"  # Default согласно документации
-        if 'expand_prompt' not in normalized_input:
-            normalized_input['expand_prompt'] = True  # Default согласно документации
-        if 'num_images' not in normalized_input:
-            normalized_input['num_images'] = "1"  # Default согласно документации
-    
-    # Применяем дефолты для ideogram/character-remix
-    if model_id in ["ideogram/character-remix", "ideogram-character-remix", "character-remix"]:
-        if 'rendering_speed' not in normalized_input:
-            normalized_input['rendering_speed'] = "BALANCED"  # Default согласно документации
-        if 'style' not in normalized_input:
-            normalized_input['style'] = "AUTO"  # Default согласно документации
-        if 'expand_prompt' not in normalized_input:
-            normalized_input['expand_prompt'] = True  # Default согласно документации
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "square_hd"  # Default согласно документации
-        if 'num_images' not in normalized_input:
-            normalized_input['num_images'] = "1"  # Default согласно документации
-        if 'strength' not in normalized_input:
-            normalized_input['strength'] = 0.8  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = ""  # Default согласно документации (пустая строка!)
-        if 'image_urls' not in normalized_input:
-            normalized_input['image_urls'] = []  # Default согласно документации
-        if 'reference_mask_urls' not in normalized_input:
-            normalized_input['reference_mask_urls'] = ""  # Default согласно документации (пустая строка!)
-    
-    # Применяем дефолты для ideogram/v3-edit
-    if model_id in ["ideogram/v3-edit", "ideogram-v3-edit", "v3-edit"]:
-        if 'rendering_speed' not in normalized_input:
-            normalized_input['rendering_speed'] = "BALANCED"  # Default согласно документации
-        if 'expand_prompt' not in normalized_input:
-            normalized_input['expand_prompt'] = True  # Default согласно документации
-    
-    # Применяем дефолты для ideogram/v3-remix
-    if model_id in ["ideogram/v3-remix", "ideogram-v3-remix", "v3-remix"]:
-        if 'rendering_speed' not in normalized_input:
-            normalized_input['rendering_speed'] = "BALANCED"  # Default согласно документации
-        if 'style' not in normalized_input:
-            normalized_input['style'] = "AUTO"  # Default согласно документации
-        if 'expand_prompt' not in normalized_input:
-            normalized_input['expand_prompt'] = True  # Default согласно документации
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "square_hd"  # Default согласно документации
-        if 'num_images' not in normalized_input:
-            normalized_input['num_images'] = "1"  # Default согласно документации
-        if 'strength' not in normalized_input:
-            normalized_input['strength'] = 0.8  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = ""  # Default согласно документации (пустая строка!)
-    
-    # Применяем дефолты для ideogram/character
-    if model_id in ["ideogram/character", "ideogram-character", "character"]:
-        if 'rendering_speed' not in normalized_input:
-            normalized_input['rendering_speed'] = "BALANCED"  # Default согласно документации
-        if 'style' not in normalized_input:
-            normalized_input['style'] = "AUTO"  # Default согласно документации
-        if 'expand_prompt' not in normalized_input:
-            normalized_input['expand_prompt'] = True  # Default согласно документации
-        if 'num_images' not in normalized_input:
-            normalized_input['num_images'] = "1"  # Default согласно документации
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "square_hd"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = ""  # Default согласно документации (пустая строка!)
-    
-    # Применяем дефолты для bytedance/v1-pro-fast-image-to-video
-    if model_id in ["bytedance/v1-pro-fast-image-to-video", "bytedance-v1-pro-fast-image-to-video", "v1-pro-fast-image-to-video"]:
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "720p"  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-    
-    # Применяем дефолты для bytedance/v1-lite-text-to-video
-    if model_id in ["bytedance/v1-lite-text-to-video", "bytedance-v1-lite-text-to-video", "v1-lite-text-to-video"]:
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "16:9"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "720p"  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'camera_fixed' not in normalized_input:
-            normalized_input['camera_fixed'] = False  # Default согласно документации
-        if 'enable_safety_checker' not in normalized_input:
-            normalized_input['enable_safety_checker'] = True  # Default согласно документации
-    
-    # Применяем дефолты для bytedance/v1-pro-text-to-video
-    if model_id in ["bytedance/v1-pro-text-to-video", "bytedance-v1-pro-text-to-video", "v1-pro-text-to-video"]:
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "16:9"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "720p"  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'camera_fixed' not in normalized_input:
-            normalized_input['camera_fixed'] = False  # Default согласно документации
-        if 'seed' not in normalized_input:
-            normalized_input['seed'] = -1  # Default согласно документации (случайный seed)
-        if 'enable_safety_checker' not in normalized_input:
-            normalized_input['enable_safety_checker'] = True  # Default согласно документации
-    
-    # Применяем дефолты для bytedance/v1-lite-image-to-video
-    if model_id in ["bytedance/v1-lite-image-to-video", "bytedance-v1-lite-image-to-video", "v1-lite-image-to-video"]:
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "720p"  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'camera_fixed' not in normalized_input:
-            normalized_input['camera_fixed'] = False  # Default согласно документации
-        if 'seed' not in normalized_input:
-            normalized_input['seed'] = -1  # Default согласно документации (случайный seed)
-        if 'enable_safety_checker' not in normalized_input:
-            normalized_input['enable_safety_checker'] = True  # Default согласно документации
-        if 'end_image_url' not in normalized_input:
-            normalized_input['end_image_url'] = ""  # Default согласно документации (пустая строка!)
-    
-    # Применяем дефолты для bytedance/v1-pro-image-to-video
-    if model_id in ["bytedance/v1-pro-image-to-video", "bytedance-v1-pro-image-to-video", "v1-pro-image-to-video"]:
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "720p"  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'camera_fixed' not in normalized_input:
-            normalized_input['camera_fixed'] = False  # Default согласно документации
-        if 'seed' not in normalized_input:
-            normalized_input['seed'] = -1  # Default согласно документации (случайный seed)
-        if 'enable_safety_checker' not in normalized_input:
-            normalized_input['enable_safety_checker'] = True  # Default согласно документации
-    
-    # Применяем дефолты для ideogram/v3-text-to-image
-    if model_id in ["ideogram/v3-text-to-image", "ideogram-v3-text-to-image", "ideogram/v3-t2i", "v3-text-to-image"]:
-        if 'rendering_speed' not in normalized_input:
-            normalized_input['rendering_speed'] = "BALANCED"  # Default согласно документации
-        if 'style' not in normalized_input:
-            normalized_input['style'] = "AUTO"  # Default согласно документации
-        if 'expand_prompt' not in normalized_input:
-            normalized_input['expand_prompt'] = True  # Default согласно документации
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "square_hd"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = ""  # Default согласно документации (пустая строка!)
-    
-    # Применяем дефолты для ideogram/v3-reframe
-    if model_id in ["ideogram/v3-reframe", "ideogram-v3-reframe"]:
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "square_hd"  # Default согласно документации
-        if 'rendering_speed' not in normalized_input:
-            normalized_input['rendering_speed'] = "BALANCED"  # Default согласно документации
-        if 'style' not in normalized_input:
-            normalized_input['style'] = "AUTO"  # Default согласно документации
-        if 'num_images' not in normalized_input:
-            normalized_input['num_images'] = "1"  # Default согласно документации
-        if 'seed' not in normalized_input:
-            normalized_input['seed'] = 0  # Default согласно документации
-    
-    # Применяем дефолты для topaz/image-upscale
-    if model_id in ["topaz/image-upscale", "topaz/image-upscaler", "topaz/upscale"]:
-        if 'image_url' not in normalized_input:
-            normalized_input['image_url'] = "https://static.aiquickdraw.com/tools/example/1762752805607_mErUj1KR.png"  # Default согласно документации
-        if 'upscale_factor' not in normalized_input:
-            normalized_input['upscale_factor'] = "2"  # Default согласно документации
-    
-    # Применяем дефолты для kling/v2-5-turbo-text-to-video-pro
-    if model_id in ["kling/v2-5-turbo-text-to-video-pro", "kling/v2-5-turbo-t2v-pro", "kling/v2.5-turbo-text-to-video-pro"]:
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "16:9"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = "blur, distort, and low quality"  # Default согласно документации
-        if 'cfg_scale' not in normalized_input:
-            normalized_input['cfg_scale'] = 0.5  # Default согласно документации
-    
-    # Применяем дефолты для kling-2.6/image-to-video
-    if model_id == "kling-2.6/image-to-video":
-        if 'sound' not in normalized_input:
-            normalized_input['sound'] = False  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-    
-    # Применяем дефолты для kling-2.6/text-to-video
-    if model_id == "kling-2.6/text-to-video":
-        if 'sound' not in normalized_input:
-            normalized_input['sound'] = False  # Default согласно документации
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-    
-    # Применяем дефолты для kling/v2-5-turbo-text-to-video-pro
-    if model_id in ["kling/v2-5-turbo-text-to-video-pro", "kling/v2-5-turbo-t2v-pro", "kling/v2.5-turbo-text-to-video-pro"]:
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "16:9"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = "blur, distort, and low quality"  # Default согласно документации
-        if 'cfg_scale' not in normalized_input:
-            normalized_input['cfg_scale'] = 0.5  # Default согласно документации
-    
-    # Применяем дефолты для kling/v2-5-turbo-image-to-video-pro
-    if model_id in ["kling/v2-5-turbo-image-to-video-pro", "kling/v2-5-turbo-i2v-pro", "kling/v2.5-turbo-image-to-video-pro"]:
-        if 'image_url' not in normalized_input:
-            normalized_input['image_url'] = "https://file.aiquickdraw.com/custom-page/akr/section-images/1759211376283gfcw5zcy.png"  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = "blur, distort, and low quality"  # Default согласно документации
-        if 'cfg_scale' not in normalized_input:
-            normalized_input['cfg_scale'] = 0.5  # Default согласно документации
-        # tail_image_url опциональный, default "" (пустая строка) - не добавляем если не указан
-    
-    # Применяем дефолты для seedream/4.5-text-to-image
-    if model_id == "seedream/4.5-text-to-image":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации
-        if 'quality' not in normalized_input:
-            normalized_input['quality'] = "basic"  # Default согласно документации
-    
-    # Применяем дефолты для seedream/4.5-edit
-    if model_id == "seedream/4.5-edit":
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "1:1"  # Default согласно документации
-        if 'quality' not in normalized_input:
-            normalized_input['quality'] = "basic"  # Default согласно документации
-    
-    # Применяем дефолты для bytedance/seedream-v4-text-to-image
-    if model_id in ["bytedance/seedream-v4-text-to-image", "seedream-v4-text-to-image", "seedream-v4-t2i"]:
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "square_hd"  # Default согласно документации
-        if 'image_resolution' not in normalized_input:
-            normalized_input['image_resolution'] = "1K"  # Default согласно документации
-        if 'max_images' not in normalized_input:
-            normalized_input['max_images'] = 1  # Default согласно документации
-    
-    # Применяем дефолты для bytedance/seedream-v4-edit
-    if model_id in ["bytedance/seedream-v4-edit", "seedream-v4-edit", "seedream-v4-i2i"]:
-        if 'image_size' not in normalized_input:
-            normalized_input['image_size'] = "square_hd"  # Default согласно документации
-        if 'image_resolution' not in normalized_input:
-            normalized_input['image_resolution'] = "1K"  # Default согласно документации
-        if 'max_images' not in normalized_input:
-            normalized_input['max_images'] = 1  # Default согласно документации
-    
-    # Применяем дефолты для wan/2-6-text-to-video
-    if model_id == "wan/2-6-text-to-video":
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "1080p"  # Default согласно документации
-    
-    # Применяем дефолты для wan/2-5-text-to-video
-    if model_id in ["wan/2-5-text-to-video", "wan/2.5-text-to-video"]:
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'aspect_ratio' not in normalized_input:
-            normalized_input['aspect_ratio'] = "16:9"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "1080p"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = ""  # Default согласно документации (пустая строка)
-        if 'enable_prompt_expansion' not in normalized_input:
-            normalized_input['enable_prompt_expansion'] = True  # Default согласно документации
-    
-    # Применяем дефолты для wan/2-5-image-to-video
-    if model_id in ["wan/2-5-image-to-video", "wan/2.5-image-to-video"]:
-        if 'image_url' not in normalized_input:
-            normalized_input['image_url'] = "https://file.aiquickdraw.com/custom-page/akr/section-images/1758796480945qb63zxq8.webp"  # Default согласно документации
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "1080p"  # Default согласно документации
-        if 'negative_prompt' not in normalized_input:
-            normalized_input['negative_prompt'] = ""  # Default согласно документации (пустая строка)
-        if 'enable_prompt_expansion' not in normalized_input:
-            normalized_input['enable_prompt_expansion'] = True  # Default согласно документации
-    
-    # Применяем дефолты для wan/2-6-image-to-video
-    if model_id == "wan/2-6-image-to-video":
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "1080p"  # Default согласно документации
-    
-    # Применяем дефолты для wan/2-2-animate-replace
-    if model_id in ["wan/2-2-animate-replace", "wan/2.2-animate-replace"]:
-        if 'video_url' not in normalized_input:
-            normalized_input['video_url'] = "https://file.aiquickdraw.com/custom-page/akr/section-images/17586199429271xscyd5d.mp4"  # Default согласно документации
-        if 'image_url' not in normalized_input:
-            normalized_input['image_url'] = "https://file.aiquickdraw.com/custom-page/akr/section-images/17586199255323tks43kq.png"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "480p"  # Default согласно документации
-    
-    # Применяем дефолты для wan/2-2-animate-move
-    if model_id in ["wan/2-2-animate-move", "wan/2.2-animate-move"]:
-        if 'video_url' not in normalized_input:
-            normalized_input['video_url'] = "https://file.aiquickdraw.com/custom-page/akr/section-images/17586254974931y2hottk.mp4"  # Default согласно документации
-        if 'image_url' not in normalized_input:
-            normalized_input['image_url'] = "https://file.aiquickdraw.com/custom-page/akr/section-images/1758625466310wpehpbnf.png"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "480p"  # Default согласно документации
-    
-    # Применяем дефолты для wan/2-6-video-to-video
-    if model_id == "wan/2-6-video-to-video":
-        if 'duration' not in normalized_input:
-            normalized_input['duration'] = "5"  # Default согласно документации
-        if 'resolution' not in normalized_input:
-            normalized_input['resolution'] = "1080p"  # Default согласно документации
-    
+    # Специфичная валидация модели (таблица _VALIDATOR_RULES)
+    for validator in _validators_for(model_id):
+        is_valid, error_msg = validator(model_id, normalized_input)
+        if not is_valid:
+            return {}, error_msg
+
+    # Применяем дефолты модели из документации (таблица _DEFAULTS_RULES)
+    for field_name, default_value in _model_defaults_for(model_id).items():
+        if field_name not in normalized_input:
+            normalized_input[field_name] = copy.copy(default_value)
+
     # Валидируем обязательные поля
     is_valid, error_msg = _check_required_fields(model_type, normalized_input, required_fields)
     if not is_valid:
@@ -0,0 +1,199 @@
+"""
+Индекс скриншотов оплаты для поиска повторно использованных чеков.
+
+* Точное совпадение: ``file_unique_id`` (одинаков для одного и того же файла
+  в Telegram) и, для старых записей, ``file_id`` — словари, O(1).
+* Почти-дубликаты: повторная загрузка того же изображения получает новый
+  file_id/file_unique_id, поэтому к платежу сохраняется перцептивный dHash,
+  а поиск по расстоянию Хэмминга идёт через BK-дерево, не перебирая все
+  платежи.
+
+Индекс живёт в памяти процесса: пополняется при записи платежей, перед
+каждой проверкой догоняется до payments.json по набору ключей (платежи
+других инстансов) и полностью пересобирается раз в
+``PAYMENT_SCREENSHOT_INDEX_RESYNC_SECONDS``.
+БЕЗ зависимостей от bot_kie.py.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 16 → 256-битный хэш: 64 бита слишком грубы для чеков одного банка, у которых
+# одинаковая вёрстка и разные только суммы/время.
+PAYMENT_SCREENSHOT_HASH_SIZE = int(os.getenv("PAYMENT_SCREENSHOT_HASH_SIZE", "16"))
+# Повторное сжатие/масштабирование Telegram даёт 0–4 бита; чеки одного приложения с
+# другой суммой тоже могут быть близки, поэтому совпадение — повод для ручной проверки.
+PAYMENT_SCREENSHOT_MAX_DISTANCE = int(os.getenv("PAYMENT_SCREENSHOT_MAX_DISTANCE", "6"))
+PAYMENT_SCREENSHOT_INDEX_RESYNC_SECONDS = float(os.getenv("PAYMENT_SCREENSHOT_INDEX_RESYNC_SECONDS", "300"))
+
+
+def compute_dhash(image_data: bytes, hash_size: int = PAYMENT_SCREENSHOT_HASH_SIZE) -> str:
+    """Разностный хэш (dHash) изображения в виде hex-строки."""
+    from PIL import Image
+
+    with Image.open(BytesIO(image_data)) as image:
+        # JPEG декодируется сразу в уменьшенном виде — это основная экономия.
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        small = image.convert("L").resize((hash_size + 1, hash_size))
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+
+def hamming_distance(left: int, right: int) -> int:
+    return (left ^ right).bit_count()
+
+
+class BKTree:
+    """BK-дерево по расстоянию Хэмминга; узел хранит хэш и ключи платежей."""
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self) -> None:
+        self._root: Optional[list] = None  # [hash, keys, {distance: child}]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, key: str) -> None:
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [key], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [key], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, str]]:
+        if self._root is None:
+            return []
+        found: List[Tuple[int, str]] = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= radius:
+                found.extend((distance, key) for key in node[1])
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        found.sort()
+        return found
+
+
+class PaymentScreenshotIndex:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._keys: Set[str] = set()
+        self._by_unique_id: Dict[str, str] = {}
+        self._by_file_id: Dict[str, str] = {}
+        self._tree = BKTree()
+        self.built_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _add_locked(self, key: str, payment: Dict[str, Any]) -> None:
+        if key in self._keys or not isinstance(payment, dict):
+            return
+        self._keys.add(key)
+        unique_id = payment.get("screenshot_unique_id")
+        if unique_id:
+            self._by_unique_id.setdefault(str(unique_id), key)
+        file_id = payment.get("screenshot_file_id")
+        if file_id:
+            self._by_file_id.setdefault(str(file_id), key)
+        screenshot_hash = payment.get("screenshot_hash")
+        if screenshot_hash:
+            try:
+                self._tree.add(int(str(screenshot_hash), 16), key)
+            except ValueError:
+                logger.debug("payment_index_bad_hash key=%s hash=%s", key, screenshot_hash)
+
+    def add(self, key: str, payment: Dict[str, Any]) -> None:
+        with self._lock:
+            self._add_locked(str(key), payment)
+
+    def rebuild(self, payments: Dict[str, Any]) -> None:
+        with self._lock:
+            self._keys = set()
+            self._by_unique_id = {}
+            self._by_file_id = {}
+            self._tree = BKTree()
+            for key, payment in (payments or {}).items():
+                self._add_locked(str(key), payment)
+            self.built_at = time.monotonic()
+        logger.info("PAYMENT_INDEX rebuilt payments=%s hashed=%s", len(self._keys), len(self._tree))
+
+    def sync(self, payments: Dict[str, Any]) -> None:
+        """Догнать индекс до переданного payments.json; полный обход только если платежи удалялись."""
+        with self._lock:
+            keys = {str(key) for key in payments}
+            if self.built_at is None or not self._keys <= keys:
+                self.rebuild(payments)
+                return
+            for key in payments:
+                if str(key) not in self._keys:
+                    self._add_locked(str(key), payments[key])
+
+    def is_stale(self, resync_seconds: float = PAYMENT_SCREENSHOT_INDEX_RESYNC_SECONDS) -> bool:
+        return self.built_at is None or time.monotonic() - self.built_at >= resync_seconds
+
+    def find_exact(self, *, unique_id: Optional[str] = None, file_id: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            if unique_id and unique_id in self._by_unique_id:
+                return self._by_unique_id[unique_id]
+            if file_id and file_id in self._by_file_id:
+                return self._by_file_id[file_id]
+        return None
+
+    def find_similar(
+        self,
+        screenshot_hash: Optional[str],
+        max_distance: int = PAYMENT_SCREENSHOT_MAX_DISTANCE,
+    ) -> List[Tuple[int, str]]:
+        """[(distance, payment_key)] по возрастанию расстояния."""
+        if not screenshot_hash:
+            return []
+        try:
+            value = int(screenshot_hash, 16)
+        except ValueError:
+            return []
+        with self._lock:
+            return self._tree.search(value, max_distance)
+
+
+_index: Optional[PaymentScreenshotIndex] = None
+
+
+def get_payment_index() -> PaymentScreenshotIndex:
+    global _index
+    if _index is None:
+        _index = PaymentScreenshotIndex()
+    return _index
+
+
+def reset_payment_index() -> None:
+    """Сбросить индекс (для тестов)."""
+    global _index
+    _index = None
@@ -0,0 +1,306 @@
+"""
+Внешние хранилища для SessionStore (Redis / Postgres).
+
+Бэкенд хранит для каждого пользователя JSON-сессию и целочисленную версию.
+save() выполняет compare-and-set: запись проходит только если версия в
+хранилище равна ожидаемой, иначе поднимается SessionVersionConflict.
+TTL продлевается при каждой записи.
+
+SESSION_BACKEND=memory (по умолчанию) | redis | postgres
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Protocol, Tuple
+
+from app.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").strip().lower()
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "86400"))
+SESSION_BACKEND_TIMEOUT_SECONDS = float(os.getenv("SESSION_BACKEND_TIMEOUT_SECONDS", "1.5"))
+
+
+class SessionVersionConflict(RuntimeError):
+    """Сессия была изменена другим воркером после чтения."""
+
+    def __init__(self, user_id: int, expected: int, actual: int):
+        super().__init__(f"session version conflict user_id={user_id} expected={expected} actual={actual}")
+        self.user_id = user_id
+        self.expected = expected
+        self.actual = actual
+
+
+class SessionBackend(Protocol):
+    name: str
+
+    async def load(self, user_id: int) -> Optional[Tuple[Dict[str, Any], int]]:
+        ...
+
+    async def save(self, user_id: int, session: Dict[str, Any], expected_version: int, ttl_seconds: int) -> int:
+        ...
+
+    async def delete(self, user_id: int) -> None:
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+def encode_session(session: Dict[str, Any]) -> str:
+    return json.dumps(session, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _tenant() -> str:
+    return os.getenv("BOT_INSTANCE_ID", "").strip() or os.getenv("PARTNER_ID", "").strip() or "default"
+
+
+class InMemorySessionBackend:
+    """Версионированное хранилище в памяти процесса (тесты и single-worker)."""
+
+    name = "memory"
+
+    def __init__(self, time_fn=time.monotonic) -> None:
+        self._rows: Dict[int, Tuple[str, int, float]] = {}
+        self._time_fn = time_fn
+
+    async def load(self, user_id: int) -> Optional[Tuple[Dict[str, Any], int]]:
+        row = self._rows.get(user_id)
+        if row is None:
+            return None
+        payload, version, expires_at = row
+        if expires_at <= self._time_fn():
+            self._rows.pop(user_id, None)
+            return None
+        return json.loads(payload), version
+
+    async def save(self, user_id: int, session: Dict[str, Any], expected_version: int, ttl_seconds: int) -> int:
+        current = await self.load(user_id)
+        actual = current[1] if current else 0
+        if actual != expected_version:
+            raise SessionVersionConflict(user_id, expected_version, actual)
+        version = actual + 1
+        self._rows[user_id] = (encode_session(session), version, self._time_fn() + ttl_seconds)
+        return version
+
+    async def delete(self, user_id: int) -> None:
+        self._rows.pop(user_id, None)
+
+    async def close(self) -> None:
+        return None
+
+
+# KEYS[1]=session key; ARGV: expected version, payload, ttl
+_REDIS_CAS_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'v') or '0')
+if current ~= tonumber(ARGV[1]) then
+  return -1 - current
+end
+local version = current + 1
+redis.call('HSET', KEYS[1], 'v', version, 'd', ARGV[2])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return version
+"""
+
+
+class RedisSessionBackend:
+    """Сессии в Redis: HASH {v, d} с EXPIRE; CAS через Lua-скрипт."""
+
+    name = "redis"
+
+    def __init__(self, client: Any = None, *, key_prefix: Optional[str] = None) -> None:
+        self._client = client
+        self._key_prefix = key_prefix or f"session:tenant:{_tenant()}:"
+        self._script = None
+
+    async def _get_client(self) -> Any:
+        if self._client is None:
+            from app.utils.distributed_lock import get_redis_client
+
+            self._client = await get_redis_client()
+            if self._client is None:
+                raise RuntimeError("SESSION_BACKEND=redis but Redis is not available (REDIS_URL)")
+        return self._client
+
+    def _key(self, user_id: int) -> str:
+        return f"{self._key_prefix}{user_id}"
+
+    async def load(self, user_id: int) -> Optional[Tuple[Dict[str, Any], int]]:
+        client = await self._get_client()
+        version, payload = await asyncio.wait_for(
+            client.hmget(self._key(user_id), "v", "d"),
+            timeout=SESSION_BACKEND_TIMEOUT_SECONDS,
+        )
+        if version is None or payload is None:
+            return None
+        return json.loads(payload), int(version)
+
+    async def save(self, user_id: int, session: Dict[str, Any], expected_version: int, ttl_seconds: int) -> int:
+        client = await self._get_client()
+        if self._script is None:
+            self._script = client.register_script(_REDIS_CAS_SCRIPT)
+        result = int(
+            await asyncio.wait_for(
+                self._script(keys=[self._key(user_id)], args=[expected_version, encode_session(session), ttl_seconds]),
+                timeout=SESSION_BACKEND_TIMEOUT_SECONDS,
+            )
+        )
+        if result < 0:
+            raise SessionVersionConflict(user_id, expected_version, -1 - result)
+        return result
+
+    async def delete(self, user_id: int) -> None:
+        client = await self._get_client()
+        await asyncio.wait_for(client.delete(self._key(user_id)), timeout=SESSION_BACKEND_TIMEOUT_SECONDS)
+
+    async def close(self) -> None:
+        # Клиент общий с distributed_lock и закрывается там.
+        return None
+
+
+class PostgresSessionBackend:
+    """Сессии в таблице bot_sessions (partner_id, user_id) с version и expires_at."""
+
+    name = "postgres"
+
+    def __init__(self, dsn: Optional[str] = None, *, pool: Any = None) -> None:
+        self._dsn = dsn or os.getenv("DATABASE_URL", "").strip()
+        self._pool = pool
+        self._schema_ready = False
+        self._partner_id = _tenant()
+
+    async def _get_pool(self) -> Any:
+        if self._pool is None:
+            if not self._dsn:
+                raise RuntimeError("SESSION_BACKEND=postgres but DATABASE_URL is not set")
+            import asyncpg
+
+            self._pool = await asyncpg.create_pool(self._dsn, min_size=1, max_size=4)
+        if not self._schema_ready:
+            async with self._pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS bot_sessions (
+                        partner_id TEXT NOT NULL,
+                        user_id    BIGINT NOT NULL,
+                        payload    JSONB NOT NULL,
+                        version    BIGINT NOT NULL,
+                        expires_at TIMESTAMPTZ NOT NULL,
+                        PRIMARY KEY (partner_id, user_id)
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_bot_sessions_expires_at
+                        ON bot_sessions(expires_at);
+                    """
+                )
+            self._schema_ready = True
+        return self._pool
+
+    async def load(self, user_id: int) -> Optional[Tuple[Dict[str, Any], int]]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT payload, version FROM bot_sessions
+                WHERE partner_id = $1 AND user_id = $2 AND expires_at > now()
+                """,
+                self._partner_id,
+                user_id,
+                timeout=SESSION_BACKEND_TIMEOUT_SECONDS,
+            )
+        if row is None:
+            return None
+        payload = row["payload"]
+        return (json.loads(payload) if isinstance(payload, str) else dict(payload)), int(row["version"])
+
+    async def save(self, user_id: int, session: Dict[str, Any], expected_version: int, ttl_seconds: int) -> int:
+        pool = await self._get_pool()
+        payload = encode_session(session)
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow(
+                    """
+                    SELECT version, expires_at <= now() AS expired FROM bot_sessions
+                    WHERE partner_id = $1 AND user_id = $2
+                    FOR UPDATE
+                    """,
+                    self._partner_id,
+                    user_id,
+                    timeout=SESSION_BACKEND_TIMEOUT_SECONDS,
+                )
+                # Истёкшая строка считается отсутствующей (version 0).
+                actual = 0 if row is None or row["expired"] else int(row["version"])
+                if actual != expected_version:
+                    raise SessionVersionConflict(user_id, expected_version, actual)
+                version = actual + 1
+                if row is None:
+                    try:
+                        await conn.execute(
+                            """
+                            INSERT INTO bot_sessions (partner_id, user_id, payload, version, expires_at)
+                            VALUES ($1, $2, $3::jsonb, $4, now() + make_interval(secs => $5))
+                            """,
+                            self._partner_id,
+                            user_id,
+                            payload,
+                            version,
+                            float(ttl_seconds),
+                        )
+                    except Exception as exc:
+                        if type(exc).__name__ == "UniqueViolationError":
+                            raise SessionVersionConflict(user_id, expected_version, -1) from exc
+                        raise
+                else:
+                    await conn.execute(
+                        """
+                        UPDATE bot_sessions
+                        SET payload = $3::jsonb, version = $4, expires_at = now() + make_interval(secs => $5)
+                        WHERE partner_id = $1 AND user_id = $2
+                        """,
+                        self._partner_id,
+                        user_id,
+                        payload,
+                        version,
+                        float(ttl_seconds),
+                    )
+        return int(version)
+
+    async def delete(self, user_id: int) -> None:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "DELETE FROM bot_sessions WHERE partner_id = $1 AND user_id = $2",
+                self._partner_id,
+                user_id,
+            )
+
+    async def prune_expired(self) -> int:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            result = await conn.execute("DELETE FROM bot_sessions WHERE expires_at <= now()")
+        try:
+            return int(str(result).split()[-1])
+        except (ValueError, IndexError):
+            return 0
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+def create_session_backend(kind: Optional[str] = None) -> Optional[SessionBackend]:
+    """Бэкенд по SESSION_BACKEND; None для memory (локальный dict и есть хранилище)."""
+    kind = (kind or SESSION_BACKEND or "memory").strip().lower()
+    if kind in {"", "memory"}:
+        return None
+    if kind == "redis":
+        return RedisSessionBackend()
+    if kind in {"postgres", "postgresql", "pg"}:
+        return PostgresSessionBackend()
+    logger.warning("SESSION_BACKEND_UNKNOWN value=%s fallback=memory", kind)
+    return None
@@ -4,20 +4,60 @@ SessionStore: единый источник правды для runtime session
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import os
+import time
 from typing import Any, Dict, Optional
 
+from app.session_backends import (
+    SESSION_TTL_SECONDS,
+    SessionBackend,
+    SessionVersionConflict,
+    create_session_backend,
+    encode_session,
+)
 from app.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+SESSION_EXPIRE_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_EXPIRE_SWEEP_INTERVAL_SECONDS", "60"))
+
 _DEFAULT_SESSION_DATA: Dict[int, Dict[str, Any]] = {}
 
 
 class SessionStore:
     """Thin wrapper around session dict with structured logging."""
 
-    def __init__(self, store: Dict[int, Dict[str, Any]]):
+    def __init__(self, store: Dict[int, Dict[str, Any]], *, ttl_seconds: float = SESSION_TTL_SECONDS):
         self._store = store
+        self._ttl_seconds = ttl_seconds
+        self._touched: Dict[int, float] = {}
+        self._next_sweep = time.monotonic() + SESSION_EXPIRE_SWEEP_INTERVAL_SECONDS
+
+    def _touch(self, user_id: int) -> None:
+        now = time.monotonic()
+        self._touched[user_id] = now
+        if now >= self._next_sweep:
+            self._next_sweep = now + SESSION_EXPIRE_SWEEP_INTERVAL_SECONDS
+            self.expire_idle(now=now)
+
+    def expire_idle(self, ttl_seconds: Optional[float] = None, *, now: Optional[float] = None) -> int:
+        """Drop sessions not accessed for ``ttl_seconds`` (default SESSION_TTL_SECONDS)."""
+        ttl = self._ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0:
+            return 0
+        now = time.monotonic() if now is None else now
+        for user_id in self._store.keys() - self._touched.keys():
+            # Сессии, созданные в обход SessionStore, отсчитывают TTL с момента обнаружения.
+            self._touched[user_id] = now
+        expired = [user_id for user_id, touched in self._touched.items() if now - touched > ttl]
+        for user_id in expired:
+            self._touched.pop(user_id, None)
+            self._store.pop(user_id, None)
+        if expired:
+            logger.info("SESSION_EXPIRED count=%s ttl_s=%s remaining=%s", len(expired), int(ttl), len(self._store))
+        return len(expired)
 
     @property
     def data(self) -> Dict[int, Dict[str, Any]]:
@@ -29,6 +69,7 @@ class SessionStore:
     def __getitem__(self, user_id: int) -> Dict[str, Any]:
         if user_id in self._store:
             session = self._store[user_id]
+            self._touch(user_id)
             self._log("SESSION_GET", user_id, session)
             return session
         self._log("SESSION_MISS", user_id, None)
@@ -36,6 +77,7 @@ class SessionStore:
 
     def __setitem__(self, user_id: int, session: Dict[str, Any]) -> None:
         self._store[user_id] = session
+        self._touch(user_id)
         self._log("SESSION_SET", user_id, session)
 
     def __delitem__(self, user_id: int) -> None:
@@ -52,16 +94,19 @@ class SessionStore:
         if session is None or session is default:
             self._log("SESSION_MISS", user_id, None)
         else:
+            self._touch(user_id)
             self._log("SESSION_GET", user_id, session)
         return session
 
     def set(self, user_id: int, session: Dict[str, Any]) -> Dict[str, Any]:
         self._store[user_id] = session
+        self._touch(user_id)
         self._log("SESSION_SET", user_id, session)
         return session
 
     def ensure(self, user_id: int) -> Dict[str, Any]:
         session = self._store.get(user_id)
+        self._touch(user_id)
         if session is None:
             session = {}
             self._store[user_id] = session
@@ -71,6 +116,7 @@ class SessionStore:
         return session
 
     def clear(self, user_id: int) -> None:
+        self._touched.pop(user_id, None)
         if user_id in self._store:
             self._store.pop(user_id, None)
             self._log("SESSION_SET", user_id, {})
@@ -78,6 +124,7 @@ class SessionStore:
             self._log("SESSION_MISS", user_id, None)
 
     def pop(self, user_id: int, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        self._touched.pop(user_id, None)
         session = self._store.pop(user_id, default)
         if session is default or session is None:
             self._log("SESSION_MISS", user_id, None)
@@ -86,6 +133,7 @@ class SessionStore:
         return session
 
     def setdefault(self, user_id: int, default: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self._touch(user_id)
         if user_id in self._store:
             session = self._store[user_id]
             self._log("SESSION_GET", user_id, session)
@@ -135,6 +183,173 @@ class SessionStore:
 
 _SESSION_STORE = SessionStore(_DEFAULT_SESSION_DATA)
 
+
+def _fingerprint(session: Optional[Dict[str, Any]]) -> Optional[str]:
+    if session is None:
+        return None
+    return hashlib.blake2b(encode_session(session).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SessionWriteBack:
+    """Per-update sync between the local SessionStore and an external backend.
+
+    hydrate() loads the user's session before the update is handled (in place,
+    so references held by handlers stay valid); flush() writes it back only if
+    its content changed, using the version read at hydrate time. A concurrent
+    write by another worker raises SessionVersionConflict: the local changes
+    are dropped and the stored copy is adopted.
+    """
+
+    def __init__(self, store: SessionStore, backend: SessionBackend, *, ttl_seconds: int = SESSION_TTL_SECONDS):
+        self.store = store
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._versions: Dict[int, int] = {}
+        self._fingerprints: Dict[int, Optional[str]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._stats = {"loads": 0, "writes": 0, "clean_skips": 0, "conflicts": 0, "errors": 0}
+
+    def _lock_for(self, user_id: int) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    def _adopt(self, user_id: int, remote: Optional[tuple]) -> None:
+        local = self.store.data.get(user_id)
+        if remote is None:
+            if self._versions.get(user_id, 0) > 0:
+                # Истекла по TTL или удалена другим воркером.
+                self.store.data.pop(user_id, None)
+            self._versions[user_id] = 0
+            self._fingerprints[user_id] = None
+            return
+        data, version = remote
+        if version != self._versions.get(user_id) or local is None:
+            if isinstance(local, dict):
+                local.clear()
+                local.update(data)
+            else:
+                self.store.data[user_id] = data
+            self._versions[user_id] = version
+        self._fingerprints[user_id] = _fingerprint(data)
+
+    async def hydrate(self, user_id: int) -> None:
+        async with self._lock_for(user_id):
+            try:
+                remote = await self.backend.load(user_id)
+            except Exception as exc:
+                self._stats["errors"] += 1
+                logger.warning("SESSION_BACKEND_LOAD_FAILED user_id=%s backend=%s error=%s", user_id, self.backend.name, exc)
+                return
+            self._stats["loads"] += 1
+            self._adopt(user_id, remote)
+
+    async def flush(self, user_id: int) -> bool:
+        """Write the session back if it changed; returns True when a write happened."""
+        async with self._lock_for(user_id):
+            current = self.store.data.get(user_id)
+            fingerprint = _fingerprint(current) if isinstance(current, dict) else None
+            known = user_id in self._fingerprints
+            if (known and fingerprint == self._fingerprints[user_id]) or (not known and current is None):
+                self._stats["clean_skips"] += 1
+                return False
+            expected = self._versions.get(user_id, 0)
+            try:
+                if current is None:
+                    await self.backend.delete(user_id)
+                    self._versions[user_id] = 0
+                else:
+                    self._versions[user_id] = await self.backend.save(user_id, current, expected, self.ttl_seconds)
+                self._fingerprints[user_id] = fingerprint
+                self._stats["writes"] += 1
+                return True
+            except SessionVersionConflict as exc:
+                self._stats["conflicts"] += 1
+                logger.warning(
+                    "METRIC_GAUGE name=session_version_conflict_total value=%s user_id=%s expected=%s actual=%s",
+                    self._stats["conflicts"],
+                    user_id,
+                    exc.expected,
+                    exc.actual,
+                )
+                try:
+                    self._adopt(user_id, await self.backend.load(user_id))
+                except Exception:
+                    logger.warning("SESSION_BACKEND_RELOAD_FAILED user_id=%s", user_id, exc_info=True)
+                return False
+            except Exception as exc:
+                # Остаётся «грязной» и будет записана следующим flush.
+                self._stats["errors"] += 1
+                logger.warning("SESSION_BACKEND_SAVE_FAILED user_id=%s backend=%s error=%s", user_id, self.backend.name, exc)
+                return False
+
+    async def flush_all(self) -> int:
+        written = 0
+        for user_id in list(self.store.data.keys() | self._fingerprints.keys()):
+            if await self.flush(user_id):
+                written += 1
+        return written
+
+    def forget_idle(self) -> None:
+        """Drop version bookkeeping for users whose local session expired."""
+        for user_id in list(self._versions):
+            if user_id not in self.store.data and not self._lock_for(user_id).locked():
+                self._versions.pop(user_id, None)
+                self._fingerprints.pop(user_id, None)
+                self._locks.pop(user_id, None)
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        return {"backend": self.backend.name, "tracked_users": len(self._versions), **self._stats}
+
+
+_session_write_back: Optional[SessionWriteBack] = None
+
+
+def get_session_write_back() -> Optional[SessionWriteBack]:
+    return _session_write_back
+
+
+def configure_session_backend(
+    backend: Optional[SessionBackend] = None,
+    *,
+    store: Optional[SessionStore] = None,
+) -> Optional[SessionWriteBack]:
+    """Attach an external backend to the default store (None: SESSION_BACKEND from env)."""
+    global _session_write_back
+    backend = backend if backend is not None else create_session_backend()
+    _session_write_back = SessionWriteBack(store or _SESSION_STORE, backend) if backend is not None else None
+    if _session_write_back is not None:
+        logger.info("SESSION_BACKEND_CONFIGURED backend=%s ttl_s=%s", backend.name, _session_write_back.ttl_seconds)
+    return _session_write_back
+
+
+def install_session_write_back(application: Any) -> None:
+    """Wrap application.process_update with hydrate/flush of the update's user session."""
+    if getattr(application, "_session_write_back_installed", False):
+        return
+    if _session_write_back is None and configure_session_backend() is None:
+        return
+    original_process_update = application.process_update
+
+    async def _process_update_with_session(update: Any) -> Any:
+        write_back = _session_write_back
+        user = getattr(update, "effective_user", None)
+        user_id = getattr(user, "id", None)
+        if write_back is None or user_id is None:
+            return await original_process_update(update)
+        await write_back.hydrate(user_id)
+        try:
+            return await original_process_update(update)
+        finally:
+            await write_back.flush(user_id)
+
+    try:
+        application.process_update = _process_update_with_session  # type: ignore[assignment]
+        application._session_write_back_installed = True
+    except Exception:
+        logger.debug("SESSION_WRITE_BACK_SKIP reason=readonly_process_update", exc_info=True)
+
 _SESSION_CACHE_KEY = "_session_cache"
 _SESSION_LAST_UPDATE_ID = "_session_last_update_id"
 
@@ -19,6 +19,7 @@ from app.services.user_service import (
     get_admin_remaining as get_admin_remaining_service,
     get_is_admin as get_is_admin_service,
 )
+from app.storage.loop_bridge import run_storage_sync
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +47,7 @@ def _run_async_safe(coro, wrapper_name: str):
     """
     _log_sync_wrapper_call(wrapper_name)
     try:
-        return asyncio.run(coro)
+        return run_storage_sync(coro, label=wrapper_name)
     except Exception as e:
         logger.error(f"Error running async function: {e}", exc_info=True)
         raise
@@ -3,20 +3,17 @@
 from __future__ import annotations
 
 import asyncio
-import concurrent.futures
 
 from app.services.user_service import get_user_balance, set_user_balance
-
-_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+from app.storage.loop_bridge import run_storage_sync
 
 
 def _run_sync(coro):
     try:
         asyncio.get_running_loop()
     except RuntimeError:
-        return asyncio.run(coro)
-    future = _executor.submit(lambda: asyncio.run(coro))
-    return future.result(timeout=5)
+        return run_storage_sync(coro, label="balance_store")
+    return run_storage_sync(coro, timeout=5, label="balance_store")
 
 
 class BalanceStore:
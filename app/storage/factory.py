@@ -10,6 +10,7 @@ from typing import Optional, Set, Awaitable
 
 from app.storage.base import BaseStorage
 from app.storage.postgres_storage import PostgresStorage
+from app.storage.postgres_row_storage import PostgresRowStorage
 from app.storage.json_storage import JsonStorage
 from app.storage.github_storage import GitHubStorage
 from app.storage.hybrid_storage import HybridStorage
@@ -26,6 +27,14 @@ def _resolve_mode(storage_mode: Optional[str]) -> str:
     return os.getenv("STORAGE_MODE", "").strip().lower()
 
 
+def _resolve_pg_layout() -> str:
+    layout = os.getenv("STORAGE_PG_LAYOUT", "document").strip().lower()
+    if layout not in {"document", "rows"}:
+        logger.warning("[STORAGE] invalid STORAGE_PG_LAYOUT=%s, using document", layout)
+        return "document"
+    return layout
+
+
 def _runtime_files() -> Set[str]:
     return {
         "user_balances.json",
@@ -142,10 +151,14 @@ def create_storage(
         return _storage_instance
     if not partner_id:
         raise RuntimeError("BOT_INSTANCE_ID is required for multi-tenant storage")
-    storage = PostgresStorage(database_url, partner_id=partner_id)
+    layout = _resolve_pg_layout()
+    if layout == "rows":
+        storage = PostgresRowStorage(database_url, partner_id=partner_id)
+    else:
+        storage = PostgresStorage(database_url, partner_id=partner_id)
 
     _storage_instance = storage
-    logger.info("[STORAGE] backend=postgres partner_id=%s", partner_id)
+    logger.info("[STORAGE] backend=postgres layout=%s partner_id=%s", layout, partner_id)
     return _storage_instance
 
 
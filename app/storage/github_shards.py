@@ -0,0 +1,71 @@
+"""Shard layout helpers for per-user GitHub storage files.
+
+A sharded logical file such as ``user_balances.json`` is stored as
+``user_balances/shard-XX.json`` plus ``user_balances/_manifest.json``. Keys are
+routed by a stable CRC32 of the user id so every process agrees on placement.
+"""
+from __future__ import annotations
+
+import os
+import zlib
+from typing import Any, Dict, Iterable, List
+
+MANIFEST_NAME = "_manifest.json"
+
+GITHUB_STORAGE_SHARDS = int(os.getenv("GITHUB_STORAGE_SHARDS", "0"))
+GITHUB_SHARDED_FILES_DEFAULT = (
+    "user_balances.json",
+    "user_languages.json",
+    "gift_claimed.json",
+    "hourly_free_usage.json",
+    "referral_free_bank.json",
+)
+
+
+def sharded_files_from_env() -> List[str]:
+    raw = os.getenv("GITHUB_SHARDED_FILES", "")
+    if not raw.strip():
+        return list(GITHUB_SHARDED_FILES_DEFAULT)
+    return [name.strip() for name in raw.split(",") if name.strip()]
+
+
+def shard_dir(filename: str) -> str:
+    return filename[: -len(".json")] if filename.endswith(".json") else filename
+
+
+def shard_index(key: Any, shard_count: int) -> int:
+    return zlib.crc32(str(key).encode("utf-8")) % shard_count
+
+
+def shard_filename(filename: str, index: int) -> str:
+    return f"{shard_dir(filename)}/shard-{index:02d}.json"
+
+
+def manifest_filename(filename: str) -> str:
+    return f"{shard_dir(filename)}/{MANIFEST_NAME}"
+
+
+def shard_filenames(filename: str, shard_count: int) -> List[str]:
+    return [shard_filename(filename, index) for index in range(shard_count)]
+
+
+def logical_filename(filename: str) -> str:
+    """Map ``user_balances/shard-03.json`` back to ``user_balances.json``."""
+    head, sep, tail = filename.rpartition("/")
+    if sep and (tail.startswith("shard-") or tail == MANIFEST_NAME):
+        return f"{head}.json"
+    return filename
+
+
+def split_by_shard(data: Dict[str, Any], shard_count: int) -> List[Dict[str, Any]]:
+    shards: List[Dict[str, Any]] = [{} for _ in range(shard_count)]
+    for key, value in data.items():
+        shards[shard_index(key, shard_count)][key] = value
+    return shards
+
+
+def combine_shards(shards: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    combined: Dict[str, Any] = {}
+    for shard in shards:
+        combined.update(shard)
+    return combined
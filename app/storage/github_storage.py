@@ -19,8 +19,11 @@ from typing import Dict, Any, Optional, List, Callable, Tuple
 
 import aiohttp
 
+from app.storage import github_shards
 from app.storage.base import BaseStorage
+from app.storage.github_write_behind import GitHubWriteBehind
 from app.config_env import resolve_storage_prefix
+from app.integrations.http_clients import create_session
 from app.utils.distributed_lock import distributed_lock
 from app.observability.structured_logs import log_structured_event
 from app.observability.trace import get_correlation_id
@@ -68,6 +71,8 @@ class GitHubStorage(BaseStorage):
         self._sessions_lock = threading.Lock()
         self._stub_enabled = os.getenv("GITHUB_STORAGE_STUB", "0") in ("1", "true", "yes")
         self._stub_store: Dict[str, Tuple[Dict[str, Any], Optional[str]]] = {}
+        # Stub stand-in for the branch head; bumped on every stub commit.
+        self._stub_head = 0
         self._storage_branch_checked = False
         self._storage_branch_lock = asyncio.Lock()
         self._legacy_prefix = self.config.legacy_storage_prefix
@@ -99,6 +104,26 @@ class GitHubStorage(BaseStorage):
             self.referral_free_bank_file,
             self.admin_limits_file,
         }
+        self._write_behind: Optional[GitHubWriteBehind] = None
+        if os.getenv("GITHUB_WRITE_BEHIND", "0").lower() in ("1", "true", "yes"):
+            self._write_behind = GitHubWriteBehind(self._read_for_write_behind, self._commit_with_lock)
+        self._shard_count = max(0, github_shards.GITHUB_STORAGE_SHARDS)
+        self._sharded_files = set(github_shards.sharded_files_from_env()) if self._shard_count > 1 else set()
+        # logical file -> active shard count (0 = single-file layout), resolved once per process.
+        self._shard_layouts: Dict[str, int] = {}
+        # Money-critical files (and the one-time gift / free-bank grants) flush synchronously
+        # even with write-behind enabled.
+        self._durable_files = {
+            self.balances_file,
+            self.payments_file,
+            self.gift_claimed_file,
+            self.referral_free_bank_file,
+        }
+        self._durable_files.update(
+            name.strip()
+            for name in os.getenv("GITHUB_WRITE_BEHIND_DURABLE_FILES", "").split(",")
+            if name.strip()
+        )
 
         logger.info(
             "[STORAGE] mode=github instance=%s prefix=%s repo=%s branch=%s parallel=%s retries=%s timeout=%ss",
@@ -265,7 +290,8 @@ class GitHubStorage(BaseStorage):
                 "Authorization": f"token {self.config.token}",
                 "User-Agent": "TRT-GitHubStorage",
             }
-            session = aiohttp.ClientSession(timeout=timeout, headers=headers)
+            # Настройки пула github (keep-alive, DNS-кэш); сессией по-прежнему владеем мы.
+            session = create_session("github", timeout=timeout, headers=headers)
             with self._sessions_lock:
                 self._sessions[loop_id] = session
                 self._session_loops[loop_id] = loop
@@ -303,7 +329,8 @@ class GitHubStorage(BaseStorage):
         if not entry:
             return None
         age = time.monotonic() - entry.fetched_at
-        ttl = self._read_cache_ttl_hot if filename in self._hot_read_files else self._read_cache_ttl
+        hot = github_shards.logical_filename(filename) in self._hot_read_files
+        ttl = self._read_cache_ttl_hot if hot else self._read_cache_ttl
         if age <= ttl:
             return entry
         return None
@@ -509,6 +536,10 @@ class GitHubStorage(BaseStorage):
     ) -> Tuple[Dict[str, Any], Optional[str]]:
         await self._ensure_storage_branch_exists()
         cache = self._get_request_cache()
+        if not force_refresh and self._write_behind is not None:
+            overlay = self._write_behind.overlay(filename)
+            if overlay is not None:
+                return overlay, None
         if not force_refresh:
             cached = cache.get(filename)
             if cached is not None:
@@ -581,7 +612,12 @@ class GitHubStorage(BaseStorage):
             len(payload_json.encode("utf-8")),
         )
         if self._stub_enabled:
-            sha = f"stub-{int(time.time() * 1000)}"
+            stored = self._stub_store.get(path)
+            if sha and stored is not None and stored[1] != sha:
+                # Same answer the Contents API gives for a stale blob SHA.
+                raise GitHubConflictError(f"GitHub write conflict for {path}")
+            self._stub_head += 1
+            sha = f"stub-{self._stub_head}"
             self._stub_store[path] = (data, sha)
             logger.info("[GITHUB] write_ok path=%s status=stub", path)
             return sha
@@ -640,6 +676,37 @@ class GitHubStorage(BaseStorage):
         self,
         filename: str,
         update_fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+        *,
+        durable: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        if self._write_behind is None:
+            return await self._commit_update_json(filename, update_fn)
+        if durable is None:
+            durable = github_shards.logical_filename(filename) in self._durable_files
+        return await self._write_behind.apply(filename, update_fn, durable=durable)
+
+    async def _read_for_write_behind(self, filename: str) -> Dict[str, Any]:
+        data, _ = await self._read_json(filename, force_refresh=True)
+        return data
+
+    async def flush_pending_writes(self, filename: Optional[str] = None) -> None:
+        """Commit buffered write-behind updates (all files when ``filename`` is None)."""
+        if self._write_behind is None:
+            return
+        if filename is None:
+            await self._write_behind.flush_all()
+        else:
+            await self._write_behind.flush(filename)
+
+    def write_behind_metrics(self) -> Dict[str, Any]:
+        if self._write_behind is None:
+            return {"enabled": False}
+        return {"enabled": True, **self._write_behind.snapshot()}
+
+    async def _commit_update_json(
+        self,
+        filename: str,
+        update_fn: Callable[[Dict[str, Any]], Dict[str, Any]],
     ) -> Dict[str, Any]:
         lock = self._get_write_lock(filename)
         async with lock:
@@ -807,7 +874,8 @@ class GitHubStorage(BaseStorage):
         return True
 
     async def close(self) -> None:
-        """Close shared resources (aiohttp session)."""
+        """Flush buffered writes and close shared resources (aiohttp session)."""
+        await self.flush_pending_writes()
         await self._close_all_sessions(reason="close")
 
     def test_connection(self) -> bool:
@@ -823,7 +891,7 @@ class GitHubStorage(BaseStorage):
                 "Authorization": f"token {self.config.token}",
                 "User-Agent": "TRT-GitHubStorage",
             }
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
+            async with create_session("github", timeout=timeout, headers=headers) as session:
                 async with session.get(url, params={"ref": self.config.storage_branch}) as response:
                     if response.status not in (200, 404):
                         payload = await response.text()
@@ -878,6 +946,278 @@ class GitHubStorage(BaseStorage):
             )
             return False
 
+    # ==================== SHARDED LAYOUT ====================
+
+    async def _shard_count_for(self, filename: str) -> int:
+        """Active shard count for a logical file; 0 means the single-file layout."""
+        if filename not in self._sharded_files:
+            return 0
+        cached = self._shard_layouts.get(filename)
+        if cached is not None:
+            return cached
+        await self._ensure_storage_branch_exists()
+        manifest_name = github_shards.manifest_filename(filename)
+        manifest, _, status = await self._fetch_json_payload(manifest_name)
+        count = int(manifest.get("shards") or 0) if status == 200 else 0
+        if count <= 0:
+            _, _, legacy_status = await self._fetch_json_payload(filename)
+            if legacy_status == 200:
+                logger.warning(
+                    "[GITHUB] shard_layout=single path=%s reason=not_migrated hint=scripts/migrate_github_shards.py",
+                    self._storage_path(filename),
+                )
+            else:
+                count = self._shard_count
+                manifest = {"shards": count, "created_at": datetime.now().isoformat()}
+                try:
+                    await self._write_json(manifest_name, manifest, None)
+                except Exception as exc:
+                    # Another instance created it first; trust what is stored.
+                    logger.info("[GITHUB] shard_manifest_create_conflict path=%s error=%s", manifest_name, exc)
+                    manifest, _, _ = await self._fetch_json_payload(manifest_name)
+                    count = int(manifest.get("shards") or count)
+        self._shard_layouts[filename] = count
+        logger.info("[GITHUB] shard_layout file=%s shards=%s", filename, count)
+        return count
+
+    async def _user_file(self, filename: str, user_id: Any) -> str:
+        count = await self._shard_count_for(filename)
+        if not count:
+            return filename
+        return github_shards.shard_filename(filename, github_shards.shard_index(str(user_id), count))
+
+    async def _read_shards(
+        self,
+        filename: str,
+        count: int,
+        *,
+        force_refresh: bool = False,
+    ) -> List[Dict[str, Any]]:
+        versions = await self._read_shard_versions(filename, count, force_refresh=force_refresh)
+        return [data for data, _ in versions]
+
+    async def _read_shard_versions(
+        self,
+        filename: str,
+        count: int,
+        *,
+        force_refresh: bool = False,
+    ) -> List[Tuple[Dict[str, Any], Optional[str]]]:
+        return list(
+            await asyncio.gather(
+                *(
+                    self._read_json(name, force_refresh=force_refresh)
+                    for name in github_shards.shard_filenames(filename, count)
+                )
+            )
+        )
+
+    async def _read_branch_head(self) -> Optional[str]:
+        """Commit SHA the storage branch points at right now."""
+        if self._stub_enabled:
+            return f"stub-head-{self._stub_head}"
+        branch = self.config.storage_branch
+        ref_response = await self._request_with_retry(
+            "GET",
+            self._git_url(f"ref/heads/{branch}"),
+            op="tree_ref",
+            path=branch,
+            ok_statuses=(200,),
+        )
+        return self._parse_json(ref_response.text).get("object", {}).get("sha")
+
+    async def _update_sharded(
+        self,
+        filename: str,
+        count: int,
+        update_fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+        *,
+        replace: bool = False,
+    ) -> Dict[str, Any]:
+        names = github_shards.shard_filenames(filename, count)
+        for name in names:
+            await self.flush_pending_writes(name)
+        last_error: Optional[Exception] = None
+        for attempt in range(1, self.config.max_retries + 1):
+            # Head first: a commit landing after it makes our tree commit a non fast-forward.
+            parent_sha = await self._read_branch_head()
+            versions = await self._read_shard_versions(filename, count, force_refresh=True)
+            current = [data for data, _ in versions]
+            combined = github_shards.combine_shards(current)
+            updated = update_fn(dict(combined))
+            merged = updated if replace else self._merge_json(combined, updated)
+            new_shards = github_shards.split_by_shard(merged, count)
+            changed = {
+                names[index]: shard
+                for index, shard in enumerate(new_shards)
+                if shard != current[index]
+            }
+            if not changed:
+                return merged
+            shas = {names[index]: sha for index, (_, sha) in enumerate(versions) if names[index] in changed}
+            try:
+                await self._commit_files(
+                    changed,
+                    message=f"storage update {self._storage_path(filename)}",
+                    shas=shas,
+                    parent_sha=parent_sha,
+                )
+                return merged
+            except GitHubConflictError as exc:
+                last_error = exc
+                logger.warning(
+                    "[GITHUB] write_retry attempt=%s path=%s reason=conflict shards=%s",
+                    attempt,
+                    self._storage_path(filename),
+                    len(changed),
+                )
+                await self._backoff(attempt)
+        raise RuntimeError("Exceeded GitHub write retries") from last_error
+
+    async def _commit_files(
+        self,
+        files: Dict[str, Dict[str, Any]],
+        *,
+        message: str,
+        shas: Optional[Dict[str, Optional[str]]] = None,
+        parent_sha: Optional[str] = None,
+    ) -> None:
+        """Write several files; more than one goes out as a single Git Trees commit.
+
+        ``shas`` and ``parent_sha`` are the blob and branch versions the caller
+        read the data from; a write on top of anything newer raises
+        ``GitHubConflictError`` so the caller can re-read and retry.
+        """
+        if len(files) == 1:
+            (filename, data), = files.items()
+            if shas is not None and filename in shas:
+                sha = shas[filename]
+            else:
+                _, sha = await self._read_json(filename, force_refresh=True)
+            new_sha = await self._write_json(filename, data, sha)
+            self._set_request_cache(filename, data, new_sha or sha)
+            return
+        await self._ensure_storage_branch_exists()
+        branch = self.config.storage_branch
+        if self._stub_enabled:
+            if parent_sha is not None and parent_sha != f"stub-head-{self._stub_head}":
+                raise GitHubConflictError(f"GitHub tree commit conflict on {branch}")
+            self._stub_head += 1
+            for filename, data in files.items():
+                sha = f"stub-{self._stub_head}"
+                self._stub_store[self._storage_path(filename)] = (data, sha)
+                self._set_request_cache(filename, data, sha)
+                self._set_read_cache(filename, data, sha)
+            logger.info("[GITHUB] tree_commit_ok files=%s status=stub", len(files))
+            return
+        if parent_sha is None:
+            parent_sha = await self._read_branch_head()
+        commit_response = await self._request_with_retry(
+            "GET",
+            self._git_url(f"commits/{parent_sha}"),
+            op="tree_parent",
+            path=branch,
+            ok_statuses=(200,),
+        )
+        base_tree = self._parse_json(commit_response.text).get("tree", {}).get("sha")
+        if not parent_sha or not base_tree:
+            raise RuntimeError(f"GitHub tree commit failed: no base for {branch}")
+        entries = [
+            {
+                "path": self._storage_path(filename),
+                "mode": "100644",
+                "type": "blob",
+                "content": json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True),
+            }
+            for filename, data in files.items()
+        ]
+        tree_response = await self._request_with_retry(
+            "POST",
+            self._git_url("trees"),
+            op="tree_create",
+            path=branch,
+            ok_statuses=(201,),
+            json={"base_tree": base_tree, "tree": entries},
+        )
+        tree_sha = self._parse_json(tree_response.text).get("sha")
+        new_commit_response = await self._request_with_retry(
+            "POST",
+            self._git_url("commits"),
+            op="tree_commit",
+            path=branch,
+            ok_statuses=(201,),
+            json={
+                "message": message,
+                "tree": tree_sha,
+                "parents": [parent_sha],
+                "committer": {
+                    "name": self.config.committer_name,
+                    "email": self.config.committer_email,
+                },
+            },
+        )
+        new_commit_sha = self._parse_json(new_commit_response.text).get("sha")
+        if tree_response.status != 201 or new_commit_response.status != 201 or not new_commit_sha:
+            raise RuntimeError(
+                f"GitHub tree commit failed {tree_response.status}/{new_commit_response.status}"
+            )
+        update_response = await self._request_with_retry(
+            "PATCH",
+            self._git_url(f"refs/heads/{branch}"),
+            op="tree_ref_update",
+            path=branch,
+            ok_statuses=(200, 409, 422),
+            json={"sha": new_commit_sha, "force": False},
+        )
+        if update_response.status in (409, 422):
+            # Branch moved since we read it (non fast-forward): caller re-reads and retries.
+            raise GitHubConflictError(f"GitHub tree commit conflict on {branch}")
+        for filename, data in files.items():
+            # Blob SHAs are not returned for nested paths; writes re-read them with force_refresh.
+            self._set_request_cache(filename, data, None)
+            self._set_read_cache(filename, data, None)
+        logger.info("[GITHUB] tree_commit_ok files=%s commit=%s", len(files), new_commit_sha)
+
+    async def migrate_to_shards(
+        self,
+        filename: str,
+        shard_count: Optional[int] = None,
+        *,
+        dry_run: bool = False,
+    ) -> Dict[str, Any]:
+        """Split a single-file document into shards plus manifest in one commit.
+
+        The original file is left in place as a backup; readers switch to the
+        sharded layout once the manifest exists.
+        """
+        count = int(shard_count or self._shard_count)
+        if count < 2:
+            raise ValueError("shard_count must be at least 2")
+        await self._ensure_storage_branch_exists()
+        data, _, status = await self._fetch_json_payload(filename)
+        if status != 200:
+            data = {}
+        shards = github_shards.split_by_shard(data, count)
+        report = {
+            "file": filename,
+            "keys": len(data),
+            "shards": count,
+            "largest_shard_keys": max((len(shard) for shard in shards), default=0),
+            "dry_run": dry_run,
+        }
+        if dry_run:
+            return report
+        files = dict(zip(github_shards.shard_filenames(filename, count), shards))
+        files[github_shards.manifest_filename(filename)] = {
+            "shards": count,
+            "created_at": datetime.now().isoformat(),
+            "migrated_from": self._storage_path(filename),
+        }
+        await self._commit_files(files, message=f"storage shard migration {self._storage_path(filename)}")
+        self._shard_layouts[filename] = count
+        logger.info("[GITHUB] shard_migration_ok file=%s keys=%s shards=%s", filename, len(data), count)
+        return report
+
     # ==================== USER OPERATIONS ====================
 
     async def get_user(self, user_id: int, upsert: bool = True) -> Dict[str, Any]:
@@ -897,7 +1237,7 @@ class GitHubStorage(BaseStorage):
         }
 
     async def get_user_balance(self, user_id: int) -> float:
-        data, _ = await self._read_json(self.balances_file)
+        data, _ = await self._read_json(await self._user_file(self.balances_file, user_id))
         return self._coerce_balance(data.get(str(user_id), 0.0))
 
     async def set_user_balance(self, user_id: int, amount: float) -> None:
@@ -907,7 +1247,7 @@ class GitHubStorage(BaseStorage):
             data[str(user_id)] = safe_amount
             return data
 
-        await self._update_json(self.balances_file, updater)
+        await self._update_json(await self._user_file(self.balances_file, user_id), updater)
 
     async def add_user_balance(self, user_id: int, amount: float) -> float:
         safe_amount = self._coerce_balance(amount)
@@ -917,7 +1257,7 @@ class GitHubStorage(BaseStorage):
             data[str(user_id)] = self._coerce_balance(current + safe_amount)
             return data
 
-        data = await self._update_json(self.balances_file, updater)
+        data = await self._update_json(await self._user_file(self.balances_file, user_id), updater)
         return self._coerce_balance(data.get(str(user_id), 0.0))
 
     async def subtract_user_balance(self, user_id: int, amount: float) -> bool:
@@ -926,6 +1266,8 @@ class GitHubStorage(BaseStorage):
 
         def updater(data: Dict[str, Any]) -> Dict[str, Any]:
             nonlocal success
+            # May run more than once (overlay, conflict retries); the last run wins.
+            success = False
             current = self._coerce_balance(data.get(str(user_id), 0.0))
             if safe_amount <= 0:
                 return data
@@ -934,7 +1276,7 @@ class GitHubStorage(BaseStorage):
                 success = True
             return data
 
-        await self._update_json(self.balances_file, updater)
+        await self._update_json(await self._user_file(self.balances_file, user_id), updater)
         return success
 
     @staticmethod
@@ -948,7 +1290,7 @@ class GitHubStorage(BaseStorage):
         return amount
 
     async def get_user_language(self, user_id: int) -> str:
-        data, _ = await self._read_json(self.languages_file)
+        data, _ = await self._read_json(await self._user_file(self.languages_file, user_id))
         return data.get(str(user_id), "ru")
 
     async def set_user_language(self, user_id: int, language: str) -> None:
@@ -956,10 +1298,10 @@ class GitHubStorage(BaseStorage):
             data[str(user_id)] = language
             return data
 
-        await self._update_json(self.languages_file, updater)
+        await self._update_json(await self._user_file(self.languages_file, user_id), updater)
 
     async def has_claimed_gift(self, user_id: int) -> bool:
-        data, _ = await self._read_json(self.gift_claimed_file)
+        data, _ = await self._read_json(await self._user_file(self.gift_claimed_file, user_id))
         return data.get(str(user_id), False)
 
     async def set_gift_claimed(self, user_id: int) -> None:
@@ -967,7 +1309,7 @@ class GitHubStorage(BaseStorage):
             data[str(user_id)] = True
             return data
 
-        await self._update_json(self.gift_claimed_file, updater)
+        await self._update_json(await self._user_file(self.gift_claimed_file, user_id), updater)
 
     async def get_user_free_generations_today(self, user_id: int) -> int:
         data, _ = await self._read_json(self.free_generations_file)
@@ -1003,7 +1345,7 @@ class GitHubStorage(BaseStorage):
         await self._update_json(self.free_generations_file, updater)
 
     async def get_hourly_free_usage(self, user_id: int) -> Dict[str, Any]:
-        data, _ = await self._read_json(self.hourly_free_usage_file)
+        data, _ = await self._read_json(await self._user_file(self.hourly_free_usage_file, user_id))
         return data.get(str(user_id), {})
 
     async def set_hourly_free_usage(self, user_id: int, window_start_iso: str, used_count: int) -> None:
@@ -1014,10 +1356,10 @@ class GitHubStorage(BaseStorage):
             }
             return data
 
-        await self._update_json(self.hourly_free_usage_file, updater)
+        await self._update_json(await self._user_file(self.hourly_free_usage_file, user_id), updater)
 
     async def get_referral_free_bank(self, user_id: int) -> int:
-        data, _ = await self._read_json(self.referral_free_bank_file)
+        data, _ = await self._read_json(await self._user_file(self.referral_free_bank_file, user_id))
         return int(data.get(str(user_id), 0))
 
     async def set_referral_free_bank(self, user_id: int, remaining_count: int) -> None:
@@ -1025,7 +1367,7 @@ class GitHubStorage(BaseStorage):
             data[str(user_id)] = int(max(0, remaining_count))
             return data
 
-        await self._update_json(self.referral_free_bank_file, updater)
+        await self._update_json(await self._user_file(self.referral_free_bank_file, user_id), updater)
 
     async def get_admin_limit(self, user_id: int) -> float:
         from app.config import get_settings
@@ -1354,7 +1696,11 @@ class GitHubStorage(BaseStorage):
         from app.utils.fault_injection import maybe_inject_sleep
 
         await maybe_inject_sleep("TRT_FAULT_INJECT_STORAGE_SLEEP_MS", label=f"github_storage.read:{filename}")
-        data, _ = await self._read_json(filename)
+        count = await self._shard_count_for(filename)
+        if count:
+            data = github_shards.combine_shards(await self._read_shards(filename, count))
+        else:
+            data, _ = await self._read_json(filename)
         if data:
             return data
         return default or {}
@@ -1363,6 +1709,17 @@ class GitHubStorage(BaseStorage):
         from app.utils.fault_injection import maybe_inject_sleep
 
         await maybe_inject_sleep("TRT_FAULT_INJECT_STORAGE_SLEEP_MS", label=f"github_storage.write:{filename}")
+        # Keep ordering: buffered updates land before the full overwrite.
+        await self.flush_pending_writes(filename)
+        count = await self._shard_count_for(filename)
+        if count:
+            await self._commit_with_lock(
+                filename,
+                lambda _current: dict(data),
+                sharded=count,
+                replace=True,
+            )
+            return
         lock = self._get_write_lock(filename)
         lock_key = f"{self.config.bot_instance_id}:{filename}"
         async with distributed_lock(lock_key, ttl_seconds=15, wait_seconds=3) as lock_result:
@@ -1418,6 +1775,22 @@ class GitHubStorage(BaseStorage):
         from app.utils.fault_injection import maybe_inject_sleep
 
         await maybe_inject_sleep("TRT_FAULT_INJECT_STORAGE_SLEEP_MS", label=f"github_storage.update:{filename}")
+        count = await self._shard_count_for(filename)
+        if count:
+            return await self._commit_with_lock(filename, update_fn, sharded=count)
+        if self._write_behind is not None:
+            # The distributed lock is taken once per flush by _commit_with_lock.
+            return await self._update_json(filename, update_fn)
+        return await self._commit_with_lock(filename, update_fn)
+
+    async def _commit_with_lock(
+        self,
+        filename: str,
+        update_fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+        *,
+        sharded: int = 0,
+        replace: bool = False,
+    ) -> Dict[str, Any]:
         lock_key = f"{self.config.bot_instance_id}:{filename}"
         async with distributed_lock(lock_key, ttl_seconds=15, wait_seconds=3) as lock_result:
             correlation_id = get_correlation_id()
@@ -1438,4 +1811,6 @@ class GitHubStorage(BaseStorage):
             if not lock_result:
                 logger.error("[GITHUB] distributed_lock failed for %s", lock_key)
                 raise RuntimeError(f"Failed to acquire distributed lock for {filename}")
-            return await self._update_json(filename, update_fn)
+            if sharded:
+                return await self._update_sharded(filename, sharded, update_fn, replace=replace)
+            return await self._commit_update_json(filename, update_fn)
@@ -0,0 +1,250 @@
+"""Write-behind buffer that coalesces GitHub storage updates into fewer commits.
+
+Every ``update_fn`` is applied immediately to an in-memory overlay of the file
+(read-your-writes) and queued. A flush replays all queued updaters on the
+freshly read remote document and commits once. Durable (money-critical)
+updates flush synchronously and commit together with whatever is pending.
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+UpdateFn = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+GITHUB_WRITE_BEHIND_MAX_DELAY_SECONDS = float(os.getenv("GITHUB_WRITE_BEHIND_MAX_DELAY_SECONDS", "2.0"))
+GITHUB_WRITE_BEHIND_MAX_PENDING = int(os.getenv("GITHUB_WRITE_BEHIND_MAX_PENDING", "50"))
+
+
+@dataclass
+class _PendingUpdate:
+    update_fn: UpdateFn
+    durable: bool
+    done: bool = False
+    error: Optional[BaseException] = None
+    result: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class _FileBuffer:
+    base: Optional[Dict[str, Any]] = None
+    overlay: Optional[Dict[str, Any]] = None
+    pending: List[_PendingUpdate] = field(default_factory=list)
+    first_pending_at: Optional[float] = None
+    timer_scheduled: bool = False
+    flush_lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def _apply_all(data: Dict[str, Any], updates: List[_PendingUpdate]) -> Dict[str, Any]:
+    for update in updates:
+        data = update.update_fn(data)
+    return data
+
+
+class GitHubWriteBehind:
+    """Per-file coalescing buffer in front of a read/commit pair."""
+
+    def __init__(
+        self,
+        read_fn: Callable[[str], Awaitable[Dict[str, Any]]],
+        commit_fn: Callable[[str, UpdateFn], Awaitable[Dict[str, Any]]],
+        *,
+        max_delay_seconds: float = GITHUB_WRITE_BEHIND_MAX_DELAY_SECONDS,
+        max_pending: int = GITHUB_WRITE_BEHIND_MAX_PENDING,
+    ) -> None:
+        self._read_fn = read_fn
+        self._commit_fn = commit_fn
+        self.max_delay_seconds = max(0.0, float(max_delay_seconds))
+        self.max_pending = max(1, int(max_pending))
+        self._files: Dict[str, _FileBuffer] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, int] = {
+            "updates_applied": 0,
+            "commits": 0,
+            "commits_saved": 0,
+            "flush_failures": 0,
+        }
+
+    def _buffer(self, filename: str) -> _FileBuffer:
+        with self._lock:
+            return self._files.setdefault(filename, _FileBuffer())
+
+    def overlay(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Copy of the pending view of ``filename``, or None when nothing is buffered."""
+        buffer = self._files.get(filename)
+        if buffer is None:
+            return None
+        with self._lock:
+            # Callers mutate what they read; the live overlay must only change through apply().
+            return copy.deepcopy(buffer.overlay) if buffer.overlay is not None else None
+
+    def pending_count(self, filename: Optional[str] = None) -> int:
+        with self._lock:
+            if filename is not None:
+                buffer = self._files.get(filename)
+                return len(buffer.pending) if buffer else 0
+            return sum(len(buffer.pending) for buffer in self._files.values())
+
+    async def apply(self, filename: str, update_fn: UpdateFn, *, durable: bool = False) -> Dict[str, Any]:
+        """Queue ``update_fn``; durable updates return only after their commit."""
+        buffer = self._buffer(filename)
+        with self._lock:
+            needs_base = buffer.overlay is None
+        if needs_base:
+            remote = await self._read_fn(filename)
+            with self._lock:
+                if buffer.overlay is None:
+                    buffer.base = copy.deepcopy(remote)
+                    buffer.overlay = copy.deepcopy(remote)
+        entry = _PendingUpdate(update_fn=update_fn, durable=durable)
+        with self._lock:
+            buffer.overlay = update_fn(buffer.overlay)
+            buffer.pending.append(entry)
+            if buffer.first_pending_at is None:
+                buffer.first_pending_at = time.monotonic()
+            overlay = buffer.overlay
+            pending = len(buffer.pending)
+        if durable:
+            await self.flush(filename)
+            if entry.error is not None:
+                raise entry.error
+            return entry.result if entry.result is not None else overlay
+        if pending >= self.max_pending:
+            try:
+                await self.flush(filename)
+            except Exception:
+                # The update is requeued and visible in the overlay; the timer retries the commit.
+                self._schedule_flush(filename, buffer)
+        else:
+            self._schedule_flush(filename, buffer)
+        return overlay
+
+    def _schedule_flush(self, filename: str, buffer: _FileBuffer) -> None:
+        with self._lock:
+            if buffer.timer_scheduled or not buffer.pending:
+                return
+            buffer.timer_scheduled = True
+        task = asyncio.get_running_loop().create_task(self._flush_later(filename, buffer))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush_later(self, filename: str, buffer: _FileBuffer) -> None:
+        reschedule = False
+        try:
+            while True:
+                with self._lock:
+                    started = buffer.first_pending_at
+                if started is None:
+                    break
+                remaining = self.max_delay_seconds - (time.monotonic() - started)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                try:
+                    await self.flush(filename)
+                    break
+                except Exception:
+                    # Failed batch is back in the queue; retry after another delay.
+                    await asyncio.sleep(max(self.max_delay_seconds, 0.5))
+            with self._lock:
+                reschedule = bool(buffer.pending)
+        finally:
+            # On cancellation (loop shutdown) the next apply() re-arms the timer.
+            with self._lock:
+                buffer.timer_scheduled = False
+        if reschedule:
+            self._schedule_flush(filename, buffer)
+
+    async def flush(self, filename: str) -> None:
+        """Commit everything queued for ``filename`` in a single write."""
+        buffer = self._buffer(filename)
+        # Flushes may come from different event loops (bridge + main loop), so
+        # serialize them with a thread lock polled from async code.
+        while not buffer.flush_lock.acquire(blocking=False):
+            await asyncio.sleep(0.01)
+        try:
+            with self._lock:
+                batch = list(buffer.pending)
+                buffer.pending.clear()
+                buffer.first_pending_at = None
+            if not batch:
+                return
+            try:
+                committed = await self._commit_fn(filename, lambda data: _apply_all(data, batch))
+            except BaseException as exc:
+                self._metrics["flush_failures"] += 1
+                with self._lock:
+                    for entry in batch:
+                        if entry.durable:
+                            entry.error = exc
+                            entry.done = True
+                    retry = [entry for entry in batch if not entry.durable]
+                    buffer.pending[:0] = retry
+                    if buffer.pending and buffer.first_pending_at is None:
+                        buffer.first_pending_at = time.monotonic()
+                    self._rebuild_overlay(buffer)
+                logger.warning(
+                    "[GITHUB] write_behind_flush_failed file=%s batch=%s requeued=%s error=%s",
+                    filename,
+                    len(batch),
+                    len(retry),
+                    exc,
+                )
+                if any(entry.durable for entry in batch) or not retry:
+                    return
+                raise
+            with self._lock:
+                for entry in batch:
+                    entry.result = committed
+                    entry.done = True
+                buffer.base = copy.deepcopy(committed)
+                self._rebuild_overlay(buffer)
+            self._metrics["commits"] += 1
+            self._metrics["updates_applied"] += len(batch)
+            self._metrics["commits_saved"] += len(batch) - 1
+            logger.info(
+                "METRIC_GAUGE name=github_write_behind_batch value=%s file=%s commits_saved_total=%s",
+                len(batch),
+                filename,
+                self._metrics["commits_saved"],
+            )
+        finally:
+            buffer.flush_lock.release()
+
+    def _rebuild_overlay(self, buffer: _FileBuffer) -> None:
+        if not buffer.pending:
+            buffer.overlay = None
+            return
+        buffer.overlay = _apply_all(copy.deepcopy(buffer.base or {}), buffer.pending)
+
+    async def flush_all(self) -> None:
+        """Flush every file and wind down the timer tasks; used on shutdown."""
+        with self._lock:
+            filenames = list(self._files)
+        for filename in filenames:
+            # Also for files with nothing queued: flush() waits on flush_lock for a
+            # timer commit that has already taken the batch.
+            try:
+                await self.flush(filename)
+            except Exception as exc:
+                logger.error("[GITHUB] write_behind_shutdown_flush_failed file=%s error=%s", filename, exc)
+        # Nothing is left for the timers of this loop; tasks of other loops cannot be awaited here.
+        loop = asyncio.get_running_loop()
+        timers = [task for task in list(self._flush_tasks) if task.get_loop() is loop and task is not asyncio.current_task()]
+        for task in timers:
+            task.cancel()
+        if timers:
+            await asyncio.gather(*timers, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot: Dict[str, Any] = dict(self._metrics)
+        snapshot["pending_updates"] = self.pending_count()
+        return snapshot
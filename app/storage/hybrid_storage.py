@@ -262,6 +262,25 @@ class HybridStorage(BaseStorage):
     async def get_user_generations_history(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         return await self._primary.get_user_generations_history(user_id, limit=limit)
 
+    @property
+    def supports_history_event_rows(self) -> bool:
+        return getattr(self._primary, "supports_history_event_rows", False) is True
+
+    async def append_history_event(self, user_id: int, event: Dict[str, Any]) -> bool:
+        return await self._primary.append_history_event(user_id, event)
+
+    async def list_history_events(
+        self,
+        user_id: int,
+        *,
+        limit: int = 10,
+        before_seq: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        return await self._primary.list_history_events(user_id, limit=limit, before_seq=before_seq)
+
+    async def get_history_event_counters(self, user_id: int) -> Dict[str, int]:
+        return await self._primary.get_history_event_counters(user_id)
+
     async def add_payment(
         self,
         user_id: int,
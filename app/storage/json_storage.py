@@ -861,6 +861,7 @@ class JsonStorage(BaseStorage):
 
         await maybe_inject_sleep("TRT_FAULT_INJECT_STORAGE_SLEEP_MS", label=f"json_storage.write:{filename}")
         target = self.data_dir / filename
+        target.parent.mkdir(parents=True, exist_ok=True)
         await self._save_json(target, data)
 
     async def update_json_file(
@@ -873,6 +874,7 @@ class JsonStorage(BaseStorage):
 
         await maybe_inject_sleep("TRT_FAULT_INJECT_STORAGE_SLEEP_MS", label=f"json_storage.update:{filename}")
         target = self.data_dir / filename
+        target.parent.mkdir(parents=True, exist_ok=True)
         data = await self._load_json(target)
         updated = update_fn(dict(data))
         await self._save_json(target, updated)
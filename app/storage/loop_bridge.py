@@ -0,0 +1,182 @@
+"""Long-lived storage I/O loop for synchronous storage wrappers.
+
+Sync helpers used to call ``asyncio.run`` per call, which creates a new event
+loop each time. GitHubStorage/PostgresStorage key their sessions and pools by
+loop, so every call built and discarded an aiohttp session or asyncpg pool.
+All sync wrappers now submit to one dedicated loop thread instead, so they
+share a single pool/session.
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+STORAGE_BRIDGE_TIMEOUT_SECONDS = float(os.getenv("STORAGE_BRIDGE_TIMEOUT_SECONDS", "30"))
+STORAGE_BRIDGE_DEPTH_WARN = int(os.getenv("STORAGE_BRIDGE_DEPTH_WARN", "50"))
+
+
+class StorageLoopBridge:
+    """Runs coroutines on a private event loop thread via ``run_coroutine_threadsafe``."""
+
+    def __init__(self, name: str = "storage-io-loop") -> None:
+        self._name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._latencies_ms: Deque[float] = deque(maxlen=1000)
+        self._counts: Dict[str, int] = {"calls": 0, "errors": 0, "timeouts": 0, "reentrant": 0}
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        return self._loop
+
+    def in_bridge_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            return loop
+        with self._start_lock:
+            if self._loop is not None and self._loop.is_running():
+                return self._loop
+            ready = threading.Event()
+            loop = asyncio.new_event_loop()
+
+            def _run() -> None:
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=_run, name=self._name, daemon=True)
+            thread.start()
+            ready.wait()
+            self._loop = loop
+            self._thread = thread
+            logger.info("STORAGE_BRIDGE_STARTED thread=%s", self._name)
+            return loop
+
+    def run(self, coro: Awaitable[T], *, timeout: Optional[float] = None, label: str = "storage_call") -> T:
+        """Block the calling thread until ``coro`` finishes on the bridge loop."""
+        timeout = STORAGE_BRIDGE_TIMEOUT_SECONDS if timeout is None else timeout
+        if self.in_bridge_thread():
+            # A storage coroutine called a sync wrapper: waiting here would deadlock the loop.
+            self._bump("reentrant")
+            logger.warning("STORAGE_BRIDGE_REENTRANT label=%s", label)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+                return executor.submit(asyncio.run, coro).result(timeout=timeout)
+        loop = self._ensure_started()
+        started = time.monotonic()
+        depth = self._enter()
+        if depth >= STORAGE_BRIDGE_DEPTH_WARN and depth % STORAGE_BRIDGE_DEPTH_WARN == 0:
+            logger.warning("METRIC_GAUGE name=storage_bridge_queue_depth value=%s label=%s", depth, label)
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError as exc:
+            future.cancel()
+            self._bump("timeouts")
+            logger.error("STORAGE_BRIDGE_TIMEOUT label=%s timeout=%.2fs depth=%s", label, timeout, depth)
+            raise TimeoutError(f"{label} timed out after {timeout}s") from exc
+        except BaseException:
+            if not future.done():
+                future.cancel()
+            self._bump("errors")
+            raise
+        finally:
+            self._exit((time.monotonic() - started) * 1000)
+
+    def _enter(self) -> int:
+        with self._metrics_lock:
+            self._in_flight += 1
+            self._counts["calls"] += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+            return self._in_flight
+
+    def _exit(self, latency_ms: float) -> None:
+        with self._metrics_lock:
+            self._in_flight -= 1
+            self._latencies_ms.append(latency_ms)
+
+    def _bump(self, key: str) -> None:
+        with self._metrics_lock:
+            self._counts[key] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            ordered = sorted(self._latencies_ms)
+            counts = dict(self._counts)
+            in_flight = self._in_flight
+            max_in_flight = self._max_in_flight
+
+        def _pct(percentile: float) -> Optional[float]:
+            if not ordered:
+                return None
+            k = max(0, min(len(ordered) - 1, int(round(percentile * (len(ordered) - 1)))))
+            return round(ordered[k], 2)
+
+        return {
+            "running": bool(self._loop is not None and self._loop.is_running()),
+            "queue_depth": in_flight,
+            "max_queue_depth": max_in_flight,
+            "latency_p50_ms": _pct(0.5),
+            "latency_p95_ms": _pct(0.95),
+            **counts,
+        }
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Cancel pending work, stop the loop and join the thread."""
+        with self._start_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+        if loop is None or thread is None:
+            return
+
+        async def _cancel_pending() -> None:
+            current = asyncio.current_task()
+            tasks = [task for task in asyncio.all_tasks() if task is not current]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(_cancel_pending(), loop).result(timeout=timeout)
+            except Exception as exc:
+                logger.debug("storage_bridge_cancel_failed error=%s", exc)
+            loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=timeout)
+        if not thread.is_alive():
+            loop.close()
+
+
+_bridge = StorageLoopBridge()
+atexit.register(_bridge.shutdown)
+
+
+def get_storage_bridge() -> StorageLoopBridge:
+    return _bridge
+
+
+def run_storage_sync(coro: Awaitable[T], *, timeout: Optional[float] = None, label: str = "storage_call") -> T:
+    """Run a storage coroutine from synchronous code on the shared storage loop."""
+    return _bridge.run(coro, timeout=timeout, label=label)
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    return _bridge.snapshot()
@@ -0,0 +1,1129 @@
+"""
+PostgreSQL storage with one row per entity.
+
+Balances, generation jobs, payments and generation history live in dedicated tables
+keyed by (partner_id, entity id) instead of one JSONB document per logical file.
+Hot writes (set_user_balance, add_generation_job, update_job_status, add_payment)
+touch a single row. read_json_file/update_json_file keep a document-shaped view of
+those tables for legacy callers; every other logical file stays in storage_json.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import asyncpg
+
+from app.storage.postgres_storage import PostgresStorage
+
+logger = logging.getLogger(__name__)
+
+ROW_LAYOUT_MIGRATION_KEY = "storage_json_to_rows"
+HISTORY_MAX_PER_USER = 100
+
+ROW_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS storage_balances (
+    partner_id TEXT NOT NULL,
+    user_id    BIGINT NOT NULL,
+    amount     DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (partner_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS storage_jobs (
+    partner_id TEXT NOT NULL,
+    job_id     TEXT NOT NULL,
+    user_id    BIGINT,
+    status     TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT '',
+    payload    JSONB NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (partner_id, job_id)
+);
+CREATE INDEX IF NOT EXISTS idx_storage_jobs_status
+    ON storage_jobs(partner_id, status, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_storage_jobs_user_id
+    ON storage_jobs(partner_id, user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_storage_jobs_created_at
+    ON storage_jobs(partner_id, created_at DESC);
+CREATE TABLE IF NOT EXISTS storage_payments (
+    partner_id TEXT NOT NULL,
+    payment_id TEXT NOT NULL,
+    user_id    BIGINT,
+    status     TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT '',
+    payload    JSONB NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (partner_id, payment_id)
+);
+CREATE INDEX IF NOT EXISTS idx_storage_payments_user_id
+    ON storage_payments(partner_id, user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_storage_payments_status
+    ON storage_payments(partner_id, status, created_at DESC);
+CREATE TABLE IF NOT EXISTS storage_history (
+    id         BIGSERIAL PRIMARY KEY,
+    partner_id TEXT NOT NULL,
+    user_id    BIGINT NOT NULL,
+    gen_id     TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT '',
+    payload    JSONB NOT NULL,
+    UNIQUE (partner_id, user_id, gen_id)
+);
+CREATE INDEX IF NOT EXISTS idx_storage_history_user
+    ON storage_history(partner_id, user_id, id DESC);
+CREATE TABLE IF NOT EXISTS balance_ledger (
+    partner_id TEXT NOT NULL,
+    task_id    TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    user_id    BIGINT NOT NULL,
+    amount     DOUBLE PRECISION NOT NULL,
+    sku_id     TEXT NOT NULL DEFAULT '',
+    model_id   TEXT NOT NULL DEFAULT '',
+    reason     TEXT NOT NULL DEFAULT '',
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (partner_id, task_id, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_balance_ledger_user
+    ON balance_ledger(partner_id, user_id, created_at DESC);
+"""
+
+# One statement: record the charge in the ledger (unique per task) and debit the balance
+# row only when the ledger insert happened and funds suffice. Concurrent charges for the
+# same user serialize on that single balance row; nothing tenant-wide is locked.
+CHARGE_ONCE_SQL = """
+WITH ins AS (
+    INSERT INTO balance_ledger (partner_id, task_id, kind, user_id, amount, sku_id, model_id)
+    SELECT $1, $2, 'charge', $3, $4, $5, $6
+    WHERE EXISTS (
+        SELECT 1 FROM storage_balances WHERE partner_id=$1 AND user_id=$3 AND amount >= $4
+    )
+    ON CONFLICT (partner_id, task_id, kind) DO NOTHING
+    RETURNING task_id
+), upd AS (
+    UPDATE storage_balances
+    SET amount = amount - $4, updated_at = now()
+    WHERE partner_id=$1 AND user_id=$3 AND amount >= $4 AND EXISTS (SELECT 1 FROM ins)
+    RETURNING amount
+)
+SELECT
+    (SELECT count(*) FROM ins) AS inserted,
+    (SELECT amount FROM upd) AS balance_after,
+    (SELECT amount FROM storage_balances WHERE partner_id=$1 AND user_id=$3) AS balance_seen,
+    EXISTS (
+        SELECT 1 FROM balance_ledger WHERE partner_id=$1 AND task_id=$2 AND kind='charge'
+    ) AS already_charged
+"""
+
+REFUND_ONCE_SQL = """
+WITH charge AS (
+    SELECT user_id, amount FROM balance_ledger
+    WHERE partner_id=$1 AND task_id=$2 AND kind='charge'
+), ins AS (
+    INSERT INTO balance_ledger (partner_id, task_id, kind, user_id, amount, reason)
+    SELECT $1, $2, 'refund', user_id, amount, $3 FROM charge
+    ON CONFLICT (partner_id, task_id, kind) DO NOTHING
+    RETURNING user_id, amount
+), upd AS (
+    INSERT INTO storage_balances (partner_id, user_id, amount)
+    SELECT $1, user_id, amount FROM ins
+    ON CONFLICT (partner_id, user_id)
+    DO UPDATE SET amount = storage_balances.amount + EXCLUDED.amount, updated_at = now()
+    RETURNING amount
+)
+SELECT
+    (SELECT count(*) FROM charge) AS charged,
+    (SELECT amount FROM charge) AS amount,
+    (SELECT count(*) FROM ins) AS refunded,
+    (SELECT amount FROM upd) AS balance_after
+"""
+
+
+def _as_int_or_none(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_float(value: Any) -> float:
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return result if math.isfinite(result) else 0.0
+
+
+def balance_rows_from_document(payload: Dict[str, Any]) -> List[Tuple[int, float]]:
+    """Convert a user_balances.json document into (user_id, amount) rows."""
+    rows: List[Tuple[int, float]] = []
+    for key, value in (payload or {}).items():
+        user_id = _as_int_or_none(key)
+        if user_id is None:
+            logger.warning("[STORAGE][ROWS] skip_balance_key key=%s reason=not_int", key)
+            continue
+        rows.append((user_id, _as_float(value)))
+    return rows
+
+
+def keyed_rows_from_document(payload: Dict[str, Any], *, id_field: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """Convert a {entity_id: record} document (jobs/payments) into (entity_id, record) rows."""
+    rows: List[Tuple[str, Dict[str, Any]]] = []
+    for key, value in (payload or {}).items():
+        if not isinstance(value, dict):
+            logger.warning("[STORAGE][ROWS] skip_record key=%s reason=not_dict", key)
+            continue
+        record = dict(value)
+        record.setdefault(id_field, key)
+        rows.append((str(key), record))
+    return rows
+
+
+def history_rows_from_document(payload: Dict[str, Any]) -> List[Tuple[int, str, Dict[str, Any]]]:
+    """Convert a generations_history.json document into (user_id, gen_id, record) rows, oldest first."""
+    rows: List[Tuple[int, str, Dict[str, Any]]] = []
+    for key, items in (payload or {}).items():
+        user_id = _as_int_or_none(key)
+        if user_id is None or not isinstance(items, list):
+            continue
+        for item in items[-HISTORY_MAX_PER_USER:]:
+            if not isinstance(item, dict):
+                continue
+            gen_id = str(item.get("id") or uuid.uuid4())
+            rows.append((user_id, gen_id, dict(item, id=gen_id)))
+    return rows
+
+
+def ledger_rows_from_deductions(payload: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Convert a balance_deductions.json document into ledger charge rows."""
+    rows: List[Tuple[str, Dict[str, Any]]] = []
+    for task_id, record in (payload or {}).items():
+        if not isinstance(record, dict):
+            continue
+        user_id = _as_int_or_none(record.get("user_id"))
+        if user_id is None:
+            continue
+        rows.append(
+            (
+                str(task_id),
+                {
+                    "user_id": user_id,
+                    "amount": _as_float(record.get("amount")),
+                    "sku_id": str(record.get("sku_id") or ""),
+                    "model_id": str(record.get("model_id") or ""),
+                },
+            )
+        )
+    return rows
+
+
+def diff_document(
+    before: Dict[str, Any],
+    after: Dict[str, Any],
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Return (changed_or_added, removed_keys) between two document snapshots."""
+    changed = {key: value for key, value in after.items() if key not in before or before[key] != value}
+    removed = [key for key in before if key not in after]
+    return changed, removed
+
+
+def charge_result_from_row(row: Any, *, amount: float) -> Dict[str, Any]:
+    """Map the CHARGE_ONCE_SQL result row onto the charge_balance_once result contract."""
+    inserted = int(row["inserted"] or 0) if row else 0
+    balance_after = row["balance_after"] if row else None
+    balance_seen = float(row["balance_seen"] or 0.0) if row else 0.0
+    if inserted and balance_after is not None:
+        balance_after = float(balance_after)
+        return {"status": "charged", "balance_before": balance_after + amount, "balance_after": balance_after}
+    if inserted:
+        return {"status": "race_insufficient", "balance_before": balance_seen, "balance_after": balance_seen}
+    # Funds were sufficient in the statement snapshot, so an empty insert means the
+    # unique (partner_id, task_id, kind) key already existed, even if a concurrent
+    # commit is not yet visible to the already_charged probe.
+    if row and (row["already_charged"] or balance_seen >= amount):
+        return {"status": "duplicate", "balance_before": balance_seen, "balance_after": balance_seen}
+    return {"status": "insufficient", "balance_before": balance_seen, "balance_after": balance_seen}
+
+
+def refund_result_from_row(row: Any) -> Dict[str, Any]:
+    """Map the REFUND_ONCE_SQL result row onto a refund result dict."""
+    charged = int(row["charged"] or 0) if row else 0
+    refunded = int(row["refunded"] or 0) if row else 0
+    amount = float(row["amount"] or 0.0) if row and row["amount"] is not None else 0.0
+    balance_after = float(row["balance_after"]) if row and row["balance_after"] is not None else 0.0
+    if not charged:
+        return {"status": "not_charged", "amount": 0.0, "balance_after": balance_after}
+    if not refunded:
+        return {"status": "duplicate", "amount": amount, "balance_after": balance_after}
+    return {"status": "refunded", "amount": amount, "balance_after": balance_after}
+
+
+class _ChargeRaceLost(Exception):
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__("charge race lost")
+        self.result = result
+
+
+class PostgresRowStorage(PostgresStorage):
+    """PostgresStorage variant that keeps balances/jobs/payments/history as rows."""
+
+    def __init__(self, dsn: str, partner_id: Optional[str] = None):
+        super().__init__(dsn, partner_id=partner_id)
+        self._row_files = {
+            self.balances_file,
+            self.jobs_file,
+            self.payments_file,
+            self.generations_history_file,
+        }
+
+    async def _ensure_schema(self, pool: asyncpg.Pool, loop_id: int) -> None:
+        if loop_id in self._schema_ready_loops:
+            return
+        await super()._ensure_schema(pool, loop_id)
+        try:
+            async with pool.acquire() as conn:
+                await conn.execute(ROW_SCHEMA_SQL)
+        except Exception as exc:
+            self._schema_ready_loops.discard(loop_id)
+            self._maybe_open_circuit(exc, context="ensure_row_schema")
+            raise
+        try:
+            await self.migrate_from_storage_json(pool=pool)
+        except Exception as exc:
+            logger.warning("[STORAGE][ROWS] migration_failed partner_id=%s error=%s", self.partner_id, exc)
+
+    def _decode(self, payload: Any, *, filename: str) -> Dict[str, Any]:
+        return self._coerce_payload(payload, filename=filename)
+
+    # ==================== BALANCES ====================
+
+    async def get_user_balance(self, user_id: int) -> float:
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                value = await conn.fetchval(
+                    "SELECT amount FROM storage_balances WHERE partner_id=$1 AND user_id=$2",
+                    self.partner_id,
+                    int(user_id),
+                )
+        except Exception as exc:
+            self._maybe_open_circuit(exc, context="get_balance")
+            raise
+        return float(value) if value is not None else 0.0
+
+    async def set_user_balance(self, user_id: int, amount: float) -> None:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                balance_before = await conn.fetchval(
+                    "SELECT amount FROM storage_balances WHERE partner_id=$1 AND user_id=$2 FOR UPDATE",
+                    self.partner_id,
+                    int(user_id),
+                )
+                await conn.execute(
+                    """
+                    INSERT INTO storage_balances (partner_id, user_id, amount)
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT (partner_id, user_id)
+                    DO UPDATE SET amount = EXCLUDED.amount, updated_at = now()
+                    """,
+                    self.partner_id,
+                    int(user_id),
+                    float(amount),
+                )
+        balance_before = float(balance_before or 0.0)
+        logger.info(
+            "BALANCE_SET user_id=%s balance_before=%.2f balance_after=%.2f delta=%.2f",
+            user_id,
+            balance_before,
+            amount,
+            amount - balance_before,
+        )
+
+    async def add_user_balance(self, user_id: int, amount: float) -> float:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            new_balance = await conn.fetchval(
+                """
+                INSERT INTO storage_balances (partner_id, user_id, amount)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (partner_id, user_id)
+                DO UPDATE SET amount = storage_balances.amount + EXCLUDED.amount, updated_at = now()
+                RETURNING amount
+                """,
+                self.partner_id,
+                int(user_id),
+                float(amount),
+            )
+        new_balance = float(new_balance or 0.0)
+        logger.info(
+            "BALANCE_ADD user_id=%s amount=%.2f balance_before=%.2f balance_after=%.2f",
+            user_id,
+            amount,
+            new_balance - amount,
+            new_balance,
+        )
+        return new_balance
+
+    async def subtract_user_balance(self, user_id: int, amount: float) -> bool:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            new_balance = await conn.fetchval(
+                """
+                UPDATE storage_balances
+                SET amount = amount - $3, updated_at = now()
+                WHERE partner_id=$1 AND user_id=$2 AND amount >= $3
+                RETURNING amount
+                """,
+                self.partner_id,
+                int(user_id),
+                float(amount),
+            )
+        if new_balance is None:
+            available = await self.get_user_balance(user_id)
+            logger.warning(
+                "Insufficient balance: user_id=%s required=%.2f available=%.2f",
+                user_id,
+                amount,
+                available,
+            )
+            return False
+        new_balance = float(new_balance)
+        logger.info(
+            "BALANCE_SUBTRACT user_id=%s amount=%.2f balance_before=%.2f balance_after=%.2f",
+            user_id,
+            amount,
+            new_balance + amount,
+            new_balance,
+        )
+        return True
+
+    async def charge_balance_once(
+        self,
+        user_id: int,
+        amount: float,
+        *,
+        task_id: str,
+        sku_id: str = "",
+        model_id: str = "",
+    ) -> Dict[str, Any]:
+        if not task_id:
+            return {"status": "missing_task_id"}
+        if not math.isfinite(amount) or amount <= 0:
+            balance_before = await self.get_user_balance(user_id)
+            logger.warning(
+                "INVALID_CHARGE_AMOUNT user_id=%s amount=%.4f task_id=%s",
+                user_id,
+                amount,
+                task_id,
+            )
+            return {
+                "status": "invalid_amount",
+                "balance_before": balance_before,
+                "balance_after": balance_before,
+            }
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    row = await conn.fetchrow(
+                        CHARGE_ONCE_SQL,
+                        self.partner_id,
+                        task_id,
+                        int(user_id),
+                        float(amount),
+                        sku_id or "",
+                        model_id or "",
+                    )
+                    result = charge_result_from_row(row, amount=amount)
+                    if result["status"] == "race_insufficient":
+                        # Another charge drained the row between snapshot and update:
+                        # roll back the ledger insert so the task can be retried.
+                        raise _ChargeRaceLost(result)
+        except _ChargeRaceLost as lost:
+            result = dict(lost.result, status="insufficient")
+        except Exception as exc:
+            self._maybe_open_circuit(exc, context="charge_balance_once")
+            raise
+        status = result["status"]
+        if status == "charged":
+            logger.info(
+                "BALANCE_CHARGE_OK user_id=%s task_id=%s sku_id=%s model_id=%s amount=%.2f balance_after=%.2f",
+                user_id,
+                task_id,
+                sku_id,
+                model_id,
+                amount,
+                result["balance_after"],
+            )
+        elif status == "duplicate":
+            logger.info(
+                "BALANCE_CHARGE_DUPLICATE user_id=%s task_id=%s sku_id=%s model_id=%s balance=%.2f",
+                user_id,
+                task_id,
+                sku_id,
+                model_id,
+                result["balance_before"],
+            )
+        else:
+            logger.warning(
+                "BALANCE_CHARGE_INSUFFICIENT user_id=%s task_id=%s required=%.2f available=%.2f",
+                user_id,
+                task_id,
+                amount,
+                result["balance_before"],
+            )
+        return result
+
+    async def refund_balance_once(self, user_id: int, *, task_id: str, reason: str = "") -> Dict[str, Any]:
+        """Compensate a ledger charge exactly once; returns refunded/duplicate/not_charged."""
+        if not task_id:
+            return {"status": "missing_task_id"}
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                row = await conn.fetchrow(REFUND_ONCE_SQL, self.partner_id, task_id, reason or "")
+        except Exception as exc:
+            self._maybe_open_circuit(exc, context="refund_balance_once")
+            raise
+        result = refund_result_from_row(row)
+        if result["status"] != "refunded":
+            result["balance_after"] = await self.get_user_balance(user_id)
+        logger.info(
+            "BALANCE_REFUND status=%s user_id=%s task_id=%s amount=%.2f balance_after=%.2f reason=%s",
+            result["status"],
+            user_id,
+            task_id,
+            result["amount"],
+            result["balance_after"],
+            reason or "-",
+        )
+        return result
+
+    # ==================== GENERATION JOBS ====================
+
+    async def _upsert_job_row(self, conn: Any, job_id: str, job: Dict[str, Any]) -> None:
+        await conn.execute(
+            """
+            INSERT INTO storage_jobs (partner_id, job_id, user_id, status, created_at, payload)
+            VALUES ($1, $2, $3, $4, $5, $6::jsonb)
+            ON CONFLICT (partner_id, job_id)
+            DO UPDATE SET user_id = EXCLUDED.user_id, status = EXCLUDED.status,
+                          created_at = EXCLUDED.created_at, payload = EXCLUDED.payload, updated_at = now()
+            """,
+            self.partner_id,
+            job_id,
+            _as_int_or_none(job.get("user_id")),
+            str(job.get("status") or ""),
+            str(job.get("created_at") or ""),
+            json.dumps(job, default=str),
+        )
+
+    async def add_generation_job(
+        self,
+        user_id: int,
+        model_id: str,
+        model_name: str,
+        params: Dict[str, Any],
+        price: float,
+        task_id: Optional[str] = None,
+        status: str = "pending",
+        *,
+        job_id: Optional[str] = None,
+        request_id: Optional[str] = None,
+        correlation_id: Optional[str] = None,
+        prompt: Optional[str] = None,
+        prompt_hash: Optional[str] = None,
+        sku_id: Optional[str] = None,
+        is_free: bool = False,
+        is_admin_user: bool = False,
+        chat_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+        result_url: Optional[str] = None,
+        error_code: Optional[str] = None,
+    ) -> str:
+        job_id = job_id or task_id or str(uuid.uuid4())
+        now_iso = datetime.now().isoformat()
+        job = {
+            "job_id": job_id,
+            "request_id": request_id,
+            "correlation_id": correlation_id or request_id,
+            "user_id": user_id,
+            "model_id": model_id,
+            "model_name": model_name,
+            "prompt": prompt,
+            "prompt_hash": prompt_hash,
+            "sku_id": sku_id,
+            "is_free": bool(is_free),
+            "is_admin_user": bool(is_admin_user),
+            "params": params,
+            "price": price,
+            "status": status,
+            "task_id": task_id,
+            "external_task_id": task_id,
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "created_at": now_iso,
+            "updated_at": now_iso,
+            "result_urls": [],
+            "result_url": result_url,
+            "error_message": None,
+            "error_code": error_code,
+        }
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await self._upsert_job_row(conn, job_id, job)
+        return job_id
+
+    async def update_job_status(
+        self,
+        job_id: str,
+        status: str,
+        result_urls: Optional[List[str]] = None,
+        error_message: Optional[str] = None,
+        error_code: Optional[str] = None,
+        result_url: Optional[str] = None,
+    ) -> None:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                payload = await conn.fetchval(
+                    "SELECT payload FROM storage_jobs WHERE partner_id=$1 AND job_id=$2 FOR UPDATE",
+                    self.partner_id,
+                    job_id,
+                )
+                if payload is None:
+                    raise ValueError(f"Job {job_id} not found")
+                job = self._decode(payload, filename=self.jobs_file)
+                current_status = str(job.get("status") or "").lower()
+                new_status = str(status or "").lower()
+                if current_status == "delivered" and new_status != "delivered":
+                    logger.warning(
+                        "Skipping status regression for delivered job: job_id=%s current=%s next=%s",
+                        job_id,
+                        current_status,
+                        new_status,
+                    )
+                    return
+                job["status"] = status
+                job["updated_at"] = datetime.now().isoformat()
+                if result_urls is not None:
+                    job["result_urls"] = result_urls
+                    if result_urls:
+                        job["result_url"] = result_urls[0]
+                if error_message is not None:
+                    job["error_message"] = error_message
+                if error_code is not None:
+                    job["error_code"] = error_code
+                if result_url is not None:
+                    job["result_url"] = result_url
+                await self._upsert_job_row(conn, job_id, job)
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            payload = await conn.fetchval(
+                "SELECT payload FROM storage_jobs WHERE partner_id=$1 AND job_id=$2",
+                self.partner_id,
+                job_id,
+            )
+        if payload is None:
+            return None
+        return self._decode(payload, filename=self.jobs_file)
+
+    async def list_jobs(
+        self,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        clauses = ["partner_id=$1"]
+        args: List[Any] = [self.partner_id]
+        if user_id is not None:
+            args.append(int(user_id))
+            clauses.append(f"user_id=${len(args)}")
+        if status is not None:
+            args.append(status)
+            clauses.append(f"status=${len(args)}")
+        args.append(int(limit))
+        query = (
+            f"SELECT payload FROM storage_jobs WHERE {' AND '.join(clauses)} "
+            f"ORDER BY created_at DESC LIMIT ${len(args)}"
+        )
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(query, *args)
+        return [self._decode(row[0], filename=self.jobs_file) for row in rows]
+
+    async def list_jobs_by_status(
+        self,
+        statuses: List[str],
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        wanted = sorted({str(status).lower() for status in statuses})
+        if not wanted:
+            return []
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT payload FROM storage_jobs WHERE partner_id=$1 AND lower(status) = ANY($2::text[]) "
+                "ORDER BY created_at DESC LIMIT $3",
+                self.partner_id,
+                wanted,
+                int(limit),
+            )
+        return [self._decode(row[0], filename=self.jobs_file) for row in rows]
+
+    # ==================== HISTORY ====================
+
+    async def _insert_history_row(self, conn: Any, user_id: int, gen_id: str, record: Dict[str, Any]) -> None:
+        await conn.execute(
+            """
+            INSERT INTO storage_history (partner_id, user_id, gen_id, created_at, payload)
+            VALUES ($1, $2, $3, $4, $5::jsonb)
+            ON CONFLICT (partner_id, user_id, gen_id) DO UPDATE SET payload = EXCLUDED.payload
+            """,
+            self.partner_id,
+            int(user_id),
+            gen_id,
+            str(record.get("timestamp") or ""),
+            json.dumps(record, default=str),
+        )
+
+    async def _trim_history(self, conn: Any, user_id: int) -> None:
+        await conn.execute(
+            """
+            DELETE FROM storage_history
+            WHERE partner_id=$1 AND user_id=$2 AND id IN (
+                SELECT id FROM storage_history
+                WHERE partner_id=$1 AND user_id=$2
+                ORDER BY id DESC OFFSET $3
+            )
+            """,
+            self.partner_id,
+            int(user_id),
+            HISTORY_MAX_PER_USER,
+        )
+
+    async def add_generation_to_history(
+        self,
+        user_id: int,
+        model_id: str,
+        model_name: str,
+        params: Dict[str, Any],
+        result_urls: List[str],
+        price: float,
+        operation_id: Optional[str] = None,
+    ) -> str:
+        from app.services.history_service import append_event
+
+        gen_id = operation_id or str(uuid.uuid4())
+        generation = {
+            "id": gen_id,
+            "model_id": model_id,
+            "model_name": model_name,
+            "params": params,
+            "result_urls": result_urls,
+            "price": price,
+            "timestamp": datetime.now().isoformat(),
+        }
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await self._insert_history_row(conn, user_id, gen_id, generation)
+                await self._trim_history(conn, user_id)
+        await append_event(
+            self,
+            user_id=user_id,
+            kind="generation",
+            payload={
+                "model_id": model_id,
+                "model_name": model_name,
+                "price": price,
+                "result_urls": result_urls,
+            },
+            event_id=gen_id,
+        )
+        return gen_id
+
+    async def get_user_generations_history(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT payload FROM storage_history WHERE partner_id=$1 AND user_id=$2 ORDER BY id DESC LIMIT $3",
+                self.partner_id,
+                int(user_id),
+                int(limit),
+            )
+        return [self._decode(row[0], filename=self.generations_history_file) for row in reversed(rows)]
+
+    # ==================== PAYMENTS ====================
+
+    async def _upsert_payment_row(self, conn: Any, payment_id: str, payment: Dict[str, Any]) -> None:
+        await conn.execute(
+            """
+            INSERT INTO storage_payments (partner_id, payment_id, user_id, status, created_at, payload)
+            VALUES ($1, $2, $3, $4, $5, $6::jsonb)
+            ON CONFLICT (partner_id, payment_id)
+            DO UPDATE SET user_id = EXCLUDED.user_id, status = EXCLUDED.status,
+                          created_at = EXCLUDED.created_at, payload = EXCLUDED.payload, updated_at = now()
+            """,
+            self.partner_id,
+            payment_id,
+            _as_int_or_none(payment.get("user_id")),
+            str(payment.get("status") or ""),
+            str(payment.get("created_at") or ""),
+            json.dumps(payment, default=str),
+        )
+
+    async def add_payment(
+        self,
+        user_id: int,
+        amount: float,
+        payment_method: str,
+        payment_id: Optional[str] = None,
+        screenshot_file_id: Optional[str] = None,
+        status: str = "pending",
+    ) -> str:
+        pay_id = payment_id or str(uuid.uuid4())
+        now_iso = datetime.now().isoformat()
+        payment = {
+            "payment_id": pay_id,
+            "user_id": user_id,
+            "amount": amount,
+            "payment_method": payment_method,
+            "screenshot_file_id": screenshot_file_id,
+            "status": status,
+            "balance_charged": False,
+            "created_at": now_iso,
+            "updated_at": now_iso,
+            "admin_id": None,
+            "notes": None,
+        }
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await self._upsert_payment_row(conn, pay_id, payment)
+        return pay_id
+
+    async def mark_payment_status(
+        self,
+        payment_id: str,
+        status: str,
+        admin_id: Optional[int] = None,
+        notes: Optional[str] = None,
+    ) -> None:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                raw = await conn.fetchval(
+                    "SELECT payload FROM storage_payments WHERE partner_id=$1 AND payment_id=$2 FOR UPDATE",
+                    self.partner_id,
+                    payment_id,
+                )
+                if raw is None:
+                    raise ValueError(f"Payment {payment_id} not found")
+                payment = self._decode(raw, filename=self.payments_file)
+                if payment.get("status") == status:
+                    logger.info(
+                        "PAYMENT_STATUS_IDEMPOTENT payment_id=%s status=%s user_id=%s",
+                        payment_id,
+                        status,
+                        payment.get("user_id"),
+                    )
+                credit_balance = status in {"approved", "completed"} and not payment.get("balance_charged")
+                if credit_balance:
+                    payment["balance_charged"] = True
+                    await conn.execute(
+                        """
+                        INSERT INTO storage_balances (partner_id, user_id, amount)
+                        VALUES ($1, $2, $3)
+                        ON CONFLICT (partner_id, user_id)
+                        DO UPDATE SET amount = storage_balances.amount + EXCLUDED.amount, updated_at = now()
+                        """,
+                        self.partner_id,
+                        int(payment["user_id"]),
+                        float(payment["amount"]),
+                    )
+                payment["status"] = status
+                payment["updated_at"] = datetime.now().isoformat()
+                if admin_id is not None:
+                    payment["admin_id"] = admin_id
+                if notes is not None:
+                    payment["notes"] = notes
+                await self._upsert_payment_row(conn, payment_id, payment)
+        if credit_balance:
+            logger.info(
+                "BALANCE_ADD user_id=%s amount=%.2f source=payment payment_id=%s",
+                payment.get("user_id"),
+                float(payment.get("amount") or 0.0),
+                payment_id,
+            )
+
+    async def get_payment(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            raw = await conn.fetchval(
+                "SELECT payload FROM storage_payments WHERE partner_id=$1 AND payment_id=$2",
+                self.partner_id,
+                payment_id,
+            )
+        if raw is None:
+            return None
+        return self._decode(raw, filename=self.payments_file)
+
+    async def list_payments(
+        self,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        clauses = ["partner_id=$1"]
+        args: List[Any] = [self.partner_id]
+        if user_id is not None:
+            args.append(int(user_id))
+            clauses.append(f"user_id=${len(args)}")
+        if status is not None:
+            args.append(status)
+            clauses.append(f"status=${len(args)}")
+        args.append(int(limit))
+        query = (
+            f"SELECT payload FROM storage_payments WHERE {' AND '.join(clauses)} "
+            f"ORDER BY created_at DESC LIMIT ${len(args)}"
+        )
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(query, *args)
+        return [self._decode(row[0], filename=self.payments_file) for row in rows]
+
+    # ==================== DOCUMENT COMPATIBILITY VIEW ====================
+
+    async def _load_rows_document(self, conn: Any, filename: str) -> Dict[str, Any]:
+        if filename == self.balances_file:
+            rows = await conn.fetch(
+                "SELECT user_id, amount FROM storage_balances WHERE partner_id=$1",
+                self.partner_id,
+            )
+            return {str(row[0]): float(row[1]) for row in rows}
+        if filename == self.jobs_file:
+            rows = await conn.fetch(
+                "SELECT job_id, payload FROM storage_jobs WHERE partner_id=$1 ORDER BY created_at",
+                self.partner_id,
+            )
+            return {row[0]: self._decode(row[1], filename=filename) for row in rows}
+        if filename == self.payments_file:
+            rows = await conn.fetch(
+                "SELECT payment_id, payload FROM storage_payments WHERE partner_id=$1 ORDER BY created_at",
+                self.partner_id,
+            )
+            return {row[0]: self._decode(row[1], filename=filename) for row in rows}
+        rows = await conn.fetch(
+            "SELECT user_id, payload FROM storage_history WHERE partner_id=$1 ORDER BY user_id, id",
+            self.partner_id,
+        )
+        history: Dict[str, Any] = {}
+        for row in rows:
+            history.setdefault(str(row[0]), []).append(self._decode(row[1], filename=filename))
+        return history
+
+    async def _write_rows_document(
+        self,
+        conn: Any,
+        filename: str,
+        before: Dict[str, Any],
+        after: Dict[str, Any],
+    ) -> None:
+        changed, removed = diff_document(before, after)
+        if filename == self.balances_file:
+            for user_id, amount in balance_rows_from_document(changed):
+                await conn.execute(
+                    """
+                    INSERT INTO storage_balances (partner_id, user_id, amount) VALUES ($1, $2, $3)
+                    ON CONFLICT (partner_id, user_id) DO UPDATE SET amount = EXCLUDED.amount, updated_at = now()
+                    """,
+                    self.partner_id,
+                    user_id,
+                    amount,
+                )
+            ids = [value for value in (_as_int_or_none(key) for key in removed) if value is not None]
+            if ids:
+                await conn.execute(
+                    "DELETE FROM storage_balances WHERE partner_id=$1 AND user_id = ANY($2::bigint[])",
+                    self.partner_id,
+                    ids,
+                )
+            return
+        if filename in (self.jobs_file, self.payments_file):
+            is_jobs = filename == self.jobs_file
+            id_field = "job_id" if is_jobs else "payment_id"
+            upsert = self._upsert_job_row if is_jobs else self._upsert_payment_row
+            for entity_id, record in keyed_rows_from_document(changed, id_field=id_field):
+                await upsert(conn, entity_id, record)
+            if removed:
+                table = "storage_jobs" if is_jobs else "storage_payments"
+                await conn.execute(
+                    f"DELETE FROM {table} WHERE partner_id=$1 AND {id_field} = ANY($2::text[])",
+                    self.partner_id,
+                    list(removed),
+                )
+            return
+        touched_users = [key for key in list(changed) + removed if _as_int_or_none(key) is not None]
+        if touched_users:
+            await conn.execute(
+                "DELETE FROM storage_history WHERE partner_id=$1 AND user_id = ANY($2::bigint[])",
+                self.partner_id,
+                [int(key) for key in touched_users],
+            )
+        for user_id, gen_id, record in history_rows_from_document(changed):
+            await self._insert_history_row(conn, user_id, gen_id, record)
+
+    async def read_json_file(self, filename: str, default: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if filename not in self._row_files:
+            return await super().read_json_file(filename, default)
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                payload = await self._load_rows_document(conn, filename)
+        except Exception as exc:
+            self._maybe_open_circuit(exc, context="load_rows")
+            raise
+        return payload or (default or {})
+
+    async def write_json_file(self, filename: str, data: Dict[str, Any]) -> None:
+        if filename not in self._row_files:
+            await super().write_json_file(filename, data)
+            return
+        await self.update_json_file(filename, lambda _current: dict(data or {}))
+
+    async def update_json_file(
+        self,
+        filename: str,
+        update_fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+        lock_mode: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if filename not in self._row_files:
+            return await super().update_json_file(filename, update_fn, lock_mode=lock_mode)
+        from app.utils.pg_advisory_lock import acquire_advisory_xact_lock
+
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await acquire_advisory_xact_lock(conn, self._advisory_lock_key_pair(filename))
+                    current = await self._load_rows_document(conn, filename)
+                    updated = update_fn(json.loads(json.dumps(current, default=str)))
+                    await self._write_rows_document(conn, filename, current, updated or {})
+                    return updated
+        except Exception as exc:
+            self._maybe_open_circuit(exc, context="update_rows")
+            raise
+
+    # ==================== MIGRATION ====================
+
+    async def migrate_from_storage_json(self, *, pool: Optional[asyncpg.Pool] = None) -> Dict[str, int]:
+        """
+        Copy legacy storage_json documents into row tables.
+
+        Runs online: existing rows win (ON CONFLICT DO NOTHING), so writes made through the
+        row layout while the migration is in flight are never overwritten. The legacy
+        documents are left untouched for rollback.
+        """
+        migration_key = f"{ROW_LAYOUT_MIGRATION_KEY}:{self.partner_id}"
+        pool = pool or await self._get_pool()
+        counts: Dict[str, int] = {}
+        async with pool.acquire() as conn:
+            done = await conn.fetchrow("SELECT 1 FROM migrations_meta WHERE key=$1", migration_key)
+            if done is not None:
+                return counts
+            async with conn.transaction():
+                docs: Dict[str, Dict[str, Any]] = {}
+                for filename in self._row_files:
+                    raw = await conn.fetchval(
+                        "SELECT payload FROM storage_json WHERE partner_id=$1 AND filename=$2",
+                        self.partner_id,
+                        filename,
+                    )
+                    docs[filename] = self._decode(raw, filename=filename) if raw is not None else {}
+                balance_rows = balance_rows_from_document(docs[self.balances_file])
+                for user_id, amount in balance_rows:
+                    await conn.execute(
+                        "INSERT INTO storage_balances (partner_id, user_id, amount) VALUES ($1, $2, $3) "
+                        "ON CONFLICT DO NOTHING",
+                        self.partner_id,
+                        user_id,
+                        amount,
+                    )
+                counts[self.balances_file] = len(balance_rows)
+                for filename, table, id_field in (
+                    (self.jobs_file, "storage_jobs", "job_id"),
+                    (self.payments_file, "storage_payments", "payment_id"),
+                ):
+                    rows = keyed_rows_from_document(docs[filename], id_field=id_field)
+                    for entity_id, record in rows:
+                        await conn.execute(
+                            f"INSERT INTO {table} (partner_id, {id_field}, user_id, status, created_at, payload) "
+                            "VALUES ($1, $2, $3, $4, $5, $6::jsonb) ON CONFLICT DO NOTHING",
+                            self.partner_id,
+                            entity_id,
+                            _as_int_or_none(record.get("user_id")),
+                            str(record.get("status") or ""),
+                            str(record.get("created_at") or ""),
+                            json.dumps(record, default=str),
+                        )
+                    counts[filename] = len(rows)
+                history_rows = history_rows_from_document(docs[self.generations_history_file])
+                for user_id, gen_id, record in history_rows:
+                    await conn.execute(
+                        "INSERT INTO storage_history (partner_id, user_id, gen_id, created_at, payload) "
+                        "VALUES ($1, $2, $3, $4, $5::jsonb) ON CONFLICT DO NOTHING",
+                        self.partner_id,
+                        user_id,
+                        gen_id,
+                        str(record.get("timestamp") or ""),
+                        json.dumps(record, default=str),
+                    )
+                counts[self.generations_history_file] = len(history_rows)
+                raw = await conn.fetchval(
+                    "SELECT payload FROM storage_json WHERE partner_id=$1 AND filename=$2",
+                    self.partner_id,
+                    self.balance_deductions_file,
+                )
+                deductions = self._decode(raw, filename=self.balance_deductions_file) if raw is not None else {}
+                ledger_rows = ledger_rows_from_deductions(deductions)
+                for task_id, record in ledger_rows:
+                    await conn.execute(
+                        "INSERT INTO balance_ledger (partner_id, task_id, kind, user_id, amount, sku_id, model_id) "
+                        "VALUES ($1, $2, 'charge', $3, $4, $5, $6) ON CONFLICT DO NOTHING",
+                        self.partner_id,
+                        task_id,
+                        record["user_id"],
+                        record["amount"],
+                        record["sku_id"],
+                        record["model_id"],
+                    )
+                counts[self.balance_deductions_file] = len(ledger_rows)
+                await conn.execute(
+                    "INSERT INTO migrations_meta (key, completed_at) VALUES ($1, now()) ON CONFLICT (key) DO NOTHING",
+                    migration_key,
+                )
+        logger.info(
+            "[STORAGE][ROWS] migration_completed partner_id=%s counts=%s",
+            self.partner_id,
+            ",".join(f"{name}:{count}" for name, count in sorted(counts.items())) or "none",
+        )
+        return counts
+
+    async def migrate_from_github(self, github_storage: Any) -> None:
+        await super().migrate_from_github(github_storage)
+        await self._copy_documents_into_rows(github_storage, self._row_files)
+
+    async def _copy_documents_into_rows(self, source: Any, filenames: Iterable[str]) -> None:
+        for filename in filenames:
+            try:
+                payload = await source.read_json_file(filename, default={})
+            except Exception as exc:
+                logger.warning("[STORAGE][ROWS] copy_failed file=%s error=%s", filename, exc)
+                continue
+            if payload:
+                await self.update_json_file(filename, lambda current, _p=payload: {**_p, **current})
@@ -27,6 +27,9 @@ _corr_lock_drop_total = 0
 class PostgresStorage(BaseStorage):
     """PostgreSQL-backed storage that mirrors JsonStorage semantics."""
 
+    # history_service stores events as rows (see append_history_event).
+    supports_history_event_rows = True
+
     def __init__(self, dsn: str, partner_id: Optional[str] = None):
         self.dsn = dsn
         self.partner_id = (partner_id or os.getenv("PARTNER_ID") or os.getenv("BOT_INSTANCE_ID") or "").strip()
@@ -129,6 +132,25 @@ class PostgresStorage(BaseStorage):
                         ON referrals(partner_id, referrer_id);
                     CREATE INDEX IF NOT EXISTS idx_referrals_created_at
                         ON referrals(partner_id, created_at DESC);
+                    CREATE TABLE IF NOT EXISTS history_events (
+                        seq        BIGSERIAL,
+                        partner_id TEXT NOT NULL,
+                        user_id    BIGINT NOT NULL,
+                        event_id   TEXT NOT NULL,
+                        kind       TEXT NOT NULL,
+                        payload    JSONB NOT NULL,
+                        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                        PRIMARY KEY (partner_id, event_id)
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_history_events_user
+                        ON history_events(partner_id, user_id, seq DESC);
+                    CREATE TABLE IF NOT EXISTS history_event_counters (
+                        partner_id TEXT NOT NULL,
+                        user_id    BIGINT NOT NULL,
+                        kind       TEXT NOT NULL,
+                        count      BIGINT NOT NULL DEFAULT 0,
+                        PRIMARY KEY (partner_id, user_id, kind)
+                    );
                     """
                 )
         except Exception as exc:
@@ -1079,6 +1101,94 @@ class PostgresStorage(BaseStorage):
         ]
         return {"totals": totals, "recent": recent}
 
+    # ==================== HISTORY EVENTS ====================
+
+    async def append_history_event(self, user_id: int, event: Dict[str, Any]) -> bool:
+        """Insert an event once per event_id and bump the per-kind counter in the same transaction."""
+        kind = str(event.get("kind") or "legacy")
+        created_at = event.get("created_at")
+        try:
+            created_at_ts = datetime.fromisoformat(str(created_at)) if created_at else datetime.now(timezone.utc)
+        except ValueError:
+            created_at_ts = datetime.now(timezone.utc)
+        if created_at_ts.tzinfo is None:
+            created_at_ts = created_at_ts.replace(tzinfo=timezone.utc)
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                inserted = await conn.fetchval(
+                    """
+                    INSERT INTO history_events (partner_id, user_id, event_id, kind, payload, created_at)
+                    VALUES ($1, $2, $3, $4, $5::jsonb, $6)
+                    ON CONFLICT (partner_id, event_id) DO NOTHING
+                    RETURNING seq
+                    """,
+                    self.partner_id,
+                    int(user_id),
+                    str(event["event_id"]),
+                    kind,
+                    json.dumps(event.get("payload") or {}, default=str),
+                    created_at_ts,
+                )
+                if inserted is None:
+                    return False
+                await conn.execute(
+                    """
+                    INSERT INTO history_event_counters (partner_id, user_id, kind, count)
+                    VALUES ($1, $2, $3, 1)
+                    ON CONFLICT (partner_id, user_id, kind)
+                    DO UPDATE SET count = history_event_counters.count + 1
+                    """,
+                    self.partner_id,
+                    int(user_id),
+                    kind,
+                )
+        return True
+
+    async def list_history_events(
+        self,
+        user_id: int,
+        *,
+        limit: int = 10,
+        before_seq: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Newest-first events for one user, optionally older than ``before_seq``."""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT seq, event_id, kind, payload, created_at FROM history_events
+                WHERE partner_id = $1 AND user_id = $2 AND ($3::bigint IS NULL OR seq < $3)
+                ORDER BY seq DESC
+                LIMIT $4
+                """,
+                self.partner_id,
+                int(user_id),
+                before_seq,
+                int(limit),
+            )
+        return [
+            {
+                "seq": int(row["seq"]),
+                "event_id": row["event_id"],
+                "user_id": int(user_id),
+                "kind": row["kind"],
+                "payload": self._coerce_payload(row["payload"], filename="history_events"),
+                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+            }
+            for row in rows
+        ]
+
+    async def get_history_event_counters(self, user_id: int) -> Dict[str, int]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT kind, count FROM history_event_counters WHERE partner_id = $1 AND user_id = $2",
+                self.partner_id,
+                int(user_id),
+            )
+        return {row["kind"]: int(row["count"]) for row in rows}
+
     # ==================== GENERIC JSON FILES ====================
 
     async def read_json_file(self, filename: str, default: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
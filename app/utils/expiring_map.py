@@ -0,0 +1,122 @@
+"""Bounded insertion-ordered map with per-entry expiry.
+
+Entries are kept in an OrderedDict in write order; a write moves the key to
+the tail. With a uniform TTL that order is also expiry order, so expired
+entries are always at the head and ``purge`` pops them in amortized O(1) per
+write instead of scanning the whole map. ``max_size`` caps memory: when it is
+exceeded the oldest entry is evicted, so protection degrades one key at a time
+rather than being dropped all at once.
+
+Entries written with a longer TTL than their successors may linger at the
+head until they expire; reads still check each entry's own deadline, so a
+stale value is never returned.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Iterator, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class ExpiringMap(Generic[V]):
+    __slots__ = ("ttl_seconds", "max_size", "_time_fn", "_data", "evictions", "expirations")
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        *,
+        max_size: Optional[int] = None,
+        time_fn: Callable[[], float] | None = None,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size if max_size and max_size > 0 else None
+        self._time_fn = time_fn or time.monotonic
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _deadline(self, now: float, ttl_seconds: Optional[float]) -> float:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        return float("inf") if ttl is None else now + ttl
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """Pop expired entries from the head; stops at the first live one."""
+        now = self._time_fn() if now is None else now
+        data = self._data
+        removed = 0
+        while data:
+            key, (expires_at, _) = next(iter(data.items()))
+            if now <= expires_at:
+                break
+            del data[key]
+            removed += 1
+        self.expirations += removed
+        return removed
+
+    def get(self, key: Hashable, default: Any = None, *, now: Optional[float] = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        now = self._time_fn() if now is None else now
+        if now > entry[0]:
+            del self._data[key]
+            self.expirations += 1
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: V, *, ttl_seconds: Optional[float] = None, now: Optional[float] = None) -> None:
+        """Store ``value`` and restart its TTL (the key moves to the tail)."""
+        now = self._time_fn() if now is None else now
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+        data[key] = (self._deadline(now, ttl_seconds), value)
+        self.purge(now)
+        if self.max_size is not None:
+            while len(data) > self.max_size:
+                data.popitem(last=False)
+                self.evictions += 1
+
+    def add(self, key: Hashable, *, now: Optional[float] = None) -> bool:
+        """Record ``key`` unless it is already live; returns True when it was already present."""
+        now = self._time_fn() if now is None else now
+        if self.get(key, _MISSING, now=now) is not _MISSING:
+            return True
+        self.set(key, True, now=now)  # type: ignore[arg-type]
+        return False
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def items(self, *, now: Optional[float] = None) -> Iterator[Tuple[Hashable, V]]:
+        """Live entries in write order (snapshot; the map may be mutated while iterating)."""
+        now = self._time_fn() if now is None else now
+        for key, (expires_at, value) in list(self._data.items()):
+            if now <= expires_at:
+                yield key, value
+
+    def values(self, *, now: Optional[float] = None) -> Iterator[V]:
+        for _, value in self.items(now=now):
+            yield value
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size or 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -84,15 +84,16 @@ async def check_kie_api_health() -> Dict[str, Any]:
         
         # Простая проверка доступности API
         import aiohttp
+        from app.integrations.http_clients import get_session
+
         timeout = aiohttp.ClientTimeout(total=3.0)
-        
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            headers = {"Authorization": f"Bearer {kie_api_key}"}
-            async with session.get(f"{kie_api_url}/health", headers=headers) as resp:
-                if resp.status == 200:
-                    return {"status": "healthy", "message": "KIE API accessible"}
-                else:
-                    return {"status": "error", "message": f"KIE API returned {resp.status}"}
+        session = await get_session("kie_api")
+        headers = {"Authorization": f"Bearer {kie_api_key}"}
+        async with session.get(f"{kie_api_url}/health", headers=headers, timeout=timeout) as resp:
+            if resp.status == 200:
+                return {"status": "healthy", "message": "KIE API accessible"}
+            else:
+                return {"status": "error", "message": f"KIE API returned {resp.status}"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -149,6 +150,36 @@ async def health_handler(request):
         "webhook_route_registered": _webhook_route_registered,
         "health_checks": health_checks,
     }
+    try:
+        from app.storage.loop_bridge import metrics_snapshot as storage_bridge_snapshot
+
+        response_data["storage_bridge"] = storage_bridge_snapshot()
+    except Exception as exc:
+        logger.debug("healthcheck_storage_bridge_failed error=%s", exc)
+    try:
+        from app.observability.correlation_store import log_registry_gauges
+
+        response_data["correlation_registry"] = log_registry_gauges()
+    except Exception as exc:
+        logger.debug("healthcheck_correlation_registry_failed error=%s", exc)
+    try:
+        from app.integrations.payment_ocr import metrics_snapshot as payment_ocr_snapshot
+
+        response_data["payment_ocr"] = payment_ocr_snapshot()
+    except Exception as exc:
+        logger.debug("healthcheck_payment_ocr_failed error=%s", exc)
+    try:
+        from app.integrations.http_clients import log_pool_gauges
+
+        response_data["http_pools"] = log_pool_gauges()
+    except Exception as exc:
+        logger.debug("healthcheck_http_pools_failed error=%s", exc)
+    try:
+        from app.observability.loop_monitor import loop_monitor_snapshot
+
+        response_data["event_loop"] = loop_monitor_snapshot()
+    except Exception as exc:
+        logger.debug("healthcheck_event_loop_failed error=%s", exc)
     try:
         from app.config import get_settings
         settings = get_settings()
@@ -183,6 +214,17 @@ async def webhook_health_echo(request):
     )
 
 
+async def loop_diag_handler(request):
+    """Event loop lag histogram and the stacks of recent stalls."""
+    from app.observability.loop_monitor import loop_monitor_snapshot
+
+    return web.Response(
+        text=json.dumps(loop_monitor_snapshot(include_stacks=True), ensure_ascii=False, default=str),
+        content_type="application/json",
+        status=200,
+    )
+
+
 async def billing_preflight_handler(request):
     """Billing preflight diagnostic endpoint."""
     from app.diagnostics.billing_preflight import (
@@ -482,6 +524,7 @@ async def start_health_server(
     port: int = 8000,
     webhook_handler: Optional[Callable[[web.Request], Awaitable[web.StreamResponse]]] = None,
     self_check: bool = False,
+    kie_callback_handler: Optional[Callable[[web.Request], Awaitable[web.StreamResponse]]] = None,
     **kwargs,
 ):
     """Запустить healthcheck сервер в том же event loop"""
@@ -511,6 +554,7 @@ async def start_health_server(
             app.router.add_get('/__diag/billing_preflight', billing_preflight_handler)
             app.router.add_get('/diag/telegram', telegram_diag_handler)
             app.router.add_get('/diag/ready', ready_diag_handler)
+            app.router.add_get('/diag/loop', loop_diag_handler)
             app.router.add_post('/webhook/health', webhook_health_echo)
             if webhook_handler is not None:
                 try:
@@ -526,6 +570,11 @@ async def start_health_server(
             else:
                 _webhook_route_registered = False
                 logger.warning("[WEBHOOK] route_registered=false path=/webhook reason=handler_missing")
+            if kie_callback_handler is not None:
+                from app.kie.callbacks import KIE_CALLBACK_PATH
+
+                app.router.add_post(KIE_CALLBACK_PATH, kie_callback_handler)
+                logger.info("[KIE_CALLBACK] route_registered=true path=%s", KIE_CALLBACK_PATH)
 
             runner = web.AppRunner(app)
             await runner.setup()
@@ -555,6 +604,13 @@ async def start_health_server(
             _health_runner = runner
             _health_server_running = True
 
+            try:
+                from app.observability.loop_monitor import start_loop_monitor
+
+                start_loop_monitor()
+            except Exception as exc:
+                logger.warning("[HEALTH] event_loop_monitor_start_failed error=%s", exc)
+
             logger.info(f"[HEALTH] Healthcheck server started on port {port}")
             logger.info(f"[HEALTH] Endpoints: /health, /")
 
@@ -569,7 +625,14 @@ async def start_health_server(
 async def stop_health_server():
     """Остановить healthcheck сервер"""
     global _health_server, _health_runner, _health_server_running, _webhook_route_registered
-    
+
+    try:
+        from app.observability.loop_monitor import stop_loop_monitor
+
+        await stop_loop_monitor()
+    except Exception as exc:
+        logger.debug("[HEALTH] event_loop_monitor_stop_failed error=%s", exc)
+
     if _health_runner:
         try:
             await _health_runner.cleanup()
@@ -0,0 +1 @@
+"""Load benchmarks (not collected by pytest)."""
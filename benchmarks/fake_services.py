@@ -0,0 +1,240 @@
+"""Fake KIE API and Telegram Bot API served over real local HTTP.
+
+Both servers run on 127.0.0.1 with an ephemeral port inside a dedicated
+thread and event loop, so their own work does not show up as lag in the
+bot's loop.
+
+* ``FakeKieServer``: ``POST /api/v1/jobs/createTask`` and
+  ``GET /api/v1/jobs/recordInfo``. A task reports ``generating`` until
+  ``generation_seconds`` have passed, then ``success`` with a result URL that
+  points at ``/files/<task>.<ext>`` on the same server (png / mp4 / mp3,
+  guessed from the model id).
+* ``FakeBotApiServer``: ``/bot<token>/<method>`` for every Bot API method the
+  pipeline uses. It records the arrival time of each outgoing message per chat,
+  which the load runner uses for time-to-result.
+
+Every request is answered after ``latency_seconds``.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+# 1x1 transparent PNG.
+PNG_BYTES = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+_RESULT_FILES = {
+    ".png": ("image/png", PNG_BYTES),
+    ".mp4": ("video/mp4", b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 64),
+    ".mp3": ("audio/mpeg", b"ID3" + b"\x00" * 64),
+}
+
+RESULT_METHODS = frozenset({"sendPhoto", "sendVideo", "sendAudio", "sendDocument", "sendMediaGroup", "sendAnimation"})
+MESSAGE_METHODS = frozenset({"sendMessage", "editMessageText", "editMessageReplyMarkup", "editMessageCaption"}) | RESULT_METHODS
+
+
+def _result_extension(model_id: str) -> str:
+    lowered = model_id.lower()
+    if any(token in lowered for token in ("video", "sora", "kling", "hailuo", "wan", "veo")):
+        return ".mp4"
+    if any(token in lowered for token in ("audio", "speech", "music", "suno", "tts")):
+        return ".mp3"
+    return ".png"
+
+
+class _ThreadedServer:
+    """Runs an aiohttp application in its own thread and loop."""
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._ready = threading.Event()
+        self.port: Optional[int] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def build_app(self) -> web.Application:  # pragma: no cover - overridden
+        raise NotImplementedError
+
+    async def _start(self) -> None:
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    def _serve(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self) -> "_ThreadedServer":
+        self._thread = threading.Thread(target=self._serve, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        if not self._ready.wait(10):
+            raise RuntimeError(f"{type(self).__name__} did not start")
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+
+class FakeKieServer(_ThreadedServer):
+    def __init__(self, *, latency_seconds: float = 0.05, generation_seconds: float = 1.0) -> None:
+        super().__init__()
+        self.latency_seconds = latency_seconds
+        self.generation_seconds = generation_seconds
+        self._counter = itertools.count(1)
+        self._tasks: Dict[str, tuple] = {}
+        self.requests = 0
+
+    async def _delay(self) -> None:
+        self.requests += 1
+        if self.latency_seconds > 0:
+            await asyncio.sleep(self.latency_seconds)
+
+    async def _create_task(self, request: web.Request) -> web.Response:
+        await self._delay()
+        task_id = f"bench-task-{next(self._counter)}"
+        try:
+            model_id = str((await request.json()).get("model") or "")
+        except Exception:
+            model_id = ""
+        self._tasks[task_id] = (time.time(), _result_extension(model_id))
+        return web.json_response({"code": 200, "msg": "success", "data": {"taskId": task_id}})
+
+    async def _record_info(self, request: web.Request) -> web.Response:
+        await self._delay()
+        task_id = request.query.get("taskId", "")
+        task = self._tasks.get(task_id)
+        if task is None:
+            return web.json_response({"code": 404, "msg": "task not found", "data": None})
+        created, extension = task
+        now = time.time()
+        data: Dict[str, Any] = {
+            "taskId": task_id,
+            "state": "generating",
+            "createTime": int(created * 1000),
+        }
+        if now - created >= self.generation_seconds:
+            data.update(
+                state="success",
+                completeTime=int(now * 1000),
+                resultJson=json.dumps({"resultUrls": [f"{self.base_url}/files/{task_id}{extension}"]}),
+            )
+        return web.json_response({"code": 200, "msg": "success", "data": data})
+
+    async def _file(self, request: web.Request) -> web.Response:
+        await self._delay()
+        name = request.match_info["name"]
+        content_type, body = _RESULT_FILES.get(name[name.rfind("."):], _RESULT_FILES[".png"])
+        return web.Response(body=body, content_type=content_type)
+
+    async def _credits(self, request: web.Request) -> web.Response:
+        return web.json_response({"code": 200, "msg": "success", "data": 100000})
+
+    def build_app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post("/api/v1/jobs/createTask", self._create_task)
+        app.router.add_get("/api/v1/jobs/recordInfo", self._record_info)
+        app.router.add_get("/api/v1/chat/credit", self._credits)
+        app.router.add_get("/files/{name}", self._file)
+        return app
+
+
+@dataclass
+class ChatLog:
+    """Outgoing Bot API calls for one chat: (monotonic_ts, method)."""
+
+    calls: List[tuple] = field(default_factory=list)
+
+    def first_after(self, since: float, methods: frozenset) -> Optional[float]:
+        for ts, method in self.calls:
+            if ts >= since and method in methods:
+                return ts
+        return None
+
+
+class FakeBotApiServer(_ThreadedServer):
+    def __init__(self, *, latency_seconds: float = 0.03) -> None:
+        super().__init__()
+        self.latency_seconds = latency_seconds
+        self._message_ids = itertools.count(10_000)
+        self.chats: Dict[int, ChatLog] = defaultdict(ChatLog)
+        self.method_counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    async def _payload(self, request: web.Request) -> Dict[str, Any]:
+        content_type = request.content_type or ""
+        if content_type.startswith("application/json"):
+            try:
+                return dict(await request.json())
+            except Exception:
+                return {}
+        form = await request.post()
+        return {key: value for key, value in form.items() if isinstance(value, str)}
+
+    def _message(self, chat_id: Any, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"},
+            "text": payload.get("text") or payload.get("caption") or "",
+        }
+
+    async def _method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        payload = await self._payload(request)
+        if self.latency_seconds > 0:
+            await asyncio.sleep(self.latency_seconds)
+        chat_id = payload.get("chat_id")
+        with self._lock:
+            self.method_counts[method] += 1
+            if chat_id is not None and method in MESSAGE_METHODS:
+                try:
+                    self.chats[int(chat_id)].calls.append((time.monotonic(), method))
+                except (TypeError, ValueError):
+                    pass
+        if method == "getMe":
+            result: Any = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif method == "sendMediaGroup":
+            result = [self._message(chat_id or 0, payload)]
+        elif method in MESSAGE_METHODS and chat_id is not None:
+            result = self._message(chat_id, payload)
+        elif method == "getWebhookInfo":
+            result = {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def build_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self._method)
+        return app
+
+    def first_call_after(self, chat_id: int, since: float, methods: frozenset = MESSAGE_METHODS) -> Optional[float]:
+        with self._lock:
+            log = self.chats.get(int(chat_id))
+            return log.first_after(since, methods) if log is not None else None
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+End-to-end load benchmark: webhook -> generation -> delivery.
+
+Replays synthetic Telegram updates over HTTP into the aiohttp handler built by
+``main_render.build_webhook_handler`` at a fixed rate. The bot talks to a fake
+Bot API and a fake KIE API (benchmarks/fake_services.py) over real local HTTP
+with configurable latency, so the full path (PTB handlers, storage, KIE client,
+polling, media delivery) is exercised.
+
+Update mix: each update comes from a fresh user; ``--generation-ratio`` of
+them are ``confirm_generate`` callbacks for a paid model (the session and
+balance are prepared in advance), the rest are ``/start`` messages.
+
+Reported:
+  * throughput (acked updates/s) and webhook ack latency percentiles;
+  * time-to-result percentiles: until the first outgoing message for /start,
+    until the result media is sent for generations;
+  * RSS (start / peak / end) and event-loop lag percentiles;
+  * Bot API / KIE request counts.
+
+Each storage backend runs in a fresh subprocess:
+  json      - JsonStorage in a temp dir;
+  github    - GitHub storage stub with local runtime dir;
+  postgres  - needs --database-url (or BENCH_DATABASE_URL), e.g. a local
+              ``docker run -e POSTGRES_PASSWORD=bench -p 5432:5432 postgres:16``;
+              skipped with a reason in the report when no URL is given.
+
+Usage:
+    python -m benchmarks.pipeline_load --storage json,github --rate 20 --duration 30 \\
+        --kie-latency-ms 80 --tg-latency-ms 40 --generation-seconds 2 --out bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+root_dir = Path(__file__).resolve().parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.insert(0, str(root_dir))
+
+from benchmarks.fake_services import MESSAGE_METHODS, RESULT_METHODS, FakeBotApiServer, FakeKieServer  # noqa: E402
+
+REPORT_VERSION = 1
+STORAGES = ("json", "github", "postgres")
+BOT_TOKEN = "123456:BENCH_TOKEN"
+USER_ID_BASE = 700_000_000
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 2),
+        "mean": round(statistics.fmean(ordered), 2),
+    }
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as handle:
+            pages = int(handle.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _git_sha() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=root_dir, text=True).strip()
+    except Exception:
+        return None
+
+
+def _storage_env(storage: str, tmp: Path, database_url: Optional[str]) -> Dict[str, str]:
+    if storage == "json":
+        return {"STORAGE_MODE": "json", "DATA_DIR": str(tmp / "data")}
+    if storage == "github":
+        return {
+            "GITHUB_STORAGE_STUB": "1",
+            "GITHUB_TOKEN": "stub-token",
+            "GITHUB_REPO": "bench/bench",
+            "STORAGE_BRANCH": "storage",
+            "GITHUB_BRANCH": "main",
+            "RUNTIME_STORAGE_DIR": str(tmp / "runtime"),
+        }
+    if storage == "postgres":
+        return {"STORAGE_MODE": "postgres", "DATABASE_URL": database_url or ""}
+    raise ValueError(f"unknown storage {storage}")
+
+
+def _configure_env(args: argparse.Namespace, kie: FakeKieServer, tmp: Path) -> None:
+    env = {
+        "TELEGRAM_BOT_TOKEN": BOT_TOKEN,
+        "ADMIN_ID": "1",
+        "BOT_INSTANCE_ID": f"bench-{args.storage}",
+        "BOT_MODE": "webhook",
+        "WEBHOOK_BASE_URL": "http://127.0.0.1:1",
+        "KIE_API_KEY": "bench-key",
+        "KIE_API_URL": kie.base_url,
+        "KIE_STUB": "0",
+        "TEST_MODE": "0",
+        "DRY_RUN": "0",
+        "ALLOW_REAL_GENERATION": "1",
+        "WEBHOOK_PROCESS_IN_BACKGROUND": "1",
+        "WEBHOOK_EARLY_ACK": "1",
+        # All load comes from 127.0.0.1; the per-IP limiter would measure itself.
+        "WEBHOOK_IP_RATE_LIMIT_PER_SEC": "0",
+    }
+    env.update(_storage_env(args.storage, tmp, args.database_url))
+    for key in ("KIE_CALLBACK_URL", "DATABASE_URL", "STORAGE_MODE", "GITHUB_STORAGE_STUB"):
+        if key not in env:
+            os.environ.pop(key, None)
+    os.environ.update(env)
+
+
+class _LoopLagSampler:
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.samples: List[float] = []
+        self.rss_peak = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected) * 1000)
+            self.rss_peak = max(self.rss_peak, _rss_mb())
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def _message_update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}] if text.startswith("/") else [],
+        },
+    }
+
+
+def _callback_update(update_id: int, user_id: int, data: str) -> Dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": f"bench-cbq-{update_id}",
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "message": {
+                "message_id": 9,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "confirm",
+            },
+            "data": data,
+            "chat_instance": "bench",
+        },
+    }
+
+
+async def _run_storage(args: argparse.Namespace) -> Dict[str, Any]:
+    import aiohttp
+    from aiohttp import web
+
+    kie = FakeKieServer(latency_seconds=args.kie_latency_ms / 1000, generation_seconds=args.generation_seconds).start()
+    tg = FakeBotApiServer(latency_seconds=args.tg_latency_ms / 1000).start()
+    tmp = Path(tempfile.mkdtemp(prefix=f"bench-{args.storage}-"))
+    _configure_env(args, kie, tmp)
+    rss_start = _rss_mb()
+
+    import main_render
+    from telegram.ext import ExtBot
+    from telegram.request import HTTPXRequest
+
+    import bot_kie
+    from app.config import Settings, reset_settings
+    from app.session_store import get_session_store
+    from app.storage.factory import get_storage, reset_storage
+    from tests.webhook_test_utils import build_session_payload, select_paid_model
+
+    reset_settings()
+    reset_storage()
+    settings = Settings()
+    bot = ExtBot(
+        BOT_TOKEN,
+        base_url=f"{tg.base_url}/bot",
+        base_file_url=f"{tg.base_url}/file/bot",
+        request=HTTPXRequest(connection_pool_size=max(8, args.connections)),
+    )
+    application = await bot_kie.create_bot_application(settings, bot_override=bot)
+    await application.initialize()
+    main_render._app_ready_event.set()
+    # Same background workers as webhook start-up (_run_webhook_initialization).
+    bot_kie.start_delivery_reconciler(application.bot)
+    bot_kie.start_dedupe_reconciler(application.bot)
+    handler = main_render.build_webhook_handler(application, settings)
+    webhook_app = web.Application()
+    webhook_app.router.add_post("/webhook", handler)
+    runner = web.AppRunner(webhook_app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    webhook_url = f"http://127.0.0.1:{runner.addresses[0][1]}/webhook"
+
+    total = int(args.rate * args.duration)
+    every = int(round(1 / args.generation_ratio)) if args.generation_ratio > 0 else 0
+    plan = [("generation" if every and index % every == 0 else "menu") for index in range(total)]
+    selection = select_paid_model() if every else None
+    if every and selection is None:
+        raise RuntimeError("no paid model with a simple schema found in the catalog")
+    storage = get_storage()
+    session_store = get_session_store(application=application)
+    bot_kie.user_sessions = session_store
+    for index, kind in enumerate(plan):
+        if kind == "generation":
+            session, _ = build_session_payload(selection)
+            session_store.set(USER_ID_BASE + index, session)
+            await storage.set_user_balance(USER_ID_BASE + index, 1_000_000.0)
+
+    sampler = _LoopLagSampler()
+    sampler.start()
+    records: List[Dict[str, Any]] = []
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def send(index: int, kind: str) -> None:
+            user_id = USER_ID_BASE + index
+            update_id = 1_000_000 + index
+            if kind == "generation":
+                payload = _callback_update(update_id, user_id, "confirm_generate")
+            else:
+                payload = _message_update(update_id, user_id, "/start")
+            record: Dict[str, Any] = {"kind": kind, "user_id": user_id, "sent": time.monotonic()}
+            records.append(record)
+            try:
+                async with session.post(webhook_url, json=payload, headers={"X-Request-ID": f"bench-{update_id}"}) as response:
+                    await response.read()
+                    record["status"] = response.status
+            except Exception as exc:
+                record["status"] = f"error:{type(exc).__name__}"
+            record["acked"] = time.monotonic()
+
+        started = time.monotonic()
+        pending = []
+        for index, kind in enumerate(plan):
+            delay = started + index / args.rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pending.append(asyncio.create_task(send(index, kind)))
+        await asyncio.gather(*pending)
+        send_elapsed = time.monotonic() - started
+
+    deadline = time.monotonic() + args.drain_seconds
+    while time.monotonic() < deadline:
+        done = 0
+        for record in records:
+            if "result" not in record:
+                methods = RESULT_METHODS if record["kind"] == "generation" else MESSAGE_METHODS
+                ts = tg.first_call_after(record["user_id"], record["sent"], methods)
+                if ts is not None:
+                    record["result"] = ts
+            done += "result" in record
+        if done == len(records):
+            break
+        await asyncio.sleep(0.2)
+
+    await sampler.stop()
+    rss_end = _rss_mb()
+    await runner.cleanup()
+    try:
+        await application.shutdown()
+    except Exception:
+        pass
+    kie.stop()
+    tg.stop()
+
+    acked = [r for r in records if r.get("status") == 200]
+    results: Dict[str, Any] = {}
+    for kind in ("menu", "generation"):
+        subset = [r for r in records if r["kind"] == kind]
+        ttr = [(r["result"] - r["sent"]) * 1000 for r in subset if "result" in r]
+        results[kind] = dict(_percentiles(ttr), sent=len(subset), missing=len(subset) - len(ttr))
+    return {
+        "storage": args.storage,
+        "updates_sent": len(records),
+        "updates_acked": len(acked),
+        "ack_errors": len(records) - len(acked),
+        "send_seconds": round(send_elapsed, 2),
+        "throughput_updates_per_sec": round(len(acked) / send_elapsed, 2) if send_elapsed else None,
+        "ack_latency_ms": _percentiles([(r["acked"] - r["sent"]) * 1000 for r in acked]),
+        "time_to_result_ms": results,
+        "rss_mb": {"start": round(rss_start, 1), "peak": round(max(sampler.rss_peak, rss_end), 1), "end": round(rss_end, 1)},
+        "event_loop_lag_ms": _percentiles(sampler.samples),
+        "fake_kie_requests": kie.requests,
+        "bot_api_calls": dict(sorted(tg.method_counts.items())),
+    }
+
+
+def _child(args: argparse.Namespace) -> int:
+    if args.storage == "postgres" and not args.database_url:
+        report: Dict[str, Any] = {"storage": "postgres", "skipped": "no --database-url / BENCH_DATABASE_URL"}
+    else:
+        report = asyncio.run(_run_storage(args))
+    Path(args.child_out).write_text(json.dumps(report), encoding="utf-8")
+    return 0
+
+
+def _config(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "rate": args.rate,
+        "duration": args.duration,
+        "generation_ratio": args.generation_ratio,
+        "kie_latency_ms": args.kie_latency_ms,
+        "tg_latency_ms": args.tg_latency_ms,
+        "generation_seconds": args.generation_seconds,
+        "connections": args.connections,
+        "drain_seconds": args.drain_seconds,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--storage", default="json", help=f"comma separated: {', '.join(STORAGES)}")
+    parser.add_argument("--rate", type=float, default=10.0, help="updates per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--generation-ratio", type=float, default=0.25)
+    parser.add_argument("--kie-latency-ms", type=float, default=80.0)
+    parser.add_argument("--tg-latency-ms", type=float, default=40.0)
+    parser.add_argument("--generation-seconds", type=float, default=2.0)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--drain-seconds", type=float, default=60.0, help="wait for outstanding results")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--log-dir", help="where bot logs of each run go (default: system temp dir)")
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_out:
+        return _child(args)
+
+    storages = [name.strip() for name in args.storage.split(",") if name.strip()]
+    unknown = [name for name in storages if name not in STORAGES]
+    if unknown:
+        parser.error(f"unknown storage: {', '.join(unknown)}")
+
+    runs = []
+    for storage in storages:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+            child_out = handle.name
+        log_path = Path(args.log_dir or tempfile.gettempdir()) / f"pipeline_load-{storage}-{int(time.time())}.log"
+        command = [sys.executable, "-m", "benchmarks.pipeline_load", *sys.argv[1:], "--storage", storage, "--child-out", child_out]
+        print(f"running storage={storage} log={log_path}", file=sys.stderr)
+        with log_path.open("w", encoding="utf-8") as log:
+            completed = subprocess.run(command, cwd=root_dir, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            run = json.loads(Path(child_out).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            run = {"storage": storage, "error": f"run failed with exit code {completed.returncode}"}
+        finally:
+            Path(child_out).unlink(missing_ok=True)
+        run["log"] = str(log_path)
+        runs.append(run)
+
+    report = {
+        "benchmark": "pipeline_load",
+        "version": REPORT_VERSION,
+        "timestamp": int(time.time()),
+        "git_sha": _git_sha(),
+        "python": sys.version.split()[0],
+        "config": _config(args),
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    print(text)
+    return 0 if all("error" not in run for run in runs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
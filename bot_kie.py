@@ -8,7 +8,6 @@ from __future__ import annotations
 import logging
 import json
 import asyncio
-import concurrent.futures
 import contextlib
 import sys
 import os
@@ -35,6 +34,11 @@ from app.observability.structured_logs import (
 )
 from app.observability.task_lifecycle import log_task_lifecycle
 from app.observability.exception_boundary import handle_update_exception, handle_unknown_callback
+from app.buttons.dispatcher import is_legacy_route, resolve_callback_route
+from app.buttons.registry import ButtonHandler
+from app.admin.routes import register_callback_routes as register_admin_panel_routes
+from app.helpers.models_menu_handlers import register_callback_routes as register_models_menu_routes
+from app.observability.callback_route_metrics import record_route_latency
 from app.observability.no_silence_guard import track_outgoing_action
 from app.observability.cancel_metrics import increment as increment_cancel_metric
 from app.observability.trace import (
@@ -2882,7 +2886,7 @@ from asyncio import Lock
 import threading
 from http.server import BaseHTTPRequestHandler, HTTPServer
 
-# Shared HTTP client session (initialized lazily via get_http_client)
+# Shared HTTP client session (pool kie_upload, initialized lazily via get_http_client)
 _http_client: aiohttp.ClientSession | None = None
 
 # Ensure Python can find modules in the same directory (for Render compatibility)
@@ -5010,30 +5014,21 @@ async def build_admin_user_overview(target_user_id: int) -> tuple[str, InlineKey
 
 
 async def get_http_client() -> aiohttp.ClientSession:
-    """Get or create global HTTP client with connection pooling."""
+    """Общий пул kie_upload (см. app.integrations.http_clients); закрывать сессию нельзя."""
     global _http_client
-    if _http_client is None or _http_client.closed:
-        connector = aiohttp.TCPConnector(
-            limit=100,  # Max connections
-            limit_per_host=30,  # Max connections per host
-            ttl_dns_cache=300,  # DNS cache TTL
-            use_dns_cache=True,
-        )
-        timeout = aiohttp.ClientTimeout(total=60, connect=10)
-        _http_client = aiohttp.ClientSession(
-            connector=connector,
-            timeout=timeout,
-            headers={'User-Agent': 'TelegramBot/1.0'}
-        )
+    from app.integrations.http_clients import get_session
+
+    _http_client = await get_session("kie_upload")
     return _http_client
 
 
 async def cleanup_http_client():
-    """Close HTTP client on shutdown."""
+    """Close HTTP client pools on shutdown."""
     global _http_client
-    if _http_client and not _http_client.closed:
-        await _http_client.close()
-        _http_client = None
+    from app.integrations.http_clients import close_http_clients
+
+    await close_http_clients()
+    _http_client = None
 
 
 async def cleanup_storage():
@@ -5051,29 +5046,6 @@ async def cleanup_storage():
         logger.warning("Failed to close storage cleanly: %s", exc)
 
 
-def cleanup_old_sessions(max_age_seconds: int = 3600):
-    """Clean up old user sessions to prevent memory leaks (optimized for 1000+ users)."""
-    current_time = time.time()
-    keys_to_remove = []
-    
-    for user_id, session in user_sessions.items():
-        session_time = session.get('last_activity', current_time)
-        if current_time - session_time > max_age_seconds:
-            keys_to_remove.append(user_id)
-    
-    for key in keys_to_remove:
-        del user_sessions[key]
-    
-    if keys_to_remove:
-        logger.info(f"Cleaned up {len(keys_to_remove)} old user sessions")
-
-
-def update_session_activity(user_id: int):
-    """Update last activity time for user session."""
-    if user_id in user_sessions:
-        user_sessions[user_id]['last_activity'] = time.time()
-
-
 def _clear_session_flow_keys(session: dict, *, clear_gen_type: bool) -> list[str]:
     cleared_keys: list[str] = []
     for key in (
@@ -5457,17 +5429,18 @@ def _guard_sync_wrapper_in_event_loop(wrapper_name: str) -> None:
         raise RuntimeError(f"{wrapper_name} called inside running event loop")
 
 
-_storage_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
 _storage_sync_warned: set[str] = set()
 
 
 def _run_storage_coro_sync(coro, *, label: str = "storage_call"):
+    from app.storage.loop_bridge import run_storage_sync
+
     storage_mode = os.getenv("STORAGE_MODE", "unknown")
     partner_id = (os.getenv("PARTNER_ID") or os.getenv("BOT_INSTANCE_ID") or "unknown").strip()
     try:
         asyncio.get_running_loop()
     except RuntimeError:
-        return asyncio.run(coro)
+        return run_storage_sync(coro, label=label)
     if label not in _storage_sync_warned:
         _storage_sync_warned.add(label)
         logger.debug(
@@ -5476,10 +5449,9 @@ def _run_storage_coro_sync(coro, *, label: str = "storage_call"):
             storage_mode,
             partner_id,
         )
-    future = _storage_executor.submit(lambda: asyncio.run(coro))
     try:
-        return future.result(timeout=STORAGE_IO_TIMEOUT_SECONDS)
-    except concurrent.futures.TimeoutError as exc:
+        return run_storage_sync(coro, timeout=STORAGE_IO_TIMEOUT_SECONDS, label=label)
+    except TimeoutError:
         logger.error(
             "SYNC_STORAGE_CALL_TIMEOUT label=%s timeout=%.2fs storage_mode=%s partner_id=%s",
             label,
@@ -5487,7 +5459,7 @@ def _run_storage_coro_sync(coro, *, label: str = "storage_call"):
             storage_mode,
             partner_id,
         )
-        raise TimeoutError(f"{label} timed out after {STORAGE_IO_TIMEOUT_SECONDS}s") from exc
+        raise
     except Exception as exc:
         logger.error("SYNC_STORAGE_CALL_FAILED label=%s error=%s", label, exc, exc_info=True)
         raise
@@ -5500,7 +5472,7 @@ def get_user_balance(user_id: int) -> float:
 
     _guard_sync_wrapper_in_event_loop("get_user_balance")
     try:
-        return asyncio.run(get_balance_async(user_id))
+        return _run_storage_coro_sync(get_balance_async(user_id), label="get_user_balance")
     except Exception as e:
         logger.error(f"❌ Error getting user balance: {e}", exc_info=True)
         return 0.0
@@ -5518,8 +5490,8 @@ def set_user_balance(user_id: int, amount: float):
 
     _guard_sync_wrapper_in_event_loop("set_user_balance")
     try:
-        asyncio.run(set_balance_async(user_id, amount))
-        verified_balance = asyncio.run(get_balance_async(user_id))
+        _run_storage_coro_sync(set_balance_async(user_id, amount), label="set_user_balance")
+        verified_balance = _run_storage_coro_sync(get_balance_async(user_id), label="get_user_balance")
         logger.info(
             "BALANCE VERIFIED: user_id=%s balance=%.2f ₽",
             user_id,
@@ -5538,7 +5510,7 @@ def add_user_balance(user_id: int, amount: float) -> float:
 
     _guard_sync_wrapper_in_event_loop("add_user_balance")
     try:
-        return asyncio.run(add_balance_async(user_id, amount))
+        return _run_storage_coro_sync(add_balance_async(user_id, amount), label="add_user_balance")
     except Exception as e:
         logger.error(f"❌ Error adding user balance: {e}", exc_info=True)
         return get_user_balance(user_id)  # Return current balance on error
@@ -5552,7 +5524,7 @@ def subtract_user_balance(user_id: int, amount: float) -> bool:
 
     _guard_sync_wrapper_in_event_loop("subtract_user_balance")
     try:
-        return asyncio.run(subtract_balance_async(user_id, amount))
+        return _run_storage_coro_sync(subtract_balance_async(user_id, amount), label="subtract_user_balance")
     except Exception as e:
         logger.error(f"❌ Error subtracting user balance: {e}", exc_info=True)
         return False
@@ -5980,6 +5952,23 @@ async def _charge_balance_once(
     }
 
 
+async def _refund_balance_once(
+    *,
+    user_id: int,
+    task_id: Optional[str],
+    price: float,
+    reason: str,
+) -> Dict[str, Any]:
+    from app.storage.factory import get_storage
+
+    storage = get_storage()
+    if task_id and hasattr(storage, "refund_balance_once"):
+        # Ledger-backed storage refunds only a recorded charge, and at most once per task.
+        return await storage.refund_balance_once(user_id, task_id=task_id, reason=reason)
+    balance_after = await add_user_balance_async(user_id, price)
+    return {"status": "refunded", "amount": price, "balance_after": balance_after}
+
+
 async def _commit_post_delivery_charge(
     *,
     session: Dict[str, Any],
@@ -6311,7 +6300,7 @@ def give_bonus_generations(user_id: int, bonus_count: int):
         task = loop.create_task(add_referral_free_bonus(user_id, bonus_count))
         _register_background_task(task, action="referral_bonus_legacy")
     else:
-        asyncio.run(add_referral_free_bonus(user_id, bonus_count))
+        _run_storage_coro_sync(add_referral_free_bonus(user_id, bonus_count), label="referral_bonus_legacy")
 
 
 def get_user_referral_link(user_id: int, bot_username: str = None) -> str:
@@ -6666,80 +6655,93 @@ async def is_new_user_async(user_id: int) -> bool:
     return True
 
 
-async def send_broadcast(context: ContextTypes.DEFAULT_TYPE, broadcast_id: int, user_ids: list, message_text: str = None, message_photo=None):
-    """Send broadcast message to all users."""
-    sent = 0
-    delivered = 0
-    failed = 0
-    
-    for user_id in user_ids:
-        try:
-            # Skip blocked users
-            if is_user_blocked(user_id):
-                continue
-            
-            # Send message
-            if message_photo:
-                # Send photo with caption
-                try:
-                    await context.bot.send_photo(
-                        chat_id=user_id,
-                        photo=message_photo.file_id,
-                        caption=message_text,
-                        parse_mode='HTML'
-                    )
-                    delivered += 1
-                except Exception as e:
-                    logger.error(f"Error sending broadcast photo to {user_id}: {e}")
-                    failed += 1
-            else:
-                # Send text message
-                try:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=message_text,
-                        parse_mode='HTML'
-                    )
-                    delivered += 1
-                except Exception as e:
-                    logger.error(f"Error sending broadcast message to {user_id}: {e}")
-                    failed += 1
-            
-            sent += 1
-            
-            # Small delay to avoid rate limiting
-            await asyncio.sleep(0.05)  # 50ms delay between messages
-            
-        except Exception as e:
-            logger.error(f"Error in broadcast to {user_id}: {e}")
-            failed += 1
-            sent += 1
-    
-    # Update broadcast statistics
+def get_blocked_user_ids() -> set:
+    """Blocked user ids, loaded once per call as a set."""
+    blocked = load_json_file(BLOCKED_USERS_FILE, {})
+    return {int(uid) for uid, flag in blocked.items() if flag and str(uid).lstrip("-").isdigit()}
+
+
+async def _send_broadcast_message(bot, user_id: int, job) -> None:
+    if job.photo_file_id:
+        await bot.send_photo(
+            chat_id=user_id,
+            photo=job.photo_file_id,
+            caption=job.message_text,
+            parse_mode=job.parse_mode,
+        )
+    else:
+        await bot.send_message(chat_id=user_id, text=job.message_text, parse_mode=job.parse_mode)
+
+
+async def _finish_broadcast(bot, job) -> None:
+    """Переносит итоговые счётчики в broadcasts.json и уведомляет админа."""
     broadcasts = get_broadcasts()
-    if str(broadcast_id) in broadcasts:
-        broadcasts[str(broadcast_id)]['sent'] = sent
-        broadcasts[str(broadcast_id)]['delivered'] = delivered
-        broadcasts[str(broadcast_id)]['failed'] = failed
-        save_json_file(BROADCASTS_FILE, broadcasts)
-        
-        # Notify admin
-        try:
-            admin_id = ADMIN_ID
-            await context.bot.send_message(
-                chat_id=admin_id,
-                text=(
-                    f"✅ <b>Рассылка #{broadcast_id} завершена!</b>\n\n"
-                    f"📊 <b>Статистика:</b>\n"
-                    f"✅ Отправлено: {sent}\n"
-                    f"📬 Доставлено: {delivered}\n"
-                    f"❌ Ошибок: {failed}\n\n"
-                    f"📈 <b>Успешность:</b> {(delivered/sent*100) if sent > 0 else 0:.1f}%"
-                ),
-                parse_mode='HTML'
-            )
-        except Exception as e:
-            logger.error(f"Error notifying admin about broadcast: {e}")
+    broadcast_id = job.broadcast_id
+    if broadcast_id not in broadcasts:
+        return
+    broadcasts[broadcast_id]['sent'] = job.sent
+    broadcasts[broadcast_id]['delivered'] = job.delivered
+    broadcasts[broadcast_id]['failed'] = job.failed + job.unreachable
+    broadcasts[broadcast_id]['skipped_blocked'] = job.skipped_blocked
+    save_json_file(BROADCASTS_FILE, broadcasts)
+
+    sent = job.sent
+    delivered = job.delivered
+    try:
+        await bot.send_message(
+            chat_id=ADMIN_ID,
+            text=(
+                f"✅ <b>Рассылка #{broadcast_id} завершена!</b>\n\n"
+                f"📊 <b>Статистика:</b>\n"
+                f"✅ Отправлено: {sent}\n"
+                f"📬 Доставлено: {delivered}\n"
+                f"❌ Ошибок: {job.failed}\n"
+                f"🚫 Бот заблокирован: {job.unreachable}\n\n"
+                f"📈 <b>Успешность:</b> {(delivered/sent*100) if sent > 0 else 0:.1f}%"
+            ),
+            parse_mode='HTML'
+        )
+    except Exception as e:
+        logger.error(f"Error notifying admin about broadcast: {e}")
+
+
+async def send_broadcast(context: ContextTypes.DEFAULT_TYPE, broadcast_id: int, user_ids: list, message_text: str = None, message_photo=None):
+    """Send broadcast message to all users as a resumable, rate-paced job."""
+    from app.services import broadcast_service
+    from app.storage import get_storage
+
+    bot = context.bot
+    storage_instance = get_storage()
+    job = await broadcast_service.create_job(
+        storage_instance,
+        broadcast_id,
+        user_ids,
+        message_text=message_text,
+        photo_file_id=message_photo.file_id if message_photo else None,
+    )
+    await broadcast_service.run_job(
+        storage_instance,
+        job,
+        lambda user_id, current_job: _send_broadcast_message(bot, user_id, current_job),
+        blocked_ids=get_blocked_user_ids(),
+        on_complete=lambda finished_job: _finish_broadcast(bot, finished_job),
+    )
+
+
+async def resume_broadcasts(bot) -> None:
+    """Продолжает рассылки, прерванные рестартом, с сохранённого курсора."""
+    from app.services import broadcast_service
+    from app.storage import get_storage
+
+    try:
+        await broadcast_service.resume_pending_jobs(
+            get_storage(),
+            lambda user_id, job: _send_broadcast_message(bot, user_id, job),
+            blocked_ids=get_blocked_user_ids(),
+            on_complete=lambda job: _finish_broadcast(bot, job),
+        )
+    except Exception as e:
+        logger.error(f"Error resuming broadcasts: {e}")
 
 
 def is_user_blocked(user_id: int) -> bool:
@@ -6763,22 +6765,66 @@ def unblock_user(user_id: int):
         save_json_file(BLOCKED_USERS_FILE, blocked)
 
 
-def check_duplicate_payment(screenshot_file_id: str) -> bool:
+def _payment_screenshot_index():
+    """Индекс скриншотов оплаты, догнанный до payments.json; полная пересборка раз в TTL."""
+    from app.services.payment_screenshot_index import get_payment_index
+
+    index = get_payment_index()
+    payments = load_json_file(PAYMENTS_FILE, {})
+    if index.is_stale():
+        index.rebuild(payments)
+    else:
+        index.sync(payments)
+    return index
+
+
+def check_duplicate_payment(screenshot_file_id: str, screenshot_unique_id: str = None) -> bool:
     """Check if this screenshot was already used for payment."""
-    if not screenshot_file_id:
+    if not screenshot_file_id and not screenshot_unique_id:
         return False
-    payments = load_json_file(PAYMENTS_FILE, {})
-    for payment in payments.values():
-        if payment.get('screenshot_file_id') == screenshot_file_id:
-            return True
-    return False
+    key = _payment_screenshot_index().find_exact(unique_id=screenshot_unique_id, file_id=screenshot_file_id)
+    return key is not None
 
 
-def _persist_payment_record(user_id: int, amount: float, screenshot_file_id: str = None) -> tuple[dict, bool]:
+def find_similar_payment(screenshot_hash: str) -> Optional[dict]:
+    """Ближайший платёж с похожим скриншотом (dHash) или None."""
+    matches = _payment_screenshot_index().find_similar(screenshot_hash)
+    if not matches:
+        return None
+    distance, key = matches[0]
+    return {"payment_id": key, "distance": distance}
+
+
+def compute_payment_screenshot_hash(image_data: bytes) -> Optional[str]:
+    """dHash скриншота; None, если изображение не удалось прочитать."""
+    if not PIL_AVAILABLE:
+        return None
+    from app.services.payment_screenshot_index import compute_dhash
+
+    try:
+        return compute_dhash(bytes(image_data))
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to hash payment screenshot: {e}")
+        return None
+
+
+def _persist_payment_record(
+    user_id: int,
+    amount: float,
+    screenshot_file_id: str = None,
+    screenshot_unique_id: str = None,
+    screenshot_hash: str = None,
+    *,
+    status: str = "completed",
+    similar_payment: Optional[dict] = None,
+) -> tuple[dict, bool]:
     """Persist payment record and return (payment payload, is_new)."""
+    from app.services.payment_screenshot_index import get_payment_index
+
     lock = _file_locks.get('payments', _file_locks['balances'])
     payment: dict = {}
     created = False
+    index = get_payment_index()
 
     with lock:
         from app.storage.factory import get_storage
@@ -6788,15 +6834,17 @@ def _persist_payment_record(user_id: int, amount: float, screenshot_file_id: str
         def updater(payload: dict) -> dict:
             nonlocal payment, created
             updated = dict(payload or {})
-            if screenshot_file_id:
-                for key, existing in updated.items():
-                    if existing.get("screenshot_file_id") == screenshot_file_id:
-                        if "balance_charged" not in existing:
-                            existing["balance_charged"] = True
-                            updated[key] = existing
-                        payment = existing
-                        created = False
-                        return updated
+            if screenshot_file_id or screenshot_unique_id:
+                index.sync(updated)
+                key = index.find_exact(unique_id=screenshot_unique_id, file_id=screenshot_file_id)
+                existing = updated.get(key) if key is not None else None
+                if existing is not None:
+                    if "balance_charged" not in existing:
+                        existing["balance_charged"] = True
+                        updated[key] = existing
+                    payment = existing
+                    created = False
+                    return updated
 
             payment_id = len(updated) + 1
             while str(payment_id) in updated:
@@ -6808,9 +6856,14 @@ def _persist_payment_record(user_id: int, amount: float, screenshot_file_id: str
                 "amount": amount,
                 "timestamp": time.time(),
                 "screenshot_file_id": screenshot_file_id,
-                "status": "completed",
+                "screenshot_unique_id": screenshot_unique_id,
+                "screenshot_hash": screenshot_hash,
+                "status": status,
                 "balance_charged": False,
             }
+            if similar_payment:
+                payment["similar_payment_id"] = similar_payment.get("payment_id")
+                payment["similar_distance"] = similar_payment.get("distance")
             updated[str(payment_id)] = payment
             created = True
             return updated
@@ -6823,6 +6876,7 @@ def _persist_payment_record(user_id: int, amount: float, screenshot_file_id: str
         )
 
     if created:
+        index.add(str(payment["id"]), payment)
         logger.info(
             "✅ Saved payment: user_id=%s amount=%.2f payment_id=%s",
             user_id,
@@ -6832,9 +6886,17 @@ def _persist_payment_record(user_id: int, amount: float, screenshot_file_id: str
     return payment, created
 
 
-def add_payment(user_id: int, amount: float, screenshot_file_id: str = None) -> dict:
+def add_payment(
+    user_id: int,
+    amount: float,
+    screenshot_file_id: str = None,
+    screenshot_unique_id: str = None,
+    screenshot_hash: str = None,
+) -> dict:
     """Add a payment record. Returns payment dict with id, timestamp, etc."""
-    payment, created = _persist_payment_record(user_id, amount, screenshot_file_id)
+    payment, created = _persist_payment_record(
+        user_id, amount, screenshot_file_id, screenshot_unique_id, screenshot_hash
+    )
     if not payment.get("balance_charged"):
         add_user_balance(user_id, amount)
         payment["balance_charged"] = True
@@ -6867,9 +6929,17 @@ def add_payment(user_id: int, amount: float, screenshot_file_id: str = None) ->
     return payment
 
 
-async def add_payment_async(user_id: int, amount: float, screenshot_file_id: str = None) -> dict:
+async def add_payment_async(
+    user_id: int,
+    amount: float,
+    screenshot_file_id: str = None,
+    screenshot_unique_id: str = None,
+    screenshot_hash: str = None,
+) -> dict:
     """Async add payment with balance credit through async storage."""
-    payment, created = _persist_payment_record(user_id, amount, screenshot_file_id)
+    payment, created = _persist_payment_record(
+        user_id, amount, screenshot_file_id, screenshot_unique_id, screenshot_hash
+    )
     if not payment.get("balance_charged"):
         await add_user_balance_async(user_id, amount)
         payment["balance_charged"] = True
@@ -6886,6 +6956,48 @@ async def add_payment_async(user_id: int, amount: float, screenshot_file_id: str
     return payment
 
 
+async def add_payment_for_review_async(
+    user_id: int,
+    amount: float,
+    screenshot_file_id: str,
+    screenshot_unique_id: str = None,
+    screenshot_hash: str = None,
+    *,
+    similar_payment: dict,
+) -> dict:
+    """Записать платёж со статусом needs_review без начисления: скриншот похож на уже использованный."""
+    payment, _created = _persist_payment_record(
+        user_id,
+        amount,
+        screenshot_file_id,
+        screenshot_unique_id,
+        screenshot_hash,
+        status="needs_review",
+        similar_payment=similar_payment,
+    )
+    return payment
+
+
+async def notify_admin_payment_review(bot, payment: dict) -> None:
+    """Отправить админу скриншот платежа, ожидающего ручной проверки."""
+    try:
+        await bot.send_photo(
+            chat_id=ADMIN_ID,
+            photo=payment.get("screenshot_file_id"),
+            caption=(
+                f"⚠️ <b>Платёж #{payment.get('id')} требует проверки</b>\n\n"
+                f"👤 Пользователь: <code>{payment.get('user_id')}</code>\n"
+                f"💵 Сумма: {format_rub_amount(payment.get('amount', 0))}\n"
+                f"🔁 Похож на платёж #{payment.get('similar_payment_id')} "
+                f"(расстояние {payment.get('similar_distance')})\n\n"
+                f"Баланс <b>не начислен</b>."
+            ),
+            parse_mode='HTML'
+        )
+    except Exception as e:
+        logger.error(f"Error notifying admin about payment review: {e}")
+
+
 def get_all_payments() -> list:
     """Get all payments sorted by timestamp (newest first)."""
     payments = load_json_file(PAYMENTS_FILE, {})
@@ -7301,7 +7413,12 @@ def get_support_contact() -> str:
     return contact
 
 
-async def analyze_payment_screenshot(image_data: bytes, expected_amount: float, expected_phone: str = None) -> dict:
+async def analyze_payment_screenshot(
+    image_data: bytes,
+    expected_amount: float,
+    expected_phone: str = None,
+    on_queued=None,
+) -> dict:
     """
     STRICT Payment verification for СБП (Fast Bank Transfer) screenshots.
     
@@ -7316,6 +7433,9 @@ async def analyze_payment_screenshot(image_data: bytes, expected_amount: float,
     - CRITICAL keywords must be present (успешно/переведено/отправлено) OR phone must match
     - On OCR failure: REJECT (don't auto-credit)
     - Returns: {valid: bool, amount_found, phone_found, has_critical_keyword, message}
+
+    OCR runs in the app.integrations.payment_ocr process pool; on_queued(position)
+    is called when the screenshot has to wait for a free worker.
     """
     if not OCR_AVAILABLE or not PIL_AVAILABLE:
         logger.warning(f"⚠️ OCR not available. Payment verification DISABLED - will require manual review")
@@ -7327,30 +7447,27 @@ async def analyze_payment_screenshot(image_data: bytes, expected_amount: float,
         }
     
     try:
-        # Convert bytes to PIL Image
-        image = Image.open(BytesIO(image_data))
-        logger.info(f"📸 Analyzing payment screenshot ({image.size[0]}x{image.size[1]}px) for amount {expected_amount} RUB")
-        
-        # Extract text via OCR
-        extracted_text = ""
+        # OCR (декодирование, предобработка, Tesseract) — в пуле процессов, не в event loop
+        from app.integrations.payment_ocr import OcrQueueFull, recognize_payment_screenshot
+
         try:
-            extracted_text = pytesseract.image_to_string(image, lang='rus+eng')
-            logger.debug(f"✅ OCR successful (rus+eng): {len(extracted_text)} characters")
-        except Exception as e:
-            logger.warning(f"⚠️ OCR error (rus+eng): {e}")
-            # Try English only if Russian fails
-            try:
-                extracted_text = pytesseract.image_to_string(image, lang='eng')
-                logger.debug(f"✅ OCR successful (eng): {len(extracted_text)} characters")
-            except Exception as e2:
-                logger.warning(f"⚠️ OCR error (eng): {e2}")
-                # Try default
-                try:
-                    extracted_text = pytesseract.image_to_string(image)
-                    logger.debug(f"✅ OCR successful (default): {len(extracted_text)} characters")
-                except Exception as e3:
-                    logger.error(f"❌ OCR completely failed: {e3}")
-                    raise
+            ocr = await recognize_payment_screenshot(
+                bytes(image_data),
+                tesseract_cmd=pytesseract.pytesseract.tesseract_cmd,
+                on_queued=on_queued,
+            )
+        except OcrQueueFull:
+            return {
+                'valid': False,
+                'amount_found': False,
+                'phone_found': False,
+                'message': '⏳ <b>Сейчас проверяется много платежей.</b>\n\nОтправьте скриншот ещё раз через минуту или обратитесь к администратору.\n\n⚠️ Баланс <b>НЕ начислен</b> автоматически.'
+            }
+        extracted_text = ocr.text
+        logger.info(
+            f"📸 Analyzed payment screenshot ({ocr.width}x{ocr.height}px) for amount {expected_amount} RUB: "
+            f"{len(extracted_text)} characters, lang={ocr.lang}, ocr_ms={int(ocr.ocr_ms)}, queue_wait_ms={int(ocr.queue_wait_ms)}"
+        )
         
         extracted_text_lower = extracted_text.lower()
         logger.info(f"📄 Recognized text (first 300 chars): {extracted_text_lower[:300]}")
@@ -11064,7033 +11181,6901 @@ async def start_generation(update: Update, context: ContextTypes.DEFAULT_TYPE):
         _log_handler_latency("start_generation", start_ts, update)
 
 
-async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Latency wrapper for button callbacks."""
-    start_ts = time.monotonic()
+async def _handle_back_to_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """back_to_menu: возврат в главное меню."""
     query = update.callback_query
-    update_id = getattr(update, "update_id", None)
-    callback_answered = False
+    user_id = update.effective_user.id if update.effective_user else None
+    update_id = update.update_id
+    session_store = get_session_store(context)
+    # Answer callback immediately to show button was pressed
     try:
-        _create_background_task(
-            _check_and_deliver_pending_results(update, context),
-            action="pending_result_check",
+        await query.answer()
+    except:
+        pass
+    correlation_id = ensure_correlation_id(update, context)
+    partner_id = (os.getenv("PARTNER_ID") or os.getenv("BOT_INSTANCE_ID") or "default").strip() or "default"
+    try:
+        session = ensure_session_cached(context, session_store, user_id, update_id)
+        for key in ("waiting_for", "current_param", "param_history", "params"):
+            session.pop(key, None)
+        _clear_user_task_context(user_id, reason="back_to_menu", allow_mismatch=True)
+        await ensure_main_menu(update, context, source="back", correlation_id=correlation_id, prefer_edit=True)
+    except Exception as exc:
+        logger.error(
+            "BACK_TO_MENU_FAILED handler=back_to_menu user_id=%s partner_id=%s correlation_id=%s error=%s",
+            user_id,
+            partner_id,
+            correlation_id,
+            exc,
+            exc_info=True,
         )
-        if query:
-            user_id = query.from_user.id if query.from_user else None
-            user_lang = get_user_language(user_id) if user_id else "ru"
-            data = query.data
-            if data == "back_to_menu":
-                pass
-            elif data == "check_balance":
-                pass
-            elif data == "show_models":
-                pass
-            elif data == "all_models":
-                pass
-            elif data == "cancel":
-                pass
-            try:
-                await _answer_callback_early(
-                    query,
-                    user_lang=user_lang,
-                    callback_data=query.data,
-                )
-                callback_answered = True
-                if update_id is not None:
-                    track_outgoing_action(update_id, action_type="answerCallbackQuery")
-            except Exception as answer_error:
-                logger.warning("Could not answer callback query quickly: %s", answer_error)
-
-        acquired = False
-        if _callback_semaphore:
-            try:
-                await asyncio.wait_for(
-                    _callback_semaphore.acquire(),
-                    timeout=CALLBACK_CONCURRENCY_TIMEOUT_SECONDS,
-                )
-                acquired = True
-            except asyncio.TimeoutError:
-                user_id = update.effective_user.id if update.effective_user else None
-                user_lang = get_user_language(user_id) if user_id else "ru"
-                busy_text = (
-                    "⏳ <b>Сервер занят</b>\n\nПопробуйте снова через пару секунд."
-                    if user_lang == "ru"
-                    else "⏳ <b>Server busy</b>\n\nPlease try again in a few seconds."
-                )
-                reply_markup = build_back_to_menu_keyboard(user_lang)
-                if query and query.message:
-                    try:
-                        await query.message.reply_text(
-                            busy_text,
-                            parse_mode="HTML",
-                            reply_markup=reply_markup,
-                        )
-                        if update_id is not None:
-                            track_outgoing_action(update_id, action_type="send_message")
-                    except Exception:
-                        logger.warning("Failed to send busy response to user", exc_info=True)
-                return ConversationHandler.END
-        try:
-            return await _button_callback_impl(update, context, callback_answered=callback_answered)
-        finally:
-            if acquired and _callback_semaphore:
-                _callback_semaphore.release()
-    finally:
-        _log_handler_latency("button_callback", start_ts, update)
+        await _send_menu_error_notice(update, context, correlation_id=correlation_id)
+        await _show_minimal_menu(
+            update,
+            context,
+            source="back",
+            correlation_id=correlation_id,
+            prefer_edit=False,
+        )
+    return ConversationHandler.END
 
 
-async def show_admin_generation(query, context, gen: dict, current_index: int, total_count: int):
-    """Show admin generation with navigation."""
+async def _handle_gen_type_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """gen_type:<type>: меню моделей выбранного типа генерации."""
+    query = update.callback_query
+    user_id = update.effective_user.id if update.effective_user else None
+    data = query.data
+    update_id = update.update_id
+    session_store = get_session_store(context)
+    correlation_id = ensure_correlation_id(update, context)
+    # Answer callback immediately to show button was pressed
     try:
-        from datetime import datetime
-        
-        gen_id = gen.get('id', 0)
-        user_id = gen.get('user_id', 0)
-        model_id = gen.get('model_id', 'Unknown')
-        model_name = gen.get('model_name', model_id)
-        timestamp = gen.get('timestamp', 0)
-        price = gen.get('price', 0)
-        is_free = gen.get('is_free', False)
-        result_urls = gen.get('result_urls', [])
-        params = gen.get('params', {})
-        
-        if timestamp:
-            dt = datetime.fromtimestamp(timestamp)
-            date_str = dt.strftime("%d.%m.%Y %H:%M")
-        else:
-            date_str = "Неизвестно"
-        
-        user_link = f"tg://user?id={user_id}"
-        user_lang = get_user_language(query.from_user.id)
-        
-        if user_lang == 'ru':
-            gen_text = (
-                f"📚 <b>Генерация #{gen_id}</b>\n\n"
-                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"👤 <a href=\"{user_link}\">Пользователь {user_id}</a>\n"
-                f"📅 <b>Дата:</b> {date_str}\n"
-                f"🤖 <b>Модель:</b> {model_name}\n"
-                f"💰 <b>Стоимость:</b> {'🎁 Бесплатно' if is_free else format_rub_amount(price)}\n"
-                f"📦 <b>Результатов:</b> {len(result_urls)}\n\n"
-            )
-            
-            if params:
-                params_text = "\n".join([f"  • {k}: {str(v)[:50]}..." for k, v in list(params.items())[:5]])
-                gen_text += f"⚙️ <b>Параметры:</b>\n{params_text}\n\n"
-            
-            gen_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            gen_text += f"📄 {current_index + 1} из {total_count}"
-        else:
-            gen_text = (
-                f"📚 <b>Generation #{gen_id}</b>\n\n"
-                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"👤 <a href=\"{user_link}\">User {user_id}</a>\n"
-                f"📅 <b>Date:</b> {date_str}\n"
-                f"🤖 <b>Model:</b> {model_name}\n"
-                f"💰 <b>Cost:</b> {'🎁 Free' if is_free else format_rub_amount(price)}\n"
-                f"📦 <b>Results:</b> {len(result_urls)}\n\n"
-            )
-            
-            if params:
-                params_text = "\n".join([f"  • {k}: {str(v)[:50]}..." for k, v in list(params.items())[:5]])
-                gen_text += f"⚙️ <b>Parameters:</b>\n{params_text}\n\n"
-            
-            gen_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            gen_text += f"📄 {current_index + 1} of {total_count}"
-        
-        keyboard = []
-        
-        # Navigation buttons
-        if total_count > 1:
-            keyboard.append([
-                InlineKeyboardButton(t('btn_previous', lang=user_lang), callback_data=f"admin_gen_nav:prev"),
-                InlineKeyboardButton(t('btn_next', lang=user_lang), callback_data=f"admin_gen_nav:next")
-            ])
-        
-        # View result button
-        if result_urls:
-            keyboard.append([
-                InlineKeyboardButton(t('btn_view_result', lang=user_lang), callback_data=f"admin_gen_view:{current_index}")
-            ])
-        
-        # Back button
-        keyboard.append([
-            InlineKeyboardButton(t('btn_back_to_admin', lang=user_lang), callback_data="admin_stats")
-        ])
-        
-        await query.edit_message_text(
-            gen_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='HTML',
-            disable_web_page_preview=False
-        )
-    except Exception as e:
-        logger.error(f"Error showing admin generation: {e}", exc_info=True)
-        user_lang = get_user_language(query.from_user.id)
-        await query.answer(t('error_display_generation', lang=user_lang), show_alert=True)
-
+        await query.answer()
+    except:
+        pass
+    reset_session_context(
+        user_id,
+        reason="gen_type",
+        clear_gen_type=False,
+        correlation_id=correlation_id,
+        update_id=update_id,
+        chat_id=query.message.chat_id if query.message else None,
+    )
 
-async def show_payment_screenshot(query, payment: dict, current_index: int, total_count: int):
-    """Show payment screenshot with navigation."""
-    try:
-        import datetime
-        
-        payment_id = payment.get('id', 0)
-        user_id = payment.get('user_id', 0)
-        amount = payment.get('amount', 0)
-        timestamp = payment.get('timestamp', 0)
-        screenshot_file_id = payment.get('screenshot_file_id')
-        
-        if not screenshot_file_id:
-            await query.edit_message_text("❌ Скриншот не найден для этого платежа.")
-            return
-        
-        # Format payment info
-        amount_str = format_rub_amount(amount)
-        if timestamp:
-            dt = datetime.datetime.fromtimestamp(timestamp)
-            date_str = dt.strftime("%d.%m.%Y %H:%M")
-        else:
-            date_str = "Неизвестно"
-        
-        user_link = f"tg://user?id={user_id}"
-        caption = (
-            f"📸 <b>Скриншот платежа #{payment_id}</b>\n\n"
-            f"👤 <a href=\"{user_link}\">Пользователь {user_id}</a>\n"
-            f"💵 Сумма: {amount_str}\n"
-            f"📅 Дата: {date_str}\n\n"
-            f"📄 {current_index + 1} из {total_count}"
-        )
-        
-        # Create navigation keyboard
-        keyboard = []
-        nav_row = []
-        
-        if total_count > 1:
-            if current_index > 0:
-                nav_row.append(InlineKeyboardButton("◀️ Предыдущий", callback_data="payment_screenshot_nav:prev"))
-            if current_index < total_count - 1:
-                nav_row.append(InlineKeyboardButton("Следующий ▶️", callback_data="payment_screenshot_nav:next"))
-            
-            if nav_row:
-                keyboard.append(nav_row)
-        
-        keyboard.append([InlineKeyboardButton("📊 Назад к платежам", callback_data="admin_payments_back")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
-        
-        # Send photo with caption
-        try:
-            # Edit original message first to show we're loading
-            await query.edit_message_text(
-                f"📸 <b>Загрузка скриншота...</b>\n\n"
-                f"Платеж #{payment_id}",
-                parse_mode='HTML'
-            )
-            
-            # Send photo as new message
-            await query.message.reply_photo(
-                photo=screenshot_file_id,
-                caption=caption,
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-        except Exception as e:
-            logger.error(f"Error sending payment screenshot: {e}")
-            await query.edit_message_text(
-                f"❌ <b>Ошибка при загрузке скриншота</b>\n\n"
-                f"Платеж #{payment_id}\n"
-                f"Пользователь: {user_id}\n"
-                f"Сумма: {amount_str} ₽\n"
-                f"Дата: {date_str}\n\n"
-                f"⚠️ Скриншот недоступен (возможно, файл удален или недоступен)",
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-    except Exception as e:
-        logger.error(f"Error in show_payment_screenshot: {e}", exc_info=True)
+    # User selected a generation type
+    parts = data.split(":", 1)
+    if len(parts) < 2:
         try:
-            await query.edit_message_text("❌ Произошла ошибка при отображении скриншота.")
+            await query.answer("Ошибка: неверный формат запроса", show_alert=True)
         except:
             pass
-
-
-async def _button_callback_impl(
-    update: Update,
-    context: ContextTypes.DEFAULT_TYPE,
-    *,
-    callback_answered: bool = False,
-):
-    """Handle button callbacks. CRITICAL: Always calls query.answer() to prevent button hanging."""
-    import time
-    start_time = time.time()
-    query = None
-    user_id = None
-    data = None
-    user_lang = 'ru'
-    is_admin_user = False
-    session_store = get_session_store(context)
-    
-    # ==================== NO-SILENCE GUARD: Track outgoing actions ====================
-    from app.observability.no_silence_guard import get_no_silence_guard, track_outgoing_action
-    guard = get_no_silence_guard()
+        try:
+            await query.edit_message_text("❌ Ошибка: неверный формат запроса.")
+        except:
+            try:
+                await query.message.reply_text("❌ Ошибка: неверный формат запроса.")
+            except:
+                pass
+        return ConversationHandler.END
+    gen_type = parts[1]
+    session = ensure_session_cached(context, session_store, user_id, update_id)
+    session["active_gen_type"] = gen_type
+    session["gen_type"] = gen_type
+    set_session_context(
+        user_id,
+        to_context=UI_CONTEXT_MODEL_MENU,
+        reason="gen_type",
+        active_gen_type=gen_type,
+        correlation_id=correlation_id,
+        update_id=update_id,
+        chat_id=query.message.chat_id if query.message else None,
+    )
+    user_lang = get_user_language(user_id)
+    loading_text = (
+        "⏳ <b>Загружаю меню...</b>\n\nПожалуйста, подождите пару секунд."
+        if user_lang == "ru"
+        else "⏳ <b>Loading menu...</b>\n\nPlease wait a moment."
+    )
+    await _safe_edit_or_reply(query, loading_text, parse_mode="HTML")
     _create_background_task(
-        _check_and_deliver_pending_results(update, context),
-        action="pending_result_check",
+        _render_gen_type_menu(
+            query=query,
+            user_id=user_id,
+            gen_type=gen_type,
+            correlation_id=correlation_id,
+            update_id=update_id,
+        ),
+        action="render_gen_type_menu",
     )
+    return SELECTING_MODEL
+
+
+async def _handle_show_models_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """show_models / all_models: список типов генерации."""
+    query = update.callback_query
+    user_id = update.effective_user.id if update.effective_user else None
+    data = query.data
     update_id = update.update_id
     correlation_id = ensure_correlation_id(update, context)
-    # ==================== END NO-SILENCE GUARD ====================
-    
-    # 🔥 MAXIMUM LOGGING: Log entry point
+    # Answer callback immediately to show button was pressed
     try:
-        query = update.callback_query
-        user_id = query.from_user.id if query and query.from_user else None
-        data = query.data if query else None
-        if query and query.from_user:
-            _create_background_task(
-                upsert_user_registry_entry(query.from_user),
-                action="user_registry_upsert",
-            )
-        correlation_id = ensure_correlation_id(update, context)
-        chat_id = query.message.chat_id if query and query.message else None
-        message_id = query.message.message_id if query and query.message else None
-        guard.set_trace_context(
-            update,
-            context,
+        await query.answer()
+    except Exception as e:
+        logger.error(f"Error answering callback for show_models/all_models: {e}")
+        pass
+
+    logger.info(f"User {user_id} clicked 'show_models' or 'all_models' button (data: {data})")
+    reset_session_context(
+        user_id,
+        reason="show_models",
+        clear_gen_type=True,
+        correlation_id=correlation_id,
+        update_id=update_id,
+        chat_id=query.message.chat_id if query.message else None,
+    )
+    set_session_context(
+        user_id,
+        to_context=UI_CONTEXT_GEN_TYPE_MENU,
+        reason="show_models",
+        clear_gen_type=True,
+        correlation_id=correlation_id,
+        update_id=update_id,
+        chat_id=query.message.chat_id if query.message else None,
+    )
+
+    # Show generation types instead of all models with marketing text
+    generation_types = get_generation_types()
+    visible_models_by_type = {
+        gen_type: len(get_visible_models_by_generation_type(gen_type))
+        for gen_type in generation_types
+    }
+    visible_generation_types = [
+        gen_type for gen_type, count in visible_models_by_type.items() if count > 0
+    ]
+    remaining_free = await get_user_free_generations_remaining(user_id)
+    user_lang = get_user_language(user_id)
+    free_counter_line = ""
+    try:
+        free_counter_line = await _await_with_timeout(
+            get_free_counter_line(
+                user_id,
+                user_lang=user_lang,
+                correlation_id=correlation_id,
+                action_path="models_menu",
+            ),
+            timeout=MAIN_MENU_DEP_TIMEOUT_SECONDS,
+            label="models_menu_counter",
+            correlation_id=correlation_id,
             user_id=user_id,
-            chat_id=chat_id,
+            chat_id=query.message.chat_id if query.message else None,
             update_id=update_id,
-            message_id=message_id,
-            update_type="callback",
-            correlation_id=correlation_id,
-            action="CALLBACK",
-            action_path=build_action_path(data),
-            stage="UI_ROUTER",
+            default="",
         )
-        trace_event(
-            "info",
-            correlation_id,
-            event="TRACE_IN",
-            stage="UI_ROUTER",
-            update_type="callback",
-            action="CALLBACK",
-            action_path=build_action_path(data),
-            user_id=user_id,
-            chat_id=chat_id,
-            message_id=message_id,
-            callback_data=data,
-            route_decision="button_callback",
-        )
-        log_structured_event(
-            correlation_id=correlation_id,
-            user_id=user_id,
-            chat_id=chat_id,
-            update_id=update_id,
-            action="CALLBACK",
-            action_path=build_action_path(data),
-            outcome="received",
+    except Exception as exc:
+        logger.warning("Failed to resolve free counter line: %s", exc)
+
+    models_text = (
+        f"🤖 <b>ВЫБЕРИТЕ НЕЙРОСЕТЬ</b> 🤖\n\n"
+        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+        f"💡 <b>КАК ЭТО РАБОТАЕТ:</b>\n"
+        f"1️⃣ Выберите тип генерации (текст→фото, фото→видео и т.д.)\n"
+        f"2️⃣ Выберите нейросеть из списка\n"
+        f"3️⃣ Создавайте контент! 🚀\n\n"
+        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    )
+
+    if remaining_free > 0:
+        models_text += (
+            f"🎁 <b>БЕСПЛАТНО:</b> {remaining_free} генераций бесплатных моделей доступно!\n\n"
         )
-        session = get_session_cached(context, session_store, user_id, update_id, default={}) if user_id is not None else {}
-        log_structured_event(
-            correlation_id=correlation_id,
-            user_id=user_id,
-            chat_id=chat_id,
-            update_id=update_id,
-            action="UX_CLICK",
-            action_path=build_action_path(data),
-            model_id=session.get("model_id") if isinstance(session, dict) else None,
-            param={
-                "waiting_for": session.get("waiting_for") if isinstance(session, dict) else None,
-                "current_param": session.get("current_param") if isinstance(session, dict) else None,
-                "callback_data": data,
-            },
-            outcome="received",
-            error_code="UX_CLICK_OK",
-            fix_hint="Обработано нажатие кнопки.",
+
+    visible_models_count = len(_get_visible_model_ids())
+    models_text += (
+        f"📦 <b>Доступно:</b> {len(visible_generation_types)} типов генерации\n"
+        f"🤖 <b>Моделей:</b> {visible_models_count} топовых нейросетей"
+    )
+    models_text = _append_free_counter_text(models_text, free_counter_line)
+
+    keyboard = []
+
+    if user_lang == 'ru':
+        button_text = f"🆓 FAST TOOLS ({remaining_free}/{FREE_GENERATIONS_PER_DAY})"
+    else:
+        button_text = f"🆓 FAST TOOLS ({remaining_free}/{FREE_GENERATIONS_PER_DAY})"
+    keyboard.append([
+        InlineKeyboardButton(button_text, callback_data="free_tools")
+    ])
+
+    keyboard.append([])  # Empty row
+
+    # Generation types buttons (2 per row for compact display)
+    # Find text-to-image type and add it after free generation button
+    text_to_image_type = None
+    gen_type_rows = []
+    gen_type_index = 0  # Separate index for non-text-to-image types
+
+    for gen_type in generation_types:
+        gen_info = get_generation_type_info(gen_type)
+        models_count = visible_models_by_type.get(gen_type, 0)
+
+        # Skip if no models in this type
+        if models_count == 0:
+            logger.debug("No models found for generation type: %s", gen_type)
+            continue
+
+        # Identify text-to-image type (will be added separately)
+        if gen_type == 'text-to-image':
+            text_to_image_type = gen_type
+            continue
+
+        # Get translated name for generation type
+        gen_type_key = f'gen_type_{gen_type.replace("-", "_")}'
+        gen_type_name = t(gen_type_key, lang=user_lang, default=gen_info.get('name', gen_type))
+        button_text = f"{gen_type_name} ({models_count})"
+
+        # Add buttons in pairs (2 per row)
+        if gen_type_index % 2 == 0:
+            gen_type_rows.append([InlineKeyboardButton(
+                button_text,
+                callback_data=f"gen_type:{gen_type}"
+            )])
+        else:
+            if gen_type_rows:
+                gen_type_rows[-1].append(InlineKeyboardButton(
+                    button_text,
+                    callback_data=f"gen_type:{gen_type}"
+                ))
+            else:
+                gen_type_rows.append([InlineKeyboardButton(
+                    button_text,
+                    callback_data=f"gen_type:{gen_type}"
+                )])
+
+        gen_type_index += 1
+
+    # Add text-to-image button after free generation (if it exists and has models)
+    if text_to_image_type:
+        gen_info = get_generation_type_info(text_to_image_type)
+        models_count = visible_models_by_type.get(text_to_image_type, 0)
+        if models_count > 0:
+            gen_type_key = f'gen_type_{text_to_image_type.replace("-", "_")}'
+            gen_type_name = t(gen_type_key, lang=user_lang, default=gen_info.get('name', text_to_image_type))
+            button_text = f"{gen_type_name} ({models_count})"
+            keyboard.append([
+                InlineKeyboardButton(button_text, callback_data=f"gen_type:{text_to_image_type}")
+            ])
+            keyboard.append([])  # Empty row for spacing
+
+    # Add other generation types
+    keyboard.extend(gen_type_rows)
+
+    # Add free tools button (always visible, prominent)
+    keyboard.append([])  # Empty row for spacing
+    if user_lang == 'ru':
+        keyboard.append([
+            InlineKeyboardButton("🆓 FAST TOOLS", callback_data="free_tools")
+        ])
+    else:
+        keyboard.append([
+            InlineKeyboardButton("🆓 FAST TOOLS", callback_data="free_tools")
+        ])
+
+    # Add "Other models" shortcut
+    if user_lang == 'ru':
+        keyboard.append([
+            InlineKeyboardButton("🧩 Другие модели", callback_data="other_models")
+        ])
+    else:
+        keyboard.append([
+            InlineKeyboardButton("🧩 Other models", callback_data="other_models")
+        ])
+
+    # Add button to show all models directly (without grouping by type)
+    keyboard.append([])  # Empty row for spacing
+    if user_lang == 'ru':
+        keyboard.append([
+            InlineKeyboardButton(f"📋 Показать все {visible_models_count} моделей", callback_data="show_all_models_list")
+        ])
+    else:
+        keyboard.append([
+            InlineKeyboardButton(f"📋 Show all {visible_models_count} models", callback_data="show_all_models_list")
+        ])
+
+    user_lang = get_user_language(user_id)
+    keyboard.append([
+        InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+        InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+    ])
+    keyboard.append([InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")])
+
+    try:
+        await query.edit_message_text(
+            models_text,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode='HTML'
         )
-        session_get_count = get_session_get_count(context, update_id)
-        log_structured_event(
-            correlation_id=correlation_id,
-            user_id=user_id,
-            chat_id=chat_id,
-            update_id=update_id,
-            action="SESSION_GET_COUNT",
-            action_path=build_action_path(data),
-            stage="SESSION_CACHE",
-            outcome="count",
-            param={"count": session_get_count},
+    except BadRequest as exc:
+        if "Message is not modified" in str(exc):
+            await query.answer()
+            return SELECTING_MODEL
+        logger.error(f"Error editing message in show_models: {exc}", exc_info=True)
+        try:
+            await query.message.reply_text(
+                models_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
+        except:
+            pass
+    return SELECTING_MODEL
+
+
+async def _handle_back_to_confirmation_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """back_to_confirmation: возврат к экрану подтверждения."""
+    query = update.callback_query
+    user_id = update.effective_user.id if update.effective_user else None
+    await query.answer()
+    return await send_confirmation_message(update, context, user_id, source="back_to_confirmation")
+
+
+async def _handle_back_to_previous_step_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """back_to_previous_step: возврат к предыдущему параметру."""
+    query = update.callback_query
+    user_id = update.effective_user.id if update.effective_user else None
+    await query.answer("◀️ Возвращаюсь назад...")
+    user_lang = get_user_language(user_id)
+
+    if user_id not in user_sessions:
+        await query.edit_message_text(
+            t('error_try_start', lang=user_lang),
+            parse_mode='HTML'
         )
-        logger.debug(f"🔥🔥🔥 BUTTON_CALLBACK ENTRY: user_id={user_id}, data={data}, query_id={query.id if query else 'None'}, message_id={query.message.message_id if query and query.message else 'None'}")
-    except Exception as e:
-        logger.error(f"❌❌❌ ERROR in button_callback entry logging: {e}", exc_info=True)
-    
-    # CRITICAL: Always answer callback query to prevent button hanging
-    # This must be done FIRST, before any other operations
+        return ConversationHandler.END
+
+    session = user_sessions[user_id]
     try:
-        query = update.callback_query
-        if not query:
-            logger.error("No callback_query in update")
-            return ConversationHandler.END
-        
-        user_id = update.effective_user.id if update.effective_user else None
-        data = query.data if query else None
-        is_admin_user = get_is_admin(user_id) if user_id else False
-        
-        # ALWAYS answer callback immediately to prevent button hanging
-        # This is critical - if we don't answer, button will hang
-        if not callback_answered:
-            try:
-                await query.answer()
-                callback_answered = True
-                # NO-SILENCE GUARD: Track outgoing action
-                track_outgoing_action(update_id, action_type="answerCallbackQuery")
-            except Exception as answer_error:
-                logger.warning(f"Could not answer callback query: {answer_error}")
-                try:
-                    if context and query and query.id:
-                        await context.bot.answer_callback_query(query.id)
-                except Exception:
-                    pass
-                # Continue anyway - better to process than to fail completely
-        
-        if _should_dedupe_update(
+        history = session.setdefault('param_history', [])
+        params = session.get('params', {})
+        if not history:
+            logger.info(
+                "🧭 BACK: action_path=back_to_previous_step model_id=%s waiting_for=%s current_param=%s outcome=no_history",
+                session.get('model_id'),
+                session.get('waiting_for'),
+                session.get('current_param'),
+            )
+            log_structured_event(
+                correlation_id=ensure_correlation_id(update, context),
+                user_id=user_id,
+                chat_id=query.message.chat_id if query and query.message else None,
+                update_id=update.update_id,
+                action="BACK_TO_PREVIOUS_STEP",
+                action_path="back_to_previous_step",
+                model_id=session.get("model_id"),
+                stage="UI_ROUTER",
+                outcome="no_history",
+                error_code="UX_NO_HISTORY",
+                fix_hint="No previous steps in history; show menu options or continue current step.",
+                param={"waiting_for": session.get("waiting_for"), "current_param": session.get("current_param")},
+            )
+            no_history_text = (
+                "ℹ️ <b>Нечего возвращать</b>\n\n"
+                "Вы на первом шаге.\n"
+                "Код: <code>UX_NO_HISTORY</code>\n\n"
+                "Выберите действие ниже."
+                if user_lang == "ru"
+                else (
+                    "ℹ️ <b>Nothing to return</b>\n\n"
+                    "You are on the first step.\n"
+                    "Code: <code>UX_NO_HISTORY</code>\n\n"
+                    "Choose an action below."
+                )
+            )
+            keyboard = InlineKeyboardMarkup(
+                [
+                    [InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")],
+                    [InlineKeyboardButton(t('btn_all_models_short', lang=user_lang), callback_data="show_models")],
+                    [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")],
+                ]
+            )
+            await query.edit_message_text(
+                no_history_text,
+                reply_markup=keyboard,
+                parse_mode='HTML'
+            )
+            return INPUTTING_PARAMS
+
+        previous_param = history.pop()
+        if previous_param in params:
+            params.pop(previous_param, None)
+        session['params'] = params
+        session['waiting_for'] = previous_param
+        session['current_param'] = previous_param
+        logger.info(
+            "🧭 BACK: action_path=back_to_previous_step model_id=%s waiting_for=%s current_param=%s outcome=rewind",
+            session.get('model_id'),
+            session.get('waiting_for'),
+            session.get('current_param'),
+        )
+        next_param_result = await prompt_for_specific_param(
             update,
             context,
-            action="CALLBACK",
-            action_path=build_action_path(data),
-            user_id=user_id,
-            chat_id=query.message.chat_id if query and query.message else None,
-        ):
-            return ConversationHandler.END
+            user_id,
+            previous_param,
+            source="back_to_previous_step",
+        )
+        if next_param_result:
+            return next_param_result
+        return INPUTTING_PARAMS
+    except Exception as e:
+        logger.error(f"Error in back_to_previous_step: {e}", exc_info=True)
+        # Fallback: return to model selection
+        await query.edit_message_text(
+            t('error_try_start', lang=user_lang),
+            parse_mode='HTML'
+        )
+        return ConversationHandler.END
 
-        logger.info(f"Button callback received: user_id={user_id}, data='{data}'")
-        
-        if not data:
-            logger.error("No data in callback_query")
+
+async def _handle_check_balance_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """check_balance: экран баланса."""
+    query = update.callback_query
+    user_id = update.effective_user.id if update.effective_user else None
+    user_lang = get_user_language(user_id) if user_id else "ru"
+    # Answer callback immediately to show button was pressed
+    try:
+        await query.answer()
+    except:
+        pass
+    reset_session_on_navigation(user_id, reason="check_balance")
+
+    # Check user's personal balance (используем helpers для устранения дублирования)
+    try:
+        user_lang = get_user_language(user_id)
+        balance_info = await get_balance_info(user_id, user_lang)
+        balance_text = await format_balance_message(balance_info, user_lang)
+        keyboard = get_balance_keyboard(balance_info, user_lang)
+
+        try:
+            await query.edit_message_text(
+                balance_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
+        except Exception as e:
+            logger.error(f"Error editing message in check_balance: {e}", exc_info=True)
             try:
-                user_lang = get_user_language(user_id) if user_id else 'ru'
-                await query.answer(t('error_no_data', lang=user_lang), show_alert=True)
+                await query.message.reply_text(
+                    balance_text,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML'
+                )
             except:
-                try:
-                    await query.answer("❌ Ошибка: нет данных в кнопке", show_alert=True)
-                except:
-                    pass
-            return ConversationHandler.END
-        
-        # Get user language early for error messages
+                pass
+    except Exception as e:
+        logger.error(f"Error in check_balance: {e}", exc_info=True)
         try:
-            user_lang = get_user_language(user_id) if user_id else 'ru'
+            await query.answer("❌ Ошибка при проверке баланса", show_alert=True)
         except:
-            user_lang = 'ru'
+            pass
+    return ConversationHandler.END
 
-        if context and getattr(context, "user_data", None) is not None:
-            context.user_data["last_callback_handled_update_id"] = update_id
 
-        if data.startswith("type_header:"):
-            model_type = data.split(":", 1)[1] if ":" in data else ""
-            user_lang = get_user_language(user_id) if user_id else "ru"
-            from app.helpers.models_menu import build_models_menu_for_type, get_type_label
+async def _handle_model_card_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, *, data: Optional[str] = None):
+    """model:<id> / modelk:<id>: карточка модели."""
+    query = update.callback_query
+    data = data or query.data
+    user_id = update.effective_user.id if update.effective_user else None
+    try:
+        await query.answer()
+    except:
+        pass
 
-            keyboard_markup, models_count = build_models_menu_for_type(user_lang, model_type)
-            type_label = get_type_label(model_type, user_lang)
-            if user_lang == "ru":
-                header_text = (
-                    f"📂 <b>Раздел:</b> {type_label}\n\n"
-                    f"Доступно моделей: <b>{models_count}</b>\n\n"
-                    "Выберите модель ниже."
-                )
-            else:
-                header_text = (
-                    f"📂 <b>Section:</b> {type_label}\n\n"
-                    f"Available models: <b>{models_count}</b>\n\n"
-                    "Select a model below."
-                )
-            try:
-                await query.edit_message_text(
-                    header_text,
-                    reply_markup=keyboard_markup,
-                    parse_mode="HTML",
-                )
-            except Exception as exc:
-                logger.warning("Failed to render type filter menu: %s", exc)
-                try:
-                    await query.message.reply_text(
-                        header_text,
-                        reply_markup=keyboard_markup,
-                        parse_mode="HTML",
-                    )
-                except Exception:
-                    await query.answer("⚠️ Не удалось открыть раздел", show_alert=True)
+    # Используем новый каталог
+    user_lang = get_user_language(user_id)
+
+    try:
+        from app.helpers.models_menu_handlers import handle_model_callback
+        success = await handle_model_callback(query, user_id, user_lang, data)
+
+        if success:
             return SELECTING_MODEL
+        else:
+            return ConversationHandler.END
+    except Exception as e:
+        logger.error(f"Error in handle_model_callback: {e}", exc_info=True)
+        if user_lang == 'ru':
+            await query.answer("❌ Ошибка при загрузке модели", show_alert=True)
+        else:
+            await query.answer("❌ Error loading model", show_alert=True)
+        return ConversationHandler.END
 
-        if data == "other_models":
-            try:
-                await query.answer()
-            except Exception as exc:
-                logger.warning("Error answering callback for other_models: %s", exc)
-            user_lang = get_user_language(user_id) if user_id else "ru"
-            reset_session_context(
-                user_id,
-                reason="other_models",
-                clear_gen_type=True,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                chat_id=query.message.chat_id if query.message else None,
-            )
-            set_session_context(
-                user_id,
-                to_context=UI_CONTEXT_MODEL_MENU,
-                reason="other_models",
-                clear_gen_type=True,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                chat_id=query.message.chat_id if query.message else None,
+    # Fallback на старый код (если новый обработчик не сработал)
+    parts = data.split(":", 1)
+    if len(parts) < 2:
+        user_lang = get_user_language(user_id)
+        await query.answer(t('error_invalid_model', lang=user_lang, default="❌ Ошибка: неверный формат запроса"), show_alert=True)
+        return ConversationHandler.END
+
+    model_id = parts[1] if len(parts) > 1 else None
+    if not model_id:
+        # Пробуем разрешить через новый каталог
+        from app.helpers.models_menu import resolve_model_id_from_callback
+        model_id = resolve_model_id_from_callback(data)
+
+    if not model_id:
+        user_lang = get_user_language(user_id)
+        await query.answer(t('error_model_not_found', lang=user_lang, default="❌ Модель не найдена"), show_alert=True)
+        return ConversationHandler.END
+
+    # Пробуем получить из нового каталога
+    from app.kie_catalog import get_model as get_model_from_catalog
+    catalog_model = get_model_from_catalog(model_id)
+
+    if catalog_model:
+        # Используем новый каталог
+        from app.helpers.models_menu import build_model_card_text
+        card_text, keyboard_markup = build_model_card_text(catalog_model, 0, user_lang)
+        try:
+            await query.edit_message_text(
+                card_text,
+                reply_markup=keyboard_markup,
+                parse_mode='HTML'
             )
-            try:
-                from app.helpers.models_menu_handlers import handle_model_callback
-                await handle_model_callback(
-                    query,
-                    user_id,
-                    user_lang,
-                    "model:sora-watermark-remover",
-                )
-                return SELECTING_MODEL
-            except Exception as exc:
-                logger.error("Error in other_models handler: %s", exc, exc_info=True)
-                fallback_text = (
-                    "❌ Не удалось открыть модель. Попробуйте позже."
-                    if user_lang == "ru"
-                    else "❌ Unable to open model. Please try again later."
-                )
-                try:
-                    await query.answer(fallback_text, show_alert=True)
-                except Exception:
-                    pass
-                await show_main_menu(update, context, source="other_models_error")
-                return ConversationHandler.END
+            return SELECTING_MODEL
+        except Exception as e:
+            logger.error(f"Error showing model card: {e}", exc_info=True)
+            await query.answer("❌ Ошибка при отображении модели", show_alert=True)
+            return ConversationHandler.END
 
-        if data == "cancel_command":
-            session = user_sessions.get(user_id, {}) if user_id else {}
-            job_id = session.get("job_id") if isinstance(session, dict) else None
-            if job_id and user_id is not None:
-                now_ms = _now_ms()
-                _set_user_ui_action(user_id, "cancel_click", now_ms)
-                if isinstance(session, dict):
-                    session["last_ui_action"] = "cancel_click"
-                    session["last_ui_ts_ms"] = now_ms
-                accepted = await _request_job_cancel(
-                    update=update,
-                    context=context,
-                    job_id=job_id,
-                    user_id=user_id,
-                    user_lang=user_lang,
-                    callback_data="cancel_command",
-                    query=query,
-                    correlation_id=correlation_id,
-                    state_source="callback",
-                )
-                if accepted:
-                    _clear_user_task_context(
-                        user_id,
-                        reason="cancel_accepted",
-                        task_id=session.get("task_id"),
-                        allow_mismatch=True,
-                    )
-                    await ensure_main_menu(
-                        update,
-                        context,
-                        source="cancel_generation",
-                        prefer_edit=False,
-                    )
-                    return ConversationHandler.END
+    # Fallback на старый код
+    model = get_model_by_id(model_id)
+
+    if not model:
+        user_lang = get_user_language(user_id)
+        await query.answer(t('error_model_not_found', lang=user_lang, default="❌ Модель не найдена"), show_alert=True)
+        return ConversationHandler.END
+
+    # Нормализуем модель для единообразного использования
+    try:
+        from kie_models import normalize_model_for_api
+        normalized = normalize_model_for_api(model)
+    except:
+        normalized = model
+
+    user_lang = get_user_language(user_id)
+
+    # Формируем карточку модели
+    title = normalized.get('title') or normalized.get('name') or model_id
+    emoji = normalized.get('emoji', '')
+    gen_type = normalized.get('generation_type', 'unknown')
+    help_text = normalized.get('help') or normalized.get('description', '')
+    input_schema = normalized.get('input_schema') or normalized.get('input_params', {})
+
+    # Формируем улучшенный текст карточки модели
+    if user_lang == 'ru':
+        model_info_text = (
+            f"{emoji} <b>{title}</b>\n\n"
+            f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            f"📋 <b>Тип генерации:</b> {gen_type.replace('_', '-')}\n\n"
+            f"ℹ️ <b>Описание:</b>\n{help_text}\n\n"
+        )
+
+        # Добавляем информацию о параметрах (без технической схемы)
+        if input_schema:
+            required_params = [k for k, v in input_schema.items() if v.get('required', False)]
+            optional_params = [k for k, v in input_schema.items() if not v.get('required', False)]
+
+            model_info_text += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            model_info_text += "⚙️ <b>Основные параметры:</b>\n"
+            if required_params:
+                model_info_text += f"• Обязательные: {', '.join(required_params[:5])}"
+                if len(required_params) > 5:
+                    model_info_text += f" и еще {len(required_params) - 5}"
+                model_info_text += "\n"
+            if optional_params:
+                model_info_text += f"• Опциональные: {', '.join(optional_params[:5])}"
+                if len(optional_params) > 5:
+                    model_info_text += f" и еще {len(optional_params) - 5}"
+                model_info_text += "\n"
+            model_info_text += "\n"
+
+        model_info_text += (
+            "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            "💡 <b>Совет:</b> После начала генерации вы сможете настроить все параметры пошагово.\n\n"
+            "🚀 <b>Готовы начать?</b> Нажмите кнопку ниже!"
+        )
+    else:
+        model_info_text = (
+            f"{emoji} <b>{title}</b>\n\n"
+            f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            f"📋 <b>Generation type:</b> {gen_type.replace('_', '-')}\n\n"
+            f"ℹ️ <b>Description:</b>\n{help_text}\n\n"
+        )
+
+        # Add parameter info (without technical schema)
+        if input_schema:
+            required_params = [k for k, v in input_schema.items() if v.get('required', False)]
+            optional_params = [k for k, v in input_schema.items() if not v.get('required', False)]
+
+            model_info_text += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            model_info_text += "⚙️ <b>Main parameters:</b>\n"
+            if required_params:
+                model_info_text += f"• Required: {', '.join(required_params[:5])}"
+                if len(required_params) > 5:
+                    model_info_text += f" and {len(required_params) - 5} more"
+                model_info_text += "\n"
+            if optional_params:
+                model_info_text += f"• Optional: {', '.join(optional_params[:5])}"
+                if len(optional_params) > 5:
+                    model_info_text += f" and {len(optional_params) - 5} more"
+                model_info_text += "\n"
+            model_info_text += "\n"
+
+        model_info_text += (
+            "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            "💡 <b>Tip:</b> After starting generation, you'll be able to configure all parameters step by step.\n\n"
+            "🚀 <b>Ready to start?</b> Click the button below!"
+        )
+
+    logger.info(f"✅ [UX IMPROVEMENT] Sending improved model card to user {user_id} for model {model_id}")
+
+    # Кнопки
+    if user_lang == 'ru':
+        keyboard = [
+            [InlineKeyboardButton("✅ Начать генерацию", callback_data=f"start:{model_id}")],
+            [InlineKeyboardButton("ℹ️ Пример запроса", callback_data=f"example:{model_id}")],
+            [InlineKeyboardButton("⬅️ Назад", callback_data="back_to_menu")]
+        ]
+    else:
+        keyboard = [
+            [InlineKeyboardButton("✅ Start generation", callback_data=f"start:{model_id}")],
+            [InlineKeyboardButton("ℹ️ Example request", callback_data=f"example:{model_id}")],
+            [InlineKeyboardButton("⬅️ Back", callback_data="back_to_menu")]
+        ]
+
+    await query.edit_message_text(
+        text=model_info_text,
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode='HTML'
+    )
+    return ConversationHandler.END
+
+
+async def _handle_select_model_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, *, data: Optional[str] = None, mode_selected: bool = False):
+    """select_model:<id> / sel:<id>: запуск сценария генерации для модели."""
+    query = update.callback_query
+    data = data or query.data
+    user_id = update.effective_user.id if update.effective_user else None
+    update_id = update.update_id
+    session_store = get_session_store(context)
+    correlation_id = ensure_correlation_id(update, context)
+    user_lang = get_user_language(user_id) if user_id else "ru"
+    # Handle short format sel: -> select_model:
+    if data.startswith("sel:"):
+        parts = data.split(":", 1)
+        if len(parts) >= 2:
+            model_id = parts[1]
+            # Try to find full model_id by prefix (for backward compatibility)
+            # In most cases, sel: prefix means it was truncated, so we need to search
+            models = get_models_sync()
+            matching_models = [m for m in models if m.get('id', '').startswith(model_id)]
+            if matching_models:
+                model_id = canonicalize_model_id(matching_models[0].get('id'))
+                data = f"select_model:{model_id}"
+            else:
+                data = f"select_model:{canonicalize_model_id(model_id)}"
+
+    # 🔥 MAXIMUM LOGGING: select_model entry
+    logger.debug(f"🔥🔥🔥 SELECT_MODEL START: user_id={user_id}, data={data}")
+    reset_session_context(
+        user_id,
+        reason="select_model",
+        clear_gen_type=False,
+        correlation_id=correlation_id,
+        update_id=update_id,
+        chat_id=query.message.chat_id if query.message else None,
+    )
+    if not mode_selected and user_id in user_sessions:
+        user_sessions[user_id].pop("mode_index", None)
+
+    # Answer callback immediately to show button was pressed
+    try:
+        await query.answer()
+        logger.info(f"✅ Query answered for select_model: user_id={user_id}")
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to answer query: {e}")
+
+    parts = data.split(":", 1)
+    if len(parts) < 2:
+        logger.error(f"❌ Invalid select_model format: data={data}, user_id={user_id}")
+        try:
+            await query.answer("Ошибка: неверный формат запроса", show_alert=True)
+        except:
+            pass
+        try:
+            await query.edit_message_text("❌ Ошибка: неверный формат запроса.")
+        except:
             try:
-                await query.answer("Операция отменена" if user_lang == "ru" else "Cancelled")
-            except Exception:
+                await query.message.reply_text("❌ Ошибка: неверный формат запроса.")
+            except:
                 pass
-            if user_id is not None:
-                _clear_user_task_context(
-                    user_id,
-                    reason="cancel_callback",
-                    task_id=session.get("task_id") if isinstance(session, dict) else None,
-                    allow_mismatch=True,
-                )
-            await ensure_main_menu(update, context, source="cancel", prefer_edit=False)
-            return ConversationHandler.END
+        return ConversationHandler.END
+    model_id = canonicalize_model_id(parts[1])
+    logger.debug(f"🔥🔥🔥 SELECT_MODEL: Parsed model_id={model_id}, user_id={user_id}")
 
-        if data == "reset_step":
-            session_store.clear(user_id)
-            await show_main_menu(update, context, source="reset_step")
-            track_outgoing_action(update_id, action_type="edit_message_text")
-            return ConversationHandler.END
+    # Сначала пробуем получить из нового каталога
+    model_info = None
+    catalog_model = None
+    try:
+        from app.kie_catalog import get_model as get_model_from_catalog
+        catalog_model = get_model_from_catalog(model_id)
+        if catalog_model:
+            # Преобразуем catalog_model в формат model_info для совместимости
+            model_info = {
+                'id': catalog_model.id,
+                'name': catalog_model.title_ru,
+                'emoji': '🤖',  # Будет определено позже
+                'description': catalog_model.title_ru,
+                'category': catalog_model.type,
+                'coming_soon': False
+            }
+            logger.info(f"✅ SELECT_MODEL: Found in catalog: model_id={model_id}, name={catalog_model.title_ru}, user_id={user_id}")
+    except Exception as e:
+        logger.warning(f"⚠️ SELECT_MODEL: Error loading from catalog: {e}, trying registry")
 
-        if data == "reset_wizard":
-            session_store.clear(user_id)
-            await show_main_menu(update, context, source="reset_wizard")
-            track_outgoing_action(update_id, action_type="edit_message_text")
-            return ConversationHandler.END
+    # Если не нашли в каталоге, пробуем старый реестр
+    if not model_info:
+        model_info = get_model_by_id_from_registry(model_id)
+        logger.debug(f"🔥🔥🔥 SELECT_MODEL: Model lookup result: found={bool(model_info)}, model_name={model_info.get('name', 'N/A') if model_info else 'N/A'}, user_id={user_id}")
 
-        # 🔥🔥🔥 SUPER-DETAILED CONTEXT LOGGING
+    if not model_info:
+        logger.error(f"❌❌❌ MODEL NOT FOUND: model_id={model_id}, user_id={user_id}")
+        user_lang = get_user_language(user_id)
+        error_msg = t('error_model_not_found', lang=user_lang, default=f"❌ Модель {model_id} не найдена")
         try:
-            session = get_session_cached(context, session_store, user_id, update_id, default=None) if user_id else None
-            session_keys = list(session.keys()) if session else []
-            session_model_id = session.get('model_id') if session else None
-            session_waiting_for = session.get('waiting_for') if session else None
-            session_current_param = session.get('current_param') if session else None
-            session_params_keys = list(session.get('params', {}).keys()) if session else []
-            session_required = session.get('required', []) if session else []
-            session_properties_keys = list(session.get('properties', {}).keys()) if session else []
-            chat_id = query.message.chat_id if query and query.message else None
-            message_id = query.message.message_id if query and query.message else None
-            if DEBUG_VERBOSE_LOGS:
-                logger.info(
-                    "BUTTON_CALLBACK_CONTEXT "
-                    "user_id=%s data=%s chat_id=%s message_id=%s update_id=%s user_lang=%s "
-                    "session_exists=%s model_id=%s waiting_for=%s current_param=%s "
-                    "params_keys=%s required=%s properties_keys=%s session_keys=%s",
-                    user_id,
-                    data,
-                    chat_id,
-                    message_id,
-                    update_id,
-                    user_lang,
-                    bool(session),
-                    session_model_id,
-                    session_waiting_for,
-                    session_current_param,
-                    session_params_keys[:15],
-                    session_required[:15],
-                    session_properties_keys[:15],
-                    session_keys[:15],
-                )
+            await query.edit_message_text(error_msg)
+        except:
             try:
-                trace_event(
-                    "info",
-                    correlation_id,
-                    event="TRACE_IN",
-                    stage="SESSION_LOAD",
-                    update_type="callback",
-                    action="CALLBACK",
-                    action_path=build_action_path(data),
+                await query.message.reply_text(error_msg)
+            except:
+                await query.answer(error_msg, show_alert=True)
+        return ConversationHandler.END
+
+    # Check if model is coming soon - НЕ показываем пользователю, просто возвращаем в меню
+    if model_info.get('coming_soon', False):
+        user_lang = get_user_language(user_id)
+        # Не показываем "COMING SOON" - просто возвращаем в меню
+        keyboard = [
+            [InlineKeyboardButton(t('btn_back_to_models', lang=user_lang), callback_data="back_to_menu")]
+        ]
+
+        await query.edit_message_text(
+            t('error_model_unavailable', lang=user_lang) or "Модель временно недоступна",
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode='HTML'
+        )
+        return ConversationHandler.END
+
+    # Load model spec early (needed for multi-mode selection)
+    from app.kie_catalog import get_model
+    model_spec = get_model(model_id)
+    if not model_spec:
+        await query.edit_message_text(
+            "❌ <b>Модель не найдена в каталоге</b>",
+            parse_mode='HTML'
+        )
+        return ConversationHandler.END
+    from app.pricing.coverage_guard import (
+        DISABLED_REASON_NO_PRICE,
+        get_disabled_model_info,
+        get_pricing_preflight_status,
+    )
+    preflight_status = get_pricing_preflight_status()
+    if preflight_status.get("degraded"):
+        user_lang = get_user_language(user_id)
+        pricing_error = preflight_status.get("error") or "unknown"
+        message_text = (
+            "⚠️ <b>Прайс временно недоступен</b>\n\n"
+            "Мы не успели прогреть прайс. Попробуйте позже или выберите другую модель.\n\n"
+            f"Лог: <code>{correlation_id}</code>"
+            if user_lang == "ru"
+            else (
+                "⚠️ <b>Pricing temporarily unavailable</b>\n\n"
+                "We are still warming up pricing data. Please try again later.\n\n"
+                f"Log: <code>{correlation_id}</code>"
+            )
+        )
+        keyboard = InlineKeyboardMarkup(
+            [[InlineKeyboardButton("Модели/Главное меню", callback_data="back_to_menu")]]
+        )
+        log_structured_event(
+            correlation_id=correlation_id,
+            user_id=user_id,
+            chat_id=query.message.chat_id if query.message else None,
+            update_id=update_id,
+            action="PRICING_PREFLIGHT_DEGRADED",
+            action_path="select_model",
+            model_id=model_id,
+            stage="MODEL_SELECT",
+            outcome="blocked",
+            error_code="PRICING_PREFLIGHT_DEGRADED",
+            param={"error": pricing_error},
+        )
+        await query.edit_message_text(message_text, reply_markup=keyboard, parse_mode="HTML")
+        return ConversationHandler.END
+    from app.ux.model_visibility import (
+        evaluate_model_visibility,
+        STATUS_BLOCKED_NO_PRICE,
+        STATUS_READY_VISIBLE,
+    )
+    visibility = evaluate_model_visibility(model_id)
+    if visibility.status != STATUS_READY_VISIBLE:
+        user_lang = get_user_language(user_id)
+        disabled_info = get_disabled_model_info(model_id)
+        if visibility.status == STATUS_BLOCKED_NO_PRICE or (
+            disabled_info and disabled_info.reason == DISABLED_REASON_NO_PRICE
+        ):
+            message_text = (
+                "Модель временно отключена: отсутствует прайс для выбранных параметров. "
+                "Выберите другую модель."
+            )
+            keyboard = InlineKeyboardMarkup(
+                [[InlineKeyboardButton("Модели/Главное меню", callback_data="back_to_menu")]]
+            )
+            log_structured_event(
+                correlation_id=correlation_id,
+                user_id=user_id,
+                chat_id=query.message.chat_id if query.message else None,
+                update_id=update_id,
+                action="MODEL_DISABLED",
+                action_path="select_model",
+                model_id=model_id,
+                stage="MODEL_SELECT",
+                outcome="blocked",
+                error_code=DISABLED_REASON_NO_PRICE,
+                param={
+                    "issues": disabled_info.issues if disabled_info else visibility.issues,
+                    "status": visibility.status,
+                },
+            )
+            await query.edit_message_text(message_text, reply_markup=keyboard)
+            return ConversationHandler.END
+
+        issues = "\n".join(f"• {issue}" for issue in visibility.issues) if visibility.issues else ""
+        if user_lang == "ru":
+            blocked_text = (
+                "⛔️ <b>Модель недоступна</b>\n\n"
+                f"Причина: <code>{visibility.status}</code>\n"
+                f"{issues or '• Причина не указана'}"
+            )
+        else:
+            blocked_text = (
+                "⛔️ <b>Model unavailable</b>\n\n"
+                f"Reason: <code>{visibility.status}</code>\n"
+                f"{issues or '• No details available'}"
+            )
+        await query.edit_message_text(blocked_text, parse_mode="HTML")
+        return ConversationHandler.END
+
+    session = ensure_session_cached(context, session_store, user_id, update_id)
+    session["model_id"] = model_id
+    session["model_info"] = model_info
+    session["active_model_id"] = model_id
+    session_gen_type = _resolve_session_gen_type(session, None)
+    model_gen_type = _derive_model_gen_type(model_spec)
+    if model_gen_type:
+        session["active_gen_type"] = model_gen_type
+        session["gen_type"] = model_gen_type
+    registry_gen_type = session.get("gen_type") or session_gen_type
+    registry_entry = await _get_registry_model_entry(
+        model_id,
+        correlation_id=correlation_id,
+        user_id=user_id,
+        gen_type=registry_gen_type,
+    )
+    if not registry_entry and model_gen_type and registry_gen_type != model_gen_type:
+        registry_entry = await _get_registry_model_entry(
+            model_id,
+            correlation_id=correlation_id,
+            user_id=user_id,
+            gen_type=model_gen_type,
+        )
+    if not registry_entry and registry_gen_type is not None:
+        registry_entry = await _get_registry_model_entry(
+            model_id,
+            correlation_id=correlation_id,
+            user_id=user_id,
+            gen_type=None,
+        )
+    registry_kie_model = registry_entry.get("kie_model") if registry_entry else None
+    if not registry_entry or (
+        registry_kie_model and registry_kie_model != model_spec.kie_model
+    ):
+        user_lang = get_user_language(user_id)
+        notice_text = (
+            "🔄 <b>Модель обновилась или недоступна</b>\n\n"
+            "Пожалуйста, выберите модель из актуального списка."
+            if user_lang == "ru"
+            else "🔄 <b>Model updated or unavailable</b>\n\nPlease choose from the current list."
+        )
+        gen_type_hint = (
+            session.get("active_gen_type")
+            or session.get("gen_type")
+            or _derive_model_gen_type(model_spec)
+        )
+        loading_text = (
+            f"{notice_text}\n\n⏳ <b>Обновляю меню...</b>"
+            if user_lang == "ru"
+            else f"{notice_text}\n\n⏳ <b>Refreshing menu...</b>"
+        )
+        await _safe_edit_or_reply(query, loading_text, parse_mode="HTML")
+        if gen_type_hint:
+            _create_background_task(
+                _render_gen_type_menu(
+                    query=query,
                     user_id=user_id,
-                    chat_id=chat_id,
-                    session_exists=bool(session),
-                    model_id=session_model_id,
-                    waiting_for=session_waiting_for,
-                    current_param=session_current_param,
-                    params_keys=session_params_keys[:15],
-                    required=session_required[:15],
-                    param_order=session.get("param_order")[:15] if session and session.get("param_order") else None,
-                )
-            except Exception as trace_exc:
-                logger.warning("TRACE session load failed: %s", trace_exc, exc_info=True)
-            try:
-                correlation_id = None
-                if context and getattr(context, "user_data", None) is not None:
-                    if context.user_data.get("correlation_update_id") == update_id:
-                        correlation_id = context.user_data.get("correlation_id")
-                    if not correlation_id:
-                        correlation_id = get_correlation_id(update_id, user_id)
-                        context.user_data["correlation_id"] = correlation_id
-                        context.user_data["correlation_update_id"] = update_id
-                else:
-                    correlation_id = get_correlation_id(update_id, user_id)
+                    gen_type=_normalize_gen_type(gen_type_hint) or gen_type_hint,
+                    correlation_id=correlation_id,
+                    update_id=update_id,
+                    notice_text=notice_text,
+                ),
+                action="render_gen_type_menu_refresh",
+            )
+        else:
+            reply_markup = build_back_to_menu_keyboard(user_lang)
+            await _safe_edit_or_reply(query, notice_text, reply_markup=reply_markup)
+        return ConversationHandler.END
 
+    if session_gen_type and model_gen_type and session_gen_type != model_gen_type:
+        log_structured_event(
+            correlation_id=correlation_id,
+            user_id=user_id,
+            chat_id=query.message.chat_id if query.message else None,
+            update_id=update_id,
+            action="GEN_TYPE_AUTO_SWITCH_ON_SELECT",
+            action_path="select_model",
+            model_id=model_id,
+            gen_type=model_gen_type,
+            stage="MODEL_SELECT",
+            outcome="auto_switched",
+            param={
+                "previous_gen_type": session_gen_type,
+                "new_gen_type": model_gen_type,
+            },
+        )
+        session["active_gen_type"] = model_gen_type
+        session["gen_type"] = model_gen_type
+
+    mode_index = user_sessions.get(user_id, {}).get("mode_index")
+    if model_spec.modes and len(model_spec.modes) > 1 and mode_index is None:
+        user_balance = await get_user_balance_async(user_id)
+        sku_id = session.get("sku_id", "")
+        source = session.get("free_source", "unknown")
+        is_free_available = await is_free_generation_available(user_id, sku_id, source)
+        is_admin_check = get_is_admin(user_id) if user_id is not None else False
+        min_price: Optional[float] = None
+        session["model_id"] = model_id
+        session["model_info"] = model_info
+        session["active_model_id"] = model_id
+        if model_gen_type:
+            session["active_gen_type"] = model_gen_type
+            session["gen_type"] = model_gen_type
+        session["waiting_for"] = "mode_index"
+        user_lang = get_user_language(user_id)
+        model_name = model_info.get("name", model_id)
+        available_mode_entries: List[tuple[int, Any]] = []
+        for idx, mode in enumerate(model_spec.modes):
+            mode_quote = _resolve_mode_price_quote(model_id, idx, model_gen_type)
+            if not mode_quote:
                 log_structured_event(
                     correlation_id=correlation_id,
                     user_id=user_id,
-                    chat_id=chat_id,
+                    chat_id=query.message.chat_id if query.message else None,
                     update_id=update_id,
-                    action="CALLBACK",
-                    action_path=build_action_path(data),
-                    model_id=session_model_id,
-                    gen_type=session.get('gen_type') if session else None,
-                    stage="router",
-                    waiting_for=session_waiting_for,
-                    param=session_current_param,
-                    outcome="received",
-                    duration_ms=int((time.time() - start_time) * 1000),
-                    error_code=None,
-                    fix_hint=None,
-                )
-            except Exception as structured_log_error:
-                logger.warning(
-                    f"STRUCTURED_LOG error: {structured_log_error}",
-                    exc_info=True,
+                    action="pricing_miss",
+                    action_path="mode_selection",
+                    model_id=model_id,
+                    gen_type=model_gen_type,
+                    stage="MODE_SELECTION",
+                    outcome="blocked",
+                    error_code="NO_PRICE_FOR_PARAMS",
+                    fix_hint="Добавьте SKU/маппинг или скройте пресет.",
+                    param={
+                        "mode_index": idx,
+                        "mode_notes": getattr(mode, "notes", None),
+                        "params": {},
+                    },
                 )
-        except Exception as log_error:
-            logger.error(f"❌❌❌ ERROR in BUTTON_CALLBACK CONTEXT logging: {log_error}", exc_info=True)
-            
-    except Exception as e:
-        logger.error(f"Error in button_callback setup: {e}", exc_info=True)
-        # Try to answer anyway if we have query
-        if query:
+                continue
             try:
-                await query.answer("❌ Ошибка обработки кнопки. Попробуйте /start", show_alert=True)
-            except:
+                mode_price = float(mode_quote.price_rub)
+                min_price = mode_price if min_price is None else min(min_price, mode_price)
+            except Exception:
                 pass
+            available_mode_entries.append((idx, mode))
+
+        if not available_mode_entries:
+            blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
+            await query.edit_message_text(blocked_text, parse_mode="HTML")
+            return ConversationHandler.END
+        if (
+            not is_admin_check
+            and not is_free_available
+            and min_price is not None
+            and user_balance < min_price
+        ):
+            await query.edit_message_text(
+                _build_insufficient_funds_text(user_lang, min_price, user_balance),
+                reply_markup=_build_insufficient_funds_keyboard(user_lang),
+            )
+            return ConversationHandler.END
+        await query.edit_message_text(
+            _build_mode_selection_text(model_name, user_lang),
+            reply_markup=_build_mode_selection_keyboard(model_id, available_mode_entries, user_lang),
+            parse_mode="HTML",
+        )
         return ConversationHandler.END
-    
-    # Wrap all callback handling in try-except for error handling
+
+    input_params, required_params, forced_media_required = _apply_media_required_overrides(
+        model_spec,
+        model_spec.schema_properties or {},
+    )
+
+    # Check user balance and calculate available generations
+    user_balance = await get_user_balance_async(user_id)
+    is_admin = get_is_admin(user_id)
+
+    # IMPORTANT: Use get_is_admin() if user_id is available to respect ADMIN_ID list.
+    is_admin_check = get_is_admin(user_id) if user_id is not None else is_admin
+
+    # Check for free generations for free models
+    sku_id = session.get("sku_id", "")
+    source = session.get("free_source", "unknown")
+    is_free_available = await is_free_generation_available(user_id, sku_id, source)
+    from app.pricing.free_policy import is_sku_free_daily
+    remaining_free = (
+        await get_user_free_generations_remaining(user_id)
+        if is_sku_free_daily(sku_id)
+        else 0
+    )
+
+    price_value, price_line, price_note = _resolve_price_for_display(
+        session,
+        model_id=model_id,
+        mode_index=_resolve_mode_index(model_id, session.get("params", {}), user_id),
+        gen_type=session.get("gen_type"),
+        params=session.get("params", {}),
+        user_lang=user_lang,
+        is_admin=is_admin_check,
+        correlation_id=correlation_id,
+        update_id=update_id,
+        action_path="model_select_info",
+        user_id=user_id,
+        chat_id=query.message.chat_id if query.message else None,
+    )
+    if price_value is None:
+        blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
+        await query.edit_message_text(blocked_text, parse_mode="HTML")
+        return ConversationHandler.END
+
+    # Calculate how many generations available
+    if is_admin:
+        available_count = "Безлимит"
+    elif is_free_available:
+        # For free models with free generations, show free count
+        available_count = f"🎁 {remaining_free} бесплатно в день"
+    elif price_value is not None and price_value == 0:
+        # Free model (price is 0) - unlimited generations
+        available_count = "Безлимит"
+    elif price_value is not None and price_value > 0 and user_balance >= price_value:
+        available_count = int(user_balance / price_value)
+    else:
+        available_count = 0
+
+    # Show model info with premium formatting
+    model_name = model_info.get('name', model_id)
+    model_emoji = model_info.get('emoji', '🤖')
+    model_desc = model_info.get('description', '')
+    model_category = model_info.get('category', 'Общее')
+
+    # Check if new user for hints
+    is_new = await is_new_user_async(user_id)
+
+    model_info_text = (
+        _build_model_card(model_spec, model_info, required_params, user_lang)
+        + "\n\n"
+        + "━━━━━━━━━━━━━━━━━━━━\n\n"
+    )
+    free_counter_line = ""
     try:
-        # Initialize common variables that might be used in multiple handlers
-        # This prevents UnboundLocalError if variable is assigned in one branch but used in another
-        categories = None
-        total_models = None
-        tutorial_text = None
-        help_text = None
-        referral_text = None
-        history_text = None
-        model_info_text = None
-        prompt_text = None
-        admin_text = None
-        settings_text = None
-        promocodes_text = None
-        broadcast_text = None
-        stats_text = None
-        
-        # Handle claim gift
-        if data == "claim_gift":
-            if has_claimed_gift(user_id):
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_already_claimed', lang=user_lang), show_alert=True)
-                return ConversationHandler.END
-            
-            user_lang = get_user_language(user_id)
-            
-            # Show initial spinning message
-            await query.answer(t('msg_spinning_wheel', lang=user_lang))
-            if user_lang == 'ru':
-                spin_message = await query.edit_message_text(
-                    "🎰 <b>КОЛЕСО ФОРТУНЫ</b> 🎰\n\n"
-                    "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    "🎲 <b>Крутим колесо...</b>\n\n"
-                    "⏳ Подождите, определяем ваш выигрыш...",
-                    parse_mode='HTML'
-                )
-            else:
-                spin_message = await query.edit_message_text(
-                    "🎰 <b>WHEEL OF FORTUNE</b> 🎰\n\n"
-                    "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    "🎲 <b>Spinning the wheel...</b>\n\n"
-                    "⏳ Please wait, determining your prize...",
-                    parse_mode='HTML'
-                )
-            
-            # Animate wheel spinning with different sectors
-            wheel_sectors = [
-                ("🎯", "🎪", "🎨", "🎭", "🎪", "🎯"),
-                ("💰", "💎", "🎁", "⭐", "💎", "💰"),
-                ("🎰", "🎲", "🎯", "🎪", "🎲", "🎰"),
-                ("💫", "✨", "🌟", "⭐", "✨", "💫"),
-                ("🎊", "🎉", "🎈", "🎁", "🎉", "🎊")
-            ]
-            
-            progress_steps = [
-                ("🔄", "🔄", "🔄", "🔄", "🔄", "🔄"),
-                ("⚡", "⚡", "⚡", "⚡", "⚡", "⚡"),
-                ("✨", "✨", "✨", "✨", "✨", "✨"),
-                ("💫", "💫", "💫", "💫", "💫", "💫"),
-                ("🎯", "🎯", "🎯", "🎯", "🎯", "🎯")
-            ]
-            
-            # Show spinning animation
-            for i in range(8):
-                await asyncio.sleep(0.25)
-                sector_idx = i % len(wheel_sectors)
-                progress_idx = min(i, len(progress_steps) - 1)
-                
-                wheel_display = " ".join(wheel_sectors[sector_idx])
-                progress_display = " ".join(progress_steps[progress_idx])
-                
-                # Progress bar simulation
-                progress_percent = min((i + 1) * 12.5, 100)
-                progress_bar = "█" * int(progress_percent / 5) + "░" * (20 - int(progress_percent / 5))
-                
-                try:
-                    if user_lang == 'ru':
-                        await spin_message.edit_text(
-                            f"🎰 <b>КОЛЕСО ФОРТУНЫ</b> 🎰\n\n"
-                            f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                            f"{wheel_display}\n\n"
-                            f"<b>Крутим...</b> {progress_display}\n\n"
-                            f"📊 [{progress_bar}] {progress_percent:.0f}%\n\n"
-                            f"⏳ Подождите, определяем ваш выигрыш...",
-                            parse_mode='HTML'
-                        )
-                    else:
-                        await spin_message.edit_text(
-                            f"🎰 <b>WHEEL OF FORTUNE</b> 🎰\n\n"
-                            f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                            f"{wheel_display}\n\n"
-                            f"<b>Spinning...</b> {progress_display}\n\n"
-                            f"📊 [{progress_bar}] {progress_percent:.0f}%\n\n"
-                            f"⏳ Please wait, determining your prize...",
-                            parse_mode='HTML'
-                        )
-                except:
-                    pass
-            
-            # Final spin - slow down
-            await asyncio.sleep(0.4)
-            
-            # Get the gift amount
-            amount = spin_gift_wheel()
-            await add_user_balance_async(user_id, amount)
-            set_gift_claimed(user_id)
-            
-            # Show result with celebration
-            if user_lang == 'ru':
-                gift_text = (
-                    f'🎉 <b>ПОЗДРАВЛЯЕМ!</b> 🎉\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'🎰 <b>КОЛЕСО ОСТАНОВИЛОСЬ!</b> 🎰\n\n'
-                    f'🎁 <b>Ваш выигрыш:</b>\n\n'
-                    f'💰 <b>{format_rub_amount(amount)}</b>\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'✅ <b>Сумма автоматически зачислена на ваш баланс!</b>\n\n'
-                    f'💡 <b>Что дальше:</b>\n'
-                    f'• Начните генерацию контента прямо сейчас\n'
-                    f'• Используйте любую модель из каталога\n'
-                    f'• Наслаждайтесь премиум возможностями!\n\n'
-                    f'✨ <b>Удачи в создании контента!</b>'
-                )
-            else:
-                gift_text = (
-                    f'🎉 <b>CONGRATULATIONS!</b> 🎉\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'🎰 <b>WHEEL STOPPED!</b> 🎰\n\n'
-                    f'🎁 <b>Your prize:</b>\n\n'
-                    f'💰 <b>{format_rub_amount(amount)}</b>\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'✅ <b>Amount automatically added to your balance!</b>\n\n'
-                    f'💡 <b>What\'s next:</b>\n'
-                    f'• Start content generation right now\n'
-                    f'• Use any model from the catalog\n'
-                    f'• Enjoy premium features!\n\n'
-                    f'✨ <b>Good luck creating content!</b>'
-                )
-            
+        free_counter_line = await get_free_counter_line(
+            user_id,
+            user_lang=user_lang,
+            correlation_id=correlation_id,
+            action_path="model_select_info",
+            sku_id=sku_id,
+        )
+    except Exception as exc:
+        logger.warning("Failed to resolve free counter line: %s", exc)
+
+    balance_label = "Баланс" if user_lang == "ru" else "Balance"
+    balance_line = f"💵 <b>{balance_label}:</b> {format_rub_amount(user_balance)}"
+    model_info_text += f"{balance_line}\n{price_line}\n"
+    if price_note:
+        model_info_text += f"{price_note}\n"
+
+    # Add hint for new users
+    if is_new and sku_id in FREE_TOOL_SKU_IDS:
+        model_info_text += (
+            f"\n💡 <b>Отлично для начала!</b>\n"
+            f"Эта модель бесплатна для первых {FREE_GENERATIONS_PER_DAY} генераций в день.\n"
+            f"Просто опишите, что хотите создать, и нажмите \"Генерировать\"!\n\n"
+        )
+
+    # КРИТИЧНО: Всегда показываем цену для всех пользователей
+    if is_admin:
+        model_info_text += (
+            f"✅ <b>Доступ:</b> <b>Безлимит</b>\n"
+            f"👑 <b>Статус:</b> Администратор\n\n"
+        )
+    else:
+        # Для обычных пользователей всегда показываем цену и баланс
+        if is_free_available:
+            model_info_text += (
+                f"🎁 <b>Бесплатно:</b> {remaining_free}/{FREE_GENERATIONS_PER_DAY} в день\n"
+            )
+            if price_value is not None and price_value > 0 and user_balance >= price_value:
+                paid_count = int(user_balance / price_value)
+                model_info_text += f"💳 <b>Платных:</b> {paid_count} генераций\n"
+            model_info_text += "\n"
+        elif available_count == "Безлимит" or (isinstance(available_count, (int, float)) and available_count > 0):
+            model_info_text += (
+                f"✅ <b>Доступно:</b> {available_count} генераций\n"
+                "\n"
+            )
+        else:
+            # Not enough balance - show warning
+            model_info_text += (
+                f"\n❌ <b>Недостаточно средств</b>\n\n"
+                f"{balance_line}\n"
+                f"{price_line}\n\n"
+                f"💡 Пополните баланс для генерации"
+            )
+
+            if free_counter_line:
+                model_info_text = _append_free_counter_text(model_info_text, free_counter_line)
+
             keyboard = [
-                [InlineKeyboardButton(t('btn_check_balance', lang=user_lang), callback_data="check_balance")],
-                [InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")]
+                [InlineKeyboardButton(t('btn_top_up_balance', lang=user_lang), callback_data="topup_balance")],
+                [InlineKeyboardButton(t('btn_back_to_models', lang=user_lang), callback_data="back_to_menu")]
             ]
-            
-            await spin_message.edit_text(
-                gift_text,
+
+            await query.edit_message_text(
+                model_info_text,
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode='HTML'
             )
             return ConversationHandler.END
-        
-        # Handle admin user mode toggle (MUST be first, before any other checks)
-        if data == "admin_user_mode":
-            # Toggle user mode for admin
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
-                return ConversationHandler.END
-            
-            session = ensure_session_cached(context, session_store, user_id, update_id)
-            
-            current_mode = session.get('admin_user_mode', False)
-            session['admin_user_mode'] = not current_mode
-            
-            if not current_mode:
-                # Switching to user mode - send new message directly
-                user_lang = get_user_language(user_id)
-                await query.answer(t('msg_user_mode_enabled', lang=user_lang))
-                user = update.effective_user
-                categories = get_categories_from_registry()
-                total_models = len(get_models_sync())
-                
-                remaining_free = await get_user_free_generations_remaining(user_id)
-                free_info = ""
-                if remaining_free > 0:
-                    free_info = f"\n🎁 <b>Бесплатно:</b> {remaining_free} генераций бесплатных моделей\n"
-                
-                welcome_text = (
-                    f'✨ <b>ПРЕМИУМ AI MARKETPLACE</b> ✨\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'👋 Привет, {user.mention_html()}!\n\n'
-                    f'🚀 <b>Топовые нейросети без VPN</b>\n'
-                    f'📦 <b>{total_models} моделей</b> | <b>{len(categories)} категорий</b>{free_info}\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'💎 <b>Преимущества:</b>\n'
-                    f'• Прямой доступ к мировым AI\n'
-                    f'• Профессиональное качество 2K/4K\n'
-                    f'• Мгновенная генерация\n\n'
-                    f'🎯 <b>Выберите категорию или все модели</b>'
-                )
-                
-                keyboard = []
-                # All models button first
-                keyboard.append([
-                    InlineKeyboardButton("📋 Все модели", callback_data="all_models")
-                ])
-                
-                keyboard.append([])
-                for category in categories:
-                    models_in_category = get_models_by_category_from_registry(category)
-                    emoji = models_in_category[0]["emoji"] if models_in_category else "📦"
-                    keyboard.append([InlineKeyboardButton(
-                        f"{emoji} {category} ({len(models_in_category)})",
-                        callback_data=f"category:{category}"
-                    )])
-                
-                keyboard.append([
-                    InlineKeyboardButton("💳 Пополнить баланс", callback_data="topup_balance")
-                ])
-                keyboard.append([
-                    InlineKeyboardButton("🔙 Вернуться в админ-панель", callback_data="admin_back_to_admin")
-                ])
-                keyboard.append([
-                    InlineKeyboardButton("🆘 Помощь", callback_data="help_menu"),
-                    InlineKeyboardButton("💬 Поддержка", callback_data="support_contact")
-                ])
-                
-                await query.message.reply_text(
-                    welcome_text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
-                return ConversationHandler.END
-            else:
-                # Switching back to admin mode - send new message with full admin panel
-                session = ensure_session_cached(context, session_store, user_id, update_id)
-                session['admin_user_mode'] = False
-                user_lang = get_user_language(user_id)
-                await query.answer(t('msg_returning_to_admin', lang=user_lang))
-                user = update.effective_user
-                generation_types = get_generation_types()
-                total_models = len(get_models_sync())
-                
-                welcome_text = (
-                    f'👑 ✨ <b>ПАНЕЛЬ АДМИНИСТРАТОРА</b> ✨\n\n'
-                    f'Привет, {user.mention_html()}! 👋\n\n'
-                    f'🎯 <b>ПОЛНЫЙ КОНТРОЛЬ НАД AI MARKETPLACE</b>\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'📊 <b>СТАТИСТИКА СИСТЕМЫ:</b>\n\n'
-                    f'✅ <b>{total_models} премиум моделей</b> в арсенале\n'
-                    f'✅ <b>{len(generation_types)} категорий</b> контента\n'
-                    f'✅ Безлимитный доступ ко всем генерациям\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'🔥 <b>ТОПОВЫЕ МОДЕЛИ В СИСТЕМЕ:</b>\n\n'
-                    f'🎨 <b>Google Imagen 4 Ultra</b> - Флагман от Google DeepMind\n'
-                    f'   💰 Безлимит (цена: 4.63 ₽)\n'
-                    f'   ⭐️ Максимальное качество для тестирования\n\n'
-                    f'🍌 <b>Nano Banana Pro</b> - 4K от Google\n'
-                    f'   💰 Безлимит (1K/2K: 6.95 ₽, 4K: 9.27 ₽)\n'
-                    f'   🎯 Профессиональная генерация 2K/4K\n\n'
-                    f'🎥 <b>Sora 2</b> - Видео от OpenAI\n'
-                    f'   💰 Безлимит (цена: 11.58 ₽) за 10-секундное видео\n'
-                    f'   🎬 Кинематографические видео с аудио\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'⚙️ <b>АДМИНИСТРАТИВНЫЕ ВОЗМОЖНОСТИ:</b>\n\n'
-                    f'📈 Просмотр статистики и аналитики\n'
-                    f'👥 Управление пользователями\n'
-                    f'🎁 Управление промокодами\n'
-                    f'🧪 Тестирование OCR системы\n'
-                    f'💼 Полный контроль над ботом\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'💫 <b>НАЧНИТЕ УПРАВЛЕНИЕ ИЛИ ТЕСТИРОВАНИЕ!</b>'
-                )
-                
-                keyboard = []
-                # All models button first
-                keyboard.append([
-                    InlineKeyboardButton("📋 Все модели", callback_data="all_models")
-                ])
-                
-                keyboard.append([])
-                for category in categories:
-                    models_in_category = get_models_by_category_from_registry(category)
-                    emoji = models_in_category[0]["emoji"] if models_in_category else "📦"
-                    keyboard.append([InlineKeyboardButton(
-                        f"{emoji} {category} ({len(models_in_category)})",
-                        callback_data=f"category:{category}"
-                    )])
-                
-                keyboard.append([
-                    InlineKeyboardButton("📋 Все модели", callback_data="all_models")
-                ])
-                keyboard.append([
-                    InlineKeyboardButton("📊 Статистика", callback_data="admin_stats"),
-                    InlineKeyboardButton("⚙️ Настройки", callback_data="admin_settings")
-                ])
-                keyboard.append([
-                    InlineKeyboardButton("🔍 Поиск", callback_data="admin_search"),
-                    InlineKeyboardButton("📝 Добавить", callback_data="admin_add")
-                ])
-                keyboard.append([
-                    InlineKeyboardButton("🧪 Тест OCR", callback_data="admin_test_ocr")
-                ])
-                keyboard.append([
-                    InlineKeyboardButton("👤 Режим пользователя", callback_data="admin_user_mode")
-                ])
-                keyboard.append([InlineKeyboardButton("🆘 Помощь", callback_data="help_menu")])
-                
-                await query.message.reply_text(
-                    welcome_text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
-                return ConversationHandler.END
-        
-        if data == "admin_back_to_admin":
-            # Return to admin mode - send new message directly
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
-                return ConversationHandler.END
-            
-            session = ensure_session_cached(context, session_store, user_id, update_id)
-            session['admin_user_mode'] = False
-            await query.answer("Возврат в админ-панель")
-            user = update.effective_user
-            categories = get_categories_from_registry()
-            total_models = len(KIE_MODELS)
-            
-            welcome_text = (
-                f'👑 <b>Панель администратора</b>\n\n'
-                f'Привет, {user.mention_html()}! 👋\n\n'
-                f'🚀 <b>Расширенное меню управления</b>\n\n'
-                f'📊 <b>Статистика:</b>\n'
-                f'✅ <b>{total_models} моделей</b> доступно\n'
-                f'✅ <b>{len(categories)} категорий</b>\n\n'
-                f'⚙️ <b>Административные функции доступны</b>'
+
+    if free_counter_line:
+        model_info_text = _append_free_counter_text(model_info_text, free_counter_line)
+
+    # Check balance before starting generation (but allow free generations)
+    if not is_admin and not is_free_available and price_value is not None and user_balance < price_value:
+        user_lang = get_user_language(user_id)
+        keyboard = [
+            [InlineKeyboardButton(t('btn_top_up_balance', lang=user_lang), callback_data="topup_balance")],
+            [InlineKeyboardButton(t('btn_back_to_models', lang=user_lang), callback_data="back_to_menu")]
+        ]
+
+        needed = price_value - user_balance
+        needed_str = format_rub_amount(needed)
+        remaining_free = await get_user_free_generations_remaining(user_id)
+
+        if user_lang == 'ru':
+            insufficient_msg = (
+                f"❌ <b>Недостаточно средств для генерации</b>\n\n"
+                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                f"{balance_line}\n"
+                f"{price_line}\n"
+                f"❌ <b>Не хватает:</b> {needed_str}\n\n"
+                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                f"💡 <b>Что делать:</b>\n"
+                f"• Пополните баланс через кнопку ниже\n"
             )
-            
-            keyboard = []
-            
-            # All models button first
-            keyboard.append([
-                InlineKeyboardButton("📋 Все модели", callback_data="all_models")
-            ])
-            
-            keyboard.append([])
-            for category in categories:
-                models_in_category = get_models_by_category_from_registry(category)
-                emoji = models_in_category[0]["emoji"] if models_in_category else "📦"
-                keyboard.append([InlineKeyboardButton(
-                    f"{emoji} {category} ({len(models_in_category)})",
-                    callback_data=f"category:{category}"
-                )])
-            
-            keyboard.append([
-                InlineKeyboardButton("📊 Статистика", callback_data="admin_stats"),
-                InlineKeyboardButton("⚙️ Настройки", callback_data="admin_settings")
-            ])
-            keyboard.append([
-                InlineKeyboardButton("🔍 Поиск", callback_data="admin_search"),
-                InlineKeyboardButton("📝 Добавить", callback_data="admin_add")
-            ])
-            keyboard.append([
-                InlineKeyboardButton("🧪 Тест OCR", callback_data="admin_test_ocr")
-            ])
-            keyboard.append([InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")])
-            
-            await query.message.reply_text(
-                welcome_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
+
+            if remaining_free > 0:
+                insufficient_msg += f"• Используйте бесплатные генерации бесплатных моделей ({remaining_free} доступно)\n"
+
+            insufficient_msg += (
+                f"• Пригласите друга и получите бонусы\n\n"
+                f"🔄 После пополнения попробуйте генерацию снова."
             )
-            return ConversationHandler.END
-        
-        if data == "back_to_menu":
-            # Answer callback immediately to show button was pressed
+        else:
+            insufficient_msg = (
+                f"❌ <b>Insufficient Funds for Generation</b>\n\n"
+                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                f"{balance_line}\n"
+                f"{price_line}\n"
+                f"❌ <b>Need:</b> {needed_str}\n\n"
+                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                f"💡 <b>What to do:</b>\n"
+                f"• Top up balance via button below\n"
+            )
+
+            if remaining_free > 0:
+                insufficient_msg += f"• Use free models generations ({remaining_free} available)\n"
+
+            insufficient_msg += (
+                f"• Invite a friend and get bonuses\n\n"
+                f"🔄 After topping up, try generation again."
+            )
+
+        await query.edit_message_text(
+            insufficient_msg,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode='HTML'
+        )
+        return ConversationHandler.END
+
+    # Store selected model
+    logger.debug(f"🔥🔥🔥 SELECT_MODEL: Created new session for user_id={user_id}")
+    session['model_id'] = model_id
+    session['model_info'] = model_info
+    session['active_model_id'] = model_id
+    session['active_gen_type'] = model_gen_type or session_gen_type or _resolve_session_gen_type(None, model_spec)
+    session['gen_type'] = session['active_gen_type']
+    set_session_context(
+        user_id,
+        to_context=UI_CONTEXT_WIZARD,
+        reason="select_model",
+        active_gen_type=session.get("active_gen_type"),
+        active_model_id=model_id,
+        correlation_id=correlation_id,
+        update_id=update_id,
+        chat_id=query.message.chat_id if query.message else None,
+    )
+    logger.debug(f"🔥🔥🔥 SELECT_MODEL: Stored model in session: model_id={model_id}, user_id={user_id}, session_keys={list(session.keys())}")
+
+    log_structured_event(
+        correlation_id=correlation_id,
+        user_id=user_id,
+        chat_id=query.message.chat_id if query.message else None,
+        update_id=update.update_id,
+        action="MODEL_SELECT",
+        action_path=build_action_path(data),
+        model_id=model_id,
+        gen_type=session.get("gen_type"),
+        stage="MODEL_SELECT",
+        outcome="selected",
+    )
+    log_structured_event(
+        correlation_id=correlation_id,
+        user_id=user_id,
+        chat_id=query.message.chat_id if query.message else None,
+        update_id=update.update_id,
+        action="MODEL_SELECTED",
+        action_path=build_action_path(data),
+        model_id=model_id,
+        gen_type=session.get("gen_type"),
+        stage="MODEL_SELECT",
+        outcome="selected",
+    )
+
+    logger.info(
+        "✅ SELECT_MODEL: Using SSOT schema: count=%s, keys=%s, user_id=%s",
+        len(input_params),
+        list(input_params.keys()),
+        user_id,
+    )
+    input_params = _apply_unified_param_defaults(
+        input_params,
+        model_spec=model_spec,
+        session_gen_type=session.get("gen_type") or model_spec.model_type,
+    )
+
+    # Store session data
+    session['params'] = {}
+    session['properties'] = input_params
+    session['required'] = required_params
+    session['required_original'] = (model_spec.schema_required or []).copy()
+    session['required_forced_media'] = forced_media_required
+    session['current_param'] = None
+    session['model_type'] = model_spec.model_type or model_spec.model_mode
+    session['model_mode'] = model_spec.model_mode
+    session['param_history'] = []
+    session['model_spec'] = model_spec
+    session['param_order'] = _build_param_order(input_params)
+    session['ssot_conflicts'] = _detect_ssot_conflicts(model_spec, input_params)
+    session['optional_media_params'] = []
+    session['image_ref_prompt'] = False
+    session['skipped_params'] = set()
+    mode_index = _resolve_mode_index(model_id, session.get("params"), user_id)
+    _update_price_quote(
+        session,
+        model_id=model_id,
+        mode_index=mode_index,
+        gen_type=session.get("gen_type"),
+        params=session.get("params", {}),
+        correlation_id=correlation_id,
+        update_id=update_id,
+        action_path="select_model",
+        user_id=user_id,
+        chat_id=query.message.chat_id if query.message else None,
+        is_admin=is_admin_check,
+    )
+    model_info.setdefault("input_params", input_params)
+    if model_spec.model_type in {"text_to_image", "text_to_video", "text_to_audio", "text_to_speech", "text"}:
+        if "image_input" in input_params or "image_urls" in input_params:
+            session['image_ref_prompt'] = True
+    if "SSOT_CONFLICT_TEXT_MODEL_REQUIRES_IMAGE" in session['ssot_conflicts']:
+        media_param = _first_required_media_param(input_params)
+        if media_param:
+            session['optional_media_params'] = [media_param]
+            session['required'] = [
+                name for name in session['required'] if name != media_param
+            ]
+    if session['ssot_conflicts']:
+        log_structured_event(
+            correlation_id=correlation_id,
+            user_id=user_id,
+            chat_id=query.message.chat_id if query.message else None,
+            update_id=update.update_id,
+            action="SSOT_CONFLICT",
+            action_path="select_model",
+            model_id=model_id,
+            outcome="detected",
+            error_code="SSOT_CONFLICT_DETECTED",
+            fix_hint="Проверьте модельный SSOT на противоречия.",
+            param={"conflicts": session['ssot_conflicts']},
+        )
+    if forced_media_required:
+        log_structured_event(
+            correlation_id=correlation_id,
+            user_id=user_id,
+            chat_id=query.message.chat_id if query.message else None,
+            update_id=update.update_id,
+            action="MEDIA_REQUIRED_OVERRIDE",
+            action_path="select_model",
+            model_id=model_id,
+            gen_type=session.get("gen_type"),
+            stage="MODEL_SELECT",
+            outcome="forced",
+            param={"forced_media": forced_media_required},
+        )
+    logger.info(
+        "✅ SELECT_MODEL: Parameter order determined: %s, user_id=%s",
+        session['param_order'],
+        user_id,
+    )
+
+    if not input_params:
+        return await send_confirmation_message(update, context, user_id, source="select_model")
+
+    next_param_result = await start_next_parameter(update, context, user_id)
+    if next_param_result is None:
+        return await send_confirmation_message(update, context, user_id, source="select_model")
+    return next_param_result
+
+
+async def _handle_confirm_generate_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """confirm_generate: запасной путь, если состояние диалога не переключилось."""
+    query = update.callback_query
+    user_id = update.effective_user.id if update.effective_user else None
+    user_lang = get_user_language(user_id) if user_id else "ru"
+    # Answer callback immediately
+    try:
+        await query.answer()
+    except:
+        pass
+
+    logger.info(f"confirm_generate callback received in button_callback (fallback)")
+    # Call confirm_generation function directly
+    # 🔴 API CALL: confirm_generation может вызывать KIE API
+    try:
+        await confirm_generation(update, context)
+        return ConversationHandler.END
+    except Exception as e:
+        logger.error(f"❌❌❌ ERROR in confirm_generation fallback: {e}", exc_info=True)
+        try:
+            user_lang = get_user_language(user_id) if user_id else 'ru'
+            error_msg = "Ошибка сервера, попробуйте позже" if user_lang == 'ru' else "Server error, please try later"
+            await query.answer(error_msg, show_alert=True)
+        except Exception:
+            pass
+        return ConversationHandler.END
+
+
+async def _handle_short_model_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """m:<short_id>: короткая ссылка на карточку модели."""
+    query = update.callback_query
+    user_id = update.effective_user.id if update.effective_user else None
+    data = query.data
+    short_id = data.split(":", 1)[1] if ":" in data else ""
+    if not short_id:
+        user_lang = get_user_language(user_id) if user_id else "ru"
+        await query.answer(
+            t('error_model_not_found', lang=user_lang, default="❌ Модель не найдена"),
+            show_alert=True,
+        )
+        return ConversationHandler.END
+    models = get_models_sync()
+    matches = [m for m in models if m.get("id", "").startswith(short_id)]
+    if len(matches) == 1:
+        return await _handle_model_card_callback(update, context, data=f"model:{matches[0].get('id')}")
+    else:
+        user_lang = get_user_language(user_id) if user_id else "ru"
+        error_msg = (
+            "❌ Не удалось определить модель. Вернитесь в меню и выберите снова."
+            if user_lang == "ru"
+            else "❌ Could not resolve model. Return to the menu and select again."
+        )
+        await query.edit_message_text(
+            error_msg,
+            reply_markup=InlineKeyboardMarkup(
+                [[InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")]]
+            ),
+            parse_mode="HTML",
+        )
+        return ConversationHandler.END
+
+
+def _register_button_callback_routes() -> None:
+    """Горячие маршруты button_callback обслуживаются напрямую, минуя цепочку."""
+    from app.buttons.dispatcher import register_callback_handler
+    from app.buttons.registry import CallbackType
+
+    register_callback_handler("back_to_menu", _handle_back_to_menu_callback, CallbackType.EXACT, handler_name="_handle_back_to_menu_callback")
+    register_callback_handler("show_models", _handle_show_models_callback, CallbackType.EXACT, handler_name="_handle_show_models_callback")
+    register_callback_handler("all_models", _handle_show_models_callback, CallbackType.EXACT, handler_name="_handle_show_models_callback")
+    register_callback_handler("back_to_confirmation", _handle_back_to_confirmation_callback, CallbackType.EXACT, handler_name="_handle_back_to_confirmation_callback")
+    register_callback_handler("back_to_previous_step", _handle_back_to_previous_step_callback, CallbackType.EXACT, handler_name="_handle_back_to_previous_step_callback")
+    register_callback_handler("check_balance", _handle_check_balance_callback, CallbackType.EXACT, handler_name="_handle_check_balance_callback")
+    register_callback_handler("confirm_generate", _handle_confirm_generate_callback, CallbackType.EXACT, handler_name="_handle_confirm_generate_callback")
+    register_callback_handler("gen_type:", _handle_gen_type_callback, CallbackType.PREFIX, handler_name="_handle_gen_type_callback")
+    register_callback_handler("m:", _handle_short_model_callback, CallbackType.PREFIX, handler_name="_handle_short_model_callback")
+    register_callback_handler("model:", _handle_model_card_callback, CallbackType.PREFIX, handler_name="_handle_model_card_callback")
+    register_callback_handler("modelk:", _handle_model_card_callback, CallbackType.PREFIX, handler_name="_handle_model_card_callback")
+    register_callback_handler("select_model:", _handle_select_model_callback, CallbackType.PREFIX, handler_name="_handle_select_model_callback")
+    register_callback_handler("sel:", _handle_select_model_callback, CallbackType.PREFIX, handler_name="_handle_select_model_callback")
+
+
+register_models_menu_routes(get_user_language=get_user_language, selecting_model_state=SELECTING_MODEL)
+register_admin_panel_routes()
+_register_button_callback_routes()
+
+
+async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Latency wrapper for button callbacks."""
+    start_ts = time.monotonic()
+    query = update.callback_query
+    update_id = getattr(update, "update_id", None)
+    callback_answered = False
+    # Маршрут разрешается один раз: его же использует _button_callback_impl и метрика латентности.
+    callback_route = resolve_callback_route(query.data if query else None)
+    try:
+        _create_background_task(
+            _check_and_deliver_pending_results(update, context),
+            action="pending_result_check",
+        )
+        if query:
+            user_id = query.from_user.id if query.from_user else None
+            user_lang = get_user_language(user_id) if user_id else "ru"
             try:
-                await query.answer()
-            except:
-                pass
-            correlation_id = ensure_correlation_id(update, context)
-            partner_id = (os.getenv("PARTNER_ID") or os.getenv("BOT_INSTANCE_ID") or "default").strip() or "default"
+                await _answer_callback_early(
+                    query,
+                    user_lang=user_lang,
+                    callback_data=query.data,
+                )
+                callback_answered = True
+                if update_id is not None:
+                    track_outgoing_action(update_id, action_type="answerCallbackQuery")
+            except Exception as answer_error:
+                logger.warning("Could not answer callback query quickly: %s", answer_error)
+
+        acquired = False
+        if _callback_semaphore:
             try:
-                session = ensure_session_cached(context, session_store, user_id, update_id)
-                for key in ("waiting_for", "current_param", "param_history", "params"):
-                    session.pop(key, None)
-                _clear_user_task_context(user_id, reason="back_to_menu", allow_mismatch=True)
-                await ensure_main_menu(update, context, source="back", correlation_id=correlation_id, prefer_edit=True)
-            except Exception as exc:
-                logger.error(
-                    "BACK_TO_MENU_FAILED handler=back_to_menu user_id=%s partner_id=%s correlation_id=%s error=%s",
-                    user_id,
-                    partner_id,
-                    correlation_id,
-                    exc,
-                    exc_info=True,
+                await asyncio.wait_for(
+                    _callback_semaphore.acquire(),
+                    timeout=CALLBACK_CONCURRENCY_TIMEOUT_SECONDS,
                 )
-                await _send_menu_error_notice(update, context, correlation_id=correlation_id)
-                await _show_minimal_menu(
-                    update,
-                    context,
-                    source="back",
-                    correlation_id=correlation_id,
-                    prefer_edit=False,
-                )
-            return ConversationHandler.END
-        
-    
-        if data == "generate_again":
-            # Generate again - restore model and show model info, then ask for new prompt
-            await query.answer()  # Acknowledge the callback
-            
-            logger.info(f"Generate again requested by user {user_id}")
-            
-            if user_id not in saved_generations:
-                logger.warning(f"No saved generation data for user {user_id}")
-                await query.edit_message_text(
-                    "❌ <b>Данные для повторной генерации не найдены</b>\n\n"
-                    "Начните новую генерацию через меню.",
-                    parse_mode='HTML'
+                acquired = True
+            except asyncio.TimeoutError:
+                user_id = update.effective_user.id if update.effective_user else None
+                user_lang = get_user_language(user_id) if user_id else "ru"
+                busy_text = (
+                    "⏳ <b>Сервер занят</b>\n\nПопробуйте снова через пару секунд."
+                    if user_lang == "ru"
+                    else "⏳ <b>Server busy</b>\n\nPlease try again in a few seconds."
                 )
+                reply_markup = build_back_to_menu_keyboard(user_lang)
+                if query and query.message:
+                    try:
+                        await query.message.reply_text(
+                            busy_text,
+                            parse_mode="HTML",
+                            reply_markup=reply_markup,
+                        )
+                        if update_id is not None:
+                            track_outgoing_action(update_id, action_type="send_message")
+                    except Exception:
+                        logger.warning("Failed to send busy response to user", exc_info=True)
                 return ConversationHandler.END
-            
-            saved_data = saved_generations[user_id]
-            logger.info(f"Restoring generation data for user {user_id}, model: {saved_data.get('model_id')}")
-            
-            # Restore session with model info, but clear params to start fresh
-            session = ensure_session_cached(context, session_store, user_id, update_id)
-            
-            model_id = saved_data['model_id']
-            model_info = saved_data['model_info']
-            
-            # Restore model info but clear params - user will enter new prompt
-            session.update({
-                'model_id': model_id,
-                'model_info': model_info,
-                'properties': saved_data['properties'].copy(),
-                'required': saved_data['required'].copy(),
-                'params': {}  # Clear params - start fresh
-            })
-            
-            # Get user balance and calculate available generations (same as select_model)
-            user_balance = await get_user_balance_async(user_id)
-            is_admin = get_is_admin(user_id)
-            
-            # Calculate price for default parameters (minimum price)
-            default_params = {}
-            if model_id == "nano-banana-pro":
-                default_params = {"resolution": "1K"}  # Cheapest option
-            elif model_id == "seedream/4.5-text-to-image" or model_id == "seedream/4.5-edit":
-                default_params = {"quality": "basic"}  # Basic quality (same price, but for consistency)
-            
-            min_price = get_from_price_value(model_id)
-            price_text = format_price_rub(min_price, is_admin) if min_price is not None else "💰 <b>от — ₽</b>"
-            
-            # Calculate how many generations available
-            if is_admin:
-                available_count = "Безлимит"
-            elif min_price and user_balance >= min_price:
-                available_count = int(user_balance / min_price)
-            else:
-                available_count = 0
-            
-            # Show model info with price and available generations (improved format)
-            model_name = model_info.get('name', model_id)
-            model_emoji = model_info.get('emoji', '🤖')
-            model_desc = model_info.get('description', '')
-            
-            # Получаем категорию модели для контекста
-            model_category = model_info.get('category', '')
-            gen_type = model_info.get('generation_type', '')
+        try:
+            return await _button_callback_impl(
+                update,
+                context,
+                callback_answered=callback_answered,
+                callback_route=callback_route,
+            )
+        finally:
+            if acquired and _callback_semaphore:
+                _callback_semaphore.release()
+    finally:
+        _log_handler_latency("button_callback", start_ts, update)
+        record_route_latency(
+            callback_route.callback_data if callback_route else None,
+            (time.monotonic() - start_ts) * 1000,
+        )
 
-            model_info_text = (
-                f"{model_emoji} <b>{model_name}</b>\n\n"
+
+async def show_admin_generation(query, context, gen: dict, current_index: int, total_count: int):
+    """Show admin generation with navigation."""
+    try:
+        from datetime import datetime
+        
+        gen_id = gen.get('id', 0)
+        user_id = gen.get('user_id', 0)
+        model_id = gen.get('model_id', 'Unknown')
+        model_name = gen.get('model_name', model_id)
+        timestamp = gen.get('timestamp', 0)
+        price = gen.get('price', 0)
+        is_free = gen.get('is_free', False)
+        result_urls = gen.get('result_urls', [])
+        params = gen.get('params', {})
+        
+        if timestamp:
+            dt = datetime.fromtimestamp(timestamp)
+            date_str = dt.strftime("%d.%m.%Y %H:%M")
+        else:
+            date_str = "Неизвестно"
+        
+        user_link = f"tg://user?id={user_id}"
+        user_lang = get_user_language(query.from_user.id)
+        
+        if user_lang == 'ru':
+            gen_text = (
+                f"📚 <b>Генерация #{gen_id}</b>\n\n"
                 f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                f"👤 <a href=\"{user_link}\">Пользователь {user_id}</a>\n"
+                f"📅 <b>Дата:</b> {date_str}\n"
+                f"🤖 <b>Модель:</b> {model_name}\n"
+                f"💰 <b>Стоимость:</b> {'🎁 Бесплатно' if is_free else format_rub_amount(price)}\n"
+                f"📦 <b>Результатов:</b> {len(result_urls)}\n\n"
             )
             
-            if model_category:
-                model_info_text += f"📁 <b>Категория:</b> {model_category}\n"
-            if gen_type:
-                gen_type_display = gen_type.replace('_', ' ').replace('-', ' ').title()
-                model_info_text += f"🎯 <b>Тип:</b> {gen_type_display}\n"
-            
-            if model_category or gen_type:
-                model_info_text += "\n"
-            
-            if model_desc:
-                model_info_text += f"ℹ️ <b>Описание:</b>\n{model_desc}\n\n"
-            
-            model_info_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            model_info_text += f"💰 <b>Стоимость генерации:</b> {price_text}\n"
-            
-            if is_admin:
-                model_info_text += t('msg_unlimited_available', lang=user_lang) + "\n\n"
-            else:
-                if available_count > 0:
-                    model_info_text += t('msg_available_generations', lang=user_lang, 
-                                        count=available_count, 
-                                        balance=format_price_rub(user_balance, is_admin)) + "\n\n"
-                else:
-                    # Not enough balance - show warning
-                    model_info_text += t('msg_insufficient_funds', lang=user_lang,
-                                        balance=format_price_rub(user_balance, is_admin),
-                                        required=price_text)
-                    
-                    keyboard = _build_topup_menu_keyboard(user_lang)
-                    
-                    await query.edit_message_text(
-                        model_info_text,
-                        reply_markup=keyboard,
-                        parse_mode='HTML'
-                    )
-                    return ConversationHandler.END
-            
-            # Check balance before starting generation
-            if not is_admin and user_balance < min_price:
-                user_lang = get_user_language(user_id)
-                keyboard = _build_topup_menu_keyboard(user_lang)
-                
-                needed = min_price - user_balance
-                needed_str = format_rub_amount(needed)
-                remaining_free = await get_user_free_generations_remaining(user_id)
-                
-                if user_lang == 'ru':
-                    insufficient_msg = (
-                        f"❌ <b>Недостаточно средств для генерации</b>\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"💳 <b>Ваш баланс:</b> {format_price_rub(user_balance, is_admin)}\n"
-                        f"💵 <b>Требуется минимум:</b> {price_text}\n"
-                        f"❌ <b>Не хватает:</b> {needed_str}\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"💡 <b>Что делать:</b>\n"
-                        f"• Пополните баланс через кнопку ниже\n"
-                    )
-                    
-                    if remaining_free > 0:
-                        insufficient_msg += f"• Используйте бесплатные генерации бесплатных моделей ({remaining_free} доступно)\n"
-                    
-                    insufficient_msg += (
-                        f"• Пригласите друга и получите бонусы\n\n"
-                        f"🔄 После пополнения попробуйте генерацию снова."
-                    )
-                else:
-                    insufficient_msg = (
-                        f"❌ <b>Insufficient Funds for Generation</b>\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"💳 <b>Your balance:</b> {format_price_rub(user_balance, is_admin)}\n"
-                        f"💵 <b>Minimum required:</b> {price_text}\n"
-                        f"❌ <b>Need:</b> {needed_str}\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"💡 <b>What to do:</b>\n"
-                        f"• Top up balance via button below\n"
-                    )
-                    
-                    if remaining_free > 0:
-                        insufficient_msg += f"• Use free models generations ({remaining_free} available)\n"
-                    
-                    insufficient_msg += (
-                        f"• Invite a friend and get bonuses\n\n"
-                        f"🔄 After topping up, try generation again."
-                    )
-                
-                await query.edit_message_text(
-                    _append_free_counter_text(insufficient_msg, free_counter_line),
-                    reply_markup=keyboard,
-                    parse_mode='HTML'
-                )
-                return ConversationHandler.END
+            if params:
+                params_text = "\n".join([f"  • {k}: {str(v)[:50]}..." for k, v in list(params.items())[:5]])
+                gen_text += f"⚙️ <b>Параметры:</b>\n{params_text}\n\n"
             
-            # Get input parameters from model info
-            input_params = model_info.get('input_params', {})
-            from app.kie_catalog import get_model
-            model_spec = get_model(model_id) if model_id else None
-            forced_media_required: List[str] = []
-            if model_spec:
-                input_params, required_params, forced_media_required = _apply_media_required_overrides(
-                    model_spec,
-                    input_params,
-                )
-            else:
-                required_params = [p for p, info in input_params.items() if info.get('required', False)]
-            input_params = _apply_unified_param_defaults(
-                input_params,
-                model_spec=model_spec,
-                session_gen_type=session.get("gen_type") or model_info.get("generation_type"),
+            gen_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            gen_text += f"📄 {current_index + 1} из {total_count}"
+        else:
+            gen_text = (
+                f"📚 <b>Generation #{gen_id}</b>\n\n"
+                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                f"👤 <a href=\"{user_link}\">User {user_id}</a>\n"
+                f"📅 <b>Date:</b> {date_str}\n"
+                f"🤖 <b>Model:</b> {model_name}\n"
+                f"💰 <b>Cost:</b> {'🎁 Free' if is_free else format_rub_amount(price)}\n"
+                f"📦 <b>Results:</b> {len(result_urls)}\n\n"
             )
             
-            if not input_params:
-                # If no params defined, ask for simple text input
-                await query.edit_message_text(
-                    f"{model_info_text}"
-                    f"Введите текст для генерации:",
-                    parse_mode='HTML'
-                )
-                session['params'] = {}
-                session['waiting_for'] = 'text'
-                return INPUTTING_PARAMS
+            if params:
+                params_text = "\n".join([f"  • {k}: {str(v)[:50]}..." for k, v in list(params.items())[:5]])
+                gen_text += f"⚙️ <b>Parameters:</b>\n{params_text}\n\n"
             
-            # Store session data
-            prefill_params = session.pop("prefill_params", {}) if isinstance(session, dict) else {}
-            session['params'] = dict(prefill_params or {})
-            session['properties'] = input_params
-            session['required'] = required_params
-            session['required_forced_media'] = forced_media_required
-            session['skipped_params'] = set()
-            session['current_param'] = None
-            if model_spec:
-                session['model_type'] = model_spec.model_type or model_spec.model_mode
-                session['model_mode'] = model_spec.model_mode
-            # NOTE: model_id and model_info are already stored above at lines 8449-8450
-            
-            primary_input = _determine_primary_input(model_info, input_params)
-            logger.info(
-                "🔥🔥🔥 SELECT_MODEL CHECK: model_id=%s primary_input=%s input_params_keys=%s user_id=%s",
-                model_id,
-                primary_input,
-                list(input_params.keys()),
-                user_id,
-            )
-
-            if primary_input and primary_input["type"] == "image":
-                logger.debug("🔥🔥🔥 SELECT_MODEL: Model requires image first! user_id=%s", user_id)
-                image_param_name = primary_input["param"]
-                user_lang = get_user_language(user_id)
-                keyboard = [
-                    [
-                        InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                        InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-                    ],
-                    [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
-                ]
-                if user_lang == 'en':
-                    step_text = "📷 <b>Step 1: Upload image</b>\n\n"
-                    if model_id == "recraft/remove-background":
-                        step_text += "Send a photo to remove the background.\n\n"
-                    elif model_id == "recraft/crisp-upscale":
-                        step_text += "Send a photo to enhance quality.\n\n"
-                    elif model_id == "ideogram/v3-reframe":
-                        step_text += "Send a photo to reframe and change aspect ratio.\n\n"
-                    elif model_id == "topaz/image-upscale":
-                        step_text += "Send a photo to upscale and enhance resolution.\n\n"
-                    else:
-                        step_text += "Send a photo to use as reference or for transformation.\n\n"
-                    if 'prompt' in input_params:
-                        step_text += "💡 <i>After uploading the image, you can enter a prompt</i>"
-                else:
-                    step_text = (
-                        "📷 <b>Шаг 1: Загрузите изображение</b>\n\n"
-                        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        "Отправьте изображение в сообщении.\n"
-                        "Поддерживаются форматы: PNG, JPG, JPEG, WEBP\n"
-                        "Максимальный размер: 10 MB"
-                    )
-                    if 'prompt' in input_params:
-                        step_text += "\n\n✅ <b>После загрузки:</b> вы сможете ввести промпт"
+            gen_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            gen_text += f"📄 {current_index + 1} of {total_count}"
+        
+        keyboard = []
+        
+        # Navigation buttons
+        if total_count > 1:
+            keyboard.append([
+                InlineKeyboardButton(t('btn_previous', lang=user_lang), callback_data=f"admin_gen_nav:prev"),
+                InlineKeyboardButton(t('btn_next', lang=user_lang), callback_data=f"admin_gen_nav:next")
+            ])
+        
+        # View result button
+        if result_urls:
+            keyboard.append([
+                InlineKeyboardButton(t('btn_view_result', lang=user_lang), callback_data=f"admin_gen_view:{current_index}")
+            ])
+        
+        # Back button
+        keyboard.append([
+            InlineKeyboardButton(t('btn_back_to_admin', lang=user_lang), callback_data="admin_stats")
+        ])
+        
+        await query.edit_message_text(
+            gen_text,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode='HTML',
+            disable_web_page_preview=False
+        )
+    except Exception as e:
+        logger.error(f"Error showing admin generation: {e}", exc_info=True)
+        user_lang = get_user_language(query.from_user.id)
+        await query.answer(t('error_display_generation', lang=user_lang), show_alert=True)
 
-                free_counter_line = await _resolve_free_counter_line(
-                    user_id,
-                    user_lang,
-                    correlation_id,
-                    action_path=f"param_prompt:{image_param_name}",
-                    sku_id=session.get("sku_id"),
-                )
-                step_text = _append_free_counter_text(step_text, free_counter_line)
-                await query.edit_message_text(
-                    f"{model_info_text}\n\n{step_text}",
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
-                session['current_param'] = image_param_name
-                session['waiting_for'] = image_param_name
-                if image_param_name not in session:
-                    session[image_param_name] = []
-                await query.answer()
-                logger.info(
-                    "🔥🔥🔥 SELECT_MODEL: Image input setup complete! model_id=%s user_id=%s waiting_for=%s",
-                    model_id,
-                    user_id,
-                    image_param_name,
-                )
-                elapsed = time.time() - start_time
-                logger.debug("🔥🔥🔥 SELECT_MODEL: Total time=%0.3fs user_id=%s", elapsed, user_id)
-                return INPUTTING_PARAMS
 
-            if primary_input and primary_input["type"] == "audio":
-                logger.debug("🔥🔥🔥 SELECT_MODEL: Model requires audio first! user_id=%s", user_id)
-                audio_param_name = primary_input["param"]
-                user_lang = get_user_language(user_id)
-                keyboard = [
-                    [
-                        InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                        InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-                    ],
-                    [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
-                ]
-                if user_lang == 'en':
-                    audio_text = (
-                        f"{model_info_text}\n\n"
-                        f"🎤 <b>Step 1: Upload audio</b>\n\n"
-                        f"Send an audio file (MP3, WAV, OGG, M4A, FLAC, AAC, WMA, MPEG).\n"
-                        f"Maximum size: 200 MB"
-                    )
-                else:
-                    audio_text = (
-                        f"{model_info_text}\n\n"
-                        f"🎤 <b>Шаг 1: Загрузите аудио</b>\n\n"
-                        f"Отправьте аудио-файл (MP3, WAV, OGG, M4A, FLAC, AAC, WMA, MPEG).\n"
-                        f"Максимальный размер: 200 MB"
-                    )
-                price_line = _build_current_price_line(
-                    session,
-                    user_lang=user_lang,
-                    model_id=model_id,
-                    mode_index=_resolve_mode_index(model_id, session.get("params", {}), user_id),
-                    gen_type=session.get("gen_type"),
-                    params=session.get("params", {}),
-                    correlation_id=correlation_id,
-                    update_id=update_id,
-                    action_path=f"param_prompt:{audio_param_name}",
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    is_admin=get_is_admin(user_id),
-                )
-                audio_text += f"\n\n{price_line}"
-                free_counter_line = await _resolve_free_counter_line(
-                    user_id,
-                    user_lang,
-                    correlation_id,
-                    action_path=f"param_prompt:{audio_param_name}",
-                    sku_id=session.get("sku_id"),
-                )
-                audio_text = _append_free_counter_text(audio_text, free_counter_line)
-                await query.edit_message_text(
-                    audio_text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
-                session['current_param'] = audio_param_name
-                session['waiting_for'] = audio_param_name
-                await query.answer()
-                return INPUTTING_PARAMS
-            
-            # Special case: sora-2-pro-image-to-video starts with image_urls first
-            if model_id == "sora-2-pro-image-to-video" and 'image_urls' in input_params and input_params['image_urls'].get('required', False):
-                # Start with image_urls first for sora-2-pro-image-to-video
-                has_image_input = True
-                image_param_name = 'image_urls'
-                keyboard = [
-                    [
-                        InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                        InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-                    ],
-                    [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
-                ]
-                image_text = (
-                    f"{model_info_text}\n\n"
-                    f"📷 <b>Шаг 1: Загрузите изображение</b>\n\n"
-                    f"Отправьте фото, которое будет использовано как первый кадр видео.\n\n"
-                    f"💡 <i>После загрузки изображения вы сможете ввести промпт</i>"
-                )
-                price_line = _build_current_price_line(
-                    session,
-                    user_lang=user_lang,
-                    model_id=model_id,
-                    mode_index=_resolve_mode_index(model_id, session.get("params", {}), user_id),
-                    gen_type=session.get("gen_type"),
-                    params=session.get("params", {}),
-                    correlation_id=correlation_id,
-                    update_id=update_id,
-                    action_path=f"param_prompt:{image_param_name}",
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    is_admin=get_is_admin(user_id),
-                )
-                image_text += f"\n\n{price_line}"
-                free_counter_line = await _resolve_free_counter_line(
-                    user_id,
-                    user_lang,
-                    correlation_id,
-                    action_path=f"param_prompt:{image_param_name}",
-                    sku_id=session.get("sku_id"),
-                )
-                image_text = _append_free_counter_text(image_text, free_counter_line)
-                await query.edit_message_text(
-                    image_text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
-                session['current_param'] = 'image_urls'
-                session['waiting_for'] = 'image_urls'
-                if 'image_urls' not in session:
-                    session['image_urls'] = []  # Initialize as array
-                await query.answer()
-                return INPUTTING_PARAMS
-            
-            # Start with prompt parameter first (default behavior)
-            if 'prompt' in input_params:
-                # Check if model supports image input (image_input or image_urls)
-                # BUT: z-image does NOT support image input (text-to-image only)
-                # AND: text-to-video models do NOT require image input (text-to-video only)
-                is_text_to_video = "text-to-video" in model_id.lower()
-                has_image_input = (model_id != "z-image" and 
-                                 not is_text_to_video and
-                                 ('image_input' in input_params or 'image_urls' in input_params))
-                
-                prompt_text = (
-                    f"{model_info_text}"
-                )
-                
-                # Determine if this is a video or audio model
-                is_video = is_video_model(model_id)
-                is_audio = is_audio_model(model_id)
-                
-                if has_image_input:
-                    ref_hint = "реф-картинку" if session.get("image_ref_prompt") else "изображение"
-                    if is_video:
-                        prompt_text += (
-                            f"📝 <b>Шаг 1: Введите промпт</b>\n\n"
-                            f"Опишите видео, которое хотите сгенерировать.\n\n"
-                            f"💡 <i>После ввода промпта вы сможете добавить {ref_hint} (опционально)</i>"
-                        )
-                    else:
-                        prompt_text += (
-                            f"📝 <b>Шаг 1: Введите промпт</b>\n\n"
-                            f"Опишите изображение, которое хотите сгенерировать.\n\n"
-                            f"💡 <i>После ввода промпта вы сможете добавить {ref_hint} (опционально)</i>"
-                        )
-                else:
-                    if is_video:
-                        prompt_text += (
-                            f"📝 <b>Шаг 1: Введите промпт</b>\n\n"
-                            f"Опишите видео, которое хотите сгенерировать:"
-                        )
-                    elif is_audio:
-                        prompt_text += (
-                            f"📝 <b>Шаг 1: Введите промпт</b>\n\n"
-                            f"Опишите контент для обработки:"
-                        )
-                    else:
-                        prompt_text += (
-                            f"📝 <b>Шаг 1: Введите промпт</b>\n\n"
-                            f"Опишите изображение, которое хотите сгенерировать:"
-                        )
-                price_line = _build_current_price_line(
-                    session,
-                    user_lang=user_lang,
-                    model_id=model_id,
-                    mode_index=_resolve_mode_index(model_id, session.get("params", {}), user_id),
-                    gen_type=session.get("gen_type"),
-                    params=session.get("params", {}),
-                    correlation_id=correlation_id,
-                    update_id=update_id,
-                    action_path="param_prompt:prompt",
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    is_admin=get_is_admin(user_id),
-                )
-                prompt_text += f"\n\n{price_line}"
-                
-                # Add keyboard with "Главное меню" and "Отмена" buttons
-                free_counter_line = await _resolve_free_counter_line(
-                    user_id,
-                    user_lang,
-                    correlation_id,
-                    action_path="param_prompt:prompt",
-                    sku_id=session.get("sku_id"),
-                )
-                prompt_text = _append_free_counter_text(prompt_text, free_counter_line)
-                keyboard = [
-                    [
-                        InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                        InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-                    ],
-                    [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
-                ]
-                
-                await query.edit_message_text(
-                    prompt_text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
-                session['current_param'] = 'prompt'
-                session['waiting_for'] = 'prompt'
-                session['has_image_input'] = has_image_input
-            else:
-                # If no prompt, start with first required parameter
-                await start_next_parameter(update, context, user_id)
+async def show_payment_screenshot(query, payment: dict, current_index: int, total_count: int):
+    """Show payment screenshot with navigation."""
+    try:
+        import datetime
+        
+        payment_id = payment.get('id', 0)
+        user_id = payment.get('user_id', 0)
+        amount = payment.get('amount', 0)
+        timestamp = payment.get('timestamp', 0)
+        screenshot_file_id = payment.get('screenshot_file_id')
+        
+        if not screenshot_file_id:
+            await query.edit_message_text("❌ Скриншот не найден для этого платежа.")
+            return
+        
+        # Format payment info
+        amount_str = format_rub_amount(amount)
+        if timestamp:
+            dt = datetime.datetime.fromtimestamp(timestamp)
+            date_str = dt.strftime("%d.%m.%Y %H:%M")
+        else:
+            date_str = "Неизвестно"
+        
+        user_link = f"tg://user?id={user_id}"
+        caption = (
+            f"📸 <b>Скриншот платежа #{payment_id}</b>\n\n"
+            f"👤 <a href=\"{user_link}\">Пользователь {user_id}</a>\n"
+            f"💵 Сумма: {amount_str}\n"
+            f"📅 Дата: {date_str}\n\n"
+            f"📄 {current_index + 1} из {total_count}"
+        )
+        
+        # Create navigation keyboard
+        keyboard = []
+        nav_row = []
+        
+        if total_count > 1:
+            if current_index > 0:
+                nav_row.append(InlineKeyboardButton("◀️ Предыдущий", callback_data="payment_screenshot_nav:prev"))
+            if current_index < total_count - 1:
+                nav_row.append(InlineKeyboardButton("Следующий ▶️", callback_data="payment_screenshot_nav:next"))
             
-            return INPUTTING_PARAMS
+            if nav_row:
+                keyboard.append(nav_row)
         
-        if data.startswith("set_language:"):
-            # Handle language selection
-            parts = data.split(":", 1)
-            if len(parts) < 2:
-                user_lang = get_user_language(query.from_user.id)
-                await query.answer(t('error_invalid_format', lang=user_lang), show_alert=True)
-                return ConversationHandler.END
-            lang = parts[1]
-            if lang in ['ru', 'en']:
-                set_user_language(user_id, lang)
-                await query.answer(t('language_set', lang))
-                # Show main menu after language selection
-                await start(update, context)
-                return ConversationHandler.END
-            else:
-                await query.answer("Неверный язык / Invalid language")
+        keyboard.append([InlineKeyboardButton("📊 Назад к платежам", callback_data="admin_payments_back")])
+        
+        reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
+        
+        # Send photo with caption
+        try:
+            # Edit original message first to show we're loading
+            await query.edit_message_text(
+                f"📸 <b>Загрузка скриншота...</b>\n\n"
+                f"Платеж #{payment_id}",
+                parse_mode='HTML'
+            )
+            
+            # Send photo as new message
+            await query.message.reply_photo(
+                photo=screenshot_file_id,
+                caption=caption,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+        except Exception as e:
+            logger.error(f"Error sending payment screenshot: {e}")
+            await query.edit_message_text(
+                f"❌ <b>Ошибка при загрузке скриншота</b>\n\n"
+                f"Платеж #{payment_id}\n"
+                f"Пользователь: {user_id}\n"
+                f"Сумма: {amount_str} ₽\n"
+                f"Дата: {date_str}\n\n"
+                f"⚠️ Скриншот недоступен (возможно, файл удален или недоступен)",
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+    except Exception as e:
+        logger.error(f"Error in show_payment_screenshot: {e}", exc_info=True)
+        try:
+            await query.edit_message_text("❌ Произошла ошибка при отображении скриншота.")
+        except:
+            pass
+
+
+async def _button_callback_impl(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    *,
+    callback_answered: bool = False,
+    callback_route: Optional[ButtonHandler] = None,
+):
+    """Handle button callbacks. CRITICAL: Always calls query.answer() to prevent button hanging."""
+    import time
+    start_time = time.time()
+    query = None
+    user_id = None
+    data = None
+    user_lang = 'ru'
+    is_admin_user = False
+    session_store = get_session_store(context)
+    
+    # ==================== NO-SILENCE GUARD: Track outgoing actions ====================
+    from app.observability.no_silence_guard import get_no_silence_guard, track_outgoing_action
+    guard = get_no_silence_guard()
+    _create_background_task(
+        _check_and_deliver_pending_results(update, context),
+        action="pending_result_check",
+    )
+    update_id = update.update_id
+    correlation_id = ensure_correlation_id(update, context)
+    # ==================== END NO-SILENCE GUARD ====================
+    
+    # 🔥 MAXIMUM LOGGING: Log entry point
+    try:
+        query = update.callback_query
+        user_id = query.from_user.id if query and query.from_user else None
+        data = query.data if query else None
+        if query and query.from_user:
+            _create_background_task(
+                upsert_user_registry_entry(query.from_user),
+                action="user_registry_upsert",
+            )
+        correlation_id = ensure_correlation_id(update, context)
+        chat_id = query.message.chat_id if query and query.message else None
+        message_id = query.message.message_id if query and query.message else None
+        guard.set_trace_context(
+            update,
+            context,
+            user_id=user_id,
+            chat_id=chat_id,
+            update_id=update_id,
+            message_id=message_id,
+            update_type="callback",
+            correlation_id=correlation_id,
+            action="CALLBACK",
+            action_path=build_action_path(data),
+            stage="UI_ROUTER",
+        )
+        trace_event(
+            "info",
+            correlation_id,
+            event="TRACE_IN",
+            stage="UI_ROUTER",
+            update_type="callback",
+            action="CALLBACK",
+            action_path=build_action_path(data),
+            user_id=user_id,
+            chat_id=chat_id,
+            message_id=message_id,
+            callback_data=data,
+            route_decision="button_callback",
+        )
+        log_structured_event(
+            correlation_id=correlation_id,
+            user_id=user_id,
+            chat_id=chat_id,
+            update_id=update_id,
+            action="CALLBACK",
+            action_path=build_action_path(data),
+            outcome="received",
+        )
+        session = get_session_cached(context, session_store, user_id, update_id, default={}) if user_id is not None else {}
+        log_structured_event(
+            correlation_id=correlation_id,
+            user_id=user_id,
+            chat_id=chat_id,
+            update_id=update_id,
+            action="UX_CLICK",
+            action_path=build_action_path(data),
+            model_id=session.get("model_id") if isinstance(session, dict) else None,
+            param={
+                "waiting_for": session.get("waiting_for") if isinstance(session, dict) else None,
+                "current_param": session.get("current_param") if isinstance(session, dict) else None,
+                "callback_data": data,
+            },
+            outcome="received",
+            error_code="UX_CLICK_OK",
+            fix_hint="Обработано нажатие кнопки.",
+        )
+        session_get_count = get_session_get_count(context, update_id)
+        log_structured_event(
+            correlation_id=correlation_id,
+            user_id=user_id,
+            chat_id=chat_id,
+            update_id=update_id,
+            action="SESSION_GET_COUNT",
+            action_path=build_action_path(data),
+            stage="SESSION_CACHE",
+            outcome="count",
+            param={"count": session_get_count},
+        )
+        logger.debug(f"🔥🔥🔥 BUTTON_CALLBACK ENTRY: user_id={user_id}, data={data}, query_id={query.id if query else 'None'}, message_id={query.message.message_id if query and query.message else 'None'}")
+    except Exception as e:
+        logger.error(f"❌❌❌ ERROR in button_callback entry logging: {e}", exc_info=True)
+    
+    # CRITICAL: Always answer callback query to prevent button hanging
+    # This must be done FIRST, before any other operations
+    try:
+        query = update.callback_query
+        if not query:
+            logger.error("No callback_query in update")
             return ConversationHandler.END
         
-        if data.startswith("cancel:"):
-            user_lang = get_user_language(user_id)
-            now_ms = _now_ms()
-            _set_user_ui_action(user_id, "cancel_click", now_ms)
-            session = get_session_cached(context, session_store, user_id, update_id, default={})
-            if isinstance(session, dict):
-                session["last_ui_action"] = "cancel_click"
-                session["last_ui_ts_ms"] = now_ms
-            job_id = _parse_cancel_callback(data)
-            await _request_job_cancel(
-                update=update,
-                context=context,
-                job_id=job_id,
-                user_id=user_id,
-                user_lang=user_lang,
-                callback_data=data,
-                query=query,
-                correlation_id=correlation_id,
-                state_source="callback",
-            )
-            return ConversationHandler.END
-
-        if data == "cancel":
-            user_lang = get_user_language(user_id)
-            session = get_session_cached(context, session_store, user_id, update_id, default={})
-            active_job_id = session.get("job_id") if isinstance(session, dict) else None
-            active_state = session.get("job_state") if isinstance(session, dict) else None
-            if active_job_id and active_state in ACTIVE_JOB_STATES_ACTIVE:
-                increment_cancel_metric("cancel_without_job_total")
-                _log_cancel_update(
-                    correlation_id=correlation_id,
-                    update_id=update_id,
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query and query.message else None,
-                    message_id=query.message.message_id if query and query.message else None,
-                    callback_query_id=query.id if query else None,
-                    callback_data=data,
-                    job_id=active_job_id,
-                    state_before=active_state,
-                    state_after="ignored",
-                    action="CANCEL_MISSING_JOB_ID",
-                )
+        user_id = update.effective_user.id if update.effective_user else None
+        data = query.data if query else None
+        is_admin_user = get_is_admin(user_id) if user_id else False
+        
+        # ALWAYS answer callback immediately to prevent button hanging
+        # This is critical - if we don't answer, button will hang
+        if not callback_answered:
+            try:
+                await query.answer()
+                callback_answered = True
+                # NO-SILENCE GUARD: Track outgoing action
+                track_outgoing_action(update_id, action_type="answerCallbackQuery")
+            except Exception as answer_error:
+                logger.warning(f"Could not answer callback query: {answer_error}")
                 try:
-                    await query.answer()
+                    if context and query and query.id:
+                        await context.bot.answer_callback_query(query.id)
                 except Exception:
                     pass
-                return ConversationHandler.END
-            await query.answer(t('btn_cancel', lang=user_lang).replace('❌ ', ''))
-            session_store.clear(user_id)
+                # Continue anyway - better to process than to fail completely
+        
+        if _should_dedupe_update(
+            update,
+            context,
+            action="CALLBACK",
+            action_path=build_action_path(data),
+            user_id=user_id,
+            chat_id=query.message.chat_id if query and query.message else None,
+        ):
+            return ConversationHandler.END
+
+        logger.info(f"Button callback received: user_id={user_id}, data='{data}'")
+        
+        if not data:
+            logger.error("No data in callback_query")
             try:
-                await query.edit_message_text(
-                    t('msg_operation_cancelled', lang=user_lang),
-                    parse_mode="HTML",
-                )
-            except Exception as e:
-                logger.error(f"Error editing message on cancel: {e}")
+                user_lang = get_user_language(user_id) if user_id else 'ru'
+                await query.answer(t('error_no_data', lang=user_lang), show_alert=True)
+            except:
                 try:
-                    await query.message.reply_text(
-                        t('msg_operation_cancelled', lang=user_lang),
-                        parse_mode="HTML",
-                    )
+                    await query.answer("❌ Ошибка: нет данных в кнопке", show_alert=True)
                 except:
                     pass
-            await ensure_main_menu(update, context, source="cancel", prefer_edit=False)
             return ConversationHandler.END
         
-        if data.startswith("retry_generate:"):
-            # Retry generation with same parameters
-            await query.answer("Повторяю попытку...")
-            
-            session = get_session_cached(context, session_store, user_id, update_id, default=None)
-            if not session:
-                await query.edit_message_text("❌ Сессия не найдена. Начните заново.")
-                return ConversationHandler.END
-            
-            # Show confirmation again with same parameters
-            model_name = session.get('model_info', {}).get('name', 'Unknown')
-            params = session.get('params', {})
-            params_text = "\n".join([f"  • {k}: {str(v)[:50]}{'...' if len(str(v)) > 50 else ''}" for k, v in params.items()])
-            
-            user_lang = get_user_language(user_id)
-            keyboard = [
-                [InlineKeyboardButton(t('btn_confirm_generate', lang=user_lang), callback_data="confirm_generate")],
-                [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
-                [
-                    InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                    InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-                ],
-                [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
-            ]
-            
-            await query.edit_message_text(
-                f"🔄 <b>Повторная попытка:</b>\n\n"
-                f"Модель: <b>{model_name}</b>\n"
-                f"Параметры:\n{params_text}\n\n"
-                f"Продолжить генерацию?",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            return CONFIRMING_GENERATION
+        # Get user language early for error messages
+        try:
+            user_lang = get_user_language(user_id) if user_id else 'ru'
+        except:
+            user_lang = 'ru'
 
-        if data.startswith("open_result:"):
-            task_id = data.split(":", 1)[1].strip() if ":" in data else ""
-            await query.answer("Проверяю результат..." if user_lang == "ru" else "Checking result...")
-            if not task_id:
-                await query.edit_message_text(
-                    "❌ Не удалось определить task_id. Откройте статус через меню."
+        if context and getattr(context, "user_data", None) is not None:
+            context.user_data["last_callback_handled_update_id"] = update_id
+
+        # O(1) маршрутизация: маршрут уже разрешён в button_callback; зарегистрированные
+        # обработчики вызываются напрямую, остальные маршруты обслуживает цепочка ниже.
+        if not is_legacy_route(callback_route):
+            return await callback_route.handler(update, context)
+
+        if data == "other_models":
+            try:
+                await query.answer()
+            except Exception as exc:
+                logger.warning("Error answering callback for other_models: %s", exc)
+            user_lang = get_user_language(user_id) if user_id else "ru"
+            reset_session_context(
+                user_id,
+                reason="other_models",
+                clear_gen_type=True,
+                correlation_id=correlation_id,
+                update_id=update_id,
+                chat_id=query.message.chat_id if query.message else None,
+            )
+            set_session_context(
+                user_id,
+                to_context=UI_CONTEXT_MODEL_MENU,
+                reason="other_models",
+                clear_gen_type=True,
+                correlation_id=correlation_id,
+                update_id=update_id,
+                chat_id=query.message.chat_id if query.message else None,
+            )
+            try:
+                from app.helpers.models_menu_handlers import handle_model_callback
+                await handle_model_callback(
+                    query,
+                    user_id,
+                    user_lang,
+                    "model:sora-watermark-remover",
+                )
+                return SELECTING_MODEL
+            except Exception as exc:
+                logger.error("Error in other_models handler: %s", exc, exc_info=True)
+                fallback_text = (
+                    "❌ Не удалось открыть модель. Попробуйте позже."
                     if user_lang == "ru"
-                    else "❌ Could not determine task_id. Open status from the menu.",
-                    parse_mode="HTML",
-                    reply_markup=build_back_to_menu_keyboard(user_lang),
+                    else "❌ Unable to open model. Please try again later."
+                )
+                try:
+                    await query.answer(fallback_text, show_alert=True)
+                except Exception:
+                    pass
+                await show_main_menu(update, context, source="other_models_error")
+                return ConversationHandler.END
+
+        if data == "cancel_command":
+            session = user_sessions.get(user_id, {}) if user_id else {}
+            job_id = session.get("job_id") if isinstance(session, dict) else None
+            if job_id and user_id is not None:
+                now_ms = _now_ms()
+                _set_user_ui_action(user_id, "cancel_click", now_ms)
+                if isinstance(session, dict):
+                    session["last_ui_action"] = "cancel_click"
+                    session["last_ui_ts_ms"] = now_ms
+                accepted = await _request_job_cancel(
+                    update=update,
+                    context=context,
+                    job_id=job_id,
+                    user_id=user_id,
+                    user_lang=user_lang,
+                    callback_data="cancel_command",
+                    query=query,
+                    correlation_id=correlation_id,
+                    state_source="callback",
+                )
+                if accepted:
+                    _clear_user_task_context(
+                        user_id,
+                        reason="cancel_accepted",
+                        task_id=session.get("task_id"),
+                        allow_mismatch=True,
+                    )
+                    await ensure_main_menu(
+                        update,
+                        context,
+                        source="cancel_generation",
+                        prefer_edit=False,
+                    )
+                    return ConversationHandler.END
+            try:
+                await query.answer("Операция отменена" if user_lang == "ru" else "Cancelled")
+            except Exception:
+                pass
+            if user_id is not None:
+                _clear_user_task_context(
+                    user_id,
+                    reason="cancel_callback",
+                    task_id=session.get("task_id") if isinstance(session, dict) else None,
+                    allow_mismatch=True,
                 )
-                return ConversationHandler.END
+            await ensure_main_menu(update, context, source="cancel", prefer_edit=False)
+            return ConversationHandler.END
 
-            from app.delivery.reconciler import FAILED_STATES, SUCCESS_STATES, deliver_job_result
-            from app.integrations.kie_stub import get_kie_client_or_stub
-            from app.storage import get_storage
+        if data == "reset_step":
+            session_store.clear(user_id)
+            await show_main_menu(update, context, source="reset_step")
+            track_outgoing_action(update_id, action_type="edit_message_text")
+            return ConversationHandler.END
 
-            storage_instance = get_storage()
-            job = await _find_job_by_task_id(storage_instance, task_id)
-            if not job:
-                await query.edit_message_text(
-                    "❌ Не нашёл задачу. Проверьте статус в меню «Мои генерации»."
-                    if user_lang == "ru"
-                    else "❌ Task not found. Check status in “My generations”.",
-                    parse_mode="HTML",
-                    reply_markup=build_back_to_menu_keyboard(user_lang),
+        if data == "reset_wizard":
+            session_store.clear(user_id)
+            await show_main_menu(update, context, source="reset_wizard")
+            track_outgoing_action(update_id, action_type="edit_message_text")
+            return ConversationHandler.END
+
+        # 🔥🔥🔥 SUPER-DETAILED CONTEXT LOGGING
+        try:
+            session = get_session_cached(context, session_store, user_id, update_id, default=None) if user_id else None
+            session_keys = list(session.keys()) if session else []
+            session_model_id = session.get('model_id') if session else None
+            session_waiting_for = session.get('waiting_for') if session else None
+            session_current_param = session.get('current_param') if session else None
+            session_params_keys = list(session.get('params', {}).keys()) if session else []
+            session_required = session.get('required', []) if session else []
+            session_properties_keys = list(session.get('properties', {}).keys()) if session else []
+            chat_id = query.message.chat_id if query and query.message else None
+            message_id = query.message.message_id if query and query.message else None
+            if DEBUG_VERBOSE_LOGS:
+                logger.info(
+                    "BUTTON_CALLBACK_CONTEXT "
+                    "user_id=%s data=%s chat_id=%s message_id=%s update_id=%s user_lang=%s "
+                    "session_exists=%s model_id=%s waiting_for=%s current_param=%s "
+                    "params_keys=%s required=%s properties_keys=%s session_keys=%s",
+                    user_id,
+                    data,
+                    chat_id,
+                    message_id,
+                    update_id,
+                    user_lang,
+                    bool(session),
+                    session_model_id,
+                    session_waiting_for,
+                    session_current_param,
+                    session_params_keys[:15],
+                    session_required[:15],
+                    session_properties_keys[:15],
+                    session_keys[:15],
                 )
-                return ConversationHandler.END
-            job_user_id = job.get("user_id")
-            if job_user_id is not None and job_user_id != user_id and not get_is_admin(user_id):
-                await query.edit_message_text(
-                    "❌ У вас нет доступа к этой задаче."
-                    if user_lang == "ru"
-                    else "❌ You don't have access to this task.",
-                    parse_mode="HTML",
-                    reply_markup=build_back_to_menu_keyboard(user_lang),
+            try:
+                trace_event(
+                    "info",
+                    correlation_id,
+                    event="TRACE_IN",
+                    stage="SESSION_LOAD",
+                    update_type="callback",
+                    action="CALLBACK",
+                    action_path=build_action_path(data),
+                    user_id=user_id,
+                    chat_id=chat_id,
+                    session_exists=bool(session),
+                    model_id=session_model_id,
+                    waiting_for=session_waiting_for,
+                    current_param=session_current_param,
+                    params_keys=session_params_keys[:15],
+                    required=session_required[:15],
+                    param_order=session.get("param_order")[:15] if session and session.get("param_order") else None,
                 )
-                return ConversationHandler.END
-
-            job_id_value = job.get("job_id") or task_id
-            job_id_for_keyboard = job.get("job_id")
-            status_record: Dict[str, Any] = {}
-            provider_state = "unknown"
+            except Exception as trace_exc:
+                logger.warning("TRACE session load failed: %s", trace_exc, exc_info=True)
             try:
-                status_record = await get_kie_client_or_stub().get_task_status(task_id)
-                provider_state = (status_record.get("state") or "unknown").lower()
-            except Exception as exc:
-                logger.warning("open_result_status_fetch_failed task_id=%s error=%s", task_id, exc)
-            status_record["taskId"] = task_id
-            task_keyboard = _build_task_already_started_keyboard(
-                user_lang,
-                task_id=task_id,
-                job_id=job_id_for_keyboard,
-            )
+                correlation_id = None
+                if context and getattr(context, "user_data", None) is not None:
+                    if context.user_data.get("correlation_update_id") == update_id:
+                        correlation_id = context.user_data.get("correlation_id")
+                    if not correlation_id:
+                        correlation_id = get_correlation_id(update_id, user_id)
+                        context.user_data["correlation_id"] = correlation_id
+                        context.user_data["correlation_update_id"] = update_id
+                else:
+                    correlation_id = get_correlation_id(update_id, user_id)
 
-            if provider_state in SUCCESS_STATES:
-                delivered = await deliver_job_result(
-                    context.bot,
-                    storage_instance,
-                    job=job,
-                    status_record=status_record,
-                    notify_user=True,
-                    source="open_result",
-                    get_user_language=get_user_language,
+                log_structured_event(
+                    correlation_id=correlation_id,
+                    user_id=user_id,
+                    chat_id=chat_id,
+                    update_id=update_id,
+                    action="CALLBACK",
+                    action_path=build_action_path(data),
+                    model_id=session_model_id,
+                    gen_type=session.get('gen_type') if session else None,
+                    stage="router",
+                    waiting_for=session_waiting_for,
+                    param=session_current_param,
+                    outcome="received",
+                    duration_ms=int((time.time() - start_time) * 1000),
+                    error_code=None,
+                    fix_hint=None,
                 )
-                if delivered:
-                    _clear_user_task_context(
-                        user_id,
-                        reason="terminal_success_open_result",
-                        task_id=task_id,
-                        allow_mismatch=True,
-                    )
-                await query.edit_message_text(
-                    (
-                        "✅ <b>Результат готов</b>\n\n"
-                        "Я отправил его выше в чате."
-                        if user_lang == "ru"
-                        else "✅ <b>Result is ready</b>\n\nI've sent it above in the chat."
-                    ),
-                    parse_mode="HTML",
-                    reply_markup=task_keyboard,
+            except Exception as structured_log_error:
+                logger.warning(
+                    f"STRUCTURED_LOG error: {structured_log_error}",
+                    exc_info=True,
                 )
+        except Exception as log_error:
+            logger.error(f"❌❌❌ ERROR in BUTTON_CALLBACK CONTEXT logging: {log_error}", exc_info=True)
+            
+    except Exception as e:
+        logger.error(f"Error in button_callback setup: {e}", exc_info=True)
+        # Try to answer anyway if we have query
+        if query:
+            try:
+                await query.answer("❌ Ошибка обработки кнопки. Попробуйте /start", show_alert=True)
+            except:
+                pass
+        return ConversationHandler.END
+    
+    # Wrap all callback handling in try-except for error handling
+    try:
+        # Initialize common variables that might be used in multiple handlers
+        # This prevents UnboundLocalError if variable is assigned in one branch but used in another
+        categories = None
+        total_models = None
+        tutorial_text = None
+        help_text = None
+        referral_text = None
+        history_text = None
+        model_info_text = None
+        prompt_text = None
+        admin_text = None
+        settings_text = None
+        promocodes_text = None
+        broadcast_text = None
+        stats_text = None
+        
+        # Handle claim gift
+        if data == "claim_gift":
+            if has_claimed_gift(user_id):
+                user_lang = get_user_language(user_id)
+                await query.answer(t('error_already_claimed', lang=user_lang), show_alert=True)
                 return ConversationHandler.END
-
-            if provider_state in FAILED_STATES:
-                await storage_instance.update_job_status(
-                    job_id_value,
-                    "failed",
-                    error_message=status_record.get("failMsg"),
-                    error_code=status_record.get("failCode") or "KIE_FAIL_STATE",
+            
+            user_lang = get_user_language(user_id)
+            
+            # Show initial spinning message
+            await query.answer(t('msg_spinning_wheel', lang=user_lang))
+            if user_lang == 'ru':
+                spin_message = await query.edit_message_text(
+                    "🎰 <b>КОЛЕСО ФОРТУНЫ</b> 🎰\n\n"
+                    "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    "🎲 <b>Крутим колесо...</b>\n\n"
+                    "⏳ Подождите, определяем ваш выигрыш...",
+                    parse_mode='HTML'
                 )
-                _clear_user_task_context(
-                    user_id,
-                    reason="terminal_fail_open_result",
-                    task_id=task_id,
-                    allow_mismatch=True,
+            else:
+                spin_message = await query.edit_message_text(
+                    "🎰 <b>WHEEL OF FORTUNE</b> 🎰\n\n"
+                    "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    "🎲 <b>Spinning the wheel...</b>\n\n"
+                    "⏳ Please wait, determining your prize...",
+                    parse_mode='HTML'
                 )
-                await query.edit_message_text(
-                    (
-                        "❌ <b>Задача завершилась с ошибкой</b>\n\n"
-                        "Можно запустить новую генерацию."
-                        if user_lang == "ru"
-                        else "❌ <b>The task failed</b>\n\nYou can start a new generation."
-                    ),
-                    parse_mode="HTML",
-                    reply_markup=build_back_to_menu_keyboard(user_lang),
+            
+            # Animate wheel spinning with different sectors
+            wheel_sectors = [
+                ("🎯", "🎪", "🎨", "🎭", "🎪", "🎯"),
+                ("💰", "💎", "🎁", "⭐", "💎", "💰"),
+                ("🎰", "🎲", "🎯", "🎪", "🎲", "🎰"),
+                ("💫", "✨", "🌟", "⭐", "✨", "💫"),
+                ("🎊", "🎉", "🎈", "🎁", "🎉", "🎊")
+            ]
+            
+            progress_steps = [
+                ("🔄", "🔄", "🔄", "🔄", "🔄", "🔄"),
+                ("⚡", "⚡", "⚡", "⚡", "⚡", "⚡"),
+                ("✨", "✨", "✨", "✨", "✨", "✨"),
+                ("💫", "💫", "💫", "💫", "💫", "💫"),
+                ("🎯", "🎯", "🎯", "🎯", "🎯", "🎯")
+            ]
+            
+            # Show spinning animation
+            for i in range(8):
+                await asyncio.sleep(0.25)
+                sector_idx = i % len(wheel_sectors)
+                progress_idx = min(i, len(progress_steps) - 1)
+                
+                wheel_display = " ".join(wheel_sectors[sector_idx])
+                progress_display = " ".join(progress_steps[progress_idx])
+                
+                # Progress bar simulation
+                progress_percent = min((i + 1) * 12.5, 100)
+                progress_bar = "█" * int(progress_percent / 5) + "░" * (20 - int(progress_percent / 5))
+                
+                try:
+                    if user_lang == 'ru':
+                        await spin_message.edit_text(
+                            f"🎰 <b>КОЛЕСО ФОРТУНЫ</b> 🎰\n\n"
+                            f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                            f"{wheel_display}\n\n"
+                            f"<b>Крутим...</b> {progress_display}\n\n"
+                            f"📊 [{progress_bar}] {progress_percent:.0f}%\n\n"
+                            f"⏳ Подождите, определяем ваш выигрыш...",
+                            parse_mode='HTML'
+                        )
+                    else:
+                        await spin_message.edit_text(
+                            f"🎰 <b>WHEEL OF FORTUNE</b> 🎰\n\n"
+                            f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                            f"{wheel_display}\n\n"
+                            f"<b>Spinning...</b> {progress_display}\n\n"
+                            f"📊 [{progress_bar}] {progress_percent:.0f}%\n\n"
+                            f"⏳ Please wait, determining your prize...",
+                            parse_mode='HTML'
+                        )
+                except:
+                    pass
+            
+            # Final spin - slow down
+            await asyncio.sleep(0.4)
+            
+            # Get the gift amount
+            amount = spin_gift_wheel()
+            await add_user_balance_async(user_id, amount)
+            set_gift_claimed(user_id)
+            
+            # Show result with celebration
+            if user_lang == 'ru':
+                gift_text = (
+                    f'🎉 <b>ПОЗДРАВЛЯЕМ!</b> 🎉\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'🎰 <b>КОЛЕСО ОСТАНОВИЛОСЬ!</b> 🎰\n\n'
+                    f'🎁 <b>Ваш выигрыш:</b>\n\n'
+                    f'💰 <b>{format_rub_amount(amount)}</b>\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'✅ <b>Сумма автоматически зачислена на ваш баланс!</b>\n\n'
+                    f'💡 <b>Что дальше:</b>\n'
+                    f'• Начните генерацию контента прямо сейчас\n'
+                    f'• Используйте любую модель из каталога\n'
+                    f'• Наслаждайтесь премиум возможностями!\n\n'
+                    f'✨ <b>Удачи в создании контента!</b>'
                 )
-                return ConversationHandler.END
-
-            wait_text = (
-                "⏳ <b>Результат ещё готовится</b>\n\n"
-                f"Текущий статус: <b>{provider_state}</b>\n"
-                "Вы можете проверить статус позже или отменить задачу."
-                if user_lang == "ru"
-                else (
-                    "⏳ <b>The result is still processing</b>\n\n"
-                    f"Current status: <b>{provider_state}</b>\n"
-                    "You can check again later or cancel the task."
+            else:
+                gift_text = (
+                    f'🎉 <b>CONGRATULATIONS!</b> 🎉\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'🎰 <b>WHEEL STOPPED!</b> 🎰\n\n'
+                    f'🎁 <b>Your prize:</b>\n\n'
+                    f'💰 <b>{format_rub_amount(amount)}</b>\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'✅ <b>Amount automatically added to your balance!</b>\n\n'
+                    f'💡 <b>What\'s next:</b>\n'
+                    f'• Start content generation right now\n'
+                    f'• Use any model from the catalog\n'
+                    f'• Enjoy premium features!\n\n'
+                    f'✨ <b>Good luck creating content!</b>'
                 )
+            
+            keyboard = [
+                [InlineKeyboardButton(t('btn_check_balance', lang=user_lang), callback_data="check_balance")],
+                [InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")]
+            ]
+            
+            await spin_message.edit_text(
+                gift_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
             )
-            await query.edit_message_text(wait_text, parse_mode="HTML", reply_markup=task_keyboard)
             return ConversationHandler.END
-
-        if data.startswith("retry_delivery:"):
-            task_id = data.split(":", 1)[1] if ":" in data else ""
-            await query.answer("Повторяю доставку...")
-
-            async with pending_deliveries_lock:
-                payload = pending_deliveries.get((user_id, task_id))
-
-            if not payload:
-                await query.edit_message_text(
-                    "❌ Не нашёл результат для повторной доставки. Попробуйте заново через меню.",
-                    parse_mode="HTML",
-                )
+        
+        # Handle admin user mode toggle (MUST be first, before any other checks)
+        if data == "admin_user_mode":
+            # Toggle user mode for admin
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
                 return ConversationHandler.END
-
-            from app.generations.telegram_sender import send_result_file
-            from app.storage import get_storage
-            storage_instance = get_storage()
-
-            delivered = False
-            try:
-                delivered = bool(
-                    await send_result_file(
-                        context.bot,
-                        payload["chat_id"],
-                        payload["media_type"],
-                        payload["urls"],
-                        payload.get("text"),
-                        model_id=payload.get("model_id"),
-                        gen_type=payload.get("gen_type"),
-                        correlation_id=payload.get("correlation_id"),
-                        request_id=payload.get("request_id"),
-                        prompt_hash=payload.get("prompt_hash"),
-                        params=payload.get("params"),
-                        model_label=payload.get("model_label"),
-                        task_id=payload.get("task_id"),
-                        job_id=payload.get("job_id"),
-                    )
+            
+            session = ensure_session_cached(context, session_store, user_id, update_id)
+            
+            current_mode = session.get('admin_user_mode', False)
+            session['admin_user_mode'] = not current_mode
+            
+            if not current_mode:
+                # Switching to user mode - send new message directly
+                user_lang = get_user_language(user_id)
+                await query.answer(t('msg_user_mode_enabled', lang=user_lang))
+                user = update.effective_user
+                categories = get_categories_from_registry()
+                total_models = len(get_models_sync())
+                
+                remaining_free = await get_user_free_generations_remaining(user_id)
+                free_info = ""
+                if remaining_free > 0:
+                    free_info = f"\n🎁 <b>Бесплатно:</b> {remaining_free} генераций бесплатных моделей\n"
+                
+                welcome_text = (
+                    f'✨ <b>ПРЕМИУМ AI MARKETPLACE</b> ✨\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'👋 Привет, {user.mention_html()}!\n\n'
+                    f'🚀 <b>Топовые нейросети без VPN</b>\n'
+                    f'📦 <b>{total_models} моделей</b> | <b>{len(categories)} категорий</b>{free_info}\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'💎 <b>Преимущества:</b>\n'
+                    f'• Прямой доступ к мировым AI\n'
+                    f'• Профессиональное качество 2K/4K\n'
+                    f'• Мгновенная генерация\n\n'
+                    f'🎯 <b>Выберите категорию или все модели</b>'
                 )
-            except Exception as exc:
-                log_structured_event(
-                    correlation_id=payload.get("correlation_id"),
-                    user_id=user_id,
-                    chat_id=payload.get("chat_id"),
-                    action="DELIVERY_FAIL",
-                    action_path="retry_delivery",
-                    model_id=payload.get("model_id"),
-                    stage="TG_DELIVER",
-                    outcome="failed",
-                    error_code="TG_DELIVER_EXCEPTION",
-                    fix_hint=str(exc),
-                    param={"task_id": task_id},
+                
+                keyboard = []
+                # All models button first
+                keyboard.append([
+                    InlineKeyboardButton("📋 Все модели", callback_data="all_models")
+                ])
+                
+                keyboard.append([])
+                for category in categories:
+                    models_in_category = get_models_by_category_from_registry(category)
+                    emoji = models_in_category[0]["emoji"] if models_in_category else "📦"
+                    keyboard.append([InlineKeyboardButton(
+                        f"{emoji} {category} ({len(models_in_category)})",
+                        callback_data=f"category:{category}"
+                    )])
+                
+                keyboard.append([
+                    InlineKeyboardButton("💳 Пополнить баланс", callback_data="topup_balance")
+                ])
+                keyboard.append([
+                    InlineKeyboardButton("🔙 Вернуться в админ-панель", callback_data="admin_back_to_admin")
+                ])
+                keyboard.append([
+                    InlineKeyboardButton("🆘 Помощь", callback_data="help_menu"),
+                    InlineKeyboardButton("💬 Поддержка", callback_data="support_contact")
+                ])
+                
+                await query.message.reply_text(
+                    welcome_text,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML'
                 )
-
-            if delivered:
-                async with pending_deliveries_lock:
-                    pending_deliveries.pop((user_id, task_id), None)
-                try:
-                    await storage_instance.update_json_file(
-                        "delivery_records.json",
-                        lambda data: {
-                            **data,
-                            f"{user_id}:{task_id}": {
-                                **data.get(f"{user_id}:{task_id}", {}),
-                                "status": "delivered",
-                                "updated_at": datetime.now().isoformat(),
-                                "delivered_at": datetime.now().isoformat(),
-                            },
-                        },
-                    )
-                except Exception as exc:
-                    logger.warning("Failed to persist delivery record: %s", exc)
-                log_task_lifecycle(
-                    state="delivered",
-                    user_id=user_id,
-                    task_id=task_id,
-                    job_id=payload.get("job_id"),
-                    model_id=payload.get("model_id"),
-                    correlation_id=payload.get("correlation_id"),
-                    source="retry_delivery",
+                return ConversationHandler.END
+            else:
+                # Switching back to admin mode - send new message with full admin panel
+                session = ensure_session_cached(context, session_store, user_id, update_id)
+                session['admin_user_mode'] = False
+                user_lang = get_user_language(user_id)
+                await query.answer(t('msg_returning_to_admin', lang=user_lang))
+                user = update.effective_user
+                generation_types = get_generation_types()
+                total_models = len(get_models_sync())
+                
+                welcome_text = (
+                    f'👑 ✨ <b>ПАНЕЛЬ АДМИНИСТРАТОРА</b> ✨\n\n'
+                    f'Привет, {user.mention_html()}! 👋\n\n'
+                    f'🎯 <b>ПОЛНЫЙ КОНТРОЛЬ НАД AI MARKETPLACE</b>\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'📊 <b>СТАТИСТИКА СИСТЕМЫ:</b>\n\n'
+                    f'✅ <b>{total_models} премиум моделей</b> в арсенале\n'
+                    f'✅ <b>{len(generation_types)} категорий</b> контента\n'
+                    f'✅ Безлимитный доступ ко всем генерациям\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'🔥 <b>ТОПОВЫЕ МОДЕЛИ В СИСТЕМЕ:</b>\n\n'
+                    f'🎨 <b>Google Imagen 4 Ultra</b> - Флагман от Google DeepMind\n'
+                    f'   💰 Безлимит (цена: 4.63 ₽)\n'
+                    f'   ⭐️ Максимальное качество для тестирования\n\n'
+                    f'🍌 <b>Nano Banana Pro</b> - 4K от Google\n'
+                    f'   💰 Безлимит (1K/2K: 6.95 ₽, 4K: 9.27 ₽)\n'
+                    f'   🎯 Профессиональная генерация 2K/4K\n\n'
+                    f'🎥 <b>Sora 2</b> - Видео от OpenAI\n'
+                    f'   💰 Безлимит (цена: 11.58 ₽) за 10-секундное видео\n'
+                    f'   🎬 Кинематографические видео с аудио\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'⚙️ <b>АДМИНИСТРАТИВНЫЕ ВОЗМОЖНОСТИ:</b>\n\n'
+                    f'📈 Просмотр статистики и аналитики\n'
+                    f'👥 Управление пользователями\n'
+                    f'🎁 Управление промокодами\n'
+                    f'🧪 Тестирование OCR системы\n'
+                    f'💼 Полный контроль над ботом\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'💫 <b>НАЧНИТЕ УПРАВЛЕНИЕ ИЛИ ТЕСТИРОВАНИЕ!</b>'
                 )
-                dry_run = is_dry_run() or not allow_real_generation()
-                if not dry_run:
-                    await _commit_post_delivery_charge(
-                        session=payload.get("session", {}),
-                        user_id=user_id,
-                        chat_id=payload.get("chat_id"),
-                        task_id=payload.get("task_id"),
-                        sku_id=payload.get("sku_id", ""),
-                        price=float(payload.get("price", 0)),
-                        is_free=bool(payload.get("is_free")),
-                        is_admin_user=bool(payload.get("is_admin_user")),
-                        correlation_id=payload.get("correlation_id"),
-                        model_id=payload.get("model_id"),
-                    )
-                await query.edit_message_text(
-                    "✅ <b>Доставка завершена</b>\n\nРезультат успешно отправлен.",
-                    reply_markup=InlineKeyboardMarkup(
-                        [[InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]]
-                    ),
-                    parse_mode="HTML",
+                
+                keyboard = []
+                # All models button first
+                keyboard.append([
+                    InlineKeyboardButton("📋 Все модели", callback_data="all_models")
+                ])
+                
+                keyboard.append([])
+                for category in categories:
+                    models_in_category = get_models_by_category_from_registry(category)
+                    emoji = models_in_category[0]["emoji"] if models_in_category else "📦"
+                    keyboard.append([InlineKeyboardButton(
+                        f"{emoji} {category} ({len(models_in_category)})",
+                        callback_data=f"category:{category}"
+                    )])
+                
+                keyboard.append([
+                    InlineKeyboardButton("📋 Все модели", callback_data="all_models")
+                ])
+                keyboard.append([
+                    InlineKeyboardButton("📊 Статистика", callback_data="admin_stats"),
+                    InlineKeyboardButton("⚙️ Настройки", callback_data="admin_settings")
+                ])
+                keyboard.append([
+                    InlineKeyboardButton("🔍 Поиск", callback_data="admin_search"),
+                    InlineKeyboardButton("📝 Добавить", callback_data="admin_add")
+                ])
+                keyboard.append([
+                    InlineKeyboardButton("🧪 Тест OCR", callback_data="admin_test_ocr")
+                ])
+                keyboard.append([
+                    InlineKeyboardButton("👤 Режим пользователя", callback_data="admin_user_mode")
+                ])
+                keyboard.append([InlineKeyboardButton("🆘 Помощь", callback_data="help_menu")])
+                
+                await query.message.reply_text(
+                    welcome_text,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML'
                 )
                 return ConversationHandler.END
-
-            retry_keyboard = InlineKeyboardMarkup(
-                [
-                    [InlineKeyboardButton("🔁 Повторить доставку", callback_data=f"retry_delivery:{task_id}")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")],
-                ]
-            )
-            await query.edit_message_text(
-                "⚠️ <b>Доставка снова не удалась</b>\n\n"
-                "Попробуйте ещё раз чуть позже или используйте главное меню.",
-                reply_markup=retry_keyboard,
-                parse_mode="HTML",
-            )
-            return ConversationHandler.END
         
-        # Handle category selection (can be called from main menu)
-        if data.startswith("gen_type:"):
-            # Answer callback immediately to show button was pressed
-            try:
-                await query.answer()
-            except:
-                pass
-            reset_session_context(
-                user_id,
-                reason="gen_type",
-                clear_gen_type=False,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                chat_id=query.message.chat_id if query.message else None,
-            )
-            
-            # User selected a generation type
-            parts = data.split(":", 1)
-            if len(parts) < 2:
-                try:
-                    await query.answer("Ошибка: неверный формат запроса", show_alert=True)
-                except:
-                    pass
-                try:
-                    await query.edit_message_text("❌ Ошибка: неверный формат запроса.")
-                except:
-                    try:
-                        await query.message.reply_text("❌ Ошибка: неверный формат запроса.")
-                    except:
-                        pass
+        if data == "admin_back_to_admin":
+            # Return to admin mode - send new message directly
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
                 return ConversationHandler.END
-            gen_type = parts[1]
+            
             session = ensure_session_cached(context, session_store, user_id, update_id)
-            session["active_gen_type"] = gen_type
-            session["gen_type"] = gen_type
-            set_session_context(
-                user_id,
-                to_context=UI_CONTEXT_MODEL_MENU,
-                reason="gen_type",
-                active_gen_type=gen_type,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                chat_id=query.message.chat_id if query.message else None,
-            )
-            user_lang = get_user_language(user_id)
-            loading_text = (
-                "⏳ <b>Загружаю меню...</b>\n\nПожалуйста, подождите пару секунд."
-                if user_lang == "ru"
-                else "⏳ <b>Loading menu...</b>\n\nPlease wait a moment."
-            )
-            await _safe_edit_or_reply(query, loading_text, parse_mode="HTML")
-            _create_background_task(
-                _render_gen_type_menu(
-                    query=query,
-                    user_id=user_id,
-                    gen_type=gen_type,
-                    correlation_id=correlation_id,
-                    update_id=update_id,
-                ),
-                action="render_gen_type_menu",
+            session['admin_user_mode'] = False
+            await query.answer("Возврат в админ-панель")
+            user = update.effective_user
+            categories = get_categories_from_registry()
+            total_models = len(KIE_MODELS)
+            
+            welcome_text = (
+                f'👑 <b>Панель администратора</b>\n\n'
+                f'Привет, {user.mention_html()}! 👋\n\n'
+                f'🚀 <b>Расширенное меню управления</b>\n\n'
+                f'📊 <b>Статистика:</b>\n'
+                f'✅ <b>{total_models} моделей</b> доступно\n'
+                f'✅ <b>{len(categories)} категорий</b>\n\n'
+                f'⚙️ <b>Административные функции доступны</b>'
             )
-            return SELECTING_MODEL
-        
-        if data.startswith("category:"):
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except:
-                pass
             
-            parts = data.split(":", 1)
-            if len(parts) < 2:
-                try:
-                    await query.answer("Ошибка: неверный формат запроса", show_alert=True)
-                except:
-                    pass
-                try:
-                    await query.edit_message_text("❌ Ошибка: неверный формат запроса.")
-                except:
-                    try:
-                        await query.message.reply_text("❌ Ошибка: неверный формат запроса.")
-                    except:
-                        pass
-                return ConversationHandler.END
-            category = parts[1]
-            models = get_models_by_category_from_registry(category)
+            keyboard = []
             
-            if not models:
-                try:
-                    await query.edit_message_text(f"❌ В категории {category} нет моделей.")
-                except:
-                    try:
-                        await query.message.reply_text(f"❌ В категории {category} нет моделей.")
-                    except:
-                        pass
-                return ConversationHandler.END
+            # All models button first
+            keyboard.append([
+                InlineKeyboardButton("📋 Все модели", callback_data="all_models")
+            ])
             
-            keyboard = []
-            for model in models:
-                model_name = model.get('name', model.get('id', 'Unknown'))
-                model_emoji = model.get('emoji', '🤖')
-                model_id = model.get('id')
-                button_text = f"{model_emoji} {model_name}"
-                if len(button_text.encode("utf-8")) > 60:
-                    truncated = model_name[:40].rstrip()
-                    button_text = f"{model_emoji} {truncated}..."
-                
-                # Ensure callback_data is not too long (Telegram limit: 64 bytes)
-                callback_data = f"select_model:{model_id}"
-                if len(callback_data.encode('utf-8')) > 64:
-                    logger.error(f"Callback data too long for model {model_id}: {len(callback_data.encode('utf-8'))} bytes")
-                    callback_data = f"sel:{model_id[:50]}"
-                
+            keyboard.append([])
+            for category in categories:
+                models_in_category = get_models_by_category_from_registry(category)
+                emoji = models_in_category[0]["emoji"] if models_in_category else "📦"
                 keyboard.append([InlineKeyboardButton(
-                    button_text,
-                    callback_data=callback_data
+                    f"{emoji} {category} ({len(models_in_category)})",
+                    callback_data=f"category:{category}"
                 )])
-            user_lang = get_user_language(query.from_user.id)
-            keyboard.append([InlineKeyboardButton(t('btn_back_to_categories', lang=user_lang), callback_data="show_models")])
-            keyboard.append([InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")])
-            
-            # Premium formatted header
-            category_emoji = {
-                "Видео": "🎬",
-                "Изображения": "🖼️",
-                "Редактирование": "✏️"
-            }.get(category, "📁")
             
-            models_text = (
-                f"✨ <b>ПРЕМИУМ КАТАЛОГ</b> ✨\n\n"
-                f"{category_emoji} <b>Категория: {category}</b>\n"
-                f"📦 <b>Доступно моделей:</b> {len(models)}\n\n"
-                f"━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"💡 <i>Выберите модель из списка ниже</i>\n"
-                f"<i>Подробная информация отобразится при выборе</i>"
-            )
+            keyboard.append([
+                InlineKeyboardButton("📊 Статистика", callback_data="admin_stats"),
+                InlineKeyboardButton("⚙️ Настройки", callback_data="admin_settings")
+            ])
+            keyboard.append([
+                InlineKeyboardButton("🔍 Поиск", callback_data="admin_search"),
+                InlineKeyboardButton("📝 Добавить", callback_data="admin_add")
+            ])
+            keyboard.append([
+                InlineKeyboardButton("🧪 Тест OCR", callback_data="admin_test_ocr")
+            ])
+            keyboard.append([InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")])
             
-            await query.edit_message_text(
-                models_text,
+            await query.message.reply_text(
+                welcome_text,
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode='HTML'
             )
-            return SELECTING_MODEL
+            return ConversationHandler.END
         
-        if data == "free_tools":
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except Exception as e:
-                logger.error(f"Error answering callback for free_tools: {e}")
-                pass
-            reset_session_context(
-                user_id,
-                reason="free_tools",
-                clear_gen_type=True,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                chat_id=query.message.chat_id if query.message else None,
-            )
-            # Устанавливаем источник бесплатной генерации
-            if user_id in user_sessions:
-                user_sessions[user_id]["free_source"] = "fast_tools"
-            set_session_context(
-                user_id,
-                to_context=UI_CONTEXT_FREE_TOOLS_MENU,
-                reason="free_tools",
-                clear_gen_type=True,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                chat_id=query.message.chat_id if query.message else None,
-            )
-            logger.info(f"User {user_id} clicked 'free_tools' button")
-            
-            # Get free tools from pricing SSOT (fixed order)
-            free_sku_ids = get_free_tools_model_ids()
-            from app.pricing.ssot_catalog import (
-                get_sku_by_id,
-            )
-            models_map = {model.get('id'): model for model in get_models_sync()}
-            unique_sku_ids = []
-            seen_sku_ids = set()
-            for sku_id in free_sku_ids:
-                if sku_id in seen_sku_ids:
-                    continue
-                seen_sku_ids.add(sku_id)
-                unique_sku_ids.append(sku_id)
-            free_skus = [get_sku_by_id(sku_id) for sku_id in unique_sku_ids]
-            free_skus = [sku for sku in free_skus if sku and sku.model_id in models_map]
-
-            if not free_skus:
-                user_lang = get_user_language(user_id)
-                keyboard = [[InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")]]
-                if user_lang == 'ru':
-                    await query.edit_message_text(
-                        "ℹ️ <b>Нет доступных бесплатных SKU</b>\n\n"
-                        "В прайс-SSOT пока нет бесплатных вариантов.\n\n"
-                        "Пока можно выбрать модель из каталога.",
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                else:
-                    await query.edit_message_text(
-                        "ℹ️ <b>No free SKUs available</b>\n\n"
-                        "Pricing SSOT does not include free variants yet.\n\n"
-                        "You can pick a model from the catalog.",
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                return ConversationHandler.END
+    
+        if data == "generate_again":
+            # Generate again - restore model and show model info, then ask for new prompt
+            await query.answer()  # Acknowledge the callback
             
-            user_lang = get_user_language(user_id)
-            free_counter_line = ""
-            try:
-                free_counter_line = await _await_with_timeout(
-                    get_free_counter_line(
-                        user_id,
-                        user_lang=user_lang,
-                        correlation_id=correlation_id,
-                        action_path="free_tools_menu",
-                        sku_id=free_sku_ids[0] if free_sku_ids else None,
-                    ),
-                    timeout=MAIN_MENU_DEP_TIMEOUT_SECONDS,
-                    label="free_tools_counter",
-                    correlation_id=correlation_id,
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    update_id=update_id,
-                    default="",
-                )
-            except Exception as exc:
-                logger.warning("Failed to resolve free counter line: %s", exc)
-            if free_counter_line:
-                if user_lang == "en":
-                    free_counter_line = f"{free_counter_line}\n🔄 Limit refreshes once per day."
-                else:
-                    free_counter_line = f"{free_counter_line}\n🔄 Лимит обновляется раз в день."
-            if user_lang == 'ru':
-                free_tools_text = (
-                    f"🆓 <b>БЕСПЛАТНЫЕ ИНСТРУМЕНТЫ</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"💡 <b>Все инструменты в этом разделе полностью бесплатны!</b>\n\n"
-                    f"🤖 <b>Доступные инструменты:</b>\n\n"
-                    f"💡 <b>Выберите инструмент ниже</b>"
-                )
-            else:
-                free_tools_text = (
-                    f"🆓 <b>FAST TOOLS</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"💡 <b>All tools in this section are completely free!</b>\n\n"
-                    f"🤖 <b>Available tools:</b>\n\n"
-                    f"💡 <b>Select a tool below</b>"
-                )
-            free_tools_text = _append_free_counter_text(free_tools_text, free_counter_line)
-            keyboard_markup, unique_buttons = _build_free_tools_keyboard(
-                free_skus=free_skus,
-                models_map=models_map,
-                user_lang=user_lang,
-            )
-            if unique_buttons:
-                if user_lang == "en":
-                    free_tools_text = free_tools_text.replace(
-                        "<b>Available tools:</b>",
-                        f"<b>Available tools ({unique_buttons}):</b>",
-                    )
-                else:
-                    free_tools_text = free_tools_text.replace(
-                        "<b>Доступные инструменты:</b>",
-                        f"<b>Доступные инструменты ({unique_buttons}):</b>",
-                    )
-            if unique_buttons < len(free_skus):
-                logger.warning(
-                    "FREE_TOOLS_KEYBOARD_DEDUPED user_id=%s removed=%s",
-                    user_id,
-                    len(free_skus) - unique_buttons,
-                )
+            logger.info(f"Generate again requested by user {user_id}")
             
-            try:
+            if user_id not in saved_generations:
+                logger.warning(f"No saved generation data for user {user_id}")
                 await query.edit_message_text(
-                    free_tools_text,
-                    reply_markup=keyboard_markup,
+                    "❌ <b>Данные для повторной генерации не найдены</b>\n\n"
+                    "Начните новую генерацию через меню.",
                     parse_mode='HTML'
                 )
-            except Exception as e:
-                logger.error(f"Error editing message in free_tools: {e}", exc_info=True)
-                try:
-                    await query.message.reply_text(
-                        free_tools_text,
-                        reply_markup=keyboard_markup,
-                        parse_mode='HTML'
-                    )
-                except Exception as e2:
-                    logger.error(f"Error sending new message in free_tools: {e2}", exc_info=True)
-                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
+                return ConversationHandler.END
             
-            # Return SELECTING_MODEL state so that select_model: buttons work
-            return SELECTING_MODEL
-        
-        if data == "show_models" or data == "all_models":
-            # Answer callback immediately to show button was pressed
-            try:
-                await query.answer()
-            except Exception as e:
-                logger.error(f"Error answering callback for show_models/all_models: {e}")
-                pass
+            saved_data = saved_generations[user_id]
+            logger.info(f"Restoring generation data for user {user_id}, model: {saved_data.get('model_id')}")
             
-            logger.info(f"User {user_id} clicked 'show_models' or 'all_models' button (data: {data})")
-            reset_session_context(
-                user_id,
-                reason="show_models",
-                clear_gen_type=True,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                chat_id=query.message.chat_id if query.message else None,
-            )
-            set_session_context(
-                user_id,
-                to_context=UI_CONTEXT_GEN_TYPE_MENU,
-                reason="show_models",
-                clear_gen_type=True,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                chat_id=query.message.chat_id if query.message else None,
-            )
+            # Restore session with model info, but clear params to start fresh
+            session = ensure_session_cached(context, session_store, user_id, update_id)
             
-            # Show generation types instead of all models with marketing text
-            generation_types = get_generation_types()
-            visible_models_by_type = {
-                gen_type: len(get_visible_models_by_generation_type(gen_type))
-                for gen_type in generation_types
-            }
-            visible_generation_types = [
-                gen_type for gen_type, count in visible_models_by_type.items() if count > 0
-            ]
-            remaining_free = await get_user_free_generations_remaining(user_id)
-            user_lang = get_user_language(user_id)
-            free_counter_line = ""
-            try:
-                free_counter_line = await _await_with_timeout(
-                    get_free_counter_line(
-                        user_id,
-                        user_lang=user_lang,
-                        correlation_id=correlation_id,
-                        action_path="models_menu",
-                    ),
-                    timeout=MAIN_MENU_DEP_TIMEOUT_SECONDS,
-                    label="models_menu_counter",
-                    correlation_id=correlation_id,
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    update_id=update_id,
-                    default="",
-                )
-            except Exception as exc:
-                logger.warning("Failed to resolve free counter line: %s", exc)
+            model_id = saved_data['model_id']
+            model_info = saved_data['model_info']
             
-            models_text = (
-                f"🤖 <b>ВЫБЕРИТЕ НЕЙРОСЕТЬ</b> 🤖\n\n"
-                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"💡 <b>КАК ЭТО РАБОТАЕТ:</b>\n"
-                f"1️⃣ Выберите тип генерации (текст→фото, фото→видео и т.д.)\n"
-                f"2️⃣ Выберите нейросеть из списка\n"
-                f"3️⃣ Создавайте контент! 🚀\n\n"
-                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            )
+            # Restore model info but clear params - user will enter new prompt
+            session.update({
+                'model_id': model_id,
+                'model_info': model_info,
+                'properties': saved_data['properties'].copy(),
+                'required': saved_data['required'].copy(),
+                'params': {}  # Clear params - start fresh
+            })
             
-            if remaining_free > 0:
-                models_text += (
-                    f"🎁 <b>БЕСПЛАТНО:</b> {remaining_free} генераций бесплатных моделей доступно!\n\n"
-                )
+            # Get user balance and calculate available generations (same as select_model)
+            user_balance = await get_user_balance_async(user_id)
+            is_admin = get_is_admin(user_id)
             
-            visible_models_count = len(_get_visible_model_ids())
-            models_text += (
-                f"📦 <b>Доступно:</b> {len(visible_generation_types)} типов генерации\n"
-                f"🤖 <b>Моделей:</b> {visible_models_count} топовых нейросетей"
-            )
-            models_text = _append_free_counter_text(models_text, free_counter_line)
+            # Calculate price for default parameters (minimum price)
+            default_params = {}
+            if model_id == "nano-banana-pro":
+                default_params = {"resolution": "1K"}  # Cheapest option
+            elif model_id == "seedream/4.5-text-to-image" or model_id == "seedream/4.5-edit":
+                default_params = {"quality": "basic"}  # Basic quality (same price, but for consistency)
             
-            keyboard = []
+            min_price = get_from_price_value(model_id)
+            price_text = format_price_rub(min_price, is_admin) if min_price is not None else "💰 <b>от — ₽</b>"
             
-            if user_lang == 'ru':
-                button_text = f"🆓 FAST TOOLS ({remaining_free}/{FREE_GENERATIONS_PER_DAY})"
+            # Calculate how many generations available
+            if is_admin:
+                available_count = "Безлимит"
+            elif min_price and user_balance >= min_price:
+                available_count = int(user_balance / min_price)
             else:
-                button_text = f"🆓 FAST TOOLS ({remaining_free}/{FREE_GENERATIONS_PER_DAY})"
-            keyboard.append([
-                InlineKeyboardButton(button_text, callback_data="free_tools")
-            ])
+                available_count = 0
+            
+            # Show model info with price and available generations (improved format)
+            model_name = model_info.get('name', model_id)
+            model_emoji = model_info.get('emoji', '🤖')
+            model_desc = model_info.get('description', '')
             
-            keyboard.append([])  # Empty row
+            # Получаем категорию модели для контекста
+            model_category = model_info.get('category', '')
+            gen_type = model_info.get('generation_type', '')
+
+            model_info_text = (
+                f"{model_emoji} <b>{model_name}</b>\n\n"
+                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            )
             
-            # Generation types buttons (2 per row for compact display)
-            # Find text-to-image type and add it after free generation button
-            text_to_image_type = None
-            gen_type_rows = []
-            gen_type_index = 0  # Separate index for non-text-to-image types
+            if model_category:
+                model_info_text += f"📁 <b>Категория:</b> {model_category}\n"
+            if gen_type:
+                gen_type_display = gen_type.replace('_', ' ').replace('-', ' ').title()
+                model_info_text += f"🎯 <b>Тип:</b> {gen_type_display}\n"
             
-            for gen_type in generation_types:
-                gen_info = get_generation_type_info(gen_type)
-                models_count = visible_models_by_type.get(gen_type, 0)
-                
-                # Skip if no models in this type
-                if models_count == 0:
-                    logger.debug("No models found for generation type: %s", gen_type)
-                    continue
-                
-                # Identify text-to-image type (will be added separately)
-                if gen_type == 'text-to-image':
-                    text_to_image_type = gen_type
-                    continue
-                
-                # Get translated name for generation type
-                gen_type_key = f'gen_type_{gen_type.replace("-", "_")}'
-                gen_type_name = t(gen_type_key, lang=user_lang, default=gen_info.get('name', gen_type))
-                button_text = f"{gen_type_name} ({models_count})"
-                
-                # Add buttons in pairs (2 per row)
-                if gen_type_index % 2 == 0:
-                    gen_type_rows.append([InlineKeyboardButton(
-                        button_text,
-                        callback_data=f"gen_type:{gen_type}"
-                    )])
-                else:
-                    if gen_type_rows:
-                        gen_type_rows[-1].append(InlineKeyboardButton(
-                            button_text,
-                            callback_data=f"gen_type:{gen_type}"
-                        ))
-                    else:
-                        gen_type_rows.append([InlineKeyboardButton(
-                            button_text,
-                            callback_data=f"gen_type:{gen_type}"
-                        )])
-                
-                gen_type_index += 1
-            
-            # Add text-to-image button after free generation (if it exists and has models)
-            if text_to_image_type:
-                gen_info = get_generation_type_info(text_to_image_type)
-                models_count = visible_models_by_type.get(text_to_image_type, 0)
-                if models_count > 0:
-                    gen_type_key = f'gen_type_{text_to_image_type.replace("-", "_")}'
-                    gen_type_name = t(gen_type_key, lang=user_lang, default=gen_info.get('name', text_to_image_type))
-                    button_text = f"{gen_type_name} ({models_count})"
-                    keyboard.append([
-                        InlineKeyboardButton(button_text, callback_data=f"gen_type:{text_to_image_type}")
-                    ])
-                    keyboard.append([])  # Empty row for spacing
+            if model_category or gen_type:
+                model_info_text += "\n"
             
-            # Add other generation types
-            keyboard.extend(gen_type_rows)
-
-            # Add free tools button (always visible, prominent)
-            keyboard.append([])  # Empty row for spacing
-            if user_lang == 'ru':
-                keyboard.append([
-                    InlineKeyboardButton("🆓 FAST TOOLS", callback_data="free_tools")
-                ])
-            else:
-                keyboard.append([
-                    InlineKeyboardButton("🆓 FAST TOOLS", callback_data="free_tools")
-                ])
-
-            # Add "Other models" shortcut
-            if user_lang == 'ru':
-                keyboard.append([
-                    InlineKeyboardButton("🧩 Другие модели", callback_data="other_models")
-                ])
-            else:
-                keyboard.append([
-                    InlineKeyboardButton("🧩 Other models", callback_data="other_models")
-                ])
-
-            # Add button to show all models directly (without grouping by type)
-            keyboard.append([])  # Empty row for spacing
-            if user_lang == 'ru':
-                keyboard.append([
-                    InlineKeyboardButton(f"📋 Показать все {visible_models_count} моделей", callback_data="show_all_models_list")
-                ])
-            else:
-                keyboard.append([
-                    InlineKeyboardButton(f"📋 Show all {visible_models_count} models", callback_data="show_all_models_list")
-                ])
+            if model_desc:
+                model_info_text += f"ℹ️ <b>Описание:</b>\n{model_desc}\n\n"
             
-            user_lang = get_user_language(user_id)
-            keyboard.append([
-                InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-            ])
-            keyboard.append([InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")])
+            model_info_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            model_info_text += f"💰 <b>Стоимость генерации:</b> {price_text}\n"
             
-            try:
-                await query.edit_message_text(
-                    models_text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
-            except BadRequest as exc:
-                if "Message is not modified" in str(exc):
-                    await query.answer()
-                    return SELECTING_MODEL
-                logger.error(f"Error editing message in show_models: {exc}", exc_info=True)
-                try:
-                    await query.message.reply_text(
-                        models_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
+            if is_admin:
+                model_info_text += t('msg_unlimited_available', lang=user_lang) + "\n\n"
+            else:
+                if available_count > 0:
+                    model_info_text += t('msg_available_generations', lang=user_lang, 
+                                        count=available_count, 
+                                        balance=format_price_rub(user_balance, is_admin)) + "\n\n"
+                else:
+                    # Not enough balance - show warning
+                    model_info_text += t('msg_insufficient_funds', lang=user_lang,
+                                        balance=format_price_rub(user_balance, is_admin),
+                                        required=price_text)
+                    
+                    keyboard = _build_topup_menu_keyboard(user_lang)
+                    
+                    await query.edit_message_text(
+                        model_info_text,
+                        reply_markup=keyboard,
                         parse_mode='HTML'
                     )
-                except:
-                    pass
-            return SELECTING_MODEL
-        
-        if data == "show_all_models_list":
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except Exception as e:
-                logger.error(f"Error answering callback for show_all_models_list: {e}")
-            
-            logger.info(f"User {user_id} clicked 'show_all_models_list' button")
+                    return ConversationHandler.END
             
-            # Используем новый каталог
-            try:
-                from app.helpers.models_menu_handlers import handle_show_all_models_list
+            # Check balance before starting generation
+            if not is_admin and user_balance < min_price:
                 user_lang = get_user_language(user_id)
-                reset_session_context(
-                    user_id,
-                    reason="show_all_models_list",
-                    clear_gen_type=True,
-                    correlation_id=correlation_id,
-                    update_id=update_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                )
-                set_session_context(
-                    user_id,
-                    to_context=UI_CONTEXT_MODEL_MENU,
-                    reason="show_all_models_list",
-                    clear_gen_type=True,
-                    correlation_id=correlation_id,
-                    update_id=update_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                )
-                loading_text = (
-                    "⏳ Загружаю список моделей…" if user_lang == 'ru' else "⏳ Loading models list…"
-                )
-                try:
-                    await query.edit_message_text(loading_text, parse_mode='HTML')
-                except Exception as edit_exc:
-                    logger.debug("Could not show loading state for show_all_models_list: %s", edit_exc)
+                keyboard = _build_topup_menu_keyboard(user_lang)
                 
-                async def _render_all_models_list():
-                    try:
-                        await asyncio.wait_for(
-                            handle_show_all_models_list(
-                                query,
-                                user_id,
-                                user_lang,
-                                skip_answer=True,
-                            ),
-                            timeout=10,
-                        )
-                    except asyncio.TimeoutError:
-                        fallback = (
-                            "⚠️ Слишком долго. Попробуй ещё раз." if user_lang == 'ru' else "⚠️ Too slow. Please try again."
-                        )
-                        try:
-                            await query.edit_message_text(fallback, parse_mode='HTML')
-                        except Exception:
-                            pass
-                    except Exception as exc:
-                        logger.error("Error in handle_show_all_models_list: %s", exc, exc_info=True)
-                        fallback = (
-                            "❌ Ошибка при загрузке моделей. Попробуйте позже." if user_lang == 'ru' else "❌ Error loading models. Please try later."
-                        )
-                        try:
-                            await query.edit_message_text(fallback, parse_mode='HTML')
-                        except Exception:
-                            try:
-                                await query.answer(fallback, show_alert=True)
-                            except Exception:
-                                pass
+                needed = min_price - user_balance
+                needed_str = format_rub_amount(needed)
+                remaining_free = await get_user_free_generations_remaining(user_id)
                 
-                if context and getattr(context, "application", None):
-                    task = context.application.create_task(_render_all_models_list())
-                    _register_background_task(task, action="render_all_models_list")
-                else:
-                    await _render_all_models_list()
-                return SELECTING_MODEL
-            except Exception as e:
-                logger.error(f"Error in handle_show_all_models_list: {e}", exc_info=True)
-                user_lang = get_user_language(user_id)
                 if user_lang == 'ru':
-                    error_msg = "❌ Ошибка при загрузке моделей. Попробуйте позже."
-                else:
-                    error_msg = "❌ Error loading models. Please try later."
-                await query.answer(error_msg, show_alert=True)
-                return SELECTING_MODEL
-            
-            return SELECTING_MODEL
-        
-        if data == "add_image":
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except:
-                pass
-            
-            session = user_sessions.get(user_id, {})
-            # Determine which parameter name to use (image_input or image_urls)
-            model_info = session.get('model_info', {})
-            input_params = model_info.get('input_params', {})
-            if 'image_urls' in input_params:
-                image_param_name = 'image_urls'
-            else:
-                image_param_name = 'image_input'
-            session['waiting_for'] = image_param_name
-            session['current_param'] = image_param_name
-            if image_param_name not in session:
-                session[image_param_name] = []  # Initialize as array
-            free_counter_line = await _resolve_free_counter_line(
-                user_id,
-                user_lang,
-                correlation_id,
-                action_path=f"param_prompt:{image_param_name}",
-                sku_id=session.get("sku_id"),
-            )
-            prompt_text = _append_free_counter_text(
-                "📷 <b>Загрузите изображение</b>\n\n"
-                "Отправьте фото, которое хотите использовать как референс или для трансформации.\n"
-                "Можно загрузить до 8 изображений.",
-                free_counter_line,
-            )
-            keyboard = [
-                [
-                    InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                    InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-                ],
-                [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
-            ]
-            await query.edit_message_text(
-                prompt_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            return INPUTTING_PARAMS
-        
-        if data == "image_done":
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except:
-                pass
-            
-            if user_id not in user_sessions:
-                await query.edit_message_text("❌ Сессия не найдена.")
-                return ConversationHandler.END
-            session = user_sessions[user_id]
-            waiting_for = session.get('waiting_for', 'image_input')
-            # Normalize: if waiting_for is 'image', use the actual parameter name from properties
-            if waiting_for == 'image':
-                properties = session.get('properties', {})
-                if 'image_input' in properties:
-                    image_param_name = 'image_input'
-                elif 'image_urls' in properties:
-                    image_param_name = 'image_urls'
+                    insufficient_msg = (
+                        f"❌ <b>Недостаточно средств для генерации</b>\n\n"
+                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        f"💳 <b>Ваш баланс:</b> {format_price_rub(user_balance, is_admin)}\n"
+                        f"💵 <b>Требуется минимум:</b> {price_text}\n"
+                        f"❌ <b>Не хватает:</b> {needed_str}\n\n"
+                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        f"💡 <b>Что делать:</b>\n"
+                        f"• Пополните баланс через кнопку ниже\n"
+                    )
+                    
+                    if remaining_free > 0:
+                        insufficient_msg += f"• Используйте бесплатные генерации бесплатных моделей ({remaining_free} доступно)\n"
+                    
+                    insufficient_msg += (
+                        f"• Пригласите друга и получите бонусы\n\n"
+                        f"🔄 После пополнения попробуйте генерацию снова."
+                    )
                 else:
-                    image_param_name = 'image_input'  # Default fallback
+                    insufficient_msg = (
+                        f"❌ <b>Insufficient Funds for Generation</b>\n\n"
+                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        f"💳 <b>Your balance:</b> {format_price_rub(user_balance, is_admin)}\n"
+                        f"💵 <b>Minimum required:</b> {price_text}\n"
+                        f"❌ <b>Need:</b> {needed_str}\n\n"
+                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        f"💡 <b>What to do:</b>\n"
+                        f"• Top up balance via button below\n"
+                    )
+                    
+                    if remaining_free > 0:
+                        insufficient_msg += f"• Use free models generations ({remaining_free} available)\n"
+                    
+                    insufficient_msg += (
+                        f"• Invite a friend and get bonuses\n\n"
+                        f"🔄 After topping up, try generation again."
+                    )
+                
+                await query.edit_message_text(
+                    _append_free_counter_text(insufficient_msg, free_counter_line),
+                    reply_markup=keyboard,
+                    parse_mode='HTML'
+                )
+                return ConversationHandler.END
+            
+            # Get input parameters from model info
+            input_params = model_info.get('input_params', {})
+            from app.kie_catalog import get_model
+            model_spec = get_model(model_id) if model_id else None
+            forced_media_required: List[str] = []
+            if model_spec:
+                input_params, required_params, forced_media_required = _apply_media_required_overrides(
+                    model_spec,
+                    input_params,
+                )
             else:
-                image_param_name = waiting_for
+                required_params = [p for p, info in input_params.items() if info.get('required', False)]
+            input_params = _apply_unified_param_defaults(
+                input_params,
+                model_spec=model_spec,
+                session_gen_type=session.get("gen_type") or model_info.get("generation_type"),
+            )
             
-            if image_param_name in session and session[image_param_name]:
-                if 'params' not in session:
-                    session['params'] = {}
-                session['params'][image_param_name] = session[image_param_name]
+            if not input_params:
+                # If no params defined, ask for simple text input
                 await query.edit_message_text(
-                    f"✅ Добавлено изображений: {len(session[image_param_name])}\n\n"
-                    f"Продолжаю..."
+                    f"{model_info_text}"
+                    f"Введите текст для генерации:",
+                    parse_mode='HTML'
                 )
-            session['waiting_for'] = None
+                session['params'] = {}
+                session['waiting_for'] = 'text'
+                return INPUTTING_PARAMS
             
-            # Move to next parameter
-            try:
-                next_param_result = await start_next_parameter(update, context, user_id)
-                if next_param_result:
-                    return next_param_result
-                else:
-                    # All parameters collected
-                    model_name = session.get('model_info', {}).get('name', 'Unknown')
-                    params = session.get('params', {})
-                    params_text = "\n".join([f"  • {k}: {str(v)[:50]}..." for k, v in params.items()])
-                    
-                    user_lang = get_user_language(user_id)
-                    keyboard = [
-                        [InlineKeyboardButton(t('btn_confirm_generate', lang=user_lang), callback_data="confirm_generate")],
-                        [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
-                        [
-                            InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                            InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-                        ],
-                        [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
-                    ]
-                    
-                    # Calculate price for confirmation message
-                    is_admin_user = get_is_admin(user_id)
-                    price = calculate_price_rub(model_id, params, is_admin_user)
-                    if price is None:
-                        blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
-                        await query.edit_message_text(blocked_text, parse_mode="HTML")
-                        return ConversationHandler.END
-                    sku_id = session.get("sku_id", "")
-                    source = session.get("free_source", "unknown")
-                    is_free = await is_free_generation_available(user_id, sku_id, source)
-                    if price is None:
-                        blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
-                        await query.edit_message_text(blocked_text, parse_mode="HTML")
-                        return ConversationHandler.END
-                    if is_free:
-                        price = 0.0
-                    price_str = format_rub_amount(price)
-                    
-                    # Prepare price info
-                    if is_free:
-                        remaining = await get_user_free_generations_remaining(user_id)
-                        price_info = f"🎁 <b>БЕСПЛАТНАЯ ГЕНЕРАЦИЯ!</b>\nОсталось бесплатных: {remaining}/{FREE_GENERATIONS_PER_DAY} в день"
+            # Store session data
+            prefill_params = session.pop("prefill_params", {}) if isinstance(session, dict) else {}
+            session['params'] = dict(prefill_params or {})
+            session['properties'] = input_params
+            session['required'] = required_params
+            session['required_forced_media'] = forced_media_required
+            session['skipped_params'] = set()
+            session['current_param'] = None
+            if model_spec:
+                session['model_type'] = model_spec.model_type or model_spec.model_mode
+                session['model_mode'] = model_spec.model_mode
+            # NOTE: model_id and model_info are already stored above at lines 8449-8450
+            
+            primary_input = _determine_primary_input(model_info, input_params)
+            logger.info(
+                "🔥🔥🔥 SELECT_MODEL CHECK: model_id=%s primary_input=%s input_params_keys=%s user_id=%s",
+                model_id,
+                primary_input,
+                list(input_params.keys()),
+                user_id,
+            )
+
+            if primary_input and primary_input["type"] == "image":
+                logger.debug("🔥🔥🔥 SELECT_MODEL: Model requires image first! user_id=%s", user_id)
+                image_param_name = primary_input["param"]
+                user_lang = get_user_language(user_id)
+                keyboard = [
+                    [
+                        InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+                        InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+                    ],
+                    [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
+                ]
+                if user_lang == 'en':
+                    step_text = "📷 <b>Step 1: Upload image</b>\n\n"
+                    if model_id == "recraft/remove-background":
+                        step_text += "Send a photo to remove the background.\n\n"
+                    elif model_id == "recraft/crisp-upscale":
+                        step_text += "Send a photo to enhance quality.\n\n"
+                    elif model_id == "ideogram/v3-reframe":
+                        step_text += "Send a photo to reframe and change aspect ratio.\n\n"
+                    elif model_id == "topaz/image-upscale":
+                        step_text += "Send a photo to upscale and enhance resolution.\n\n"
                     else:
-                        price_info = f"💰 <b>Стоимость:</b> {price_str}"
+                        step_text += "Send a photo to use as reference or for transformation.\n\n"
+                    if 'prompt' in input_params:
+                        step_text += "💡 <i>After uploading the image, you can enter a prompt</i>"
+                else:
+                    step_text = (
+                        "📷 <b>Шаг 1: Загрузите изображение</b>\n\n"
+                        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        "Отправьте изображение в сообщении.\n"
+                        "Поддерживаются форматы: PNG, JPG, JPEG, WEBP\n"
+                        "Максимальный размер: 10 MB"
+                    )
+                    if 'prompt' in input_params:
+                        step_text += "\n\n✅ <b>После загрузки:</b> вы сможете ввести промпт"
 
-                    free_counter_line = ""
-                    try:
-                        free_counter_line = await get_free_counter_line(
-                            user_id,
-                            user_lang=user_lang,
-                            correlation_id=correlation_id,
-                            action_path="confirm_screen",
-                            sku_id=sku_id,
-                        )
-                    except Exception as exc:
-                        logger.warning("Failed to resolve free counter line: %s", exc)
+                free_counter_line = await _resolve_free_counter_line(
+                    user_id,
+                    user_lang,
+                    correlation_id,
+                    action_path=f"param_prompt:{image_param_name}",
+                    sku_id=session.get("sku_id"),
+                )
+                step_text = _append_free_counter_text(step_text, free_counter_line)
+                await query.edit_message_text(
+                    f"{model_info_text}\n\n{step_text}",
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML'
+                )
+                session['current_param'] = image_param_name
+                session['waiting_for'] = image_param_name
+                if image_param_name not in session:
+                    session[image_param_name] = []
+                await query.answer()
+                logger.info(
+                    "🔥🔥🔥 SELECT_MODEL: Image input setup complete! model_id=%s user_id=%s waiting_for=%s",
+                    model_id,
+                    user_id,
+                    image_param_name,
+                )
+                elapsed = time.time() - start_time
+                logger.debug("🔥🔥🔥 SELECT_MODEL: Total time=%0.3fs user_id=%s", elapsed, user_id)
+                return INPUTTING_PARAMS
 
-                    free_counter_line = ""
-                    try:
-                        free_counter_line = await get_free_counter_line(
-                            user_id,
-                            user_lang=user_lang,
-                            correlation_id=correlation_id,
-                            action_path="confirm_screen",
-                            sku_id=sku_id,
-                        )
-                    except Exception as exc:
-                        logger.warning("Failed to resolve free counter line: %s", exc)
-                    
-                    user_balance = await get_user_balance_async(user_id)
-                    # Build enhanced confirmation message
-                    confirm_msg_base = build_confirmation_text(
-                        model_id=model_id,
-                        model_name=model_name,
-                        params=params,
-                        price=price,
-                        user_id=user_id,
-                        lang=user_lang,
-                        is_free=is_free,
-                        bonus_available=0.0,
-                        discount=None,
-                        user_balance=user_balance,
-                        correlation_id=correlation_id,
+            if primary_input and primary_input["type"] == "audio":
+                logger.debug("🔥🔥🔥 SELECT_MODEL: Model requires audio first! user_id=%s", user_id)
+                audio_param_name = primary_input["param"]
+                user_lang = get_user_language(user_id)
+                keyboard = [
+                    [
+                        InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+                        InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+                    ],
+                    [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
+                ]
+                if user_lang == 'en':
+                    audio_text = (
+                        f"{model_info_text}\n\n"
+                        f"🎤 <b>Step 1: Upload audio</b>\n\n"
+                        f"Send an audio file (MP3, WAV, OGG, M4A, FLAC, AAC, WMA, MPEG).\n"
+                        f"Maximum size: 200 MB"
                     )
-                    confirm_msg = _append_free_counter_text(confirm_msg_base, free_counter_line)
-                    
-                    logger.info(f"✅ [UX IMPROVEMENT] Sending improved confirmation message to user {user_id}")
-                    await query.edit_message_text(
-                        confirm_msg,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
+                else:
+                    audio_text = (
+                        f"{model_info_text}\n\n"
+                        f"🎤 <b>Шаг 1: Загрузите аудио</b>\n\n"
+                        f"Отправьте аудио-файл (MP3, WAV, OGG, M4A, FLAC, AAC, WMA, MPEG).\n"
+                        f"Максимальный размер: 200 MB"
                     )
-                    return CONFIRMING_GENERATION
-            except Exception as e:
-                logger.error(f"Error after image done: {e}")
-                await query.edit_message_text("❌ Ошибка при переходе к следующему параметру.")
+                price_line = _build_current_price_line(
+                    session,
+                    user_lang=user_lang,
+                    model_id=model_id,
+                    mode_index=_resolve_mode_index(model_id, session.get("params", {}), user_id),
+                    gen_type=session.get("gen_type"),
+                    params=session.get("params", {}),
+                    correlation_id=correlation_id,
+                    update_id=update_id,
+                    action_path=f"param_prompt:{audio_param_name}",
+                    user_id=user_id,
+                    chat_id=query.message.chat_id if query.message else None,
+                    is_admin=get_is_admin(user_id),
+                )
+                audio_text += f"\n\n{price_line}"
+                free_counter_line = await _resolve_free_counter_line(
+                    user_id,
+                    user_lang,
+                    correlation_id,
+                    action_path=f"param_prompt:{audio_param_name}",
+                    sku_id=session.get("sku_id"),
+                )
+                audio_text = _append_free_counter_text(audio_text, free_counter_line)
+                await query.edit_message_text(
+                    audio_text,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML'
+                )
+                session['current_param'] = audio_param_name
+                session['waiting_for'] = audio_param_name
+                await query.answer()
                 return INPUTTING_PARAMS
-        
-        if data == "add_audio":
-            # User wants to add audio file
-            await query.answer()
-            if user_id not in user_sessions:
-                await query.edit_message_text("❌ Ошибка: сессия не найдена. Начните заново.")
-                return ConversationHandler.END
-            
-            session = user_sessions.get(user_id, {})
-            if not session:
-                user_lang = get_user_language(query.from_user.id)
-                await query.edit_message_text(t('error_session_empty', lang=user_lang))
-                return ConversationHandler.END
-            model_info = session.get('model_info', {})
-            input_params = model_info.get('input_params', {})
-            
-            audio_param_name = 'audio_url' if 'audio_url' in input_params else 'audio_input'
-            user_lang = get_user_language(query.from_user.id)
-            
-            keyboard = [
-                [InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")],
-                [InlineKeyboardButton(t('btn_skip', lang=user_lang), callback_data="skip_audio")]
-            ]
-            
-            await query.edit_message_text(
-                "🎤 <b>Загрузите аудио-файл</b>\n\n"
-                "Отправьте аудио-файл для транскрибации.\n\n"
-                "Поддерживаемые форматы: MP3, WAV, OGG, M4A, FLAC, AAC, WMA, MPEG\n"
-                "Максимальный размер: 200 MB",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            
-            session['waiting_for'] = audio_param_name
-            session['current_param'] = audio_param_name
-            return INPUTTING_PARAMS
-        
-        if data == "skip_audio":
-            # User wants to skip audio upload
-            await query.answer("Аудио пропущено")
-            if user_id not in user_sessions:
-                await query.edit_message_text("❌ Ошибка: сессия не найдена. Начните заново.")
-                return ConversationHandler.END
             
-            session = user_sessions[user_id]
-            session['waiting_for'] = None
-            session['current_param'] = None
+            # Special case: sora-2-pro-image-to-video starts with image_urls first
+            if model_id == "sora-2-pro-image-to-video" and 'image_urls' in input_params and input_params['image_urls'].get('required', False):
+                # Start with image_urls first for sora-2-pro-image-to-video
+                has_image_input = True
+                image_param_name = 'image_urls'
+                keyboard = [
+                    [
+                        InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+                        InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+                    ],
+                    [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
+                ]
+                image_text = (
+                    f"{model_info_text}\n\n"
+                    f"📷 <b>Шаг 1: Загрузите изображение</b>\n\n"
+                    f"Отправьте фото, которое будет использовано как первый кадр видео.\n\n"
+                    f"💡 <i>После загрузки изображения вы сможете ввести промпт</i>"
+                )
+                price_line = _build_current_price_line(
+                    session,
+                    user_lang=user_lang,
+                    model_id=model_id,
+                    mode_index=_resolve_mode_index(model_id, session.get("params", {}), user_id),
+                    gen_type=session.get("gen_type"),
+                    params=session.get("params", {}),
+                    correlation_id=correlation_id,
+                    update_id=update_id,
+                    action_path=f"param_prompt:{image_param_name}",
+                    user_id=user_id,
+                    chat_id=query.message.chat_id if query.message else None,
+                    is_admin=get_is_admin(user_id),
+                )
+                image_text += f"\n\n{price_line}"
+                free_counter_line = await _resolve_free_counter_line(
+                    user_id,
+                    user_lang,
+                    correlation_id,
+                    action_path=f"param_prompt:{image_param_name}",
+                    sku_id=session.get("sku_id"),
+                )
+                image_text = _append_free_counter_text(image_text, free_counter_line)
+                await query.edit_message_text(
+                    image_text,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML'
+                )
+                session['current_param'] = 'image_urls'
+                session['waiting_for'] = 'image_urls'
+                if 'image_urls' not in session:
+                    session['image_urls'] = []  # Initialize as array
+                await query.answer()
+                return INPUTTING_PARAMS
             
-            # Move to next parameter
-            try:
-                next_param_result = await start_next_parameter(update, context, user_id)
-                if next_param_result:
-                    return next_param_result
-                else:
-                    # All parameters collected, show confirmation
-                    model_name = session.get('model_info', {}).get('name', 'Unknown')
-                    params = session.get('params', {})
-                    params_text = "\n".join([f"  • {k}: {str(v)[:50]}{'...' if len(str(v)) > 50 else ''}" for k, v in params.items()])
-                    
-                    user_lang = get_user_language(user_id)
-                    keyboard = [
-                        [InlineKeyboardButton(t('btn_confirm_generate', lang=user_lang), callback_data="confirm_generate")],
-                        [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
-                        [
-                            InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                            InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-                        ],
-                        [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
-                    ]
-                    
-                    # Calculate price for confirmation message
-                    is_admin_user = get_is_admin(user_id)
-                    sku_id = session.get("sku_id", "")
-                    source = session.get("free_source", "unknown")
-                    is_free = await is_free_generation_available(user_id, sku_id, source)
-                    price = calculate_price_rub(model_id, params, is_admin_user)
-                    if is_free:
-                        price = 0.0
-                    price_str = format_rub_amount(price)
-                    
-                    # Prepare price info
-                    if is_free:
-                        remaining = await get_user_free_generations_remaining(user_id)
-                        price_info = f"🎁 <b>БЕСПЛАТНАЯ ГЕНЕРАЦИЯ!</b>\nОсталось бесплатных: {remaining}/{FREE_GENERATIONS_PER_DAY} в день"
+            # Start with prompt parameter first (default behavior)
+            if 'prompt' in input_params:
+                # Check if model supports image input (image_input or image_urls)
+                # BUT: z-image does NOT support image input (text-to-image only)
+                # AND: text-to-video models do NOT require image input (text-to-video only)
+                is_text_to_video = "text-to-video" in model_id.lower()
+                has_image_input = (model_id != "z-image" and 
+                                 not is_text_to_video and
+                                 ('image_input' in input_params or 'image_urls' in input_params))
+                
+                prompt_text = (
+                    f"{model_info_text}"
+                )
+                
+                # Determine if this is a video or audio model
+                is_video = is_video_model(model_id)
+                is_audio = is_audio_model(model_id)
+                
+                if has_image_input:
+                    ref_hint = "реф-картинку" if session.get("image_ref_prompt") else "изображение"
+                    if is_video:
+                        prompt_text += (
+                            f"📝 <b>Шаг 1: Введите промпт</b>\n\n"
+                            f"Опишите видео, которое хотите сгенерировать.\n\n"
+                            f"💡 <i>После ввода промпта вы сможете добавить {ref_hint} (опционально)</i>"
+                        )
                     else:
-                        price_info = f"💰 <b>Стоимость:</b> {price_str}"
-                    
-                    user_balance = await get_user_balance_async(user_id)
-                    # Build enhanced confirmation message
-                    confirm_msg_base = build_confirmation_text(
-                        model_id=model_id,
-                        model_name=model_name,
-                        params=params,
-                        price=price,
-                        user_id=user_id,
-                        lang=user_lang,
-                        is_free=is_free,
-                        bonus_available=0.0,
-                        discount=None,
-                        user_balance=user_balance,
-                        correlation_id=correlation_id,
-                    )
-                    confirm_msg = _append_free_counter_text(confirm_msg_base, free_counter_line)
-                    
-                    logger.info(f"✅ [UX IMPROVEMENT] Sending improved confirmation message to user {user_id}")
-                    await query.edit_message_text(
-                        confirm_msg,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                    return CONFIRMING_GENERATION
-            except Exception as e:
-                logger.error(f"Error after skipping audio: {e}", exc_info=True)
-                await query.edit_message_text("❌ Ошибка при переходе к следующему параметру.")
-            
-            return INPUTTING_PARAMS
-        
-        if data == "skip_image":
-            await query.answer("Изображение пропущено")
-            # Move to next parameter
-            try:
-                next_param_result = await start_next_parameter(update, context, user_id)
-                if next_param_result:
-                    return next_param_result
-                else:
-                    # All parameters collected
-                    if user_id not in user_sessions:
-                        await query.edit_message_text("❌ Сессия не найдена.")
-                        return ConversationHandler.END
-                    session = user_sessions[user_id]
-                    model_name = session.get('model_info', {}).get('name', 'Unknown')
-                    params = session.get('params', {})
-                    params_text = "\n".join([f"  • {k}: {str(v)[:50]}..." for k, v in params.items()])
-                    
-                    user_lang = get_user_language(user_id)
-                    sku_id = session.get("sku_id")
-                    free_counter_line = ""
-                    try:
-                        free_counter_line = await get_free_counter_line(
-                            user_id,
-                            user_lang=user_lang,
-                            correlation_id=correlation_id,
-                            action_path="confirm_screen",
-                            sku_id=sku_id,
+                        prompt_text += (
+                            f"📝 <b>Шаг 1: Введите промпт</b>\n\n"
+                            f"Опишите изображение, которое хотите сгенерировать.\n\n"
+                            f"💡 <i>После ввода промпта вы сможете добавить {ref_hint} (опционально)</i>"
                         )
-                    except Exception as exc:
-                        logger.warning("Failed to resolve free counter line: %s", exc)
-                    keyboard = [
-                        [InlineKeyboardButton(t('btn_confirm_generate', lang=user_lang), callback_data="confirm_generate")],
-                        [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
-                        [
-                            InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                            InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-                        ],
-                        [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
-                    ]
+                else:
+                    if is_video:
+                        prompt_text += (
+                            f"📝 <b>Шаг 1: Введите промпт</b>\n\n"
+                            f"Опишите видео, которое хотите сгенерировать:"
+                        )
+                    elif is_audio:
+                        prompt_text += (
+                            f"📝 <b>Шаг 1: Введите промпт</b>\n\n"
+                            f"Опишите контент для обработки:"
+                        )
+                    else:
+                        prompt_text += (
+                            f"📝 <b>Шаг 1: Введите промпт</b>\n\n"
+                            f"Опишите изображение, которое хотите сгенерировать:"
+                        )
+                price_line = _build_current_price_line(
+                    session,
+                    user_lang=user_lang,
+                    model_id=model_id,
+                    mode_index=_resolve_mode_index(model_id, session.get("params", {}), user_id),
+                    gen_type=session.get("gen_type"),
+                    params=session.get("params", {}),
+                    correlation_id=correlation_id,
+                    update_id=update_id,
+                    action_path="param_prompt:prompt",
+                    user_id=user_id,
+                    chat_id=query.message.chat_id if query.message else None,
+                    is_admin=get_is_admin(user_id),
+                )
+                prompt_text += f"\n\n{price_line}"
+                
+                # Add keyboard with "Главное меню" and "Отмена" buttons
+                free_counter_line = await _resolve_free_counter_line(
+                    user_id,
+                    user_lang,
+                    correlation_id,
+                    action_path="param_prompt:prompt",
+                    sku_id=session.get("sku_id"),
+                )
+                prompt_text = _append_free_counter_text(prompt_text, free_counter_line)
+                keyboard = [
+                    [
+                        InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+                        InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+                    ],
+                    [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
+                ]
                 
                 await query.edit_message_text(
-                    _append_free_counter_text(
-                        (
-                            f"📋 <b>Подтверждение:</b>\n\n"
-                            f"Модель: <b>{model_name}</b>\n"
-                            f"Параметры:\n{params_text}\n\n"
-                            f"Продолжить генерацию?"
-                        ),
-                        free_counter_line,
-                    ),
+                    prompt_text,
                     reply_markup=InlineKeyboardMarkup(keyboard),
                     parse_mode='HTML'
                 )
-                return CONFIRMING_GENERATION
-            except Exception as e:
-                logger.error(f"Error after skipping image: {e}")
-                await query.edit_message_text("❌ Ошибка при переходе к следующему параметру.")
-                return INPUTTING_PARAMS
-
-        if data == "show_parameters":
-            await query.answer()
-            if user_id not in user_sessions:
-                await query.edit_message_text("❌ Сессия не найдена.")
-                return ConversationHandler.END
-
-            session = user_sessions[user_id]
-            properties = session.get('properties', {})
-            params = session.get('params', {})
-            param_order = session.get('param_order', list(properties.keys()))
-            skipped_params = session.get('skipped_params', set())
-            user_lang = get_user_language(user_id)
-            from app.kie_catalog import get_model
-
-            model_spec = session.get("model_spec") or get_model(session.get("model_id"))
-            session_gen_type = session.get("gen_type") or (model_spec.model_type if model_spec else None)
-            keyboard = []
-
-            for param_name in param_order:
-                if param_name not in properties:
-                    continue
-                param_info = properties.get(param_name, {})
-                default_value = _resolve_unified_default(
-                    param_name,
-                    param_info,
-                    model_spec=model_spec,
-                    session_gen_type=session_gen_type,
-                )
-                if param_name in params:
-                    value_text = str(params[param_name])
-                elif param_name in skipped_params:
-                    value_text = "по умолчанию" if user_lang == "ru" else "default"
-                elif default_value is not None:
-                    value_text = f"{default_value}"
-                else:
-                    value_text = "—"
-                if len(value_text) > 30:
-                    value_text = value_text[:30] + "…"
-                keyboard.append([
-                    InlineKeyboardButton(
-                        f"{param_name}: {value_text}",
-                        callback_data=f"edit_param:{param_name}"
-                    )
-                ])
-
-            back_label = "◀️ Назад" if user_lang == 'ru' else "◀️ Back"
-            keyboard.append([InlineKeyboardButton(back_label, callback_data="back_to_confirmation")])
-            keyboard.append([InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")])
-            keyboard.append([InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")])
-
-            text = (
-                "⚙️ <b>Параметры модели</b>\n\n"
-                "Нажмите на параметр, чтобы изменить его значение."
-                if user_lang == 'ru'
-                else "⚙️ <b>Model parameters</b>\n\nTap a parameter to change its value."
-            )
-            await query.edit_message_text(
-                text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            logger.info(
-                "🧭 PARAMS_MENU: action_path=show_parameters model_id=%s waiting_for=%s current_param=%s outcome=shown",
-                session.get('model_id'),
-                session.get('waiting_for'),
-                session.get('current_param'),
-            )
+                session['current_param'] = 'prompt'
+                session['waiting_for'] = 'prompt'
+                session['has_image_input'] = has_image_input
+            else:
+                # If no prompt, start with first required parameter
+                await start_next_parameter(update, context, user_id)
+            
             return INPUTTING_PARAMS
-
-        if data.startswith("edit_param:"):
-            await query.answer()
-            if user_id not in user_sessions:
-                await query.edit_message_text("❌ Сессия не найдена.")
-                return ConversationHandler.END
-            session = user_sessions[user_id]
-            param_name = data.split(":", 1)[1]
-            session.setdefault('param_history', [])
-            skipped_params = session.get("skipped_params", set())
-            if param_name in skipped_params:
-                skipped_params.discard(param_name)
-            if 'params' in session:
-                session['params'].pop(param_name, None)
-            session['waiting_for'] = param_name
-            session['current_param'] = param_name
-            return await prompt_for_specific_param(update, context, user_id, param_name, source="edit_param")
-
-        if data.startswith("confirm_param:"):
-            parts = data.split(":", 2)
-            if len(parts) != 3:
-                await query.answer("Ошибка: неверный формат параметра", show_alert=True)
-                return ConversationHandler.END
-            if user_id not in user_sessions:
-                await query.edit_message_text("❌ Сессия не найдена.")
+        
+        if data.startswith("set_language:"):
+            # Handle language selection
+            parts = data.split(":", 1)
+            if len(parts) < 2:
+                user_lang = get_user_language(query.from_user.id)
+                await query.answer(t('error_invalid_format', lang=user_lang), show_alert=True)
                 return ConversationHandler.END
-            session = user_sessions[user_id]
-            param_name = parts[1]
-            pending = session.pop("pending_param", None)
-            pending_params = session.pop("pending_params", None)
-            session.pop("pending_price", None)
-            if not pending or pending.get("name") != param_name or not isinstance(pending_params, dict):
-                await query.edit_message_text("❌ Параметр не найден для подтверждения.")
+            lang = parts[1]
+            if lang in ['ru', 'en']:
+                set_user_language(user_id, lang)
+                await query.answer(t('language_set', lang))
+                # Show main menu after language selection
+                await start(update, context)
                 return ConversationHandler.END
-            skip_param = pending.get("skip", False)
-            session['params'] = pending_params
-            skipped_params = session.setdefault("skipped_params", set())
-            if skip_param:
-                skipped_params.add(param_name)
             else:
-                skipped_params.discard(param_name)
-            _record_param_history(session, param_name)
-            session['current_param'] = None
-            log_structured_event(
-                correlation_id=correlation_id,
+                await query.answer("Неверный язык / Invalid language")
+            return ConversationHandler.END
+        
+        if data.startswith("cancel:"):
+            user_lang = get_user_language(user_id)
+            now_ms = _now_ms()
+            _set_user_ui_action(user_id, "cancel_click", now_ms)
+            session = get_session_cached(context, session_store, user_id, update_id, default={})
+            if isinstance(session, dict):
+                session["last_ui_action"] = "cancel_click"
+                session["last_ui_ts_ms"] = now_ms
+            job_id = _parse_cancel_callback(data)
+            await _request_job_cancel(
+                update=update,
+                context=context,
+                job_id=job_id,
                 user_id=user_id,
-                chat_id=query.message.chat_id if query.message else None,
-                update_id=update_id,
-                action="PARAM_CONFIRM",
-                action_path="button_callback.confirm_param",
-                param={"param_name": param_name, "source": "callback"},
-                outcome="confirmed",
-            )
-            model_id = session.get("model_id", "")
-            mode_index = _resolve_mode_index(model_id, session.get("params", {}), user_id)
-            price_quote = _update_price_quote(
-                session,
-                model_id=model_id,
-                mode_index=mode_index,
-                gen_type=session.get("gen_type"),
-                params=session.get("params", {}),
+                user_lang=user_lang,
+                callback_data=data,
+                query=query,
                 correlation_id=correlation_id,
-                update_id=update_id,
-                action_path="button_callback.confirm_param",
-                user_id=user_id,
-                chat_id=query.message.chat_id if query.message else None,
-                is_admin=get_is_admin(user_id),
-            )
-            if not price_quote:
-                blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
-                await query.edit_message_text(blocked_text, parse_mode="HTML")
-                return ConversationHandler.END
-
-            required = session.get('required', [])
-            params = session.get('params', {})
-            missing = [p for p in required if p not in params]
+                state_source="callback",
+            )
+            return ConversationHandler.END
 
-            if missing:
-                price_line = _build_current_price_line(
-                    session,
-                    user_lang=user_lang,
-                    model_id=model_id,
-                    mode_index=mode_index,
-                    gen_type=session.get("gen_type"),
-                    params=session.get("params", {}),
+        if data == "cancel":
+            user_lang = get_user_language(user_id)
+            session = get_session_cached(context, session_store, user_id, update_id, default={})
+            active_job_id = session.get("job_id") if isinstance(session, dict) else None
+            active_state = session.get("job_state") if isinstance(session, dict) else None
+            if active_job_id and active_state in ACTIVE_JOB_STATES_ACTIVE:
+                increment_cancel_metric("cancel_without_job_total")
+                _log_cancel_update(
                     correlation_id=correlation_id,
                     update_id=update_id,
-                    action_path="button_callback.confirm_param",
                     user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    is_admin=get_is_admin(user_id),
+                    chat_id=query.message.chat_id if query and query.message else None,
+                    message_id=query.message.message_id if query and query.message else None,
+                    callback_query_id=query.id if query else None,
+                    callback_data=data,
+                    job_id=active_job_id,
+                    state_before=active_state,
+                    state_after="ignored",
+                    action="CANCEL_MISSING_JOB_ID",
                 )
-                await query.edit_message_text(f"✅ {param_name} сохранён.\n{price_line}")
-                next_param_result = await start_next_parameter(update, context, user_id)
-                if next_param_result:
-                    return next_param_result
-                return INPUTTING_PARAMS
-
-            session['waiting_for'] = None
-            if not model_id:
-                logger.error(f"❌ model_id not found in session for user_id={user_id}")
-                await query.edit_message_text("❌ Ошибка: модель не найдена в сессии.")
+                try:
+                    await query.answer()
+                except Exception:
+                    pass
                 return ConversationHandler.END
-            return await send_confirmation_message(update, context, user_id, source="confirm_param_complete")
-
-        if data == "back_to_confirmation":
-            await query.answer()
-            return await send_confirmation_message(update, context, user_id, source="back_to_confirmation")
+            await query.answer(t('btn_cancel', lang=user_lang).replace('❌ ', ''))
+            session_store.clear(user_id)
+            try:
+                await query.edit_message_text(
+                    t('msg_operation_cancelled', lang=user_lang),
+                    parse_mode="HTML",
+                )
+            except Exception as e:
+                logger.error(f"Error editing message on cancel: {e}")
+                try:
+                    await query.message.reply_text(
+                        t('msg_operation_cancelled', lang=user_lang),
+                        parse_mode="HTML",
+                    )
+                except:
+                    pass
+            await ensure_main_menu(update, context, source="cancel", prefer_edit=False)
+            return ConversationHandler.END
         
-        if data.startswith("set_param:"):
-            # Handle parameter setting via button
-            parts = data.split(":", 2)
-            if len(parts) != 3:
-                await query.answer("Ошибка: неверный формат параметра", show_alert=True)
+        if data.startswith("retry_generate:"):
+            # Retry generation with same parameters
+            await query.answer("Повторяю попытку...")
+            
+            session = get_session_cached(context, session_store, user_id, update_id, default=None)
+            if not session:
+                await query.edit_message_text("❌ Сессия не найдена. Начните заново.")
                 return ConversationHandler.END
+            
+            # Show confirmation again with same parameters
+            model_name = session.get('model_info', {}).get('name', 'Unknown')
+            params = session.get('params', {})
+            params_text = "\n".join([f"  • {k}: {str(v)[:50]}{'...' if len(str(v)) > 50 else ''}" for k, v in params.items()])
+            
+            user_lang = get_user_language(user_id)
+            keyboard = [
+                [InlineKeyboardButton(t('btn_confirm_generate', lang=user_lang), callback_data="confirm_generate")],
+                [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
+                [
+                    InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+                    InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+                ],
+                [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
+            ]
+            
+            await query.edit_message_text(
+                f"🔄 <b>Повторная попытка:</b>\n\n"
+                f"Модель: <b>{model_name}</b>\n"
+                f"Параметры:\n{params_text}\n\n"
+                f"Продолжить генерацию?",
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
+            return CONFIRMING_GENERATION
 
-            param_name = parts[1]
-            param_value = parts[2]
-            skip_param = False
-
-            if user_id not in user_sessions:
-                await query.edit_message_text("❌ Сессия не найдена.")
+        if data.startswith("open_result:"):
+            task_id = data.split(":", 1)[1].strip() if ":" in data else ""
+            await query.answer("Проверяю результат..." if user_lang == "ru" else "Checking result...")
+            if not task_id:
+                await query.edit_message_text(
+                    "❌ Не удалось определить task_id. Откройте статус через меню."
+                    if user_lang == "ru"
+                    else "❌ Could not determine task_id. Open status from the menu.",
+                    parse_mode="HTML",
+                    reply_markup=build_back_to_menu_keyboard(user_lang),
+                )
                 return ConversationHandler.END
 
-            session = user_sessions[user_id]
-            properties = session.get('properties', {})
-            param_info = properties.get(param_name, {})
-            param_type = param_info.get('type', 'string')
+            from app.delivery.reconciler import FAILED_STATES, SUCCESS_STATES, deliver_job_result
+            from app.integrations.kie_stub import get_kie_client_or_stub
+            from app.storage import get_storage
 
-            # 🔴 ВАЛИДАЦИЯ ENUM ЗНАЧЕНИЙ: Проверяем, что значение находится в списке допустимых
-            enum_values = _normalize_enum_values(param_info)
-            if enum_values and param_value not in enum_values and param_value not in {SKIP_PARAM_VALUE, "custom"}:
-                # Недопустимое enum значение
-                user_lang = get_user_language(user_id) if user_id else 'ru'
-                error_text = (
-                    f"❌ <b>Недопустимое значение</b>\n\n"
-                    f"Допустимые значения: {', '.join(enum_values)}\n"
-                    f"Введено: {param_value}"
-                ) if user_lang == 'ru' else (
-                    f"❌ <b>Invalid value</b>\n\n"
-                    f"Allowed values: {', '.join(enum_values)}\n"
-                    f"Entered: {param_value}"
+            storage_instance = get_storage()
+            job = await _find_job_by_task_id(storage_instance, task_id)
+            if not job:
+                await query.edit_message_text(
+                    "❌ Не нашёл задачу. Проверьте статус в меню «Мои генерации»."
+                    if user_lang == "ru"
+                    else "❌ Task not found. Check status in “My generations”.",
+                    parse_mode="HTML",
+                    reply_markup=build_back_to_menu_keyboard(user_lang),
                 )
-                await query.answer(error_text, show_alert=True)
                 return ConversationHandler.END
-
-            if param_value == SKIP_PARAM_VALUE:
-                if param_info.get('required', False):
-                    user_lang = get_user_language(user_id) if user_id else 'ru'
-                    error_text = (
-                        "❌ Этот параметр обязателен и не может быть пропущен."
-                        if user_lang == 'ru'
-                        else "❌ This parameter is required and cannot be skipped."
-                    )
-                    await query.answer(error_text, show_alert=True)
-                    return INPUTTING_PARAMS
-                user_lang = get_user_language(user_id) if user_id else 'ru'
-                if 'params' in session and param_name in session['params']:
-                    session['params'].pop(param_name, None)
-                skipped_params = session.setdefault("skipped_params", set())
-                skipped_params.add(param_name)
-                session['current_param'] = None
-                session['waiting_for'] = None
-                _record_param_history(session, param_name)
-                skip_param = True
-                param_label = _humanize_param_name(param_name, user_lang)
-                skip_text = (
-                    f"✅ {param_label}: по умолчанию"
+            job_user_id = job.get("user_id")
+            if job_user_id is not None and job_user_id != user_id and not get_is_admin(user_id):
+                await query.edit_message_text(
+                    "❌ У вас нет доступа к этой задаче."
                     if user_lang == "ru"
-                    else f"✅ {param_label}: default applied"
-                )
-                mode_index = _resolve_mode_index(session.get("model_id", ""), session.get("params", {}), user_id)
-                price_line = _build_current_price_line(
-                    session,
-                    user_lang=user_lang,
-                    model_id=session.get("model_id", ""),
-                    mode_index=mode_index,
-                    gen_type=session.get("gen_type"),
-                    params=session.get("params", {}),
-                    correlation_id=correlation_id,
-                    update_id=update_id,
-                    action_path="button_callback.set_param",
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    is_admin=get_is_admin(user_id),
+                    else "❌ You don't have access to this task.",
+                    parse_mode="HTML",
+                    reply_markup=build_back_to_menu_keyboard(user_lang),
                 )
-                await query.edit_message_text(f"{skip_text}\n{price_line}")
-                log_structured_event(
-                    correlation_id=correlation_id,
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    update_id=update_id,
-                    action="PARAM_SKIPPED",
-                    action_path="button_callback.set_param",
-                    param={"param_name": param_name, "source": "callback"},
-                    outcome="skipped",
+                return ConversationHandler.END
+
+            job_id_value = job.get("job_id") or task_id
+            job_id_for_keyboard = job.get("job_id")
+            status_record: Dict[str, Any] = {}
+            provider_state = "unknown"
+            try:
+                status_record = await get_kie_client_or_stub().get_task_status(task_id)
+                provider_state = (status_record.get("state") or "unknown").lower()
+            except Exception as exc:
+                logger.warning("open_result_status_fetch_failed task_id=%s error=%s", task_id, exc)
+            status_record["taskId"] = task_id
+            task_keyboard = _build_task_already_started_keyboard(
+                user_lang,
+                task_id=task_id,
+                job_id=job_id_for_keyboard,
+            )
+
+            if provider_state in SUCCESS_STATES:
+                delivered = await deliver_job_result(
+                    context.bot,
+                    storage_instance,
+                    job=job,
+                    status_record=status_record,
+                    notify_user=True,
+                    source="open_result",
+                    get_user_language=get_user_language,
                 )
-                try:
-                    next_param_result = await start_next_parameter(update, context, user_id)
-                    if next_param_result:
-                        return next_param_result
-                    return INPUTTING_PARAMS
-                except Exception as e:
-                    logger.error(f"Error starting next parameter after skip: {e}")
-                    await query.edit_message_text("❌ Ошибка при переходе к следующему параметру.")
-                    return INPUTTING_PARAMS
+                if delivered:
+                    _clear_user_task_context(
+                        user_id,
+                        reason="terminal_success_open_result",
+                        task_id=task_id,
+                        allow_mismatch=True,
+                    )
+                await query.edit_message_text(
+                    (
+                        "✅ <b>Результат готов</b>\n\n"
+                        "Я отправил его выше в чате."
+                        if user_lang == "ru"
+                        else "✅ <b>Result is ready</b>\n\nI've sent it above in the chat."
+                    ),
+                    parse_mode="HTML",
+                    reply_markup=task_keyboard,
+                )
+                return ConversationHandler.END
 
-            if param_value == "custom" and param_name == "language_code":
-                session['current_param'] = param_name
-                session['waiting_for'] = param_name
-                session['language_code_custom'] = True
+            if provider_state in FAILED_STATES:
+                await storage_instance.update_job_status(
+                    job_id_value,
+                    "failed",
+                    error_message=status_record.get("failMsg"),
+                    error_code=status_record.get("failCode") or "KIE_FAIL_STATE",
+                )
+                _clear_user_task_context(
+                    user_id,
+                    reason="terminal_fail_open_result",
+                    task_id=task_id,
+                    allow_mismatch=True,
+                )
                 await query.edit_message_text(
-                    "✏️ Введите код языка (например: en, ru, de, fr).",
+                    (
+                        "❌ <b>Задача завершилась с ошибкой</b>\n\n"
+                        "Можно запустить новую генерацию."
+                        if user_lang == "ru"
+                        else "❌ <b>The task failed</b>\n\nYou can start a new generation."
+                    ),
+                    parse_mode="HTML",
+                    reply_markup=build_back_to_menu_keyboard(user_lang),
                 )
-                return INPUTTING_PARAMS
-
-            # Convert boolean string to actual boolean
-            if param_type == 'boolean':
-                if param_value.lower() == 'true':
-                    param_value = True
-                elif param_value.lower() == 'false':
-                    param_value = False
-                else:
-                    # Use default if invalid
-                    param_value = param_info.get('default', True)
-
-            if 'params' not in session:
-                session['params'] = {}
-            candidate_params = dict(session.get("params", {}))
-            display_value = param_value
-            if skip_param:
-                default_value = param_info.get("default")
-                if default_value is not None:
-                    candidate_params[param_name] = default_value
-                    display_value = default_value
-                else:
-                    candidate_params.pop(param_name, None)
-            else:
-                candidate_params[param_name] = param_value
-
-            from app.pricing.price_resolver import resolve_price_quote
-            from app.config import get_settings
-            model_id = session.get("model_id", "")
-            mode_index = _resolve_mode_index(model_id, candidate_params, user_id)
-            quote = resolve_price_quote(
-                model_id=model_id,
-                mode_index=mode_index,
-                gen_type=session.get("gen_type"),
-                selected_params=candidate_params,
-                settings=get_settings(),
-                is_admin=get_is_admin(user_id),
-            )
-            if quote is None:
-                user_lang = get_user_language(user_id) if user_id else 'ru'
-                blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
-                await query.edit_message_text(blocked_text, parse_mode="HTML")
                 return ConversationHandler.END
 
-            session["pending_param"] = {
-                "name": param_name,
-                "value": param_value,
-                "skip": skip_param,
-            }
-            session["pending_params"] = candidate_params
-            session["pending_price"] = float(quote.price_rub)
-            option_label = _humanize_param_name(param_name, user_lang)
-            confirm_text = build_option_confirm_text(
-                user_lang,
-                option_label,
-                str(display_value),
-                float(quote.price_rub),
-            )
-            confirm_button = "✅ Подтвердить" if user_lang == "ru" else "✅ Confirm"
-            back_button = "↩️ Назад" if user_lang == "ru" else "↩️ Back"
-            keyboard = InlineKeyboardMarkup(
-                [
-                    [InlineKeyboardButton(confirm_button, callback_data=f"confirm_param:{param_name}:{param_value}")],
-                    [InlineKeyboardButton(back_button, callback_data=f"edit_param:{param_name}")],
-                ]
+            wait_text = (
+                "⏳ <b>Результат ещё готовится</b>\n\n"
+                f"Текущий статус: <b>{provider_state}</b>\n"
+                "Вы можете проверить статус позже или отменить задачу."
+                if user_lang == "ru"
+                else (
+                    "⏳ <b>The result is still processing</b>\n\n"
+                    f"Current status: <b>{provider_state}</b>\n"
+                    "You can check again later or cancel the task."
+                )
             )
-            await query.edit_message_text(confirm_text, reply_markup=keyboard, parse_mode="HTML")
-            return INPUTTING_PARAMS
+            await query.edit_message_text(wait_text, parse_mode="HTML", reply_markup=task_keyboard)
+            return ConversationHandler.END
 
-            # Check if there are more parameters
-            required = session.get('required', [])
-            params = session.get('params', {})
-            missing = [p for p in required if p not in params]
+        if data.startswith("retry_delivery:"):
+            task_id = data.split(":", 1)[1] if ":" in data else ""
+            await query.answer("Повторяю доставку...")
 
-            if missing:
-                mode_index = _resolve_mode_index(model_id, session.get("params", {}), user_id)
-                price_line = _build_current_price_line(
-                    session,
-                    user_lang=user_lang,
-                    model_id=model_id,
-                    mode_index=mode_index,
-                    gen_type=session.get("gen_type"),
-                    params=session.get("params", {}),
-                    correlation_id=correlation_id,
-                    update_id=update_id,
-                    action_path="button_callback.set_param",
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    is_admin=get_is_admin(user_id),
-                )
-                await query.edit_message_text(f"✅ {param_name} установлен: {param_value}\n{price_line}")
-                # Move to next parameter
-                try:
-                    next_param_result = await start_next_parameter(update, context, user_id)
-                    if next_param_result:
-                        return next_param_result
-                    return INPUTTING_PARAMS
-                except Exception as e:
-                    logger.error(f"Error starting next parameter: {e}")
-                    await query.edit_message_text("❌ Ошибка при переходе к следующему параметру.")
-                    return INPUTTING_PARAMS
+            async with pending_deliveries_lock:
+                payload = pending_deliveries.get((user_id, task_id))
 
-            # All parameters collected
-            session['waiting_for'] = None
-            # Get model_id from session (CRITICAL: must be defined before use)
-            model_id = session.get('model_id', '')
-            if not model_id:
-                logger.error(f"❌ model_id not found in session for user_id={user_id}")
-                await query.edit_message_text("❌ Ошибка: модель не найдена в сессии.")
-                return ConversationHandler.END
-            return await send_confirmation_message(update, context, user_id, source="set_param_complete")
-        
-        # Handle back to previous step
-        if data == "back_to_previous_step":
-            await query.answer("◀️ Возвращаюсь назад...")
-            user_lang = get_user_language(user_id)
-            
-            if user_id not in user_sessions:
+            if not payload:
                 await query.edit_message_text(
-                    t('error_try_start', lang=user_lang),
-                    parse_mode='HTML'
+                    "❌ Не нашёл результат для повторной доставки. Попробуйте заново через меню.",
+                    parse_mode="HTML",
                 )
                 return ConversationHandler.END
-            
-            session = user_sessions[user_id]
+
+            from app.generations.telegram_sender import send_result_file
+            from app.storage import get_storage
+            storage_instance = get_storage()
+
+            delivered = False
             try:
-                history = session.setdefault('param_history', [])
-                params = session.get('params', {})
-                if not history:
-                    logger.info(
-                        "🧭 BACK: action_path=back_to_previous_step model_id=%s waiting_for=%s current_param=%s outcome=no_history",
-                        session.get('model_id'),
-                        session.get('waiting_for'),
-                        session.get('current_param'),
-                    )
-                    log_structured_event(
-                        correlation_id=ensure_correlation_id(update, context),
-                        user_id=user_id,
-                        chat_id=query.message.chat_id if query and query.message else None,
-                        update_id=update.update_id,
-                        action="BACK_TO_PREVIOUS_STEP",
-                        action_path="back_to_previous_step",
-                        model_id=session.get("model_id"),
-                        stage="UI_ROUTER",
-                        outcome="no_history",
-                        error_code="UX_NO_HISTORY",
-                        fix_hint="No previous steps in history; show menu options or continue current step.",
-                        param={"waiting_for": session.get("waiting_for"), "current_param": session.get("current_param")},
-                    )
-                    no_history_text = (
-                        "ℹ️ <b>Нечего возвращать</b>\n\n"
-                        "Вы на первом шаге.\n"
-                        "Код: <code>UX_NO_HISTORY</code>\n\n"
-                        "Выберите действие ниже."
-                        if user_lang == "ru"
-                        else (
-                            "ℹ️ <b>Nothing to return</b>\n\n"
-                            "You are on the first step.\n"
-                            "Code: <code>UX_NO_HISTORY</code>\n\n"
-                            "Choose an action below."
-                        )
-                    )
-                    keyboard = InlineKeyboardMarkup(
-                        [
-                            [InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")],
-                            [InlineKeyboardButton(t('btn_all_models_short', lang=user_lang), callback_data="show_models")],
-                            [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")],
-                        ]
-                    )
-                    await query.edit_message_text(
-                        no_history_text,
-                        reply_markup=keyboard,
-                        parse_mode='HTML'
+                delivered = bool(
+                    await send_result_file(
+                        context.bot,
+                        payload["chat_id"],
+                        payload["media_type"],
+                        payload["urls"],
+                        payload.get("text"),
+                        model_id=payload.get("model_id"),
+                        gen_type=payload.get("gen_type"),
+                        correlation_id=payload.get("correlation_id"),
+                        request_id=payload.get("request_id"),
+                        prompt_hash=payload.get("prompt_hash"),
+                        params=payload.get("params"),
+                        model_label=payload.get("model_label"),
+                        task_id=payload.get("task_id"),
+                        job_id=payload.get("job_id"),
                     )
-                    return INPUTTING_PARAMS
-
-                previous_param = history.pop()
-                if previous_param in params:
-                    params.pop(previous_param, None)
-                session['params'] = params
-                session['waiting_for'] = previous_param
-                session['current_param'] = previous_param
-                logger.info(
-                    "🧭 BACK: action_path=back_to_previous_step model_id=%s waiting_for=%s current_param=%s outcome=rewind",
-                    session.get('model_id'),
-                    session.get('waiting_for'),
-                    session.get('current_param'),
                 )
-                next_param_result = await prompt_for_specific_param(
-                    update,
-                    context,
-                    user_id,
-                    previous_param,
-                    source="back_to_previous_step",
+            except Exception as exc:
+                log_structured_event(
+                    correlation_id=payload.get("correlation_id"),
+                    user_id=user_id,
+                    chat_id=payload.get("chat_id"),
+                    action="DELIVERY_FAIL",
+                    action_path="retry_delivery",
+                    model_id=payload.get("model_id"),
+                    stage="TG_DELIVER",
+                    outcome="failed",
+                    error_code="TG_DELIVER_EXCEPTION",
+                    fix_hint=str(exc),
+                    param={"task_id": task_id},
                 )
-                if next_param_result:
-                    return next_param_result
-                return INPUTTING_PARAMS
-            except Exception as e:
-                logger.error(f"Error in back_to_previous_step: {e}", exc_info=True)
-                # Fallback: return to model selection
+
+            if delivered:
+                async with pending_deliveries_lock:
+                    pending_deliveries.pop((user_id, task_id), None)
+                try:
+                    await storage_instance.update_json_file(
+                        "delivery_records.json",
+                        lambda data: {
+                            **data,
+                            f"{user_id}:{task_id}": {
+                                **data.get(f"{user_id}:{task_id}", {}),
+                                "status": "delivered",
+                                "updated_at": datetime.now().isoformat(),
+                                "delivered_at": datetime.now().isoformat(),
+                            },
+                        },
+                    )
+                except Exception as exc:
+                    logger.warning("Failed to persist delivery record: %s", exc)
+                log_task_lifecycle(
+                    state="delivered",
+                    user_id=user_id,
+                    task_id=task_id,
+                    job_id=payload.get("job_id"),
+                    model_id=payload.get("model_id"),
+                    correlation_id=payload.get("correlation_id"),
+                    source="retry_delivery",
+                )
+                dry_run = is_dry_run() or not allow_real_generation()
+                if not dry_run:
+                    await _commit_post_delivery_charge(
+                        session=payload.get("session", {}),
+                        user_id=user_id,
+                        chat_id=payload.get("chat_id"),
+                        task_id=payload.get("task_id"),
+                        sku_id=payload.get("sku_id", ""),
+                        price=float(payload.get("price", 0)),
+                        is_free=bool(payload.get("is_free")),
+                        is_admin_user=bool(payload.get("is_admin_user")),
+                        correlation_id=payload.get("correlation_id"),
+                        model_id=payload.get("model_id"),
+                    )
                 await query.edit_message_text(
-                    t('error_try_start', lang=user_lang),
-                    parse_mode='HTML'
+                    "✅ <b>Доставка завершена</b>\n\nРезультат успешно отправлен.",
+                    reply_markup=InlineKeyboardMarkup(
+                        [[InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]]
+                    ),
+                    parse_mode="HTML",
                 )
                 return ConversationHandler.END
+
+            retry_keyboard = InlineKeyboardMarkup(
+                [
+                    [InlineKeyboardButton("🔁 Повторить доставку", callback_data=f"retry_delivery:{task_id}")],
+                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")],
+                ]
+            )
+            await query.edit_message_text(
+                "⚠️ <b>Доставка снова не удалась</b>\n\n"
+                "Попробуйте ещё раз чуть позже или используйте главное меню.",
+                reply_markup=retry_keyboard,
+                parse_mode="HTML",
+            )
+            return ConversationHandler.END
         
-        if data == "fast_tools":
-            # Answer callback immediately to show button was pressed
+        if data.startswith("category:"):
+            # Answer callback immediately
             try:
                 await query.answer()
             except:
                 pass
-            reset_session_on_navigation(user_id, reason="fast_tools")
             
-            # Сохраняем source для проверки бесплатного доступа
-            session = user_sessions.get(user_id, {})
-            if session:
-                session['free_source'] = 'fast_tools'
+            parts = data.split(":", 1)
+            if len(parts) < 2:
+                try:
+                    await query.answer("Ошибка: неверный формат запроса", show_alert=True)
+                except:
+                    pass
+                try:
+                    await query.edit_message_text("❌ Ошибка: неверный формат запроса.")
+                except:
+                    try:
+                        await query.message.reply_text("❌ Ошибка: неверный формат запроса.")
+                    except:
+                        pass
+                return ConversationHandler.END
+            category = parts[1]
+            models = get_models_by_category_from_registry(category)
             
-            # Show free tools menu - только top-5 дешёвых моделей
-            try:
-                user_lang = get_user_language(user_id)
-                
-                # Используем новый PricingService для получения топ-5
-                from app.services.pricing import get_pricing_service
+            if not models:
+                try:
+                    await query.edit_message_text(f"❌ В категории {category} нет моделей.")
+                except:
+                    try:
+                        await query.message.reply_text(f"❌ В категории {category} нет моделей.")
+                    except:
+                        pass
+                return ConversationHandler.END
+            
+            keyboard = []
+            for model in models:
+                model_name = model.get('name', model.get('id', 'Unknown'))
+                model_emoji = model.get('emoji', '🤖')
+                model_id = model.get('id')
+                button_text = f"{model_emoji} {model_name}"
+                if len(button_text.encode("utf-8")) > 60:
+                    truncated = model_name[:40].rstrip()
+                    button_text = f"{model_emoji} {truncated}..."
                 
-                pricing_service = get_pricing_service()
-                top_models, error_msg = pricing_service.get_free_models_for_ui(user_lang)
+                # Ensure callback_data is not too long (Telegram limit: 64 bytes)
+                callback_data = f"select_model:{model_id}"
+                if len(callback_data.encode('utf-8')) > 64:
+                    logger.error(f"Callback data too long for model {model_id}: {len(callback_data.encode('utf-8'))} bytes")
+                    callback_data = f"sel:{model_id[:50]}"
                 
-                if error_msg:
+                keyboard.append([InlineKeyboardButton(
+                    button_text,
+                    callback_data=callback_data
+                )])
+            user_lang = get_user_language(query.from_user.id)
+            keyboard.append([InlineKeyboardButton(t('btn_back_to_categories', lang=user_lang), callback_data="show_models")])
+            keyboard.append([InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")])
+            
+            # Premium formatted header
+            category_emoji = {
+                "Видео": "🎬",
+                "Изображения": "🖼️",
+                "Редактирование": "✏️"
+            }.get(category, "📁")
+            
+            models_text = (
+                f"✨ <b>ПРЕМИУМ КАТАЛОГ</b> ✨\n\n"
+                f"{category_emoji} <b>Категория: {category}</b>\n"
+                f"📦 <b>Доступно моделей:</b> {len(models)}\n\n"
+                f"━━━━━━━━━━━━━━━━━━━━\n\n"
+                f"💡 <i>Выберите модель из списка ниже</i>\n"
+                f"<i>Подробная информация отобразится при выборе</i>"
+            )
+            
+            await query.edit_message_text(
+                models_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
+            return SELECTING_MODEL
+        
+        if data == "free_tools":
+            # Answer callback immediately
+            try:
+                await query.answer()
+            except Exception as e:
+                logger.error(f"Error answering callback for free_tools: {e}")
+                pass
+            reset_session_context(
+                user_id,
+                reason="free_tools",
+                clear_gen_type=True,
+                correlation_id=correlation_id,
+                update_id=update_id,
+                chat_id=query.message.chat_id if query.message else None,
+            )
+            # Устанавливаем источник бесплатной генерации
+            if user_id in user_sessions:
+                user_sessions[user_id]["free_source"] = "fast_tools"
+            set_session_context(
+                user_id,
+                to_context=UI_CONTEXT_FREE_TOOLS_MENU,
+                reason="free_tools",
+                clear_gen_type=True,
+                correlation_id=correlation_id,
+                update_id=update_id,
+                chat_id=query.message.chat_id if query.message else None,
+            )
+            logger.info(f"User {user_id} clicked 'free_tools' button")
+            
+            # Get free tools from pricing SSOT (fixed order)
+            free_sku_ids = get_free_tools_model_ids()
+            from app.pricing.ssot_catalog import (
+                get_sku_by_id,
+            )
+            models_map = {model.get('id'): model for model in get_models_sync()}
+            unique_sku_ids = []
+            seen_sku_ids = set()
+            for sku_id in free_sku_ids:
+                if sku_id in seen_sku_ids:
+                    continue
+                seen_sku_ids.add(sku_id)
+                unique_sku_ids.append(sku_id)
+            free_skus = [get_sku_by_id(sku_id) for sku_id in unique_sku_ids]
+            free_skus = [sku for sku in free_skus if sku and sku.model_id in models_map]
+
+            if not free_skus:
+                user_lang = get_user_language(user_id)
+                keyboard = [[InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")]]
+                if user_lang == 'ru':
                     await query.edit_message_text(
-                        f"⚡ <b>FREE FAST TOOLS</b>\n\n"
-                        f"❌ {error_msg}\n\n"
-                        "Попробуйте другие разделы меню.",
-                        reply_markup=InlineKeyboardMarkup([[
-                            InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")
-                        ]]),
+                        "ℹ️ <b>Нет доступных бесплатных SKU</b>\n\n"
+                        "В прайс-SSOT пока нет бесплатных вариантов.\n\n"
+                        "Пока можно выбрать модель из каталога.",
+                        reply_markup=InlineKeyboardMarkup(keyboard),
                         parse_mode='HTML'
                     )
                 else:
-                    await show_free_tools_menu(query, user_id, user_lang, top_models)
-            except Exception as e:
-                logger.error(f"Error in fast_tools: {e}", exc_info=True)
-                try:
-                    await query.answer("❌ Ошибка при загрузке бесплатных инструментов", show_alert=True)
-                except:
-                    pass
-        
-        if data == "special_tools":
-            # Answer callback immediately to show button was pressed
+                    await query.edit_message_text(
+                        "ℹ️ <b>No free SKUs available</b>\n\n"
+                        "Pricing SSOT does not include free variants yet.\n\n"
+                        "You can pick a model from the catalog.",
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML'
+                    )
+                return ConversationHandler.END
+            
+            user_lang = get_user_language(user_id)
+            free_counter_line = ""
             try:
-                await query.answer()
-            except:
-                pass
-            reset_session_on_navigation(user_id, reason="special_tools")
+                free_counter_line = await _await_with_timeout(
+                    get_free_counter_line(
+                        user_id,
+                        user_lang=user_lang,
+                        correlation_id=correlation_id,
+                        action_path="free_tools_menu",
+                        sku_id=free_sku_ids[0] if free_sku_ids else None,
+                    ),
+                    timeout=MAIN_MENU_DEP_TIMEOUT_SECONDS,
+                    label="free_tools_counter",
+                    correlation_id=correlation_id,
+                    user_id=user_id,
+                    chat_id=query.message.chat_id if query.message else None,
+                    update_id=update_id,
+                    default="",
+                )
+            except Exception as exc:
+                logger.warning("Failed to resolve free counter line: %s", exc)
+            if free_counter_line:
+                if user_lang == "en":
+                    free_counter_line = f"{free_counter_line}\n🔄 Limit refreshes once per day."
+                else:
+                    free_counter_line = f"{free_counter_line}\n🔄 Лимит обновляется раз в день."
+            if user_lang == 'ru':
+                free_tools_text = (
+                    f"🆓 <b>БЕСПЛАТНЫЕ ИНСТРУМЕНТЫ</b>\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"💡 <b>Все инструменты в этом разделе полностью бесплатны!</b>\n\n"
+                    f"🤖 <b>Доступные инструменты:</b>\n\n"
+                    f"💡 <b>Выберите инструмент ниже</b>"
+                )
+            else:
+                free_tools_text = (
+                    f"🆓 <b>FAST TOOLS</b>\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"💡 <b>All tools in this section are completely free!</b>\n\n"
+                    f"🤖 <b>Available tools:</b>\n\n"
+                    f"💡 <b>Select a tool below</b>"
+                )
+            free_tools_text = _append_free_counter_text(free_tools_text, free_counter_line)
+            keyboard_markup, unique_buttons = _build_free_tools_keyboard(
+                free_skus=free_skus,
+                models_map=models_map,
+                user_lang=user_lang,
+            )
+            if unique_buttons:
+                if user_lang == "en":
+                    free_tools_text = free_tools_text.replace(
+                        "<b>Available tools:</b>",
+                        f"<b>Available tools ({unique_buttons}):</b>",
+                    )
+                else:
+                    free_tools_text = free_tools_text.replace(
+                        "<b>Доступные инструменты:</b>",
+                        f"<b>Доступные инструменты ({unique_buttons}):</b>",
+                    )
+            if unique_buttons < len(free_skus):
+                logger.warning(
+                    "FREE_TOOLS_KEYBOARD_DEDUPED user_id=%s removed=%s",
+                    user_id,
+                    len(free_skus) - unique_buttons,
+                )
             
-            # Show special tools menu (audio, text, upscale, etc.)
             try:
-                user_lang = get_user_language(user_id)
-                
-                # Формируем меню спец-инструментов
-                special_tools_keyboard = [
-                    [InlineKeyboardButton("🎵 Аудио/Музыка", callback_data="gen_type:audio-to-audio")],
-                    [InlineKeyboardButton("✍️ Работа с текстом", callback_data="gen_type:text-to-text")],
-                    [InlineKeyboardButton("🖼️ Улучшение изображения", callback_data="gen_type:upscale")],
-                    [InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")]
-                ]
-                
                 await query.edit_message_text(
-                    "🧰 <b>Спец-инструменты</b>\n\n"
-                    "Дополнительные инструменты для работы с контентом:",
-                    reply_markup=InlineKeyboardMarkup(special_tools_keyboard),
+                    free_tools_text,
+                    reply_markup=keyboard_markup,
                     parse_mode='HTML'
                 )
             except Exception as e:
-                logger.error(f"Error in special_tools: {e}", exc_info=True)
-                try:
-                    await query.answer("❌ Ошибка при загрузке спец-инструментов", show_alert=True)
-                except:
-                    pass
-        
-        if data == "check_balance":
-            # Answer callback immediately to show button was pressed
-            try:
-                await query.answer()
-            except:
-                pass
-            reset_session_on_navigation(user_id, reason="check_balance")
-            
-            # Check user's personal balance (используем helpers для устранения дублирования)
-            try:
-                user_lang = get_user_language(user_id)
-                balance_info = await get_balance_info(user_id, user_lang)
-                balance_text = await format_balance_message(balance_info, user_lang)
-                keyboard = get_balance_keyboard(balance_info, user_lang)
-                
+                logger.error(f"Error editing message in free_tools: {e}", exc_info=True)
                 try:
-                    await query.edit_message_text(
-                        balance_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
+                    await query.message.reply_text(
+                        free_tools_text,
+                        reply_markup=keyboard_markup,
                         parse_mode='HTML'
                     )
-                except Exception as e:
-                    logger.error(f"Error editing message in check_balance: {e}", exc_info=True)
-                    try:
-                        await query.message.reply_text(
-                            balance_text,
-                            reply_markup=InlineKeyboardMarkup(keyboard),
-                            parse_mode='HTML'
-                        )
-                    except:
-                        pass
-            except Exception as e:
-                logger.error(f"Error in check_balance: {e}", exc_info=True)
-                try:
-                    await query.answer("❌ Ошибка при проверке баланса", show_alert=True)
-                except:
-                    pass
-            return ConversationHandler.END
+                except Exception as e2:
+                    logger.error(f"Error sending new message in free_tools: {e2}", exc_info=True)
+                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
+            
+            # Return SELECTING_MODEL state so that select_model: buttons work
+            return SELECTING_MODEL
         
-        if data == "topup_balance":
-            # Answer callback immediately to show button was pressed
+        if data == "show_all_models_list":
+            # Answer callback immediately
             try:
                 await query.answer()
-            except:
-                pass
-            
-            # Check if user is blocked
-            if is_user_blocked(user_id):
-                await query.edit_message_text(
-                    "❌ <b>Ваш аккаунт заблокирован</b>\n\n"
-                    "Обратитесь к администратору для разблокировки.",
-                    parse_mode='HTML'
-                )
-                return ConversationHandler.END
-            
-            # Get payment details to show immediately
-            payment_details = get_payment_details()
-            user_lang = get_user_language(user_id)
-            
-            # Show amount selection - focus on small amounts with marketing
-            keyboard = [
-                [
-                    InlineKeyboardButton("💎 50 ₽", callback_data="topup_amount:50"),
-                    InlineKeyboardButton("💎 100 ₽", callback_data="topup_amount:100"),
-                    InlineKeyboardButton("💎 150 ₽", callback_data="topup_amount:150")
-                ],
-                [
-                    InlineKeyboardButton(t('btn_custom_amount', lang=user_lang), callback_data="topup_custom")
-                ],
-                [InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")]
-            ]
+            except Exception as e:
+                logger.error(f"Error answering callback for show_all_models_list: {e}")
             
-            current_balance = await get_user_balance_async(user_id)
-            balance_str = format_rub_amount(current_balance)
+            logger.info(f"User {user_id} clicked 'show_all_models_list' button")
             
-            await query.edit_message_text(
-                f'💳 <b>ПОПОЛНЕНИЕ БАЛАНСА</b> 💳\n\n'
-                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                f'💰 <b>Твой текущий баланс:</b> {balance_str}\n\n'
-                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                f'{payment_details}\n\n'
-                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                f'💡 <b>Доступные модели:</b>\n'
-                f'• От 4 ₽ за видео\n'
-                f'• От 1 ₽ за изображение\n'
-                f'• Редактирование от 1 ₽\n\n'
-                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                f'🚀 <b>ВЫБЕРИ СУММУ:</b>\n'
-                f'• Быстрый выбор: 50, 100, 150 ₽\n'
-                f'• Или укажи свою сумму\n\n'
-                f'📝 <b>Ограничения:</b>\n'
-                f'Минимум: 50 ₽ | Максимум: 50000 ₽',
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            return SELECTING_AMOUNT
-        
-        if data.startswith("topup_amount:"):
-            # User selected a preset amount
-            parts = data.split(":", 1)
-            if len(parts) < 2:
-                await query.answer("Ошибка: неверный формат суммы", show_alert=True)
-                return ConversationHandler.END
+            # Используем новый каталог
             try:
-                amount = float(parts[1])
-            except (ValueError, TypeError):
-                await query.answer("Ошибка: неверная сумма", show_alert=True)
-                return ConversationHandler.END
-            user_lang = get_user_language(user_id)
-            
-            # Calculate what user can generate
-            examples_count = int(amount / 0.62)  # free tools price
-            video_count = int(amount / 3.86)  # Basic video price
-            
-            # Show payment method selection
-            amount_display = format_rub_amount(amount)
-            if user_lang == 'ru':
-                payment_text = (
-                    f'💳 <b>ОПЛАТА {amount_display}</b> 💳\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'💵 <b>Сумма к оплате:</b> {amount_display}\n\n'
-                    f'🎯 <b>ЧТО ТЫ ПОЛУЧИШЬ:</b>\n'
-                    f'• ~{examples_count} изображений (free tools)\n'
-                    f'• ~{video_count} видео (базовая модель)\n'
-                    f'• Или комбинацию разных моделей!\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'💳 <b>ОПЛАТА ТОЛЬКО ПО СБП:</b>'
+                from app.helpers.models_menu_handlers import handle_show_all_models_list
+                user_lang = get_user_language(user_id)
+                reset_session_context(
+                    user_id,
+                    reason="show_all_models_list",
+                    clear_gen_type=True,
+                    correlation_id=correlation_id,
+                    update_id=update_id,
+                    chat_id=query.message.chat_id if query.message else None,
                 )
-            else:
-                payment_text = (
-                    f'💳 <b>PAYMENT {amount_display}</b> 💳\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'💵 <b>Amount to pay:</b> {amount_display}\n\n'
-                    f'🎯 <b>WHAT YOU WILL GET:</b>\n'
-                    f'• ~{examples_count} images (free tools)\n'
-                    f'• ~{video_count} videos (basic model)\n'
-                    f'• Or a combination of different models!\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'💳 <b>PAYMENT ONLY VIA SBP:</b>'
+                set_session_context(
+                    user_id,
+                    to_context=UI_CONTEXT_MODEL_MENU,
+                    reason="show_all_models_list",
+                    clear_gen_type=True,
+                    correlation_id=correlation_id,
+                    update_id=update_id,
+                    chat_id=query.message.chat_id if query.message else None,
                 )
+                loading_text = (
+                    "⏳ Загружаю список моделей…" if user_lang == 'ru' else "⏳ Loading models list…"
+                )
+                try:
+                    await query.edit_message_text(loading_text, parse_mode='HTML')
+                except Exception as edit_exc:
+                    logger.debug("Could not show loading state for show_all_models_list: %s", edit_exc)
+                
+                async def _render_all_models_list():
+                    try:
+                        await asyncio.wait_for(
+                            handle_show_all_models_list(
+                                query,
+                                user_id,
+                                user_lang,
+                                skip_answer=True,
+                            ),
+                            timeout=10,
+                        )
+                    except asyncio.TimeoutError:
+                        fallback = (
+                            "⚠️ Слишком долго. Попробуй ещё раз." if user_lang == 'ru' else "⚠️ Too slow. Please try again."
+                        )
+                        try:
+                            await query.edit_message_text(fallback, parse_mode='HTML')
+                        except Exception:
+                            pass
+                    except Exception as exc:
+                        logger.error("Error in handle_show_all_models_list: %s", exc, exc_info=True)
+                        fallback = (
+                            "❌ Ошибка при загрузке моделей. Попробуйте позже." if user_lang == 'ru' else "❌ Error loading models. Please try later."
+                        )
+                        try:
+                            await query.edit_message_text(fallback, parse_mode='HTML')
+                        except Exception:
+                            try:
+                                await query.answer(fallback, show_alert=True)
+                            except Exception:
+                                pass
+                
+                if context and getattr(context, "application", None):
+                    task = context.application.create_task(_render_all_models_list())
+                    _register_background_task(task, action="render_all_models_list")
+                else:
+                    await _render_all_models_list()
+                return SELECTING_MODEL
+            except Exception as e:
+                logger.error(f"Error in handle_show_all_models_list: {e}", exc_info=True)
+                user_lang = get_user_language(user_id)
+                if user_lang == 'ru':
+                    error_msg = "❌ Ошибка при загрузке моделей. Попробуйте позже."
+                else:
+                    error_msg = "❌ Error loading models. Please try later."
+                await query.answer(error_msg, show_alert=True)
+                return SELECTING_MODEL
             
-            # Store amount in session
-            user_sessions[user_id] = {
-                'topup_amount': amount,
-                'waiting_for': 'payment_method'
-            }
-            
-            keyboard = [
-                [InlineKeyboardButton("💳 СБП / SBP", callback_data=f"pay_sbp:{amount}")],
-                [
-                    InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
-                    InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
-                ],
-                [
-                    InlineKeyboardButton(t('btn_support', lang=user_lang), callback_data="support_contact"),
-                    InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")
-                ]
-            ]
-            
-            await query.edit_message_text(
-                payment_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            return SELECTING_AMOUNT
-        
-        # Handle payment method selection
-        if data.startswith("pay_stars:"):
-            await query.answer("Сейчас доступна только оплата по СБП.", show_alert=True)
-            return SELECTING_AMOUNT
+            return SELECTING_MODEL
         
-        if data.startswith("pay_sbp:"):
-            # User chose SBP payment
-            parts = data.split(":", 1)
-            if len(parts) < 2:
-                await query.answer("Ошибка: неверный формат суммы", show_alert=True)
-                return ConversationHandler.END
+        if data == "add_image":
+            # Answer callback immediately
             try:
-                amount = float(parts[1])
-            except (ValueError, TypeError):
-                await query.answer("Ошибка: неверная сумма", show_alert=True)
-                return ConversationHandler.END
-            user_lang = get_user_language(user_id)
-            session = user_sessions.get(user_id, {})
-            if session.get("waiting_for") != "payment_method" or session.get("topup_amount") is None:
-                await query.answer("Сначала выберите сумму пополнения.", show_alert=True)
-                return ConversationHandler.END
-
-            amount = session.get("topup_amount", amount)
-            user_sessions[user_id] = {
-                'topup_amount': amount,
-                'waiting_for': 'payment_screenshot',
-                'payment_method': 'sbp'
-            }
+                await query.answer()
+            except:
+                pass
             
-            payment_details = get_payment_details()
+            session = user_sessions.get(user_id, {})
+            # Determine which parameter name to use (image_input or image_urls)
+            model_info = session.get('model_info', {})
+            input_params = model_info.get('input_params', {})
+            if 'image_urls' in input_params:
+                image_param_name = 'image_urls'
+            else:
+                image_param_name = 'image_input'
+            session['waiting_for'] = image_param_name
+            session['current_param'] = image_param_name
+            if image_param_name not in session:
+                session[image_param_name] = []  # Initialize as array
+            free_counter_line = await _resolve_free_counter_line(
+                user_id,
+                user_lang,
+                correlation_id,
+                action_path=f"param_prompt:{image_param_name}",
+                sku_id=session.get("sku_id"),
+            )
+            prompt_text = _append_free_counter_text(
+                "📷 <b>Загрузите изображение</b>\n\n"
+                "Отправьте фото, которое хотите использовать как референс или для трансформации.\n"
+                "Можно загрузить до 8 изображений.",
+                free_counter_line,
+            )
             keyboard = [
                 [
                     InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
                     InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
                 ],
-                [
-                    InlineKeyboardButton(t('btn_support', lang=user_lang), callback_data="support_contact"),
-                    InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")
-                ]
+                [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
             ]
-
-            sbp_text = build_manual_payment_instructions(
-                amount=amount,
-                user_lang=user_lang,
-                payment_details=payment_details,
-                method_label="СБП" if user_lang == "ru" else "SBP",
-            )
-            
             await query.edit_message_text(
-                sbp_text,
+                prompt_text,
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode='HTML'
             )
-            return WAITING_PAYMENT_SCREENSHOT
-
-        if data.startswith("pay_card:"):
-            await query.answer("Сейчас доступна только оплата по СБП.", show_alert=True)
-            return SELECTING_AMOUNT
-        
-        if data == "topup_custom":
-            # User wants to enter custom amount
-            await query.edit_message_text(
-                f'💰 <b>ВВЕДИ СВОЮ СУММУ</b> 💰\n\n'
-                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                f'📝 <b>Просто отправь число</b> (например: 250)\n\n'
-                f'💡 <b>Доступные модели:</b>\n'
-                f'• От 3.86 ₽ за видео\n'
-                f'• От 0.62 ₽ за изображение\n'
-                f'• Редактирование от 0.5 ₽\n\n'
-                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
-                f'📋 <b>Ограничения:</b>\n'
-                f'• Минимум: 50 ₽\n'
-                f'• Максимум: 50000 ₽\n\n'
-                f'💬 <b>Отправь сумму цифрами</b> (например: 250)',
-                parse_mode='HTML'
-            )
-            user_sessions[user_id] = {
-                'waiting_for': 'topup_amount_input'
-            }
-            return SELECTING_AMOUNT
+            return INPUTTING_PARAMS
         
-        # Admin functions (only for admin)
-        if get_is_admin(user_id):
-            if data.startswith("admin_user_info:"):
+        if data == "image_done":
+            # Answer callback immediately
+            try:
                 await query.answer()
-                parts = data.split(":", 1)
-                if len(parts) < 2:
-                    await query.answer("Ошибка: неверный формат пользователя", show_alert=True)
-                    return ConversationHandler.END
-                try:
-                    target_user_id = int(parts[1])
-                except ValueError:
-                    await query.answer("Ошибка: неверный user_id", show_alert=True)
-                    return ConversationHandler.END
-                text, keyboard = await build_admin_user_overview(target_user_id)
-                await query.edit_message_text(text, reply_markup=keyboard, parse_mode='HTML')
+            except:
+                pass
+            
+            if user_id not in user_sessions:
+                await query.edit_message_text("❌ Сессия не найдена.")
                 return ConversationHandler.END
-
-            if data.startswith("admin_topup_user:"):
-                await query.answer()
-                parts = data.split(":", 1)
-                if len(parts) < 2:
-                    await query.answer("Ошибка: неверный формат пользователя", show_alert=True)
-                    return ConversationHandler.END
-                try:
-                    target_user_id = int(parts[1])
-                except ValueError:
-                    await query.answer("Ошибка: неверный user_id", show_alert=True)
-                    return ConversationHandler.END
-                user_sessions[user_id] = {
-                    "waiting_for": "admin_manual_topup_amount",
-                    "admin_target_user_id": target_user_id,
-                }
+            session = user_sessions[user_id]
+            waiting_for = session.get('waiting_for', 'image_input')
+            # Normalize: if waiting_for is 'image', use the actual parameter name from properties
+            if waiting_for == 'image':
+                properties = session.get('properties', {})
+                if 'image_input' in properties:
+                    image_param_name = 'image_input'
+                elif 'image_urls' in properties:
+                    image_param_name = 'image_urls'
+                else:
+                    image_param_name = 'image_input'  # Default fallback
+            else:
+                image_param_name = waiting_for
+            
+            if image_param_name in session and session[image_param_name]:
+                if 'params' not in session:
+                    session['params'] = {}
+                session['params'][image_param_name] = session[image_param_name]
                 await query.edit_message_text(
-                    f"➕ <b>Начисление баланса</b>\n\n"
-                    f"👤 Пользователь: <code>{target_user_id}</code>\n"
-                    f"💬 Отправьте сумму для начисления (например: 150)\n\n"
-                    f"Отмена: /cancel",
-                    parse_mode='HTML'
+                    f"✅ Добавлено изображений: {len(session[image_param_name])}\n\n"
+                    f"Продолжаю..."
                 )
-                return ConversationHandler.END
-
-            if data == "admin_stats":
-                await render_admin_panel(query, context, is_callback=True)
-                return ConversationHandler.END
+            session['waiting_for'] = None
             
-            # Handle payment screenshots viewing
-            if data == "view_payment_screenshots":
-                await query.answer()
-                
-                # Get all payments with screenshots
-                payments = get_all_payments()
-                payments_with_screenshots = [p for p in payments if p.get('screenshot_file_id')]
-                
-                if not payments_with_screenshots:
+            # Move to next parameter
+            try:
+                next_param_result = await start_next_parameter(update, context, user_id)
+                if next_param_result:
+                    return next_param_result
+                else:
+                    # All parameters collected
+                    model_name = session.get('model_info', {}).get('name', 'Unknown')
+                    params = session.get('params', {})
+                    params_text = "\n".join([f"  • {k}: {str(v)[:50]}..." for k, v in params.items()])
+                    
+                    user_lang = get_user_language(user_id)
+                    keyboard = [
+                        [InlineKeyboardButton(t('btn_confirm_generate', lang=user_lang), callback_data="confirm_generate")],
+                        [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
+                        [
+                            InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+                            InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+                        ],
+                        [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
+                    ]
+                    
+                    # Calculate price for confirmation message
+                    is_admin_user = get_is_admin(user_id)
+                    price = calculate_price_rub(model_id, params, is_admin_user)
+                    if price is None:
+                        blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
+                        await query.edit_message_text(blocked_text, parse_mode="HTML")
+                        return ConversationHandler.END
+                    sku_id = session.get("sku_id", "")
+                    source = session.get("free_source", "unknown")
+                    is_free = await is_free_generation_available(user_id, sku_id, source)
+                    if price is None:
+                        blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
+                        await query.edit_message_text(blocked_text, parse_mode="HTML")
+                        return ConversationHandler.END
+                    if is_free:
+                        price = 0.0
+                    price_str = format_rub_amount(price)
+                    
+                    # Prepare price info
+                    if is_free:
+                        remaining = await get_user_free_generations_remaining(user_id)
+                        price_info = f"🎁 <b>БЕСПЛАТНАЯ ГЕНЕРАЦИЯ!</b>\nОсталось бесплатных: {remaining}/{FREE_GENERATIONS_PER_DAY} в день"
+                    else:
+                        price_info = f"💰 <b>Стоимость:</b> {price_str}"
+
+                    free_counter_line = ""
+                    try:
+                        free_counter_line = await get_free_counter_line(
+                            user_id,
+                            user_lang=user_lang,
+                            correlation_id=correlation_id,
+                            action_path="confirm_screen",
+                            sku_id=sku_id,
+                        )
+                    except Exception as exc:
+                        logger.warning("Failed to resolve free counter line: %s", exc)
+
+                    free_counter_line = ""
+                    try:
+                        free_counter_line = await get_free_counter_line(
+                            user_id,
+                            user_lang=user_lang,
+                            correlation_id=correlation_id,
+                            action_path="confirm_screen",
+                            sku_id=sku_id,
+                        )
+                    except Exception as exc:
+                        logger.warning("Failed to resolve free counter line: %s", exc)
+                    
+                    user_balance = await get_user_balance_async(user_id)
+                    # Build enhanced confirmation message
+                    confirm_msg_base = build_confirmation_text(
+                        model_id=model_id,
+                        model_name=model_name,
+                        params=params,
+                        price=price,
+                        user_id=user_id,
+                        lang=user_lang,
+                        is_free=is_free,
+                        bonus_available=0.0,
+                        discount=None,
+                        user_balance=user_balance,
+                        correlation_id=correlation_id,
+                    )
+                    confirm_msg = _append_free_counter_text(confirm_msg_base, free_counter_line)
+                    
+                    logger.info(f"✅ [UX IMPROVEMENT] Sending improved confirmation message to user {user_id}")
                     await query.edit_message_text(
-                        "📸 <b>Скриншоты платежей</b>\n\n"
-                        "Нет платежей со скриншотами.",
+                        confirm_msg,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
                         parse_mode='HTML'
                     )
-                    return ConversationHandler.END
-                
-                # Show first payment screenshot
-                first_payment = payments_with_screenshots[0]
-                payment_index = 0
-                
-                # Store current index in context for navigation
-                context.user_data['payment_screenshot_index'] = 0
-                context.user_data['payment_screenshots_list'] = [p.get('id') for p in payments_with_screenshots]
-                
-                await show_payment_screenshot(query, first_payment, payment_index, len(payments_with_screenshots))
+                    return CONFIRMING_GENERATION
+            except Exception as e:
+                logger.error(f"Error after image done: {e}")
+                await query.edit_message_text("❌ Ошибка при переходе к следующему параметру.")
+                return INPUTTING_PARAMS
+        
+        if data == "add_audio":
+            # User wants to add audio file
+            await query.answer()
+            if user_id not in user_sessions:
+                await query.edit_message_text("❌ Ошибка: сессия не найдена. Начните заново.")
                 return ConversationHandler.END
             
-            # Handle navigation between payment screenshots
-            if data.startswith("payment_screenshot_nav:"):
-                await query.answer()
-                
-                parts = data.split(":", 1)
-                if len(parts) < 2:
-                    await query.answer("Ошибка навигации", show_alert=True)
-                    return ConversationHandler.END
-                
-                direction = parts[1]  # "prev" or "next"
-                current_index = context.user_data.get('payment_screenshot_index', 0)
-                payment_ids = context.user_data.get('payment_screenshots_list', [])
-                
-                if not payment_ids:
-                    await query.answer("Список платежей не найден", show_alert=True)
-                    return ConversationHandler.END
-                
-                # Navigate
-                if direction == "prev":
-                    current_index = (current_index - 1) % len(payment_ids)
-                elif direction == "next":
-                    current_index = (current_index + 1) % len(payment_ids)
-                else:
-                    await query.answer("Неверное направление", show_alert=True)
-                    return ConversationHandler.END
-                
-                context.user_data['payment_screenshot_index'] = current_index
-                
-                # Get payment by ID
-                payment_id = payment_ids[current_index]
-                payments = get_all_payments()
-                payment = next((p for p in payments if p.get('id') == payment_id), None)
-                
-                if not payment:
-                    await query.answer("Платеж не найден", show_alert=True)
-                    return ConversationHandler.END
-                
-                await show_payment_screenshot(query, payment, current_index, len(payment_ids))
+            session = user_sessions.get(user_id, {})
+            if not session:
+                user_lang = get_user_language(query.from_user.id)
+                await query.edit_message_text(t('error_session_empty', lang=user_lang))
                 return ConversationHandler.END
+            model_info = session.get('model_info', {})
+            input_params = model_info.get('input_params', {})
             
-            # Handle back to payments list
-            if data == "admin_payments_back":
-                await query.answer()
-                await show_admin_payments(query, context, is_callback=True)
-                return ConversationHandler.END
+            audio_param_name = 'audio_url' if 'audio_url' in input_params else 'audio_input'
+            user_lang = get_user_language(query.from_user.id)
+            
+            keyboard = [
+                [InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")],
+                [InlineKeyboardButton(t('btn_skip', lang=user_lang), callback_data="skip_audio")]
+            ]
+            
+            await query.edit_message_text(
+                "🎤 <b>Загрузите аудио-файл</b>\n\n"
+                "Отправьте аудио-файл для транскрибации.\n\n"
+                "Поддерживаемые форматы: MP3, WAV, OGG, M4A, FLAC, AAC, WMA, MPEG\n"
+                "Максимальный размер: 200 MB",
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
+            
+            session['waiting_for'] = audio_param_name
+            session['current_param'] = audio_param_name
+            return INPUTTING_PARAMS
         
-        # Handle admin view all generations
-        if data == "admin_view_generations":
-            # Check admin access
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору." if get_user_language(user_id) == 'ru' else "This function is available only to administrator.")
+        if data == "skip_audio":
+            # User wants to skip audio upload
+            await query.answer("Аудио пропущено")
+            if user_id not in user_sessions:
+                await query.edit_message_text("❌ Ошибка: сессия не найдена. Начните заново.")
                 return ConversationHandler.END
             
-            await query.answer()
-            user_lang = get_user_language(user_id)
-            
-            # Load all generations from all users
-            history = load_json_file(GENERATIONS_HISTORY_FILE, {})
+            session = user_sessions[user_id]
+            session['waiting_for'] = None
+            session['current_param'] = None
             
-            if not history:
-                if user_lang == 'ru':
-                    message_text = (
-                        "📚 <b>Просмотр генераций</b>\n\n"
-                        "❌ В системе пока нет сохраненных генераций.\n\n"
-                        "💡 Генерации пользователей будут отображаться здесь после их создания."
-                    )
+            # Move to next parameter
+            try:
+                next_param_result = await start_next_parameter(update, context, user_id)
+                if next_param_result:
+                    return next_param_result
                 else:
-                    message_text = (
-                        "📚 <b>View Generations</b>\n\n"
-                        "❌ No saved generations in the system yet.\n\n"
-                        "💡 User generations will appear here after they are created."
+                    # All parameters collected, show confirmation
+                    model_name = session.get('model_info', {}).get('name', 'Unknown')
+                    params = session.get('params', {})
+                    params_text = "\n".join([f"  • {k}: {str(v)[:50]}{'...' if len(str(v)) > 50 else ''}" for k, v in params.items()])
+                    
+                    user_lang = get_user_language(user_id)
+                    keyboard = [
+                        [InlineKeyboardButton(t('btn_confirm_generate', lang=user_lang), callback_data="confirm_generate")],
+                        [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
+                        [
+                            InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+                            InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+                        ],
+                        [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
+                    ]
+                    
+                    # Calculate price for confirmation message
+                    is_admin_user = get_is_admin(user_id)
+                    sku_id = session.get("sku_id", "")
+                    source = session.get("free_source", "unknown")
+                    is_free = await is_free_generation_available(user_id, sku_id, source)
+                    price = calculate_price_rub(model_id, params, is_admin_user)
+                    if is_free:
+                        price = 0.0
+                    price_str = format_rub_amount(price)
+                    
+                    # Prepare price info
+                    if is_free:
+                        remaining = await get_user_free_generations_remaining(user_id)
+                        price_info = f"🎁 <b>БЕСПЛАТНАЯ ГЕНЕРАЦИЯ!</b>\nОсталось бесплатных: {remaining}/{FREE_GENERATIONS_PER_DAY} в день"
+                    else:
+                        price_info = f"💰 <b>Стоимость:</b> {price_str}"
+                    
+                    user_balance = await get_user_balance_async(user_id)
+                    # Build enhanced confirmation message
+                    confirm_msg_base = build_confirmation_text(
+                        model_id=model_id,
+                        model_name=model_name,
+                        params=params,
+                        price=price,
+                        user_id=user_id,
+                        lang=user_lang,
+                        is_free=is_free,
+                        bonus_available=0.0,
+                        discount=None,
+                        user_balance=user_balance,
+                        correlation_id=correlation_id,
+                    )
+                    confirm_msg = _append_free_counter_text(confirm_msg_base, free_counter_line)
+                    
+                    logger.info(f"✅ [UX IMPROVEMENT] Sending improved confirmation message to user {user_id}")
+                    await query.edit_message_text(
+                        confirm_msg,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML'
                     )
+                    return CONFIRMING_GENERATION
+            except Exception as e:
+                logger.error(f"Error after skipping audio: {e}", exc_info=True)
+                await query.edit_message_text("❌ Ошибка при переходе к следующему параметру.")
+            
+            return INPUTTING_PARAMS
+        
+        if data == "skip_image":
+            await query.answer("Изображение пропущено")
+            # Move to next parameter
+            try:
+                next_param_result = await start_next_parameter(update, context, user_id)
+                if next_param_result:
+                    return next_param_result
+                else:
+                    # All parameters collected
+                    if user_id not in user_sessions:
+                        await query.edit_message_text("❌ Сессия не найдена.")
+                        return ConversationHandler.END
+                    session = user_sessions[user_id]
+                    model_name = session.get('model_info', {}).get('name', 'Unknown')
+                    params = session.get('params', {})
+                    params_text = "\n".join([f"  • {k}: {str(v)[:50]}..." for k, v in params.items()])
+                    
+                    user_lang = get_user_language(user_id)
+                    sku_id = session.get("sku_id")
+                    free_counter_line = ""
+                    try:
+                        free_counter_line = await get_free_counter_line(
+                            user_id,
+                            user_lang=user_lang,
+                            correlation_id=correlation_id,
+                            action_path="confirm_screen",
+                            sku_id=sku_id,
+                        )
+                    except Exception as exc:
+                        logger.warning("Failed to resolve free counter line: %s", exc)
+                    keyboard = [
+                        [InlineKeyboardButton(t('btn_confirm_generate', lang=user_lang), callback_data="confirm_generate")],
+                        [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
+                        [
+                            InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+                            InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+                        ],
+                        [InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")]
+                    ]
                 
-                keyboard = [
-                    [InlineKeyboardButton(t('btn_back_to_admin', lang=user_lang), callback_data="admin_stats")]
-                ]
                 await query.edit_message_text(
-                    message_text,
+                    _append_free_counter_text(
+                        (
+                            f"📋 <b>Подтверждение:</b>\n\n"
+                            f"Модель: <b>{model_name}</b>\n"
+                            f"Параметры:\n{params_text}\n\n"
+                            f"Продолжить генерацию?"
+                        ),
+                        free_counter_line,
+                    ),
                     reply_markup=InlineKeyboardMarkup(keyboard),
                     parse_mode='HTML'
                 )
+                return CONFIRMING_GENERATION
+            except Exception as e:
+                logger.error(f"Error after skipping image: {e}")
+                await query.edit_message_text("❌ Ошибка при переходе к следующему параметру.")
+                return INPUTTING_PARAMS
+
+        if data == "show_parameters":
+            await query.answer()
+            if user_id not in user_sessions:
+                await query.edit_message_text("❌ Сессия не найдена.")
                 return ConversationHandler.END
-            
-            # Collect all generations with user info
-            all_generations = []
-            for user_key, user_history in history.items():
-                try:
-                    user_id_int = int(user_key) if user_key.isdigit() else None
-                    if user_id_int:
-                        for gen in user_history:
-                            gen_with_user = gen.copy()
-                            gen_with_user['user_id'] = user_id_int
-                            all_generations.append(gen_with_user)
-                except (ValueError, TypeError):
+
+            session = user_sessions[user_id]
+            properties = session.get('properties', {})
+            params = session.get('params', {})
+            param_order = session.get('param_order', list(properties.keys()))
+            skipped_params = session.get('skipped_params', set())
+            user_lang = get_user_language(user_id)
+            from app.kie_catalog import get_model
+
+            model_spec = session.get("model_spec") or get_model(session.get("model_id"))
+            session_gen_type = session.get("gen_type") or (model_spec.model_type if model_spec else None)
+            keyboard = []
+
+            for param_name in param_order:
+                if param_name not in properties:
                     continue
-            
-            # Sort by timestamp (newest first)
-            all_generations.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
-            
-            if not all_generations:
-                if user_lang == 'ru':
-                    message_text = (
-                        "📚 <b>Просмотр генераций</b>\n\n"
-                        "❌ Не найдено генераций для отображения."
-                    )
+                param_info = properties.get(param_name, {})
+                default_value = _resolve_unified_default(
+                    param_name,
+                    param_info,
+                    model_spec=model_spec,
+                    session_gen_type=session_gen_type,
+                )
+                if param_name in params:
+                    value_text = str(params[param_name])
+                elif param_name in skipped_params:
+                    value_text = "по умолчанию" if user_lang == "ru" else "default"
+                elif default_value is not None:
+                    value_text = f"{default_value}"
                 else:
-                    message_text = (
-                        "📚 <b>View Generations</b>\n\n"
-                        "❌ No generations found to display."
+                    value_text = "—"
+                if len(value_text) > 30:
+                    value_text = value_text[:30] + "…"
+                keyboard.append([
+                    InlineKeyboardButton(
+                        f"{param_name}: {value_text}",
+                        callback_data=f"edit_param:{param_name}"
                     )
-                
-                keyboard = [
-                    [InlineKeyboardButton(t('btn_back_to_admin', lang=user_lang), callback_data="admin_stats")]
-                ]
-                await query.edit_message_text(
-                    message_text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
-                return ConversationHandler.END
-            
-            # Store in context for navigation
-            context.user_data['admin_generations_list'] = all_generations
-            context.user_data['admin_generation_index'] = 0
-            
-            # Show first generation
-            await show_admin_generation(query, context, all_generations[0], 0, len(all_generations))
-            return ConversationHandler.END
-        
-        # Handle admin generation navigation
-        if data.startswith("admin_gen_nav:"):
-            if not is_admin(user_id):
-                await query.answer("Доступ запрещен", show_alert=True)
-                return ConversationHandler.END
-            
+                ])
+
+            back_label = "◀️ Назад" if user_lang == 'ru' else "◀️ Back"
+            keyboard.append([InlineKeyboardButton(back_label, callback_data="back_to_confirmation")])
+            keyboard.append([InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")])
+            keyboard.append([InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")])
+
+            text = (
+                "⚙️ <b>Параметры модели</b>\n\n"
+                "Нажмите на параметр, чтобы изменить его значение."
+                if user_lang == 'ru'
+                else "⚙️ <b>Model parameters</b>\n\nTap a parameter to change its value."
+            )
+            await query.edit_message_text(
+                text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
+            logger.info(
+                "🧭 PARAMS_MENU: action_path=show_parameters model_id=%s waiting_for=%s current_param=%s outcome=shown",
+                session.get('model_id'),
+                session.get('waiting_for'),
+                session.get('current_param'),
+            )
+            return INPUTTING_PARAMS
+
+        if data.startswith("edit_param:"):
             await query.answer()
-            parts = data.split(":", 1)
-            if len(parts) < 2:
+            if user_id not in user_sessions:
+                await query.edit_message_text("❌ Сессия не найдена.")
                 return ConversationHandler.END
-            
-            direction = parts[1]  # "prev" or "next"
-            all_generations = context.user_data.get('admin_generations_list', [])
-            current_index = context.user_data.get('admin_generation_index', 0)
-            
-            if not all_generations:
-                await query.answer("Список генераций не найден", show_alert=True)
+            session = user_sessions[user_id]
+            param_name = data.split(":", 1)[1]
+            session.setdefault('param_history', [])
+            skipped_params = session.get("skipped_params", set())
+            if param_name in skipped_params:
+                skipped_params.discard(param_name)
+            if 'params' in session:
+                session['params'].pop(param_name, None)
+            session['waiting_for'] = param_name
+            session['current_param'] = param_name
+            return await prompt_for_specific_param(update, context, user_id, param_name, source="edit_param")
+
+        if data.startswith("confirm_param:"):
+            parts = data.split(":", 2)
+            if len(parts) != 3:
+                await query.answer("Ошибка: неверный формат параметра", show_alert=True)
                 return ConversationHandler.END
-            
-            # Navigate
-            if direction == "prev":
-                current_index = (current_index - 1) % len(all_generations)
-            elif direction == "next":
-                current_index = (current_index + 1) % len(all_generations)
-            else:
+            if user_id not in user_sessions:
+                await query.edit_message_text("❌ Сессия не найдена.")
                 return ConversationHandler.END
-            
-            context.user_data['admin_generation_index'] = current_index
-            gen = all_generations[current_index]
-            
-            await show_admin_generation(query, context, gen, current_index, len(all_generations))
-            return ConversationHandler.END
-        
-        # Handle admin view generation result
-        if data.startswith("admin_gen_view:"):
-            if not is_admin(user_id):
-                await query.answer("Доступ запрещен", show_alert=True)
+            session = user_sessions[user_id]
+            param_name = parts[1]
+            pending = session.pop("pending_param", None)
+            pending_params = session.pop("pending_params", None)
+            session.pop("pending_price", None)
+            if not pending or pending.get("name") != param_name or not isinstance(pending_params, dict):
+                await query.edit_message_text("❌ Параметр не найден для подтверждения.")
                 return ConversationHandler.END
-            
-            await query.answer()
-            parts = data.split(":", 1)
-            if len(parts) < 2:
+            skip_param = pending.get("skip", False)
+            session['params'] = pending_params
+            skipped_params = session.setdefault("skipped_params", set())
+            if skip_param:
+                skipped_params.add(param_name)
+            else:
+                skipped_params.discard(param_name)
+            _record_param_history(session, param_name)
+            session['current_param'] = None
+            log_structured_event(
+                correlation_id=correlation_id,
+                user_id=user_id,
+                chat_id=query.message.chat_id if query.message else None,
+                update_id=update_id,
+                action="PARAM_CONFIRM",
+                action_path="button_callback.confirm_param",
+                param={"param_name": param_name, "source": "callback"},
+                outcome="confirmed",
+            )
+            model_id = session.get("model_id", "")
+            mode_index = _resolve_mode_index(model_id, session.get("params", {}), user_id)
+            price_quote = _update_price_quote(
+                session,
+                model_id=model_id,
+                mode_index=mode_index,
+                gen_type=session.get("gen_type"),
+                params=session.get("params", {}),
+                correlation_id=correlation_id,
+                update_id=update_id,
+                action_path="button_callback.confirm_param",
+                user_id=user_id,
+                chat_id=query.message.chat_id if query.message else None,
+                is_admin=get_is_admin(user_id),
+            )
+            if not price_quote:
+                blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
+                await query.edit_message_text(blocked_text, parse_mode="HTML")
                 return ConversationHandler.END
-            
-            try:
-                gen_index = int(parts[1])
-            except (ValueError, TypeError):
+
+            required = session.get('required', [])
+            params = session.get('params', {})
+            missing = [p for p in required if p not in params]
+
+            if missing:
+                price_line = _build_current_price_line(
+                    session,
+                    user_lang=user_lang,
+                    model_id=model_id,
+                    mode_index=mode_index,
+                    gen_type=session.get("gen_type"),
+                    params=session.get("params", {}),
+                    correlation_id=correlation_id,
+                    update_id=update_id,
+                    action_path="button_callback.confirm_param",
+                    user_id=user_id,
+                    chat_id=query.message.chat_id if query.message else None,
+                    is_admin=get_is_admin(user_id),
+                )
+                await query.edit_message_text(f"✅ {param_name} сохранён.\n{price_line}")
+                next_param_result = await start_next_parameter(update, context, user_id)
+                if next_param_result:
+                    return next_param_result
+                return INPUTTING_PARAMS
+
+            session['waiting_for'] = None
+            if not model_id:
+                logger.error(f"❌ model_id not found in session for user_id={user_id}")
+                await query.edit_message_text("❌ Ошибка: модель не найдена в сессии.")
                 return ConversationHandler.END
-            
-            all_generations = context.user_data.get('admin_generations_list', [])
-            if gen_index < 0 or gen_index >= len(all_generations):
-                await query.answer("Генерация не найдена", show_alert=True)
+            return await send_confirmation_message(update, context, user_id, source="confirm_param_complete")
+
+        if data.startswith("set_param:"):
+            # Handle parameter setting via button
+            parts = data.split(":", 2)
+            if len(parts) != 3:
+                await query.answer("Ошибка: неверный формат параметра", show_alert=True)
                 return ConversationHandler.END
-            
-            gen = all_generations[gen_index]
-            result_urls = gen.get('result_urls', [])
-            
-            if not result_urls:
-                await query.answer("Результаты не найдены", show_alert=True)
+
+            param_name = parts[1]
+            param_value = parts[2]
+            skip_param = False
+
+            if user_id not in user_sessions:
+                await query.edit_message_text("❌ Сессия не найдена.")
                 return ConversationHandler.END
-            
-            # Send media
-            user_lang = get_user_language(user_id)
-            session_http = await get_http_client()
-            for i, url in enumerate(result_urls[:5]):
-                try:
-                    async with session_http.get(url) as resp:
-                        if resp.status == 200:
-                            media_data = await resp.read()
-                            
-                            is_last = (i == len(result_urls[:5]) - 1)
-                            is_video = gen.get('model_id', '') in ['sora-2-text-to-video', 'sora-watermark-remover', 'kling-2.6/image-to-video', 'kling-2.6/text-to-video', 'kling/v2-5-turbo-text-to-video-pro', 'kling/v2-5-turbo-image-to-video-pro', 'wan/2-5-image-to-video', 'wan/2-5-text-to-video', 'wan/2-2-animate-move', 'wan/2-2-animate-replace', 'hailuo/02-text-to-video-pro', 'hailuo/02-image-to-video-pro', 'hailuo/02-text-to-video-standard', 'hailuo/02-image-to-video-standard']
-                            
-                            keyboard = []
-                            if is_last:
-                                keyboard = [
-                                    [InlineKeyboardButton(t('btn_back_to_list', lang=user_lang), callback_data="admin_view_generations")],
-                                    [InlineKeyboardButton(t('btn_back_to_admin', lang=user_lang), callback_data="admin_stats")]
-                                ]
-                            
-                            if is_video:
-                                video_file = io.BytesIO(media_data)
-                                video_file.name = f"generated_video_{i+1}.mp4"
-                                await context.bot.send_video(
-                                    chat_id=query.message.chat_id,
-                                    video=video_file,
-                                    reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
-                                )
-                            else:
-                                photo_file = io.BytesIO(media_data)
-                                photo_file.name = f"generated_image_{i+1}.png"
-                                await context.bot.send_photo(
-                                    chat_id=query.message.chat_id,
-                                    photo=photo_file,
-                                    reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
-                                )
-                except Exception as e:
-                    logger.error(f"Error sending admin generation result: {e}")
-            
-            await query.answer("✅ Результаты отправлены")
-            return ConversationHandler.END
-        
-        if data == "admin_settings":
-            # Check admin access
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору." if get_user_language(user_id) == 'ru' else "This function is available only to administrator.")
+
+            session = user_sessions[user_id]
+            properties = session.get('properties', {})
+            param_info = properties.get(param_name, {})
+            param_type = param_info.get('type', 'string')
+
+            # 🔴 ВАЛИДАЦИЯ ENUM ЗНАЧЕНИЙ: Проверяем, что значение находится в списке допустимых
+            enum_values = _normalize_enum_values(param_info)
+            if enum_values and param_value not in enum_values and param_value not in {SKIP_PARAM_VALUE, "custom"}:
+                # Недопустимое enum значение
+                user_lang = get_user_language(user_id) if user_id else 'ru'
+                error_text = (
+                    f"❌ <b>Недопустимое значение</b>\n\n"
+                    f"Допустимые значения: {', '.join(enum_values)}\n"
+                    f"Введено: {param_value}"
+                ) if user_lang == 'ru' else (
+                    f"❌ <b>Invalid value</b>\n\n"
+                    f"Allowed values: {', '.join(enum_values)}\n"
+                    f"Entered: {param_value}"
+                )
+                await query.answer(error_text, show_alert=True)
                 return ConversationHandler.END
-            
-            # Get user language
-            user_lang = get_user_language(user_id)
-            
-            # Get support contact info
-            support_telegram = os.getenv('SUPPORT_TELEGRAM', 'Не указано' if user_lang == 'ru' else 'Not specified')
-            
-            if user_lang == 'ru':
-                settings_text = (
-                    f'⚙️ <b>Настройки администратора:</b>\n\n'
-                    f'🔧 <b>Доступные функции:</b>\n\n'
-                    f'✅ Управление моделями\n'
-                    f'✅ Просмотр статистики\n'
-                    f'✅ Управление пользователями\n'
-                    f'✅ Настройки API\n\n'
-                    f'💡 <b>Команды:</b>\n'
-                    f'/models - Управление моделями\n'
-                    f'/balance - Проверка баланса\n'
-                    f'/search - Поиск в базе знаний\n'
-                    f'/add - Добавление знаний\n'
-                    f'/admin - Пользователи и ручные пополнения\n'
-                    f'/payments - Просмотр платежей\n'
-                    f'/block_user - Заблокировать пользователя\n'
-                    f'/unblock_user - Разблокировать пользователя\n'
-                    f'/user_balance - Баланс пользователя\n'
-                    f'/config_check - Проверка конфигурации\n\n'
-                    f'💬 <b>Настройки поддержки:</b>\n\n'
-                    f'💬 Telegram: {support_telegram if support_telegram != "Не указано" else "Не указано"}\n\n'
-                    f'💡 Для изменения настроек поддержки отредактируйте файл .env'
+
+            if param_value == SKIP_PARAM_VALUE:
+                if param_info.get('required', False):
+                    user_lang = get_user_language(user_id) if user_id else 'ru'
+                    error_text = (
+                        "❌ Этот параметр обязателен и не может быть пропущен."
+                        if user_lang == 'ru'
+                        else "❌ This parameter is required and cannot be skipped."
+                    )
+                    await query.answer(error_text, show_alert=True)
+                    return INPUTTING_PARAMS
+                user_lang = get_user_language(user_id) if user_id else 'ru'
+                if 'params' in session and param_name in session['params']:
+                    session['params'].pop(param_name, None)
+                skipped_params = session.setdefault("skipped_params", set())
+                skipped_params.add(param_name)
+                session['current_param'] = None
+                session['waiting_for'] = None
+                _record_param_history(session, param_name)
+                skip_param = True
+                param_label = _humanize_param_name(param_name, user_lang)
+                skip_text = (
+                    f"✅ {param_label}: по умолчанию"
+                    if user_lang == "ru"
+                    else f"✅ {param_label}: default applied"
                 )
-            else:
-                settings_text = (
-                    f'⚙️ <b>Administrator Settings:</b>\n\n'
-                    f'🔧 <b>Available Functions:</b>\n\n'
-                    f'✅ Model Management\n'
-                    f'✅ View Statistics\n'
-                    f'✅ User Management\n'
-                    f'✅ API Settings\n\n'
-                    f'💡 <b>Commands:</b>\n'
-                    f'/models - Model Management\n'
-                    f'/balance - Check Balance\n'
-                    f'/search - Search Knowledge Base\n'
-                    f'/add - Add Knowledge\n'
-                    f'/admin - User overview and manual top-ups\n'
-                    f'/payments - View Payments\n'
-                    f'/block_user - Block User\n'
-                    f'/unblock_user - Unblock User\n'
-                    f'/user_balance - User Balance\n'
-                    f'/config_check - Config Check\n\n'
-                    f'💬 <b>Support Settings:</b>\n\n'
-                    f'💬 Telegram: {support_telegram if support_telegram != "Not specified" else "Not specified"}\n\n'
-                    f'💡 To change support settings, edit the .env file'
+                mode_index = _resolve_mode_index(session.get("model_id", ""), session.get("params", {}), user_id)
+                price_line = _build_current_price_line(
+                    session,
+                    user_lang=user_lang,
+                    model_id=session.get("model_id", ""),
+                    mode_index=mode_index,
+                    gen_type=session.get("gen_type"),
+                    params=session.get("params", {}),
+                    correlation_id=correlation_id,
+                    update_id=update_id,
+                    action_path="button_callback.set_param",
+                    user_id=user_id,
+                    chat_id=query.message.chat_id if query.message else None,
+                    is_admin=get_is_admin(user_id),
                 )
-            
-            # Get current exchange rate
-            current_rate = get_usd_to_rub_rate()
-            
-            if user_lang == 'ru':
-                settings_text += f'\n💱 <b>Курс валюты:</b>\n'
-                settings_text += f'1 USD = {current_rate:.2f} RUB\n\n'
-                keyboard = [
-                    [InlineKeyboardButton("💱 Установить курс валюты", callback_data="admin_set_currency_rate")],
-                    [InlineKeyboardButton("🧩 Проверка конфигурации", callback_data="admin_config_check")],
-                    [InlineKeyboardButton("📢 Рассылка", callback_data="admin_broadcast")],
-                    [InlineKeyboardButton("🎁 Промокоды", callback_data="admin_promocodes")],
-                    [InlineKeyboardButton("◀️ Назад", callback_data="admin_back_to_admin")]
-                ]
-            else:
-                settings_text += f'\n💱 <b>Exchange Rate:</b>\n'
-                settings_text += f'1 USD = {current_rate:.2f} RUB\n\n'
-                keyboard = [
-                    [InlineKeyboardButton("💱 Set Exchange Rate", callback_data="admin_set_currency_rate")],
-                    [InlineKeyboardButton("🧩 Config Check", callback_data="admin_config_check")],
-                    [InlineKeyboardButton("📢 Broadcast", callback_data="admin_broadcast")],
-                    [InlineKeyboardButton("🎁 Promocodes", callback_data="admin_promocodes")],
-                    [InlineKeyboardButton("◀️ Back", callback_data="admin_back_to_admin")]
+                await query.edit_message_text(f"{skip_text}\n{price_line}")
+                log_structured_event(
+                    correlation_id=correlation_id,
+                    user_id=user_id,
+                    chat_id=query.message.chat_id if query.message else None,
+                    update_id=update_id,
+                    action="PARAM_SKIPPED",
+                    action_path="button_callback.set_param",
+                    param={"param_name": param_name, "source": "callback"},
+                    outcome="skipped",
+                )
+                try:
+                    next_param_result = await start_next_parameter(update, context, user_id)
+                    if next_param_result:
+                        return next_param_result
+                    return INPUTTING_PARAMS
+                except Exception as e:
+                    logger.error(f"Error starting next parameter after skip: {e}")
+                    await query.edit_message_text("❌ Ошибка при переходе к следующему параметру.")
+                    return INPUTTING_PARAMS
+
+            if param_value == "custom" and param_name == "language_code":
+                session['current_param'] = param_name
+                session['waiting_for'] = param_name
+                session['language_code_custom'] = True
+                await query.edit_message_text(
+                    "✏️ Введите код языка (например: en, ru, de, fr).",
+                )
+                return INPUTTING_PARAMS
+
+            # Convert boolean string to actual boolean
+            if param_type == 'boolean':
+                if param_value.lower() == 'true':
+                    param_value = True
+                elif param_value.lower() == 'false':
+                    param_value = False
+                else:
+                    # Use default if invalid
+                    param_value = param_info.get('default', True)
+
+            if 'params' not in session:
+                session['params'] = {}
+            candidate_params = dict(session.get("params", {}))
+            display_value = param_value
+            if skip_param:
+                default_value = param_info.get("default")
+                if default_value is not None:
+                    candidate_params[param_name] = default_value
+                    display_value = default_value
+                else:
+                    candidate_params.pop(param_name, None)
+            else:
+                candidate_params[param_name] = param_value
+
+            from app.pricing.price_resolver import resolve_price_quote
+            from app.config import get_settings
+            model_id = session.get("model_id", "")
+            mode_index = _resolve_mode_index(model_id, candidate_params, user_id)
+            quote = resolve_price_quote(
+                model_id=model_id,
+                mode_index=mode_index,
+                gen_type=session.get("gen_type"),
+                selected_params=candidate_params,
+                settings=get_settings(),
+                is_admin=get_is_admin(user_id),
+            )
+            if quote is None:
+                user_lang = get_user_language(user_id) if user_id else 'ru'
+                blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
+                await query.edit_message_text(blocked_text, parse_mode="HTML")
+                return ConversationHandler.END
+
+            session["pending_param"] = {
+                "name": param_name,
+                "value": param_value,
+                "skip": skip_param,
+            }
+            session["pending_params"] = candidate_params
+            session["pending_price"] = float(quote.price_rub)
+            option_label = _humanize_param_name(param_name, user_lang)
+            confirm_text = build_option_confirm_text(
+                user_lang,
+                option_label,
+                str(display_value),
+                float(quote.price_rub),
+            )
+            confirm_button = "✅ Подтвердить" if user_lang == "ru" else "✅ Confirm"
+            back_button = "↩️ Назад" if user_lang == "ru" else "↩️ Back"
+            keyboard = InlineKeyboardMarkup(
+                [
+                    [InlineKeyboardButton(confirm_button, callback_data=f"confirm_param:{param_name}:{param_value}")],
+                    [InlineKeyboardButton(back_button, callback_data=f"edit_param:{param_name}")],
                 ]
-            
-            await query.edit_message_text(
-                settings_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
             )
-            return ConversationHandler.END
+            await query.edit_message_text(confirm_text, reply_markup=keyboard, parse_mode="HTML")
+            return INPUTTING_PARAMS
 
-        if data == "admin_config_check":
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
-                return ConversationHandler.END
+            # Check if there are more parameters
+            required = session.get('required', [])
+            params = session.get('params', {})
+            missing = [p for p in required if p not in params]
 
-            from app.config_env import build_config_self_check_report
+            if missing:
+                mode_index = _resolve_mode_index(model_id, session.get("params", {}), user_id)
+                price_line = _build_current_price_line(
+                    session,
+                    user_lang=user_lang,
+                    model_id=model_id,
+                    mode_index=mode_index,
+                    gen_type=session.get("gen_type"),
+                    params=session.get("params", {}),
+                    correlation_id=correlation_id,
+                    update_id=update_id,
+                    action_path="button_callback.set_param",
+                    user_id=user_id,
+                    chat_id=query.message.chat_id if query.message else None,
+                    is_admin=get_is_admin(user_id),
+                )
+                await query.edit_message_text(f"✅ {param_name} установлен: {param_value}\n{price_line}")
+                # Move to next parameter
+                try:
+                    next_param_result = await start_next_parameter(update, context, user_id)
+                    if next_param_result:
+                        return next_param_result
+                    return INPUTTING_PARAMS
+                except Exception as e:
+                    logger.error(f"Error starting next parameter: {e}")
+                    await query.edit_message_text("❌ Ошибка при переходе к следующему параметру.")
+                    return INPUTTING_PARAMS
 
-            report = build_config_self_check_report()
-            user_lang = get_user_language(user_id)
-            back_label = "◀️ Назад" if user_lang == "ru" else "◀️ Back"
-            keyboard = [[InlineKeyboardButton(back_label, callback_data="admin_settings")]]
-            await query.edit_message_text(
-                report,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="HTML",
-            )
-            return ConversationHandler.END
-        
-        if data == "admin_promocodes":
-            # Check admin access
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
+            # All parameters collected
+            session['waiting_for'] = None
+            # Get model_id from session (CRITICAL: must be defined before use)
+            model_id = session.get('model_id', '')
+            if not model_id:
+                logger.error(f"❌ model_id not found in session for user_id={user_id}")
+                await query.edit_message_text("❌ Ошибка: модель не найдена в сессии.")
                 return ConversationHandler.END
+            return await send_confirmation_message(update, context, user_id, source="set_param_complete")
+        
+        if data == "fast_tools":
+            # Answer callback immediately to show button was pressed
+            try:
+                await query.answer()
+            except:
+                pass
+            reset_session_on_navigation(user_id, reason="fast_tools")
             
-            # Show promocodes menu
-            promocodes = load_promocodes()
-            active_promo = get_active_promocode()
-            
-            promocodes_text = "🎁 <b>Управление промокодами</b>\n\n"
+            # Сохраняем source для проверки бесплатного доступа
+            session = user_sessions.get(user_id, {})
+            if session:
+                session['free_source'] = 'fast_tools'
             
-            if active_promo:
-                promo_code = active_promo.get('code', 'N/A')
-                promo_value = active_promo.get('value', 0)
-                promo_expires = active_promo.get('expires', 'N/A')
-                promo_used = active_promo.get('used_count', 0)
+            # Show free tools menu - только top-5 дешёвых моделей
+            try:
+                user_lang = get_user_language(user_id)
                 
-                promocodes_text += (
-                    f"✅ <b>Активный промокод:</b>\n"
-                    f"🔑 <b>Код:</b> <code>{promo_code}</code>\n"
-                    f"💰 <b>Значение:</b> {promo_value} ₽\n"
-                    f"📅 <b>Действителен до:</b> {promo_expires}\n"
-                    f"👥 <b>Использовано раз:</b> {promo_used}\n\n"
-                )
-            else:
-                promocodes_text += "❌ <b>Нет активного промокода</b>\n\n"
-            
-            # Show all promocodes
-            if promocodes:
-                promocodes_text += f"📋 <b>Все промокоды ({len(promocodes)}):</b>\n\n"
-                for i, promo in enumerate(promocodes, 1):
-                    promo_code = promo.get('code', 'N/A')
-                    promo_value = promo.get('value', 0)
-                    promo_expires = promo.get('expires', 'N/A')
-                    promo_used = promo.get('used_count', 0)
-                    is_active = promo.get('active', False)
-                    
-                    status = "✅ Активен" if is_active else "❌ Неактивен"
-                    
-                    promocodes_text += (
-                        f"{i}. <b>{status}</b>\n"
-                        f"   🔑 <code>{promo_code}</code>\n"
-                        f"   💰 {promo_value} ₽ | 👥 {promo_used} использований\n"
-                        f"   📅 До: {promo_expires}\n\n"
+                # Используем новый PricingService для получения топ-5
+                from app.services.pricing import get_pricing_service
+                
+                pricing_service = get_pricing_service()
+                top_models, error_msg = pricing_service.get_free_models_for_ui(user_lang)
+                
+                if error_msg:
+                    await query.edit_message_text(
+                        f"⚡ <b>FREE FAST TOOLS</b>\n\n"
+                        f"❌ {error_msg}\n\n"
+                        "Попробуйте другие разделы меню.",
+                        reply_markup=InlineKeyboardMarkup([[
+                            InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")
+                        ]]),
+                        parse_mode='HTML'
                     )
-            else:
-                promocodes_text += "📋 <b>Нет созданных промокодов</b>\n\n"
-            
-            promocodes_text += "💡 <b>Доступные действия:</b>\n"
-            promocodes_text += "• Просмотр всех промокодов\n"
-            promocodes_text += "• Информация об активном промокоде\n"
-            
-            keyboard = [
-                [InlineKeyboardButton("🔄 Обновить", callback_data="admin_promocodes")],
-                [InlineKeyboardButton("◀️ Назад", callback_data="admin_settings")]
-            ]
-            
-            await query.edit_message_text(
-                promocodes_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            return ConversationHandler.END
+                else:
+                    await show_free_tools_menu(query, user_id, user_lang, top_models)
+            except Exception as e:
+                logger.error(f"Error in fast_tools: {e}", exc_info=True)
+                try:
+                    await query.answer("❌ Ошибка при загрузке бесплатных инструментов", show_alert=True)
+                except:
+                    pass
         
-        if data == "admin_broadcast":
-            # Check admin access
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
-                return ConversationHandler.END
-            
-            # Show broadcast menu
-            broadcasts = get_broadcasts()
-            total_users = len(get_all_users())
-            
-            broadcast_text = "📢 <b>Рассылка сообщений</b>\n\n"
-            broadcast_text += f"👥 <b>Всего пользователей:</b> {total_users}\n\n"
+        if data == "special_tools":
+            # Answer callback immediately to show button was pressed
+            try:
+                await query.answer()
+            except:
+                pass
+            reset_session_on_navigation(user_id, reason="special_tools")
             
-            if broadcasts:
-                broadcast_text += f"📋 <b>История рассылок ({len(broadcasts)}):</b>\n\n"
-                # Show last 5 broadcasts
-                sorted_broadcasts = sorted(
-                    broadcasts.items(),
-                    key=lambda x: x[1].get('created_at', 0),
-                    reverse=True
-                )[:5]
+            # Show special tools menu (audio, text, upscale, etc.)
+            try:
+                user_lang = get_user_language(user_id)
                 
-                for broadcast_id, broadcast in sorted_broadcasts:
-                    created_at = broadcast.get('created_at', 0)
-                    sent = broadcast.get('sent', 0)
-                    delivered = broadcast.get('delivered', 0)
-                    failed = broadcast.get('failed', 0)
-                    message_preview = broadcast.get('message', '')[:30] + '...' if len(broadcast.get('message', '')) > 30 else broadcast.get('message', '')
-                    
-                    from datetime import datetime
-                    if created_at:
-                        date_str = datetime.fromtimestamp(created_at).strftime('%Y-%m-%d %H:%M')
-                    else:
-                        date_str = 'N/A'
-                    
-                    broadcast_text += (
-                        f"📨 <b>#{broadcast_id}</b> ({date_str})\n"
-                        f"   📝 {message_preview}\n"
-                        f"   ✅ Отправлено: {sent} | 📬 Доставлено: {delivered} | ❌ Ошибок: {failed}\n\n"
-                    )
-            else:
-                broadcast_text += "📋 <b>Нет истории рассылок</b>\n\n"
+                # Формируем меню спец-инструментов
+                special_tools_keyboard = [
+                    [InlineKeyboardButton("🎵 Аудио/Музыка", callback_data="gen_type:audio-to-audio")],
+                    [InlineKeyboardButton("✍️ Работа с текстом", callback_data="gen_type:text-to-text")],
+                    [InlineKeyboardButton("🖼️ Улучшение изображения", callback_data="gen_type:upscale")],
+                    [InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")]
+                ]
+                
+                await query.edit_message_text(
+                    "🧰 <b>Спец-инструменты</b>\n\n"
+                    "Дополнительные инструменты для работы с контентом:",
+                    reply_markup=InlineKeyboardMarkup(special_tools_keyboard),
+                    parse_mode='HTML'
+                )
+            except Exception as e:
+                logger.error(f"Error in special_tools: {e}", exc_info=True)
+                try:
+                    await query.answer("❌ Ошибка при загрузке спец-инструментов", show_alert=True)
+                except:
+                    pass
+        
+        if data == "topup_balance":
+            # Answer callback immediately to show button was pressed
+            try:
+                await query.answer()
+            except:
+                pass
             
-            broadcast_text += "💡 <b>Создать новую рассылку:</b>\n"
-            broadcast_text += "Нажмите кнопку ниже и отправьте сообщение для рассылки."
+            # Check if user is blocked
+            if is_user_blocked(user_id):
+                await query.edit_message_text(
+                    "❌ <b>Ваш аккаунт заблокирован</b>\n\n"
+                    "Обратитесь к администратору для разблокировки.",
+                    parse_mode='HTML'
+                )
+                return ConversationHandler.END
             
+            # Get payment details to show immediately
+            payment_details = get_payment_details()
+            user_lang = get_user_language(user_id)
+            
+            # Show amount selection - focus on small amounts with marketing
             keyboard = [
-                [InlineKeyboardButton("📢 Создать рассылку", callback_data="admin_create_broadcast")],
-                [InlineKeyboardButton("📊 Статистика", callback_data="admin_broadcast_stats")],
-                [InlineKeyboardButton("◀️ Назад", callback_data="admin_settings")]
+                [
+                    InlineKeyboardButton("💎 50 ₽", callback_data="topup_amount:50"),
+                    InlineKeyboardButton("💎 100 ₽", callback_data="topup_amount:100"),
+                    InlineKeyboardButton("💎 150 ₽", callback_data="topup_amount:150")
+                ],
+                [
+                    InlineKeyboardButton(t('btn_custom_amount', lang=user_lang), callback_data="topup_custom")
+                ],
+                [InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")]
             ]
             
+            current_balance = await get_user_balance_async(user_id)
+            balance_str = format_rub_amount(current_balance)
+            
             await query.edit_message_text(
-                broadcast_text,
+                f'💳 <b>ПОПОЛНЕНИЕ БАЛАНСА</b> 💳\n\n'
+                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                f'💰 <b>Твой текущий баланс:</b> {balance_str}\n\n'
+                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                f'{payment_details}\n\n'
+                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                f'💡 <b>Доступные модели:</b>\n'
+                f'• От 4 ₽ за видео\n'
+                f'• От 1 ₽ за изображение\n'
+                f'• Редактирование от 1 ₽\n\n'
+                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                f'🚀 <b>ВЫБЕРИ СУММУ:</b>\n'
+                f'• Быстрый выбор: 50, 100, 150 ₽\n'
+                f'• Или укажи свою сумму\n\n'
+                f'📝 <b>Ограничения:</b>\n'
+                f'Минимум: 50 ₽ | Максимум: 50000 ₽',
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode='HTML'
             )
-            return ConversationHandler.END
+            return SELECTING_AMOUNT
         
-        if data == "admin_create_broadcast":
-            # Check admin access
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
+        if data.startswith("topup_amount:"):
+            # User selected a preset amount
+            parts = data.split(":", 1)
+            if len(parts) < 2:
+                await query.answer("Ошибка: неверный формат суммы", show_alert=True)
                 return ConversationHandler.END
-            
-            # Start broadcast creation
-            await query.edit_message_text(
-                "📢 <b>Создание рассылки</b>\n\n"
-                "Отправьте сообщение, которое хотите разослать всем пользователям.\n\n"
-                "💡 <b>Поддерживается:</b>\n"
-                "• Текст\n"
-                "• HTML форматирование\n"
-                "• Изображения\n\n"
-                "Или нажмите /cancel для отмены.",
-                parse_mode='HTML'
-            )
-            user_sessions[user_id] = {
-                'waiting_for': 'broadcast_message'
-            }
-            return WAITING_BROADCAST_MESSAGE
-        
-        if data == "admin_set_currency_rate":
-            # Check admin access
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
+            try:
+                amount = float(parts[1])
+            except (ValueError, TypeError):
+                await query.answer("Ошибка: неверная сумма", show_alert=True)
                 return ConversationHandler.END
+            user_lang = get_user_language(user_id)
             
-            # Get current exchange rate
-            current_rate = get_usd_to_rub_rate()
-            
-            currency_text = (
-                f'💱 <b>Установка курса валюты</b>\n\n'
-                f'📊 <b>Текущий курс:</b>\n'
-                f'1 USD = {current_rate:.2f} RUB\n\n'
-                f'💡 <b>Инструкция:</b>\n'
-                f'Отправьте новое значение курса валюты.\n'
-                f'Например: <code>100</code> (означает 1 USD = 100 RUB)\n\n'
-                f'⚠️ <b>Важно:</b>\n'
-                f'• Курс должен быть положительным числом\n'
-                f'• Используйте точку для десятичных значений (например: 95.5)\n'
-                f'• После установки все цены будут пересчитаны автоматически\n\n'
-                f'Для отмены нажмите /cancel'
-            )
+            # Calculate what user can generate
+            examples_count = int(amount / 0.62)  # free tools price
+            video_count = int(amount / 3.86)  # Basic video price
             
-            await query.edit_message_text(
-                currency_text,
-                parse_mode='HTML'
-            )
+            # Show payment method selection
+            amount_display = format_rub_amount(amount)
+            if user_lang == 'ru':
+                payment_text = (
+                    f'💳 <b>ОПЛАТА {amount_display}</b> 💳\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'💵 <b>Сумма к оплате:</b> {amount_display}\n\n'
+                    f'🎯 <b>ЧТО ТЫ ПОЛУЧИШЬ:</b>\n'
+                    f'• ~{examples_count} изображений (free tools)\n'
+                    f'• ~{video_count} видео (базовая модель)\n'
+                    f'• Или комбинацию разных моделей!\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'💳 <b>ОПЛАТА ТОЛЬКО ПО СБП:</b>'
+                )
+            else:
+                payment_text = (
+                    f'💳 <b>PAYMENT {amount_display}</b> 💳\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'💵 <b>Amount to pay:</b> {amount_display}\n\n'
+                    f'🎯 <b>WHAT YOU WILL GET:</b>\n'
+                    f'• ~{examples_count} images (free tools)\n'
+                    f'• ~{video_count} videos (basic model)\n'
+                    f'• Or a combination of different models!\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'💳 <b>PAYMENT ONLY VIA SBP:</b>'
+                )
             
-            # Set session to wait for currency rate
+            # Store amount in session
             user_sessions[user_id] = {
-                'waiting_for': 'currency_rate'
+                'topup_amount': amount,
+                'waiting_for': 'payment_method'
             }
-            return WAITING_CURRENCY_RATE
-        
-        if data == "admin_broadcast_stats":
-            # Check admin access
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
-                return ConversationHandler.END
-            
-            # Show detailed broadcast statistics
-            broadcasts = get_broadcasts()
-            total_users = len(get_all_users())
-            
-            if not broadcasts:
-                await query.edit_message_text(
-                    "📊 <b>Статистика рассылок</b>\n\n"
-                    "❌ Нет истории рассылок",
-                    reply_markup=InlineKeyboardMarkup([
-                        [InlineKeyboardButton("◀️ Назад", callback_data="admin_broadcast")]
-                    ]),
-                    parse_mode='HTML'
-                )
-                return ConversationHandler.END
-            
-            # Calculate totals
-            total_sent = sum(b.get('sent', 0) for b in broadcasts.values())
-            total_delivered = sum(b.get('delivered', 0) for b in broadcasts.values())
-            total_failed = sum(b.get('failed', 0) for b in broadcasts.values())
-            
-            stats_text = (
-                f"📊 <b>Статистика рассылок</b>\n\n"
-                f"👥 <b>Всего пользователей:</b> {total_users}\n"
-                f"📨 <b>Всего рассылок:</b> {len(broadcasts)}\n\n"
-                f"📈 <b>Общая статистика:</b>\n"
-                f"✅ Отправлено: {total_sent}\n"
-                f"📬 Доставлено: {total_delivered}\n"
-                f"❌ Ошибок: {total_failed}\n\n"
-            )
-            
-            if total_sent > 0:
-                success_rate = (total_delivered / total_sent) * 100
-                stats_text += f"📊 <b>Успешность доставки:</b> {success_rate:.1f}%\n"
             
             keyboard = [
-                [InlineKeyboardButton("🔄 Обновить", callback_data="admin_broadcast_stats")],
-                [InlineKeyboardButton("◀️ Назад", callback_data="admin_broadcast")]
+                [InlineKeyboardButton("💳 СБП / SBP", callback_data=f"pay_sbp:{amount}")],
+                [
+                    InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+                    InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+                ],
+                [
+                    InlineKeyboardButton(t('btn_support', lang=user_lang), callback_data="support_contact"),
+                    InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")
+                ]
             ]
             
             await query.edit_message_text(
-                stats_text,
+                payment_text,
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode='HTML'
             )
-            return ConversationHandler.END
+            return SELECTING_AMOUNT
         
-        if data == "admin_search":
-            # Check admin access
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
+        # Handle payment method selection
+        if data.startswith("pay_stars:"):
+            await query.answer("Сейчас доступна только оплата по СБП.", show_alert=True)
+            return SELECTING_AMOUNT
+        
+        if data.startswith("pay_sbp:"):
+            # User chose SBP payment
+            parts = data.split(":", 1)
+            if len(parts) < 2:
+                await query.answer("Ошибка: неверный формат суммы", show_alert=True)
+                return ConversationHandler.END
+            try:
+                amount = float(parts[1])
+            except (ValueError, TypeError):
+                await query.answer("Ошибка: неверная сумма", show_alert=True)
+                return ConversationHandler.END
+            user_lang = get_user_language(user_id)
+            session = user_sessions.get(user_id, {})
+            if session.get("waiting_for") != "payment_method" or session.get("topup_amount") is None:
+                await query.answer("Сначала выберите сумму пополнения.", show_alert=True)
                 return ConversationHandler.END
+
+            amount = session.get("topup_amount", amount)
+            user_sessions[user_id] = {
+                'topup_amount': amount,
+                'waiting_for': 'payment_screenshot',
+                'payment_method': 'sbp'
+            }
             
-            await query.edit_message_text(
-                '🔍 <b>Поиск в базе знаний</b>\n\n'
-                'Используйте команду:\n'
-                '<code>/search [запрос]</code>\n\n'
-                'Пример:\n'
-                '<code>/search нейросети</code>',
-                parse_mode='HTML'
+            payment_details = get_payment_details()
+            keyboard = [
+                [
+                    InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_previous_step"),
+                    InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")
+                ],
+                [
+                    InlineKeyboardButton(t('btn_support', lang=user_lang), callback_data="support_contact"),
+                    InlineKeyboardButton(t('btn_cancel', lang=user_lang), callback_data="cancel")
+                ]
+            ]
+
+            sbp_text = build_manual_payment_instructions(
+                amount=amount,
+                user_lang=user_lang,
+                payment_details=payment_details,
+                method_label="СБП" if user_lang == "ru" else "SBP",
             )
-            return ConversationHandler.END
-        
-        if data == "admin_add":
-            # Check admin access
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
-                return ConversationHandler.END
             
             await query.edit_message_text(
-                '📝 <b>Добавление знаний</b>\n\n'
-                'Используйте команду:\n'
-                '<code>/add [заголовок] | [содержание]</code>\n\n'
-                'Пример:\n'
-                '<code>/add AI | Искусственный интеллект - это...</code>',
+                sbp_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode='HTML'
             )
-            return ConversationHandler.END
+            return WAITING_PAYMENT_SCREENSHOT
+
+        if data.startswith("pay_card:"):
+            await query.answer("Сейчас доступна только оплата по СБП.", show_alert=True)
+            return SELECTING_AMOUNT
         
-        if data == "admin_test_ocr":
-            # Check admin access
-            if not is_admin(user_id):
-                await query.answer("Эта функция доступна только администратору.")
-                return ConversationHandler.END
-            
-            if not OCR_AVAILABLE or not PIL_AVAILABLE:
-                await query.edit_message_text(
-                    '❌ <b>OCR недоступен</b>\n\n'
-                    'Tesseract OCR не установлен или библиотеки не найдены.\n\n'
-                    'Установите:\n'
-                    '1. pip install Pillow pytesseract\n'
-                    '2. Tesseract OCR (см. TESSERACT_INSTALL.txt)',
-                    parse_mode='HTML'
-                )
-                return ConversationHandler.END
-            
+        if data == "topup_custom":
+            # User wants to enter custom amount
             await query.edit_message_text(
-                '🧪 <b>Тест OCR</b>\n\n'
-                'Отправьте изображение со скриншотом платежа.\n\n'
-                'Система проверит:\n'
-                '✅ Распознавание текста\n'
-                '✅ Поиск сумм\n'
-                '✅ Работа Tesseract OCR\n\n'
-                'Или нажмите /cancel для отмены.',
+                f'💰 <b>ВВЕДИ СВОЮ СУММУ</b> 💰\n\n'
+                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                f'📝 <b>Просто отправь число</b> (например: 250)\n\n'
+                f'💡 <b>Доступные модели:</b>\n'
+                f'• От 3.86 ₽ за видео\n'
+                f'• От 0.62 ₽ за изображение\n'
+                f'• Редактирование от 0.5 ₽\n\n'
+                f'━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n'
+                f'📋 <b>Ограничения:</b>\n'
+                f'• Минимум: 50 ₽\n'
+                f'• Максимум: 50000 ₽\n\n'
+                f'💬 <b>Отправь сумму цифрами</b> (например: 250)',
                 parse_mode='HTML'
             )
             user_sessions[user_id] = {
-                'waiting_for': 'admin_test_ocr'
+                'waiting_for': 'topup_amount_input'
             }
-            return ADMIN_TEST_OCR
+            return SELECTING_AMOUNT
         
-        if data == "tutorial_start":
-            # Answer callback immediately
-            try:
+        # Admin functions (only for admin)
+        if get_is_admin(user_id):
+            if data.startswith("admin_user_info:"):
                 await query.answer()
-            except:
-                pass
-            
-            try:
-                # Interactive tutorial for new users
-                tutorial_text = (
-                    '🎓 <b>ИНТЕРАКТИВНЫЙ ТУТОРИАЛ</b>\n\n'
-                    '━━━━━━━━━━━━━━━━━━━━\n\n'
-                    '👋 Добро пожаловать! Давайте разберемся, как пользоваться ботом.\n\n'
-                    '📚 <b>Что вы узнаете:</b>\n'
-                    '• Что такое AI-генерация\n'
-                    '• Как выбрать модель\n'
-                    '• Как создать контент\n'
-                    '• Как пополнить баланс\n\n'
-                    '💡 <b>Это займет 2 минуты!</b>'
-                )
-                
-                keyboard = [
-                    [InlineKeyboardButton("▶️ Начать туториал", callback_data="tutorial_step1")],
-                    [InlineKeyboardButton("⏭️ Пропустить", callback_data="back_to_menu")]
-                ]
-                
-                try:
-                    await query.edit_message_text(
-                        tutorial_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                except Exception as edit_error:
-                    logger.warning(f"Could not edit message in tutorial_start: {edit_error}, sending new message")
-                    try:
-                        await query.message.reply_text(
-                            tutorial_text,
-                            reply_markup=InlineKeyboardMarkup(keyboard),
-                            parse_mode='HTML'
-                        )
-                        try:
-                            await query.message.delete()
-                        except:
-                            pass
-                    except Exception as send_error:
-                        logger.error(f"Could not send new message in tutorial_start: {send_error}", exc_info=True)
-                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
-                
-                return ConversationHandler.END
-            except Exception as e:
-                logger.error(f"Error in tutorial_start: {e}", exc_info=True)
+                parts = data.split(":", 1)
+                if len(parts) < 2:
+                    await query.answer("Ошибка: неверный формат пользователя", show_alert=True)
+                    return ConversationHandler.END
                 try:
-                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
-                except:
-                    pass
+                    target_user_id = int(parts[1])
+                except ValueError:
+                    await query.answer("Ошибка: неверный user_id", show_alert=True)
+                    return ConversationHandler.END
+                text, keyboard = await build_admin_user_overview(target_user_id)
+                await query.edit_message_text(text, reply_markup=keyboard, parse_mode='HTML')
                 return ConversationHandler.END
-        
-        if data == "tutorial_step1":
-            # Answer callback immediately
-            try:
+
+            if data.startswith("admin_topup_user:"):
                 await query.answer()
-            except:
-                pass
-            
-            try:
-                tutorial_text = (
-                    '📖 <b>ШАГ 1: Что такое AI-генерация?</b>\n\n'
-                    '━━━━━━━━━━━━━━━━━━━━\n\n'
-                    '🤖 <b>Искусственный интеллект</b> может создавать:\n\n'
-                    '🎨 <b>Изображения</b>\n'
-                    'Опишите картинку словами, и AI создаст её!\n'
-                    'Пример: "Кот в космосе, пиксель-арт"\n\n'
-                    '🎬 <b>Видео</b>\n'
-                    'Создавайте короткие видео из текста\n'
-                    'Пример: "Летящий дракон над городом"\n\n'
-                    '🖼️ <b>Улучшение качества</b>\n'
-                    'Увеличивайте разрешение фото в 4-8 раз\n\n'
-                    '💡 <b>Все это без VPN!</b> Прямой доступ к лучшим AI-моделям.'
-                )
-                
-                keyboard = [
-                    [InlineKeyboardButton("▶️ Далее", callback_data="tutorial_step2")],
-                    [InlineKeyboardButton("◀️ Назад", callback_data="tutorial_start")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]
-                ]
-                
+                parts = data.split(":", 1)
+                if len(parts) < 2:
+                    await query.answer("Ошибка: неверный формат пользователя", show_alert=True)
+                    return ConversationHandler.END
                 try:
-                    await query.edit_message_text(
-                        tutorial_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                except Exception as edit_error:
-                    logger.warning(f"Could not edit message in tutorial_step1: {edit_error}, sending new message")
-                    try:
-                        await query.message.reply_text(
-                            tutorial_text,
-                            reply_markup=InlineKeyboardMarkup(keyboard),
-                            parse_mode='HTML'
-                        )
-                        try:
-                            await query.message.delete()
-                        except:
-                            pass
-                    except Exception as send_error:
-                        logger.error(f"Could not send new message in tutorial_step1: {send_error}", exc_info=True)
-                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
-                
+                    target_user_id = int(parts[1])
+                except ValueError:
+                    await query.answer("Ошибка: неверный user_id", show_alert=True)
+                    return ConversationHandler.END
+                user_sessions[user_id] = {
+                    "waiting_for": "admin_manual_topup_amount",
+                    "admin_target_user_id": target_user_id,
+                }
+                await query.edit_message_text(
+                    f"➕ <b>Начисление баланса</b>\n\n"
+                    f"👤 Пользователь: <code>{target_user_id}</code>\n"
+                    f"💬 Отправьте сумму для начисления (например: 150)\n\n"
+                    f"Отмена: /cancel",
+                    parse_mode='HTML'
+                )
                 return ConversationHandler.END
-            except Exception as e:
-                logger.error(f"Error in tutorial_step1: {e}", exc_info=True)
-                try:
-                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
-                except:
-                    pass
+
+            if data == "admin_stats":
+                await render_admin_panel(query, context, is_callback=True)
                 return ConversationHandler.END
-        
-        if data == "tutorial_step2":
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except:
-                pass
             
-            try:
-                categories = get_categories_from_registry()
-                total_models = len(get_models_sync())
-                tutorial_text = (
-                    f'📖 <b>ШАГ 2: Как выбрать модель?</b>\n\n'
-                    f'━━━━━━━━━━━━━━━━━━━━\n\n'
-                    f'🎯 <b>У нас {total_models} моделей в {len(categories)} категориях:</b>\n\n'
-                    f'🖼️ <b>Изображения</b>\n'
-                    f'• free tools (FAST TOOLS) — 5 раз в день\n'
-                    f'• Nano Banana Pro - качество 2K/4K\n'
-                    f'• Imagen 4 Ultra - новейшая от Google\n\n'
-                    f'🎬 <b>Видео</b>\n'
-                    f'• Sora 2 - реалистичные видео\n'
-                    f'• Grok Imagine - мультимодальная модель\n\n'
-                    f'💡 <b>Совет:</b> Начните с бесплатных моделей - это бесплатно!'
-                )
+            # Handle payment screenshots viewing
+            if data == "view_payment_screenshots":
+                await query.answer()
                 
-                keyboard = [
-                    [InlineKeyboardButton("▶️ Далее", callback_data="tutorial_step3")],
-                    [InlineKeyboardButton("◀️ Назад", callback_data="tutorial_step1")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]
-                ]
+                # Get all payments with screenshots
+                payments = get_all_payments()
+                payments_with_screenshots = [p for p in payments if p.get('screenshot_file_id')]
                 
-                try:
+                if not payments_with_screenshots:
                     await query.edit_message_text(
-                        tutorial_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        "📸 <b>Скриншоты платежей</b>\n\n"
+                        "Нет платежей со скриншотами.",
                         parse_mode='HTML'
                     )
-                except Exception as edit_error:
-                    logger.warning(f"Could not edit message in tutorial_step2: {edit_error}, sending new message")
-                    try:
-                        await query.message.reply_text(
-                            tutorial_text,
-                            reply_markup=InlineKeyboardMarkup(keyboard),
-                            parse_mode='HTML'
-                        )
-                        try:
-                            await query.message.delete()
-                        except:
-                            pass
-                    except Exception as send_error:
-                        logger.error(f"Could not send new message in tutorial_step2: {send_error}", exc_info=True)
-                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
+                    return ConversationHandler.END
                 
+                # Show first payment screenshot
+                first_payment = payments_with_screenshots[0]
+                payment_index = 0
+                
+                # Store current index in context for navigation
+                context.user_data['payment_screenshot_index'] = 0
+                context.user_data['payment_screenshots_list'] = [p.get('id') for p in payments_with_screenshots]
+                
+                await show_payment_screenshot(query, first_payment, payment_index, len(payments_with_screenshots))
                 return ConversationHandler.END
-            except Exception as e:
-                logger.error(f"Error in tutorial_step2: {e}", exc_info=True)
-                try:
-                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
-                except:
-                    pass
-                return ConversationHandler.END
-        
-        if data == "tutorial_step3":
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except:
-                pass
             
-            try:
-                tutorial_text = (
-                    '📖 <b>ШАГ 3: Как создать контент?</b>\n\n'
-                    '━━━━━━━━━━━━━━━━━━━━\n\n'
-                    '📝 <b>Простой процесс:</b>\n\n'
-                    '1️⃣ Нажмите "📋 Все модели"\n'
-                    '2️⃣ Выберите модель из бесплатных моделей\n'
-                    '3️⃣ Введите описание (промпт)\n'
-                    '   Пример: "Красивый закат над океаном"\n'
-                    '4️⃣ Выберите параметры (размер, стиль и т.д.)\n'
-                    '5️⃣ Нажмите "✅ Генерировать"\n'
-                    '6️⃣ Подождите 10-60 секунд\n'
-                    '7️⃣ Получите результат! 🎉\n\n'
-                    '💡 <b>Совет:</b> Чем подробнее описание, тем лучше результат!'
-                )
+            # Handle navigation between payment screenshots
+            if data.startswith("payment_screenshot_nav:"):
+                await query.answer()
                 
-                keyboard = [
-                    [InlineKeyboardButton("▶️ Далее", callback_data="tutorial_step4")],
-                    [InlineKeyboardButton("◀️ Назад", callback_data="tutorial_step2")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]
-                ]
+                parts = data.split(":", 1)
+                if len(parts) < 2:
+                    await query.answer("Ошибка навигации", show_alert=True)
+                    return ConversationHandler.END
                 
-                try:
-                    await query.edit_message_text(
-                        tutorial_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                except Exception as edit_error:
-                    logger.warning(f"Could not edit message in tutorial_step3: {edit_error}, sending new message")
-                    try:
-                        await query.message.reply_text(
-                            tutorial_text,
-                            reply_markup=InlineKeyboardMarkup(keyboard),
-                            parse_mode='HTML'
-                        )
-                        try:
-                            await query.message.delete()
-                        except:
-                            pass
-                    except Exception as send_error:
-                        logger.error(f"Could not send new message in tutorial_step3: {send_error}", exc_info=True)
-                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
+                direction = parts[1]  # "prev" or "next"
+                current_index = context.user_data.get('payment_screenshot_index', 0)
+                payment_ids = context.user_data.get('payment_screenshots_list', [])
+                
+                if not payment_ids:
+                    await query.answer("Список платежей не найден", show_alert=True)
+                    return ConversationHandler.END
+                
+                # Navigate
+                if direction == "prev":
+                    current_index = (current_index - 1) % len(payment_ids)
+                elif direction == "next":
+                    current_index = (current_index + 1) % len(payment_ids)
+                else:
+                    await query.answer("Неверное направление", show_alert=True)
+                    return ConversationHandler.END
+                
+                context.user_data['payment_screenshot_index'] = current_index
                 
+                # Get payment by ID
+                payment_id = payment_ids[current_index]
+                payments = get_all_payments()
+                payment = next((p for p in payments if p.get('id') == payment_id), None)
+                
+                if not payment:
+                    await query.answer("Платеж не найден", show_alert=True)
+                    return ConversationHandler.END
+                
+                await show_payment_screenshot(query, payment, current_index, len(payment_ids))
                 return ConversationHandler.END
-            except Exception as e:
-                logger.error(f"Error in tutorial_step3: {e}", exc_info=True)
-                try:
-                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
-                except:
-                    pass
+            
+            # Handle back to payments list
+            if data == "admin_payments_back":
+                await query.answer()
+                await show_admin_payments(query, context, is_callback=True)
                 return ConversationHandler.END
         
-        if data == "tutorial_step4":
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except:
-                pass
+        # Handle admin view all generations
+        if data == "admin_view_generations":
+            # Check admin access
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору." if get_user_language(user_id) == 'ru' else "This function is available only to administrator.")
+                return ConversationHandler.END
             
-            try:
-                remaining_free = await get_user_free_generations_remaining(user_id)
-                tutorial_text = (
-                    '📖 <b>ШАГ 4: Баланс и оплата</b>\n\n'
-                    '━━━━━━━━━━━━━━━━━━━━\n\n'
-                    '💰 <b>Как это работает:</b>\n\n'
-                    '🎁 <b>Бесплатно:</b>\n'
-                    f'• {remaining_free if remaining_free > 0 else FREE_GENERATIONS_PER_DAY} бесплатных генераций в день\n'
-                    f'• Пригласите друга - получите оба +{REFERRAL_BONUS_GENERATIONS} генераций в free tools!\n\n'
-                    '💳 <b>Пополнение баланса:</b>\n'
-                    '• Минимальная сумма: 50 ₽\n'
-                    '• Быстрый выбор: 50, 100, 150 ₽\n'
-                    '• Или укажите свою сумму\n'
-                    '• Оплата через СБП (Система быстрых платежей)\n\n'
-                    '💡 <b>Совет:</b> Начните с бесплатных генераций!'
-                )
+            await query.answer()
+            user_lang = get_user_language(user_id)
+            
+            # Load all generations from all users
+            history = load_json_file(GENERATIONS_HISTORY_FILE, {})
+            
+            if not history:
+                if user_lang == 'ru':
+                    message_text = (
+                        "📚 <b>Просмотр генераций</b>\n\n"
+                        "❌ В системе пока нет сохраненных генераций.\n\n"
+                        "💡 Генерации пользователей будут отображаться здесь после их создания."
+                    )
+                else:
+                    message_text = (
+                        "📚 <b>View Generations</b>\n\n"
+                        "❌ No saved generations in the system yet.\n\n"
+                        "💡 User generations will appear here after they are created."
+                    )
                 
                 keyboard = [
-                    [InlineKeyboardButton("▶️ Завершить", callback_data="tutorial_complete")],
-                    [InlineKeyboardButton("◀️ Назад", callback_data="tutorial_step3")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]
+                    [InlineKeyboardButton(t('btn_back_to_admin', lang=user_lang), callback_data="admin_stats")]
                 ]
-                
+                await query.edit_message_text(
+                    message_text,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML'
+                )
+                return ConversationHandler.END
+            
+            # Collect all generations with user info
+            all_generations = []
+            for user_key, user_history in history.items():
                 try:
-                    await query.edit_message_text(
-                        tutorial_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
+                    user_id_int = int(user_key) if user_key.isdigit() else None
+                    if user_id_int:
+                        for gen in user_history:
+                            gen_with_user = gen.copy()
+                            gen_with_user['user_id'] = user_id_int
+                            all_generations.append(gen_with_user)
+                except (ValueError, TypeError):
+                    continue
+            
+            # Sort by timestamp (newest first)
+            all_generations.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
+            
+            if not all_generations:
+                if user_lang == 'ru':
+                    message_text = (
+                        "📚 <b>Просмотр генераций</b>\n\n"
+                        "❌ Не найдено генераций для отображения."
+                    )
+                else:
+                    message_text = (
+                        "📚 <b>View Generations</b>\n\n"
+                        "❌ No generations found to display."
                     )
-                except Exception as edit_error:
-                    logger.warning(f"Could not edit message in tutorial_step4: {edit_error}, sending new message")
-                    try:
-                        await query.message.reply_text(
-                            tutorial_text,
-                            reply_markup=InlineKeyboardMarkup(keyboard),
-                            parse_mode='HTML'
-                        )
-                        try:
-                            await query.message.delete()
-                        except:
-                            pass
-                    except Exception as send_error:
-                        logger.error(f"Could not send new message in tutorial_step4: {send_error}", exc_info=True)
-                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
                 
+                keyboard = [
+                    [InlineKeyboardButton(t('btn_back_to_admin', lang=user_lang), callback_data="admin_stats")]
+                ]
+                await query.edit_message_text(
+                    message_text,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML'
+                )
+                return ConversationHandler.END
+            
+            # Store in context for navigation
+            context.user_data['admin_generations_list'] = all_generations
+            context.user_data['admin_generation_index'] = 0
+            
+            # Show first generation
+            await show_admin_generation(query, context, all_generations[0], 0, len(all_generations))
+            return ConversationHandler.END
+        
+        # Handle admin generation navigation
+        if data.startswith("admin_gen_nav:"):
+            if not is_admin(user_id):
+                await query.answer("Доступ запрещен", show_alert=True)
                 return ConversationHandler.END
-            except Exception as e:
-                logger.error(f"Error in tutorial_step4: {e}", exc_info=True)
-                try:
-                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
-                except:
-                    pass
+            
+            await query.answer()
+            parts = data.split(":", 1)
+            if len(parts) < 2:
+                return ConversationHandler.END
+            
+            direction = parts[1]  # "prev" or "next"
+            all_generations = context.user_data.get('admin_generations_list', [])
+            current_index = context.user_data.get('admin_generation_index', 0)
+            
+            if not all_generations:
+                await query.answer("Список генераций не найден", show_alert=True)
+                return ConversationHandler.END
+            
+            # Navigate
+            if direction == "prev":
+                current_index = (current_index - 1) % len(all_generations)
+            elif direction == "next":
+                current_index = (current_index + 1) % len(all_generations)
+            else:
                 return ConversationHandler.END
+            
+            context.user_data['admin_generation_index'] = current_index
+            gen = all_generations[current_index]
+            
+            await show_admin_generation(query, context, gen, current_index, len(all_generations))
+            return ConversationHandler.END
         
-        if data == "tutorial_complete":
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except:
-                pass
+        # Handle admin view generation result
+        if data.startswith("admin_gen_view:"):
+            if not is_admin(user_id):
+                await query.answer("Доступ запрещен", show_alert=True)
+                return ConversationHandler.END
+            
+            await query.answer()
+            parts = data.split(":", 1)
+            if len(parts) < 2:
+                return ConversationHandler.END
             
             try:
-                tutorial_text = (
-                '🎉 <b>ТУТОРИАЛ ЗАВЕРШЕН!</b>\n\n'
-                '━━━━━━━━━━━━━━━━━━━━\n\n'
-                '✅ Теперь вы знаете:\n'
-                '• Что такое AI-генерация\n'
-                '• Как выбрать модель\n'
-                '• Как создать контент\n'
-                '• Как пополнить баланс\n\n'
-                '🚀 <b>Готовы начать?</b>\n\n'
-                '💡 <b>Рекомендация:</b>\n'
-                    'Начните с бесплатной генерации в бесплатных моделях!\n'
-                'Просто выберите модель и опишите, что хотите создать.'
-            )
+                gen_index = int(parts[1])
+            except (ValueError, TypeError):
+                return ConversationHandler.END
             
-                keyboard = [
-                    [InlineKeyboardButton("📋 Все модели", callback_data="all_models")],
-                    [InlineKeyboardButton("🆓 FAST TOOLS", callback_data="free_tools")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]
-                ]
-                
-                try:
-                    await query.edit_message_text(
-                        tutorial_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                except Exception as edit_error:
-                    logger.warning(f"Could not edit message in tutorial_complete: {edit_error}, sending new message")
-                    try:
-                        await query.message.reply_text(
-                            tutorial_text,
-                            reply_markup=InlineKeyboardMarkup(keyboard),
-                            parse_mode='HTML'
-                        )
-                        try:
-                            await query.message.delete()
-                        except:
-                            pass
-                    except Exception as send_error:
-                        logger.error(f"Could not send new message in tutorial_complete: {send_error}", exc_info=True)
-                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
-                
+            all_generations = context.user_data.get('admin_generations_list', [])
+            if gen_index < 0 or gen_index >= len(all_generations):
+                await query.answer("Генерация не найдена", show_alert=True)
                 return ConversationHandler.END
-            except Exception as e:
-                logger.error(f"Error in tutorial_complete: {e}", exc_info=True)
+            
+            gen = all_generations[gen_index]
+            result_urls = gen.get('result_urls', [])
+            
+            if not result_urls:
+                await query.answer("Результаты не найдены", show_alert=True)
+                return ConversationHandler.END
+            
+            # Send media
+            user_lang = get_user_language(user_id)
+            session_http = await get_http_client()
+            for i, url in enumerate(result_urls[:5]):
                 try:
-                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
-                except:
-                    pass
+                    async with session_http.get(url) as resp:
+                        if resp.status == 200:
+                            media_data = await resp.read()
+                            
+                            is_last = (i == len(result_urls[:5]) - 1)
+                            is_video = gen.get('model_id', '') in ['sora-2-text-to-video', 'sora-watermark-remover', 'kling-2.6/image-to-video', 'kling-2.6/text-to-video', 'kling/v2-5-turbo-text-to-video-pro', 'kling/v2-5-turbo-image-to-video-pro', 'wan/2-5-image-to-video', 'wan/2-5-text-to-video', 'wan/2-2-animate-move', 'wan/2-2-animate-replace', 'hailuo/02-text-to-video-pro', 'hailuo/02-image-to-video-pro', 'hailuo/02-text-to-video-standard', 'hailuo/02-image-to-video-standard']
+                            
+                            keyboard = []
+                            if is_last:
+                                keyboard = [
+                                    [InlineKeyboardButton(t('btn_back_to_list', lang=user_lang), callback_data="admin_view_generations")],
+                                    [InlineKeyboardButton(t('btn_back_to_admin', lang=user_lang), callback_data="admin_stats")]
+                                ]
+                            
+                            if is_video:
+                                video_file = io.BytesIO(media_data)
+                                video_file.name = f"generated_video_{i+1}.mp4"
+                                await context.bot.send_video(
+                                    chat_id=query.message.chat_id,
+                                    video=video_file,
+                                    reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
+                                )
+                            else:
+                                photo_file = io.BytesIO(media_data)
+                                photo_file.name = f"generated_image_{i+1}.png"
+                                await context.bot.send_photo(
+                                    chat_id=query.message.chat_id,
+                                    photo=photo_file,
+                                    reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
+                                )
+                except Exception as e:
+                    logger.error(f"Error sending admin generation result: {e}")
+            
+            await query.answer("✅ Результаты отправлены")
+            return ConversationHandler.END
+        
+        if data == "admin_settings":
+            # Check admin access
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору." if get_user_language(user_id) == 'ru' else "This function is available only to administrator.")
+                return ConversationHandler.END
+            
+            # Get user language
+            user_lang = get_user_language(user_id)
+            
+            # Get support contact info
+            support_telegram = os.getenv('SUPPORT_TELEGRAM', 'Не указано' if user_lang == 'ru' else 'Not specified')
+            
+            if user_lang == 'ru':
+                settings_text = (
+                    f'⚙️ <b>Настройки администратора:</b>\n\n'
+                    f'🔧 <b>Доступные функции:</b>\n\n'
+                    f'✅ Управление моделями\n'
+                    f'✅ Просмотр статистики\n'
+                    f'✅ Управление пользователями\n'
+                    f'✅ Настройки API\n\n'
+                    f'💡 <b>Команды:</b>\n'
+                    f'/models - Управление моделями\n'
+                    f'/balance - Проверка баланса\n'
+                    f'/search - Поиск в базе знаний\n'
+                    f'/add - Добавление знаний\n'
+                    f'/admin - Пользователи и ручные пополнения\n'
+                    f'/payments - Просмотр платежей\n'
+                    f'/block_user - Заблокировать пользователя\n'
+                    f'/unblock_user - Разблокировать пользователя\n'
+                    f'/user_balance - Баланс пользователя\n'
+                    f'/config_check - Проверка конфигурации\n\n'
+                    f'💬 <b>Настройки поддержки:</b>\n\n'
+                    f'💬 Telegram: {support_telegram if support_telegram != "Не указано" else "Не указано"}\n\n'
+                    f'💡 Для изменения настроек поддержки отредактируйте файл .env'
+                )
+            else:
+                settings_text = (
+                    f'⚙️ <b>Administrator Settings:</b>\n\n'
+                    f'🔧 <b>Available Functions:</b>\n\n'
+                    f'✅ Model Management\n'
+                    f'✅ View Statistics\n'
+                    f'✅ User Management\n'
+                    f'✅ API Settings\n\n'
+                    f'💡 <b>Commands:</b>\n'
+                    f'/models - Model Management\n'
+                    f'/balance - Check Balance\n'
+                    f'/search - Search Knowledge Base\n'
+                    f'/add - Add Knowledge\n'
+                    f'/admin - User overview and manual top-ups\n'
+                    f'/payments - View Payments\n'
+                    f'/block_user - Block User\n'
+                    f'/unblock_user - Unblock User\n'
+                    f'/user_balance - User Balance\n'
+                    f'/config_check - Config Check\n\n'
+                    f'💬 <b>Support Settings:</b>\n\n'
+                    f'💬 Telegram: {support_telegram if support_telegram != "Not specified" else "Not specified"}\n\n'
+                    f'💡 To change support settings, edit the .env file'
+                )
+            
+            # Get current exchange rate
+            current_rate = get_usd_to_rub_rate()
+            
+            if user_lang == 'ru':
+                settings_text += f'\n💱 <b>Курс валюты:</b>\n'
+                settings_text += f'1 USD = {current_rate:.2f} RUB\n\n'
+                keyboard = [
+                    [InlineKeyboardButton("💱 Установить курс валюты", callback_data="admin_set_currency_rate")],
+                    [InlineKeyboardButton("🧩 Проверка конфигурации", callback_data="admin_config_check")],
+                    [InlineKeyboardButton("📢 Рассылка", callback_data="admin_broadcast")],
+                    [InlineKeyboardButton("🎁 Промокоды", callback_data="admin_promocodes")],
+                    [InlineKeyboardButton("◀️ Назад", callback_data="admin_back_to_admin")]
+                ]
+            else:
+                settings_text += f'\n💱 <b>Exchange Rate:</b>\n'
+                settings_text += f'1 USD = {current_rate:.2f} RUB\n\n'
+                keyboard = [
+                    [InlineKeyboardButton("💱 Set Exchange Rate", callback_data="admin_set_currency_rate")],
+                    [InlineKeyboardButton("🧩 Config Check", callback_data="admin_config_check")],
+                    [InlineKeyboardButton("📢 Broadcast", callback_data="admin_broadcast")],
+                    [InlineKeyboardButton("🎁 Promocodes", callback_data="admin_promocodes")],
+                    [InlineKeyboardButton("◀️ Back", callback_data="admin_back_to_admin")]
+                ]
+            
+            await query.edit_message_text(
+                settings_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
+            return ConversationHandler.END
+
+        if data == "admin_config_check":
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
                 return ConversationHandler.END
+
+            from app.config_env import build_config_self_check_report
+
+            report = build_config_self_check_report()
+            user_lang = get_user_language(user_id)
+            back_label = "◀️ Назад" if user_lang == "ru" else "◀️ Back"
+            keyboard = [[InlineKeyboardButton(back_label, callback_data="admin_settings")]]
+            await query.edit_message_text(
+                report,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode="HTML",
+            )
+            return ConversationHandler.END
         
-        if data == "help_menu":
-            # Answer callback immediately to show button was pressed
-            try:
-                await query.answer()
-            except:
-                pass
+        if data == "admin_promocodes":
+            # Check admin access
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
+                return ConversationHandler.END
             
-            # Get user language
-            user_lang = get_user_language(user_id)
-            is_new = await is_new_user_async(user_id)
+            # Show promocodes menu
+            promocodes = load_promocodes()
+            active_promo = get_active_promocode()
             
-            if is_new:
-                if user_lang == 'ru':
-                    help_text = (
-                        '📋 <b>ПОМОЩЬ ДЛЯ НОВЫХ ПОЛЬЗОВАТЕЛЕЙ</b>\n\n'
-                        '━━━━━━━━━━━━━━━━━━━━\n\n'
-                        '👋 <b>Добро пожаловать!</b>\n\n'
-                        '🎯 <b>Быстрый старт:</b>\n'
-                        '1. Нажмите "📋 Все модели"\n'
-                        '2. Выберите "🆓 FAST TOOLS" (это бесплатно!)\n'
-                        '3. Введите описание, например: "Кот в космосе"\n'
-                        '4. Нажмите "✅ Генерировать"\n'
-                        '5. Получите результат через 10-30 секунд!\n\n'
-                        '━━━━━━━━━━━━━━━━━━━━\n\n'
-                        '💡 <b>Полезные команды:</b>\n'
-                        '/start - Главное меню\n'
-                        '/models - Показать все модели\n'
-                        '/balance - Проверить баланс\n'
-                        '/help - Эта справка\n\n'
-                        '❓ <b>Нужна помощь?</b>\n'
-                        'Нажмите "❓ Как это работает?" для интерактивного туториала!'
-                    )
-                else:
-                    help_text = (
-                        '📋 <b>HELP FOR NEW USERS</b>\n\n'
-                        '━━━━━━━━━━━━━━━━━━━━\n\n'
-                        '👋 <b>Welcome!</b>\n\n'
-                        '🎯 <b>Quick Start:</b>\n'
-                        '1. Click "📋 All Models"\n'
-                        '2. Select "🆓 FAST TOOLS" (it\'s free!)\n'
-                        '3. Enter description, e.g.: "Cat in space"\n'
-                        '4. Click "✅ Generate"\n'
-                        '5. Get result in 10-30 seconds!\n\n'
-                        '━━━━━━━━━━━━━━━━━━━━\n\n'
-                        '💡 <b>Useful Commands:</b>\n'
-                        '/start - Main menu\n'
-                        '/models - Show all models\n'
-                        '/balance - Check balance\n'
-                        '/help - This help\n\n'
-                        '❓ <b>Need help?</b>\n'
-                        'Click "❓ How it works?" for interactive tutorial!'
-                    )
-            else:
-                if user_lang == 'ru':
-                    help_text = (
-                        '📋 <b>ДОСТУПНЫЕ КОМАНДЫ</b>\n\n'
-                        '━━━━━━━━━━━━━━━━━━━━\n\n'
-                        '🔹 <b>Основные:</b>\n'
-                        '/start - Главное меню\n'
-                        '/models - Показать модели\n'
-                        '/balance - Проверить баланс\n'
-                        '/generate - Начать генерацию\n'
-                        '/help - Справка\n\n'
-                    )
-                else:
-                    help_text = (
-                        '📋 <b>AVAILABLE COMMANDS</b>\n\n'
-                        '━━━━━━━━━━━━━━━━━━━━\n\n'
-                        '🔹 <b>Main:</b>\n'
-                        '/start - Main menu\n'
-                        '/models - Show models\n'
-                        '/balance - Check balance\n'
-                        '/generate - Start generation\n'
-                        '/help - Help\n\n'
-                    )
-                
-                if get_is_admin(user_id):
-                    if user_lang == 'ru':
-                        help_text += (
-                            '👑 <b>Административные:</b>\n'
-                            '/search - Поиск в базе знаний\n'
-                            '/add - Добавление знаний\n'
-                            '/admin - Пользователи и ручные пополнения\n'
-                            '/payments - Просмотр платежей\n'
-                            '/block_user - Заблокировать пользователя\n'
-                            '/unblock_user - Разблокировать пользователя\n'
-                            '/user_balance - Баланс пользователя\n\n'
-                        )
-                    else:
-                        help_text += (
-                            '👑 <b>Administrative:</b>\n'
-                            '/search - Search knowledge base\n'
-                            '/add - Add knowledge\n'
-                            '/admin - User overview and manual top-ups\n'
-                            '/payments - View payments\n'
-                            '/block_user - Block user\n'
-                            '/unblock_user - Unblock user\n'
-                            '/user_balance - User balance\n\n'
-                        )
+            promocodes_text = "🎁 <b>Управление промокодами</b>\n\n"
+            
+            if active_promo:
+                promo_code = active_promo.get('code', 'N/A')
+                promo_value = active_promo.get('value', 0)
+                promo_expires = active_promo.get('expires', 'N/A')
+                promo_used = active_promo.get('used_count', 0)
                 
-                if user_lang == 'ru':
-                    help_text += (
-                        '💡 <b>Как использовать:</b>\n'
-                        '1. Выберите модель из меню\n'
-                        '2. Введите промпт (описание)\n'
-                        '3. Выберите параметры через кнопки\n'
-                        '4. Подтвердите генерацию\n'
-                        '5. Получите результат!\n\n'
-                        '📚 <b>Полезные функции:</b>\n'
-                        '• "📚 Мои генерации" - просмотр истории\n'
-                        '• "🔄 Повторить" - создать с теми же параметрами\n'
-                        '• "💳 Пополнить" - пополнение баланса'
-                    )
-                else:
-                    help_text += (
-                        '💡 <b>How to use:</b>\n'
-                        '1. Select model from menu\n'
-                        '2. Enter prompt (description)\n'
-                        '3. Select parameters via buttons\n'
-                        '4. Confirm generation\n'
-                        '5. Get result!\n\n'
-                        '📚 <b>Useful features:</b>\n'
-                        '• "📚 My generations" - view history\n'
-                        '• "🔄 Repeat" - create with same parameters\n'
-                        '• "💳 Top up" - top up balance'
-                    )
+                promocodes_text += (
+                    f"✅ <b>Активный промокод:</b>\n"
+                    f"🔑 <b>Код:</b> <code>{promo_code}</code>\n"
+                    f"💰 <b>Значение:</b> {promo_value} ₽\n"
+                    f"📅 <b>Действителен до:</b> {promo_expires}\n"
+                    f"👥 <b>Использовано раз:</b> {promo_used}\n\n"
+                )
+            else:
+                promocodes_text += "❌ <b>Нет активного промокода</b>\n\n"
             
-            keyboard = []
-            if is_new:
-                if user_lang == 'ru':
-                    keyboard.append([InlineKeyboardButton("❓ Как это работает?", callback_data="tutorial_start")])
-                else:
-                    keyboard.append([InlineKeyboardButton("❓ How it works?", callback_data="tutorial_start")])
-            if user_lang == 'ru':
-                keyboard.append([
-                    InlineKeyboardButton("🎁 Колесо удачи", callback_data="claim_gift"),
-                    InlineKeyboardButton(t('btn_copy_bot', lang=user_lang), callback_data="copy_bot")
-                ])
-                keyboard.append([
-                    InlineKeyboardButton("🇷🇺 Русский", callback_data="set_language:ru"),
-                    InlineKeyboardButton("🇺🇸 English", callback_data="set_language:en")
-                ])
+            # Show all promocodes
+            if promocodes:
+                promocodes_text += f"📋 <b>Все промокоды ({len(promocodes)}):</b>\n\n"
+                for i, promo in enumerate(promocodes, 1):
+                    promo_code = promo.get('code', 'N/A')
+                    promo_value = promo.get('value', 0)
+                    promo_expires = promo.get('expires', 'N/A')
+                    promo_used = promo.get('used_count', 0)
+                    is_active = promo.get('active', False)
+                    
+                    status = "✅ Активен" if is_active else "❌ Неактивен"
+                    
+                    promocodes_text += (
+                        f"{i}. <b>{status}</b>\n"
+                        f"   🔑 <code>{promo_code}</code>\n"
+                        f"   💰 {promo_value} ₽ | 👥 {promo_used} использований\n"
+                        f"   📅 До: {promo_expires}\n\n"
+                    )
             else:
-                keyboard.append([
-                    InlineKeyboardButton("🎁 Wheel of Fortune", callback_data="claim_gift"),
-                    InlineKeyboardButton(t('btn_copy_bot', lang=user_lang), callback_data="copy_bot")
-                ])
-                keyboard.append([
-                    InlineKeyboardButton("🇷🇺 Russian", callback_data="set_language:ru"),
-                    InlineKeyboardButton("🇺🇸 English", callback_data="set_language:en")
-                ])
-            keyboard.append([
-                InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")
-            ])
+                promocodes_text += "📋 <b>Нет созданных промокодов</b>\n\n"
             
-            try:
-                await query.edit_message_text(
-                    help_text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
-            except Exception as e:
-                logger.error(f"Error editing message in help_menu: {e}", exc_info=True)
-                try:
-                    await query.message.reply_text(
-                        help_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
+            promocodes_text += "💡 <b>Доступные действия:</b>\n"
+            promocodes_text += "• Просмотр всех промокодов\n"
+            promocodes_text += "• Информация об активном промокоде\n"
+            
+            keyboard = [
+                [InlineKeyboardButton("🔄 Обновить", callback_data="admin_promocodes")],
+                [InlineKeyboardButton("◀️ Назад", callback_data="admin_settings")]
+            ]
+            
+            await query.edit_message_text(
+                promocodes_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
+            return ConversationHandler.END
+        
+        if data == "admin_broadcast":
+            # Check admin access
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
+                return ConversationHandler.END
+            
+            # Show broadcast menu
+            broadcasts = get_broadcasts()
+            total_users = len(get_all_users())
+            
+            broadcast_text = "📢 <b>Рассылка сообщений</b>\n\n"
+            broadcast_text += f"👥 <b>Всего пользователей:</b> {total_users}\n\n"
+            
+            if broadcasts:
+                broadcast_text += f"📋 <b>История рассылок ({len(broadcasts)}):</b>\n\n"
+                # Show last 5 broadcasts
+                sorted_broadcasts = sorted(
+                    broadcasts.items(),
+                    key=lambda x: x[1].get('created_at', 0),
+                    reverse=True
+                )[:5]
+                
+                for broadcast_id, broadcast in sorted_broadcasts:
+                    created_at = broadcast.get('created_at', 0)
+                    sent = broadcast.get('sent', 0)
+                    delivered = broadcast.get('delivered', 0)
+                    failed = broadcast.get('failed', 0)
+                    message_preview = broadcast.get('message', '')[:30] + '...' if len(broadcast.get('message', '')) > 30 else broadcast.get('message', '')
+                    
+                    from datetime import datetime
+                    if created_at:
+                        date_str = datetime.fromtimestamp(created_at).strftime('%Y-%m-%d %H:%M')
+                    else:
+                        date_str = 'N/A'
+                    
+                    broadcast_text += (
+                        f"📨 <b>#{broadcast_id}</b> ({date_str})\n"
+                        f"   📝 {message_preview}\n"
+                        f"   ✅ Отправлено: {sent} | 📬 Доставлено: {delivered} | ❌ Ошибок: {failed}\n\n"
                     )
-                except:
-                    pass
+            else:
+                broadcast_text += "📋 <b>Нет истории рассылок</b>\n\n"
+            
+            broadcast_text += "💡 <b>Создать новую рассылку:</b>\n"
+            broadcast_text += "Нажмите кнопку ниже и отправьте сообщение для рассылки."
+            
+            keyboard = [
+                [InlineKeyboardButton("📢 Создать рассылку", callback_data="admin_create_broadcast")],
+                [InlineKeyboardButton("📊 Статистика", callback_data="admin_broadcast_stats")],
+                [InlineKeyboardButton("◀️ Назад", callback_data="admin_settings")]
+            ]
+            
+            await query.edit_message_text(
+                broadcast_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
             return ConversationHandler.END
         
-        if data == "support_contact":
-            # Answer callback immediately to show button was pressed
-            try:
-                await query.answer()
-            except:
-                pass
+        if data == "admin_create_broadcast":
+            # Check admin access
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
+                return ConversationHandler.END
             
-            # Get user language
-            user_lang = get_user_language(user_id)
-            support_info = get_support_contact()
+            # Start broadcast creation
+            await query.edit_message_text(
+                "📢 <b>Создание рассылки</b>\n\n"
+                "Отправьте сообщение, которое хотите разослать всем пользователям.\n\n"
+                "💡 <b>Поддерживается:</b>\n"
+                "• Текст\n"
+                "• HTML форматирование\n"
+                "• Изображения\n\n"
+                "Или нажмите /cancel для отмены.",
+                parse_mode='HTML'
+            )
+            user_sessions[user_id] = {
+                'waiting_for': 'broadcast_message'
+            }
+            return WAITING_BROADCAST_MESSAGE
+        
+        if data == "admin_set_currency_rate":
+            # Check admin access
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
+                return ConversationHandler.END
             
-            # Translate support contact message if needed
-            if user_lang == 'en' and 'Поддержка' in support_info:
-                # If support info is in Russian but user wants English, add English header
-                support_info = (
-                    '💬 <b>SUPPORT</b>\n\n'
-                    '━━━━━━━━━━━━━━━━━━━━\n\n'
-                    'If you have any questions or need help, please contact our support team:\n\n'
-                    + support_info.replace('💬 <b>Поддержка</b>', '').replace('━━━━━━━━━━━━━━━━━━━━', '').strip()
-                )
+            # Get current exchange rate
+            current_rate = get_usd_to_rub_rate()
             
-            keyboard = [
-                [InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_menu")]
-            ]
+            currency_text = (
+                f'💱 <b>Установка курса валюты</b>\n\n'
+                f'📊 <b>Текущий курс:</b>\n'
+                f'1 USD = {current_rate:.2f} RUB\n\n'
+                f'💡 <b>Инструкция:</b>\n'
+                f'Отправьте новое значение курса валюты.\n'
+                f'Например: <code>100</code> (означает 1 USD = 100 RUB)\n\n'
+                f'⚠️ <b>Важно:</b>\n'
+                f'• Курс должен быть положительным числом\n'
+                f'• Используйте точку для десятичных значений (например: 95.5)\n'
+                f'• После установки все цены будут пересчитаны автоматически\n\n'
+                f'Для отмены нажмите /cancel'
+            )
             
-            try:
+            await query.edit_message_text(
+                currency_text,
+                parse_mode='HTML'
+            )
+            
+            # Set session to wait for currency rate
+            user_sessions[user_id] = {
+                'waiting_for': 'currency_rate'
+            }
+            return WAITING_CURRENCY_RATE
+        
+        if data == "admin_broadcast_stats":
+            # Check admin access
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
+                return ConversationHandler.END
+            
+            # Show detailed broadcast statistics
+            broadcasts = get_broadcasts()
+            total_users = len(get_all_users())
+            
+            if not broadcasts:
                 await query.edit_message_text(
-                    support_info,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    "📊 <b>Статистика рассылок</b>\n\n"
+                    "❌ Нет истории рассылок",
+                    reply_markup=InlineKeyboardMarkup([
+                        [InlineKeyboardButton("◀️ Назад", callback_data="admin_broadcast")]
+                    ]),
                     parse_mode='HTML'
                 )
-            except Exception as e:
-                logger.error(f"Error editing message in support_contact: {e}", exc_info=True)
-                try:
-                    await query.message.reply_text(
-                        support_info,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                except:
-                    pass
-            return ConversationHandler.END
-        
-        # Handle copy bot request
-        if data == "copy_bot":
-            # Answer callback immediately to show button was pressed
-            try:
-                await query.answer()
-            except:
-                pass
+                return ConversationHandler.END
             
-            # Get user language
-            user_lang = get_user_language(user_id)
+            # Calculate totals
+            total_sent = sum(b.get('sent', 0) for b in broadcasts.values())
+            total_delivered = sum(b.get('delivered', 0) for b in broadcasts.values())
+            total_failed = sum(b.get('failed', 0) for b in broadcasts.values())
             
-            # Create admin link
-            admin_link = f"tg://user?id={ADMIN_ID}"
+            stats_text = (
+                f"📊 <b>Статистика рассылок</b>\n\n"
+                f"👥 <b>Всего пользователей:</b> {total_users}\n"
+                f"📨 <b>Всего рассылок:</b> {len(broadcasts)}\n\n"
+                f"📈 <b>Общая статистика:</b>\n"
+                f"✅ Отправлено: {total_sent}\n"
+                f"📬 Доставлено: {total_delivered}\n"
+                f"❌ Ошибок: {total_failed}\n\n"
+            )
             
-            # Create message with admin link
-            if user_lang == 'ru':
-                copy_message = (
-                    f"{t('msg_copy_bot_title', lang=user_lang)}\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"{t('msg_copy_bot_description', lang=user_lang)}\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"👨‍💻 <a href=\"{admin_link}\">Связаться с администратором</a>"
-                )
-            else:
-                copy_message = (
-                    f"{t('msg_copy_bot_title', lang=user_lang)}\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"{t('msg_copy_bot_description', lang=user_lang)}\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"👨‍💻 <a href=\"{admin_link}\">Contact Administrator</a>"
+            if total_sent > 0:
+                success_rate = (total_delivered / total_sent) * 100
+                stats_text += f"📊 <b>Успешность доставки:</b> {success_rate:.1f}%\n"
+            
+            from app.services.broadcast_service import active_progress
+
+            for progress in active_progress():
+                eta = progress['eta_seconds']
+                stats_text += (
+                    f"\n⏳ <b>Идёт рассылка #{progress['broadcast_id']}:</b> "
+                    f"{progress['processed']}/{progress['total']}\n"
+                    f"📬 Доставлено: {progress['delivered']} | ❌ Ошибок: {progress['failed']} | "
+                    f"🚫 Недоступны: {progress['unreachable']}\n"
+                    f"⚡ {progress['rate_per_sec']} сообщ./с"
+                    + (f", осталось ~{int(eta // 60)} мин {int(eta % 60)} с" if eta is not None else "")
+                    + "\n"
                 )
             
             keyboard = [
-                [InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")]
+                [InlineKeyboardButton("🔄 Обновить", callback_data="admin_broadcast_stats")],
+                [InlineKeyboardButton("◀️ Назад", callback_data="admin_broadcast")]
             ]
             
-            try:
-                await query.edit_message_text(
-                    copy_message,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML',
-                    disable_web_page_preview=False
-                )
-            except Exception as e:
-                logger.error(f"Error editing message in copy_bot: {e}", exc_info=True)
-                try:
-                    await query.message.reply_text(
-                        copy_message,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML',
-                        disable_web_page_preview=False
-                    )
-                except:
-                    pass
+            await query.edit_message_text(
+                stats_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
             return ConversationHandler.END
         
-        if data == "referral_info":
-            return await handle_referral_info(update, context)
+        if data == "admin_search":
+            # Check admin access
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
+                return ConversationHandler.END
+            
+            await query.edit_message_text(
+                '🔍 <b>Поиск в базе знаний</b>\n\n'
+                'Используйте команду:\n'
+                '<code>/search [запрос]</code>\n\n'
+                'Пример:\n'
+                '<code>/search нейросети</code>',
+                parse_mode='HTML'
+            )
+            return ConversationHandler.END
+        
+        if data == "admin_add":
+            # Check admin access
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
+                return ConversationHandler.END
+            
+            await query.edit_message_text(
+                '📝 <b>Добавление знаний</b>\n\n'
+                'Используйте команду:\n'
+                '<code>/add [заголовок] | [содержание]</code>\n\n'
+                'Пример:\n'
+                '<code>/add AI | Искусственный интеллект - это...</code>',
+                parse_mode='HTML'
+            )
+            return ConversationHandler.END
+        
+        if data == "admin_test_ocr":
+            # Check admin access
+            if not is_admin(user_id):
+                await query.answer("Эта функция доступна только администратору.")
+                return ConversationHandler.END
+            
+            if not OCR_AVAILABLE or not PIL_AVAILABLE:
+                await query.edit_message_text(
+                    '❌ <b>OCR недоступен</b>\n\n'
+                    'Tesseract OCR не установлен или библиотеки не найдены.\n\n'
+                    'Установите:\n'
+                    '1. pip install Pillow pytesseract\n'
+                    '2. Tesseract OCR (см. TESSERACT_INSTALL.txt)',
+                    parse_mode='HTML'
+                )
+                return ConversationHandler.END
+            
+            await query.edit_message_text(
+                '🧪 <b>Тест OCR</b>\n\n'
+                'Отправьте изображение со скриншотом платежа.\n\n'
+                'Система проверит:\n'
+                '✅ Распознавание текста\n'
+                '✅ Поиск сумм\n'
+                '✅ Работа Tesseract OCR\n\n'
+                'Или нажмите /cancel для отмены.',
+                parse_mode='HTML'
+            )
+            user_sessions[user_id] = {
+                'waiting_for': 'admin_test_ocr'
+            }
+            return ADMIN_TEST_OCR
         
-        if data == "my_generations":
-            # Answer callback immediately to show button was pressed
+        if data == "tutorial_start":
+            # Answer callback immediately
             try:
                 await query.answer()
             except:
                 pass
             
-            # Show user's generation history
-            history = get_user_generations_history(user_id, limit=20)
-            
-            # Debug: log history loading
-            logger.info(f"Loading history for user {user_id}: found {len(history)} generations")
-            
-            # Check if file exists and show helpful message
-            if not history:
-                user_lang = get_user_language(user_id)
-                from app.config import get_settings
-
-                storage_is_db = get_settings().get_storage_mode() == "db"
-                file_exists = False
-                
-                # Load full history to check if there are any users at all
-                full_history = {}
-                total_users = 0
-                if not storage_is_db:
-                    file_exists = os.path.exists(GENERATIONS_HISTORY_FILE)
-                if file_exists and not storage_is_db:
-                    try:
-                        full_history = load_json_file(GENERATIONS_HISTORY_FILE, {})
-                        total_users = len(full_history)
-                        logger.info(f"History file exists with {total_users} users. Checking for user {user_id}...")
-                    except Exception as e:
-                        logger.error(f"Error loading history file: {e}", exc_info=True)
-                
-                if user_lang == 'ru':
-                    message_text = (
-                        "📚 <b>Мои генерации</b>\n\n"
-                        "❌ У вас пока нет сохраненных генераций.\n\n"
-                    )
-                    if not storage_is_db and not file_exists:
-                        message_text += (
-                            "⚠️ <b>Примечание:</b> Файл истории не найден.\n"
-                            "Это может произойти после обновления бота.\n\n"
-                        )
-                    elif not storage_is_db and total_users > 0:
-                        message_text += (
-                            f"ℹ️ В системе сохранено {total_users} пользователей с историей.\n"
-                            f"Если вы создавали генерации ранее, они должны отображаться.\n\n"
-                        )
-                    message_text += "💡 После создания контента все ваши работы будут сохранены здесь."
-                else:
-                    message_text = (
-                        "📚 <b>My Generations</b>\n\n"
-                        "❌ You don't have any saved generations yet.\n\n"
-                    )
-                    if not storage_is_db and not file_exists:
-                        message_text += (
-                            "⚠️ <b>Note:</b> History file not found.\n"
-                            "This may happen after bot update.\n\n"
-                        )
-                    elif not storage_is_db and total_users > 0:
-                        message_text += (
-                            f"ℹ️ System has {total_users} users with history saved.\n"
-                            f"If you created generations before, they should appear.\n\n"
-                        )
-                    message_text += "💡 After creating content, all your works will be saved here."
-                
-                keyboard = [[InlineKeyboardButton("◀️ Назад в меню" if user_lang == 'ru' else "◀️ Back to menu", callback_data="back_to_menu")]]
-                try:
-                    await query.edit_message_text(
-                        message_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                except Exception as e:
-                    logger.error(f"Error editing message in my_generations (empty): {e}", exc_info=True)
-                    try:
-                        await query.message.reply_text(
-                            message_text,
-                            reply_markup=InlineKeyboardMarkup(keyboard),
-                            parse_mode='HTML'
-                        )
-                    except:
-                        pass
-                return ConversationHandler.END
-            
-            # Show first generation with navigation
             try:
-                from datetime import datetime
-                
-                gen = history[0]
-                timestamp = gen.get('timestamp', 0)
-                if timestamp:
-                    date_str = datetime.fromtimestamp(timestamp).strftime('%d.%m.%Y %H:%M')
-                else:
-                    date_str = 'Неизвестно'
-                
-                model_name = gen.get('model_name', gen.get('model_id', 'Unknown'))
-                result_urls = gen.get('result_urls', [])
-                price = gen.get('price', 0)
-                is_free = gen.get('is_free', False)
-                
-                user_lang = get_user_language(user_id)
-                
-                history_text = (
-                    f"📚 <b>Мои генерации</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"📊 <b>Всего:</b> {len(history)} генераций\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"🎨 <b>Генерация #{gen.get('id', 1)}</b>\n"
-                    f"📅 <b>Дата:</b> {date_str}\n"
-                    f"🤖 <b>Модель:</b> {model_name}\n"
-                    f"💰 <b>Стоимость:</b> {'🎁 Бесплатно' if is_free else format_rub_amount(price)}\n"
-                    f"📦 <b>Результатов:</b> {len(result_urls)}\n\n"
+                # Interactive tutorial for new users
+                tutorial_text = (
+                    '🎓 <b>ИНТЕРАКТИВНЫЙ ТУТОРИАЛ</b>\n\n'
+                    '━━━━━━━━━━━━━━━━━━━━\n\n'
+                    '👋 Добро пожаловать! Давайте разберемся, как пользоваться ботом.\n\n'
+                    '📚 <b>Что вы узнаете:</b>\n'
+                    '• Что такое AI-генерация\n'
+                    '• Как выбрать модель\n'
+                    '• Как создать контент\n'
+                    '• Как пополнить баланс\n\n'
+                    '💡 <b>Это займет 2 минуты!</b>'
                 )
                 
-                if len(history) > 1:
-                    history_text += f"💡 <b>Показана последняя генерация</b>\n"
-                    history_text += f"Используйте кнопки для навигации\n\n"
-                
-                keyboard = []
-                
-                # Navigation buttons if more than 1 generation
-                if len(history) > 1:
-                    keyboard.append([
-                        InlineKeyboardButton(t('btn_previous', lang=user_lang), callback_data=f"gen_history:{gen.get('id', 1)}:prev"),
-                        InlineKeyboardButton(t('btn_next', lang=user_lang), callback_data=f"gen_history:{gen.get('id', 1)}:next")
-                    ])
-                
-                # Action buttons
-                if result_urls:
-                    keyboard.append([
-                        InlineKeyboardButton("👁️ Показать результат", callback_data=f"gen_view:{gen.get('id', 1)}")
-                    ])
-                    keyboard.append([
-                        InlineKeyboardButton("🔄 Повторить", callback_data=f"gen_repeat:{gen.get('id', 1)}")
-                    ])
-                
-                keyboard.append([InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")])
+                keyboard = [
+                    [InlineKeyboardButton("▶️ Начать туториал", callback_data="tutorial_step1")],
+                    [InlineKeyboardButton("⏭️ Пропустить", callback_data="back_to_menu")]
+                ]
                 
                 try:
                     await query.edit_message_text(
-                        history_text,
+                        tutorial_text,
                         reply_markup=InlineKeyboardMarkup(keyboard),
                         parse_mode='HTML'
                     )
-                except Exception as e:
-                    logger.error(f"Error editing message in my_generations: {e}", exc_info=True)
+                except Exception as edit_error:
+                    logger.warning(f"Could not edit message in tutorial_start: {edit_error}, sending new message")
                     try:
                         await query.message.reply_text(
-                            history_text,
+                            tutorial_text,
                             reply_markup=InlineKeyboardMarkup(keyboard),
                             parse_mode='HTML'
                         )
-                    except:
-                        pass
-            except Exception as e:
-                logger.error(f"Error in my_generations: {e}", exc_info=True)
-                try:
-                    await query.answer("❌ Ошибка при загрузке истории", show_alert=True)
-                except:
-                    pass
-            return ConversationHandler.END
-        
-        if data.startswith("gen_view:"):
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except:
-                pass
-            
-            # View specific generation result
-            parts = data.split(":", 1)
-            if len(parts) < 2:
-                try:
-                    await query.answer("Ошибка: неверный формат запроса", show_alert=True)
-                except:
-                    pass
-                return ConversationHandler.END
-            try:
-                gen_id = int(parts[1])
-            except (ValueError, TypeError):
-                try:
-                    await query.answer("Ошибка: неверный ID генерации", show_alert=True)
-                except:
-                    pass
-                return ConversationHandler.END
-            gen = get_generation_by_id(user_id, gen_id)
-            
-            if not gen:
-                try:
-                    await query.answer("❌ Генерация не найдена", show_alert=True)
-                except:
-                    pass
-                return ConversationHandler.END
-            
-            result_urls = gen.get('result_urls', [])
-            if not result_urls:
-                try:
-                    await query.answer("❌ Результаты не найдены", show_alert=True)
-                except:
-                    pass
-                return ConversationHandler.END
-            
-            user_lang = get_user_language(user_id)
-            
-            # Send media
-            try:
-                session_http = await get_http_client()
-                for i, url in enumerate(result_urls[:5]):
-                    try:
-                        async with session_http.get(url) as resp:
-                                if resp.status == 200:
-                                    media_data = await resp.read()
-                                    
-                                    is_last = (i == len(result_urls[:5]) - 1)
-                                    is_video = gen.get('model_id', '') in ['sora-2-text-to-video', 'sora-watermark-remover', 'kling-2.6/image-to-video', 'kling-2.6/text-to-video', 'kling/v2-5-turbo-text-to-video-pro', 'kling/v2-5-turbo-image-to-video-pro', 'wan/2-5-image-to-video', 'wan/2-5-text-to-video', 'wan/2-2-animate-move', 'wan/2-2-animate-replace', 'hailuo/02-text-to-video-pro', 'hailuo/02-image-to-video-pro', 'hailuo/02-text-to-video-standard', 'hailuo/02-image-to-video-standard']
-                                    
-                                    keyboard = []
-                                    if is_last:
-                                        keyboard = [
-                                            [InlineKeyboardButton(t('btn_back_to_history', lang=user_lang), callback_data="my_generations")],
-                                            [InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")]
-                                        ]
-                                    
-                                    if is_video:
-                                        video_file = io.BytesIO(media_data)
-                                        video_file.name = f"generated_video_{i+1}.mp4"
-                                        await context.bot.send_video(
-                                            chat_id=update.effective_chat.id,
-                                            video=video_file,
-                                            reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
-                                        )
-                                    else:
-                                        photo_file = io.BytesIO(media_data)
-                                        photo_file.name = f"generated_image_{i+1}.png"
-                                        await context.bot.send_photo(
-                                            chat_id=update.effective_chat.id,
-                                            photo=photo_file,
-                                            reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
-                                        )
-                    except Exception as e:
-                        logger.error(f"Error sending generation result (HTTP API call): {e}", exc_info=True)
+                        try:
+                            await query.message.delete()
+                        except:
+                            pass
+                    except Exception as send_error:
+                        logger.error(f"Could not send new message in tutorial_start: {send_error}", exc_info=True)
+                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
+                
+                return ConversationHandler.END
             except Exception as e:
-                logger.error(f"Error in gen_view API calls: {e}", exc_info=True)
+                logger.error(f"Error in tutorial_start: {e}", exc_info=True)
                 try:
-                    user_lang = get_user_language(user_id) if user_id else 'ru'
-                    error_msg = "Ошибка сервера, попробуйте позже" if user_lang == 'ru' else "Server error, please try later"
-                    await query.answer(error_msg, show_alert=True)
+                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
                 except:
                     pass
-            
-            try:
-                await query.answer("✅ Результаты отправлены")
-            except:
-                pass
-            return ConversationHandler.END
+                return ConversationHandler.END
         
-        if data.startswith("gen_repeat:"):
+        if data == "tutorial_step1":
             # Answer callback immediately
             try:
                 await query.answer()
             except:
                 pass
             
-            # Repeat generation with same parameters
-            parts = data.split(":", 1)
-            if len(parts) < 2:
+            try:
+                tutorial_text = (
+                    '📖 <b>ШАГ 1: Что такое AI-генерация?</b>\n\n'
+                    '━━━━━━━━━━━━━━━━━━━━\n\n'
+                    '🤖 <b>Искусственный интеллект</b> может создавать:\n\n'
+                    '🎨 <b>Изображения</b>\n'
+                    'Опишите картинку словами, и AI создаст её!\n'
+                    'Пример: "Кот в космосе, пиксель-арт"\n\n'
+                    '🎬 <b>Видео</b>\n'
+                    'Создавайте короткие видео из текста\n'
+                    'Пример: "Летящий дракон над городом"\n\n'
+                    '🖼️ <b>Улучшение качества</b>\n'
+                    'Увеличивайте разрешение фото в 4-8 раз\n\n'
+                    '💡 <b>Все это без VPN!</b> Прямой доступ к лучшим AI-моделям.'
+                )
+                
+                keyboard = [
+                    [InlineKeyboardButton("▶️ Далее", callback_data="tutorial_step2")],
+                    [InlineKeyboardButton("◀️ Назад", callback_data="tutorial_start")],
+                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]
+                ]
+                
                 try:
-                    await query.answer("Ошибка: неверный формат запроса", show_alert=True)
-                except:
-                    pass
+                    await query.edit_message_text(
+                        tutorial_text,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML'
+                    )
+                except Exception as edit_error:
+                    logger.warning(f"Could not edit message in tutorial_step1: {edit_error}, sending new message")
+                    try:
+                        await query.message.reply_text(
+                            tutorial_text,
+                            reply_markup=InlineKeyboardMarkup(keyboard),
+                            parse_mode='HTML'
+                        )
+                        try:
+                            await query.message.delete()
+                        except:
+                            pass
+                    except Exception as send_error:
+                        logger.error(f"Could not send new message in tutorial_step1: {send_error}", exc_info=True)
+                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
+                
                 return ConversationHandler.END
-            try:
-                gen_id = int(parts[1])
-            except (ValueError, TypeError):
+            except Exception as e:
+                logger.error(f"Error in tutorial_step1: {e}", exc_info=True)
                 try:
-                    await query.answer("Ошибка: неверный ID генерации", show_alert=True)
+                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
                 except:
                     pass
                 return ConversationHandler.END
-            gen = get_generation_by_id(user_id, gen_id)
+        
+        if data == "tutorial_step2":
+            # Answer callback immediately
+            try:
+                await query.answer()
+            except:
+                pass
             
-            if not gen:
+            try:
+                categories = get_categories_from_registry()
+                total_models = len(get_models_sync())
+                tutorial_text = (
+                    f'📖 <b>ШАГ 2: Как выбрать модель?</b>\n\n'
+                    f'━━━━━━━━━━━━━━━━━━━━\n\n'
+                    f'🎯 <b>У нас {total_models} моделей в {len(categories)} категориях:</b>\n\n'
+                    f'🖼️ <b>Изображения</b>\n'
+                    f'• free tools (FAST TOOLS) — 5 раз в день\n'
+                    f'• Nano Banana Pro - качество 2K/4K\n'
+                    f'• Imagen 4 Ultra - новейшая от Google\n\n'
+                    f'🎬 <b>Видео</b>\n'
+                    f'• Sora 2 - реалистичные видео\n'
+                    f'• Grok Imagine - мультимодальная модель\n\n'
+                    f'💡 <b>Совет:</b> Начните с бесплатных моделей - это бесплатно!'
+                )
+                
+                keyboard = [
+                    [InlineKeyboardButton("▶️ Далее", callback_data="tutorial_step3")],
+                    [InlineKeyboardButton("◀️ Назад", callback_data="tutorial_step1")],
+                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]
+                ]
+                
                 try:
-                    await query.answer("❌ Генерация не найдена", show_alert=True)
-                except:
-                    pass
+                    await query.edit_message_text(
+                        tutorial_text,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML'
+                    )
+                except Exception as edit_error:
+                    logger.warning(f"Could not edit message in tutorial_step2: {edit_error}, sending new message")
+                    try:
+                        await query.message.reply_text(
+                            tutorial_text,
+                            reply_markup=InlineKeyboardMarkup(keyboard),
+                            parse_mode='HTML'
+                        )
+                        try:
+                            await query.message.delete()
+                        except:
+                            pass
+                    except Exception as send_error:
+                        logger.error(f"Could not send new message in tutorial_step2: {send_error}", exc_info=True)
+                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
+                
                 return ConversationHandler.END
-            
-            # Restore session from history
-            model_id = gen.get('model_id')
-            params = gen.get('params', {})
-            model_info = get_model_by_id(model_id)
-            
-            if not model_info:
+            except Exception as e:
+                logger.error(f"Error in tutorial_step2: {e}", exc_info=True)
                 try:
-                    await query.answer("❌ Модель не найдена", show_alert=True)
+                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
                 except:
                     pass
                 return ConversationHandler.END
-            
-            user_lang = get_user_language(user_id)
-            
-            user_sessions[user_id] = {
-                'model_id': model_id,
-                'model_info': model_info,
-                'params': params.copy(),
-                'properties': model_info.get('input_params', {}),
-                'required': []
-            }
-            
-            # Go directly to confirmation
+        
+        if data == "tutorial_step3":
+            # Answer callback immediately
             try:
-                await query.answer("✅ Параметры восстановлены")
+                await query.answer()
             except:
                 pass
             
             try:
-                # Format parameters for display
-                params = gen.get('params', {})
-                params_preview = "\n".join([f"  • {k}: {str(v)[:50]}{'...' if len(str(v)) > 50 else ''}" for k, v in list(params.items())[:5]])
-                if len(params) > 5:
-                    params_preview += f"\n  ... и еще {len(params) - 5} параметров"
-                
-                if user_lang == 'ru':
-                    repeat_msg = (
-                        "🔄 <b>Повторная генерация</b>\n\n"
-                        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"🤖 <b>Модель:</b> {model_info.get('name', model_id)}\n\n"
-                        f"⚙️ <b>Параметры восстановлены из истории:</b>\n{params_preview if params_preview else '  (нет параметров)'}\n\n"
-                        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        "💡 <b>Что будет дальше:</b>\n"
-                        "• Параметры уже заполнены\n"
-                        "• Вы можете сразу начать генерацию\n"
-                        "• Или вернуться и изменить параметры\n\n"
-                        "🚀 <b>Подтвердите генерацию:</b>"
-                    )
-                else:
-                    repeat_msg = (
-                        "🔄 <b>Repeat generation</b>\n\n"
-                        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"🤖 <b>Model:</b> {model_info.get('name', model_id)}\n\n"
-                        f"⚙️ <b>Parameters restored from history:</b>\n{params_preview if params_preview else '  (no parameters)'}\n\n"
-                        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        "💡 <b>What's next:</b>\n"
-                        "• Parameters are already filled\n"
-                        "• You can start generation immediately\n"
-                        "• Or go back and change parameters\n\n"
-                        "🚀 <b>Confirm generation:</b>"
-                    )
-                
-                logger.info(f"✅ [UX IMPROVEMENT] Sending improved repeat generation message to user {user_id}")
-                await query.edit_message_text(
-                    repeat_msg,
-                    reply_markup=InlineKeyboardMarkup([
-                        [InlineKeyboardButton(t('btn_confirm_generate_text', lang=user_lang), callback_data="confirm_generate")],
-                        [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
-                        [InlineKeyboardButton(t('btn_back_to_history', lang=user_lang), callback_data="my_generations")],
-                        [InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")]
-                    ]),
-                    parse_mode='HTML'
-                )
-            except Exception as e:
-                logger.error(f"Error editing message in gen_repeat: {e}", exc_info=True)
-                try:
-                    # Format parameters for display
-                    params = gen.get('params', {})
-                    params_preview = "\n".join([f"  • {k}: {str(v)[:50]}{'...' if len(str(v)) > 50 else ''}" for k, v in list(params.items())[:5]])
-                    if len(params) > 5:
-                        params_preview += f"\n  ... и еще {len(params) - 5} параметров"
-                    
-                    if user_lang == 'ru':
-                        repeat_msg = (
-                            "🔄 <b>Повторная генерация</b>\n\n"
-                            "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                            f"🤖 <b>Модель:</b> {model_info.get('name', model_id)}\n\n"
-                            f"⚙️ <b>Параметры восстановлены из истории:</b>\n{params_preview if params_preview else '  (нет параметров)'}\n\n"
-                            "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                            "💡 <b>Что будет дальше:</b>\n"
-                            "• Параметры уже заполнены\n"
-                            "• Вы можете сразу начать генерацию\n"
-                            "• Или вернуться и изменить параметры\n\n"
-                            "🚀 <b>Подтвердите генерацию:</b>"
-                        )
-                    else:
-                        repeat_msg = (
-                            "🔄 <b>Repeat generation</b>\n\n"
-                            "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                            f"🤖 <b>Model:</b> {model_info.get('name', model_id)}\n\n"
-                            f"⚙️ <b>Parameters restored from history:</b>\n{params_preview if params_preview else '  (no parameters)'}\n\n"
-                            "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                            "💡 <b>What's next:</b>\n"
-                            "• Parameters are already filled\n"
-                            "• You can start generation immediately\n"
-                            "• Or go back and change parameters\n\n"
-                            "🚀 <b>Confirm generation:</b>"
-                        )
-                    
-                    logger.info(f"✅ [UX IMPROVEMENT] Sending improved repeat generation message (fallback) to user {user_id}")
-                    await query.message.reply_text(
-                        repeat_msg,
-                        reply_markup=InlineKeyboardMarkup([
-                            [InlineKeyboardButton("✅ Генерировать" if user_lang == 'ru' else "✅ Generate", callback_data="confirm_generate")],
-                            [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
-                            [InlineKeyboardButton("◀️ Назад к истории" if user_lang == 'ru' else "◀️ Back to history", callback_data="my_generations")],
-                            [InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")]
-                        ]),
+                tutorial_text = (
+                    '📖 <b>ШАГ 3: Как создать контент?</b>\n\n'
+                    '━━━━━━━━━━━━━━━━━━━━\n\n'
+                    '📝 <b>Простой процесс:</b>\n\n'
+                    '1️⃣ Нажмите "📋 Все модели"\n'
+                    '2️⃣ Выберите модель из бесплатных моделей\n'
+                    '3️⃣ Введите описание (промпт)\n'
+                    '   Пример: "Красивый закат над океаном"\n'
+                    '4️⃣ Выберите параметры (размер, стиль и т.д.)\n'
+                    '5️⃣ Нажмите "✅ Генерировать"\n'
+                    '6️⃣ Подождите 10-60 секунд\n'
+                    '7️⃣ Получите результат! 🎉\n\n'
+                    '💡 <b>Совет:</b> Чем подробнее описание, тем лучше результат!'
+                )
+                
+                keyboard = [
+                    [InlineKeyboardButton("▶️ Далее", callback_data="tutorial_step4")],
+                    [InlineKeyboardButton("◀️ Назад", callback_data="tutorial_step2")],
+                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]
+                ]
+                
+                try:
+                    await query.edit_message_text(
+                        tutorial_text,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
                         parse_mode='HTML'
                     )
+                except Exception as edit_error:
+                    logger.warning(f"Could not edit message in tutorial_step3: {edit_error}, sending new message")
+                    try:
+                        await query.message.reply_text(
+                            tutorial_text,
+                            reply_markup=InlineKeyboardMarkup(keyboard),
+                            parse_mode='HTML'
+                        )
+                        try:
+                            await query.message.delete()
+                        except:
+                            pass
+                    except Exception as send_error:
+                        logger.error(f"Could not send new message in tutorial_step3: {send_error}", exc_info=True)
+                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
+                
+                return ConversationHandler.END
+            except Exception as e:
+                logger.error(f"Error in tutorial_step3: {e}", exc_info=True)
+                try:
+                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
                 except:
                     pass
-            return CONFIRMING_GENERATION
+                return ConversationHandler.END
         
-        if data.startswith("gen_history:"):
+        if data == "tutorial_step4":
             # Answer callback immediately
             try:
                 await query.answer()
             except:
                 pass
             
-            # Navigate through generation history
-            parts = data.split(":", 2)
-            if len(parts) < 3:
-                try:
-                    await query.answer("❌ Ошибка навигации", show_alert=True)
-                except:
-                    pass
-                return ConversationHandler.END
-            
             try:
-                current_gen_id = int(parts[1])
-            except (ValueError, TypeError):
+                remaining_free = await get_user_free_generations_remaining(user_id)
+                tutorial_text = (
+                    '📖 <b>ШАГ 4: Баланс и оплата</b>\n\n'
+                    '━━━━━━━━━━━━━━━━━━━━\n\n'
+                    '💰 <b>Как это работает:</b>\n\n'
+                    '🎁 <b>Бесплатно:</b>\n'
+                    f'• {remaining_free if remaining_free > 0 else FREE_GENERATIONS_PER_DAY} бесплатных генераций в день\n'
+                    f'• Пригласите друга - получите оба +{REFERRAL_BONUS_GENERATIONS} генераций в free tools!\n\n'
+                    '💳 <b>Пополнение баланса:</b>\n'
+                    '• Минимальная сумма: 50 ₽\n'
+                    '• Быстрый выбор: 50, 100, 150 ₽\n'
+                    '• Или укажите свою сумму\n'
+                    '• Оплата через СБП (Система быстрых платежей)\n\n'
+                    '💡 <b>Совет:</b> Начните с бесплатных генераций!'
+                )
+                
+                keyboard = [
+                    [InlineKeyboardButton("▶️ Завершить", callback_data="tutorial_complete")],
+                    [InlineKeyboardButton("◀️ Назад", callback_data="tutorial_step3")],
+                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]
+                ]
+                
                 try:
-                    await query.answer("❌ Ошибка: неверный ID генерации", show_alert=True)
-                except:
-                    pass
+                    await query.edit_message_text(
+                        tutorial_text,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML'
+                    )
+                except Exception as edit_error:
+                    logger.warning(f"Could not edit message in tutorial_step4: {edit_error}, sending new message")
+                    try:
+                        await query.message.reply_text(
+                            tutorial_text,
+                            reply_markup=InlineKeyboardMarkup(keyboard),
+                            parse_mode='HTML'
+                        )
+                        try:
+                            await query.message.delete()
+                        except:
+                            pass
+                    except Exception as send_error:
+                        logger.error(f"Could not send new message in tutorial_step4: {send_error}", exc_info=True)
+                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
+                
                 return ConversationHandler.END
-            
-            direction = parts[2]  # prev or next
-            
-            history = get_user_generations_history(user_id, limit=100)
-            if not history:
+            except Exception as e:
+                logger.error(f"Error in tutorial_step4: {e}", exc_info=True)
                 try:
-                    await query.answer("❌ История пуста", show_alert=True)
+                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
                 except:
                     pass
                 return ConversationHandler.END
+        
+        if data == "tutorial_complete":
+            # Answer callback immediately
+            try:
+                await query.answer()
+            except:
+                pass
             
-            # Find current generation index
-            current_index = -1
-            for i, gen in enumerate(history):
-                if gen.get('id') == current_gen_id:
-                    current_index = i
-                    break
+            try:
+                tutorial_text = (
+                '🎉 <b>ТУТОРИАЛ ЗАВЕРШЕН!</b>\n\n'
+                '━━━━━━━━━━━━━━━━━━━━\n\n'
+                '✅ Теперь вы знаете:\n'
+                '• Что такое AI-генерация\n'
+                '• Как выбрать модель\n'
+                '• Как создать контент\n'
+                '• Как пополнить баланс\n\n'
+                '🚀 <b>Готовы начать?</b>\n\n'
+                '💡 <b>Рекомендация:</b>\n'
+                    'Начните с бесплатной генерации в бесплатных моделях!\n'
+                'Просто выберите модель и опишите, что хотите создать.'
+            )
             
-            if current_index == -1:
+                keyboard = [
+                    [InlineKeyboardButton("📋 Все модели", callback_data="all_models")],
+                    [InlineKeyboardButton("🆓 FAST TOOLS", callback_data="free_tools")],
+                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]
+                ]
+                
                 try:
-                    await query.answer("❌ Генерация не найдена", show_alert=True)
-                except:
-                    pass
+                    await query.edit_message_text(
+                        tutorial_text,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML'
+                    )
+                except Exception as edit_error:
+                    logger.warning(f"Could not edit message in tutorial_complete: {edit_error}, sending new message")
+                    try:
+                        await query.message.reply_text(
+                            tutorial_text,
+                            reply_markup=InlineKeyboardMarkup(keyboard),
+                            parse_mode='HTML'
+                        )
+                        try:
+                            await query.message.delete()
+                        except:
+                            pass
+                    except Exception as send_error:
+                        logger.error(f"Could not send new message in tutorial_complete: {send_error}", exc_info=True)
+                        await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
+                
                 return ConversationHandler.END
-            
-            # Navigate
-            if direction == 'prev' and current_index < len(history) - 1:
-                new_index = current_index + 1
-            elif direction == 'next' and current_index > 0:
-                new_index = current_index - 1
-            else:
+            except Exception as e:
+                logger.error(f"Error in tutorial_complete: {e}", exc_info=True)
                 try:
-                    await query.answer("⚠️ Это первая/последняя генерация", show_alert=True)
+                    await query.answer("❌ Ошибка. Попробуйте еще раз", show_alert=True)
                 except:
                     pass
                 return ConversationHandler.END
+        
+        if data == "help_menu":
+            # Answer callback immediately to show button was pressed
+            try:
+                await query.answer()
+            except:
+                pass
             
+            # Get user language
             user_lang = get_user_language(user_id)
+            is_new = await is_new_user_async(user_id)
             
-            gen = history[new_index]
-            from datetime import datetime
-            
-            timestamp = gen.get('timestamp', 0)
-            if timestamp:
-                date_str = datetime.fromtimestamp(timestamp).strftime('%d.%m.%Y %H:%M')
-            else:
-                date_str = 'Неизвестно'
-            
-            model_name = gen.get('model_name', gen.get('model_id', 'Unknown'))
-            result_urls = gen.get('result_urls', [])
-            price = gen.get('price', 0)
-            is_free = gen.get('is_free', False)
-            
-            if user_lang == 'ru':
-                history_text = (
-                    f"📚 <b>Мои генерации</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"📊 <b>Всего генераций:</b> {len(history)}\n"
-                    f"📍 <b>Показана:</b> {new_index + 1} из {len(history)}\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"🎨 <b>Генерация #{gen.get('id', 1)}</b>\n\n"
-                    f"📅 <b>Дата создания:</b> {date_str}\n"
-                    f"🤖 <b>Модель:</b> {model_name}\n"
-                    f"💰 <b>Стоимость:</b> {'🎁 Бесплатно' if is_free else format_rub_amount(price)}\n"
-                    f"📦 <b>Результатов:</b> {len(result_urls)}\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"💡 <b>Что можно сделать:</b>\n"
-                    f"• Просмотреть результат генерации\n"
-                    f"• Повторить генерацию с теми же параметрами\n"
-                    f"• Перейти к другой генерации\n\n"
-                    f"🔄 <b>Навигация:</b> Используйте кнопки ниже"
-                )
+            if is_new:
+                if user_lang == 'ru':
+                    help_text = (
+                        '📋 <b>ПОМОЩЬ ДЛЯ НОВЫХ ПОЛЬЗОВАТЕЛЕЙ</b>\n\n'
+                        '━━━━━━━━━━━━━━━━━━━━\n\n'
+                        '👋 <b>Добро пожаловать!</b>\n\n'
+                        '🎯 <b>Быстрый старт:</b>\n'
+                        '1. Нажмите "📋 Все модели"\n'
+                        '2. Выберите "🆓 FAST TOOLS" (это бесплатно!)\n'
+                        '3. Введите описание, например: "Кот в космосе"\n'
+                        '4. Нажмите "✅ Генерировать"\n'
+                        '5. Получите результат через 10-30 секунд!\n\n'
+                        '━━━━━━━━━━━━━━━━━━━━\n\n'
+                        '💡 <b>Полезные команды:</b>\n'
+                        '/start - Главное меню\n'
+                        '/models - Показать все модели\n'
+                        '/balance - Проверить баланс\n'
+                        '/help - Эта справка\n\n'
+                        '❓ <b>Нужна помощь?</b>\n'
+                        'Нажмите "❓ Как это работает?" для интерактивного туториала!'
+                    )
+                else:
+                    help_text = (
+                        '📋 <b>HELP FOR NEW USERS</b>\n\n'
+                        '━━━━━━━━━━━━━━━━━━━━\n\n'
+                        '👋 <b>Welcome!</b>\n\n'
+                        '🎯 <b>Quick Start:</b>\n'
+                        '1. Click "📋 All Models"\n'
+                        '2. Select "🆓 FAST TOOLS" (it\'s free!)\n'
+                        '3. Enter description, e.g.: "Cat in space"\n'
+                        '4. Click "✅ Generate"\n'
+                        '5. Get result in 10-30 seconds!\n\n'
+                        '━━━━━━━━━━━━━━━━━━━━\n\n'
+                        '💡 <b>Useful Commands:</b>\n'
+                        '/start - Main menu\n'
+                        '/models - Show all models\n'
+                        '/balance - Check balance\n'
+                        '/help - This help\n\n'
+                        '❓ <b>Need help?</b>\n'
+                        'Click "❓ How it works?" for interactive tutorial!'
+                    )
             else:
-                history_text = (
-                    f"📚 <b>My Generations</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"📊 <b>Total generations:</b> {len(history)}\n"
-                    f"📍 <b>Showing:</b> {new_index + 1} of {len(history)}\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"🎨 <b>Generation #{gen.get('id', 1)}</b>\n\n"
-                    f"📅 <b>Created:</b> {date_str}\n"
-                    f"🤖 <b>Model:</b> {model_name}\n"
-                    f"💰 <b>Cost:</b> {'🎁 Free' if is_free else format_rub_amount(price)}\n"
-                    f"📦 <b>Results:</b> {len(result_urls)}\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"💡 <b>What you can do:</b>\n"
-                    f"• View generation result\n"
-                    f"• Repeat generation with same parameters\n"
-                    f"• Navigate to another generation\n\n"
-                    f"🔄 <b>Navigation:</b> Use buttons below"
-                )
-            
-            logger.info(f"✅ [UX IMPROVEMENT] Sending improved generation history view to user {user_id}")
+                if user_lang == 'ru':
+                    help_text = (
+                        '📋 <b>ДОСТУПНЫЕ КОМАНДЫ</b>\n\n'
+                        '━━━━━━━━━━━━━━━━━━━━\n\n'
+                        '🔹 <b>Основные:</b>\n'
+                        '/start - Главное меню\n'
+                        '/models - Показать модели\n'
+                        '/balance - Проверить баланс\n'
+                        '/generate - Начать генерацию\n'
+                        '/help - Справка\n\n'
+                    )
+                else:
+                    help_text = (
+                        '📋 <b>AVAILABLE COMMANDS</b>\n\n'
+                        '━━━━━━━━━━━━━━━━━━━━\n\n'
+                        '🔹 <b>Main:</b>\n'
+                        '/start - Main menu\n'
+                        '/models - Show models\n'
+                        '/balance - Check balance\n'
+                        '/generate - Start generation\n'
+                        '/help - Help\n\n'
+                    )
+                
+                if get_is_admin(user_id):
+                    if user_lang == 'ru':
+                        help_text += (
+                            '👑 <b>Административные:</b>\n'
+                            '/search - Поиск в базе знаний\n'
+                            '/add - Добавление знаний\n'
+                            '/admin - Пользователи и ручные пополнения\n'
+                            '/payments - Просмотр платежей\n'
+                            '/block_user - Заблокировать пользователя\n'
+                            '/unblock_user - Разблокировать пользователя\n'
+                            '/user_balance - Баланс пользователя\n\n'
+                        )
+                    else:
+                        help_text += (
+                            '👑 <b>Administrative:</b>\n'
+                            '/search - Search knowledge base\n'
+                            '/add - Add knowledge\n'
+                            '/admin - User overview and manual top-ups\n'
+                            '/payments - View payments\n'
+                            '/block_user - Block user\n'
+                            '/unblock_user - Unblock user\n'
+                            '/user_balance - User balance\n\n'
+                        )
+                
+                if user_lang == 'ru':
+                    help_text += (
+                        '💡 <b>Как использовать:</b>\n'
+                        '1. Выберите модель из меню\n'
+                        '2. Введите промпт (описание)\n'
+                        '3. Выберите параметры через кнопки\n'
+                        '4. Подтвердите генерацию\n'
+                        '5. Получите результат!\n\n'
+                        '📚 <b>Полезные функции:</b>\n'
+                        '• "📚 Мои генерации" - просмотр истории\n'
+                        '• "🔄 Повторить" - создать с теми же параметрами\n'
+                        '• "💳 Пополнить" - пополнение баланса'
+                    )
+                else:
+                    help_text += (
+                        '💡 <b>How to use:</b>\n'
+                        '1. Select model from menu\n'
+                        '2. Enter prompt (description)\n'
+                        '3. Select parameters via buttons\n'
+                        '4. Confirm generation\n'
+                        '5. Get result!\n\n'
+                        '📚 <b>Useful features:</b>\n'
+                        '• "📚 My generations" - view history\n'
+                        '• "🔄 Repeat" - create with same parameters\n'
+                        '• "💳 Top up" - top up balance'
+                    )
             
             keyboard = []
-            
-            # Navigation buttons
-            keyboard.append([
-                InlineKeyboardButton("◀️ Предыдущая", callback_data=f"gen_history:{gen.get('id', 1)}:prev"),
-                InlineKeyboardButton("Следующая ▶️", callback_data=f"gen_history:{gen.get('id', 1)}:next")
-            ])
-            
-            # Action buttons
-            if result_urls:
+            if is_new:
+                if user_lang == 'ru':
+                    keyboard.append([InlineKeyboardButton("❓ Как это работает?", callback_data="tutorial_start")])
+                else:
+                    keyboard.append([InlineKeyboardButton("❓ How it works?", callback_data="tutorial_start")])
+            if user_lang == 'ru':
                 keyboard.append([
-                    InlineKeyboardButton("👁️ Показать результат", callback_data=f"gen_view:{gen.get('id', 1)}")
+                    InlineKeyboardButton("🎁 Колесо удачи", callback_data="claim_gift"),
+                    InlineKeyboardButton(t('btn_copy_bot', lang=user_lang), callback_data="copy_bot")
                 ])
                 keyboard.append([
-                    InlineKeyboardButton("🔄 Повторить", callback_data=f"gen_repeat:{gen.get('id', 1)}")
+                    InlineKeyboardButton("🇷🇺 Русский", callback_data="set_language:ru"),
+                    InlineKeyboardButton("🇺🇸 English", callback_data="set_language:en")
                 ])
-            
-            keyboard.append([InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")])
-            
-            await query.edit_message_text(
-                history_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            return ConversationHandler.END
-        
-        # Handle model card display (model:<model_id>)
-        if data.startswith("m:"):
-            short_id = data.split(":", 1)[1] if ":" in data else ""
-            if not short_id:
-                user_lang = get_user_language(user_id) if user_id else "ru"
-                await query.answer(
-                    t('error_model_not_found', lang=user_lang, default="❌ Модель не найдена"),
-                    show_alert=True,
-                )
-                return ConversationHandler.END
-            models = get_models_sync()
-            matches = [m for m in models if m.get("id", "").startswith(short_id)]
-            if len(matches) == 1:
-                data = f"model:{matches[0].get('id')}"
             else:
-                user_lang = get_user_language(user_id) if user_id else "ru"
-                error_msg = (
-                    "❌ Не удалось определить модель. Вернитесь в меню и выберите снова."
-                    if user_lang == "ru"
-                    else "❌ Could not resolve model. Return to the menu and select again."
-                )
+                keyboard.append([
+                    InlineKeyboardButton("🎁 Wheel of Fortune", callback_data="claim_gift"),
+                    InlineKeyboardButton(t('btn_copy_bot', lang=user_lang), callback_data="copy_bot")
+                ])
+                keyboard.append([
+                    InlineKeyboardButton("🇷🇺 Russian", callback_data="set_language:ru"),
+                    InlineKeyboardButton("🇺🇸 English", callback_data="set_language:en")
+                ])
+            keyboard.append([
+                InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")
+            ])
+            
+            try:
                 await query.edit_message_text(
-                    error_msg,
-                    reply_markup=InlineKeyboardMarkup(
-                        [[InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")]]
-                    ),
-                    parse_mode="HTML",
+                    help_text,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML'
                 )
-                return ConversationHandler.END
-
-        if data.startswith("model:") or data.startswith("modelk:"):
+            except Exception as e:
+                logger.error(f"Error editing message in help_menu: {e}", exc_info=True)
+                try:
+                    await query.message.reply_text(
+                        help_text,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML'
+                    )
+                except:
+                    pass
+            return ConversationHandler.END
+        
+        if data == "support_contact":
+            # Answer callback immediately to show button was pressed
             try:
                 await query.answer()
             except:
                 pass
             
-            # Используем новый каталог
+            # Get user language
             user_lang = get_user_language(user_id)
+            support_info = get_support_contact()
             
-            try:
-                from app.helpers.models_menu_handlers import handle_model_callback
-                success = await handle_model_callback(query, user_id, user_lang, data)
-                
-                if success:
-                    return SELECTING_MODEL
-                else:
-                    return ConversationHandler.END
-            except Exception as e:
-                logger.error(f"Error in handle_model_callback: {e}", exc_info=True)
-                if user_lang == 'ru':
-                    await query.answer("❌ Ошибка при загрузке модели", show_alert=True)
-                else:
-                    await query.answer("❌ Error loading model", show_alert=True)
-                return ConversationHandler.END
-            
-            # Fallback на старый код (если новый обработчик не сработал)
-            parts = data.split(":", 1)
-            if len(parts) < 2:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_invalid_model', lang=user_lang, default="❌ Ошибка: неверный формат запроса"), show_alert=True)
-                return ConversationHandler.END
-            
-            model_id = parts[1] if len(parts) > 1 else None
-            if not model_id:
-                # Пробуем разрешить через новый каталог
-                from app.helpers.models_menu import resolve_model_id_from_callback
-                model_id = resolve_model_id_from_callback(data)
-            
-            if not model_id:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_model_not_found', lang=user_lang, default="❌ Модель не найдена"), show_alert=True)
-                return ConversationHandler.END
+            # Translate support contact message if needed
+            if user_lang == 'en' and 'Поддержка' in support_info:
+                # If support info is in Russian but user wants English, add English header
+                support_info = (
+                    '💬 <b>SUPPORT</b>\n\n'
+                    '━━━━━━━━━━━━━━━━━━━━\n\n'
+                    'If you have any questions or need help, please contact our support team:\n\n'
+                    + support_info.replace('💬 <b>Поддержка</b>', '').replace('━━━━━━━━━━━━━━━━━━━━', '').strip()
+                )
             
-            # Пробуем получить из нового каталога
-            from app.kie_catalog import get_model as get_model_from_catalog
-            catalog_model = get_model_from_catalog(model_id)
+            keyboard = [
+                [InlineKeyboardButton(t('btn_back', lang=user_lang), callback_data="back_to_menu")]
+            ]
             
-            if catalog_model:
-                # Используем новый каталог
-                from app.helpers.models_menu import build_model_card_text
-                card_text, keyboard_markup = build_model_card_text(catalog_model, 0, user_lang)
+            try:
+                await query.edit_message_text(
+                    support_info,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML'
+                )
+            except Exception as e:
+                logger.error(f"Error editing message in support_contact: {e}", exc_info=True)
                 try:
-                    await query.edit_message_text(
-                        card_text,
-                        reply_markup=keyboard_markup,
+                    await query.message.reply_text(
+                        support_info,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
                         parse_mode='HTML'
                     )
-                    return SELECTING_MODEL
-                except Exception as e:
-                    logger.error(f"Error showing model card: {e}", exc_info=True)
-                    await query.answer("❌ Ошибка при отображении модели", show_alert=True)
-                    return ConversationHandler.END
-            
-            # Fallback на старый код
-            model = get_model_by_id(model_id)
-            
-            if not model:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_model_not_found', lang=user_lang, default="❌ Модель не найдена"), show_alert=True)
-                return ConversationHandler.END
-            
-            # Нормализуем модель для единообразного использования
+                except:
+                    pass
+            return ConversationHandler.END
+        
+        # Handle copy bot request
+        if data == "copy_bot":
+            # Answer callback immediately to show button was pressed
             try:
-                from kie_models import normalize_model_for_api
-                normalized = normalize_model_for_api(model)
+                await query.answer()
             except:
-                normalized = model
+                pass
             
+            # Get user language
             user_lang = get_user_language(user_id)
             
-            # Формируем карточку модели
-            title = normalized.get('title') or normalized.get('name') or model_id
-            emoji = normalized.get('emoji', '')
-            gen_type = normalized.get('generation_type', 'unknown')
-            help_text = normalized.get('help') or normalized.get('description', '')
-            input_schema = normalized.get('input_schema') or normalized.get('input_params', {})
+            # Create admin link
+            admin_link = f"tg://user?id={ADMIN_ID}"
             
-            # Формируем улучшенный текст карточки модели
+            # Create message with admin link
             if user_lang == 'ru':
-                model_info_text = (
-                    f"{emoji} <b>{title}</b>\n\n"
+                copy_message = (
+                    f"{t('msg_copy_bot_title', lang=user_lang)}\n\n"
                     f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"📋 <b>Тип генерации:</b> {gen_type.replace('_', '-')}\n\n"
-                    f"ℹ️ <b>Описание:</b>\n{help_text}\n\n"
-                )
-                
-                # Добавляем информацию о параметрах (без технической схемы)
-                if input_schema:
-                    required_params = [k for k, v in input_schema.items() if v.get('required', False)]
-                    optional_params = [k for k, v in input_schema.items() if not v.get('required', False)]
-                    
-                    model_info_text += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    model_info_text += "⚙️ <b>Основные параметры:</b>\n"
-                    if required_params:
-                        model_info_text += f"• Обязательные: {', '.join(required_params[:5])}"
-                        if len(required_params) > 5:
-                            model_info_text += f" и еще {len(required_params) - 5}"
-                        model_info_text += "\n"
-                    if optional_params:
-                        model_info_text += f"• Опциональные: {', '.join(optional_params[:5])}"
-                        if len(optional_params) > 5:
-                            model_info_text += f" и еще {len(optional_params) - 5}"
-                        model_info_text += "\n"
-                    model_info_text += "\n"
-                
-                model_info_text += (
-                    "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    "💡 <b>Совет:</b> После начала генерации вы сможете настроить все параметры пошагово.\n\n"
-                    "🚀 <b>Готовы начать?</b> Нажмите кнопку ниже!"
+                    f"{t('msg_copy_bot_description', lang=user_lang)}\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"👨‍💻 <a href=\"{admin_link}\">Связаться с администратором</a>"
                 )
             else:
-                model_info_text = (
-                    f"{emoji} <b>{title}</b>\n\n"
+                copy_message = (
+                    f"{t('msg_copy_bot_title', lang=user_lang)}\n\n"
                     f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    f"📋 <b>Generation type:</b> {gen_type.replace('_', '-')}\n\n"
-                    f"ℹ️ <b>Description:</b>\n{help_text}\n\n"
-                )
-                
-                # Add parameter info (without technical schema)
-                if input_schema:
-                    required_params = [k for k, v in input_schema.items() if v.get('required', False)]
-                    optional_params = [k for k, v in input_schema.items() if not v.get('required', False)]
-                    
-                    model_info_text += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    model_info_text += "⚙️ <b>Main parameters:</b>\n"
-                    if required_params:
-                        model_info_text += f"• Required: {', '.join(required_params[:5])}"
-                        if len(required_params) > 5:
-                            model_info_text += f" and {len(required_params) - 5} more"
-                        model_info_text += "\n"
-                    if optional_params:
-                        model_info_text += f"• Optional: {', '.join(optional_params[:5])}"
-                        if len(optional_params) > 5:
-                            model_info_text += f" and {len(optional_params) - 5} more"
-                        model_info_text += "\n"
-                    model_info_text += "\n"
-                
-                model_info_text += (
-                    "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                    "💡 <b>Tip:</b> After starting generation, you'll be able to configure all parameters step by step.\n\n"
-                    "🚀 <b>Ready to start?</b> Click the button below!"
+                    f"{t('msg_copy_bot_description', lang=user_lang)}\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"👨‍💻 <a href=\"{admin_link}\">Contact Administrator</a>"
                 )
             
-            logger.info(f"✅ [UX IMPROVEMENT] Sending improved model card to user {user_id} for model {model_id}")
-            
-            # Кнопки
-            if user_lang == 'ru':
-                keyboard = [
-                    [InlineKeyboardButton("✅ Начать генерацию", callback_data=f"start:{model_id}")],
-                    [InlineKeyboardButton("ℹ️ Пример запроса", callback_data=f"example:{model_id}")],
-                    [InlineKeyboardButton("⬅️ Назад", callback_data="back_to_menu")]
-                ]
-            else:
-                keyboard = [
-                    [InlineKeyboardButton("✅ Start generation", callback_data=f"start:{model_id}")],
-                    [InlineKeyboardButton("ℹ️ Example request", callback_data=f"example:{model_id}")],
-                    [InlineKeyboardButton("⬅️ Back", callback_data="back_to_menu")]
-                ]
+            keyboard = [
+                [InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")]
+            ]
             
-            await query.edit_message_text(
-                text=model_info_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
+            try:
+                await query.edit_message_text(
+                    copy_message,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='HTML',
+                    disable_web_page_preview=False
+                )
+            except Exception as e:
+                logger.error(f"Error editing message in copy_bot: {e}", exc_info=True)
+                try:
+                    await query.message.reply_text(
+                        copy_message,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML',
+                        disable_web_page_preview=False
+                    )
+                except:
+                    pass
             return ConversationHandler.END
         
-        # Handle start generation from model card (start:<model_id>)
-        if data.startswith("start:"):
-            try:
-                await query.answer()
-            except:
-                pass
-            
-            parts = data.split(":", 1)
-            if len(parts) < 2:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_invalid_model', lang=user_lang, default="❌ Ошибка: неверный формат запроса"), show_alert=True)
-                return ConversationHandler.END
-            
-            model_id = parts[1]
-            # Перенаправляем на select_model для начала генерации
-            query.data = f"select_model:{model_id}"
-            # Продолжаем обработку как select_model
-            data = query.data
+        if data == "referral_info":
+            return await handle_referral_info(update, context)
         
-        # Handle example request (example:<model_id>)
-        if data.startswith("example:"):
+        if data == "my_generations":
+            # Answer callback immediately to show button was pressed
             try:
                 await query.answer()
             except:
                 pass
             
-            parts = data.split(":", 1)
-            if len(parts) < 2:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_invalid_model', lang=user_lang, default="❌ Ошибка: неверный формат запроса"), show_alert=True)
-                return ConversationHandler.END
-            
-            model_id = parts[1]
-            user_lang = get_user_language(user_id)
+            # Show user's generation history
+            history = get_user_generations_history(user_id, limit=20)
             
-            # Пробуем получить из нового каталога
-            from app.kie_catalog import get_model as get_model_from_catalog
-            catalog_model = get_model_from_catalog(model_id)
+            # Debug: log history loading
+            logger.info(f"Loading history for user {user_id}: found {len(history)} generations")
             
-            if catalog_model:
-                # Используем новый каталог для примера
-                mode = catalog_model.modes[0] if catalog_model.modes else None
+            # Check if file exists and show helpful message
+            if not history:
+                user_lang = get_user_language(user_id)
+                from app.config import get_settings
+
+                storage_is_db = get_settings().get_storage_mode() == "db"
+                file_exists = False
+                
+                # Load full history to check if there are any users at all
+                full_history = {}
+                total_users = 0
+                if not storage_is_db:
+                    file_exists = os.path.exists(GENERATIONS_HISTORY_FILE)
+                if file_exists and not storage_is_db:
+                    try:
+                        full_history = load_json_file(GENERATIONS_HISTORY_FILE, {})
+                        total_users = len(full_history)
+                        logger.info(f"History file exists with {total_users} users. Checking for user {user_id}...")
+                    except Exception as e:
+                        logger.error(f"Error loading history file: {e}", exc_info=True)
+                
                 if user_lang == 'ru':
-                    example_text = (
-                        f"📸 <b>Пример запроса для {catalog_model.title_ru}</b>\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"💡 <b>Тип генерации:</b> {catalog_model.type}\n\n"
+                    message_text = (
+                        "📚 <b>Мои генерации</b>\n\n"
+                        "❌ У вас пока нет сохраненных генераций.\n\n"
                     )
+                    if not storage_is_db and not file_exists:
+                        message_text += (
+                            "⚠️ <b>Примечание:</b> Файл истории не найден.\n"
+                            "Это может произойти после обновления бота.\n\n"
+                        )
+                    elif not storage_is_db and total_users > 0:
+                        message_text += (
+                            f"ℹ️ В системе сохранено {total_users} пользователей с историей.\n"
+                            f"Если вы создавали генерации ранее, они должны отображаться.\n\n"
+                        )
+                    message_text += "💡 После создания контента все ваши работы будут сохранены здесь."
                 else:
-                    example_text = (
-                        f"📸 <b>Example request for {catalog_model.title_ru}</b>\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"💡 <b>Generation type:</b> {catalog_model.type}\n\n"
+                    message_text = (
+                        "📚 <b>My Generations</b>\n\n"
+                        "❌ You don't have any saved generations yet.\n\n"
                     )
+                    if not storage_is_db and not file_exists:
+                        message_text += (
+                            "⚠️ <b>Note:</b> History file not found.\n"
+                            "This may happen after bot update.\n\n"
+                        )
+                    elif not storage_is_db and total_users > 0:
+                        message_text += (
+                            f"ℹ️ System has {total_users} users with history saved.\n"
+                            f"If you created generations before, they should appear.\n\n"
+                        )
+                    message_text += "💡 After creating content, all your works will be saved here."
                 
-                if mode:
-                    mode_label = _resolve_mode_label(mode, 0, user_lang)
-                    example_text += (
-                        f"⚙️ <b>Режим:</b> {mode_label}\n\n"
-                        if user_lang == 'ru'
-                        else f"⚙️ <b>Mode:</b> {mode_label}\n\n"
+                keyboard = [[InlineKeyboardButton("◀️ Назад в меню" if user_lang == 'ru' else "◀️ Back to menu", callback_data="back_to_menu")]]
+                try:
+                    await query.edit_message_text(
+                        message_text,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML'
                     )
+                except Exception as e:
+                    logger.error(f"Error editing message in my_generations (empty): {e}", exc_info=True)
+                    try:
+                        await query.message.reply_text(
+                            message_text,
+                            reply_markup=InlineKeyboardMarkup(keyboard),
+                            parse_mode='HTML'
+                        )
+                    except:
+                        pass
+                return ConversationHandler.END
+            
+            # Show first generation with navigation
+            try:
+                from datetime import datetime
                 
-                if user_lang == 'ru':
-                    example_text += (
-                        f"💡 <b>Совет:</b> После начала генерации вы сможете настроить все параметры пошагово.\n\n"
-                        f"🚀 <b>Готовы начать?</b> Нажмите кнопку ниже!"
-                    )
+                gen = history[0]
+                timestamp = gen.get('timestamp', 0)
+                if timestamp:
+                    date_str = datetime.fromtimestamp(timestamp).strftime('%d.%m.%Y %H:%M')
                 else:
-                    example_text += (
-                        f"💡 <b>Tip:</b> After starting generation, you'll be able to configure all parameters step by step.\n\n"
-                        f"🚀 <b>Ready to start?</b> Click the button below!"
-                    )
+                    date_str = 'Неизвестно'
                 
-                keyboard = [
-                    [InlineKeyboardButton("🚀 Сгенерировать" if user_lang == 'ru' else "🚀 Generate", callback_data=f"select_model:{model_id}")],
-                    [InlineKeyboardButton("ℹ️ Инфо" if user_lang == 'ru' else "ℹ️ Info", callback_data=f"info:{model_id}")],
-                    [InlineKeyboardButton("⬅️ Назад" if user_lang == 'ru' else "⬅️ Back", callback_data=f"model:{model_id}")]
-                ]
+                model_name = gen.get('model_name', gen.get('model_id', 'Unknown'))
+                result_urls = gen.get('result_urls', [])
+                price = gen.get('price', 0)
+                is_free = gen.get('is_free', False)
+                
+                user_lang = get_user_language(user_id)
+                
+                history_text = (
+                    f"📚 <b>Мои генерации</b>\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"📊 <b>Всего:</b> {len(history)} генераций\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"🎨 <b>Генерация #{gen.get('id', 1)}</b>\n"
+                    f"📅 <b>Дата:</b> {date_str}\n"
+                    f"🤖 <b>Модель:</b> {model_name}\n"
+                    f"💰 <b>Стоимость:</b> {'🎁 Бесплатно' if is_free else format_rub_amount(price)}\n"
+                    f"📦 <b>Результатов:</b> {len(result_urls)}\n\n"
+                )
+                
+                if len(history) > 1:
+                    history_text += f"💡 <b>Показана последняя генерация</b>\n"
+                    history_text += f"Используйте кнопки для навигации\n\n"
+                
+                keyboard = []
+                
+                # Navigation buttons if more than 1 generation
+                if len(history) > 1:
+                    keyboard.append([
+                        InlineKeyboardButton(t('btn_previous', lang=user_lang), callback_data=f"gen_history:{gen.get('id', 1)}:prev"),
+                        InlineKeyboardButton(t('btn_next', lang=user_lang), callback_data=f"gen_history:{gen.get('id', 1)}:next")
+                    ])
+                
+                # Action buttons
+                if result_urls:
+                    keyboard.append([
+                        InlineKeyboardButton("👁️ Показать результат", callback_data=f"gen_view:{gen.get('id', 1)}")
+                    ])
+                    keyboard.append([
+                        InlineKeyboardButton("🔄 Повторить", callback_data=f"gen_repeat:{gen.get('id', 1)}")
+                    ])
+                
+                keyboard.append([InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")])
                 
                 try:
-                    await query.edit_message_text(
-                        text=example_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                    return SELECTING_MODEL
-                except Exception as e:
-                    logger.error(f"Error showing example from catalog: {e}", exc_info=True)
-                    await query.answer("❌ Ошибка при загрузке примера", show_alert=True)
-                    return ConversationHandler.END
-            
-            # Fallback на старый код
-            model = get_model_by_id(model_id)
-            
-            if not model:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_model_not_found', lang=user_lang, default="❌ Модель не найдена"), show_alert=True)
-                return ConversationHandler.END
-            
-            # Нормализуем модель
-            try:
-                from kie_models import normalize_model_for_api
-                normalized = normalize_model_for_api(model)
-            except:
-                normalized = model
-            
-            user_lang = get_user_language(user_id)
-            input_schema = normalized.get('input_schema') or normalized.get('input_params', {})
-            
-            # Формируем пример запроса
-            example_text = f"📝 <b>Пример запроса для {normalized.get('title', model_id)}</b>\n\n"
-            example_text += f"<b>Параметры:</b>\n"
-            
-            import json
-            # Генерируем пример значений на основе схемы
-            example_params = {}
-            for param_name, param_type in input_schema.items():
-                if param_type == 'string':
-                    if 'prompt' in param_name.lower():
-                        example_params[param_name] = "Красивый закат над океаном"
-                    elif 'url' in param_name.lower():
-                        example_params[param_name] = "https://example.com/image.jpg"
-                    else:
-                        example_params[param_name] = "пример значения"
-                elif param_type == 'array':
-                    example_params[param_name] = ["https://example.com/image1.jpg"]
-                else:
-                    example_params[param_name] = "пример"
-            
-            example_text += f"<code>{json.dumps(example_params, indent=2, ensure_ascii=False)}</code>\n\n"
-            example_text += f"💡 <b>Инструкция:</b>\n{normalized.get('help', 'Следуйте инструкциям модели')}"
-            
-            keyboard = [
-                [InlineKeyboardButton("✅ Начать генерацию", callback_data=f"start:{model_id}")],
-                [InlineKeyboardButton("⬅️ Назад к модели", callback_data=f"model:{model_id}")]
-            ]
-            
-            await query.edit_message_text(
-                text=example_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            return SELECTING_MODEL
+                    await query.edit_message_text(
+                        history_text,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML'
+                    )
+                except Exception as e:
+                    logger.error(f"Error editing message in my_generations: {e}", exc_info=True)
+                    try:
+                        await query.message.reply_text(
+                            history_text,
+                            reply_markup=InlineKeyboardMarkup(keyboard),
+                            parse_mode='HTML'
+                        )
+                    except:
+                        pass
+            except Exception as e:
+                logger.error(f"Error in my_generations: {e}", exc_info=True)
+                try:
+                    await query.answer("❌ Ошибка при загрузке истории", show_alert=True)
+                except:
+                    pass
+            return ConversationHandler.END
         
-        # Handle info: callback - shows detailed model information
-        if data.startswith("info:"):
+        if data.startswith("gen_view:"):
+            # Answer callback immediately
             try:
                 await query.answer()
             except:
                 pass
             
+            # View specific generation result
             parts = data.split(":", 1)
             if len(parts) < 2:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_invalid_model', lang=user_lang, default="❌ Ошибка: неверный формат запроса"), show_alert=True)
+                try:
+                    await query.answer("Ошибка: неверный формат запроса", show_alert=True)
+                except:
+                    pass
                 return ConversationHandler.END
-            
-            model_id = parts[1]
-            user_lang = get_user_language(user_id)
-            
-            # Пробуем получить из нового каталога
-            from app.kie_catalog import get_model as get_model_from_catalog
-            catalog_model = get_model_from_catalog(model_id)
-            
-            if catalog_model:
-                # Используем новый каталог для отображения информации
-                from app.helpers.models_menu import build_model_card_text
-                card_text, keyboard_markup = build_model_card_text(catalog_model, 0, user_lang)
+            try:
+                gen_id = int(parts[1])
+            except (ValueError, TypeError):
                 try:
-                    await query.edit_message_text(
-                        card_text,
-                        reply_markup=keyboard_markup,
-                        parse_mode='HTML'
-                    )
-                    return SELECTING_MODEL
-                except Exception as e:
-                    logger.error(f"Error showing model info: {e}", exc_info=True)
-                    await query.answer("❌ Ошибка при загрузке информации о модели", show_alert=True)
-                    return ConversationHandler.END
+                    await query.answer("Ошибка: неверный ID генерации", show_alert=True)
+                except:
+                    pass
+                return ConversationHandler.END
+            gen = get_generation_by_id(user_id, gen_id)
             
-            # Fallback на старый код
-            model = get_model_by_id(model_id)
-            if not model:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_model_not_found', lang=user_lang, default="❌ Модель не найдена"), show_alert=True)
+            if not gen:
+                try:
+                    await query.answer("❌ Генерация не найдена", show_alert=True)
+                except:
+                    pass
                 return ConversationHandler.END
             
-            # Нормализуем модель
-            try:
-                from kie_models import normalize_model_for_api
-                normalized = normalize_model_for_api(model)
-            except:
-                normalized = model
+            result_urls = gen.get('result_urls', [])
+            if not result_urls:
+                try:
+                    await query.answer("❌ Результаты не найдены", show_alert=True)
+                except:
+                    pass
+                return ConversationHandler.END
             
             user_lang = get_user_language(user_id)
-            input_schema = normalized.get('input_schema') or normalized.get('input_params', {})
-            
-            # Формируем детальную информацию о модели
-            if user_lang == 'ru':
-                info_text = (
-                    f"ℹ️ <b>Информация о модели: {normalized.get('title', model_id)}</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                )
-            else:
-                info_text = (
-                    f"ℹ️ <b>Model Information: {normalized.get('title', model_id)}</b>\n\n"
-                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                )
-            
-            if normalized.get('description'):
-                info_text += f"📝 <b>Описание:</b>\n{normalized.get('description')}\n\n"
-            
-            if input_schema:
-                if user_lang == 'ru':
-                    info_text += f"⚙️ <b>Параметры:</b>\n"
-                else:
-                    info_text += f"⚙️ <b>Parameters:</b>\n"
-                
-                for param_name, param_info in input_schema.items():
-                    if isinstance(param_info, dict):
-                        param_type = param_info.get('type', 'string')
-                        param_desc = param_info.get('description', '')
-                        required = param_info.get('required', False)
-                        req_text = " (обязательный)" if required else " (опциональный)"
-                        if user_lang != 'ru':
-                            req_text = " (required)" if required else " (optional)"
-                        info_text += f"• <b>{param_name}</b>: {param_type}{req_text}\n"
-                        if param_desc:
-                            info_text += f"  {param_desc}\n"
-                    else:
-                        info_text += f"• <b>{param_name}</b>: {param_info}\n"
-            
-            if normalized.get('help'):
-                info_text += f"\n💡 <b>Совет:</b>\n{normalized.get('help')}\n"
             
-            keyboard = [
-                [InlineKeyboardButton("🚀 Сгенерировать" if user_lang == 'ru' else "🚀 Generate", callback_data=f"select_model:{model_id}")],
-                [InlineKeyboardButton("📸 Пример" if user_lang == 'ru' else "📸 Example", callback_data=f"example:{model_id}")],
-                [InlineKeyboardButton("⬅️ Назад" if user_lang == 'ru' else "⬅️ Back", callback_data=f"model:{model_id}")]
-            ]
+            # Send media
+            try:
+                session_http = await get_http_client()
+                for i, url in enumerate(result_urls[:5]):
+                    try:
+                        async with session_http.get(url) as resp:
+                                if resp.status == 200:
+                                    media_data = await resp.read()
+                                    
+                                    is_last = (i == len(result_urls[:5]) - 1)
+                                    is_video = gen.get('model_id', '') in ['sora-2-text-to-video', 'sora-watermark-remover', 'kling-2.6/image-to-video', 'kling-2.6/text-to-video', 'kling/v2-5-turbo-text-to-video-pro', 'kling/v2-5-turbo-image-to-video-pro', 'wan/2-5-image-to-video', 'wan/2-5-text-to-video', 'wan/2-2-animate-move', 'wan/2-2-animate-replace', 'hailuo/02-text-to-video-pro', 'hailuo/02-image-to-video-pro', 'hailuo/02-text-to-video-standard', 'hailuo/02-image-to-video-standard']
+                                    
+                                    keyboard = []
+                                    if is_last:
+                                        keyboard = [
+                                            [InlineKeyboardButton(t('btn_back_to_history', lang=user_lang), callback_data="my_generations")],
+                                            [InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")]
+                                        ]
+                                    
+                                    if is_video:
+                                        video_file = io.BytesIO(media_data)
+                                        video_file.name = f"generated_video_{i+1}.mp4"
+                                        await context.bot.send_video(
+                                            chat_id=update.effective_chat.id,
+                                            video=video_file,
+                                            reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
+                                        )
+                                    else:
+                                        photo_file = io.BytesIO(media_data)
+                                        photo_file.name = f"generated_image_{i+1}.png"
+                                        await context.bot.send_photo(
+                                            chat_id=update.effective_chat.id,
+                                            photo=photo_file,
+                                            reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
+                                        )
+                    except Exception as e:
+                        logger.error(f"Error sending generation result (HTTP API call): {e}", exc_info=True)
+            except Exception as e:
+                logger.error(f"Error in gen_view API calls: {e}", exc_info=True)
+                try:
+                    user_lang = get_user_language(user_id) if user_id else 'ru'
+                    error_msg = "Ошибка сервера, попробуйте позже" if user_lang == 'ru' else "Server error, please try later"
+                    await query.answer(error_msg, show_alert=True)
+                except:
+                    pass
             
-            await query.edit_message_text(
-                text=info_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            return SELECTING_MODEL
-        
-        # Handle model: callback - shows model card with "Start" button (canonical format for tests)
-        if data.startswith("model:") or data.startswith("modelk:"):
             try:
-                await query.answer()
+                await query.answer("✅ Результаты отправлены")
             except:
                 pass
-            
-            # Используем новый каталог
-            user_lang = get_user_language(user_id)
-            
+            return ConversationHandler.END
+        
+        if data.startswith("gen_repeat:"):
+            # Answer callback immediately
             try:
-                from app.helpers.models_menu_handlers import handle_model_callback
-                success = await handle_model_callback(query, user_id, user_lang, data)
-                
-                if success:
-                    return SELECTING_MODEL
-                else:
-                    return ConversationHandler.END
-            except Exception as e:
-                logger.error(f"Error in handle_model_callback (second handler): {e}", exc_info=True)
-                # Fallback на старый код
+                await query.answer()
+            except:
                 pass
             
-            # Fallback на старый код
+            # Repeat generation with same parameters
             parts = data.split(":", 1)
             if len(parts) < 2:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_invalid_model', lang=user_lang, default="❌ Ошибка: неверный формат запроса"), show_alert=True)
+                try:
+                    await query.answer("Ошибка: неверный формат запроса", show_alert=True)
+                except:
+                    pass
+                return ConversationHandler.END
+            try:
+                gen_id = int(parts[1])
+            except (ValueError, TypeError):
+                try:
+                    await query.answer("Ошибка: неверный ID генерации", show_alert=True)
+                except:
+                    pass
                 return ConversationHandler.END
+            gen = get_generation_by_id(user_id, gen_id)
             
-            model_id = parts[1] if len(parts) > 1 else None
-            if not model_id:
-                # Пробуем разрешить через новый каталог
-                from app.helpers.models_menu import resolve_model_id_from_callback
-                model_id = resolve_model_id_from_callback(data)
-            
-            if not model_id:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_model_not_found', lang=user_lang, default=f"❌ Модель не найдена"), show_alert=True)
+            if not gen:
+                try:
+                    await query.answer("❌ Генерация не найдена", show_alert=True)
+                except:
+                    pass
                 return ConversationHandler.END
             
-            logger.info(f"Model card requested: model_id={model_id}, user_id={user_id}")
-            
-            # Пробуем получить из нового каталога
-            from app.kie_catalog import get_model as get_model_from_catalog
-            catalog_model = get_model_from_catalog(model_id)
-            
-            if catalog_model:
-                # Используем новый каталог
-                from app.helpers.models_menu import build_model_card_text
-                card_text, keyboard_markup = build_model_card_text(catalog_model, 0, user_lang)
-                try:
-                    await query.edit_message_text(
-                        card_text,
-                        reply_markup=keyboard_markup,
-                        parse_mode='HTML'
-                    )
-                    return SELECTING_MODEL
-                except Exception as e:
-                    logger.error(f"Error showing model card: {e}", exc_info=True)
-                    await query.answer("❌ Ошибка при отображении модели", show_alert=True)
-                    return ConversationHandler.END
+            # Restore session from history
+            model_id = gen.get('model_id')
+            params = gen.get('params', {})
+            model_info = get_model_by_id(model_id)
             
-            # Fallback на старый код
-            # Get model from registry
-            model_info = get_model_by_id_from_registry(model_id)
             if not model_info:
-                user_lang = get_user_language(user_id)
-                await query.answer(t('error_model_not_found', lang=user_lang, default=f"❌ Модель {model_id} не найдена"), show_alert=True)
-                return ConversationHandler.END
-            
-            # Check if model is coming soon
-            if model_info.get('coming_soon', False):
-                user_lang = get_user_language(user_id)
-                keyboard = [
-                    [InlineKeyboardButton(t('btn_back_to_models', lang=user_lang), callback_data="back_to_menu")]
-                ]
-                error_msg = t('error_model_unavailable', lang=user_lang) or "Модель временно недоступна"
                 try:
-                    await query.edit_message_text(
-                        error_msg,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                except Exception as edit_error:
-                    logger.warning(f"Could not edit message for coming_soon model: {edit_error}")
-                    try:
-                        await query.message.reply_text(error_msg, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='HTML')
-                        try:
-                            await query.message.delete()
-                        except:
-                            pass
-                    except:
-                        await query.answer(error_msg, show_alert=True)
+                    await query.answer("❌ Модель не найдена", show_alert=True)
+                except:
+                    pass
                 return ConversationHandler.END
             
-            # Show model card with info and "Start" button
-            user_balance = await get_user_balance_async(user_id)
-            is_admin = get_is_admin(user_id)
             user_lang = get_user_language(user_id)
             
-            is_admin_check = get_is_admin(user_id) if user_id is not None else is_admin
-            min_price = get_from_price_value(model_id)
-            price_text = get_model_price_text(model_id, None, is_admin_check, user_id)
-            try:
-                from app.services.pricing_service import get_model_price_info
-                from app.config import get_settings
-
-                settings = get_settings()
-                mode_index = _resolve_mode_index(model_id, {}, user_id)
-                price_info = get_model_price_info(model_id, mode_index, settings, is_admin=is_admin_check)
-                trace_event(
-                    "info",
-                    correlation_id,
-                    event="PRICE_CALC",
-                    stage="PRICE_CALC",
-                    update_type="callback",
-                    action="SELECT_MODEL",
-                    action_path=build_action_path(data),
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    model_id=model_id,
-                    official_usd=price_info.get("official_usd") if price_info else None,
-                    rate=price_info.get("usd_to_rub") if price_info else None,
-                    multiplier=price_info.get("price_multiplier") if price_info else None,
-                    price_rub=min_price,
-                    is_admin=is_admin_check,
-                    pricing_source="catalog",
-                    always_fields=[
-                        "model_id",
-                        "official_usd",
-                        "rate",
-                        "multiplier",
-                        "price_rub",
-                        "is_admin",
-                        "pricing_source",
-                    ],
-                )
-            except Exception as price_exc:
-                logger.debug("Pricing trace skipped: %s", price_exc)
-            
-            # Format model card
-            model_name = model_info.get('name', model_id)
-            model_emoji = model_info.get('emoji', '🤖')
-            model_desc = model_info.get('description', '')
-            model_category = model_info.get('category', 'Общее')
-            
-            model_info_text = (
-                f"{model_emoji} <b>{model_name}</b>\n\n"
-                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            )
-            
-            if model_category:
-                model_info_text += f"📁 <b>Категория:</b> {model_category}\n"
-            
-            if model_desc:
-                model_info_text += f"\n📝 <b>Описание:</b>\n{model_desc}\n\n"
-            
-            model_info_text += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            model_info_text += f"💰 <b>Стоимость:</b> {price_text}\n\n"
+            user_sessions[user_id] = {
+                'model_id': model_id,
+                'model_info': model_info,
+                'params': params.copy(),
+                'properties': model_info.get('input_params', {}),
+                'required': []
+            }
             
-            # Build keyboard with "Start" button
-            keyboard = [
-                [InlineKeyboardButton("🚀 Старт", callback_data=f"select_model:{model_id}")],
-                [InlineKeyboardButton(t('btn_back_to_models', lang=user_lang), callback_data="back_to_menu")]
-            ]
+            # Go directly to confirmation
+            try:
+                await query.answer("✅ Параметры восстановлены")
+            except:
+                pass
             
-            # Try to edit message, fallback to reply if edit fails
             try:
+                # Format parameters for display
+                params = gen.get('params', {})
+                params_preview = "\n".join([f"  • {k}: {str(v)[:50]}{'...' if len(str(v)) > 50 else ''}" for k, v in list(params.items())[:5]])
+                if len(params) > 5:
+                    params_preview += f"\n  ... и еще {len(params) - 5} параметров"
+                
+                if user_lang == 'ru':
+                    repeat_msg = (
+                        "🔄 <b>Повторная генерация</b>\n\n"
+                        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        f"🤖 <b>Модель:</b> {model_info.get('name', model_id)}\n\n"
+                        f"⚙️ <b>Параметры восстановлены из истории:</b>\n{params_preview if params_preview else '  (нет параметров)'}\n\n"
+                        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        "💡 <b>Что будет дальше:</b>\n"
+                        "• Параметры уже заполнены\n"
+                        "• Вы можете сразу начать генерацию\n"
+                        "• Или вернуться и изменить параметры\n\n"
+                        "🚀 <b>Подтвердите генерацию:</b>"
+                    )
+                else:
+                    repeat_msg = (
+                        "🔄 <b>Repeat generation</b>\n\n"
+                        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        f"🤖 <b>Model:</b> {model_info.get('name', model_id)}\n\n"
+                        f"⚙️ <b>Parameters restored from history:</b>\n{params_preview if params_preview else '  (no parameters)'}\n\n"
+                        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        "💡 <b>What's next:</b>\n"
+                        "• Parameters are already filled\n"
+                        "• You can start generation immediately\n"
+                        "• Or go back and change parameters\n\n"
+                        "🚀 <b>Confirm generation:</b>"
+                    )
+                
+                logger.info(f"✅ [UX IMPROVEMENT] Sending improved repeat generation message to user {user_id}")
                 await query.edit_message_text(
-                    model_info_text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    repeat_msg,
+                    reply_markup=InlineKeyboardMarkup([
+                        [InlineKeyboardButton(t('btn_confirm_generate_text', lang=user_lang), callback_data="confirm_generate")],
+                        [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
+                        [InlineKeyboardButton(t('btn_back_to_history', lang=user_lang), callback_data="my_generations")],
+                        [InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")]
+                    ]),
                     parse_mode='HTML'
                 )
-            except Exception as edit_error:
-                logger.warning(f"Could not edit message in model: handler: {edit_error}, sending new message")
+            except Exception as e:
+                logger.error(f"Error editing message in gen_repeat: {e}", exc_info=True)
                 try:
-                    await query.message.reply_text(
-                        model_info_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='HTML'
-                    )
-                    try:
-                        await query.message.delete()
-                    except:
-                        pass
-                except Exception as send_error:
-                    logger.error(f"Could not send new message in model: handler: {send_error}", exc_info=True)
-                    await query.answer(t('error_try_start', lang=user_lang, default="❌ Ошибка отображения. Попробуйте /start"), show_alert=True)
-            
-            return ConversationHandler.END
-        
-        mode_selected = False
-        if data.startswith("select_mode:"):
-            parts = data.split(":")
-            if len(parts) < 3:
-                await query.answer("Ошибка: неверный формат режима", show_alert=True)
-                return ConversationHandler.END
-            model_id = parts[1]
-            try:
-                mode_index = int(parts[2])
-            except ValueError:
-                await query.answer("Ошибка: неверный режим", show_alert=True)
-                return ConversationHandler.END
-            if user_id not in user_sessions:
-                user_sessions[user_id] = {}
-            from app.kie_catalog import get_model as get_catalog_model
-
-            model_spec = get_catalog_model(model_id)
-            model_gen_type = _derive_model_gen_type(model_spec)
-            mode_quote = _resolve_mode_price_quote(model_id, mode_index, model_gen_type)
-            if not mode_quote:
-                user_lang = get_user_language(user_id)
-                log_structured_event(
-                    correlation_id=correlation_id,
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    update_id=update_id,
-                    action="pricing_miss",
-                    action_path=build_action_path(data),
-                    model_id=model_id,
-                    gen_type=model_gen_type,
-                    stage="MODE_SELECTION",
-                    outcome="blocked",
-                    error_code="NO_PRICE_FOR_PARAMS",
-                    fix_hint="Добавьте SKU/маппинг или скройте пресет.",
-                    param={
-                        "mode_index": mode_index,
-                        "params": {},
-                    },
-                )
-                blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
-                await query.edit_message_text(blocked_text, parse_mode="HTML")
-                return ConversationHandler.END
-            user_sessions[user_id]["mode_index"] = mode_index
-            _prefill_params_from_quote(user_sessions[user_id], model_id, mode_quote)
-            log_structured_event(
-                correlation_id=correlation_id,
-                user_id=user_id,
-                chat_id=query.message.chat_id if query.message else None,
-                update_id=update_id,
-                action="MODE_SELECTED",
-                action_path=build_action_path(data),
-                model_id=model_id,
-                param={"mode_index": mode_index},
-                outcome="selected",
-            )
-            data = f"select_model:{model_id}"
-            mode_selected = True
-
-        if data.startswith("sku:") or data.startswith("sk:"):
-            await query.answer()
-            from app.pricing.ssot_catalog import get_sku_by_id
-
-            session = ensure_session_cached(context, session_store, user_id, update_id)
-            sku_id, parsed_params = _parse_sku_callback_data(data)
-            if sku_id:
-                session["sku_id"] = sku_id
-            if parsed_params:
-                session["prefill_params"] = dict(parsed_params)
-            sku = get_sku_by_id(sku_id) if sku_id else None
-            if not sku:
-                user_lang = get_user_language(user_id)
-                await query.edit_message_text(
-                    "❌ Неверная бесплатная опция" if user_lang == "ru" else "❌ Invalid free option",
-                )
-                return ConversationHandler.END
-            session["prefill_params"] = dict(sku.params)
-            session["sku_id"] = sku.sku_id
-            data = f"select_model:{canonicalize_model_id(sku.model_id)}"
-
-        # Handle select_model: callback - starts generation flow directly (legacy, still supported)
-        # Also handles start: callback (redirects to select_model:)
-        if data.startswith("select_model:") or data.startswith("sel:"):
-            # Handle short format sel: -> select_model:
-            if data.startswith("sel:"):
-                parts = data.split(":", 1)
-                if len(parts) >= 2:
-                    model_id = parts[1]
-                    # Try to find full model_id by prefix (for backward compatibility)
-                    # In most cases, sel: prefix means it was truncated, so we need to search
-                    models = get_models_sync()
-                    matching_models = [m for m in models if m.get('id', '').startswith(model_id)]
-                    if matching_models:
-                        model_id = canonicalize_model_id(matching_models[0].get('id'))
-                        data = f"select_model:{model_id}"
+                    # Format parameters for display
+                    params = gen.get('params', {})
+                    params_preview = "\n".join([f"  • {k}: {str(v)[:50]}{'...' if len(str(v)) > 50 else ''}" for k, v in list(params.items())[:5]])
+                    if len(params) > 5:
+                        params_preview += f"\n  ... и еще {len(params) - 5} параметров"
+                    
+                    if user_lang == 'ru':
+                        repeat_msg = (
+                            "🔄 <b>Повторная генерация</b>\n\n"
+                            "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                            f"🤖 <b>Модель:</b> {model_info.get('name', model_id)}\n\n"
+                            f"⚙️ <b>Параметры восстановлены из истории:</b>\n{params_preview if params_preview else '  (нет параметров)'}\n\n"
+                            "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                            "💡 <b>Что будет дальше:</b>\n"
+                            "• Параметры уже заполнены\n"
+                            "• Вы можете сразу начать генерацию\n"
+                            "• Или вернуться и изменить параметры\n\n"
+                            "🚀 <b>Подтвердите генерацию:</b>"
+                        )
                     else:
-                        data = f"select_model:{canonicalize_model_id(model_id)}"
-            
-            # 🔥 MAXIMUM LOGGING: select_model entry
-            logger.debug(f"🔥🔥🔥 SELECT_MODEL START: user_id={user_id}, data={data}")
-            reset_session_context(
-                user_id,
-                reason="select_model",
-                clear_gen_type=False,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                chat_id=query.message.chat_id if query.message else None,
-            )
-            if not mode_selected and user_id in user_sessions:
-                user_sessions[user_id].pop("mode_index", None)
-            
-            # Answer callback immediately to show button was pressed
+                        repeat_msg = (
+                            "🔄 <b>Repeat generation</b>\n\n"
+                            "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                            f"🤖 <b>Model:</b> {model_info.get('name', model_id)}\n\n"
+                            f"⚙️ <b>Parameters restored from history:</b>\n{params_preview if params_preview else '  (no parameters)'}\n\n"
+                            "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                            "💡 <b>What's next:</b>\n"
+                            "• Parameters are already filled\n"
+                            "• You can start generation immediately\n"
+                            "• Or go back and change parameters\n\n"
+                            "🚀 <b>Confirm generation:</b>"
+                        )
+                    
+                    logger.info(f"✅ [UX IMPROVEMENT] Sending improved repeat generation message (fallback) to user {user_id}")
+                    await query.message.reply_text(
+                        repeat_msg,
+                        reply_markup=InlineKeyboardMarkup([
+                            [InlineKeyboardButton("✅ Генерировать" if user_lang == 'ru' else "✅ Generate", callback_data="confirm_generate")],
+                            [InlineKeyboardButton(_get_settings_label(user_lang), callback_data="show_parameters")],
+                            [InlineKeyboardButton("◀️ Назад к истории" if user_lang == 'ru' else "◀️ Back to history", callback_data="my_generations")],
+                            [InlineKeyboardButton(t('btn_home', lang=user_lang), callback_data="back_to_menu")]
+                        ]),
+                        parse_mode='HTML'
+                    )
+                except:
+                    pass
+            return CONFIRMING_GENERATION
+        
+        if data.startswith("gen_history:"):
+            # Answer callback immediately
             try:
                 await query.answer()
-                logger.info(f"✅ Query answered for select_model: user_id={user_id}")
-            except Exception as e:
-                logger.warning(f"⚠️ Failed to answer query: {e}")
+            except:
+                pass
             
-            parts = data.split(":", 1)
-            if len(parts) < 2:
-                logger.error(f"❌ Invalid select_model format: data={data}, user_id={user_id}")
+            # Navigate through generation history
+            parts = data.split(":", 2)
+            if len(parts) < 3:
                 try:
-                    await query.answer("Ошибка: неверный формат запроса", show_alert=True)
+                    await query.answer("❌ Ошибка навигации", show_alert=True)
                 except:
                     pass
+                return ConversationHandler.END
+            
+            try:
+                current_gen_id = int(parts[1])
+            except (ValueError, TypeError):
                 try:
-                    await query.edit_message_text("❌ Ошибка: неверный формат запроса.")
+                    await query.answer("❌ Ошибка: неверный ID генерации", show_alert=True)
                 except:
-                    try:
-                        await query.message.reply_text("❌ Ошибка: неверный формат запроса.")
-                    except:
-                        pass
+                    pass
                 return ConversationHandler.END
-            model_id = canonicalize_model_id(parts[1])
-            logger.debug(f"🔥🔥🔥 SELECT_MODEL: Parsed model_id={model_id}, user_id={user_id}")
             
-            # Сначала пробуем получить из нового каталога
-            model_info = None
-            catalog_model = None
-            try:
-                from app.kie_catalog import get_model as get_model_from_catalog
-                catalog_model = get_model_from_catalog(model_id)
-                if catalog_model:
-                    # Преобразуем catalog_model в формат model_info для совместимости
-                    model_info = {
-                        'id': catalog_model.id,
-                        'name': catalog_model.title_ru,
-                        'emoji': '🤖',  # Будет определено позже
-                        'description': catalog_model.title_ru,
-                        'category': catalog_model.type,
-                        'coming_soon': False
-                    }
-                    logger.info(f"✅ SELECT_MODEL: Found in catalog: model_id={model_id}, name={catalog_model.title_ru}, user_id={user_id}")
-            except Exception as e:
-                logger.warning(f"⚠️ SELECT_MODEL: Error loading from catalog: {e}, trying registry")
+            direction = parts[2]  # prev or next
             
-            # Если не нашли в каталоге, пробуем старый реестр
-            if not model_info:
-                model_info = get_model_by_id_from_registry(model_id)
-                logger.debug(f"🔥🔥🔥 SELECT_MODEL: Model lookup result: found={bool(model_info)}, model_name={model_info.get('name', 'N/A') if model_info else 'N/A'}, user_id={user_id}")
+            history = get_user_generations_history(user_id, limit=100)
+            if not history:
+                try:
+                    await query.answer("❌ История пуста", show_alert=True)
+                except:
+                    pass
+                return ConversationHandler.END
             
-            if not model_info:
-                logger.error(f"❌❌❌ MODEL NOT FOUND: model_id={model_id}, user_id={user_id}")
-                user_lang = get_user_language(user_id)
-                error_msg = t('error_model_not_found', lang=user_lang, default=f"❌ Модель {model_id} не найдена")
+            # Find current generation index
+            current_index = -1
+            for i, gen in enumerate(history):
+                if gen.get('id') == current_gen_id:
+                    current_index = i
+                    break
+            
+            if current_index == -1:
                 try:
-                    await query.edit_message_text(error_msg)
+                    await query.answer("❌ Генерация не найдена", show_alert=True)
                 except:
-                    try:
-                        await query.message.reply_text(error_msg)
-                    except:
-                        await query.answer(error_msg, show_alert=True)
+                    pass
                 return ConversationHandler.END
             
-            # Check if model is coming soon - НЕ показываем пользователю, просто возвращаем в меню
-            if model_info.get('coming_soon', False):
-                user_lang = get_user_language(user_id)
-                # Не показываем "COMING SOON" - просто возвращаем в меню
-                keyboard = [
-                    [InlineKeyboardButton(t('btn_back_to_models', lang=user_lang), callback_data="back_to_menu")]
-                ]
-                
-                await query.edit_message_text(
-                    t('error_model_unavailable', lang=user_lang) or "Модель временно недоступна",
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
+            # Navigate
+            if direction == 'prev' and current_index < len(history) - 1:
+                new_index = current_index + 1
+            elif direction == 'next' and current_index > 0:
+                new_index = current_index - 1
+            else:
+                try:
+                    await query.answer("⚠️ Это первая/последняя генерация", show_alert=True)
+                except:
+                    pass
                 return ConversationHandler.END
-
-            # Load model spec early (needed for multi-mode selection)
-            from app.kie_catalog import get_model
-            model_spec = get_model(model_id)
-            if not model_spec:
-                await query.edit_message_text(
-                    "❌ <b>Модель не найдена в каталоге</b>",
-                    parse_mode='HTML'
+            
+            user_lang = get_user_language(user_id)
+            
+            gen = history[new_index]
+            from datetime import datetime
+            
+            timestamp = gen.get('timestamp', 0)
+            if timestamp:
+                date_str = datetime.fromtimestamp(timestamp).strftime('%d.%m.%Y %H:%M')
+            else:
+                date_str = 'Неизвестно'
+            
+            model_name = gen.get('model_name', gen.get('model_id', 'Unknown'))
+            result_urls = gen.get('result_urls', [])
+            price = gen.get('price', 0)
+            is_free = gen.get('is_free', False)
+            
+            if user_lang == 'ru':
+                history_text = (
+                    f"📚 <b>Мои генерации</b>\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"📊 <b>Всего генераций:</b> {len(history)}\n"
+                    f"📍 <b>Показана:</b> {new_index + 1} из {len(history)}\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"🎨 <b>Генерация #{gen.get('id', 1)}</b>\n\n"
+                    f"📅 <b>Дата создания:</b> {date_str}\n"
+                    f"🤖 <b>Модель:</b> {model_name}\n"
+                    f"💰 <b>Стоимость:</b> {'🎁 Бесплатно' if is_free else format_rub_amount(price)}\n"
+                    f"📦 <b>Результатов:</b> {len(result_urls)}\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"💡 <b>Что можно сделать:</b>\n"
+                    f"• Просмотреть результат генерации\n"
+                    f"• Повторить генерацию с теми же параметрами\n"
+                    f"• Перейти к другой генерации\n\n"
+                    f"🔄 <b>Навигация:</b> Используйте кнопки ниже"
                 )
-                return ConversationHandler.END
-            from app.pricing.coverage_guard import (
-                DISABLED_REASON_NO_PRICE,
-                get_disabled_model_info,
-                get_pricing_preflight_status,
+            else:
+                history_text = (
+                    f"📚 <b>My Generations</b>\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"📊 <b>Total generations:</b> {len(history)}\n"
+                    f"📍 <b>Showing:</b> {new_index + 1} of {len(history)}\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"🎨 <b>Generation #{gen.get('id', 1)}</b>\n\n"
+                    f"📅 <b>Created:</b> {date_str}\n"
+                    f"🤖 <b>Model:</b> {model_name}\n"
+                    f"💰 <b>Cost:</b> {'🎁 Free' if is_free else format_rub_amount(price)}\n"
+                    f"📦 <b>Results:</b> {len(result_urls)}\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                    f"💡 <b>What you can do:</b>\n"
+                    f"• View generation result\n"
+                    f"• Repeat generation with same parameters\n"
+                    f"• Navigate to another generation\n\n"
+                    f"🔄 <b>Navigation:</b> Use buttons below"
+                )
+            
+            logger.info(f"✅ [UX IMPROVEMENT] Sending improved generation history view to user {user_id}")
+            
+            keyboard = []
+            
+            # Navigation buttons
+            keyboard.append([
+                InlineKeyboardButton("◀️ Предыдущая", callback_data=f"gen_history:{gen.get('id', 1)}:prev"),
+                InlineKeyboardButton("Следующая ▶️", callback_data=f"gen_history:{gen.get('id', 1)}:next")
+            ])
+            
+            # Action buttons
+            if result_urls:
+                keyboard.append([
+                    InlineKeyboardButton("👁️ Показать результат", callback_data=f"gen_view:{gen.get('id', 1)}")
+                ])
+                keyboard.append([
+                    InlineKeyboardButton("🔄 Повторить", callback_data=f"gen_repeat:{gen.get('id', 1)}")
+                ])
+            
+            keyboard.append([InlineKeyboardButton(t('btn_back_to_menu', lang=user_lang), callback_data="back_to_menu")])
+            
+            await query.edit_message_text(
+                history_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
             )
-            preflight_status = get_pricing_preflight_status()
-            if preflight_status.get("degraded"):
+            return ConversationHandler.END
+        
+        # Handle start generation from model card (start:<model_id>)
+        if data.startswith("start:"):
+            try:
+                await query.answer()
+            except:
+                pass
+            
+            parts = data.split(":", 1)
+            if len(parts) < 2:
                 user_lang = get_user_language(user_id)
-                pricing_error = preflight_status.get("error") or "unknown"
-                message_text = (
-                    "⚠️ <b>Прайс временно недоступен</b>\n\n"
-                    "Мы не успели прогреть прайс. Попробуйте позже или выберите другую модель.\n\n"
-                    f"Лог: <code>{correlation_id}</code>"
-                    if user_lang == "ru"
-                    else (
-                        "⚠️ <b>Pricing temporarily unavailable</b>\n\n"
-                        "We are still warming up pricing data. Please try again later.\n\n"
-                        f"Log: <code>{correlation_id}</code>"
-                    )
-                )
-                keyboard = InlineKeyboardMarkup(
-                    [[InlineKeyboardButton("Модели/Главное меню", callback_data="back_to_menu")]]
-                )
-                log_structured_event(
-                    correlation_id=correlation_id,
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    update_id=update_id,
-                    action="PRICING_PREFLIGHT_DEGRADED",
-                    action_path="select_model",
-                    model_id=model_id,
-                    stage="MODEL_SELECT",
-                    outcome="blocked",
-                    error_code="PRICING_PREFLIGHT_DEGRADED",
-                    param={"error": pricing_error},
-                )
-                await query.edit_message_text(message_text, reply_markup=keyboard, parse_mode="HTML")
+                await query.answer(t('error_invalid_model', lang=user_lang, default="❌ Ошибка: неверный формат запроса"), show_alert=True)
                 return ConversationHandler.END
-            from app.ux.model_visibility import (
-                evaluate_model_visibility,
-                STATUS_BLOCKED_NO_PRICE,
-                STATUS_READY_VISIBLE,
-            )
-            visibility = evaluate_model_visibility(model_id)
-            if visibility.status != STATUS_READY_VISIBLE:
+            
+            model_id = parts[1]
+            # Перенаправляем на select_model для начала генерации
+            return await _handle_select_model_callback(update, context, data=f"select_model:{model_id}")
+        
+        # Handle example request (example:<model_id>)
+        if data.startswith("example:"):
+            try:
+                await query.answer()
+            except:
+                pass
+            
+            parts = data.split(":", 1)
+            if len(parts) < 2:
                 user_lang = get_user_language(user_id)
-                disabled_info = get_disabled_model_info(model_id)
-                if visibility.status == STATUS_BLOCKED_NO_PRICE or (
-                    disabled_info and disabled_info.reason == DISABLED_REASON_NO_PRICE
-                ):
-                    message_text = (
-                        "Модель временно отключена: отсутствует прайс для выбранных параметров. "
-                        "Выберите другую модель."
-                    )
-                    keyboard = InlineKeyboardMarkup(
-                        [[InlineKeyboardButton("Модели/Главное меню", callback_data="back_to_menu")]]
-                    )
-                    log_structured_event(
-                        correlation_id=correlation_id,
-                        user_id=user_id,
-                        chat_id=query.message.chat_id if query.message else None,
-                        update_id=update_id,
-                        action="MODEL_DISABLED",
-                        action_path="select_model",
-                        model_id=model_id,
-                        stage="MODEL_SELECT",
-                        outcome="blocked",
-                        error_code=DISABLED_REASON_NO_PRICE,
-                        param={
-                            "issues": disabled_info.issues if disabled_info else visibility.issues,
-                            "status": visibility.status,
-                        },
-                    )
-                    await query.edit_message_text(message_text, reply_markup=keyboard)
-                    return ConversationHandler.END
-
-                issues = "\n".join(f"• {issue}" for issue in visibility.issues) if visibility.issues else ""
-                if user_lang == "ru":
-                    blocked_text = (
-                        "⛔️ <b>Модель недоступна</b>\n\n"
-                        f"Причина: <code>{visibility.status}</code>\n"
-                        f"{issues or '• Причина не указана'}"
+                await query.answer(t('error_invalid_model', lang=user_lang, default="❌ Ошибка: неверный формат запроса"), show_alert=True)
+                return ConversationHandler.END
+            
+            model_id = parts[1]
+            user_lang = get_user_language(user_id)
+            
+            # Пробуем получить из нового каталога
+            from app.kie_catalog import get_model as get_model_from_catalog
+            catalog_model = get_model_from_catalog(model_id)
+            
+            if catalog_model:
+                # Используем новый каталог для примера
+                mode = catalog_model.modes[0] if catalog_model.modes else None
+                if user_lang == 'ru':
+                    example_text = (
+                        f"📸 <b>Пример запроса для {catalog_model.title_ru}</b>\n\n"
+                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        f"💡 <b>Тип генерации:</b> {catalog_model.type}\n\n"
                     )
                 else:
-                    blocked_text = (
-                        "⛔️ <b>Model unavailable</b>\n\n"
-                        f"Reason: <code>{visibility.status}</code>\n"
-                        f"{issues or '• No details available'}"
+                    example_text = (
+                        f"📸 <b>Example request for {catalog_model.title_ru}</b>\n\n"
+                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                        f"💡 <b>Generation type:</b> {catalog_model.type}\n\n"
                     )
-                await query.edit_message_text(blocked_text, parse_mode="HTML")
-                return ConversationHandler.END
-
-            session = ensure_session_cached(context, session_store, user_id, update_id)
-            session["model_id"] = model_id
-            session["model_info"] = model_info
-            session["active_model_id"] = model_id
-            session_gen_type = _resolve_session_gen_type(session, None)
-            model_gen_type = _derive_model_gen_type(model_spec)
-            if model_gen_type:
-                session["active_gen_type"] = model_gen_type
-                session["gen_type"] = model_gen_type
-            registry_gen_type = session.get("gen_type") or session_gen_type
-            registry_entry = await _get_registry_model_entry(
-                model_id,
-                correlation_id=correlation_id,
-                user_id=user_id,
-                gen_type=registry_gen_type,
-            )
-            if not registry_entry and model_gen_type and registry_gen_type != model_gen_type:
-                registry_entry = await _get_registry_model_entry(
-                    model_id,
-                    correlation_id=correlation_id,
-                    user_id=user_id,
-                    gen_type=model_gen_type,
-                )
-            if not registry_entry and registry_gen_type is not None:
-                registry_entry = await _get_registry_model_entry(
-                    model_id,
-                    correlation_id=correlation_id,
-                    user_id=user_id,
-                    gen_type=None,
-                )
-            registry_kie_model = registry_entry.get("kie_model") if registry_entry else None
-            if not registry_entry or (
-                registry_kie_model and registry_kie_model != model_spec.kie_model
-            ):
-                user_lang = get_user_language(user_id)
-                notice_text = (
-                    "🔄 <b>Модель обновилась или недоступна</b>\n\n"
-                    "Пожалуйста, выберите модель из актуального списка."
-                    if user_lang == "ru"
-                    else "🔄 <b>Model updated or unavailable</b>\n\nPlease choose from the current list."
-                )
-                gen_type_hint = (
-                    session.get("active_gen_type")
-                    or session.get("gen_type")
-                    or _derive_model_gen_type(model_spec)
-                )
-                loading_text = (
-                    f"{notice_text}\n\n⏳ <b>Обновляю меню...</b>"
-                    if user_lang == "ru"
-                    else f"{notice_text}\n\n⏳ <b>Refreshing menu...</b>"
-                )
-                await _safe_edit_or_reply(query, loading_text, parse_mode="HTML")
-                if gen_type_hint:
-                    _create_background_task(
-                        _render_gen_type_menu(
-                            query=query,
-                            user_id=user_id,
-                            gen_type=_normalize_gen_type(gen_type_hint) or gen_type_hint,
-                            correlation_id=correlation_id,
-                            update_id=update_id,
-                            notice_text=notice_text,
-                        ),
-                        action="render_gen_type_menu_refresh",
+                
+                if mode:
+                    mode_label = _resolve_mode_label(mode, 0, user_lang)
+                    example_text += (
+                        f"⚙️ <b>Режим:</b> {mode_label}\n\n"
+                        if user_lang == 'ru'
+                        else f"⚙️ <b>Mode:</b> {mode_label}\n\n"
+                    )
+                
+                if user_lang == 'ru':
+                    example_text += (
+                        f"💡 <b>Совет:</b> После начала генерации вы сможете настроить все параметры пошагово.\n\n"
+                        f"🚀 <b>Готовы начать?</b> Нажмите кнопку ниже!"
                     )
                 else:
-                    reply_markup = build_back_to_menu_keyboard(user_lang)
-                    await _safe_edit_or_reply(query, notice_text, reply_markup=reply_markup)
-                return ConversationHandler.END
-
-            if session_gen_type and model_gen_type and session_gen_type != model_gen_type:
-                log_structured_event(
-                    correlation_id=correlation_id,
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    update_id=update_id,
-                    action="GEN_TYPE_AUTO_SWITCH_ON_SELECT",
-                    action_path="select_model",
-                    model_id=model_id,
-                    gen_type=model_gen_type,
-                    stage="MODEL_SELECT",
-                    outcome="auto_switched",
-                    param={
-                        "previous_gen_type": session_gen_type,
-                        "new_gen_type": model_gen_type,
-                    },
-                )
-                session["active_gen_type"] = model_gen_type
-                session["gen_type"] = model_gen_type
-
-            mode_index = user_sessions.get(user_id, {}).get("mode_index")
-            if model_spec.modes and len(model_spec.modes) > 1 and mode_index is None:
-                user_balance = await get_user_balance_async(user_id)
-                sku_id = session.get("sku_id", "")
-                source = session.get("free_source", "unknown")
-                is_free_available = await is_free_generation_available(user_id, sku_id, source)
-                is_admin_check = get_is_admin(user_id) if user_id is not None else False
-                min_price: Optional[float] = None
-                session["model_id"] = model_id
-                session["model_info"] = model_info
-                session["active_model_id"] = model_id
-                if model_gen_type:
-                    session["active_gen_type"] = model_gen_type
-                    session["gen_type"] = model_gen_type
-                session["waiting_for"] = "mode_index"
-                user_lang = get_user_language(user_id)
-                model_name = model_info.get("name", model_id)
-                available_mode_entries: List[tuple[int, Any]] = []
-                for idx, mode in enumerate(model_spec.modes):
-                    mode_quote = _resolve_mode_price_quote(model_id, idx, model_gen_type)
-                    if not mode_quote:
-                        log_structured_event(
-                            correlation_id=correlation_id,
-                            user_id=user_id,
-                            chat_id=query.message.chat_id if query.message else None,
-                            update_id=update_id,
-                            action="pricing_miss",
-                            action_path="mode_selection",
-                            model_id=model_id,
-                            gen_type=model_gen_type,
-                            stage="MODE_SELECTION",
-                            outcome="blocked",
-                            error_code="NO_PRICE_FOR_PARAMS",
-                            fix_hint="Добавьте SKU/маппинг или скройте пресет.",
-                            param={
-                                "mode_index": idx,
-                                "mode_notes": getattr(mode, "notes", None),
-                                "params": {},
-                            },
-                        )
-                        continue
-                    try:
-                        mode_price = float(mode_quote.price_rub)
-                        min_price = mode_price if min_price is None else min(min_price, mode_price)
-                    except Exception:
-                        pass
-                    available_mode_entries.append((idx, mode))
-
-                if not available_mode_entries:
-                    blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
-                    await query.edit_message_text(blocked_text, parse_mode="HTML")
-                    return ConversationHandler.END
-                if (
-                    not is_admin_check
-                    and not is_free_available
-                    and min_price is not None
-                    and user_balance < min_price
-                ):
+                    example_text += (
+                        f"💡 <b>Tip:</b> After starting generation, you'll be able to configure all parameters step by step.\n\n"
+                        f"🚀 <b>Ready to start?</b> Click the button below!"
+                    )
+                
+                keyboard = [
+                    [InlineKeyboardButton("🚀 Сгенерировать" if user_lang == 'ru' else "🚀 Generate", callback_data=f"select_model:{model_id}")],
+                    [InlineKeyboardButton("ℹ️ Инфо" if user_lang == 'ru' else "ℹ️ Info", callback_data=f"info:{model_id}")],
+                    [InlineKeyboardButton("⬅️ Назад" if user_lang == 'ru' else "⬅️ Back", callback_data=f"model:{model_id}")]
+                ]
+                
+                try:
                     await query.edit_message_text(
-                        _build_insufficient_funds_text(user_lang, min_price, user_balance),
-                        reply_markup=_build_insufficient_funds_keyboard(user_lang),
+                        text=example_text,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode='HTML'
                     )
+                    return SELECTING_MODEL
+                except Exception as e:
+                    logger.error(f"Error showing example from catalog: {e}", exc_info=True)
+                    await query.answer("❌ Ошибка при загрузке примера", show_alert=True)
                     return ConversationHandler.END
-                await query.edit_message_text(
-                    _build_mode_selection_text(model_name, user_lang),
-                    reply_markup=_build_mode_selection_keyboard(model_id, available_mode_entries, user_lang),
-                    parse_mode="HTML",
-                )
+            
+            # Fallback на старый код
+            model = get_model_by_id(model_id)
+            
+            if not model:
+                user_lang = get_user_language(user_id)
+                await query.answer(t('error_model_not_found', lang=user_lang, default="❌ Модель не найдена"), show_alert=True)
                 return ConversationHandler.END
-
-            input_params, required_params, forced_media_required = _apply_media_required_overrides(
-                model_spec,
-                model_spec.schema_properties or {},
-            )
             
-            # Check user balance and calculate available generations
-            user_balance = await get_user_balance_async(user_id)
-            is_admin = get_is_admin(user_id)
+            # Нормализуем модель
+            try:
+                from kie_models import normalize_model_for_api
+                normalized = normalize_model_for_api(model)
+            except:
+                normalized = model
             
-            # IMPORTANT: Use get_is_admin() if user_id is available to respect ADMIN_ID list.
-            is_admin_check = get_is_admin(user_id) if user_id is not None else is_admin
+            user_lang = get_user_language(user_id)
+            input_schema = normalized.get('input_schema') or normalized.get('input_params', {})
             
-            # Check for free generations for free models
-            sku_id = session.get("sku_id", "")
-            source = session.get("free_source", "unknown")
-            is_free_available = await is_free_generation_available(user_id, sku_id, source)
-            from app.pricing.free_policy import is_sku_free_daily
-            remaining_free = (
-                await get_user_free_generations_remaining(user_id)
-                if is_sku_free_daily(sku_id)
-                else 0
-            )
-
-            price_value, price_line, price_note = _resolve_price_for_display(
-                session,
-                model_id=model_id,
-                mode_index=_resolve_mode_index(model_id, session.get("params", {}), user_id),
-                gen_type=session.get("gen_type"),
-                params=session.get("params", {}),
-                user_lang=user_lang,
-                is_admin=is_admin_check,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                action_path="model_select_info",
-                user_id=user_id,
-                chat_id=query.message.chat_id if query.message else None,
-            )
-            if price_value is None:
-                blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
-                await query.edit_message_text(blocked_text, parse_mode="HTML")
-                return ConversationHandler.END
+            # Формируем пример запроса
+            example_text = f"📝 <b>Пример запроса для {normalized.get('title', model_id)}</b>\n\n"
+            example_text += f"<b>Параметры:</b>\n"
             
-            # Calculate how many generations available
-            if is_admin:
-                available_count = "Безлимит"
-            elif is_free_available:
-                # For free models with free generations, show free count
-                available_count = f"🎁 {remaining_free} бесплатно в день"
-            elif price_value is not None and price_value == 0:
-                # Free model (price is 0) - unlimited generations
-                available_count = "Безлимит"
-            elif price_value is not None and price_value > 0 and user_balance >= price_value:
-                available_count = int(user_balance / price_value)
-            else:
-                available_count = 0
+            import json
+            # Генерируем пример значений на основе схемы
+            example_params = {}
+            for param_name, param_type in input_schema.items():
+                if param_type == 'string':
+                    if 'prompt' in param_name.lower():
+                        example_params[param_name] = "Красивый закат над океаном"
+                    elif 'url' in param_name.lower():
+                        example_params[param_name] = "https://example.com/image.jpg"
+                    else:
+                        example_params[param_name] = "пример значения"
+                elif param_type == 'array':
+                    example_params[param_name] = ["https://example.com/image1.jpg"]
+                else:
+                    example_params[param_name] = "пример"
             
-            # Show model info with premium formatting
-            model_name = model_info.get('name', model_id)
-            model_emoji = model_info.get('emoji', '🤖')
-            model_desc = model_info.get('description', '')
-            model_category = model_info.get('category', 'Общее')
+            example_text += f"<code>{json.dumps(example_params, indent=2, ensure_ascii=False)}</code>\n\n"
+            example_text += f"💡 <b>Инструкция:</b>\n{normalized.get('help', 'Следуйте инструкциям модели')}"
             
-            # Check if new user for hints
-            is_new = await is_new_user_async(user_id)
+            keyboard = [
+                [InlineKeyboardButton("✅ Начать генерацию", callback_data=f"start:{model_id}")],
+                [InlineKeyboardButton("⬅️ Назад к модели", callback_data=f"model:{model_id}")]
+            ]
             
-            model_info_text = (
-                _build_model_card(model_spec, model_info, required_params, user_lang)
-                + "\n\n"
-                + "━━━━━━━━━━━━━━━━━━━━\n\n"
+            await query.edit_message_text(
+                text=example_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
             )
-            free_counter_line = ""
+            return SELECTING_MODEL
+        
+        # Handle info: callback - shows detailed model information
+        if data.startswith("info:"):
             try:
-                free_counter_line = await get_free_counter_line(
-                    user_id,
-                    user_lang=user_lang,
-                    correlation_id=correlation_id,
-                    action_path="model_select_info",
-                    sku_id=sku_id,
-                )
-            except Exception as exc:
-                logger.warning("Failed to resolve free counter line: %s", exc)
+                await query.answer()
+            except:
+                pass
             
-            balance_label = "Баланс" if user_lang == "ru" else "Balance"
-            balance_line = f"💵 <b>{balance_label}:</b> {format_rub_amount(user_balance)}"
-            model_info_text += f"{balance_line}\n{price_line}\n"
-            if price_note:
-                model_info_text += f"{price_note}\n"
+            parts = data.split(":", 1)
+            if len(parts) < 2:
+                user_lang = get_user_language(user_id)
+                await query.answer(t('error_invalid_model', lang=user_lang, default="❌ Ошибка: неверный формат запроса"), show_alert=True)
+                return ConversationHandler.END
             
-            # Add hint for new users
-            if is_new and sku_id in FREE_TOOL_SKU_IDS:
-                model_info_text += (
-                    f"\n💡 <b>Отлично для начала!</b>\n"
-                    f"Эта модель бесплатна для первых {FREE_GENERATIONS_PER_DAY} генераций в день.\n"
-                    f"Просто опишите, что хотите создать, и нажмите \"Генерировать\"!\n\n"
-                )
+            model_id = parts[1]
+            user_lang = get_user_language(user_id)
             
-            # КРИТИЧНО: Всегда показываем цену для всех пользователей
-            if is_admin:
-                model_info_text += (
-                    f"✅ <b>Доступ:</b> <b>Безлимит</b>\n"
-                    f"👑 <b>Статус:</b> Администратор\n\n"
-                )
-            else:
-                # Для обычных пользователей всегда показываем цену и баланс
-                if is_free_available:
-                    model_info_text += (
-                        f"🎁 <b>Бесплатно:</b> {remaining_free}/{FREE_GENERATIONS_PER_DAY} в день\n"
-                    )
-                    if price_value is not None and price_value > 0 and user_balance >= price_value:
-                        paid_count = int(user_balance / price_value)
-                        model_info_text += f"💳 <b>Платных:</b> {paid_count} генераций\n"
-                    model_info_text += "\n"
-                elif available_count == "Безлимит" or (isinstance(available_count, (int, float)) and available_count > 0):
-                    model_info_text += (
-                        f"✅ <b>Доступно:</b> {available_count} генераций\n"
-                        "\n"
-                    )
-                else:
-                    # Not enough balance - show warning
-                    model_info_text += (
-                        f"\n❌ <b>Недостаточно средств</b>\n\n"
-                        f"{balance_line}\n"
-                        f"{price_line}\n\n"
-                        f"💡 Пополните баланс для генерации"
-                    )
-
-                    if free_counter_line:
-                        model_info_text = _append_free_counter_text(model_info_text, free_counter_line)
-                    
-                    keyboard = [
-                        [InlineKeyboardButton(t('btn_top_up_balance', lang=user_lang), callback_data="topup_balance")],
-                        [InlineKeyboardButton(t('btn_back_to_models', lang=user_lang), callback_data="back_to_menu")]
-                    ]
-                    
+            # Пробуем получить из нового каталога
+            from app.kie_catalog import get_model as get_model_from_catalog
+            catalog_model = get_model_from_catalog(model_id)
+            
+            if catalog_model:
+                # Используем новый каталог для отображения информации
+                from app.helpers.models_menu import build_model_card_text
+                card_text, keyboard_markup = build_model_card_text(catalog_model, 0, user_lang)
+                try:
                     await query.edit_message_text(
-                        model_info_text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        card_text,
+                        reply_markup=keyboard_markup,
                         parse_mode='HTML'
                     )
+                    return SELECTING_MODEL
+                except Exception as e:
+                    logger.error(f"Error showing model info: {e}", exc_info=True)
+                    await query.answer("❌ Ошибка при загрузке информации о модели", show_alert=True)
                     return ConversationHandler.END
-
-            if free_counter_line:
-                model_info_text = _append_free_counter_text(model_info_text, free_counter_line)
             
-            # Check balance before starting generation (but allow free generations)
-            if not is_admin and not is_free_available and price_value is not None and user_balance < price_value:
-                user_lang = get_user_language(user_id)
-                keyboard = [
-                    [InlineKeyboardButton(t('btn_top_up_balance', lang=user_lang), callback_data="topup_balance")],
-                    [InlineKeyboardButton(t('btn_back_to_models', lang=user_lang), callback_data="back_to_menu")]
-                ]
-                
-                needed = price_value - user_balance
-                needed_str = format_rub_amount(needed)
-                remaining_free = await get_user_free_generations_remaining(user_id)
-                
+            # Fallback на старый код
+            model = get_model_by_id(model_id)
+            if not model:
+                user_lang = get_user_language(user_id)
+                await query.answer(t('error_model_not_found', lang=user_lang, default="❌ Модель не найдена"), show_alert=True)
+                return ConversationHandler.END
+            
+            # Нормализуем модель
+            try:
+                from kie_models import normalize_model_for_api
+                normalized = normalize_model_for_api(model)
+            except:
+                normalized = model
+            
+            user_lang = get_user_language(user_id)
+            input_schema = normalized.get('input_schema') or normalized.get('input_params', {})
+            
+            # Формируем детальную информацию о модели
+            if user_lang == 'ru':
+                info_text = (
+                    f"ℹ️ <b>Информация о модели: {normalized.get('title', model_id)}</b>\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                )
+            else:
+                info_text = (
+                    f"ℹ️ <b>Model Information: {normalized.get('title', model_id)}</b>\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                )
+            
+            if normalized.get('description'):
+                info_text += f"📝 <b>Описание:</b>\n{normalized.get('description')}\n\n"
+            
+            if input_schema:
                 if user_lang == 'ru':
-                    insufficient_msg = (
-                        f"❌ <b>Недостаточно средств для генерации</b>\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"{balance_line}\n"
-                        f"{price_line}\n"
-                        f"❌ <b>Не хватает:</b> {needed_str}\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"💡 <b>Что делать:</b>\n"
-                        f"• Пополните баланс через кнопку ниже\n"
-                    )
-                    
-                    if remaining_free > 0:
-                        insufficient_msg += f"• Используйте бесплатные генерации бесплатных моделей ({remaining_free} доступно)\n"
-                    
-                    insufficient_msg += (
-                        f"• Пригласите друга и получите бонусы\n\n"
-                        f"🔄 После пополнения попробуйте генерацию снова."
-                    )
+                    info_text += f"⚙️ <b>Параметры:</b>\n"
                 else:
-                    insufficient_msg = (
-                        f"❌ <b>Insufficient Funds for Generation</b>\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"{balance_line}\n"
-                        f"{price_line}\n"
-                        f"❌ <b>Need:</b> {needed_str}\n\n"
-                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                        f"💡 <b>What to do:</b>\n"
-                        f"• Top up balance via button below\n"
-                    )
-                    
-                    if remaining_free > 0:
-                        insufficient_msg += f"• Use free models generations ({remaining_free} available)\n"
-                    
-                    insufficient_msg += (
-                        f"• Invite a friend and get bonuses\n\n"
-                        f"🔄 After topping up, try generation again."
-                    )
+                    info_text += f"⚙️ <b>Parameters:</b>\n"
                 
-                await query.edit_message_text(
-                    insufficient_msg,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='HTML'
-                )
-                return ConversationHandler.END
+                for param_name, param_info in input_schema.items():
+                    if isinstance(param_info, dict):
+                        param_type = param_info.get('type', 'string')
+                        param_desc = param_info.get('description', '')
+                        required = param_info.get('required', False)
+                        req_text = " (обязательный)" if required else " (опциональный)"
+                        if user_lang != 'ru':
+                            req_text = " (required)" if required else " (optional)"
+                        info_text += f"• <b>{param_name}</b>: {param_type}{req_text}\n"
+                        if param_desc:
+                            info_text += f"  {param_desc}\n"
+                    else:
+                        info_text += f"• <b>{param_name}</b>: {param_info}\n"
             
-            # Store selected model
-            logger.debug(f"🔥🔥🔥 SELECT_MODEL: Created new session for user_id={user_id}")
-            session['model_id'] = model_id
-            session['model_info'] = model_info
-            session['active_model_id'] = model_id
-            session['active_gen_type'] = model_gen_type or session_gen_type or _resolve_session_gen_type(None, model_spec)
-            session['gen_type'] = session['active_gen_type']
-            set_session_context(
-                user_id,
-                to_context=UI_CONTEXT_WIZARD,
-                reason="select_model",
-                active_gen_type=session.get("active_gen_type"),
-                active_model_id=model_id,
-                correlation_id=correlation_id,
-                update_id=update_id,
-                chat_id=query.message.chat_id if query.message else None,
+            if normalized.get('help'):
+                info_text += f"\n💡 <b>Совет:</b>\n{normalized.get('help')}\n"
+            
+            keyboard = [
+                [InlineKeyboardButton("🚀 Сгенерировать" if user_lang == 'ru' else "🚀 Generate", callback_data=f"select_model:{model_id}")],
+                [InlineKeyboardButton("📸 Пример" if user_lang == 'ru' else "📸 Example", callback_data=f"example:{model_id}")],
+                [InlineKeyboardButton("⬅️ Назад" if user_lang == 'ru' else "⬅️ Back", callback_data=f"model:{model_id}")]
+            ]
+            
+            await query.edit_message_text(
+                text=info_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
             )
-            logger.debug(f"🔥🔥🔥 SELECT_MODEL: Stored model in session: model_id={model_id}, user_id={user_id}, session_keys={list(session.keys())}")
+            return SELECTING_MODEL
+        
+        if data.startswith("select_mode:"):
+            parts = data.split(":")
+            if len(parts) < 3:
+                await query.answer("Ошибка: неверный формат режима", show_alert=True)
+                return ConversationHandler.END
+            model_id = parts[1]
+            try:
+                mode_index = int(parts[2])
+            except ValueError:
+                await query.answer("Ошибка: неверный режим", show_alert=True)
+                return ConversationHandler.END
+            if user_id not in user_sessions:
+                user_sessions[user_id] = {}
+            from app.kie_catalog import get_model as get_catalog_model
 
+            model_spec = get_catalog_model(model_id)
+            model_gen_type = _derive_model_gen_type(model_spec)
+            mode_quote = _resolve_mode_price_quote(model_id, mode_index, model_gen_type)
+            if not mode_quote:
+                user_lang = get_user_language(user_id)
+                log_structured_event(
+                    correlation_id=correlation_id,
+                    user_id=user_id,
+                    chat_id=query.message.chat_id if query.message else None,
+                    update_id=update_id,
+                    action="pricing_miss",
+                    action_path=build_action_path(data),
+                    model_id=model_id,
+                    gen_type=model_gen_type,
+                    stage="MODE_SELECTION",
+                    outcome="blocked",
+                    error_code="NO_PRICE_FOR_PARAMS",
+                    fix_hint="Добавьте SKU/маппинг или скройте пресет.",
+                    param={
+                        "mode_index": mode_index,
+                        "params": {},
+                    },
+                )
+                blocked_text = format_pricing_blocked_message(model_id, user_lang=user_lang)
+                await query.edit_message_text(blocked_text, parse_mode="HTML")
+                return ConversationHandler.END
+            user_sessions[user_id]["mode_index"] = mode_index
+            _prefill_params_from_quote(user_sessions[user_id], model_id, mode_quote)
             log_structured_event(
                 correlation_id=correlation_id,
                 user_id=user_id,
                 chat_id=query.message.chat_id if query.message else None,
-                update_id=update.update_id,
-                action="MODEL_SELECT",
+                update_id=update_id,
+                action="MODE_SELECTED",
                 action_path=build_action_path(data),
                 model_id=model_id,
-                gen_type=session.get("gen_type"),
-                stage="MODEL_SELECT",
+                param={"mode_index": mode_index},
                 outcome="selected",
             )
-            log_structured_event(
-                correlation_id=correlation_id,
-                user_id=user_id,
-                chat_id=query.message.chat_id if query.message else None,
-                update_id=update.update_id,
-                action="MODEL_SELECTED",
-                action_path=build_action_path(data),
-                model_id=model_id,
-                gen_type=session.get("gen_type"),
-                stage="MODEL_SELECT",
-                outcome="selected",
+            return await _handle_select_model_callback(
+                update, context, data=f"select_model:{model_id}", mode_selected=True
             )
 
-            logger.info(
-                "✅ SELECT_MODEL: Using SSOT schema: count=%s, keys=%s, user_id=%s",
-                len(input_params),
-                list(input_params.keys()),
-                user_id,
-            )
-            input_params = _apply_unified_param_defaults(
-                input_params,
-                model_spec=model_spec,
-                session_gen_type=session.get("gen_type") or model_spec.model_type,
-            )
+        if data.startswith("sku:") or data.startswith("sk:"):
+            await query.answer()
+            from app.pricing.ssot_catalog import get_sku_by_id
 
-            # Store session data
-            session['params'] = {}
-            session['properties'] = input_params
-            session['required'] = required_params
-            session['required_original'] = (model_spec.schema_required or []).copy()
-            session['required_forced_media'] = forced_media_required
-            session['current_param'] = None
-            session['model_type'] = model_spec.model_type or model_spec.model_mode
-            session['model_mode'] = model_spec.model_mode
-            session['param_history'] = []
-            session['model_spec'] = model_spec
-            session['param_order'] = _build_param_order(input_params)
-            session['ssot_conflicts'] = _detect_ssot_conflicts(model_spec, input_params)
-            session['optional_media_params'] = []
-            session['image_ref_prompt'] = False
-            session['skipped_params'] = set()
-            mode_index = _resolve_mode_index(model_id, session.get("params"), user_id)
-            _update_price_quote(
-                session,
-                model_id=model_id,
-                mode_index=mode_index,
-                gen_type=session.get("gen_type"),
-                params=session.get("params", {}),
-                correlation_id=correlation_id,
-                update_id=update_id,
-                action_path="select_model",
-                user_id=user_id,
-                chat_id=query.message.chat_id if query.message else None,
-                is_admin=is_admin_check,
-            )
-            model_info.setdefault("input_params", input_params)
-            if model_spec.model_type in {"text_to_image", "text_to_video", "text_to_audio", "text_to_speech", "text"}:
-                if "image_input" in input_params or "image_urls" in input_params:
-                    session['image_ref_prompt'] = True
-            if "SSOT_CONFLICT_TEXT_MODEL_REQUIRES_IMAGE" in session['ssot_conflicts']:
-                media_param = _first_required_media_param(input_params)
-                if media_param:
-                    session['optional_media_params'] = [media_param]
-                    session['required'] = [
-                        name for name in session['required'] if name != media_param
-                    ]
-            if session['ssot_conflicts']:
-                log_structured_event(
-                    correlation_id=correlation_id,
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    update_id=update.update_id,
-                    action="SSOT_CONFLICT",
-                    action_path="select_model",
-                    model_id=model_id,
-                    outcome="detected",
-                    error_code="SSOT_CONFLICT_DETECTED",
-                    fix_hint="Проверьте модельный SSOT на противоречия.",
-                    param={"conflicts": session['ssot_conflicts']},
-                )
-            if forced_media_required:
-                log_structured_event(
-                    correlation_id=correlation_id,
-                    user_id=user_id,
-                    chat_id=query.message.chat_id if query.message else None,
-                    update_id=update.update_id,
-                    action="MEDIA_REQUIRED_OVERRIDE",
-                    action_path="select_model",
-                    model_id=model_id,
-                    gen_type=session.get("gen_type"),
-                    stage="MODEL_SELECT",
-                    outcome="forced",
-                    param={"forced_media": forced_media_required},
+            session = ensure_session_cached(context, session_store, user_id, update_id)
+            sku_id, parsed_params = _parse_sku_callback_data(data)
+            if sku_id:
+                session["sku_id"] = sku_id
+            if parsed_params:
+                session["prefill_params"] = dict(parsed_params)
+            sku = get_sku_by_id(sku_id) if sku_id else None
+            if not sku:
+                user_lang = get_user_language(user_id)
+                await query.edit_message_text(
+                    "❌ Неверная бесплатная опция" if user_lang == "ru" else "❌ Invalid free option",
                 )
-            logger.info(
-                "✅ SELECT_MODEL: Parameter order determined: %s, user_id=%s",
-                session['param_order'],
-                user_id,
-            )
-
-            if not input_params:
-                return await send_confirmation_message(update, context, user_id, source="select_model")
-
-            next_param_result = await start_next_parameter(update, context, user_id)
-            if next_param_result is None:
-                return await send_confirmation_message(update, context, user_id, source="select_model")
-            return next_param_result
-        
-        # Handle confirm_generate as fallback (in case state didn't switch properly)
-        if data == "confirm_generate":
-            # Answer callback immediately
-            try:
-                await query.answer()
-            except:
-                pass
-            
-            logger.info(f"confirm_generate callback received in button_callback (fallback)")
-            # Call confirm_generation function directly
-            # 🔴 API CALL: confirm_generation может вызывать KIE API
-            try:
-                await confirm_generation(update, context)
-                return ConversationHandler.END
-            except Exception as e:
-                logger.error(f"❌❌❌ ERROR in confirm_generation fallback: {e}", exc_info=True)
-                try:
-                    user_lang = get_user_language(user_id) if user_id else 'ru'
-                    error_msg = "Ошибка сервера, попробуйте позже" if user_lang == 'ru' else "Server error, please try later"
-                    await query.answer(error_msg, show_alert=True)
-                except Exception:
-                    pass
                 return ConversationHandler.END
+            session["prefill_params"] = dict(sku.params)
+            session["sku_id"] = sku.sku_id
+            return await _handle_select_model_callback(
+                update, context, data=f"select_model:{canonicalize_model_id(sku.model_id)}"
+            )
     
     # If we get here and no handler matched, log and return END
     except Exception as e:
@@ -18369,11 +18354,10 @@ def _get_param_price_variants(
     current_params: dict,
 ) -> tuple[bool, dict[str, float]]:
     try:
-        from app.pricing.price_ssot import list_model_skus, list_variants_with_prices
+        from app.pricing.price_ssot import list_variants_with_prices, model_price_params
     except Exception:
         return False, {}
-    skus = list_model_skus(model_id)
-    if not any(param_name in sku.params for sku in skus):
+    if param_name not in model_price_params(model_id):
         return False, {}
     variants = list_variants_with_prices(model_id, param_name, current_params or {})
     return True, {value: float(price) for value, price in variants}
@@ -20000,18 +19984,15 @@ async def _input_parameters_impl(update: Update, context: ContextTypes.DEFAULT_T
                 file = await context.bot.get_file(photo.file_id)
                 image_data = await file.download_as_bytearray()
                 
-                # Test OCR - extract text
+                # Test OCR - extract text (в пуле процессов, как и проверка платежей)
                 try:
-                    image = Image.open(BytesIO(image_data))
-                    try:
-                        extracted_text = pytesseract.image_to_string(image, lang='rus+eng')
-                    except Exception as e:
-                        logger.warning(f"Error with rus+eng, trying eng only: {e}")
-                        try:
-                            extracted_text = pytesseract.image_to_string(image, lang='eng')
-                        except Exception as e2:
-                            logger.warning(f"Error with eng, trying default: {e2}")
-                            extracted_text = pytesseract.image_to_string(image)
+                    from app.integrations.payment_ocr import recognize_payment_screenshot
+
+                    ocr = await recognize_payment_screenshot(
+                        bytes(image_data),
+                        tesseract_cmd=pytesseract.pytesseract.tesseract_cmd,
+                    )
+                    extracted_text = ocr.text
                 except Exception as e:
                     error_msg = str(e)
                     if "tesseract is not installed" in error_msg.lower() or "not in your path" in error_msg.lower():
@@ -20300,6 +20281,7 @@ async def _input_parameters_impl(update: Update, context: ContextTypes.DEFAULT_T
             
             photo = update.message.photo[-1]
             screenshot_file_id = photo.file_id
+            screenshot_unique_id = getattr(photo, 'file_unique_id', None)
             
             session = user_sessions[user_id]
             amount = session.get('topup_amount', 0)
@@ -20312,7 +20294,7 @@ async def _input_parameters_impl(update: Update, context: ContextTypes.DEFAULT_T
             
             try:
                 # Check for duplicate screenshot
-                if check_duplicate_payment(screenshot_file_id):
+                if check_duplicate_payment(screenshot_file_id, screenshot_unique_id):
                     await loading_msg.delete()
                     await update.message.reply_text(
                         f"⚠️ <b>Этот скриншот уже был использован</b>\n\n"
@@ -20325,6 +20307,33 @@ async def _input_parameters_impl(update: Update, context: ContextTypes.DEFAULT_T
                 file = await context.bot.get_file(photo.file_id)
                 image_data = await file.download_as_bytearray()
                 
+                # Повторная загрузка того же чека получает новый file_id — ищем по dHash
+                screenshot_hash = await asyncio.to_thread(compute_payment_screenshot_hash, image_data)
+                similar_payment = find_similar_payment(screenshot_hash) if screenshot_hash else None
+                if similar_payment:
+                    logger.warning(
+                        f"⚠️ Payment screenshot similar to payment #{similar_payment['payment_id']} "
+                        f"(distance={similar_payment['distance']}), user={user_id}"
+                    )
+                    payment = await add_payment_for_review_async(
+                        user_id,
+                        amount,
+                        screenshot_file_id,
+                        screenshot_unique_id=screenshot_unique_id,
+                        screenshot_hash=screenshot_hash,
+                        similar_payment=similar_payment,
+                    )
+                    await notify_admin_payment_review(context.bot, payment)
+                    await loading_msg.delete()
+                    await update.message.reply_text(
+                        f"⚠️ <b>Этот скриншот похож на уже использованный</b>\n\n"
+                        f"❌ Автоматическое начисление невозможно, платеж #{payment.get('id')} передан администратору на ручную проверку.\n\n"
+                        f"💡 Баланс будет начислен после проверки. Вопросы: @ferixdiii.",
+                        parse_mode='HTML'
+                    )
+                    user_sessions.pop(user_id, None)
+                    return ConversationHandler.END
+                
                 # Get expected phone from .env
                 expected_phone = os.getenv('PAYMENT_PHONE', '')
                 
@@ -20335,7 +20344,18 @@ async def _input_parameters_impl(update: Update, context: ContextTypes.DEFAULT_T
                 if OCR_AVAILABLE and PIL_AVAILABLE:
                     try:
                         # STRICT OCR ANALYSIS - validates real receipt
-                        analysis = await analyze_payment_screenshot(image_data, amount, expected_phone if expected_phone else None)
+                        async def _notify_queued(position: int) -> None:
+                            await loading_msg.edit_text(
+                                f"⏳ <b>Проверяем скриншот…</b>\n\nВы в очереди на проверку: {position}. Это займёт немного времени.",
+                                parse_mode='HTML',
+                            )
+
+                        analysis = await analyze_payment_screenshot(
+                            image_data,
+                            amount,
+                            expected_phone if expected_phone else None,
+                            on_queued=_notify_queued,
+                        )
                         logger.info(f"✅ Payment analysis result: valid={analysis.get('valid')}, amount={analysis.get('found_amount')}, phone={analysis.get('phone_found')}")
                     except Exception as e:
                         logger.error(f"❌ OCR API ERROR in analyze_payment_screenshot: {e}", exc_info=True)
@@ -20400,7 +20420,13 @@ async def _input_parameters_impl(update: Update, context: ContextTypes.DEFAULT_T
                 )
                 
                 # Add payment and auto-credit balance
-                payment = await add_payment_async(user_id, amount, screenshot_file_id)
+                payment = await add_payment_async(
+                    user_id,
+                    amount,
+                    screenshot_file_id,
+                    screenshot_unique_id=screenshot_unique_id,
+                    screenshot_hash=screenshot_hash,
+                )
                 new_balance = await get_user_balance_async(user_id)
                 balance_str = format_rub_amount(new_balance)
                 
@@ -25939,8 +25965,13 @@ async def poll_task_status(update: Update, context: ContextTypes.DEFAULT_TYPE, t
                             price = calculate_price_rub(model_id, params, is_admin_user)
                             # Refund if charge was made (idempotent - safe to call multiple times)
                             try:
-                                await add_user_balance_async(user_id, price)
-                                logger.info(f"💰 AUTO-REFUND: Refunded {price} to user {user_id} for failed task {task_id}")
+                                refund = await _refund_balance_once(
+                                    user_id=user_id, task_id=task_id, price=price, reason="task_failed"
+                                )
+                                logger.info(
+                                    f"💰 AUTO-REFUND: status={refund['status']} amount={refund.get('amount')} "
+                                    f"user {user_id} failed task {task_id}"
+                                )
                             except Exception as refund_error:
                                 logger.error(f"❌ Failed to refund user {user_id} for failed task {task_id}: {refund_error}")
                         
@@ -26028,8 +26059,13 @@ async def poll_task_status(update: Update, context: ContextTypes.DEFAULT_TYPE, t
                         if not is_free and user_id != ADMIN_ID:
                             price = calculate_price_rub(model_id, params, is_admin_user)
                             try:
-                                await add_user_balance_async(user_id, price)
-                                logger.info(f"💰 AUTO-REFUND: Refunded {price} to user {user_id} for timeout task {task_id}")
+                                refund = await _refund_balance_once(
+                                    user_id=user_id, task_id=task_id, price=price, reason="task_timeout"
+                                )
+                                logger.info(
+                                    f"💰 AUTO-REFUND: status={refund['status']} amount={refund.get('amount')} "
+                                    f"user {user_id} timeout task {task_id}"
+                                )
                             except Exception as refund_error:
                                 logger.error(f"❌ Failed to refund user {user_id} for timeout task {task_id}: {refund_error}")
                         
@@ -26063,8 +26099,13 @@ async def poll_task_status(update: Update, context: ContextTypes.DEFAULT_TYPE, t
                         logger.error("Missing price for refund on model %s", model_id)
                         price = 0.0
                     try:
-                        await add_user_balance_async(user_id, price)
-                        logger.info(f"💰 AUTO-REFUND: Refunded {price} to user {user_id} for timeout task {task_id}")
+                        refund = await _refund_balance_once(
+                            user_id=user_id, task_id=task_id, price=price, reason="task_timeout"
+                        )
+                        logger.info(
+                            f"💰 AUTO-REFUND: status={refund['status']} amount={refund.get('amount')} "
+                            f"user {user_id} timeout task {task_id}"
+                        )
                     except Exception as refund_error:
                         logger.error(f"❌ Failed to refund user {user_id} for timeout task {task_id}: {refund_error}")
                 
@@ -28270,11 +28311,9 @@ async def create_webhook_handler():
                 handler_total_ms=duration_ms,
                 route=request.path if "request" in locals() else None,
             )
-            try:
-                loop = asyncio.get_running_loop()
-                event_loop_lag_ms = max(0.0, (time.monotonic() - loop.time()) * 1000)
-            except RuntimeError:
-                event_loop_lag_ms = None
+            from app.observability.loop_monitor import current_lag_ms as current_loop_lag_ms
+
+            event_loop_lag_ms = current_loop_lag_ms()
             log_structured_event(
                 correlation_id=correlation_id,
                 request_id=request_id,
@@ -28316,6 +28355,7 @@ async def _run_webhook_initialization(
     logger.info("✅ Application initialized for webhook mode")
     start_delivery_reconciler(application.bot)
     start_dedupe_reconciler(application.bot)
+    _create_background_task(resume_broadcasts(application.bot), action="broadcast_resume")
 
     # 🚑 Гарантируем, что HTTP сервер с /webhook поднят даже без entrypoints/run_bot
     try:
@@ -24,9 +24,12 @@ from telegram import Update
 from app.bootstrap import create_application
 from bot_kie import create_bot_application
 from app.middleware.rate_limit import PerKeyRateLimiter, TTLCache
+from app.utils.expiring_map import ExpiringMap
+from app.observability.loop_monitor import current_lag_ms as current_loop_lag_ms
 from app.observability.structured_logs import log_critical_event, log_structured_event
 from app.observability.update_metrics import increment_metric as increment_update_metric
 from app.utils.healthcheck import start_health_server, stop_health_server
+from app.integrations.http_clients import close_http_clients
 from app.utils.logging_config import setup_logging
 
 logger = logging.getLogger(__name__)
@@ -35,7 +38,7 @@ _app_ready_event = asyncio.Event()
 _app_init_lock = asyncio.Lock()
 _app_init_task: Optional[asyncio.Task] = None
 _handler_ready: bool = False
-_seen_update_ids: set[int] = set()
+_seen_update_ids: ExpiringMap[bool] = ExpiringMap(max_size=int(os.getenv("WEBHOOK_SEEN_UPDATE_IDS_MAX", "5000")))
 _early_update_count: int = 0
 _early_update_log_last_ts: Optional[float] = None
 
@@ -81,12 +84,7 @@ def _resolve_client_ip(request: web.Request) -> str:
 def _is_duplicate(update_id: Optional[int]) -> bool:
     if update_id is None:
         return False
-    if update_id in _seen_update_ids:
-        return True
-    _seen_update_ids.add(update_id)
-    if len(_seen_update_ids) > 5000:
-        _seen_update_ids.clear()
-    return False
+    return _seen_update_ids.add(update_id)
 
 
 def build_webhook_handler(
@@ -666,11 +664,7 @@ def build_webhook_handler(
             )
 
         duration_ms = int((time.monotonic() - handler_start) * 1000)
-        try:
-            loop = asyncio.get_running_loop()
-            event_loop_lag_ms = max(0.0, (time.monotonic() - loop.time()) * 1000)
-        except RuntimeError:
-            event_loop_lag_ms = None
+        event_loop_lag_ms = current_loop_lag_ms()
         log_structured_event(
             correlation_id=correlation_id,
             request_id=request_id,
@@ -722,6 +716,21 @@ async def _initialize_application(settings):
     return application
 
 
+def build_kie_callback_route(application) -> Callable[[web.Request], Awaitable[web.StreamResponse]]:
+    """KIE pushes task completion here; in-flight waiters wake up, others go to delivery."""
+    from app.integrations.kie_stub import get_kie_client_or_stub
+    from app.kie.callbacks import build_kie_callback_handler
+    from app.storage import get_storage
+    from bot_kie import get_user_language
+
+    return build_kie_callback_handler(
+        get_bot=lambda: application.bot,
+        get_storage=get_storage,
+        get_kie_client=get_kie_client_or_stub,
+        get_user_language=get_user_language,
+    )
+
+
 async def _get_initialized_application(settings):
     global _app_init_task
     async with _app_init_lock:
@@ -730,10 +739,35 @@ async def _get_initialized_application(settings):
     return await _app_init_task
 
 
+async def _flush_storage_writes() -> None:
+    """Commit write-behind buffered storage updates before the process exits."""
+    try:
+        from app.generations.telegram_file_cache import flush_file_cache
+
+        await flush_file_cache()
+    except Exception as exc:
+        logger.warning("[RENDER] tg_file_cache_flush_on_shutdown_failed error=%s", exc)
+    try:
+        from app.storage import get_storage
+
+        flush = getattr(get_storage(), "flush_pending_writes", None)
+        if flush is not None:
+            await flush()
+    except Exception as exc:
+        logger.error("[RENDER] storage_flush_on_shutdown_failed error=%s", exc)
+
+
 async def main() -> None:
     """Start webhook-mode PTB application and healthcheck server."""
     setup_logging()
     logger.info("[RENDER] Starting webhook mode...")
+
+    try:
+        from app.integrations.payment_ocr import start_ocr_forkserver
+
+        start_ocr_forkserver()
+    except Exception as exc:
+        logger.warning("[RENDER] payment_ocr_forkserver_start_failed error=%s", exc)
     
     settings = None
     try:
@@ -762,16 +796,24 @@ async def main() -> None:
     # Строим webhook handler и обновляем health server
     logger.info("[RENDER] Step 3: Registering webhook handler...")
     webhook_handler = build_webhook_handler(application, settings)
+    kie_callback_handler = build_kie_callback_route(application)
     
     # Перезапускаем health server с webhook handler
     await stop_health_server()
-    await start_health_server(port=port, webhook_handler=webhook_handler, self_check=True)
+    await start_health_server(
+        port=port,
+        webhook_handler=webhook_handler,
+        self_check=True,
+        kie_callback_handler=kie_callback_handler,
+    )
     logger.info("[RENDER] Webhook handler registered, ready to receive updates")
 
     try:
         await asyncio.Event().wait()
     finally:
         await stop_health_server()
+        await _flush_storage_writes()
+        await close_http_clients()
 
 
 if __name__ == "__main__":
@@ -46,47 +46,6 @@ def log_api_response_time(operation_name: str, elapsed_time: float):
         logger.debug(f"⏱️ {operation_name} заняло {elapsed_time:.2f}с")
 
 
-def cleanup_old_sessions(user_sessions: Dict[int, Dict[str, Any]], max_age_hours: int = 24):
-    """
-    Очищает старые сессии пользователей.
-    
-    Args:
-        user_sessions: Словарь сессий пользователей
-        max_age_hours: Максимальный возраст сессии в часах (по умолчанию 24)
-    """
-    current_time = datetime.now()
-    expired_sessions = []
-    
-    for user_id, session in user_sessions.items():
-        # Проверяем время создания сессии
-        session_time = session.get('created_at')
-        if session_time:
-            if isinstance(session_time, str):
-                try:
-                    session_time = datetime.fromisoformat(session_time)
-                except:
-                    # Если не удалось распарсить, считаем сессию устаревшей
-                    expired_sessions.append(user_id)
-                    continue
-            
-            age = current_time - session_time
-            if age > timedelta(hours=max_age_hours):
-                expired_sessions.append(user_id)
-        else:
-            # Если нет времени создания, считаем сессию устаревшей
-            expired_sessions.append(user_id)
-    
-    # Удаляем устаревшие сессии
-    for user_id in expired_sessions:
-        del user_sessions[user_id]
-        logger.info(f"🧹 Удалена устаревшая сессия пользователя {user_id}")
-    
-    if expired_sessions:
-        logger.info(f"✅ Очищено {len(expired_sessions)} устаревших сессий")
-    
-    return len(expired_sessions)
-
-
 def get_session_stats(user_sessions: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
     """Возвращает статистику сессий."""
     current_time = datetime.now()
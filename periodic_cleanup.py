@@ -59,16 +59,8 @@ async def periodic_cleanup():
         except Exception as e:
             logger.error(f"❌ Ошибка при очистке кеша моделей: {e}", exc_info=True)
         
-        # 4. Очистка старых сессий
-        try:
-            from optimization_helpers import cleanup_old_sessions
-            from bot_kie import user_sessions
-            cleared = cleanup_old_sessions(user_sessions, max_age_hours=24)
-            logger.info(f"✅ Очистка сессий: удалено {cleared} сессий")
-        except ImportError:
-            logger.warning("⚠️ Модуль optimization_helpers не доступен")
-        except Exception as e:
-            logger.error(f"❌ Ошибка при очистке сессий: {e}", exc_info=True)
+        # Сессии пользователей здесь не чистятся: SessionStore сам вытесняет
+        # неактивные по SESSION_TTL_SECONDS.
         
         logger.info("✅ Периодическая очистка завершена успешно")
         return True
@@ -189,10 +189,11 @@ async def health_check(endpoint: str, timeout: float = 5.0) -> bool:
     """
     try:
         import aiohttp
+        from app.integrations.http_clients import get_session
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(endpoint, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
-                return response.status == 200
+        session = await get_session("default")
+        async with session.get(endpoint, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            return response.status == 200
                 
     except Exception as e:
         logger.debug(f"⚠️ Health check для {endpoint} не удался: {e}")
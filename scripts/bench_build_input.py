@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark build_input over every catalog model and mode.
+
+Compares the table-driven validator dispatch with the former sequential chain
+(every validator called for every model), and the cached schema registry with
+re-parsing models/kie_models.yaml on every call.
+
+Usage:
+    python scripts/bench_build_input.py --rounds 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_dir))
+
+from app.kie_catalog.catalog import load_catalog  # noqa: E402
+from app.kie_contract import schema_loader  # noqa: E402
+from app.services import kie_input_builder  # noqa: E402
+
+PAYLOAD = {"prompt": "a cat in a hat", "image_url": "https://example.com/a.png"}
+
+
+@contextmanager
+def _sequential_chain():
+    all_validators = tuple(rule.validator for rule in kie_input_builder._VALIDATOR_RULES)
+    original = kie_input_builder._validators_for
+    kie_input_builder._validators_for = lambda _model_id: all_validators
+    try:
+        yield
+    finally:
+        kie_input_builder._validators_for = original
+
+
+@contextmanager
+def _uncached_registry():
+    original = schema_loader._load_registry
+
+    def reload_every_call():
+        schema_loader.reset_registry_cache()
+        return original()
+
+    schema_loader._load_registry = reload_every_call
+    try:
+        yield
+    finally:
+        schema_loader._load_registry = original
+
+
+def _workload():
+    return [(model, mode_index) for model in load_catalog() for mode_index in range(max(1, len(model.modes)))]
+
+
+def _run(workload, rounds: int):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for model, mode_index in workload:
+            try:
+                kie_input_builder.build_input(model, dict(PAYLOAD), mode_index)
+            except Exception:
+                pass
+        samples.append((time.perf_counter() - started) * 1000)
+    per_call_us = statistics.median(samples) * 1000 / max(1, len(workload))
+    return {"round_ms_p50": round(statistics.median(samples), 2), "per_build_us": round(per_call_us, 1)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    workload = _workload()
+    _run(workload, 1)
+    dispatch = _run(workload, args.rounds)
+    with _sequential_chain():
+        sequential = _run(workload, args.rounds)
+    with _uncached_registry():
+        uncached = _run(workload, 1)
+    print(
+        json.dumps(
+            {
+                "builds_per_round": len(workload),
+                "sequential_chain": sequential,
+                "dispatch": dispatch,
+                "uncached_registry": uncached,
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
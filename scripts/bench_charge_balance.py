@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark charge_balance_once throughput: document layout vs row/ledger layout.
+
+Requires a disposable PostgreSQL (DATABASE_URL). Each run uses fresh partner ids,
+so existing tenants are not touched.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/bench_charge_balance.py --users 1000 --charges-per-user 3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_dir))
+
+from app.storage.postgres_row_storage import PostgresRowStorage  # noqa: E402
+from app.storage.postgres_storage import PostgresStorage  # noqa: E402
+
+
+async def _seed(storage: PostgresStorage, users: int, balance: float) -> None:
+    if isinstance(storage, PostgresRowStorage):
+        for user_id in range(1, users + 1):
+            await storage.set_user_balance(user_id, balance)
+        return
+    await storage.write_json_file(
+        storage.balances_file,
+        {str(user_id): balance for user_id in range(1, users + 1)},
+    )
+
+
+async def _run(storage: PostgresStorage, *, users: int, charges_per_user: int, concurrency: int) -> dict:
+    await _seed(storage, users, balance=float(charges_per_user) * 10.0)
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses: dict = {}
+
+    async def _charge(user_id: int, n: int) -> None:
+        async with semaphore:
+            result = await storage.charge_balance_once(
+                user_id,
+                10.0,
+                task_id=f"bench-{user_id}-{n}",
+                sku_id="bench",
+                model_id="bench",
+            )
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+
+    jobs = [_charge(user_id, n) for n in range(charges_per_user) for user_id in range(1, users + 1)]
+    started = time.perf_counter()
+    await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - started
+    return {
+        "backend": type(storage).__name__,
+        "charges": len(jobs),
+        "elapsed_s": round(elapsed, 3),
+        "charges_per_s": round(len(jobs) / elapsed, 1) if elapsed else None,
+        "statuses": statuses,
+    }
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--charges-per-user", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    args = parser.parse_args()
+
+    dsn = os.getenv("DATABASE_URL", "").strip()
+    if not dsn:
+        print("[ERROR] DATABASE_URL not set")
+        return 1
+    os.environ.setdefault("DB_MAX_CONN", "20")
+    run_id = uuid.uuid4().hex[:8]
+    results = []
+    for storage in (
+        PostgresStorage(dsn, partner_id=f"bench-doc-{run_id}"),
+        PostgresRowStorage(dsn, partner_id=f"bench-rows-{run_id}"),
+    ):
+        try:
+            results.append(
+                await _run(
+                    storage,
+                    users=args.users,
+                    charges_per_user=args.charges_per_user,
+                    concurrency=args.concurrency,
+                )
+            )
+        finally:
+            await storage.close()
+    print(json.dumps({"run_id": run_id, "users": args.users, "results": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark the dedupe / rate-limit structures at 100k distinct keys per second.
+
+Feeds a stream of mostly-new keys on a simulated clock (``--keys-per-sec``)
+through TTLCache and PerKeyRateLimiter and compares the per-operation cost with
+the former implementations (full scan of the dedupe dict on every call,
+unbounded bucket dict).
+
+Usage:
+    python scripts/bench_expiring_map.py --seconds 3 --keys-per-sec 100000 [--memory]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Hashable
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_dir))
+
+from app.middleware.rate_limit import PerKeyRateLimiter, TTLCache, TokenBucket  # noqa: E402
+
+
+class _ScanningTTLCache:
+    """TTLCache as it was: scans every entry on each call."""
+
+    def __init__(self, ttl_seconds: float, time_fn: Callable[[], float]) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._time_fn = time_fn
+        self._entries: Dict[Hashable, float] = {}
+
+    def seen(self, key: Hashable) -> bool:
+        now = self._time_fn()
+        expired = [k for k, ts in self._entries.items() if now - ts > self.ttl_seconds]
+        for k in expired:
+            self._entries.pop(k, None)
+        if key in self._entries:
+            return True
+        self._entries[key] = now
+        return False
+
+
+class _UnboundedLimiter:
+    def __init__(self, rate: float, capacity: float, time_fn: Callable[[], float]) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._time_fn = time_fn
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+
+    def check(self, key: Hashable, amount: float = 1.0):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket.create(self.rate, self.capacity, self._time_fn)
+        return bucket.consume(amount)
+
+
+def _run(name: str, op: Callable[[int], object], clock: list, keys_per_sec: int, total: int, memory: bool) -> None:
+    if memory:
+        tracemalloc.start()
+    step = 1.0 / keys_per_sec
+    started = time.perf_counter()
+    for i in range(total):
+        clock[0] += step
+        # 1 of 10 operations repeats a recent key (retries / double taps).
+        op(i - 5 if i % 10 == 0 else i)
+    elapsed = time.perf_counter() - started
+    line = (
+        f"{name:<28} ops={total:>8} total={elapsed:7.2f}s per_op={elapsed / total * 1e6:6.2f}us "
+        f"ops_per_sec={total / elapsed:>10.0f}"
+    )
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f" peak_mem={peak / 1e6:6.1f}MB"
+    print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3.0, help="simulated seconds of traffic")
+    parser.add_argument("--keys-per-sec", type=int, default=100_000)
+    parser.add_argument("--ttl", type=float, default=1.0)
+    parser.add_argument("--baseline-ops", type=int, default=5_000, help="ops for the scanning baseline (quadratic)")
+    parser.add_argument("--memory", action="store_true", help="track peak memory (slows every op down)")
+    args = parser.parse_args()
+    total = int(args.seconds * args.keys_per_sec)
+
+    clock = [0.0]
+    cache = TTLCache(args.ttl, time_fn=lambda: clock[0])
+    _run("TTLCache (expiring map)", cache.seen, clock, args.keys_per_sec, total, args.memory)
+
+    clock = [0.0]
+    legacy_cache = _ScanningTTLCache(args.ttl, time_fn=lambda: clock[0])
+    _run("TTLCache (full scan)", legacy_cache.seen, clock, args.keys_per_sec, min(total, args.baseline_ops), args.memory)
+
+    clock = [0.0]
+    limiter = PerKeyRateLimiter(5.0, 5.0, time_fn=lambda: clock[0])
+    _run("PerKeyRateLimiter (bounded)", limiter.check, clock, args.keys_per_sec, total, args.memory)
+    print(f"  live buckets={len(limiter)} stats={limiter.stats()}")
+
+    clock = [0.0]
+    legacy_limiter = _UnboundedLimiter(5.0, 5.0, time_fn=lambda: clock[0])
+    _run("PerKeyRateLimiter (dict)", legacy_limiter.check, clock, args.keys_per_sec, total, args.memory)
+    print(f"  live buckets={len(legacy_limiter._buckets)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark resolve_and_prepare_telegram_payload latency for multi-image results.
+
+Serves fake PNG results from a local aiohttp server with a fixed per-request
+latency and compares sequential resolution (MEDIA_RESOLVE_CONCURRENCY=1) with
+the configured per-job concurrency for 1/4/8-image results.
+
+Usage:
+    python scripts/bench_media_resolve.py --latency-ms 150 --image-kb 256 --rounds 5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_dir))
+
+from app.generations import media_pipeline  # noqa: E402
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+async def _start_server(latency_ms: int, image_bytes: int) -> tuple[web.AppRunner, str]:
+    body = PNG_HEADER + b"\x00" * max(0, image_bytes - len(PNG_HEADER))
+
+    async def _image(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency_ms / 1000)
+        return web.Response(body=body, content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/img/{name}", _image)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def _measure(base_url: str, images: int, rounds: int) -> dict:
+    samples = []
+    async with aiohttp.ClientSession() as session:
+        for round_idx in range(rounds):
+            urls = [f"{base_url}/img/{round_idx}-{idx}.png" for idx in range(images)]
+            started = time.perf_counter()
+            tg_method, payload = await media_pipeline.resolve_and_prepare_telegram_payload(
+                {"urls": urls, "text": None},
+                f"bench-{images}-{round_idx}",
+                "image",
+                None,
+                session,
+            )
+            samples.append((time.perf_counter() - started) * 1000)
+            media_pipeline.release_media_payload(payload)
+    return {
+        "images": images,
+        "tg_method": tg_method,
+        "p50_ms": round(statistics.median(samples), 1),
+        "max_ms": round(max(samples), 1),
+    }
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=int, default=150)
+    parser.add_argument("--image-kb", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=media_pipeline.MEDIA_RESOLVE_CONCURRENCY)
+    args = parser.parse_args()
+
+    os.environ.update({"TEST_MODE": "0", "DRY_RUN": "0", "ALLOW_REAL_GENERATION": "1"})
+    runner, base_url = await _start_server(args.latency_ms, args.image_kb * 1024)
+    results = {}
+    try:
+        for label, concurrency in (("sequential", 1), ("concurrent", args.concurrency)):
+            media_pipeline.MEDIA_RESOLVE_CONCURRENCY = concurrency
+            results[label] = [await _measure(base_url, images, args.rounds) for images in (1, 4, 8)]
+    finally:
+        await runner.cleanup()
+    print(
+        json.dumps(
+            {
+                "latency_ms": args.latency_ms,
+                "image_kb": args.image_kb,
+                "concurrency": args.concurrency,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
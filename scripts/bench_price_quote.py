@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark resolve_price_quote and variant listing over the whole pricing catalog.
+
+For every model in the SSOT, quotes each SKU's own params and lists per-param
+price variants (the wizard's keystroke path). Compares the compiled pricing
+index with the former linear scan over load_price_ssot()["models"].
+
+Usage:
+    python scripts/bench_price_quote.py --rounds 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_dir))
+
+from app.pricing import price_resolver, price_ssot  # noqa: E402
+from app.pricing.price_ssot import PriceSku, list_all_models, list_model_skus  # noqa: E402
+
+
+def _linear_list_model_skus(model_id: str) -> List[PriceSku]:
+    for model in price_ssot.load_price_ssot().get("models", []):
+        if isinstance(model, dict) and model.get("id") == model_id:
+            return list(price_ssot._iter_skus(model, model_id))
+    return []
+
+
+def _linear_resolve(model_id: str, params: Dict[str, Any]) -> Optional[PriceSku]:
+    normalized = {k: price_ssot._normalize_param_value(v) for k, v in (params or {}).items()}
+    matches = [
+        sku
+        for sku in _linear_list_model_skus(model_id)
+        if not any(normalized.get(k) != price_ssot._normalize_param_value(v) for k, v in sku.params.items())
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _linear_variants(model_id: str, param_name: str, partial: Dict[str, Any]) -> List[Tuple[str, Decimal]]:
+    norm = price_ssot._normalize_param_value
+    normalized_partial = {k: norm(v) for k, v in partial.items() if k != param_name}
+    values: Dict[str, Decimal] = {}
+    for sku in _linear_list_model_skus(model_id):
+        if param_name not in sku.params:
+            continue
+        sku_params = {k: norm(v) for k, v in sku.params.items()}
+        if any(sku_params.get(k) != v for k, v in normalized_partial.items()):
+            continue
+        value = norm(sku.params[param_name])
+        if value not in values or sku.price_rub < values[value]:
+            values[value] = sku.price_rub
+    return sorted(values.items())
+
+
+class _CompiledStub:
+    """Minimal stand-in so price_resolver runs on the linear helpers."""
+
+    def __init__(self, model_id: str) -> None:
+        skus = _linear_list_model_skus(model_id)
+        compiled = price_ssot.CompiledModelPricing(model_id, skus)
+        self.skus = skus
+        self.param_keys = compiled.param_keys
+        self.param_values = compiled.param_values
+        self.skus_by_price = compiled.skus_by_price
+
+
+@contextmanager
+def _linear_mode():
+    originals = (price_resolver.get_compiled_model, price_resolver.resolve_sku_for_params)
+    price_resolver.get_compiled_model = _CompiledStub
+    price_resolver.resolve_sku_for_params = _linear_resolve
+    try:
+        yield
+    finally:
+        price_resolver.get_compiled_model, price_resolver.resolve_sku_for_params = originals
+
+
+def _workload() -> List[Tuple[str, Dict[str, Any]]]:
+    return [(model_id, dict(sku.params)) for model_id in list_all_models() for sku in list_model_skus(model_id)]
+
+
+def _run(workload, rounds: int, variants_fn) -> Dict[str, float]:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for model_id, params in workload:
+            price_resolver.resolve_price_quote(model_id, 0, None, params)
+            for param_name in params:
+                variants_fn(model_id, param_name, params)
+        samples.append((time.perf_counter() - started) * 1000)
+    per_call_us = statistics.median(samples) * 1000 / max(1, len(workload))
+    return {"round_ms_p50": round(statistics.median(samples), 1), "per_quote_us": round(per_call_us, 1)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    workload = _workload()
+    price_ssot.get_pricing_index()
+    compiled = _run(workload, args.rounds, price_ssot.list_variants_with_prices)
+    with _linear_mode():
+        linear = _run(workload, args.rounds, _linear_variants)
+    print(
+        json.dumps(
+            {
+                "models": len(list_all_models()),
+                "quotes_per_round": len(workload),
+                "linear": linear,
+                "compiled": compiled,
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -65,8 +65,8 @@ async def _fast_simulate(self, task_id: str) -> None:
     task["resultText"] = None
 
 
-async def _fake_download(session, url, retries=2):
-    return b"\x89PNG\r\n\x1a\n", "image/png", 8
+async def _fake_download(session, url, retries=2, **kwargs):
+    return media_pipeline.SpooledMedia.from_bytes(b"\x89PNG\r\n\x1a\n"), "image/png", 8
 
 
 async def main() -> None:
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Migrate single-file GitHub storage documents to the sharded layout.
+
+Each file (default: GITHUB_SHARDED_FILES) is split into
+``<name>/shard-XX.json`` plus ``<name>/_manifest.json`` in a single commit.
+The original file is kept as a backup. Running instances pick up the new
+layout after a restart.
+
+Usage:
+    GITHUB_STORAGE_SHARDS=16 python scripts/migrate_github_shards.py --dry-run
+    GITHUB_STORAGE_SHARDS=16 python scripts/migrate_github_shards.py user_balances.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_dir))
+
+from app.storage import github_shards  # noqa: E402
+from app.storage.github_storage import GitHubStorage  # noqa: E402
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="*", help="logical files to migrate (default: GITHUB_SHARDED_FILES)")
+    parser.add_argument("--shards", type=int, default=github_shards.GITHUB_STORAGE_SHARDS)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.shards < 2:
+        print("[ERROR] set GITHUB_STORAGE_SHARDS or --shards to 2 or more")
+        return 1
+    storage = GitHubStorage()
+    reports = []
+    try:
+        for filename in args.files or github_shards.sharded_files_from_env():
+            reports.append(await storage.migrate_to_shards(filename, args.shards, dry_run=args.dry_run))
+    finally:
+        await storage.close()
+    print(json.dumps(reports, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -35,6 +35,8 @@ HANDLER_STARTSWITH_PATTERNS = [
     re.compile(r"data\.startswith\([\"']([^\"']+)[\"']\)"),
 ]
 
+HANDLER_REGISTER_PATTERN = re.compile(r"register_callback_handler\(\s*[\"']([^\"']+)[\"']")
+
 HANDLER_IN_LIST_PATTERN = re.compile(r"data\s*in\s*\[([^\]]+)\]")
 STRING_LITERAL = re.compile(r"[\"']([^\"']+)[\"']")
 
@@ -63,6 +65,9 @@ def _extract_handlers(content: str) -> Dict[str, Set[str]]:
     for pattern in HANDLER_STARTSWITH_PATTERNS:
         prefixes.update(pattern.findall(content))
 
+    for registered in HANDLER_REGISTER_PATTERN.findall(content):
+        (prefixes if registered.endswith(":") else exact).add(registered)
+
     for match in HANDLER_IN_LIST_PATTERN.finditer(content):
         list_body = match.group(1)
         exact.update(STRING_LITERAL.findall(list_body))
@@ -173,13 +173,15 @@ def disable_network_calls():
 
     def guarded_connect(self, address):
         host = address[0] if isinstance(address, tuple) else address
-        if _is_localhost(host):
+        # AF_UNIX — локальный IPC (например, forkserver multiprocessing), не сеть.
+        if self.family == socket.AF_UNIX or _is_localhost(host):
             return original_connect(self, address)
         raise RuntimeError("NETWORK_DISABLED_IN_TESTS")
 
     def guarded_connect_ex(self, address):
         host = address[0] if isinstance(address, tuple) else address
-        if _is_localhost(host):
+        # AF_UNIX — локальный IPC (например, forkserver multiprocessing), не сеть.
+        if self.family == socket.AF_UNIX or _is_localhost(host):
             return original_connect_ex(self, address)
         raise RuntimeError("NETWORK_DISABLED_IN_TESTS")
 
@@ -229,15 +231,29 @@ def test_env():
 
     from app.storage.factory import reset_storage
     from app.generations.request_dedupe_store import reset_memory_entries
+    from app.generations.telegram_file_cache import reset_file_cache
     from app.observability.dedupe_metrics import reset_metrics as reset_dedupe_metrics
     from app.observability.correlation_store import reset_correlation_store
     from app.observability.generation_metrics import reset_metrics as reset_generation_metrics
+    from app.services.history_service import reset_seeded_users
+    from app.services.broadcast_service import reset_broadcast_runners
+    from app.observability.loop_monitor import reset_loop_monitor
+    from app.integrations.payment_ocr import reset_ocr_pool
+    from app.services.payment_screenshot_index import reset_payment_index
+    from app.integrations.http_clients import reset_http_clients
 
     reset_storage()
     reset_memory_entries()
+    reset_file_cache()
     reset_dedupe_metrics()
     reset_generation_metrics()
     reset_correlation_store()
+    reset_seeded_users()
+    reset_broadcast_runners()
+    reset_loop_monitor()
+    reset_ocr_pool()
+    reset_payment_index()
+    reset_http_clients()
     import bot_kie
 
     bot_kie._update_deduper._entries.clear()
@@ -4,11 +4,14 @@ Fake KIE API для тестов
 """
 
 import asyncio
+import json
 import os
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from enum import Enum
 
+import aiohttp
+
 
 class TaskState(Enum):
     WAITING = "waiting"
@@ -75,6 +78,8 @@ class FakeKieAPI:
             }
         
         task = self._tasks[task_id]
+        if task.get("final"):
+            return dict(task["final"])
         elapsed = time.time() - task["created_at"]
         
         # Симуляция прогресса
@@ -104,3 +109,39 @@ class FakeKieAPI:
             "ok": True,
             "state": task["state"]
         }
+
+    async def complete_task(
+        self,
+        task_id: str,
+        *,
+        state: str = TaskState.SUCCESS.value,
+        result_urls: Optional[List[str]] = None,
+    ) -> Optional[int]:
+        """Завершает задачу и отправляет callback на callBackUrl (как настоящий KIE)"""
+        task = self._tasks[task_id]
+        urls = result_urls if result_urls is not None else ["https://fake-result.com/image.jpg"]
+        task["state"] = state
+        task["final"] = {
+            "ok": True,
+            "taskId": task_id,
+            "state": state,
+            "resultJson": json.dumps({"resultUrls": urls}),
+        }
+        callback_url = task.get("callback_url")
+        if not callback_url:
+            return None
+        body = {
+            "code": 200,
+            "msg": "Playground task completed successfully.",
+            "data": {
+                "taskId": task_id,
+                "model": task["model_id"],
+                "state": state,
+                "resultJson": json.dumps({"resultUrls": urls}),
+                "failCode": None if state == TaskState.SUCCESS.value else "500",
+                "failMsg": None if state == TaskState.SUCCESS.value else "Fake API failure",
+            },
+        }
+        async with aiohttp.ClientSession() as session:
+            async with session.post(callback_url, json=body) as response:
+                return response.status
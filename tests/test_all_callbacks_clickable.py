@@ -22,16 +22,16 @@ def extract_all_callbacks() -> list:
 
 
 def extract_button_callback_handlers() -> set:
-    """Извлекает все обрабатываемые callback'ы из button_callback"""
+    """Извлекает все обрабатываемые callback'ы: цепочку _button_callback_impl и зарегистрированные маршруты"""
     if not bot_file.exists():
         return set()
     
     content = bot_file.read_text(encoding='utf-8', errors='ignore')
     
-    if 'async def button_callback' not in content:
+    if 'async def _button_callback_impl' not in content:
         return set()
     
-    start = content.find('async def button_callback')
+    start = content.find('async def _button_callback_impl')
     end = content.find('\nasync def ', start + 1)
     if end == -1:
         end = len(content)
@@ -57,6 +57,14 @@ def extract_button_callback_handlers() -> set:
     handled.update(re.findall(exact_pattern.replace('if', 'elif'), button_callback_content))
     handled.update(re.findall(prefix_pattern.replace('if', 'elif'), button_callback_content))
     
+    # Маршруты, вынесенные из цепочки в зарегистрированные обработчики
+    import bot_kie  # noqa: F401  регистрирует обработчики при импорте
+    from app.buttons.dispatcher import get_route_registry, is_legacy_route
+
+    handled.update(
+        route.callback_data for route in get_route_registry().iter_routes() if not is_legacy_route(route)
+    )
+    
     return handled
 
 
@@ -98,14 +98,14 @@ async def test_telegram_sender_selects_correct_method(monkeypatch):
 
     async def fake_download(session, url, **kwargs):
         if url.endswith(".png"):
-            return b"\x89PNG\r\n\x1a\nfake", "image/png", 16
+            return media_pipeline.SpooledMedia.from_bytes(b"\x89PNG\r\n\x1a\nfake"), "image/png", 16
         if url.endswith(".mp4"):
-            return b"\x00\x00\x00\x18ftypisom", "video/mp4", 16
+            return media_pipeline.SpooledMedia.from_bytes(b"\x00\x00\x00\x18ftypisom"), "video/mp4", 16
         if url.endswith(".mp3"):
-            return b"ID3fake", "audio/mpeg", 16
+            return media_pipeline.SpooledMedia.from_bytes(b"ID3fake"), "audio/mpeg", 16
         if url.endswith(".ogg"):
-            return b"OggSfake", "audio/ogg", 16
-        return b"PK\x03\x04fake", "application/zip", 16
+            return media_pipeline.SpooledMedia.from_bytes(b"OggSfake"), "audio/ogg", 16
+        return media_pipeline.SpooledMedia.from_bytes(b"PK\x03\x04fake"), "application/zip", 16
 
     monkeypatch.setattr(media_pipeline, "_download_with_retries", fake_download)
 
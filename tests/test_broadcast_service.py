@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from telegram.error import Forbidden, RetryAfter
+
+from app.services import broadcast_service
+from app.services.broadcast_service import GlobalPacer, create_job, load_job, resume_pending_jobs, run_job
+from app.storage.json_storage import JsonStorage
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.now += max(0.0, seconds)
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return JsonStorage(data_dir=str(tmp_path), bot_instance_id="test-instance")
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+def _runner_kwargs(clock, rate=1000.0):
+    return {
+        "pacer": GlobalPacer(rate, rate, time_fn=clock, sleep_fn=clock.sleep),
+        "time_fn": clock,
+        "sleep_fn": clock.sleep,
+    }
+
+
+@pytest.mark.asyncio
+async def test_broadcast_delivers_to_everyone_but_blocked(storage, clock):
+    sent = []
+
+    async def send(user_id, job):
+        sent.append(user_id)
+
+    job = await create_job(storage, 1, [1, 2, 3, 4, 2], message_text="hi")
+    await run_job(storage, job, send, blocked_ids={3}, **_runner_kwargs(clock))
+
+    assert sorted(sent) == [1, 2, 4]
+    assert job.total == 4
+    assert (job.delivered, job.skipped_blocked, job.status) == (3, 1, "done")
+    stored = await load_job(storage, 1)
+    assert stored.cursor == 4 and stored.status == "done"
+    assert await broadcast_service.pending_job_ids(storage) == []
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_and_retries(storage, clock):
+    calls = {}
+
+    async def send(user_id, job):
+        calls[user_id] = calls.get(user_id, 0) + 1
+        if user_id == 2 and calls[user_id] == 1:
+            raise RetryAfter(5)
+
+    job = await create_job(storage, 2, [1, 2, 3], message_text="hi")
+    before = clock.now
+    await run_job(storage, job, send, concurrency=1, **_runner_kwargs(clock))
+
+    assert job.delivered == 3
+    assert job.retry_after_hits == 1
+    assert calls[2] == 2
+    assert clock.now - before >= 5
+
+
+@pytest.mark.asyncio
+async def test_forbidden_counts_as_unreachable(storage, clock):
+    async def send(user_id, job):
+        if user_id == 1:
+            raise Forbidden("bot was blocked by the user")
+
+    job = await create_job(storage, 3, [1, 2], message_text="hi")
+    await run_job(storage, job, send, **_runner_kwargs(clock))
+
+    assert (job.sent, job.delivered, job.unreachable, job.failed) == (2, 1, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_global_rate_is_respected(storage, clock):
+    async def send(user_id, job):
+        return None
+
+    job = await create_job(storage, 4, range(1, 101), message_text="hi")
+    before = clock.now
+    await run_job(storage, job, send, concurrency=8, **_runner_kwargs(clock, rate=20.0))
+
+    assert job.delivered == 100
+    # 20 burst tokens, then 80 more at 20/s.
+    assert clock.now - before >= 3.9
+
+
+@pytest.mark.asyncio
+async def test_interrupted_job_resumes_from_cursor(storage, clock):
+    job = await create_job(storage, 5, range(1, 11), message_text="hi")
+    job.cursor = 6
+    job.sent = job.delivered = 6
+    await broadcast_service.save_job(storage, job)
+    sent = []
+
+    async def send(user_id, current_job):
+        sent.append(user_id)
+
+    resumed = await resume_pending_jobs(storage, send, **_runner_kwargs(clock))
+
+    assert sorted(sent) == [7, 8, 9, 10]
+    assert len(resumed) == 1
+    assert (resumed[0].delivered, resumed[0].cursor, resumed[0].resumed) == (10, 10, 1)
+    assert await broadcast_service.pending_job_ids(storage) == []
+
+
+@pytest.mark.asyncio
+async def test_progress_visible_while_running(storage, clock):
+    seen = {}
+
+    async def send(user_id, job):
+        if user_id == 2:
+            seen["progress"] = broadcast_service.get_progress(job.broadcast_id)
+
+    job = await create_job(storage, 6, [1, 2], message_text="hi")
+    await run_job(storage, job, send, concurrency=1, **_runner_kwargs(clock))
+
+    assert seen["progress"]["processed"] == 1
+    assert seen["progress"]["status"] == "running"
+    assert broadcast_service.get_progress(6) is None
@@ -0,0 +1,116 @@
+import re
+from pathlib import Path
+
+import pytest
+from telegram.ext import CallbackQueryHandler
+
+import bot_kie
+from app.buttons.dispatcher import get_route_registry, is_legacy_route, resolve_callback_route
+from app.buttons.registry import ButtonRegistry, CallbackType
+from app.buttons.validator import ButtonValidator
+from app.observability import callback_route_metrics
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _keyboard_callbacks():
+    validator = ButtonValidator(ROOT)
+    callbacks = {}
+    for path in [ROOT / "bot_kie.py", *sorted((ROOT / "app").rglob("*.py"))]:
+        for callback in validator.scan_code_for_callbacks(path):
+            callbacks.setdefault(callback, path.relative_to(ROOT).as_posix())
+    return callbacks
+
+
+def test_every_keyboard_callback_resolves_to_exactly_one_handler():
+    registry = get_route_registry()
+    callbacks = _keyboard_callbacks()
+    assert len(callbacks) > 50
+    ambiguous = {
+        callback: [route.callback_data for route in registry.match_all(callback)]
+        for callback in callbacks
+        if len(registry.match_all(callback)) != 1
+    }
+    assert ambiguous == {}
+
+
+def test_legacy_routes_match_button_callback_branches():
+    source = (ROOT / "bot_kie.py").read_text(encoding="utf-8")
+    start = source.index("async def _button_callback_impl(")
+    body = source[start : source.index("\ndef ", start)]
+    handled = set(re.findall(r'data == "([^"]+)"', body)) | set(re.findall(r'data\.startswith\("([^"]+)"\)', body))
+    legacy = {route.callback_data for route in get_route_registry().iter_routes() if is_legacy_route(route)}
+    assert legacy == handled
+
+
+def test_lookup_uses_segment_then_longest_prefix():
+    async def handler(update, context):
+        return None
+
+    registry = ButtonRegistry()
+    registry.register("m:", handler, "short", CallbackType.PREFIX)
+    registry.register("model:", handler, "long", CallbackType.PREFIX)
+    registry.register("tutorial_step", handler, "step", CallbackType.PREFIX)
+    registry.register("tutorial_step1", handler, "step1")
+
+    assert registry.get_handler("model:flux").handler_name == "long"
+    assert registry.get_handler("m:flux").handler_name == "short"
+    assert registry.get_handler("tutorial_step1").handler_name == "step1"
+    assert registry.get_handler("tutorial_step9").handler_name == "step"
+    assert registry.get_handler("mo") is None
+
+    registry.unregister("tutorial_step")
+    assert registry.get_handler("tutorial_step9") is None
+
+
+def test_hot_routes_bypass_legacy_chain():
+    for callback_data in ("back_to_menu", "show_models", "check_balance", "confirm_generate"):
+        route = resolve_callback_route(callback_data)
+        assert not is_legacy_route(route), callback_data
+    for callback_data in ("gen_type:text-to-image", "m:flux", "model:flux", "select_model:flux", "sel:flux"):
+        route = resolve_callback_route(callback_data)
+        assert not is_legacy_route(route), callback_data
+    assert resolve_callback_route("m:flux").handler is bot_kie._handle_short_model_callback
+    assert resolve_callback_route("sel:flux").handler is bot_kie._handle_select_model_callback
+
+
+def test_module_handlers_replace_legacy_routes():
+    route = resolve_callback_route("type_header:video")
+    assert route.handler_name == "handle_type_header_callback"
+    assert not is_legacy_route(route)
+    assert is_legacy_route(resolve_callback_route("category:video"))
+    assert resolve_callback_route("no_such_button") is None
+
+
+@pytest.mark.asyncio
+async def test_button_callback_records_route_latency(harness):
+    harness.add_handler(CallbackQueryHandler(bot_kie.button_callback))
+    bot_kie._processed_update_ids.clear()
+    callback_route_metrics.reset_metrics()
+
+    result = await harness.process_callback("type_header:unknown_type", user_id=12345)
+
+    assert result["success"], result.get("error")
+    snapshot = callback_route_metrics.metrics_snapshot()
+    assert snapshot["type_header:"]["count"] == 1
+    assert snapshot["type_header:"]["p50_ms"] is not None
+
+
+@pytest.mark.asyncio
+async def test_button_callback_resolves_route_once(harness, monkeypatch):
+    harness.add_handler(CallbackQueryHandler(bot_kie.button_callback))
+    bot_kie._processed_update_ids.clear()
+    callback_route_metrics.reset_metrics()
+    resolved = []
+
+    def tracking_resolve(callback_data):
+        resolved.append(callback_data)
+        return resolve_callback_route(callback_data)
+
+    monkeypatch.setattr(bot_kie, "resolve_callback_route", tracking_resolve)
+
+    result = await harness.process_callback("check_balance", user_id=12345)
+
+    assert result["success"], result.get("error")
+    assert resolved == ["check_balance"]
+    assert callback_route_metrics.metrics_snapshot()["check_balance"]["count"] == 1
@@ -0,0 +1,110 @@
+import os
+import tracemalloc
+
+import pytest
+
+from app.observability import correlation_store
+from app.observability.correlation_store import (
+    mark_delivery_status,
+    register_ids,
+    registry_snapshot,
+    reset_correlation_store,
+    resolve_correlation_ids,
+)
+
+# CORRELATION_SOAK_EVENTS=1000000 for the full soak run.
+SOAK_EVENTS = int(os.getenv("CORRELATION_SOAK_EVENTS", "100000"))
+
+
+@pytest.fixture(autouse=True)
+def _small_registry(monkeypatch):
+    reset_correlation_store()
+    monkeypatch.setattr(correlation_store, "_registry_max_records", 1000)
+    yield
+    reset_correlation_store()
+
+
+def _event(i: int) -> None:
+    register_ids(
+        correlation_id=f"corr-{i}",
+        request_id=f"req-{i}",
+        task_id=f"task-{i}" if i % 2 else None,
+        job_id=None,
+        user_id=i % 500,
+        model_id="z-image",
+    )
+
+
+def test_records_use_slots():
+    record = correlation_store.CorrelationRecord(correlation_id="c")
+    assert not hasattr(record, "__dict__")
+
+
+def test_completed_correlations_are_evicted_first():
+    for i in range(1000):
+        _event(i)
+    mark_delivery_status("corr-900", "delivered")
+    mark_delivery_status("corr-901", "failed")
+
+    _event(1000)
+
+    assert resolve_correlation_ids(correlation_id=None, request_id="req-900", task_id=None, job_id=None)["task_id"] is None
+    assert resolve_correlation_ids(correlation_id="corr-0", request_id=None, task_id=None, job_id=None)["request_id"] == "req-0"
+    _event(1001)
+    # No completed records left: the least recently used one goes next.
+    assert "corr-1" not in correlation_store._records_by_correlation
+    assert "req-1" not in correlation_store._records_by_request
+    assert "task-1" not in correlation_store._records_by_task
+
+
+def test_reassigned_ids_do_not_leave_stale_index_keys():
+    for attempt in range(50):
+        register_ids(
+            correlation_id="corr-retry",
+            request_id=f"req-{attempt}",
+            task_id=f"task-{attempt}",
+            job_id=None,
+            user_id=1,
+            model_id="z-image",
+        )
+
+    snapshot = registry_snapshot()
+    assert (snapshot["records"], snapshot["by_request"], snapshot["by_task"]) == (1, 1, 1)
+    assert "task-0" not in correlation_store._records_by_task
+
+    correlation_store._drop_record("corr-retry")
+    assert correlation_store._records_by_request == {}
+    assert correlation_store._records_by_task == {}
+
+
+def test_idle_correlations_expire(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(correlation_store.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(correlation_store, "_registry_max_age_seconds", 60.0)
+    _event(1)
+    clock[0] += 61
+    _event(2)
+    snapshot = registry_snapshot()
+    assert snapshot["records"] == 1
+    assert snapshot["expired_total"] == 1
+
+
+def test_soak_registry_memory_stays_flat():
+    """SOAK_EVENTS synthetic events; memory at the end matches memory halfway through."""
+    tracemalloc.start()
+    halfway = None
+    for i in range(SOAK_EVENTS):
+        _event(i)
+        if i % 3 == 0:
+            mark_delivery_status(f"corr-{i}", "success")
+        if i == SOAK_EVENTS // 2:
+            halfway, _ = tracemalloc.get_traced_memory()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    snapshot = registry_snapshot()
+    assert snapshot["records"] == 1000
+    assert snapshot["by_request"] <= 1000
+    assert snapshot["by_task"] <= 1000
+    assert snapshot["completed"] <= 1000
+    assert abs(current - halfway) < 64 * 1024
@@ -0,0 +1,76 @@
+import os
+import time
+
+import pytest
+
+from app.observability import correlation_store
+from app.observability.correlation_sink import JsonlCorrelationSink, build_row, get_correlation_sink
+
+
+def _row(i, **overrides):
+    payload = {"correlation_id": f"corr-{i}", "request_id": f"req-{i}", "task_id": f"task-{i}", "job_id": None}
+    payload.update(overrides)
+    return build_row(payload, "test")
+
+
+@pytest.mark.asyncio
+async def test_jsonl_sink_rotates_segments_and_finds_rows(tmp_path):
+    sink = JsonlCorrelationSink(tmp_path, segment_bytes=400)
+    for i in range(20):
+        await sink.append([_row(i)])
+    await sink.append([_row(3, job_id="job-3")])
+
+    assert len(list(tmp_path.glob("correlations-*.jsonl"))) > 1
+    [latest] = await sink.lookup(task_id="task-3")
+    assert latest["job_id"] == "job-3"
+    assert [row["correlation_id"] for row in await sink.lookup(request_id="req-1")] == ["corr-1"]
+    assert await sink.lookup(request_id="req-10", task_id="task-3") == []
+    assert await sink.lookup() == []
+
+
+@pytest.mark.asyncio
+async def test_jsonl_sink_prunes_closed_segments_after_retention(tmp_path):
+    sink = JsonlCorrelationSink(tmp_path, segment_bytes=100)
+    for i in range(5):
+        await sink.append([_row(i)])
+    segments = sorted(tmp_path.glob("correlations-*.jsonl"))
+    old = time.time() - 7200
+    for segment in segments:
+        os.utime(segment, (old, old))
+
+    removed = await sink.prune(retention_seconds=3600)
+
+    remaining = list(tmp_path.glob("correlations-*.jsonl"))
+    assert removed == len(segments) - 1
+    assert remaining == [sink._active]
+
+
+@pytest.mark.asyncio
+async def test_lookup_falls_back_to_sink_after_registry_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(correlation_store, "_resolve_storage", lambda *_args, **_kwargs: object())
+    sink = JsonlCorrelationSink(tmp_path)
+    monkeypatch.setattr(correlation_store, "get_correlation_sink", lambda _storage: sink)
+    correlation_store.reset_correlation_store()
+    await sink.append([_row(7, job_id="job-7")])
+
+    [found] = await correlation_store.lookup_correlations(task_id="task-7")
+
+    assert found["job_id"] == "job-7"
+
+
+def test_sink_choice_follows_storage(tmp_path):
+    class JsonLike:
+        data_dir = tmp_path
+
+    class PostgresLike:
+        partner_id = "p1"
+
+        async def _get_pool(self):
+            raise AssertionError("not used")
+
+    class HybridLike:
+        _primary = PostgresLike()
+
+    assert isinstance(get_correlation_sink(JsonLike()), JsonlCorrelationSink)
+    assert get_correlation_sink(JsonLike()).directory == tmp_path / "correlations"
+    assert get_correlation_sink(HybridLike()).name == "postgres"
@@ -7,26 +7,32 @@ import pytest
 from app.observability import correlation_store
 
 
-class FakeStorage:
+class FakeSink:
+    name = "fake"
+
     def __init__(self) -> None:
         self.calls = []
 
-    async def update_json_file(self, filename, update_fn, **_kwargs):
-        self.calls.append(filename)
-        return update_fn({})
+    async def append(self, rows):
+        self.calls.append(list(rows))
+        return len(rows)
+
+    async def prune(self, retention_seconds):
+        return 0
 
 
-class SlowStorage:
-    async def update_json_file(self, filename, update_fn, **_kwargs):
+class SlowSink(FakeSink):
+    async def append(self, rows):
         await asyncio.sleep(0.05)
-        return update_fn({})
+        return len(rows)
 
 
 @pytest.mark.asyncio
 async def test_correlation_store_batches_flush(monkeypatch):
-    storage = FakeStorage()
+    storage = FakeSink()
 
-    monkeypatch.setattr(correlation_store, "_resolve_storage", lambda *_args, **_kwargs: storage)
+    monkeypatch.setattr(correlation_store, "_resolve_storage", lambda *_args, **_kwargs: object())
+    monkeypatch.setattr(correlation_store, "get_correlation_sink", lambda _storage: storage)
     correlation_store._persist_debounce_seconds = 0.01
     correlation_store._flush_interval_seconds = 0.01
     correlation_store._flush_max_records = 10
@@ -47,13 +53,15 @@ async def test_correlation_store_batches_flush(monkeypatch):
     while time.monotonic() < deadline and len(storage.calls) < 1:
         await asyncio.sleep(0.01)
     assert len(storage.calls) == 1
+    assert sorted(row["request_id"] for row in storage.calls[0]) == ["req-0", "req-1", "req-2"]
 
 
 @pytest.mark.asyncio
 async def test_correlation_store_flush_timeout_log_throttled(monkeypatch, caplog):
-    storage = SlowStorage()
+    storage = SlowSink()
 
-    monkeypatch.setattr(correlation_store, "_resolve_storage", lambda *_args, **_kwargs: storage)
+    monkeypatch.setattr(correlation_store, "_resolve_storage", lambda *_args, **_kwargs: object())
+    monkeypatch.setattr(correlation_store, "get_correlation_sink", lambda _storage: storage)
     correlation_store._persist_debounce_seconds = 0.0
     correlation_store._flush_interval_seconds = 0.01
     correlation_store._persist_timeout_seconds = 0.01
@@ -6,8 +6,8 @@ from app.generations import media_pipeline
 
 @pytest.mark.asyncio
 async def test_delivery_contract_filename_and_method(monkeypatch):
-    async def fake_download(session, url, retries=2):
-        return b"\x89PNG\r\n\x1a\n", "image/png", 8
+    async def fake_download(session, url, retries=2, **kwargs):
+        return media_pipeline.SpooledMedia.from_bytes(b"\x89PNG\r\n\x1a\n"), "image/png", 8
 
     monkeypatch.setattr(media_pipeline, "_download_with_retries", fake_download)
 
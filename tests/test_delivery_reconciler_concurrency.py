@@ -0,0 +1,197 @@
+import asyncio
+
+import pytest
+
+from app.delivery import reconciler
+from app.delivery.reconciler import (
+    PollSchedule,
+    interleave_jobs_by_user,
+    next_poll_delay,
+    reconcile_pending_results,
+)
+from app.observability.delivery_metrics import metrics_snapshot
+
+
+class FakeStorage:
+    def __init__(self, jobs):
+        self._jobs = jobs
+        self.updates = []
+
+    async def list_jobs_by_status(self, statuses, limit=100):
+        return [dict(job) for job in self._jobs[:limit]]
+
+    async def update_job_status(self, job_id, status, **kwargs):
+        self.updates.append((job_id, status))
+
+
+class FakeKie:
+    def __init__(self, state="success"):
+        self.state = state
+        self.calls = []
+
+    async def get_task_status(self, task_id, correlation_id=None):
+        self.calls.append(task_id)
+        return {"ok": True, "state": self.state, "taskId": task_id}
+
+
+def _jobs(per_user):
+    jobs = []
+    for user_id, count in per_user.items():
+        for n in range(count):
+            jobs.append(
+                {
+                    "job_id": f"job-{user_id}-{n}",
+                    "task_id": f"task-{user_id}-{n}",
+                    "user_id": user_id,
+                    "model_id": "z-image",
+                    "status": "running",
+                }
+            )
+    return jobs
+
+
+def test_interleave_jobs_round_robins_users():
+    ordered = interleave_jobs_by_user(_jobs({1: 3, 2: 1, 3: 2}))
+
+    assert [job["task_id"] for job in ordered] == [
+        "task-1-0",
+        "task-2-0",
+        "task-3-0",
+        "task-1-1",
+        "task-3-1",
+        "task-1-2",
+    ]
+
+
+def test_next_poll_delay_depends_on_media_state_and_streak():
+    mid = lambda: 0.5  # noqa: E731 - no jitter
+
+    image = next_poll_delay("image", "generating", streak=0, rng=mid)
+    video = next_poll_delay("video", "generating", streak=0, rng=mid)
+    queued = next_poll_delay("image", "queued", streak=0, rng=mid)
+    backed_off = next_poll_delay("image", "generating", streak=2, rng=mid)
+
+    assert video > image
+    assert queued == image * 2
+    assert backed_off == image * 4
+    assert next_poll_delay("video", "queued", streak=10, rng=mid) == reconciler.DELIVERY_POLL_MAX_SECONDS
+    low = next_poll_delay("image", "generating", streak=0, rng=lambda: 0.0)
+    high = next_poll_delay("image", "generating", streak=0, rng=lambda: 1.0)
+    assert low < image < high
+
+
+def test_poll_schedule_defers_until_due():
+    now = [100.0]
+    schedule = PollSchedule(clock=lambda: now[0], rng=lambda: 0.5)
+
+    assert schedule.is_due("t1")
+    delay = schedule.record("t1", media_kind="image", state="generating")
+    assert not schedule.is_due("t1")
+    now[0] += delay
+    assert schedule.is_due("t1")
+    schedule.prune(["t2"])
+    assert len(schedule) == 0
+
+
+@pytest.mark.asyncio
+async def test_reconcile_delivers_concurrently_with_user_fairness(monkeypatch):
+    storage = FakeStorage(_jobs({1: 4, 2: 1, 3: 1, 4: 1}))
+    kie = FakeKie()
+    active = {"total": 0, "max": 0}
+    active_users = set()
+    overlapping_same_user = []
+    delivered = []
+
+    async def slow_deliver(bot, storage_arg, *, job, status_record, notify_user, source, get_user_language=None):
+        user_id = job["user_id"]
+        if user_id in active_users:
+            overlapping_same_user.append(user_id)
+        active_users.add(user_id)
+        active["total"] += 1
+        active["max"] = max(active["max"], active["total"])
+        await asyncio.sleep(0.05)
+        active["total"] -= 1
+        active_users.discard(user_id)
+        delivered.append(job["task_id"])
+        return True
+
+    monkeypatch.setattr(reconciler, "deliver_job_result", slow_deliver)
+
+    await reconcile_pending_results(
+        object(),
+        storage,
+        kie,
+        batch_limit=50,
+        pending_age_alert_seconds=9999,
+        queue_tail_alert_threshold=9999,
+        poll_concurrency=4,
+        deliver_concurrency=3,
+    )
+
+    assert len(kie.calls) == 7
+    assert sorted(delivered) == sorted(job["task_id"] for job in storage._jobs)
+    assert active["max"] == 3
+    assert not overlapping_same_user
+    # Users 2-4 are not stuck behind user 1's backlog.
+    assert delivered.index("task-4-0") < delivered.index("task-1-2")
+    snapshot = metrics_snapshot()
+    assert snapshot["last_sweep"]["queue_depth"] == 7
+    assert snapshot["last_sweep"]["delivered"] == 7
+    assert snapshot["sweep_duration_p95"] is not None
+
+
+@pytest.mark.asyncio
+async def test_reconcile_with_schedule_skips_tasks_not_due(monkeypatch):
+    storage = FakeStorage(_jobs({1: 2}))
+    kie = FakeKie(state="generating")
+    schedule = PollSchedule(rng=lambda: 0.5)
+
+    for _ in range(2):
+        await reconcile_pending_results(
+            object(),
+            storage,
+            kie,
+            batch_limit=50,
+            pending_age_alert_seconds=9999,
+            queue_tail_alert_threshold=9999,
+            schedule=schedule,
+        )
+
+    assert len(kie.calls) == 2
+    assert len(schedule) == 2
+    assert metrics_snapshot()["last_sweep"]["deferred"] == 2
+
+
+@pytest.mark.asyncio
+async def test_reconcile_pipelines_polls_into_deliveries_and_counts_sends(monkeypatch):
+    storage = FakeStorage(_jobs({1: 1, 2: 1, 3: 1}))
+    slow_poll_done = asyncio.Event()
+    delivered_before_slow_poll = []
+
+    class SlowKie(FakeKie):
+        async def get_task_status(self, task_id, correlation_id=None):
+            if task_id == "task-1-0":
+                await asyncio.sleep(0.2)
+                slow_poll_done.set()
+            return await super().get_task_status(task_id, correlation_id=correlation_id)
+
+    async def fake_deliver(bot, storage_arg, *, job, status_record, notify_user, source, get_user_language=None):
+        if not slow_poll_done.is_set():
+            delivered_before_slow_poll.append(job["task_id"])
+        # Nothing is sent for user 3 (e.g. result validation failed).
+        return job["user_id"] != 3
+
+    monkeypatch.setattr(reconciler, "deliver_job_result", fake_deliver)
+
+    await reconcile_pending_results(
+        object(),
+        storage,
+        SlowKie(),
+        batch_limit=50,
+        pending_age_alert_seconds=9999,
+        queue_tail_alert_threshold=9999,
+        poll_concurrency=4,
+    )
+
+    assert sorted(delivered_before_slow_poll) == ["task-2-0", "task-3-0"]
+    assert metrics_snapshot()["last_sweep"]["delivered"] == 2
@@ -24,11 +24,11 @@ class DummyBot:
 
 
 class DummySession:
-    async def __aenter__(self):
-        return self
+    pass
 
-    async def __aexit__(self, exc_type, exc, tb):
-        return False
+
+async def _dummy_get_session(_upstream):
+    return DummySession()
 
 
 @pytest.mark.asyncio
@@ -59,7 +59,7 @@ async def test_delivery_routing_image(monkeypatch):
         return "send_photo", {"photo": "file"}
 
     monkeypatch.setattr(telegram_sender, "resolve_and_prepare_telegram_payload", fake_resolve)
-    monkeypatch.setattr(telegram_sender.aiohttp, "ClientSession", lambda: DummySession())
+    monkeypatch.setattr(telegram_sender, "get_session", _dummy_get_session)
 
     await telegram_sender.deliver_result(
         bot,
@@ -80,7 +80,7 @@ async def test_delivery_routing_video(monkeypatch):
         return "send_video", {"video": "file"}
 
     monkeypatch.setattr(telegram_sender, "resolve_and_prepare_telegram_payload", fake_resolve)
-    monkeypatch.setattr(telegram_sender.aiohttp, "ClientSession", lambda: DummySession())
+    monkeypatch.setattr(telegram_sender, "get_session", _dummy_get_session)
 
     await telegram_sender.deliver_result(
         bot,
@@ -101,7 +101,7 @@ async def test_delivery_routing_audio(monkeypatch):
         return "send_audio", {"audio": "file"}
 
     monkeypatch.setattr(telegram_sender, "resolve_and_prepare_telegram_payload", fake_resolve)
-    monkeypatch.setattr(telegram_sender.aiohttp, "ClientSession", lambda: DummySession())
+    monkeypatch.setattr(telegram_sender, "get_session", _dummy_get_session)
 
     await telegram_sender.deliver_result(
         bot,
@@ -122,7 +122,7 @@ async def test_delivery_routing_document(monkeypatch):
         return "send_document", {"document": "file"}
 
     monkeypatch.setattr(telegram_sender, "resolve_and_prepare_telegram_payload", fake_resolve)
-    monkeypatch.setattr(telegram_sender.aiohttp, "ClientSession", lambda: DummySession())
+    monkeypatch.setattr(telegram_sender, "get_session", _dummy_get_session)
 
     await telegram_sender.deliver_result(
         bot,
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from app.storage import github_shards
+from app.storage.github_storage import GitHubStorage
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setenv("GITHUB_REPO", "owner/repo")
+    monkeypatch.setenv("GITHUB_TOKEN", "test-token")
+    monkeypatch.setenv("BOT_INSTANCE_ID", "test-instance")
+    monkeypatch.setenv("GITHUB_STORAGE_STUB", "1")
+    monkeypatch.setattr(github_shards, "GITHUB_STORAGE_SHARDS", 4)
+    return GitHubStorage()
+
+
+def _stub(storage, filename):
+    return storage._stub_store.get(storage._storage_path(filename), (None, None))[0]
+
+
+def test_fresh_install_writes_only_the_users_shard(storage):
+    async def scenario():
+        await storage.add_user_balance(101, 25.0)
+        return await storage.get_user_balance(101)
+
+    assert asyncio.run(scenario()) == 25.0
+
+    shard = github_shards.shard_filename(storage.balances_file, github_shards.shard_index("101", 4))
+    assert _stub(storage, shard) == {"101": 25.0}
+    assert _stub(storage, github_shards.manifest_filename(storage.balances_file))["shards"] == 4
+    assert _stub(storage, storage.balances_file) is None
+
+
+def test_generic_read_and_update_span_all_shards(storage):
+    async def scenario():
+        for user_id in range(1, 9):
+            await storage.set_user_balance(user_id, float(user_id))
+        commits = []
+        original = storage._commit_files
+
+        async def tracking_commit(files, **kwargs):
+            commits.append(sorted(files))
+            await original(files, **kwargs)
+
+        storage._commit_files = tracking_commit
+
+        def double_all(data):
+            return {key: value * 2 for key, value in data.items()}
+
+        await storage.update_json_file(storage.balances_file, double_all)
+        exported = await storage.read_json_file(storage.balances_file)
+        return commits, exported
+
+    commits, exported = asyncio.run(scenario())
+
+    assert exported == {str(user_id): float(user_id) * 2 for user_id in range(1, 9)}
+    assert len(commits) == 1
+    assert len(commits[0]) > 1
+
+
+@pytest.mark.parametrize("touch", ["all_shards", "one_shard"])
+def test_shard_write_between_read_and_commit_is_not_overwritten(storage, touch):
+    same_shard = [
+        user_id
+        for user_id in range(2, 100)
+        if github_shards.shard_index(str(user_id), 4) == github_shards.shard_index("1", 4)
+    ][0]
+
+    async def no_backoff(attempt, headers=None):
+        return None
+
+    storage._backoff = no_backoff
+
+    async def scenario():
+        for user_id in range(1, 9):
+            await storage.set_user_balance(user_id, float(user_id))
+        await storage.set_user_balance(same_shard, 50.0)
+        original_read = storage._read_shard_versions
+        reads = []
+
+        async def interleaved_read(filename, count, *, force_refresh=False):
+            versions = await original_read(filename, count, force_refresh=force_refresh)
+            if not force_refresh:
+                return versions
+            reads.append(filename)
+            if len(reads) == 1:
+                # A per-user write lands after the logical update has read the shards.
+                await storage.add_user_balance(1, 100.0)
+            return versions
+
+        storage._read_shard_versions = interleaved_read
+
+        def double_all(data):
+            return {key: value * 2 for key, value in data.items()}
+
+        def bump_neighbour(data):
+            data[str(same_shard)] = data[str(same_shard)] + 1
+            return data
+
+        await storage.update_json_file(storage.balances_file, double_all if touch == "all_shards" else bump_neighbour)
+        return reads, await storage.read_json_file(storage.balances_file)
+
+    reads, exported = asyncio.run(scenario())
+
+    assert len(reads) == 2
+    if touch == "all_shards":
+        assert exported["1"] == 202.0
+        assert exported[str(same_shard)] == 100.0
+    else:
+        assert exported["1"] == 101.0
+        assert exported[str(same_shard)] == 51.0
+
+
+def test_existing_single_file_stays_until_migrated(storage):
+    storage._stub_store[storage._storage_path(storage.balances_file)] = ({"5": 10.0, "6": 20.0}, "legacy")
+
+    async def before():
+        return await storage.get_user_balance(5)
+
+    assert asyncio.run(before()) == 10.0
+    assert storage._shard_layouts[storage.balances_file] == 0
+
+    report = asyncio.run(storage.migrate_to_shards(storage.balances_file, 4))
+
+    assert report["keys"] == 2
+    assert storage._shard_layouts[storage.balances_file] == 4
+    migrated = GitHubStorage()
+    migrated._stub_store = storage._stub_store
+
+    async def after():
+        await migrated.add_user_balance(6, 5.0)
+        return await migrated.read_json_file(migrated.balances_file)
+
+    assert asyncio.run(after()) == {"5": 10.0, "6": 25.0}
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from app.storage.github_storage import GitHubStorage
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setenv("GITHUB_REPO", "owner/repo")
+    monkeypatch.setenv("GITHUB_TOKEN", "test-token")
+    monkeypatch.setenv("BOT_INSTANCE_ID", "test-instance")
+    monkeypatch.setenv("GITHUB_STORAGE_STUB", "1")
+    monkeypatch.setenv("GITHUB_WRITE_BEHIND", "1")
+    instance = GitHubStorage()
+    instance._write_behind.max_delay_seconds = 60
+    for filename in (instance.languages_file, instance.balances_file, instance.gift_claimed_file):
+        instance._stub_store[instance._storage_path(filename)] = ({}, "stub-seed")
+    writes = []
+    original_write = instance._write_json
+
+    async def counting_write(filename, data, sha):
+        writes.append(filename)
+        return await original_write(filename, data, sha)
+
+    monkeypatch.setattr(instance, "_write_json", counting_write)
+    instance.writes = writes
+    return instance
+
+
+def test_updates_coalesce_into_one_commit_with_read_your_writes(storage):
+    async def scenario():
+        for user_id in range(10):
+            await storage.set_user_language(user_id, "en")
+        assert storage.writes == []
+        assert await storage.get_user_language(3) == "en"
+
+        await storage.flush_pending_writes()
+        stub_data, _ = storage._stub_store[storage._storage_path(storage.languages_file)]
+        return stub_data
+
+    stub_data = asyncio.run(scenario())
+
+    assert storage.writes == [storage.languages_file]
+    assert {str(user_id) for user_id in range(10)} <= set(stub_data)
+    metrics = storage.write_behind_metrics()
+    assert metrics["updates_applied"] == 10
+    assert metrics["commits"] == 1
+    assert metrics["commits_saved"] == 9
+    assert metrics["pending_updates"] == 0
+
+
+def test_balance_updates_flush_synchronously(storage):
+    async def scenario():
+        await storage.set_user_language(1, "ru")
+        await storage.add_user_balance(1, 50.0)
+        return await storage.subtract_user_balance(1, 80.0), await storage.subtract_user_balance(1, 20.0)
+
+    over_limit, ok = asyncio.run(scenario())
+
+    assert (over_limit, ok) == (False, True)
+    assert storage.writes == [storage.balances_file, storage.balances_file, storage.balances_file]
+    assert storage._write_behind.pending_count(storage.languages_file) == 1
+    assert asyncio.run(storage.get_user_balance(1)) == 30.0
+
+
+def test_failed_flush_requeues_updates(storage, monkeypatch):
+    async def failing_commit(filename, update_fn):
+        raise RuntimeError("github down")
+
+    async def scenario():
+        await storage.set_user_language(7, "en")
+        original_commit = storage._write_behind._commit_fn
+        storage._write_behind._commit_fn = failing_commit
+        with pytest.raises(RuntimeError):
+            await storage.flush_pending_writes(storage.languages_file)
+        assert await storage.get_user_language(7) == "en"
+        storage._write_behind._commit_fn = original_commit
+        await storage.close()
+
+    asyncio.run(scenario())
+
+    assert storage.writes == [storage.languages_file]
+    metrics = storage.write_behind_metrics()
+    assert metrics["flush_failures"] == 1
+    assert metrics["pending_updates"] == 0
+
+
+def test_max_pending_triggers_flush(storage):
+    storage._write_behind.max_pending = 3
+
+    async def scenario():
+        for user_id in range(7):
+            await storage.set_user_language(user_id, "en")
+
+    asyncio.run(scenario())
+
+    assert storage.writes == [storage.languages_file, storage.languages_file]
+    assert storage._write_behind.pending_count() == 1
+
+
+def test_gift_and_free_bank_grants_flush_synchronously(storage):
+    asyncio.run(storage.set_gift_claimed(1))
+
+    assert storage.writes == [storage.gift_claimed_file]
+    assert storage.referral_free_bank_file in storage._durable_files
+    assert storage._write_behind.pending_count() == 0
+
+
+def test_failed_max_pending_flush_does_not_fail_the_caller(storage):
+    storage._write_behind.max_pending = 2
+
+    async def failing_commit(filename, update_fn):
+        raise RuntimeError("github down")
+
+    async def scenario():
+        original_commit = storage._write_behind._commit_fn
+        storage._write_behind._commit_fn = failing_commit
+        await storage.set_user_language(1, "en")
+        await storage.set_user_language(2, "ru")
+        assert await storage.get_user_language(2) == "ru"
+        storage._write_behind._commit_fn = original_commit
+        await storage.flush_pending_writes(storage.languages_file)
+        stub_data, _ = storage._stub_store[storage._storage_path(storage.languages_file)]
+        await storage.close()
+        return stub_data
+
+    stub_data = asyncio.run(scenario())
+
+    assert {"1", "2"} <= set(stub_data)
+    assert storage.write_behind_metrics()["flush_failures"] == 1
+
+
+def test_flush_all_awaits_timer_tasks_and_reads_are_copies(storage):
+    async def scenario():
+        await storage.set_user_language(1, "en")
+        timers = set(storage._write_behind._flush_tasks)
+        assert len(timers) == 1
+
+        data, _ = await storage._read_json(storage.languages_file)
+        data["1"] = "mutated"
+        assert await storage.get_user_language(1) == "en"
+
+        await storage.flush_pending_writes()
+        return timers
+
+    timers = asyncio.run(scenario())
+
+    assert all(task.done() for task in timers)
+    assert storage._write_behind._flush_tasks == set()
+    assert storage.writes == [storage.languages_file]
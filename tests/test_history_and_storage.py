@@ -119,15 +119,8 @@ class TestHistoryAndStorage:
         # Мокаем storage
         mock_storage = AsyncMock()
         mock_storage.read_json_file.return_value = {"12345": []}
-        mock_storage.update_json_file.return_value = {"12345": [
-            {
-                "event_id": "event-123",
-                "user_id": 12345,
-                "kind": "generation",
-                "payload": payload,
-                "created_at": "2026-01-28T12:00:00Z"
-            }
-        ]}
+        mock_storage.supports_history_event_rows = False
+        mock_storage.update_json_file.side_effect = lambda filename, updater: updater({})
         
         result = await append_event(
             storage=mock_storage,
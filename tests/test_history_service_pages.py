@@ -0,0 +1,88 @@
+import pytest
+
+from app.services import history_service
+from app.services.history_service import append_event, get_aggregates, get_page, get_recent, user_events_filename
+from app.storage.json_storage import JsonStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return JsonStorage(data_dir=str(tmp_path), bot_instance_id="test-instance")
+
+
+@pytest.mark.asyncio
+async def test_append_is_idempotent_and_counts(storage):
+    assert await append_event(storage, 1, "generation", {"model_id": "a"}, "evt-1") is True
+    assert await append_event(storage, 1, "generation", {"model_id": "a"}, "evt-1") is False
+    assert await append_event(storage, 1, "payment", {"amount": 10}, "evt-2") is True
+
+    aggregates = await get_aggregates(storage, 1)
+    assert aggregates["counts"] == {"generation": 1, "payment": 1}
+    assert aggregates["latest"]["event_id"] == "evt-2"
+
+
+@pytest.mark.asyncio
+async def test_users_are_stored_separately(storage):
+    await append_event(storage, 1, "generation", {}, "evt-1")
+    await append_event(storage, 2, "generation", {}, "evt-2")
+
+    assert [e["event_id"] for e in await get_recent(storage, 1)] == ["evt-1"]
+    assert [e["event_id"] for e in await get_recent(storage, 2)] == ["evt-2"]
+    assert (storage.data_dir / user_events_filename(1)).exists()
+
+
+@pytest.mark.asyncio
+async def test_cursor_pagination_newest_first(storage):
+    for index in range(25):
+        await append_event(storage, 1, "generation", {"n": index}, f"evt-{index}")
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        page = await get_page(storage, 1, limit=10, cursor=cursor)
+        seen.extend(event["payload"]["n"] for event in page.events)
+        pages += 1
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+
+    assert pages == 3
+    assert seen == list(range(24, -1, -1))
+
+
+@pytest.mark.asyncio
+async def test_legacy_document_seeds_user_once(storage):
+    await storage.write_json_file(
+        history_service.HISTORY_EVENTS_FILE,
+        {
+            "1": [
+                {"event_id": "old-1", "user_id": 1, "kind": "generation", "payload": {}, "created_at": "2026-01-01"},
+                {"event_id": "old-2", "user_id": 1, "kind": "payment", "payload": {}, "created_at": "2026-01-02"},
+            ]
+        },
+    )
+
+    page = await get_page(storage, 1, limit=10)
+    assert [e["event_id"] for e in page.events] == ["old-2", "old-1"]
+
+    assert await append_event(storage, 1, "generation", {}, "old-1") is False
+    assert await append_event(storage, 1, "generation", {}, "new-1") is True
+    history_service.reset_seeded_users()
+    await append_event(storage, 1, "generation", {}, "new-2")
+
+    events = [e["event_id"] for e in (await get_page(storage, 1, limit=10)).events]
+    assert events == ["new-2", "new-1", "old-2", "old-1"]
+    assert (await get_aggregates(storage, 1))["counts"] == {"generation": 3, "payment": 1}
+
+
+@pytest.mark.asyncio
+async def test_per_user_document_is_bounded(storage, monkeypatch):
+    monkeypatch.setattr(history_service, "HISTORY_EVENTS_MAX_PER_USER", 5)
+    for index in range(8):
+        await append_event(storage, 1, "generation", {"n": index}, f"evt-{index}")
+
+    doc = await storage.read_json_file(user_events_filename(1), default={})
+    assert [e["event_id"] for e in doc["events"]] == [f"evt-{index}" for index in range(3, 8)]
+    assert set(doc["ids"]) == {f"evt-{index}" for index in range(3, 8)}
+    assert doc["total"] == 8
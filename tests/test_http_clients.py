@@ -0,0 +1,112 @@
+import asyncio
+
+import aiohttp
+import httpx
+import pytest
+from aiohttp import web
+
+from app.integrations import http_clients
+from app.integrations.http_clients import Http2Session, HttpClientRegistry, UpstreamConfig
+
+
+async def _start_server():
+    async def ok(request):
+        return web.Response(body=b"payload", content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/file.png", ok)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}/file.png"
+
+
+@pytest.mark.asyncio
+async def test_session_is_shared_per_upstream_and_reuses_connections():
+    registry = HttpClientRegistry()
+    runner, url = await _start_server()
+    try:
+        cdn = await registry.get_session("cdn")
+        assert await registry.get_session("cdn") is cdn
+        assert await registry.get_session("kie_api") is not cdn
+        assert await registry.get_session("unknown") is await registry.get_session("default")
+
+        for _ in range(3):
+            async with cdn.get(url) as response:
+                assert await response.read() == b"payload"
+
+        snapshot = registry.snapshot()["cdn"]
+        assert snapshot["sessions"] == 1
+        assert snapshot["requests"] == 3
+        assert snapshot["connections_created"] == 1
+        assert snapshot["connections_reused"] == 2
+        assert snapshot["idle"] == 1
+    finally:
+        await registry.close()
+        await runner.cleanup()
+
+    assert cdn.closed
+    assert registry.snapshot()["cdn"]["sessions"] == 0
+
+
+def test_each_event_loop_gets_its_own_session():
+    registry = HttpClientRegistry()
+
+    async def grab():
+        return await registry.get_session("kie_api")
+
+    loop1 = asyncio.new_event_loop()
+    first = loop1.run_until_complete(grab())
+    assert loop1.run_until_complete(grab()) is first
+    loop1.run_until_complete(registry.close())
+    loop1.close()
+
+    loop2 = asyncio.new_event_loop()
+    second = loop2.run_until_complete(grab())
+    loop2.run_until_complete(registry.close())
+    loop2.close()
+
+    assert first is not second
+    assert first.closed and second.closed
+
+
+def test_upstream_limits_come_from_env(monkeypatch):
+    monkeypatch.setenv("HTTP_POOL_CDN_LIMIT", "7")
+    monkeypatch.setenv("HTTP_POOL_CDN_PER_HOST", "oops")
+
+    config = UpstreamConfig.from_env("cdn", limit=64, limit_per_host=16, keepalive_seconds=15)
+
+    assert (config.limit, config.limit_per_host, config.keepalive_seconds) == (7, 16, 15)
+
+
+@pytest.mark.asyncio
+async def test_cdn_http2_falls_back_to_aiohttp_without_h2(monkeypatch):
+    monkeypatch.setattr(http_clients, "_http2_available", lambda: False)
+    registry = HttpClientRegistry(cdn_http2=True)
+
+    session = await registry.get_session("cdn")
+    await registry.close()
+
+    assert isinstance(session, aiohttp.ClientSession)
+
+
+@pytest.mark.asyncio
+async def test_http2_session_matches_aiohttp_interface():
+    def handler(request):
+        assert request.headers["X-Test"] == "1"
+        return httpx.Response(200, headers={"Content-Type": "video/mp4", "Content-Length": "6"}, content=b"abcdef")
+
+    session = Http2Session(http_clients.UPSTREAMS["cdn"], http2=False, transport=httpx.MockTransport(handler))
+    async with session.get("https://cdn.example/v.mp4", headers={"X-Test": "1"}, timeout=aiohttp.ClientTimeout(total=5)) as response:
+        assert (response.status, response.content_length) == (200, 6)
+        assert response.headers.get("Content-Type") == "video/mp4"
+        chunks = [chunk async for chunk in response.content.iter_chunked(4)]
+    async with session.get("https://cdn.example/v.mp4", headers={"X-Test": "1"}) as response:
+        head = await response.content.read(2)
+    await session.close()
+
+    assert b"".join(chunks) == b"abcdef"
+    assert head == b"ab"
+    assert session.closed
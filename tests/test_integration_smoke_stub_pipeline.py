@@ -67,8 +67,8 @@ async def test_integration_smoke_stub_pipeline(monkeypatch, test_env):
 
     monkeypatch.setattr(KIEStub, "_simulate_processing", fast_simulate)
 
-    async def fake_download(session, url, retries=2):
-        return b"\x89PNG\r\n\x1a\n", "image/png", 8
+    async def fake_download(session, url, retries=2, **kwargs):
+        return media_pipeline.SpooledMedia.from_bytes(b"\x89PNG\r\n\x1a\n"), "image/png", 8
 
     monkeypatch.setattr(media_pipeline, "_download_with_retries", fake_download)
 
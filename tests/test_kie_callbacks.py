@@ -0,0 +1,235 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.delivery import reconciler
+from app.generations.request_dedupe_store import reset_memory_entries, set_job_task_mapping
+from app.generations.universal_engine import wait_job_result
+from app.kie import callbacks as kie_callbacks
+from tests.fakes.fake_kie_api import FakeKieAPI
+
+
+class CountingKie(FakeKieAPI):
+    def __init__(self):
+        super().__init__()
+        self.status_calls = 0
+
+    async def get_task_status(self, task_id):
+        self.status_calls += 1
+        return await super().get_task_status(task_id)
+
+
+class FakeStorage:
+    def __init__(self, jobs=None):
+        self.jobs = jobs or {}
+        self.updates = []
+
+    async def update_job_status(self, job_id, status, **kwargs):
+        self.updates.append((job_id, status))
+
+    async def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+
+@pytest.fixture
+async def callback_server(monkeypatch):
+    kie_callbacks.reset_callback_state()
+    reset_memory_entries()
+    storage = FakeStorage()
+    kie = CountingKie()
+    handler = kie_callbacks.build_kie_callback_handler(
+        get_bot=lambda: object(),
+        get_storage=lambda: storage,
+        get_kie_client=lambda: kie,
+    )
+    app = web.Application()
+    app.router.add_post(kie_callbacks.KIE_CALLBACK_PATH, handler)
+    server = TestServer(app)
+    await server.start_server()
+    monkeypatch.setenv("KIE_CALLBACK_URL", str(server.make_url(kie_callbacks.KIE_CALLBACK_PATH)))
+    monkeypatch.setenv("KIE_CALLBACK_TOKEN", "secret-token")
+    try:
+        yield kie, storage
+    finally:
+        await server.close()
+        kie_callbacks.reset_callback_state()
+        reset_memory_entries()
+
+
+async def _validate(urls, **kwargs):
+    return None
+
+
+async def test_callback_wakes_waiter_without_extra_polls(callback_server, monkeypatch):
+    kie, storage = callback_server
+    monkeypatch.setattr(kie_callbacks, "KIE_CALLBACK_SAFETY_POLL_SECONDS", 30.0)
+    callback_url = kie_callbacks.resolve_callback_url()
+    assert callback_url.endswith("token=secret-token")
+    created = await kie.create_task("model", {"prompt": "x"}, callback_url=callback_url)
+    task_id = created["taskId"]
+
+    waiter = asyncio.create_task(
+        wait_job_result(
+            task_id,
+            "model",
+            client=kie,
+            timeout=20,
+            max_attempts=10,
+            base_delay=0.01,
+            max_delay=0.05,
+            correlation_id="corr-cb",
+            request_id="req-cb",
+            user_id=1,
+            prompt_hash="hash",
+            job_id="job-cb",
+            validate_result_fn=_validate,
+            storage=storage,
+        )
+    )
+    await asyncio.sleep(0.05)
+    assert await kie.complete_task(task_id) == 200
+
+    record = await asyncio.wait_for(waiter, timeout=2)
+
+    assert record["state"] == "success"
+    assert record["source"] == "kie_callback"
+    assert kie.status_calls == 1
+    assert kie_callbacks.callback_stats_snapshot()["woke_waiter"] == 1
+    assert kie_callbacks.callback_stats_snapshot()["waiters"] == 0
+
+
+async def test_callback_with_bad_token_is_rejected(callback_server):
+    kie, _ = callback_server
+    created = await kie.create_task(
+        "model",
+        {"prompt": "x"},
+        callback_url=kie_callbacks.resolve_callback_url().replace("secret-token", "forged"),
+    )
+
+    assert await kie.complete_task(created["taskId"]) == 403
+    assert kie_callbacks.callback_stats_snapshot()["rejected"] == 1
+
+
+async def test_callback_without_waiter_hands_off_to_delivery(callback_server, monkeypatch):
+    kie, storage = callback_server
+    created = await kie.create_task("model", {"prompt": "x"}, callback_url=kie_callbacks.resolve_callback_url())
+    task_id = created["taskId"]
+    storage.jobs["job-orphan"] = {"job_id": "job-orphan", "user_id": 5, "status": "running"}
+    await set_job_task_mapping("job-orphan", task_id)
+    applied = []
+
+    async def fake_apply(bot, storage_arg, *, job, status, source, **kwargs):
+        applied.append((job, status, source))
+        return status["state"]
+
+    monkeypatch.setattr(reconciler, "apply_task_status", fake_apply)
+
+    assert await kie.complete_task(task_id) == 200
+    await asyncio.gather(*list(kie_callbacks._handoff_tasks))
+
+    assert len(applied) == 1
+    job, status, source = applied[0]
+    assert job["job_id"] == "job-orphan"
+    assert job["task_id"] == task_id
+    assert status["state"] == "success"
+    assert source == "kie_callback"
+    assert kie.status_calls == 0
+
+
+def _wait_kwargs(kie, storage):
+    return dict(
+        client=kie,
+        timeout=5,
+        max_attempts=10,
+        base_delay=0.01,
+        max_delay=0.05,
+        correlation_id="corr-early",
+        request_id="req-early",
+        user_id=5,
+        prompt_hash="hash",
+        job_id="job-early",
+        validate_result_fn=_validate,
+        storage=storage,
+    )
+
+
+async def test_early_callback_handoff_and_late_waiter_deliver_once(callback_server, monkeypatch):
+    kie, storage = callback_server
+    monkeypatch.setattr(kie_callbacks, "KIE_CALLBACK_SAFETY_POLL_SECONDS", 0.01)
+    created = await kie.create_task("model", {"prompt": "x"}, callback_url=kie_callbacks.resolve_callback_url())
+    task_id = created["taskId"]
+    storage.jobs["job-early"] = {"job_id": "job-early", "user_id": 5, "status": "running"}
+    await set_job_task_mapping("job-early", task_id)
+    applying = asyncio.Event()
+    release = asyncio.Event()
+    applied = []
+
+    async def slow_apply(bot, storage_arg, *, job, status, source, **kwargs):
+        applied.append(source)
+        applying.set()
+        await release.wait()
+        return status["state"]
+
+    monkeypatch.setattr(reconciler, "apply_task_status", slow_apply)
+
+    assert await kie.complete_task(task_id) == 200
+    await asyncio.wait_for(applying.wait(), timeout=2)
+    # The generation flow only starts waiting after the handoff claimed the task.
+    record = await wait_job_result(task_id, "model", **_wait_kwargs(kie, storage))
+    release.set()
+    await asyncio.gather(*list(kie_callbacks._handoff_tasks))
+
+    assert record["delivery_pending"] is True
+    assert applied == ["kie_callback"]
+    assert kie.status_calls == 0
+
+
+async def test_waiter_registered_during_handoff_lookup_takes_the_record(callback_server, monkeypatch):
+    kie, storage = callback_server
+    created = await kie.create_task("model", {"prompt": "x"}, callback_url=kie_callbacks.resolve_callback_url())
+    task_id = created["taskId"]
+    storage.jobs["job-early"] = {"job_id": "job-early", "user_id": 5, "status": "running"}
+    await set_job_task_mapping("job-early", task_id)
+    lookup_started = asyncio.Event()
+    release = asyncio.Event()
+    real_resolve = kie_callbacks.resolve_job_for_task
+    applied = []
+
+    async def slow_resolve(storage_arg, task_id_arg):
+        lookup_started.set()
+        await release.wait()
+        return await real_resolve(storage_arg, task_id_arg)
+
+    async def fake_apply(bot, storage_arg, *, job, status, source, **kwargs):
+        applied.append(source)
+        return status["state"]
+
+    monkeypatch.setattr(kie_callbacks, "resolve_job_for_task", slow_resolve)
+    monkeypatch.setattr(reconciler, "apply_task_status", fake_apply)
+
+    assert await kie.complete_task(task_id) == 200
+    await asyncio.wait_for(lookup_started.wait(), timeout=2)
+    waiter = asyncio.create_task(wait_job_result(task_id, "model", **_wait_kwargs(kie, storage)))
+    await asyncio.sleep(0.05)
+    release.set()
+    record = await asyncio.wait_for(waiter, timeout=2)
+    await asyncio.gather(*list(kie_callbacks._handoff_tasks))
+
+    assert record["state"] == "success"
+    assert record["source"] == "kie_callback"
+    assert applied == []
+
+
+def test_normalize_callback_record_accepts_wrapped_and_flat_payloads():
+    wrapped = kie_callbacks.normalize_callback_record(
+        {"code": 200, "data": {"taskId": "t1", "state": "success", "resultJson": {"resultUrls": ["u"]}}}
+    )
+    flat = kie_callbacks.normalize_callback_record({"taskId": "t2", "state": "fail", "failMsg": "boom"})
+
+    assert wrapped["taskId"] == "t1"
+    assert wrapped["resultJson"] == '{"resultUrls": ["u"]}'
+    assert flat["state"] == "fail"
+    assert flat["failMsg"] == "boom"
+    assert kie_callbacks.normalize_callback_record({"data": {}}) is None
@@ -0,0 +1,85 @@
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from app.kie_catalog.catalog import load_catalog
+from app.services import kie_input_builder
+from app.services.kie_input_builder import build_input
+
+SOURCE_OF_TRUTH = Path(__file__).resolve().parents[1] / "models" / "kie_models_source_of_truth.json"
+
+
+def _example_payloads(model_id):
+    models = json.loads(SOURCE_OF_TRUTH.read_text(encoding="utf-8")).get("models", {})
+    example = (models.get(model_id) or {}).get("payload_example") or {}
+    payloads = [{"prompt": "a cat"}, {"prompt": "a cat", "image_url": "https://example.com/a.png"}]
+    if example.get("input"):
+        payloads.insert(0, example["input"])
+    return payloads
+
+
+def _run(model, payload, mode_index):
+    try:
+        return build_input(model, copy.deepcopy(payload), mode_index)
+    except Exception as exc:  # a few legacy validators reference missing helpers
+        return ("error", type(exc).__name__, str(exc))
+
+
+def test_dispatch_matches_sequential_validator_chain(monkeypatch):
+    """Every validator guards on model_id, so running all of them is the legacy path."""
+    all_validators = tuple(rule.validator for rule in kie_input_builder._VALIDATOR_RULES)
+    cases = 0
+    for model in load_catalog():
+        for payload in _example_payloads(model.id):
+            for mode_index in range(max(1, len(model.modes))):
+                dispatched = _run(model, payload, mode_index)
+                with monkeypatch.context() as patched:
+                    patched.setattr(kie_input_builder, "_validators_for", lambda _model_id: all_validators)
+                    sequential = _run(model, payload, mode_index)
+                assert dispatched == sequential, (model.id, payload, mode_index)
+                cases += 1
+    assert cases >= len(load_catalog())
+
+
+@pytest.mark.parametrize(
+    "model_id, expected",
+    [
+        ("z-image", {"aspect_ratio": "1:1"}),
+        ("sora-2-text-to-video", {"aspect_ratio": "landscape", "n_frames": "10", "remove_watermark": True}),
+        ("unknown/model", {}),
+    ],
+)
+def test_model_defaults_are_declared_once(model_id, expected):
+    assert kie_input_builder._model_defaults_for(model_id) == expected
+
+
+def test_mutable_defaults_are_copied_per_build():
+    defaults = kie_input_builder._model_defaults_for("nano-banana-pro")
+    assert defaults["image_input"] == []
+    model = next((m for m in load_catalog() if m.id == "nano-banana-pro"), None)
+    if model is None:
+        pytest.skip("nano-banana-pro not in catalog")
+    built, error = build_input(model, {"prompt": "a cat"}, 0)
+    if error is None and "image_input" in built:
+        built["image_input"].append("mutated")
+    assert kie_input_builder._model_defaults_for("nano-banana-pro")["image_input"] == []
+
+
+def test_schema_registry_is_parsed_once_per_file_version(tmp_path, monkeypatch):
+    from app.kie_contract import schema_loader
+
+    path = tmp_path / "kie_models.yaml"
+    path.write_text("models:\n  m:\n    input: {}\n", encoding="utf-8")
+    monkeypatch.setattr(schema_loader, "REGISTRY_PATH", path)
+    schema_loader.reset_registry_cache()
+    try:
+        first = schema_loader._load_registry()
+        assert schema_loader._load_registry() is first
+
+        path.write_text("models:\n  m:\n    input: {}\n  n:\n    input: {}\n", encoding="utf-8")
+        assert set(schema_loader._load_registry()["models"]) == {"m", "n"}
+    finally:
+        monkeypatch.undo()
+        schema_loader.reset_registry_cache()
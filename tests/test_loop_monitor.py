@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.observability import loop_monitor
+from app.observability.loop_monitor import LoopMonitor, current_lag_ms, loop_monitor_snapshot, start_loop_monitor
+from app.utils.healthcheck import loop_diag_handler
+
+
+def _block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def _wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_sampler_fills_histogram():
+    monitor = LoopMonitor(asyncio.get_running_loop(), interval_ms=5, threshold_ms=500)
+    monitor.start()
+    try:
+        await _wait_for(lambda: monitor.samples >= 5)
+    finally:
+        await monitor.stop()
+
+    snapshot = monitor.snapshot()
+    assert sum(snapshot["histogram_ms"].values()) == snapshot["samples"]
+    assert snapshot["p95_ms"] is not None
+    assert snapshot["stalls_total"] == 0
+    assert not monitor.running
+
+
+@pytest.mark.asyncio
+async def test_slow_callback_stack_is_captured(caplog):
+    monitor = LoopMonitor(asyncio.get_running_loop(), interval_ms=5, threshold_ms=50)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.02)
+        _block_the_loop(0.3)
+        await _wait_for(lambda: monitor.max_lag_ms >= 250)
+        await asyncio.sleep(0.02)
+    finally:
+        await monitor.stop()
+
+    assert monitor.stalls_total == 1
+    stall = monitor.snapshot(include_stacks=True)["recent_stalls"][0]
+    assert "_block_the_loop" in "\n".join(stall["stack"])
+    assert "test_slow_callback_stack_is_captured" in stall["task"]
+    assert stall["blocked_ms"] >= 250
+    assert "stack" not in monitor.snapshot()["recent_stalls"][0]
+    structured = [r.getMessage() for r in caplog.records if "EVENT_LOOP_STALL" in r.getMessage()]
+    assert structured and '"stage": "EVENT_LOOP"' in structured[0]
+
+
+@pytest.mark.asyncio
+async def test_current_lag_and_diag_endpoint(monkeypatch):
+    monkeypatch.setattr(loop_monitor, "EVENT_LOOP_MONITOR_ENABLED", True)
+    assert current_lag_ms() is None
+
+    monitor = start_loop_monitor(interval_ms=5, threshold_ms=1000)
+    assert start_loop_monitor() is monitor
+    try:
+        await _wait_for(lambda: monitor.samples >= 2)
+        assert current_lag_ms() is not None
+
+        response = await loop_diag_handler(None)
+        payload = json.loads(response.text)
+        assert payload["running"] is True
+        assert payload["samples"] >= 2
+    finally:
+        await loop_monitor.stop_loop_monitor()
+
+    assert current_lag_ms() is None
+    assert loop_monitor_snapshot()["running"] is False
@@ -13,6 +13,15 @@ class DummyResponse:
         self._body = body
         self.history = history or []
         self.content_length = content_length
+        self.status = 200
+
+    @property
+    def content(self):
+        return self
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self._body), size):
+            yield self._body[start : start + size]
 
     async def read(self):
         return self._body
@@ -149,3 +158,216 @@ def test_redirect_chain_is_followed():
 
     assert tg_method == "send_photo"
     assert session.last_get_kwargs.get("allow_redirects") is True
+
+
+class HeadSession(DummySession):
+    def __init__(self, get_factory, head_length):
+        super().__init__(get_factory)
+        self._head_length = head_length
+        self.get_calls = 0
+
+    def head(self, url, *args, **kwargs):
+        return DummyResponse(content_length=self._head_length)
+
+    def get(self, url, *args, **kwargs):
+        self.get_calls += 1
+        return super().get(url, *args, **kwargs)
+
+
+def test_head_precheck_skips_download_of_oversized_media(monkeypatch):
+    monkeypatch.setenv("TEST_MODE", "0")
+    monkeypatch.setenv("DRY_RUN", "0")
+    monkeypatch.setenv("ALLOW_REAL_GENERATION", "1")
+    monkeypatch.setattr(media_pipeline, "TELEGRAM_MAX_BYTES", 10)
+    session = HeadSession(lambda: DummyResponse(headers={"Content-Type": "video/mp4"}, body=b"x" * 100), 100)
+
+    tg_method, payload = asyncio.run(
+        resolve_and_prepare_telegram_payload(
+            {"urls": ["https://example.com/big.mp4"], "text": None},
+            "corr-7",
+            "video",
+            kie_client=None,
+            http_client=session,
+        )
+    )
+
+    assert tg_method == "send_message"
+    assert session.get_calls == 0
+
+
+def test_streamed_download_spools_to_disk_and_aborts_over_limit(monkeypatch):
+    monkeypatch.setattr(media_pipeline, "MEDIA_STREAM_CHUNK_BYTES", 4)
+    monkeypatch.setattr(media_pipeline, "MEDIA_SPOOL_MAX_MEMORY_BYTES", 8)
+    budget = media_pipeline.MediaByteBudget(1000)
+    monkeypatch.setattr(media_pipeline, "_media_budget", budget)
+    body = b"\x89PNG" + b"x" * 60
+    session = DummySession(lambda: DummyResponse(headers={"Content-Type": "application/octet-stream"}, body=body))
+
+    async def run():
+        spool, _, length = await media_pipeline._download_with_retries(session, "https://example.com/a")
+        assert length == len(body)
+        assert spool.rolled_to_disk
+        assert spool.head.startswith(b"\x89PNG")
+        # Disk-backed spools hold no in-memory budget until upload.
+        assert budget.in_use == 0
+        input_file = media_pipeline.SpooledInputFile(spool, filename="a.png")
+        assert input_file.input_file_content == body
+        spool.close()
+        assert budget.in_use == 0
+
+        aborted, _, aborted_length = await media_pipeline._download_with_retries(
+            session, "https://example.com/a", max_bytes=16
+        )
+        assert aborted.file is None
+        assert aborted_length > 16
+        assert budget.in_use == 0
+
+    asyncio.run(run())
+
+
+def test_media_byte_budget_blocks_until_release():
+    async def run():
+        budget = media_pipeline.MediaByteBudget(10)
+        first = await budget.acquire(8)
+        waiter = asyncio.create_task(budget.acquire(5))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        budget.release(first)
+        assert await asyncio.wait_for(waiter, timeout=1) == 5
+        assert budget.snapshot() == {"capacity_bytes": 10, "in_use_bytes": 5, "waiters": 0}
+
+    asyncio.run(run())
+
+
+def test_media_byte_budget_acquire_times_out_and_wakes_smaller_waiters():
+    async def run():
+        budget = media_pipeline.MediaByteBudget(10)
+        await budget.acquire(8)
+        small = asyncio.create_task(budget.acquire(2))
+        try:
+            await budget.acquire(5, timeout=0.05)
+        except media_pipeline.MediaBudgetExhausted:
+            pass
+        else:
+            raise AssertionError("expected MediaBudgetExhausted")
+        assert await asyncio.wait_for(small, timeout=1) == 2
+        assert budget.snapshot() == {"capacity_bytes": 10, "in_use_bytes": 10, "waiters": 0}
+
+    asyncio.run(run())
+
+
+def test_media_group_larger_than_budget_is_delivered(monkeypatch):
+    monkeypatch.setenv("TEST_MODE", "0")
+    monkeypatch.setenv("DRY_RUN", "0")
+    monkeypatch.setenv("ALLOW_REAL_GENERATION", "1")
+    monkeypatch.setattr(media_pipeline, "MEDIA_HEAD_PRECHECK", False)
+    monkeypatch.setattr(media_pipeline, "MEDIA_STREAM_CHUNK_BYTES", 64)
+    monkeypatch.setattr(media_pipeline, "MEDIA_SPOOL_MAX_MEMORY_BYTES", 100)
+    monkeypatch.setattr(media_pipeline, "MEDIA_BUDGET_WAIT_SECONDS", 5)
+    budget = media_pipeline.MediaByteBudget(3000)
+    monkeypatch.setattr(media_pipeline, "_media_budget", budget)
+    body = b"\x89PNG" + b"x" * 1996
+    session = DummySession(lambda: DummyResponse(headers={"Content-Type": "image/png"}, body=body))
+    urls = [f"https://cdn.example.com/{idx}.png" for idx in range(4)]
+
+    async def run():
+        tg_method, payload = await asyncio.wait_for(
+            resolve_and_prepare_telegram_payload(
+                {"urls": urls, "text": None},
+                "corr-budget",
+                "image",
+                kie_client=None,
+                http_client=session,
+            ),
+            timeout=5,
+        )
+        assert tg_method == "send_media_group"
+        assert len(payload["media"]) == 4
+        assert all(isinstance(item.media, InputFile) for item in payload["media"])
+        assert budget.in_use == 0
+        media_pipeline.release_media_payload(payload)
+        assert budget.in_use == 0
+
+    asyncio.run(run())
+
+
+def test_budget_timeout_falls_back_to_url_delivery(monkeypatch):
+    monkeypatch.setenv("TEST_MODE", "0")
+    monkeypatch.setenv("DRY_RUN", "0")
+    monkeypatch.setenv("ALLOW_REAL_GENERATION", "1")
+    monkeypatch.setattr(media_pipeline, "MEDIA_HEAD_PRECHECK", False)
+    monkeypatch.setattr(media_pipeline, "MEDIA_BUDGET_WAIT_SECONDS", 0.05)
+    budget = media_pipeline.MediaByteBudget(100)
+    monkeypatch.setattr(media_pipeline, "_media_budget", budget)
+    session = HeadSession(lambda: DummyResponse(headers={"Content-Type": "image/png"}, body=b"data"), None)
+    url = "https://cdn.example.com/a.png"
+
+    async def run():
+        await budget.acquire(100)
+        return await resolve_and_prepare_telegram_payload(
+            {"urls": [url], "text": None}, "corr-busy", "image", kie_client=None, http_client=session
+        )
+
+    tg_method, payload = asyncio.run(run())
+
+    assert tg_method == "send_photo"
+    assert payload["photo"] == url
+    assert session.get_calls == 0
+
+
+def test_send_prepared_media_releases_spools():
+    async def run():
+        budget = media_pipeline.MediaByteBudget(100)
+        spool = media_pipeline.SpooledMedia.from_bytes(b"data")
+        spool.attach_budget(budget, await budget.acquire(4))
+        bot = AsyncMock()
+        payload = {"photo": media_pipeline.SpooledInputFile(spool, filename="a.png"), "caption": "c"}
+
+        await media_pipeline.send_prepared_media(bot, "send_photo", chat_id=1, payload=payload)
+
+        bot.send_photo.assert_awaited_once()
+        assert budget.in_use == 0
+
+    asyncio.run(run())
+
+
+def test_multi_result_resolution_is_concurrent_and_keeps_order(monkeypatch):
+    monkeypatch.setattr(media_pipeline, "MEDIA_RESOLVE_CONCURRENCY", 2)
+    state = {"in_flight": 0, "peak": 0}
+    urls = [f"https://example.com/{idx}.png" for idx in range(5)]
+
+    async def fake_resolve(url, media_kind, correlation_id, kie_client, http_client, **kwargs):
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        # Later URLs finish first to prove the group keeps the original order.
+        await asyncio.sleep(0.01 * (len(urls) - urls.index(url)))
+        state["in_flight"] -= 1
+        if url.endswith("3.png"):
+            raise media_pipeline.MediaNotMediaError(url, "text/html", "html")
+        return media_pipeline.ResolvedMedia(
+            url=url,
+            payload=url,
+            content_type="image/png",
+            content_length=1,
+            method="send_photo",
+            used_download=False,
+            too_large=False,
+            is_media=True,
+            error_code=None,
+        )
+
+    monkeypatch.setattr(media_pipeline, "_resolve_single_media", fake_resolve)
+
+    tg_method, payload = asyncio.run(
+        resolve_and_prepare_telegram_payload(
+            {"urls": urls, "text": None},
+            "corr-8",
+            "image",
+            kie_client=None,
+            http_client=None,
+        )
+    )
+
+    assert tg_method == "send_media_group"
+    assert [item.media for item in payload["media"]] == [urls[0], urls[1], urls[2], urls[4]]
+    assert state["peak"] == 2
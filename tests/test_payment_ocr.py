@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.integrations import payment_ocr
+from app.integrations.payment_ocr import OcrPool, OcrQueueFull, OcrTimeout, preprocess_image
+
+
+def _png(size=(3200, 1200), color=(20, 120, 220)) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _thread_pool(workers):
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def test_preprocess_downscales_and_grays():
+    image = preprocess_image(Image.new("RGBA", (3200, 1200)), max_side=1600, threshold=128)
+    assert image.mode == "L"
+    assert image.size == (1600, 600)
+    assert set(image.getdata()) <= {0, 255}
+
+
+def test_run_ocr_falls_back_to_next_language(monkeypatch):
+    calls = []
+
+    def fake_image_to_string(image, lang=None):
+        calls.append(lang)
+        if lang == "rus+eng":
+            raise RuntimeError("rus traineddata missing")
+        return "Переведено 500 ₽"
+
+    monkeypatch.setattr("pytesseract.image_to_string", fake_image_to_string)
+    payload = payment_ocr.run_ocr(_png())
+
+    assert calls == ["rus+eng", "eng"]
+    assert payload["lang"] == "eng"
+    assert (payload["width"], payload["height"]) == (3200, 1200)
+
+
+@pytest.mark.asyncio
+async def test_queue_is_bounded_and_waiters_are_notified():
+    release = threading.Event()
+
+    def slow_worker(image_data, tesseract_cmd):
+        release.wait(5)
+        return {"text": "ok", "lang": "eng", "width": 1, "height": 1, "ocr_ms": 5.0}
+
+    pool = OcrPool(workers=1, queue_max=1, timeout_seconds=5, executor_factory=_thread_pool, worker_fn=slow_worker)
+    positions = []
+    first = asyncio.create_task(pool.run(b"a"))
+    await asyncio.sleep(0.05)
+    second = asyncio.create_task(pool.run(b"b", on_queued=positions.append))
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(OcrQueueFull):
+        await pool.run(b"c")
+
+    release.set()
+    results = await asyncio.gather(first, second)
+    pool.shutdown()
+
+    assert positions == [1]
+    assert [result.text for result in results] == ["ok", "ok"]
+    assert results[1].queue_wait_ms > 0
+    snapshot = pool.snapshot()
+    assert (snapshot["completed"], snapshot["rejected"], snapshot["waiting"]) == (2, 1, 0)
+    assert snapshot["ocr_ms_p95"] == 5.0
+
+
+@pytest.mark.asyncio
+async def test_timeout_recycles_the_pool():
+    def stuck_worker(image_data, tesseract_cmd):
+        time.sleep(0.5)
+        return {"text": ""}
+
+    pool = OcrPool(workers=1, timeout_seconds=0.05, executor_factory=_thread_pool, worker_fn=stuck_worker)
+    with pytest.raises(OcrTimeout):
+        await pool.run(b"a")
+
+    assert pool.snapshot()["timeouts"] == 1
+    assert pool.snapshot()["recycled"] == 1
+    assert pool.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_timeout_does_not_kill_other_jobs_or_the_replacement_pool():
+    release = threading.Event()
+    executors = []
+
+    class TrackingExecutor(ThreadPoolExecutor):
+        def __init__(self, workers):
+            super().__init__(max_workers=workers)
+            self.stopped_after = None
+            executors.append(self)
+
+        def shutdown(self, wait=True, *, cancel_futures=False):
+            self.stopped_after = list(finished)
+            super().shutdown(wait=False, cancel_futures=cancel_futures)
+
+    finished = []
+
+    def worker(image_data, tesseract_cmd):
+        if image_data == b"stuck":
+            release.wait(5)
+        else:
+            time.sleep(0.4)
+        finished.append(image_data)
+        return {"text": image_data.decode(), "ocr_ms": 1.0}
+
+    pool = OcrPool(workers=2, timeout_seconds=0.5, executor_factory=TrackingExecutor, worker_fn=worker)
+    stuck = asyncio.create_task(pool.run(b"stuck"))
+    await asyncio.sleep(0.3)
+    other = asyncio.create_task(pool.run(b"other"))
+
+    with pytest.raises(OcrTimeout):
+        await stuck
+    assert executors[0].stopped_after is None
+    fresh_task = asyncio.create_task(pool.run(b"fresh"))
+    result = await other
+    # A late failure reported against the retired pool must not touch its replacement.
+    pool.recycle("broken_pool", executor=executors[0])
+    fresh = await fresh_task
+    assert executors[1].stopped_after is None
+    release.set()
+    pool.shutdown()
+
+    assert (result.text, fresh.text) == ("other", "fresh")
+    assert len(executors) == 2
+    assert executors[0].stopped_after == [b"other"]
+    assert pool.snapshot()["recycled"] == 1
+    assert pool.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_workers_are_recycled_after_max_tasks():
+    created = []
+
+    def factory(workers):
+        created.append(workers)
+        return _thread_pool(workers)
+
+    def worker(image_data, tesseract_cmd):
+        return {"text": "ok", "ocr_ms": 1.0}
+
+    pool = OcrPool(workers=1, executor_factory=factory, worker_fn=worker, max_tasks_per_child=2)
+    for _ in range(5):
+        await pool.run(b"a")
+    pool.shutdown()
+
+    assert len(created) == 3
+    assert pool.snapshot()["recycled"] == 2
+
+
+def _image_size_worker(image_data, tesseract_cmd):
+    import sys
+
+    with Image.open(BytesIO(image_data)) as image:
+        width, height = image.size
+    return {"text": "ok", "width": width, "height": height, "preloaded": "pytesseract" in sys.modules}
+
+
+@pytest.mark.asyncio
+async def test_default_pool_forks_workers_from_the_forkserver():
+    payment_ocr.start_ocr_forkserver()
+    executor = payment_ocr._default_executor_factory(1)
+    try:
+        assert executor._mp_context.get_start_method() == "forkserver"
+        payload = await asyncio.get_running_loop().run_in_executor(executor, _image_size_worker, _png((40, 20)), None)
+    finally:
+        executor.shutdown(wait=True)
+
+    assert (payload["width"], payload["height"]) == (40, 20)
+    assert payload["preloaded"] is True
+
+
+@pytest.mark.asyncio
+async def test_analyze_payment_screenshot_keeps_result_contract(monkeypatch):
+    import bot_kie
+
+    async def fake_recognize(image_data, *, tesseract_cmd=None, on_queued=None):
+        return payment_ocr.OcrResult(text="Перевод успешно выполнен 500 ₽", lang="rus+eng", width=10, height=10, ocr_ms=1.0)
+
+    monkeypatch.setattr(bot_kie, "OCR_AVAILABLE", True)
+    monkeypatch.setattr(bot_kie, "PIL_AVAILABLE", True)
+    monkeypatch.setattr(payment_ocr, "recognize_payment_screenshot", fake_recognize)
+
+    result = await bot_kie.analyze_payment_screenshot(b"png", 500.0)
+
+    assert result["valid"] is True
+    assert result["amount_found"] is True
+    assert result["found_amount"] == 500.0
+    assert result["has_critical_keyword"] is True
+    assert result["phone_found"] is None
@@ -0,0 +1,180 @@
+import random
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from app.services.payment_screenshot_index import (
+    BKTree,
+    PaymentScreenshotIndex,
+    compute_dhash,
+    hamming_distance,
+)
+
+
+def _receipt(amount: str, *, scale: float = 1.0, quality=90) -> bytes:
+    image = Image.new("RGB", (720, 1280), (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 720, 200), fill=(30, 160, 90))
+    draw.rectangle((60, 400, 660, 700), fill=(255, 255, 255), outline=(0, 0, 0))
+    draw.text((100, 450), f"{amount} RUB", fill=(0, 0, 0))
+    draw.ellipse((300, 800, 420, 920), fill=(30, 160, 90))
+    if scale != 1.0:
+        image = image.resize((int(720 * scale), int(1280 * scale)))
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _distance(left: str, right: str) -> int:
+    return hamming_distance(int(left, 16), int(right, 16))
+
+
+def test_dhash_survives_recompression_and_resize():
+    original = compute_dhash(_receipt("500"))
+    reuploaded = compute_dhash(_receipt("500", scale=0.75, quality=55))
+    rng = random.Random(1)
+    other = Image.new("L", (72, 128))
+    other.putdata([rng.randrange(256) for _ in range(72 * 128)])
+    buffer = BytesIO()
+    other.save(buffer, format="PNG")
+
+    assert len(original) == 64
+    assert _distance(original, reuploaded) <= 6
+    assert _distance(original, compute_dhash(buffer.getvalue())) > 40
+
+
+def test_bk_tree_matches_brute_force():
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(2000)]
+    tree = BKTree()
+    for position, value in enumerate(values):
+        tree.add(value, str(position))
+    probe = values[123] ^ 0b1011
+
+    expected = sorted(
+        (hamming_distance(probe, value), str(position))
+        for position, value in enumerate(values)
+        if hamming_distance(probe, value) <= 12
+    )
+    assert tree.search(probe, 12) == expected
+    assert expected[0] == (3, "123")
+    assert len(tree) == 2000
+
+
+def test_index_exact_and_incremental_sync():
+    index = PaymentScreenshotIndex()
+    payments = {
+        "1": {"id": 1, "screenshot_file_id": "file-a"},
+        "2": {"id": 2, "screenshot_file_id": "file-b", "screenshot_unique_id": "uniq-b", "screenshot_hash": "ff" * 32},
+    }
+    index.sync(payments)
+    assert index.find_exact(file_id="file-a") == "1"
+    assert index.find_exact(unique_id="uniq-b", file_id="new-file-id") == "2"
+    assert index.find_exact(unique_id="uniq-x") is None
+
+    payments["3"] = {"id": 3, "screenshot_unique_id": "uniq-c", "screenshot_hash": "ff" * 31 + "fe"}
+    index.sync(payments)
+    assert len(index) == 3
+    assert index.find_similar("ff" * 32) == [(0, "2"), (1, "3")]
+
+
+def test_index_sync_compares_key_sets():
+    index = PaymentScreenshotIndex()
+    index.sync({"1": {"id": 1, "screenshot_file_id": "file-a"}, "2": {"id": 2, "screenshot_file_id": "file-b"}})
+
+    # Тот же размер, другой набор ключей: платёж 1 удалён, платёж 3 добавлен другим инстансом.
+    index.sync({"2": {"id": 2, "screenshot_file_id": "file-b"}, "3": {"id": 3, "screenshot_file_id": "file-c"}})
+
+    assert index.find_exact(file_id="file-c") == "3"
+    assert index.find_exact(file_id="file-a") is None
+    assert len(index) == 2
+
+
+def test_duplicate_check_sees_payments_from_other_instances(monkeypatch):
+    import bot_kie
+
+    payments = {"1": {"id": 1, "screenshot_unique_id": "uniq-1"}}
+    monkeypatch.setattr(bot_kie, "load_json_file", lambda *_args, **_kwargs: dict(payments))
+    assert bot_kie.check_duplicate_payment("file-x", "uniq-2") is False
+
+    payments["2"] = {"id": 2, "screenshot_unique_id": "uniq-2"}
+
+    assert bot_kie.check_duplicate_payment("file-x", "uniq-2") is True
+
+
+def test_payment_flow_blocks_reuploaded_screenshot(monkeypatch):
+    import bot_kie
+
+    class FakeStorage:
+        def __init__(self):
+            self.payments = {}
+
+        async def update_json_file(self, filename, update_fn):
+            self.payments = update_fn(self.payments)
+            return self.payments
+
+    fake_storage = FakeStorage()
+    monkeypatch.setattr("app.storage.factory.get_storage", lambda: fake_storage)
+    monkeypatch.setattr(bot_kie, "add_user_balance", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr(bot_kie, "load_json_file", lambda *_args, **_kwargs: dict(fake_storage.payments))
+
+    screenshot_hash = bot_kie.compute_payment_screenshot_hash(_receipt("750"))
+    bot_kie.add_payment(5, 750.0, "file-1", screenshot_unique_id="uniq-1", screenshot_hash=screenshot_hash)
+
+    stored = fake_storage.payments["1"]
+    assert (stored["screenshot_unique_id"], stored["screenshot_hash"]) == ("uniq-1", screenshot_hash)
+    assert bot_kie.check_duplicate_payment("another-file-id", "uniq-1") is True
+    assert bot_kie.check_duplicate_payment("another-file-id", "uniq-2") is False
+
+    reupload_hash = bot_kie.compute_payment_screenshot_hash(_receipt("750", scale=0.75, quality=50))
+    similar = bot_kie.find_similar_payment(reupload_hash)
+    assert similar is not None and similar["payment_id"] == "1"
+
+    again = bot_kie.add_payment(5, 750.0, "file-2", screenshot_unique_id="uniq-1")
+    assert again["id"] == 1
+    assert len(fake_storage.payments) == 1
+
+
+async def test_similar_screenshot_is_recorded_for_review(monkeypatch):
+    import bot_kie
+
+    class FakeStorage:
+        def __init__(self):
+            self.payments = {}
+
+        async def update_json_file(self, filename, update_fn):
+            self.payments = update_fn(self.payments)
+            return self.payments
+
+    class FakeBot:
+        def __init__(self):
+            self.photos = []
+
+        async def send_photo(self, **kwargs):
+            self.photos.append(kwargs)
+
+    fake_storage = FakeStorage()
+    credited = []
+    monkeypatch.setattr("app.storage.factory.get_storage", lambda: fake_storage)
+    monkeypatch.setattr(bot_kie, "add_user_balance", lambda *args, **_kwargs: credited.append(args))
+    monkeypatch.setattr(bot_kie, "load_json_file", lambda *_args, **_kwargs: dict(fake_storage.payments))
+
+    screenshot_hash = bot_kie.compute_payment_screenshot_hash(_receipt("750"))
+    bot_kie.add_payment(5, 750.0, "file-1", screenshot_unique_id="uniq-1", screenshot_hash=screenshot_hash)
+    reupload_hash = bot_kie.compute_payment_screenshot_hash(_receipt("750", scale=0.75, quality=50))
+    similar = bot_kie.find_similar_payment(reupload_hash)
+
+    payment = await bot_kie.add_payment_for_review_async(
+        5, 750.0, "file-2", screenshot_unique_id="uniq-2", screenshot_hash=reupload_hash, similar_payment=similar
+    )
+    bot = FakeBot()
+    await bot_kie.notify_admin_payment_review(bot, payment)
+
+    stored = fake_storage.payments[str(payment["id"])]
+    assert stored["status"] == "needs_review"
+    assert stored["balance_charged"] is False
+    assert (stored["similar_payment_id"], stored["similar_distance"]) == ("1", similar["distance"])
+    assert len(credited) == 1
+    assert bot.photos[0]["chat_id"] == bot_kie.ADMIN_ID
+    assert bot.photos[0]["photo"] == "file-2"
+    assert bot_kie.check_duplicate_payment("file-3", "uniq-2") is True
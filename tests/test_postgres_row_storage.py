@@ -0,0 +1,278 @@
+import asyncio
+import os
+
+import pytest
+
+from app.storage.factory import create_storage, reset_storage
+from app.storage.postgres_row_storage import (
+    HISTORY_MAX_PER_USER,
+    PostgresRowStorage,
+    balance_rows_from_document,
+    charge_result_from_row,
+    diff_document,
+    history_rows_from_document,
+    keyed_rows_from_document,
+    ledger_rows_from_deductions,
+    refund_result_from_row,
+)
+from app.storage.postgres_storage import PostgresStorage
+
+
+def test_balance_rows_skip_non_numeric_keys():
+    rows = balance_rows_from_document({"1": 10, "2": "5.5", "meta": 1, "3": "nan"})
+
+    assert sorted(rows) == [(1, 10.0), (2, 5.5), (3, 0.0)]
+
+
+def test_keyed_rows_backfill_id_field():
+    rows = keyed_rows_from_document({"job-1": {"status": "pending"}, "broken": "x"}, id_field="job_id")
+
+    assert rows == [("job-1", {"status": "pending", "job_id": "job-1"})]
+
+
+def test_history_rows_keep_last_entries_per_user():
+    items = [{"id": f"g{i}", "timestamp": f"2025-01-01T00:00:{i:02d}"} for i in range(HISTORY_MAX_PER_USER + 5)]
+    rows = history_rows_from_document({"42": items, "bad": items})
+
+    assert len(rows) == HISTORY_MAX_PER_USER
+    assert rows[0][0] == 42
+    assert rows[0][1] == "g5"
+    assert rows[-1][1] == f"g{HISTORY_MAX_PER_USER + 4}"
+
+
+def test_diff_document_reports_changes_and_removals():
+    changed, removed = diff_document({"a": 1, "b": 2, "c": 3}, {"a": 1, "b": 5, "d": 4})
+
+    assert changed == {"b": 5, "d": 4}
+    assert removed == ["c"]
+
+
+def test_factory_selects_row_layout(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql://example")
+    monkeypatch.setenv("BOT_INSTANCE_ID", "tenant-rows")
+    monkeypatch.setenv("STORAGE_PG_LAYOUT", "rows")
+    monkeypatch.delenv("GITHUB_REPO", raising=False)
+    monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+    reset_storage()
+
+    storage = create_storage(storage_mode="postgres")
+
+    assert isinstance(storage, PostgresRowStorage)
+    assert isinstance(storage, PostgresStorage)
+    reset_storage()
+
+
+def test_charge_result_mapping_covers_contract():
+    charged = charge_result_from_row(
+        {"inserted": 1, "balance_after": 90.0, "balance_seen": 100.0, "already_charged": False},
+        amount=10.0,
+    )
+    duplicate = charge_result_from_row(
+        {"inserted": 0, "balance_after": None, "balance_seen": 90.0, "already_charged": True},
+        amount=10.0,
+    )
+    insufficient = charge_result_from_row(
+        {"inserted": 0, "balance_after": None, "balance_seen": 5.0, "already_charged": False},
+        amount=10.0,
+    )
+    race = charge_result_from_row(
+        {"inserted": 1, "balance_after": None, "balance_seen": 12.0, "already_charged": False},
+        amount=10.0,
+    )
+
+    assert charged == {"status": "charged", "balance_before": 100.0, "balance_after": 90.0}
+    assert duplicate["status"] == "duplicate"
+    assert insufficient == {"status": "insufficient", "balance_before": 5.0, "balance_after": 5.0}
+    assert race["status"] == "race_insufficient"
+
+
+class _ChargeConn:
+    """Returns queued CHARGE_ONCE_SQL result rows; records how each transaction ended."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.transactions = []
+
+    async def fetchrow(self, sql, *args):
+        return self.rows.pop(0)
+
+    def transaction(self):
+        conn = self
+
+        class _Transaction:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, exc_type, exc, tb):
+                conn.transactions.append("rollback" if exc_type else "commit")
+                return False
+
+        return _Transaction()
+
+
+def _charge_storage(monkeypatch, rows):
+    conn = _ChargeConn(rows)
+
+    class _Acquire:
+        async def __aenter__(self):
+            return conn
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class _Pool:
+        def acquire(self):
+            return _Acquire()
+
+    storage = PostgresRowStorage("postgresql://example", partner_id="tenant-charge")
+
+    async def get_pool():
+        return _Pool()
+
+    monkeypatch.setattr(storage, "_get_pool", get_pool)
+    return storage, conn
+
+
+async def test_charge_outcomes_follow_the_cte_result(monkeypatch):
+    storage, conn = _charge_storage(
+        monkeypatch,
+        [
+            {"inserted": 1, "balance_after": 70.0, "balance_seen": 100.0, "already_charged": False},
+            {"inserted": 0, "balance_after": None, "balance_seen": 70.0, "already_charged": True},
+            {"inserted": 0, "balance_after": None, "balance_seen": 5.0, "already_charged": False},
+        ],
+    )
+
+    charged = await storage.charge_balance_once(1, 30.0, task_id="t-1")
+    duplicate = await storage.charge_balance_once(1, 30.0, task_id="t-1")
+    insufficient = await storage.charge_balance_once(1, 30.0, task_id="t-2")
+
+    assert charged == {"status": "charged", "balance_before": 100.0, "balance_after": 70.0}
+    assert duplicate == {"status": "duplicate", "balance_before": 70.0, "balance_after": 70.0}
+    assert insufficient == {"status": "insufficient", "balance_before": 5.0, "balance_after": 5.0}
+    assert conn.transactions == ["commit", "commit", "commit"]
+
+
+async def test_charge_race_reports_insufficient_and_rolls_back(monkeypatch):
+    storage, conn = _charge_storage(
+        monkeypatch,
+        [{"inserted": 1, "balance_after": None, "balance_seen": 12.0, "already_charged": False}],
+    )
+
+    result = await storage.charge_balance_once(1, 30.0, task_id="t-race")
+
+    assert result == {"status": "insufficient", "balance_before": 12.0, "balance_after": 12.0}
+    # The ledger insert is rolled back so the task can be charged again later.
+    assert conn.transactions == ["rollback"]
+
+
+def test_refund_result_mapping():
+    assert refund_result_from_row({"charged": 0, "amount": None, "refunded": 0, "balance_after": None})[
+        "status"
+    ] == "not_charged"
+    assert refund_result_from_row({"charged": 1, "amount": 10.0, "refunded": 0, "balance_after": None})[
+        "status"
+    ] == "duplicate"
+    assert refund_result_from_row({"charged": 1, "amount": 10.0, "refunded": 1, "balance_after": 60.0}) == {
+        "status": "refunded",
+        "amount": 10.0,
+        "balance_after": 60.0,
+    }
+
+
+def test_ledger_rows_from_deductions():
+    rows = ledger_rows_from_deductions(
+        {"task-1": {"user_id": 7, "amount": 12.5, "sku_id": "s"}, "task-2": {"amount": 1}, "task-3": "bad"}
+    )
+
+    assert rows == [("task-1", {"user_id": 7, "amount": 12.5, "sku_id": "s", "model_id": ""})]
+
+
+async def test_bot_refund_goes_through_the_ledger_when_storage_has_one(monkeypatch):
+    import bot_kie
+    from app.storage import factory
+
+    calls = []
+
+    class LedgerStorage:
+        async def refund_balance_once(self, user_id, *, task_id, reason=""):
+            calls.append((user_id, task_id, reason))
+            return {"status": "not_charged", "amount": 0.0, "balance_after": 5.0}
+
+    async def unexpected_add(user_id, amount):
+        raise AssertionError("uncharged task must not be credited")
+
+    monkeypatch.setattr(factory, "get_storage", lambda: LedgerStorage())
+    monkeypatch.setattr(bot_kie, "add_user_balance_async", unexpected_add)
+
+    result = await bot_kie._refund_balance_once(user_id=7, task_id="task-7", price=10.0, reason="task_failed")
+
+    assert result["status"] == "not_charged"
+    assert calls == [(7, "task-7", "task_failed")]
+
+
+async def _db_storage(partner_id):
+    dsn = os.getenv("DATABASE_URL", "").strip()
+    if not dsn:
+        pytest.skip("DATABASE_URL not set")
+    storage = PostgresRowStorage(dsn, partner_id=partner_id)
+    pool = await storage._get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute("DELETE FROM balance_ledger WHERE partner_id=$1", partner_id)
+        await conn.execute("DELETE FROM storage_balances WHERE partner_id=$1", partner_id)
+    return storage, pool
+
+
+async def test_db_charge_and_refund_apply_once():
+    storage, pool = await _db_storage("tenant-ledger-once")
+    try:
+        await storage.set_user_balance(501, 100.0)
+
+        first = await storage.charge_balance_once(501, 30.0, task_id="t-once", sku_id="s", model_id="m")
+        second = await storage.charge_balance_once(501, 30.0, task_id="t-once", sku_id="s", model_id="m")
+        refund = await storage.refund_balance_once(501, task_id="t-once", reason="task_failed")
+        refund_again = await storage.refund_balance_once(501, task_id="t-once", reason="task_failed")
+        not_charged = await storage.refund_balance_once(501, task_id="t-never", reason="task_failed")
+
+        assert first == {"status": "charged", "balance_before": 100.0, "balance_after": 70.0}
+        assert second["status"] == "duplicate"
+        assert refund == {"status": "refunded", "amount": 30.0, "balance_after": 100.0}
+        assert refund_again["status"] == "duplicate"
+        assert not_charged["status"] == "not_charged"
+        assert await storage.get_user_balance(501) == 100.0
+    finally:
+        await storage.close()
+
+
+async def test_db_charge_race_rolls_back_the_ledger_row():
+    storage, pool = await _db_storage("tenant-ledger-race")
+    try:
+        await storage.set_user_balance(502, 50.0)
+        async with pool.acquire() as conn:
+            drain = conn.transaction()
+            await drain.start()
+            # Hold the balance row drained but uncommitted: the charge snapshot still sees 50.
+            await conn.execute(
+                "UPDATE storage_balances SET amount = 0 WHERE partner_id=$1 AND user_id=$2",
+                "tenant-ledger-race",
+                502,
+            )
+            charge = asyncio.create_task(storage.charge_balance_once(502, 40.0, task_id="t-race"))
+            await asyncio.sleep(0.2)
+            assert not charge.done()
+            await drain.commit()
+        result = await asyncio.wait_for(charge, timeout=5)
+        async with pool.acquire() as conn:
+            ledger_rows = await conn.fetchval(
+                "SELECT count(*) FROM balance_ledger WHERE partner_id=$1 AND task_id=$2",
+                "tenant-ledger-race",
+                "t-race",
+            )
+
+        assert result["status"] == "insufficient"
+        assert ledger_rows == 0
+        await storage.add_user_balance(502, 40.0)
+        retry = await storage.charge_balance_once(502, 40.0, task_id="t-race")
+        assert retry["status"] == "charged"
+    finally:
+        await storage.close()
@@ -1,7 +1,7 @@
 from decimal import Decimal
 
 from app.pricing import price_ssot
-from app.pricing.price_ssot import PriceSku, list_variants_with_prices
+from app.pricing.price_ssot import PriceSku, PricingIndex, list_variants_with_prices
 
 
 def test_list_variants_with_prices_filters_by_selected_params(monkeypatch):
@@ -29,7 +29,8 @@ def test_list_variants_with_prices_filters_by_selected_params(monkeypatch):
         ),
     ]
 
-    monkeypatch.setattr(price_ssot, "list_model_skus", lambda _model_id: skus)
+    index = PricingIndex({"model-a": skus})
+    monkeypatch.setattr(price_ssot, "get_pricing_index", lambda: index)
 
     variants = list_variants_with_prices("model-a", "size", {"style": "a"})
 
@@ -0,0 +1,93 @@
+import itertools
+import os
+from decimal import Decimal
+
+from app.pricing import price_ssot
+from app.pricing.price_ssot import (
+    get_pricing_index,
+    list_all_models,
+    list_model_skus,
+    list_variants_with_prices,
+    reset_price_ssot_cache,
+    resolve_sku_for_params,
+)
+
+
+def _norm(value):
+    return price_ssot._normalize_param_value(value)
+
+
+def _linear_resolve(skus, params):
+    normalized = {k: _norm(v) for k, v in params.items()}
+    matches = [
+        sku
+        for sku in skus
+        if not any(normalized.get(k) != _norm(v) for k, v in sku.params.items())
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _linear_variants(skus, param_name, partial):
+    normalized_partial = {k: _norm(v) for k, v in partial.items() if k != param_name}
+    values = {}
+    for sku in skus:
+        if param_name not in sku.params:
+            continue
+        sku_params = {k: _norm(v) for k, v in sku.params.items()}
+        if any(sku_params.get(k) != v for k, v in normalized_partial.items()):
+            continue
+        value = _norm(sku.params[param_name])
+        if value not in values or sku.price_rub < values[value]:
+            values[value] = sku.price_rub
+    return sorted(values.items())
+
+
+def _param_grid(skus):
+    values = {}
+    for sku in skus:
+        for key, value in sku.params.items():
+            values.setdefault(key, []).append(value)
+    keys = sorted(values)
+    for combo in itertools.product(*(sorted(set(map(str, values[key]))) + ["missing"] for key in keys)):
+        yield {key: value for key, value in zip(keys, combo) if value != "missing"}
+
+
+def test_index_matches_linear_scan_for_whole_catalog():
+    checked = 0
+    for model_id in list_all_models():
+        skus = list_model_skus(model_id)
+        for params in itertools.islice(_param_grid(skus), 200):
+            assert resolve_sku_for_params(model_id, params) == _linear_resolve(skus, params), (model_id, params)
+            for param_name in params:
+                expected = _linear_variants(skus, param_name, params)
+                assert list_variants_with_prices(model_id, param_name, params) == expected
+            checked += 1
+    assert checked > 0
+
+
+def test_index_rebuilds_when_ssot_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "pricing.yaml"
+    path.write_text(
+        "models:\n  - id: m\n    skus:\n      - params: {size: s}\n        price_rub: 5\n",
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(price_ssot, "PRICING_SSOT_PATH", path)
+    monkeypatch.setattr(price_ssot, "PRICING_INDEX_STAT_INTERVAL_SECONDS", 0.0)
+    reset_price_ssot_cache()
+    try:
+        first = get_pricing_index()
+        assert resolve_sku_for_params("m", {"size": "s"}).price_rub == Decimal("5")
+        assert get_pricing_index() is first
+
+        path.write_text(
+            "models:\n  - id: m\n    skus:\n      - params: {size: s}\n        price_rub: 7\n",
+            encoding="utf-8",
+        )
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert resolve_sku_for_params("m", {"size": "s"}).price_rub == Decimal("7")
+        assert get_pricing_index() is not first
+    finally:
+        monkeypatch.undo()
+        reset_price_ssot_cache()
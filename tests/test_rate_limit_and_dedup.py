@@ -1,4 +1,5 @@
-from app.middleware.rate_limit import PerUserRateLimiter, TTLCache
+from app.middleware.rate_limit import PerKeyRateLimiter, PerUserRateLimiter, TTLCache
+from app.utils.expiring_map import ExpiringMap
 
 
 def test_token_bucket_rate_limiter_blocks_and_recovers():
@@ -31,3 +32,40 @@ def test_ttl_cache_dedup_expires():
 
     now[0] += 6.0
     assert cache.seen("key") is False
+
+
+def test_idle_buckets_expire_and_key_count_is_bounded():
+    now = [0.0]
+    limiter = PerKeyRateLimiter(rate=1.0, capacity=2.0, time_fn=lambda: now[0], max_keys=100)
+    for key in range(1000):
+        limiter.check(key)
+    assert len(limiter) == 100
+
+    now[0] += 3.0
+    limiter.check("fresh")
+    assert len(limiter) == 1
+    assert limiter.stats()["evictions"] == 900
+
+
+def test_ttl_cache_evicts_oldest_key_when_full():
+    cache = TTLCache(ttl_seconds=60.0, time_fn=lambda: 0.0, max_size=3)
+    for key in ("a", "b", "c", "d"):
+        assert cache.seen(key) is False
+    assert len(cache) == 3
+    assert cache.seen("d") is True
+    assert cache.seen("a") is False
+
+
+def test_expiring_map_purges_from_head_only():
+    now = [0.0]
+    entries = ExpiringMap(10.0, time_fn=lambda: now[0])
+    entries.set("a", 1)
+    now[0] = 5.0
+    entries.set("b", 2)
+    now[0] = 11.0
+    assert entries.purge() == 1
+    assert list(entries.items()) == [("b", 2)]
+    entries.set("b", 3, ttl_seconds=1.0)
+    now[0] = 12.5
+    assert entries.get("b") is None
+    assert len(entries) == 0
@@ -0,0 +1,81 @@
+from app.kie_contract import schema_compiler, schema_loader
+from app.kie_contract.normalizer import normalize_payload
+from app.kie_contract.validator import validate_payload as validate_contract
+from app.ux.form_engine import build_form_fields, validate_payload
+
+REGISTRY = """
+models:
+  demo/model:
+    input:
+      prompt: {type: string, required: true, max: 10}
+      aspect_ratio: {type: enum, required: false, values: ["1:1", "16:9"], default: "1:1"}
+      steps: {type: integer, required: false, min: 1, max: 50}
+      sound: {type: boolean, required: false}
+      image_urls: {type: array, required: false, item_type: string}
+"""
+
+
+def _use_registry(tmp_path, monkeypatch, text=REGISTRY):
+    path = tmp_path / "kie_models.yaml"
+    path.write_text(text, encoding="utf-8")
+    monkeypatch.setattr(schema_loader, "REGISTRY_PATH", path)
+    schema_loader.reset_registry_cache()
+    schema_compiler.reset_compiled_schemas()
+    return path
+
+
+def test_compiled_schema_precomputes_lookups(tmp_path, monkeypatch):
+    _use_registry(tmp_path, monkeypatch)
+    try:
+        compiled = schema_compiler.get_compiled_schema("demo/model")
+        assert compiled is schema_compiler.get_compiled_schema("demo/model")
+        assert compiled.required == ("prompt",)
+        assert compiled.defaults == {"aspect_ratio": "1:1"}
+        assert compiled.field_map["aspect_ratio"].enum_strings == frozenset({"1:1", "16:9"})
+        assert [field.name for field in build_form_fields("demo/model")] == list(compiled.field_map)
+        assert schema_compiler.get_compiled_schema("unknown/model") is None
+    finally:
+        schema_loader.reset_registry_cache()
+        schema_compiler.reset_compiled_schemas()
+
+
+def test_call_sites_share_compiled_schema(tmp_path, monkeypatch):
+    _use_registry(tmp_path, monkeypatch)
+    try:
+        payload = {"prompt": "cat", "steps": "20", "sound": "yes", "image_urls": "https://x/a.png"}
+        assert normalize_payload("demo/model", payload) == {
+            "prompt": "cat",
+            "steps": 20,
+            "sound": True,
+            "image_urls": ["https://x/a.png"],
+        }
+        ok, errors, normalized = validate_contract("demo/model", dict(payload, extra=1))
+        assert not ok
+        assert errors == ["Unexpected fields: ['extra']"]
+        assert normalized["steps"] == 20
+
+        ok, errors = validate_payload("demo/model", {"prompt": " ", "aspect_ratio": "4:3", "steps": 99})
+        assert not ok
+        assert errors == [
+            "prompt is required",
+            "aspect_ratio must be one of ['1:1', '16:9']",
+            "steps must be <= 50",
+        ]
+        assert validate_payload("demo/model", {"prompt": "cat", "other": 1}, ignore_unknown=True) == (True, [])
+    finally:
+        schema_loader.reset_registry_cache()
+        schema_compiler.reset_compiled_schemas()
+
+
+def test_compiled_schemas_follow_registry_file(tmp_path, monkeypatch):
+    path = _use_registry(tmp_path, monkeypatch)
+    try:
+        first = schema_compiler.get_compiled_schema("demo/model")
+        path.write_text(REGISTRY.replace("required: true", "required: false"), encoding="utf-8")
+        second = schema_compiler.get_compiled_schema("demo/model")
+        assert second is not first
+        assert second.required == ()
+        assert validate_payload("demo/model", {}) == (True, [])
+    finally:
+        schema_loader.reset_registry_cache()
+        schema_compiler.reset_compiled_schemas()
@@ -0,0 +1,144 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import session_store as session_store_module
+from app.session_backends import InMemorySessionBackend, SessionVersionConflict
+from app.session_store import SessionStore, SessionWriteBack, install_session_write_back
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _worker(backend):
+    store = SessionStore({})
+    return store, SessionWriteBack(store, backend, ttl_seconds=60)
+
+
+@pytest.mark.asyncio
+async def test_session_written_back_and_visible_to_other_worker():
+    backend = InMemorySessionBackend()
+    store_a, sync_a = _worker(backend)
+    store_b, sync_b = _worker(backend)
+
+    await sync_a.hydrate(1)
+    store_a.ensure(1)["model_id"] = "z-image"
+    assert await sync_a.flush(1) is True
+
+    await sync_b.hydrate(1)
+    assert store_b.get(1) == {"model_id": "z-image"}
+
+
+@pytest.mark.asyncio
+async def test_clean_update_does_not_write():
+    backend = InMemorySessionBackend()
+    store, sync = _worker(backend)
+    await sync.hydrate(1)
+    store.ensure(1)["step"] = 1
+    await sync.flush(1)
+
+    await sync.hydrate(1)
+    assert store.get(1)["step"] == 1
+    assert await sync.flush(1) is False
+    assert sync.metrics_snapshot()["writes"] == 1
+    assert sync.metrics_snapshot()["clean_skips"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hydrate_updates_session_in_place():
+    backend = InMemorySessionBackend()
+    store_a, sync_a = _worker(backend)
+    store_b, sync_b = _worker(backend)
+    await sync_a.hydrate(1)
+    store_a.ensure(1)["step"] = 1
+    await sync_a.flush(1)
+    await sync_b.hydrate(1)
+    held = store_b.get(1)
+
+    await sync_a.hydrate(1)
+    store_a.get(1)["step"] = 2
+    await sync_a.flush(1)
+    await sync_b.hydrate(1)
+
+    assert store_b.get(1) is held
+    assert held["step"] == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_write_detected_and_remote_adopted():
+    backend = InMemorySessionBackend()
+    store_a, sync_a = _worker(backend)
+    store_b, sync_b = _worker(backend)
+    await sync_a.hydrate(1)
+    await sync_b.hydrate(1)
+
+    store_a.ensure(1)["choice"] = "a"
+    store_b.ensure(1)["choice"] = "b"
+    assert await sync_a.flush(1) is True
+    assert await sync_b.flush(1) is False
+
+    assert sync_b.metrics_snapshot()["conflicts"] == 1
+    assert store_b.get(1) == {"choice": "a"}
+    assert (await backend.load(1)) == ({"choice": "a"}, 1)
+
+
+@pytest.mark.asyncio
+async def test_backend_rejects_stale_version():
+    backend = InMemorySessionBackend()
+    assert await backend.save(1, {"x": 1}, 0, 60) == 1
+    with pytest.raises(SessionVersionConflict) as excinfo:
+        await backend.save(1, {"x": 2}, 0, 60)
+    assert excinfo.value.actual == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_remote_session_is_dropped_locally():
+    clock = _Clock()
+    backend = InMemorySessionBackend(time_fn=clock)
+    store, sync = _worker(backend)
+    await sync.hydrate(1)
+    store.ensure(1)["step"] = 1
+    await sync.flush(1)
+
+    clock.now += 61
+    await sync.hydrate(1)
+    assert store.get(1) is None
+
+
+def test_local_store_expires_idle_sessions(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(session_store_module.time, "monotonic", clock)
+    store = SessionStore({}, ttl_seconds=60)
+    store.ensure(1)
+    clock.now += 30
+    store.ensure(2)
+    clock.now += 40
+
+    assert store.expire_idle() == 1
+    assert store.get(1) is None
+    assert store.get(2) == {}
+
+
+@pytest.mark.asyncio
+async def test_process_update_wrapper_hydrates_and_flushes(monkeypatch):
+    backend = InMemorySessionBackend()
+    store, sync = _worker(backend)
+    monkeypatch.setattr(session_store_module, "_session_write_back", sync)
+    await backend.save(7, {"lang": "en"}, 0, 60)
+    seen = {}
+
+    async def process_update(update):
+        seen["session"] = dict(store.get(update.effective_user.id))
+        store.get(update.effective_user.id)["lang"] = "ru"
+
+    application = SimpleNamespace(process_update=process_update)
+    install_session_write_back(application)
+    await application.process_update(SimpleNamespace(effective_user=SimpleNamespace(id=7)))
+
+    assert seen["session"] == {"lang": "en"}
+    assert (await backend.load(7)) == ({"lang": "ru"}, 2)
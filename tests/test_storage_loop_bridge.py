@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.storage.loop_bridge import StorageLoopBridge
+
+
+@pytest.fixture
+def bridge():
+    instance = StorageLoopBridge(name="test-storage-loop")
+    yield instance
+    instance.shutdown()
+
+
+async def _current_loop_id():
+    return id(asyncio.get_running_loop())
+
+
+def test_calls_from_many_threads_share_one_loop(bridge):
+    seen = []
+
+    def worker():
+        for _ in range(5):
+            seen.append(bridge.run(_current_loop_id(), label="loop_id"))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(seen) == 20
+    assert set(seen) == {id(bridge.loop)}
+    snapshot = bridge.snapshot()
+    assert snapshot["calls"] == 20
+    assert snapshot["queue_depth"] == 0
+    assert snapshot["latency_p95_ms"] is not None
+
+
+def test_timeout_cancels_coroutine_on_bridge_loop(bridge):
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(TimeoutError):
+        bridge.run(slow(), timeout=0.05, label="slow")
+
+    assert cancelled.wait(1)
+    assert bridge.snapshot()["timeouts"] == 1
+    assert bridge.run(_current_loop_id()) == id(bridge.loop)
+
+
+def test_reentrant_call_from_bridge_loop_does_not_deadlock(bridge):
+    async def outer():
+        return bridge.run(_current_loop_id(), timeout=1, label="inner")
+
+    inner_loop_id = bridge.run(outer(), timeout=2, label="outer")
+
+    assert inner_loop_id != id(bridge.loop)
+    assert bridge.snapshot()["reentrant"] == 1
+
+
+def test_errors_propagate_and_are_counted(bridge):
+    async def boom():
+        raise ValueError("storage down")
+
+    with pytest.raises(ValueError):
+        bridge.run(boom())
+
+    assert bridge.snapshot()["errors"] == 1
@@ -0,0 +1,202 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest, TimedOut
+
+from app.generations import telegram_file_cache, telegram_sender
+
+
+@pytest.fixture(autouse=True)
+def _reset_cache():
+    telegram_file_cache.reset_file_cache()
+    yield
+    telegram_file_cache.reset_file_cache()
+
+
+class MemoryStorage:
+    def __init__(self):
+        self.files = {}
+
+    async def read_json_file(self, filename, default=None):
+        return dict(self.files.get(filename, default or {}))
+
+    async def update_json_file(self, filename, update_fn, lock_mode=None):
+        self.files[filename] = update_fn(dict(self.files.get(filename, {})))
+        return self.files[filename]
+
+
+def _photo_message(file_id):
+    return SimpleNamespace(photo=[SimpleNamespace(file_id=f"{file_id}-small"), SimpleNamespace(file_id=file_id)])
+
+
+def _use_storage(monkeypatch, storage):
+    monkeypatch.setattr(telegram_file_cache, "_resolve_storage", lambda _storage: storage)
+
+
+def test_remember_and_lookup_survive_restart(monkeypatch):
+    storage = MemoryStorage()
+    _use_storage(monkeypatch, storage)
+
+    async def run():
+        url = "https://cdn.example.com/a.png"
+        assert await telegram_file_cache.get_cached_files([url]) is None
+        stored = await telegram_file_cache.remember_sent_media([url], "send_photo", _photo_message("fid-a"))
+        assert stored == 1
+        assert await telegram_file_cache.flush_file_cache() == 1
+
+        telegram_file_cache.reset_file_cache()
+        cached = await telegram_file_cache.get_cached_files([url])
+        assert [(entry.method, entry.file_id) for entry in cached] == [("send_photo", "fid-a")]
+        snapshot = telegram_file_cache.metrics_snapshot()
+        assert snapshot["hits"] == 1
+        assert snapshot["entries"] == 1
+
+    asyncio.run(run())
+
+
+def test_stores_are_batched_off_the_delivery_path(monkeypatch):
+    storage = MemoryStorage()
+    updates = []
+    original_update = storage.update_json_file
+
+    async def counting_update(filename, update_fn, lock_mode=None):
+        updates.append(filename)
+        return await original_update(filename, update_fn, lock_mode)
+
+    storage.update_json_file = counting_update
+    _use_storage(monkeypatch, storage)
+    monkeypatch.setattr(telegram_file_cache, "TG_FILE_CACHE_FLUSH_SECONDS", 0.05)
+
+    async def run():
+        for name in ("a", "b", "c"):
+            await telegram_file_cache.remember_sent_media([f"https://x/{name}.png"], "send_photo", _photo_message(name))
+        await telegram_file_cache.invalidate_cached_files(["https://x/b.png"])
+        assert updates == []
+        assert telegram_file_cache.metrics_snapshot()["pending"] == 3
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run())
+
+    assert updates == [telegram_file_cache.TELEGRAM_FILE_CACHE_FILE]
+    assert sorted(storage.files[telegram_file_cache.TELEGRAM_FILE_CACHE_FILE]) == sorted(
+        telegram_file_cache.cache_key(f"https://x/{name}.png") for name in ("a", "c")
+    )
+    assert telegram_file_cache.metrics_snapshot()["pending"] == 0
+
+
+def test_ambiguous_sends_are_not_cached(monkeypatch):
+    _use_storage(monkeypatch, MemoryStorage())
+
+    async def run():
+        urls = ["https://cdn.example.com/a.png", "https://cdn.example.com/b.png"]
+        assert await telegram_file_cache.remember_sent_media(urls, "send_photo", _photo_message("x")) == 0
+        assert await telegram_file_cache.remember_sent_media(urls, "send_media_group", [_photo_message("x")]) == 0
+        assert await telegram_file_cache.remember_sent_media(urls[:1], "send_photo", MagicMock()) == 0
+        assert telegram_file_cache.metrics_snapshot()["entries"] == 0
+
+    asyncio.run(run())
+
+
+def test_lru_and_ttl_eviction(monkeypatch):
+    storage = MemoryStorage()
+    _use_storage(monkeypatch, storage)
+    monkeypatch.setattr(telegram_file_cache, "TG_FILE_CACHE_MAX_ENTRIES", 2)
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(telegram_file_cache.time, "time", lambda: clock["now"])
+
+    async def run():
+        for name in ("a", "b"):
+            await telegram_file_cache.remember_sent_media([f"https://x/{name}.png"], "send_photo", _photo_message(name))
+        assert await telegram_file_cache.get_cached_files(["https://x/a.png"])
+        await telegram_file_cache.remember_sent_media(["https://x/c.png"], "send_photo", _photo_message("c"))
+        assert await telegram_file_cache.get_cached_files(["https://x/b.png"]) is None
+        assert await telegram_file_cache.get_cached_files(["https://x/a.png"])
+        await telegram_file_cache.flush_file_cache()
+        assert len(storage.files[telegram_file_cache.TELEGRAM_FILE_CACHE_FILE]) == 2
+
+        clock["now"] += telegram_file_cache.TG_FILE_CACHE_TTL_SECONDS + 1
+        assert await telegram_file_cache.get_cached_files(["https://x/c.png"]) is None
+
+    asyncio.run(run())
+
+
+def test_deliver_result_reuses_file_id_without_download(monkeypatch):
+    _use_storage(monkeypatch, MemoryStorage())
+    urls = ["https://cdn.example.com/a.png", "https://cdn.example.com/b.png"]
+    resolve_calls = []
+
+    async def fake_resolve(result, correlation_id, media_kind, kie_client, session, **kwargs):
+        resolve_calls.append(result["urls"])
+        return "send_media_group", {"media": [InputMediaPhoto(media=url) for url in result["urls"]]}
+
+    monkeypatch.setattr(telegram_sender, "resolve_and_prepare_telegram_payload", fake_resolve)
+    bot = MagicMock()
+    bot.send_media_group = AsyncMock(return_value=(_photo_message("fid-a"), _photo_message("fid-b")))
+
+    async def run():
+        for _ in range(2):
+            ok = await telegram_sender.deliver_result(
+                bot, 1, "image", urls, None, model_id="m", correlation_id="corr-cache"
+            )
+            assert ok
+
+    asyncio.run(run())
+
+    assert len(resolve_calls) == 1
+    assert bot.send_media_group.await_count == 2
+    cached_media = bot.send_media_group.await_args.kwargs["media"]
+    assert [item.media for item in cached_media] == ["fid-a", "fid-b"]
+
+
+def test_rejected_file_id_falls_back_to_upload(monkeypatch):
+    _use_storage(monkeypatch, MemoryStorage())
+    url = "https://cdn.example.com/a.png"
+
+    async def fake_resolve(result, correlation_id, media_kind, kie_client, session, **kwargs):
+        return "send_photo", {"photo": "uploaded", "caption": "c"}
+
+    monkeypatch.setattr(telegram_sender, "resolve_and_prepare_telegram_payload", fake_resolve)
+    bot = MagicMock()
+    bot.send_photo = AsyncMock(
+        side_effect=[BadRequest("Wrong file identifier/HTTP URL specified"), _photo_message("fid-new")]
+    )
+
+    async def run():
+        await telegram_file_cache.remember_sent_media([url], "send_photo", _photo_message("fid-old"))
+        assert await telegram_sender.deliver_result(bot, 1, "image", [url], None, correlation_id="corr-x")
+        cached = await telegram_file_cache.get_cached_files([url])
+        assert cached[0].file_id == "fid-new"
+
+    asyncio.run(run())
+
+    assert bot.send_photo.await_args.kwargs["photo"] == "uploaded"
+    assert telegram_file_cache.metrics_snapshot()["invalidations"] == 1
+
+
+@pytest.mark.parametrize("error", [TimedOut(), BadRequest("Chat not found")])
+def test_cached_send_errors_are_not_retried_as_upload(monkeypatch, error):
+    _use_storage(monkeypatch, MemoryStorage())
+    url = "https://cdn.example.com/a.png"
+    resolve_calls = []
+
+    async def fake_resolve(*args, **kwargs):
+        resolve_calls.append(args)
+        return "send_photo", {"photo": "uploaded"}
+
+    monkeypatch.setattr(telegram_sender, "resolve_and_prepare_telegram_payload", fake_resolve)
+    bot = MagicMock()
+    bot.send_photo = AsyncMock(side_effect=error)
+
+    async def run():
+        await telegram_file_cache.remember_sent_media([url], "send_photo", _photo_message("fid-old"))
+        with pytest.raises(type(error)):
+            await telegram_sender.deliver_result(bot, 1, "image", [url], None, correlation_id="corr-x")
+        assert (await telegram_file_cache.get_cached_files([url]))[0].file_id == "fid-old"
+
+    asyncio.run(run())
+
+    assert bot.send_photo.await_count == 1
+    assert resolve_calls == []